@@ -1338,6 +1338,101 @@ test_skip_tables(void)
     free(ts1);
 }
 
+static void
+test_load_mmap(void)
+{
+    int ret;
+    tsk_treeseq_t *ts1 = caterpillar_tree(5, 3, 3);
+    tsk_treeseq_t ts2, ts3;
+    tsk_table_collection_t t1;
+    FILE *f;
+
+    ret = tsk_treeseq_dump(ts1, _tmp_file_name, 0);
+    CU_ASSERT_EQUAL_FATAL(ret, 0);
+
+    ret = tsk_treeseq_load(&ts2, _tmp_file_name, TSK_LOAD_MMAP);
+    CU_ASSERT_EQUAL_FATAL(ret, 0);
+    CU_ASSERT_TRUE(tsk_table_collection_equals(ts1->tables, ts2.tables, 0));
+    CU_ASSERT_TRUE(ts2.tables->mapping.data != NULL);
+    CU_ASSERT_TRUE(tsk_table_collection_has_index(ts2.tables, 0));
+    tsk_treeseq_free(&ts2);
+
+    /* Two stores in one file are both mapped */
+    f = fopen(_tmp_file_name, "w+");
+    CU_ASSERT_FATAL(f != NULL);
+    ret = tsk_treeseq_dumpf(ts1, f, 0);
+    CU_ASSERT_EQUAL_FATAL(ret, 0);
+    ret = tsk_treeseq_dumpf(ts1, f, 0);
+    CU_ASSERT_EQUAL_FATAL(ret, 0);
+    rewind(f);
+    ret = tsk_treeseq_loadf(&ts2, f, TSK_LOAD_MMAP);
+    CU_ASSERT_EQUAL_FATAL(ret, 0);
+    ret = tsk_treeseq_loadf(&ts3, f, TSK_LOAD_MMAP);
+    CU_ASSERT_EQUAL_FATAL(ret, 0);
+    CU_ASSERT_EQUAL(fgetc(f), EOF);
+    CU_ASSERT_TRUE(tsk_table_collection_equals(ts1->tables, ts2.tables, 0));
+    CU_ASSERT_TRUE(tsk_table_collection_equals(ts1->tables, ts3.tables, 0));
+    fclose(f);
+    tsk_treeseq_free(&ts2);
+    tsk_treeseq_free(&ts3);
+
+    /* Mapped tables are read-only, so can't be loaded into a table collection */
+    ret = tsk_table_collection_load(&t1, _tmp_file_name, TSK_LOAD_MMAP);
+    CU_ASSERT_EQUAL_FATAL(ret, TSK_ERR_BAD_PARAM_VALUE);
+    tsk_table_collection_free(&t1);
+    f = fopen(_tmp_file_name, "r");
+    CU_ASSERT_FATAL(f != NULL);
+    ret = tsk_table_collection_loadf(&t1, f, TSK_LOAD_MMAP);
+    CU_ASSERT_EQUAL_FATAL(ret, TSK_ERR_BAD_PARAM_VALUE);
+    tsk_table_collection_free(&t1);
+    fclose(f);
+
+    tsk_treeseq_free(ts1);
+    free(ts1);
+}
+
+static void
+test_column_residency(void)
+{
+    int ret;
+    tsk_treeseq_t *ts1 = caterpillar_tree(5, 3, 3);
+    tsk_treeseq_t ts2;
+    tsk_size_t j, *resident;
+    const tsk_mapped_column_t *column;
+    bool found = false;
+
+    /* Tables that aren't memory mapped have no columns */
+    CU_ASSERT_EQUAL(ts1->tables->mapping.num_columns, 0);
+    ret = tsk_table_collection_get_column_residency(ts1->tables, NULL);
+    CU_ASSERT_EQUAL_FATAL(ret, 0);
+
+    ret = tsk_treeseq_dump(ts1, _tmp_file_name, 0);
+    CU_ASSERT_EQUAL_FATAL(ret, 0);
+    ret = tsk_treeseq_load(&ts2, _tmp_file_name, TSK_LOAD_MMAP);
+    CU_ASSERT_EQUAL_FATAL(ret, 0);
+    CU_ASSERT_TRUE_FATAL(ts2.tables->mapping.num_columns > 0);
+    resident = tsk_malloc(ts2.tables->mapping.num_columns * sizeof(*resident));
+    CU_ASSERT_FATAL(resident != NULL);
+    ret = tsk_table_collection_get_column_residency(ts2.tables, resident);
+    CU_ASSERT_EQUAL_FATAL(ret, 0);
+    for (j = 0; j < ts2.tables->mapping.num_columns; j++) {
+        column = &ts2.tables->mapping.columns[j];
+        CU_ASSERT_TRUE(resident[j] <= column->size);
+        if (strcmp(column->name, "nodes/time") == 0) {
+            found = true;
+            CU_ASSERT_EQUAL(column->size, ts2.tables->nodes.num_rows * sizeof(double));
+            /* The node times have been read by tsk_treeseq_init */
+            CU_ASSERT_EQUAL(resident[j], column->size);
+        }
+    }
+    CU_ASSERT_TRUE(found);
+    free(resident);
+    tsk_treeseq_free(&ts2);
+
+    tsk_treeseq_free(ts1);
+    free(ts1);
+}
+
 static void
 test_skip_reference_sequence(void)
 {
@@ -1424,6 +1519,8 @@ main(int argc, char **argv)
         { "test_copy_store_drop_columns", test_copy_store_drop_columns },
         { "test_skip_tables", test_skip_tables },
         { "test_skip_reference_sequence", test_skip_reference_sequence },
+        { "test_load_mmap", test_load_mmap },
+        { "test_column_residency", test_column_residency },
         { NULL, NULL },
     };
 
@@ -46,6 +46,90 @@ multi_mutations_exist(tsk_treeseq_t *ts, tsk_id_t start, tsk_id_t end)
     return false;
 }
 
+static void
+verify_ld_matrix(tsk_treeseq_t *ts)
+{
+    int ret;
+    tsk_id_t num_sites = (tsk_id_t) tsk_treeseq_get_num_sites(ts);
+    const double *position = ts->tables->sites.position;
+    double *r2 = tsk_malloc((tsk_size_t)(num_sites * num_sites + 1) * sizeof(*r2));
+    /* The full matrix computed for the last distance is reused below */
+    double max_distances[] = { 0, 0.1, 1.5, DBL_MAX };
+    tsk_ld_calc_t ld_calc;
+    tsk_id_t a, b, row_start, col_start;
+    tsk_size_t j;
+    double x;
+
+    CU_ASSERT_FATAL(r2 != NULL);
+    ret = tsk_ld_calc_init(&ld_calc, ts);
+    CU_ASSERT_EQUAL_FATAL(ret, 0);
+
+    for (j = 0; j < sizeof(max_distances) / sizeof(*max_distances); j++) {
+        ret = tsk_ld_calc_get_r2_matrix(
+            &ld_calc, 0, num_sites, 0, num_sites, max_distances[j], r2);
+        if (multi_mutations_exist(ts, 0, num_sites)) {
+            CU_ASSERT_EQUAL_FATAL(ret, TSK_ERR_ONLY_INFINITE_SITES);
+            continue;
+        }
+        CU_ASSERT_EQUAL_FATAL(ret, 0);
+        for (a = 0; a < num_sites; a++) {
+            for (b = 0; b < num_sites; b++) {
+                x = r2[a * num_sites + b];
+                if (fabs(position[a] - position[b]) > max_distances[j]) {
+                    CU_ASSERT_FATAL(isnan(x));
+                } else if (a == b) {
+                    CU_ASSERT_EQUAL_FATAL(x, 1.0);
+                } else {
+                    CU_ASSERT_DOUBLE_EQUAL_FATAL(x, r2[b * num_sites + a], 1e-12);
+                }
+            }
+        }
+    }
+    if (!multi_mutations_exist(ts, 0, num_sites)) {
+        /* Compute each entry as a single-cell block and compare */
+        for (a = 0; a < num_sites; a++) {
+            for (b = 0; b < num_sites; b++) {
+                ret = tsk_ld_calc_get_r2_matrix(
+                    &ld_calc, a, a + 1, b, b + 1, DBL_MAX, &x);
+                CU_ASSERT_EQUAL_FATAL(ret, 0);
+                if (a == b) {
+                    CU_ASSERT_EQUAL_FATAL(x, 1.0);
+                } else {
+                    CU_ASSERT_EQUAL_FATAL(x, r2[a * num_sites + b]);
+                }
+            }
+        }
+        /* Empty blocks are fine */
+        for (row_start = 0; row_start <= num_sites; row_start++) {
+            for (col_start = 0; col_start <= num_sites; col_start++) {
+                ret = tsk_ld_calc_get_r2_matrix(
+                    &ld_calc, row_start, row_start, col_start, num_sites, DBL_MAX, r2);
+                CU_ASSERT_EQUAL_FATAL(ret, 0);
+                ret = tsk_ld_calc_get_r2_matrix(
+                    &ld_calc, row_start, num_sites, col_start, col_start, DBL_MAX, r2);
+                CU_ASSERT_EQUAL_FATAL(ret, 0);
+            }
+        }
+    }
+
+    /* Check some error conditions */
+    ret = tsk_ld_calc_get_r2_matrix(&ld_calc, -1, 0, 0, num_sites, DBL_MAX, r2);
+    CU_ASSERT_EQUAL(ret, TSK_ERR_SITE_OUT_OF_BOUNDS);
+    ret = tsk_ld_calc_get_r2_matrix(&ld_calc, 0, num_sites + 1, 0, 0, DBL_MAX, r2);
+    CU_ASSERT_EQUAL(ret, TSK_ERR_SITE_OUT_OF_BOUNDS);
+    ret = tsk_ld_calc_get_r2_matrix(&ld_calc, 0, 0, -1, 0, DBL_MAX, r2);
+    CU_ASSERT_EQUAL(ret, TSK_ERR_SITE_OUT_OF_BOUNDS);
+    ret = tsk_ld_calc_get_r2_matrix(&ld_calc, 0, 0, 0, num_sites + 1, DBL_MAX, r2);
+    CU_ASSERT_EQUAL(ret, TSK_ERR_SITE_OUT_OF_BOUNDS);
+    ret = tsk_ld_calc_get_r2_matrix(&ld_calc, 1, 0, 0, 0, DBL_MAX, r2);
+    CU_ASSERT_EQUAL(ret, TSK_ERR_SITE_OUT_OF_BOUNDS);
+    ret = tsk_ld_calc_get_r2_matrix(&ld_calc, 0, 0, 0, 0, -1, r2);
+    CU_ASSERT_EQUAL(ret, TSK_ERR_BAD_PARAM_VALUE);
+
+    tsk_ld_calc_free(&ld_calc);
+    free(r2);
+}
+
 static void
 verify_ld(tsk_treeseq_t *ts)
 {
@@ -180,6 +264,8 @@ verify_ld(tsk_treeseq_t *ts)
     free(r2_prime);
     free(sites);
     free(num_site_mutations);
+
+    verify_ld_matrix(ts);
 }
 
 /* FIXME: this test is weak and should check the return value somehow.
@@ -670,6 +756,72 @@ general_stat_sum(
     return 0;
 }
 
+static int
+general_stat_sum_batch(
+    tsk_size_t K, tsk_size_t N, const double *X, tsk_size_t M, double *Y, void *params)
+{
+    tsk_size_t j;
+    int ret = 0;
+    int *num_calls = (int *) params;
+
+    CU_ASSERT_FATAL(N > 0);
+    (*num_calls)++;
+    for (j = 0; j < N; j++) {
+        ret = general_stat_sum(K, X + j * K, M, Y + j * M, NULL);
+        CU_ASSERT_FATAL(ret == 0);
+    }
+    return ret;
+}
+
+static int
+general_stat_batch_error(tsk_size_t TSK_UNUSED(K), tsk_size_t TSK_UNUSED(N),
+    const double *TSK_UNUSED(X), tsk_size_t TSK_UNUSED(M), double *TSK_UNUSED(Y),
+    void *TSK_UNUSED(params))
+{
+    return -12345;
+}
+
+static void
+verify_general_stat_batch(
+    tsk_treeseq_t *ts, tsk_size_t K, tsk_size_t M, tsk_flags_t options)
+{
+    int ret;
+    tsk_size_t num_samples = tsk_treeseq_get_num_samples(ts);
+    tsk_size_t num_nodes = tsk_treeseq_get_num_nodes(ts);
+    double *W = tsk_malloc(K * num_samples * sizeof(double));
+    double *sigma1 = tsk_calloc(num_nodes * M, sizeof(double));
+    double *sigma2 = tsk_calloc(num_nodes * M, sizeof(double));
+    tsk_size_t j;
+    int num_calls = 0;
+    CU_ASSERT_FATAL(W != NULL);
+    CU_ASSERT_FATAL(sigma1 != NULL);
+    CU_ASSERT_FATAL(sigma2 != NULL);
+
+    for (j = 0; j < K * num_samples; j++) {
+        W[j] = (double) (j % 3);
+    }
+    ret = tsk_treeseq_general_stat(
+        ts, K, W, M, general_stat_sum, NULL, 0, NULL, options, sigma1);
+    CU_ASSERT_EQUAL_FATAL(ret, 0);
+    ret = tsk_treeseq_general_stat_batch(
+        ts, K, W, M, general_stat_sum_batch, &num_calls, 0, NULL, options, sigma2);
+    CU_ASSERT_EQUAL_FATAL(ret, 0);
+    /* At most two calls per tree and one for the initial conditions */
+    CU_ASSERT_FATAL(num_calls <= 2 * (int) tsk_treeseq_get_num_trees(ts) + 2);
+    for (j = 0; j < num_nodes * M; j++) {
+        CU_ASSERT_DOUBLE_EQUAL_FATAL(sigma1[j], sigma2[j], 1e-9);
+    }
+    if (!((options & TSK_STAT_SITE) && tsk_treeseq_get_num_sites(ts) == 0)) {
+        ret = tsk_treeseq_general_stat_batch(
+            ts, K, W, M, general_stat_batch_error, NULL, 0, NULL, options, sigma2);
+        CU_ASSERT_EQUAL_FATAL(ret, -12345);
+    }
+
+    free(W);
+    free(sigma1);
+    free(sigma2);
+}
+
 static void
 verify_general_stat_dims(
     tsk_treeseq_t *ts, tsk_size_t K, tsk_size_t M, tsk_flags_t options)
@@ -730,6 +882,62 @@ verify_general_stat_windows(
     free(windows);
 }
 
+static void
+verify_general_stat_partial_windows(
+    tsk_treeseq_t *ts, tsk_size_t num_windows, tsk_flags_t options)
+{
+    int ret;
+    tsk_size_t num_samples = tsk_treeseq_get_num_samples(ts);
+    double *W = tsk_malloc(num_samples * sizeof(double));
+    tsk_size_t M = 2;
+    tsk_size_t stride
+        = (options & TSK_STAT_NODE) ? M * tsk_treeseq_get_num_nodes(ts) : M;
+    double *sigma = tsk_calloc(stride * num_windows, sizeof(double));
+    double *sigma_part = tsk_calloc(stride * num_windows, sizeof(double));
+    double *windows = tsk_malloc((num_windows + 1) * sizeof(*windows));
+    double L = tsk_treeseq_get_sequence_length(ts);
+    tsk_size_t j, k;
+    CU_ASSERT_FATAL(W != NULL);
+    CU_ASSERT_FATAL(sigma != NULL);
+    CU_ASSERT_FATAL(sigma_part != NULL);
+    CU_ASSERT_FATAL(windows != NULL);
+
+    for (j = 0; j < num_samples; j++) {
+        W[j] = 1;
+    }
+    windows[0] = 0;
+    windows[num_windows] = L;
+    for (j = 1; j < num_windows; j++) {
+        windows[j] = ((double) j) * L / (double) num_windows;
+    }
+    ret = tsk_treeseq_general_stat(
+        ts, 1, W, M, general_stat_sum, NULL, num_windows, windows, options, sigma);
+    CU_ASSERT_EQUAL_FATAL(ret, 0);
+
+    for (k = 1; k < num_windows; k++) {
+        /* The windows either side of k do not cover the sequence */
+        ret = tsk_treeseq_general_stat(ts, 1, W, M, general_stat_sum, NULL,
+            num_windows - k, windows + k, options, sigma_part);
+        CU_ASSERT_EQUAL_FATAL(ret, TSK_ERR_BAD_WINDOWS);
+
+        ret = tsk_treeseq_general_stat(ts, 1, W, M, general_stat_sum, NULL, k, windows,
+            options | TSK_STAT_PARTIAL_WINDOWS, sigma_part);
+        CU_ASSERT_EQUAL_FATAL(ret, 0);
+        ret = tsk_treeseq_general_stat(ts, 1, W, M, general_stat_sum, NULL,
+            num_windows - k, windows + k, options | TSK_STAT_PARTIAL_WINDOWS,
+            sigma_part + k * stride);
+        CU_ASSERT_EQUAL_FATAL(ret, 0);
+        for (j = 0; j < stride * num_windows; j++) {
+            CU_ASSERT_DOUBLE_EQUAL_FATAL(sigma[j], sigma_part[j], 1e-9);
+        }
+    }
+
+    free(W);
+    free(sigma);
+    free(sigma_part);
+    free(windows);
+}
+
 static void
 verify_default_general_stat(tsk_treeseq_t *ts)
 {
@@ -780,6 +988,11 @@ verify_general_stat(tsk_treeseq_t *ts, tsk_flags_t mode)
     verify_general_stat_windows(ts, 10, mode | TSK_STAT_SPAN_NORMALISE);
     verify_general_stat_windows(ts, 100, mode);
     verify_general_stat_windows(ts, 100, mode | TSK_STAT_SPAN_NORMALISE);
+    verify_general_stat_batch(ts, 1, 1, mode);
+    verify_general_stat_batch(ts, 3, 2, mode | TSK_STAT_POLARISED);
+    verify_general_stat_batch(ts, 2, 3, mode | TSK_STAT_SPAN_NORMALISE);
+    verify_general_stat_partial_windows(ts, 2, mode);
+    verify_general_stat_partial_windows(ts, 7, mode | TSK_STAT_SPAN_NORMALISE);
 }
 
 static void
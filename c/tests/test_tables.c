@@ -7856,6 +7856,102 @@ verify_ibd_segment_list(tsk_identity_segment_list_t *list, tsk_size_t num_nodes)
     CU_ASSERT_EQUAL_FATAL(num_segments, list->num_segments);
 }
 
+static void
+verify_ibd_arrays(tsk_identity_segments_t *result, const tsk_id_t *pairs,
+    tsk_identity_segment_list_t **lists)
+{
+    int ret;
+    tsk_size_t j, k;
+    tsk_size_t num_pairs = tsk_identity_segments_get_num_pairs(result);
+    tsk_size_t num_segments = tsk_identity_segments_get_num_segments(result);
+    tsk_id_t *pair_a = tsk_malloc(num_segments * sizeof(*pair_a));
+    tsk_id_t *pair_b = tsk_malloc(num_segments * sizeof(*pair_b));
+    double *left = tsk_malloc(num_segments * sizeof(*left));
+    double *right = tsk_malloc(num_segments * sizeof(*right));
+    tsk_id_t *node = tsk_malloc(num_segments * sizeof(*node));
+    tsk_identity_segment_t *seg;
+
+    CU_ASSERT_FATAL(pair_a != NULL);
+    CU_ASSERT_FATAL(pair_b != NULL);
+    CU_ASSERT_FATAL(left != NULL);
+    CU_ASSERT_FATAL(right != NULL);
+    CU_ASSERT_FATAL(node != NULL);
+
+    ret = tsk_identity_segments_get_arrays(result, pair_a, pair_b, left, right, node);
+    if (!result->store_segments) {
+        CU_ASSERT_EQUAL_FATAL(ret, TSK_ERR_IBD_SEGMENTS_NOT_STORED);
+    } else {
+        CU_ASSERT_EQUAL_FATAL(ret, 0);
+        k = 0;
+        for (j = 0; j < num_pairs; j++) {
+            for (seg = lists[j]->head; seg != NULL; seg = seg->next) {
+                CU_ASSERT_FATAL(k < num_segments);
+                CU_ASSERT_EQUAL(pair_a[k], pairs[2 * j]);
+                CU_ASSERT_EQUAL(pair_b[k], pairs[2 * j + 1]);
+                CU_ASSERT_EQUAL(left[k], seg->left);
+                CU_ASSERT_EQUAL(right[k], seg->right);
+                CU_ASSERT_EQUAL(node[k], seg->node);
+                k++;
+            }
+        }
+        CU_ASSERT_EQUAL(k, num_segments);
+    }
+    free(pair_a);
+    free(pair_b);
+    free(left);
+    free(right);
+    free(node);
+}
+
+static void
+verify_ibd_span_matrix(tsk_identity_segments_t *result, const tsk_id_t *pairs,
+    tsk_identity_segment_list_t **lists)
+{
+    int ret;
+    tsk_size_t j;
+    tsk_id_t a, b;
+    tsk_size_t N = result->num_nodes;
+    tsk_size_t num_pairs = tsk_identity_segments_get_num_pairs(result);
+    tsk_size_t *sizes = tsk_malloc(N * sizeof(*sizes));
+    tsk_id_t *nodes = tsk_malloc(N * sizeof(*nodes));
+    double *matrix = tsk_malloc(N * N * sizeof(*matrix));
+    double total_span = 0;
+    double pairs_span = 0;
+
+    CU_ASSERT_FATAL(sizes != NULL);
+    CU_ASSERT_FATAL(nodes != NULL);
+    CU_ASSERT_FATAL(matrix != NULL);
+
+    /* With each node in its own set we get the span of each pair */
+    for (j = 0; j < N; j++) {
+        sizes[j] = 1;
+        nodes[j] = (tsk_id_t) j;
+    }
+    ret = tsk_identity_segments_get_span_matrix(result, N, sizes, nodes, matrix);
+    CU_ASSERT_EQUAL_FATAL(ret, 0);
+    for (j = 0; j < N * N; j++) {
+        total_span += matrix[j];
+    }
+    for (j = 0; j < num_pairs; j++) {
+        a = pairs[2 * j];
+        b = pairs[2 * j + 1];
+        CU_ASSERT_EQUAL(matrix[a * (tsk_id_t) N + b], lists[j]->total_span);
+        CU_ASSERT_EQUAL(matrix[b * (tsk_id_t) N + a], lists[j]->total_span);
+        pairs_span += lists[j]->total_span;
+    }
+    CU_ASSERT_DOUBLE_EQUAL(total_span, 2 * pairs_span, 1e-6);
+
+    /* With all nodes in one set we get the overall total span */
+    sizes[0] = N;
+    ret = tsk_identity_segments_get_span_matrix(result, 1, sizes, nodes, matrix);
+    CU_ASSERT_EQUAL_FATAL(ret, 0);
+    CU_ASSERT_DOUBLE_EQUAL(matrix[0], pairs_span, 1e-6);
+
+    free(sizes);
+    free(nodes);
+    free(matrix);
+}
+
 static void
 verify_ibd_result(tsk_identity_segments_t *result)
 {
@@ -7908,6 +8004,8 @@ verify_ibd_result(tsk_identity_segments_t *result)
     }
     CU_ASSERT_EQUAL_FATAL(result->num_segments, total_segments);
     CU_ASSERT_DOUBLE_EQUAL(result->total_span, total_span, 1e-6);
+    verify_ibd_arrays(result, pairs, lists);
+    verify_ibd_span_matrix(result, pairs, lists);
 
     free(pairs);
     free(pairs2);
@@ -8098,6 +8196,8 @@ test_ibd_segments_single_tree_options(void)
     tsk_id_t pairs[12];
     tsk_identity_segment_list_t *lists[6];
     tsk_flags_t options[2];
+    tsk_size_t sizes[] = { 1 };
+    double span_matrix[6];
     int k;
 
     tsk_treeseq_from_text(&ts, 1, single_tree_ex_nodes, single_tree_ex_edges, NULL, NULL,
@@ -8121,6 +8221,12 @@ test_ibd_segments_single_tree_options(void)
     CU_ASSERT_EQUAL_FATAL(ret, TSK_ERR_IBD_PAIRS_NOT_STORED);
     ret = tsk_identity_segments_get_items(&result, pairs, lists);
     CU_ASSERT_EQUAL_FATAL(ret, TSK_ERR_IBD_PAIRS_NOT_STORED);
+    ret = tsk_identity_segments_get_span_matrix(
+        &result, 1, sizes, (tsk_id_t *) pairs, span_matrix);
+    CU_ASSERT_EQUAL_FATAL(ret, TSK_ERR_IBD_PAIRS_NOT_STORED);
+    ret = tsk_identity_segments_get_arrays(
+        &result, pairs, pairs, span_matrix, span_matrix, pairs);
+    CU_ASSERT_EQUAL_FATAL(ret, TSK_ERR_IBD_SEGMENTS_NOT_STORED);
     tsk_identity_segments_free(&result);
 
     ret = tsk_table_collection_ibd_within(
@@ -8308,6 +8414,183 @@ test_ibd_segments_multiple_trees(void)
     tsk_treeseq_free(&ts);
 }
 
+typedef struct {
+    tsk_size_t num_segments;
+    tsk_size_t max_segments;
+    tsk_id_t a[64];
+    tsk_id_t b[64];
+    double left[64];
+    double right[64];
+    tsk_id_t node[64];
+} ibd_sink_buffer_t;
+
+static int
+ibd_sink(tsk_id_t a, tsk_id_t b, double left, double right, tsk_id_t node, void *params)
+{
+    ibd_sink_buffer_t *buffer = (ibd_sink_buffer_t *) params;
+    tsk_size_t j = buffer->num_segments;
+
+    if (j == buffer->max_segments) {
+        return -12345;
+    }
+    CU_ASSERT_FATAL(j < 64);
+    buffer->a[j] = a;
+    buffer->b[j] = b;
+    buffer->left[j] = left;
+    buffer->right[j] = right;
+    buffer->node[j] = node;
+    buffer->num_segments++;
+    return 0;
+}
+
+static void
+verify_ibd_stream(tsk_identity_segments_t *stored, ibd_sink_buffer_t *buffer)
+{
+    tsk_size_t j;
+    tsk_identity_segment_list_t *list;
+    tsk_identity_segment_t *seg;
+    bool found;
+    int ret;
+
+    CU_ASSERT_EQUAL_FATAL(
+        buffer->num_segments, tsk_identity_segments_get_num_segments(stored));
+    for (j = 0; j < buffer->num_segments; j++) {
+        CU_ASSERT_FATAL(buffer->a[j] < buffer->b[j]);
+        ret = tsk_identity_segments_get(stored, buffer->a[j], buffer->b[j], &list);
+        CU_ASSERT_EQUAL_FATAL(ret, 0);
+        CU_ASSERT_FATAL(list != NULL);
+        found = false;
+        for (seg = list->head; seg != NULL; seg = seg->next) {
+            found = found
+                    || (seg->left == buffer->left[j] && seg->right == buffer->right[j]
+                           && seg->node == buffer->node[j]);
+        }
+        CU_ASSERT_FATAL(found);
+    }
+}
+
+static void
+test_ibd_segments_stream(void)
+{
+    int ret;
+    tsk_treeseq_t ts;
+    tsk_id_t samples[] = { 0, 1, 2, 3 };
+    tsk_size_t sizes[] = { 2, 2 };
+    tsk_identity_segments_t stored, result;
+    ibd_sink_buffer_t buffer;
+
+    tsk_treeseq_from_text(&ts, 2, multiple_tree_ex_nodes, multiple_tree_ex_edges, NULL,
+        NULL, NULL, NULL, NULL, 0);
+
+    ret = tsk_table_collection_ibd_within(
+        ts.tables, &stored, NULL, 0, 0.0, DBL_MAX, TSK_IBD_STORE_SEGMENTS);
+    CU_ASSERT_EQUAL_FATAL(ret, 0);
+    tsk_memset(&buffer, 0, sizeof(buffer));
+    buffer.max_segments = 64;
+    ret = tsk_table_collection_ibd_within_stream(
+        ts.tables, &result, NULL, 0, 0.0, DBL_MAX, ibd_sink, &buffer, 0);
+    CU_ASSERT_EQUAL_FATAL(ret, 0);
+    CU_ASSERT_TRUE(buffer.num_segments > 0);
+    verify_ibd_stream(&stored, &buffer);
+    /* Only the summaries are kept */
+    CU_ASSERT_EQUAL_FATAL(tsk_identity_segments_get_num_segments(&result),
+        tsk_identity_segments_get_num_segments(&stored));
+    CU_ASSERT_EQUAL_FATAL(tsk_identity_segments_get_total_span(&result),
+        tsk_identity_segments_get_total_span(&stored));
+    CU_ASSERT_EQUAL_FATAL(tsk_identity_segments_get_num_pairs(&result), 0);
+    tsk_identity_segments_free(&result);
+    tsk_identity_segments_free(&stored);
+
+    ret = tsk_table_collection_ibd_between(
+        ts.tables, &stored, 2, sizes, samples, 0.0, DBL_MAX, TSK_IBD_STORE_SEGMENTS);
+    CU_ASSERT_EQUAL_FATAL(ret, 0);
+    tsk_memset(&buffer, 0, sizeof(buffer));
+    buffer.max_segments = 64;
+    ret = tsk_table_collection_ibd_between_stream(ts.tables, &result, 2, sizes, samples,
+        0.0, DBL_MAX, ibd_sink, &buffer, TSK_IBD_STORE_PAIRS);
+    CU_ASSERT_EQUAL_FATAL(ret, 0);
+    CU_ASSERT_TRUE(buffer.num_segments > 0);
+    verify_ibd_stream(&stored, &buffer);
+    CU_ASSERT_EQUAL_FATAL(tsk_identity_segments_get_num_pairs(&result),
+        tsk_identity_segments_get_num_pairs(&stored));
+    tsk_identity_segments_free(&result);
+    tsk_identity_segments_free(&stored);
+
+    /* Errors in the sink stop the search */
+    tsk_memset(&buffer, 0, sizeof(buffer));
+    buffer.max_segments = 1;
+    ret = tsk_table_collection_ibd_within_stream(
+        ts.tables, &result, NULL, 0, 0.0, DBL_MAX, ibd_sink, &buffer, 0);
+    CU_ASSERT_EQUAL_FATAL(ret, -12345);
+    CU_ASSERT_EQUAL_FATAL(buffer.num_segments, 1);
+    tsk_identity_segments_free(&result);
+    tsk_memset(&buffer, 0, sizeof(buffer));
+    ret = tsk_table_collection_ibd_between_stream(
+        ts.tables, &result, 2, sizes, samples, 0.0, DBL_MAX, ibd_sink, &buffer, 0);
+    CU_ASSERT_EQUAL_FATAL(ret, -12345);
+    CU_ASSERT_EQUAL_FATAL(buffer.num_segments, 0);
+    tsk_identity_segments_free(&result);
+
+    tsk_treeseq_free(&ts);
+}
+
+static void
+test_ibd_segments_span_matrix(void)
+{
+    int ret;
+    tsk_treeseq_t ts;
+    tsk_table_collection_t tables;
+    tsk_identity_segments_t result;
+    tsk_size_t sizes[] = { 2, 2 };
+    tsk_id_t sample_sets[] = { 0, 1, 2, 3 };
+    tsk_size_t partial_sizes[] = { 1, 2 };
+    tsk_id_t partial_sample_sets[] = { 3, 0, 1 };
+    tsk_id_t bad_sample_sets[] = { 0, 1, 1, 3 };
+    double matrix[4];
+
+    tsk_treeseq_from_text(&ts, 1, single_tree_ex_nodes, single_tree_ex_edges, NULL, NULL,
+        NULL, NULL, NULL, 0);
+    ret = tsk_treeseq_copy_tables(&ts, &tables, 0);
+    CU_ASSERT_EQUAL_FATAL(ret, 0);
+
+    ret = tsk_table_collection_ibd_within(
+        &tables, &result, NULL, 0, 0.0, DBL_MAX, TSK_IBD_STORE_PAIRS);
+    CU_ASSERT_EQUAL_FATAL(ret, 0);
+
+    /* All 6 pairs have an IBD segment covering the sequence */
+    ret = tsk_identity_segments_get_span_matrix(&result, 2, sizes, sample_sets, matrix);
+    CU_ASSERT_EQUAL_FATAL(ret, 0);
+    CU_ASSERT_EQUAL(matrix[0], 1);
+    CU_ASSERT_EQUAL(matrix[1], 4);
+    CU_ASSERT_EQUAL(matrix[2], 4);
+    CU_ASSERT_EQUAL(matrix[3], 1);
+
+    /* Nodes not in any sample set are ignored */
+    ret = tsk_identity_segments_get_span_matrix(
+        &result, 2, partial_sizes, partial_sample_sets, matrix);
+    CU_ASSERT_EQUAL_FATAL(ret, 0);
+    CU_ASSERT_EQUAL(matrix[0], 0);
+    CU_ASSERT_EQUAL(matrix[1], 2);
+    CU_ASSERT_EQUAL(matrix[2], 2);
+    CU_ASSERT_EQUAL(matrix[3], 1);
+
+    ret = tsk_identity_segments_get_span_matrix(
+        &result, 2, sizes, bad_sample_sets, matrix);
+    CU_ASSERT_EQUAL_FATAL(ret, TSK_ERR_DUPLICATE_SAMPLE);
+    bad_sample_sets[2] = -1;
+    ret = tsk_identity_segments_get_span_matrix(
+        &result, 2, sizes, bad_sample_sets, matrix);
+    CU_ASSERT_EQUAL_FATAL(ret, TSK_ERR_NODE_OUT_OF_BOUNDS);
+    bad_sample_sets[2] = (tsk_id_t) tables.nodes.num_rows;
+    ret = tsk_identity_segments_get_span_matrix(
+        &result, 2, sizes, bad_sample_sets, matrix);
+    CU_ASSERT_EQUAL_FATAL(ret, TSK_ERR_NODE_OUT_OF_BOUNDS);
+
+    tsk_identity_segments_free(&result);
+    tsk_table_collection_free(&tables);
+    tsk_treeseq_free(&ts);
+}
+
 static void
 test_ibd_segments_empty_result(void)
 {
@@ -8629,6 +8912,192 @@ test_simplify_metadata(void)
     tsk_table_collection_free(&tables);
 }
 
+/* Runs a simple haploid Wright-Fisher simulation with recombination and
+ * mutation, simplifying with a persistent simplifier and checking that
+ * the result is identical to sorting and simplifying from scratch. */
+static void
+verify_simplifier_wright_fisher(tsk_flags_t options, int simplify_interval)
+{
+    int ret;
+    tsk_id_t ret_id;
+    tsk_table_collection_t tables, expected;
+    tsk_simplifier_t simplifier;
+    const tsk_size_t N = 8;
+    const int num_generations = 30;
+    tsk_id_t parents[8], children[8], node_map[1024], expected_node_map[1024];
+    tsk_id_t left_parent, right_parent, site;
+    unsigned long rng = 12345;
+    double breakpoint, position;
+    char state;
+    tsk_size_t j, k, num_input_nodes;
+    int t;
+
+    ret = tsk_table_collection_init(&tables, 0);
+    CU_ASSERT_EQUAL_FATAL(ret, 0);
+    tables.sequence_length = 100;
+    for (j = 0; j < N; j++) {
+        ret_id = tsk_node_table_add_row(&tables.nodes, TSK_NODE_IS_SAMPLE,
+            num_generations, TSK_NULL, TSK_NULL, NULL, 0);
+        CU_ASSERT_FATAL(ret_id >= 0);
+        parents[j] = ret_id;
+    }
+    ret = tsk_simplifier_init(&simplifier, &tables, options);
+    CU_ASSERT_EQUAL_FATAL(ret, 0);
+    ret = tsk_table_collection_copy(&tables, &expected, 0);
+    CU_ASSERT_EQUAL_FATAL(ret, 0);
+
+    for (t = num_generations - 1; t >= 0; t--) {
+        for (j = 0; j < N; j++) {
+            rng = rng * 6364136223846793005UL + 1442695040888963407UL;
+            left_parent = parents[(rng >> 33) % N];
+            right_parent = parents[(rng >> 17) % N];
+            breakpoint = (double) (1 + (rng >> 40) % 99);
+            ret_id = tsk_node_table_add_row(
+                &tables.nodes, 0, t, TSK_NULL, TSK_NULL, NULL, 0);
+            CU_ASSERT_FATAL(ret_id >= 0);
+            children[j] = ret_id;
+            ret_id = tsk_edge_table_add_row(
+                &tables.edges, 0, breakpoint, left_parent, children[j], NULL, 0);
+            CU_ASSERT_FATAL(ret_id >= 0);
+            ret_id = tsk_edge_table_add_row(&tables.edges, breakpoint,
+                tables.sequence_length, right_parent, children[j], NULL, 0);
+            CU_ASSERT_FATAL(ret_id >= 0);
+            if ((rng >> 50) % 4 == 0) {
+                position = (double) ((rng >> 20) % 100) + 0.5;
+                state = (char) ('A' + t % 4);
+                site = TSK_NULL;
+                for (k = 0; k < tables.sites.num_rows; k++) {
+                    if (tables.sites.position[k] == position) {
+                        site = (tsk_id_t) k;
+                    }
+                }
+                if (site == TSK_NULL) {
+                    site = tsk_site_table_add_row(
+                        &tables.sites, position, "0", 1, NULL, 0);
+                    CU_ASSERT_FATAL(site >= 0);
+                }
+                ret_id = tsk_mutation_table_add_row(&tables.mutations, site, children[j],
+                    TSK_NULL, t, &state, 1, NULL, 0);
+                CU_ASSERT_FATAL(ret_id >= 0);
+            }
+        }
+        ret = tsk_table_collection_copy(&tables, &expected, TSK_NO_INIT);
+        CU_ASSERT_EQUAL_FATAL(ret, 0);
+        if (t % simplify_interval == 0) {
+            num_input_nodes = tables.nodes.num_rows;
+            ret = tsk_simplifier_run(&simplifier, children, N, node_map);
+            CU_ASSERT_EQUAL_FATAL(ret, 0);
+            ret = tsk_table_collection_sort(&expected, NULL, 0);
+            CU_ASSERT_EQUAL_FATAL(ret, 0);
+            ret = tsk_table_collection_simplify(
+                &expected, children, N, options, expected_node_map);
+            CU_ASSERT_EQUAL_FATAL(ret, 0);
+            CU_ASSERT_TRUE(tsk_table_collection_equals(&tables, &expected, 0));
+            CU_ASSERT_EQUAL(0,
+                memcmp(node_map, expected_node_map, num_input_nodes * sizeof(tsk_id_t)));
+            for (j = 0; j < N; j++) {
+                children[j] = node_map[children[j]];
+            }
+        }
+        tsk_memcpy(parents, children, sizeof(parents));
+    }
+    ret = tsk_table_collection_check_integrity(&tables, 0);
+    CU_ASSERT_EQUAL_FATAL(ret, 0);
+
+    tsk_simplifier_free(&simplifier);
+    tsk_table_collection_free(&tables);
+    tsk_table_collection_free(&expected);
+}
+
+static void
+test_simplifier_wright_fisher(void)
+{
+    verify_simplifier_wright_fisher(0, 1);
+    verify_simplifier_wright_fisher(0, 3);
+    verify_simplifier_wright_fisher(TSK_SIMPLIFY_FILTER_SITES, 1);
+    verify_simplifier_wright_fisher(TSK_SIMPLIFY_KEEP_UNARY, 2);
+    verify_simplifier_wright_fisher(TSK_SIMPLIFY_NO_FILTER_NODES, 5);
+}
+
+static void
+test_simplifier_errors(void)
+{
+    int ret;
+    tsk_table_collection_t tables;
+    tsk_simplifier_t simplifier;
+    tsk_id_t samples[] = { 0, 1 };
+    tsk_id_t ret_id;
+
+    ret = tsk_table_collection_init(&tables, 0);
+    CU_ASSERT_EQUAL_FATAL(ret, 0);
+    tables.sequence_length = 1;
+
+    ret = tsk_simplifier_init(&simplifier, &tables, TSK_SIMPLIFY_KEEP_INPUT_ROOTS);
+    CU_ASSERT_EQUAL_FATAL(ret, TSK_ERR_SIMPLIFIER_OPTION_NOT_SUPPORTED);
+    tsk_simplifier_free(&simplifier);
+    ret = tsk_simplifier_init(
+        &simplifier, &tables, TSK_SIMPLIFY_REDUCE_TO_SITE_TOPOLOGY);
+    CU_ASSERT_EQUAL_FATAL(ret, TSK_ERR_SIMPLIFIER_OPTION_NOT_SUPPORTED);
+    tsk_simplifier_free(&simplifier);
+    ret = tsk_simplifier_init(&simplifier, &tables,
+        TSK_SIMPLIFY_KEEP_UNARY | TSK_SIMPLIFY_KEEP_UNARY_IN_INDIVIDUALS);
+    CU_ASSERT_EQUAL_FATAL(ret, TSK_ERR_KEEP_UNARY_MUTUALLY_EXCLUSIVE);
+    tsk_simplifier_free(&simplifier);
+
+    ret = tsk_simplifier_init(&simplifier, &tables, 0);
+    CU_ASSERT_EQUAL_FATAL(ret, 0);
+    ret_id = tsk_node_table_add_row(&tables.nodes, 0, 0, TSK_NULL, TSK_NULL, NULL, 0);
+    CU_ASSERT_FATAL(ret_id >= 0);
+    ret_id = tsk_node_table_add_row(&tables.nodes, 0, 0, TSK_NULL, TSK_NULL, NULL, 0);
+    CU_ASSERT_FATAL(ret_id >= 0);
+
+    samples[0] = 10;
+    ret = tsk_simplifier_run(&simplifier, samples, 2, NULL);
+    CU_ASSERT_EQUAL_FATAL(ret, TSK_ERR_NODE_OUT_OF_BOUNDS);
+    samples[0] = 0;
+    ret = tsk_simplifier_run(&simplifier, samples, 2, NULL);
+    CU_ASSERT_EQUAL_FATAL(ret, 0);
+    CU_ASSERT_EQUAL_FATAL(tables.nodes.num_rows, 2);
+
+    ret_id = tsk_edge_table_add_row(&tables.edges, 0, 1, 5, 0, NULL, 0);
+    CU_ASSERT_FATAL(ret_id >= 0);
+    ret = tsk_simplifier_run(&simplifier, samples, 2, NULL);
+    CU_ASSERT_EQUAL_FATAL(ret, TSK_ERR_NODE_OUT_OF_BOUNDS);
+    tsk_edge_table_clear(&tables.edges);
+
+    ret = tsk_simplifier_run(&simplifier, samples, 2, NULL);
+    CU_ASSERT_EQUAL_FATAL(ret, 0);
+    ret_id = tsk_node_table_add_row(&tables.nodes, 0, 1, TSK_NULL, TSK_NULL, NULL, 0);
+    CU_ASSERT_FATAL(ret_id >= 0);
+    ret_id = tsk_edge_table_add_row(&tables.edges, 0, 1, 2, 0, NULL, 0);
+    CU_ASSERT_FATAL(ret_id >= 0);
+    ret_id = tsk_edge_table_add_row(&tables.edges, 0, 1, 2, 0, NULL, 0);
+    CU_ASSERT_FATAL(ret_id >= 0);
+    ret = tsk_simplifier_run(&simplifier, samples, 2, NULL);
+    CU_ASSERT_EQUAL_FATAL(ret, TSK_ERR_DUPLICATE_EDGES);
+    tsk_edge_table_clear(&tables.edges);
+    ret = tsk_node_table_truncate(&tables.nodes, 2);
+    CU_ASSERT_EQUAL_FATAL(ret, 0);
+
+    ret = tsk_simplifier_run(&simplifier, samples, 2, NULL);
+    CU_ASSERT_EQUAL_FATAL(ret, 0);
+    ret = tsk_node_table_truncate(&tables.nodes, 1);
+    CU_ASSERT_EQUAL_FATAL(ret, 0);
+    ret = tsk_simplifier_run(&simplifier, samples, 1, NULL);
+    CU_ASSERT_EQUAL_FATAL(ret, TSK_ERR_SIMPLIFIER_ROWS_REMOVED);
+    /* After an error the next call starts from scratch */
+    ret = tsk_simplifier_run(&simplifier, samples, 1, NULL);
+    CU_ASSERT_EQUAL_FATAL(ret, 0);
+
+    ret_id = tsk_edge_table_add_row(&tables.edges, 0, 1, 0, 0, "x", 1);
+    CU_ASSERT_FATAL(ret_id >= 0);
+    ret = tsk_simplifier_run(&simplifier, samples, 1, NULL);
+    CU_ASSERT_EQUAL_FATAL(ret, TSK_ERR_CANT_PROCESS_EDGES_WITH_METADATA);
+
+    tsk_simplifier_free(&simplifier);
+    tsk_table_collection_free(&tables);
+}
+
 static void
 test_edge_update_invalidates_index(void)
 {
@@ -8808,6 +9277,89 @@ test_sort_tables_offsets(void)
     free(ts);
 }
 
+static void
+test_sort_tables_sorted_prefix(void)
+{
+    int ret;
+    tsk_id_t ret_id;
+    tsk_treeseq_t *ts;
+    tsk_table_collection_t tables, expected;
+    tsk_table_sorter_t sorter;
+    tsk_edge_t edge;
+    tsk_size_t num_threads[] = { 0, 3 };
+    tsk_size_t j, k, n, num_prefix[5];
+    tsk_id_t m;
+
+    ts = caterpillar_tree(30, 10, 3);
+    ret = tsk_treeseq_copy_tables(ts, &expected, 0);
+    CU_ASSERT_EQUAL_FATAL(ret, 0);
+    ret = tsk_table_collection_sort(&expected, NULL, 0);
+    CU_ASSERT_EQUAL_FATAL(ret, 0);
+    n = expected.edges.num_rows;
+    num_prefix[0] = 0;
+    num_prefix[1] = 1;
+    num_prefix[2] = n / 2;
+    num_prefix[3] = n - 1;
+    num_prefix[4] = n;
+
+    for (j = 0; j < 5; j++) {
+        for (k = 0; k < 4; k++) {
+            ret = tsk_table_collection_copy(&expected, &tables, 0);
+            CU_ASSERT_EQUAL_FATAL(ret, 0);
+            /* Reverse the edges after the sorted prefix */
+            ret = tsk_edge_table_truncate(&tables.edges, num_prefix[j]);
+            CU_ASSERT_EQUAL_FATAL(ret, 0);
+            for (m = (tsk_id_t) n - 1; m >= (tsk_id_t) num_prefix[j]; m--) {
+                ret = tsk_edge_table_get_row(&expected.edges, m, &edge);
+                CU_ASSERT_EQUAL_FATAL(ret, 0);
+                ret_id = tsk_edge_table_add_row(&tables.edges, edge.left, edge.right,
+                    edge.parent, edge.child, edge.metadata, edge.metadata_length);
+                CU_ASSERT_FATAL(ret_id >= 0);
+            }
+            ret = tsk_table_sorter_init(&sorter, &tables, 0);
+            CU_ASSERT_EQUAL_FATAL(ret, 0);
+            sorter.num_threads = num_threads[k % 2];
+            /* The scan for the sorted prefix can start after a known prefix */
+            sorter.num_sorted_edges = k < 2 ? 0 : num_prefix[j];
+            ret = tsk_table_sorter_run(&sorter, NULL);
+            CU_ASSERT_EQUAL_FATAL(ret, 0);
+            tsk_table_sorter_free(&sorter);
+            CU_ASSERT_TRUE(tsk_table_collection_equals(&tables, &expected, 0));
+            tsk_table_collection_free(&tables);
+        }
+    }
+
+    /* Append a site that sorts before the existing sites, with a mutation */
+    ret = tsk_table_collection_copy(&expected, &tables, 0);
+    CU_ASSERT_EQUAL_FATAL(ret, 0);
+    CU_ASSERT_FATAL(tables.sites.position[0] > 0);
+    ret_id = tsk_site_table_add_row(
+        &tables.sites, tables.sites.position[0] / 2, "A", 1, NULL, 0);
+    CU_ASSERT_FATAL(ret_id >= 0);
+    ret_id = tsk_mutation_table_add_row(
+        &tables.mutations, ret_id, 0, TSK_NULL, 0, "B", 1, NULL, 0);
+    CU_ASSERT_FATAL(ret_id >= 0);
+    ret = tsk_table_collection_check_integrity(&tables, TSK_CHECK_SITE_ORDERING);
+    CU_ASSERT_EQUAL_FATAL(ret, TSK_ERR_UNSORTED_SITES);
+    ret = tsk_table_collection_sort(&tables, NULL, 0);
+    CU_ASSERT_EQUAL_FATAL(ret, 0);
+    ret = tsk_table_collection_check_integrity(
+        &tables, TSK_CHECK_SITE_ORDERING | TSK_CHECK_MUTATION_ORDERING);
+    CU_ASSERT_EQUAL_FATAL(ret, 0);
+    CU_ASSERT_EQUAL(tables.sites.position[0], expected.sites.position[0] / 2);
+    CU_ASSERT_EQUAL(tables.mutations.site[0], 0);
+    CU_ASSERT_EQUAL(tables.mutations.derived_state[0], 'B');
+    for (j = 1; j < tables.mutations.num_rows; j++) {
+        CU_ASSERT_EQUAL(tables.mutations.site[j], expected.mutations.site[j - 1] + 1);
+        CU_ASSERT_EQUAL(tables.mutations.node[j], expected.mutations.node[j - 1]);
+    }
+    tsk_table_collection_free(&tables);
+
+    tsk_table_collection_free(&expected);
+    tsk_treeseq_free(ts);
+    free(ts);
+}
+
 static void
 test_sort_tables_drops_indexes_with_options(tsk_flags_t tc_options)
 {
@@ -9433,6 +9985,140 @@ test_sorter_interface(void)
     tsk_treeseq_free(&ts);
 }
 
+static int
+run_tasks_reversed(
+    tsk_table_sorter_t *self, tsk_size_t num_tasks, void (*task)(void *arg), void **args)
+{
+    tsk_size_t j;
+    int *num_calls = (int *) self->user_data;
+
+    for (j = num_tasks; j > 0; j--) {
+        task(args[j - 1]);
+    }
+    (*num_calls)++;
+    return 0;
+}
+
+static int
+run_tasks_error(tsk_table_sorter_t *TSK_UNUSED(self), tsk_size_t num_tasks,
+    void (*task)(void *arg), void **args)
+{
+    /* Run the first task and then fail */
+    if (num_tasks > 0) {
+        task(args[0]);
+    }
+    return -12345;
+}
+
+static void
+verify_sorter_num_threads(tsk_table_collection_t *input, tsk_bookmark_t *bookmark)
+{
+    int ret;
+    tsk_table_collection_t tables, expected;
+    tsk_table_sorter_t sorter;
+    tsk_size_t num_threads[] = { 1, 2, 3, 4, 7, 1000 };
+    tsk_edge_t edge, other_edge;
+    tsk_size_t j;
+    int num_calls;
+
+    ret = tsk_table_collection_copy(input, &expected, 0);
+    CU_ASSERT_EQUAL_FATAL(ret, 0);
+    ret = tsk_table_sorter_init(&sorter, &expected, TSK_NO_CHECK_INTEGRITY);
+    CU_ASSERT_EQUAL_FATAL(ret, 0);
+    CU_ASSERT_EQUAL(sorter.num_threads, 0);
+    CU_ASSERT_EQUAL(sorter.run_tasks, NULL);
+    ret = tsk_table_sorter_run(&sorter, bookmark);
+    CU_ASSERT_EQUAL_FATAL(ret, 0);
+    tsk_table_sorter_free(&sorter);
+    if (bookmark != NULL) {
+        /* Rows before the start are unaffected, including their metadata */
+        for (j = 0; j < bookmark->edges; j++) {
+            ret = tsk_edge_table_get_row(&input->edges, (tsk_id_t) j, &edge);
+            CU_ASSERT_EQUAL_FATAL(ret, 0);
+            ret = tsk_edge_table_get_row(&expected.edges, (tsk_id_t) j, &other_edge);
+            CU_ASSERT_EQUAL_FATAL(ret, 0);
+            CU_ASSERT_EQUAL(edge.parent, other_edge.parent);
+            CU_ASSERT_EQUAL(edge.child, other_edge.child);
+            CU_ASSERT_EQUAL(edge.left, other_edge.left);
+            CU_ASSERT_EQUAL(edge.right, other_edge.right);
+            CU_ASSERT_EQUAL_FATAL(edge.metadata_length, other_edge.metadata_length);
+            CU_ASSERT_EQUAL(
+                0, memcmp(edge.metadata, other_edge.metadata, edge.metadata_length));
+        }
+    }
+
+    for (j = 0; j < sizeof(num_threads) / sizeof(*num_threads); j++) {
+        /* Tasks run sequentially */
+        ret = tsk_table_collection_copy(input, &tables, 0);
+        CU_ASSERT_EQUAL_FATAL(ret, 0);
+        ret = tsk_table_sorter_init(&sorter, &tables, TSK_NO_CHECK_INTEGRITY);
+        CU_ASSERT_EQUAL_FATAL(ret, 0);
+        sorter.num_threads = num_threads[j];
+        ret = tsk_table_sorter_run(&sorter, bookmark);
+        CU_ASSERT_EQUAL_FATAL(ret, 0);
+        CU_ASSERT_TRUE(tsk_table_collection_equals(&tables, &expected, 0));
+        tsk_table_sorter_free(&sorter);
+        tsk_table_collection_free(&tables);
+
+        /* Tasks run by the client in a different order */
+        ret = tsk_table_collection_copy(input, &tables, 0);
+        CU_ASSERT_EQUAL_FATAL(ret, 0);
+        ret = tsk_table_sorter_init(&sorter, &tables, TSK_NO_CHECK_INTEGRITY);
+        CU_ASSERT_EQUAL_FATAL(ret, 0);
+        num_calls = 0;
+        sorter.num_threads = num_threads[j];
+        sorter.run_tasks = run_tasks_reversed;
+        sorter.user_data = &num_calls;
+        ret = tsk_table_sorter_run(&sorter, bookmark);
+        CU_ASSERT_EQUAL_FATAL(ret, 0);
+        CU_ASSERT_TRUE(tsk_table_collection_equals(&tables, &expected, 0));
+        CU_ASSERT_EQUAL(num_calls > 0, num_threads[j] > 1);
+        tsk_table_sorter_free(&sorter);
+        tsk_table_collection_free(&tables);
+    }
+    tsk_table_collection_free(&expected);
+}
+
+static void
+test_sorter_num_threads(void)
+{
+    int ret;
+    tsk_id_t ret_id;
+    tsk_treeseq_t *ts;
+    tsk_table_collection_t tables;
+    tsk_table_sorter_t sorter;
+    tsk_bookmark_t bookmark;
+
+    ts = caterpillar_tree(20, 10, 5);
+    ret = tsk_treeseq_copy_tables(ts, &tables, 0);
+    CU_ASSERT_EQUAL_FATAL(ret, 0);
+    insert_edge_metadata(&tables);
+    reverse_edges(&tables);
+    reverse_mutations(&tables);
+    /* Add a duplicate edge so that the sort must break ties by ID */
+    ret_id = tsk_edge_table_add_row(&tables.edges, tables.edges.left[0],
+        tables.edges.right[0] / 2, tables.edges.parent[0], tables.edges.child[0], "dup",
+        3);
+    CU_ASSERT_FATAL(ret_id >= 0);
+
+    verify_sorter_num_threads(&tables, NULL);
+    tsk_memset(&bookmark, 0, sizeof(bookmark));
+    bookmark.edges = 5;
+    verify_sorter_num_threads(&tables, &bookmark);
+
+    ret = tsk_table_sorter_init(&sorter, &tables, TSK_NO_CHECK_INTEGRITY);
+    CU_ASSERT_EQUAL_FATAL(ret, 0);
+    sorter.num_threads = 2;
+    sorter.run_tasks = run_tasks_error;
+    ret = tsk_table_sorter_run(&sorter, NULL);
+    CU_ASSERT_EQUAL_FATAL(ret, -12345);
+    tsk_table_sorter_free(&sorter);
+
+    tsk_table_collection_free(&tables);
+    tsk_treeseq_free(ts);
+    free(ts);
+}
+
 static void
 test_dump_unindexed_with_options(tsk_flags_t tc_options)
 {
@@ -11606,6 +12292,8 @@ main(int argc, char **argv)
         { "test_simplify_tables_drops_indexes", test_simplify_tables_drops_indexes },
         { "test_simplify_empty_tables", test_simplify_empty_tables },
         { "test_simplify_metadata", test_simplify_metadata },
+        { "test_simplifier_wright_fisher", test_simplifier_wright_fisher },
+        { "test_simplifier_errors", test_simplifier_errors },
         { "test_link_ancestors_no_edges", test_link_ancestors_no_edges },
         { "test_link_ancestors_input_errors", test_link_ancestors_input_errors },
         { "test_link_ancestors_single_tree", test_link_ancestors_single_tree },
@@ -11620,6 +12308,8 @@ main(int argc, char **argv)
         { "test_ibd_segments_single_tree_options",
             test_ibd_segments_single_tree_options },
         { "test_ibd_segments_multiple_trees", test_ibd_segments_multiple_trees },
+        { "test_ibd_segments_stream", test_ibd_segments_stream },
+        { "test_ibd_segments_span_matrix", test_ibd_segments_span_matrix },
         { "test_ibd_segments_empty_result", test_ibd_segments_empty_result },
         { "test_ibd_segments_min_span_max_time", test_ibd_segments_min_span_max_time },
         { "test_ibd_segments_single_tree_between",
@@ -11630,6 +12320,7 @@ main(int argc, char **argv)
         { "test_ibd_segments_odd_topologies", test_ibd_segments_odd_topologies },
         { "test_ibd_segments_errors", test_ibd_segments_errors },
         { "test_sorter_interface", test_sorter_interface },
+        { "test_sorter_num_threads", test_sorter_num_threads },
         { "test_sort_tables_canonical_errors", test_sort_tables_canonical_errors },
         { "test_sort_tables_canonical", test_sort_tables_canonical },
         { "test_sort_tables_drops_indexes", test_sort_tables_drops_indexes },
@@ -11640,6 +12331,7 @@ main(int argc, char **argv)
         { "test_sort_tables_migrations", test_sort_tables_migrations },
         { "test_sort_tables_no_edge_metadata", test_sort_tables_no_edge_metadata },
         { "test_sort_tables_offsets", test_sort_tables_offsets },
+        { "test_sort_tables_sorted_prefix", test_sort_tables_sorted_prefix },
         { "test_edge_update_invalidates_index", test_edge_update_invalidates_index },
         { "test_copy_table_collection", test_copy_table_collection },
         { "test_dump_unindexed", test_dump_unindexed },
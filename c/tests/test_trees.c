@@ -6187,6 +6187,147 @@ test_seek_multi_tree(void)
     tsk_treeseq_free(&ts);
 }
 
+static void
+test_seek_index_multi_tree(void)
+{
+    int ret;
+    tsk_treeseq_t ts;
+    tsk_tree_t t;
+    tsk_id_t num_trees = 3;
+    tsk_id_t j, k;
+
+    tsk_treeseq_from_text(&ts, 10, paper_ex_nodes, paper_ex_edges, NULL, NULL, NULL,
+        paper_ex_individuals, NULL, 0);
+
+    ret = tsk_tree_init(&t, &ts, 0);
+    CU_ASSERT_EQUAL_FATAL(ret, 0);
+    for (j = 0; j < num_trees; j++) {
+        ret = tsk_tree_seek_index(&t, j, 0);
+        CU_ASSERT_EQUAL_FATAL(ret, 0);
+        CU_ASSERT_EQUAL_FATAL(t.index, j);
+        for (k = num_trees - 1; k >= 0; k--) {
+            ret = tsk_tree_seek_index(&t, k, 0);
+            CU_ASSERT_EQUAL_FATAL(ret, 0);
+            CU_ASSERT_EQUAL_FATAL(t.index, k);
+            CU_ASSERT_EQUAL_FATAL(t.interval.left, ts.breakpoints[k]);
+        }
+    }
+    tsk_tree_free(&t);
+    tsk_treeseq_free(&ts);
+}
+
+static void
+test_seek_tree_checkpoints(void)
+{
+    int ret;
+    tsk_treeseq_t ts, ts_checkpoints;
+    tsk_table_collection_t tables;
+    tsk_tree_t t1, t2;
+    double breakpoints[] = { 0, 2, 7, 10 };
+    tsk_id_t num_trees = 3;
+    tsk_size_t interval;
+    tsk_id_t j, k;
+
+    tsk_treeseq_from_text(&ts, 10, paper_ex_nodes, paper_ex_edges, NULL, NULL, NULL,
+        paper_ex_individuals, NULL, 0);
+
+    for (interval = 1; interval < 4; interval++) {
+        ret = tsk_treeseq_copy_tables(&ts, &tables, 0);
+        CU_ASSERT_EQUAL_FATAL(ret, 0);
+        CU_ASSERT_FALSE(tsk_table_collection_has_tree_checkpoints(&tables));
+        ret = tsk_table_collection_build_tree_checkpoints(&tables, interval, 0);
+        CU_ASSERT_EQUAL_FATAL(ret, 0);
+        CU_ASSERT_TRUE(tsk_table_collection_has_tree_checkpoints(&tables));
+        CU_ASSERT_EQUAL(tables.indexes.num_tree_checkpoints,
+            ((tsk_size_t) num_trees + interval - 1) / interval);
+        ret = tsk_treeseq_init(&ts_checkpoints, &tables, 0);
+        CU_ASSERT_EQUAL_FATAL(ret, 0);
+        CU_ASSERT_TRUE(tsk_table_collection_has_tree_checkpoints(ts_checkpoints.tables));
+
+        ret = tsk_tree_init(&t1, &ts, 0);
+        CU_ASSERT_EQUAL_FATAL(ret, 0);
+        for (j = 0; j < num_trees; j++) {
+            ret = tsk_tree_next(&t1);
+            CU_ASSERT_EQUAL_FATAL(ret, TSK_TREE_OK);
+            for (k = 0; k < num_trees; k++) {
+                ret = tsk_tree_init(&t2, &ts_checkpoints, 0);
+                CU_ASSERT_EQUAL_FATAL(ret, 0);
+                ret = tsk_tree_seek(&t2, breakpoints[k], 0);
+                CU_ASSERT_EQUAL_FATAL(ret, 0);
+                ret = tsk_tree_seek(&t2, breakpoints[j], 0);
+                CU_ASSERT_EQUAL_FATAL(ret, 0);
+                CU_ASSERT_EQUAL_FATAL(t2.index, j);
+                CU_ASSERT_EQUAL(t1.interval.left, t2.interval.left);
+                CU_ASSERT_EQUAL(t1.interval.right, t2.interval.right);
+                CU_ASSERT_EQUAL(t1.num_edges, t2.num_edges);
+                CU_ASSERT_EQUAL(t1.sites_length, t2.sites_length);
+                CU_ASSERT_EQUAL(
+                    tsk_tree_get_num_roots(&t1), tsk_tree_get_num_roots(&t2));
+                CU_ASSERT_EQUAL(0, memcmp(t1.parent, t2.parent,
+                                       (t1.num_nodes + 1) * sizeof(*t1.parent)));
+                ret = tsk_tree_free(&t2);
+                CU_ASSERT_EQUAL_FATAL(ret, 0);
+            }
+        }
+        tsk_tree_free(&t1);
+        tsk_treeseq_free(&ts_checkpoints);
+        tsk_table_collection_free(&tables);
+    }
+    tsk_treeseq_free(&ts);
+}
+
+static void
+test_tree_checkpoints_errors(void)
+{
+    int ret;
+    tsk_treeseq_t ts, ts2;
+    tsk_table_collection_t tables;
+
+    tsk_treeseq_from_text(&ts, 10, paper_ex_nodes, paper_ex_edges, NULL, NULL, NULL,
+        paper_ex_individuals, NULL, 0);
+    ret = tsk_treeseq_copy_tables(&ts, &tables, 0);
+    CU_ASSERT_EQUAL_FATAL(ret, 0);
+
+    ret = tsk_table_collection_build_tree_checkpoints(&tables, 0, 0);
+    CU_ASSERT_EQUAL_FATAL(ret, TSK_ERR_BAD_PARAM_VALUE);
+    ret = tsk_table_collection_drop_index(&tables, 0);
+    CU_ASSERT_EQUAL_FATAL(ret, 0);
+    ret = tsk_table_collection_build_tree_checkpoints(&tables, 1, 0);
+    CU_ASSERT_EQUAL_FATAL(ret, TSK_ERR_TABLES_NOT_INDEXED);
+
+    ret = tsk_table_collection_build_index(&tables, 0);
+    CU_ASSERT_EQUAL_FATAL(ret, 0);
+    ret = tsk_table_collection_build_tree_checkpoints(&tables, 1, 0);
+    CU_ASSERT_EQUAL_FATAL(ret, 0);
+    /* Dropping the indexes also drops the checkpoints */
+    ret = tsk_table_collection_drop_index(&tables, 0);
+    CU_ASSERT_EQUAL_FATAL(ret, 0);
+    CU_ASSERT_FALSE(tsk_table_collection_has_tree_checkpoints(&tables));
+
+    ret = tsk_table_collection_build_index(&tables, 0);
+    CU_ASSERT_EQUAL_FATAL(ret, 0);
+    ret = tsk_table_collection_build_tree_checkpoints(&tables, 1, 0);
+    CU_ASSERT_EQUAL_FATAL(ret, 0);
+    /* Shift the checkpoints along by one tree */
+    tables.indexes.tree_checkpoint_tree[0] = 1;
+    tables.indexes.tree_checkpoint_tree[1] = 2;
+    tables.indexes.tree_checkpoint_tree[2] = 3;
+    ret = tsk_treeseq_init(&ts2, &tables, 0);
+    CU_ASSERT_EQUAL_FATAL(ret, TSK_ERR_BAD_TREE_CHECKPOINTS);
+    tsk_treeseq_free(&ts2);
+
+    tables.indexes.tree_checkpoint_tree[0] = 0;
+    tables.indexes.tree_checkpoint_tree[1] = 1;
+    tables.indexes.tree_checkpoint_tree[2] = 2;
+    tables.indexes.tree_checkpoint_edges[0] = (tsk_id_t) tables.edges.num_rows;
+    ret = tsk_treeseq_init(&ts2, &tables, 0);
+    CU_ASSERT_EQUAL_FATAL(ret, TSK_ERR_BAD_TREE_CHECKPOINTS);
+    tsk_treeseq_free(&ts2);
+
+    tsk_table_collection_free(&tables);
+    tsk_treeseq_free(&ts);
+}
+
 static void
 test_seek_errors(void)
 {
@@ -6205,6 +6346,10 @@ test_seek_errors(void)
     CU_ASSERT_EQUAL_FATAL(ret, TSK_ERR_SEEK_OUT_OF_BOUNDS);
     ret = tsk_tree_seek(&t, 11, 0);
     CU_ASSERT_EQUAL_FATAL(ret, TSK_ERR_SEEK_OUT_OF_BOUNDS);
+    ret = tsk_tree_seek_index(&t, -1, 0);
+    CU_ASSERT_EQUAL_FATAL(ret, TSK_ERR_SEEK_OUT_OF_BOUNDS);
+    ret = tsk_tree_seek_index(&t, 3, 0);
+    CU_ASSERT_EQUAL_FATAL(ret, TSK_ERR_SEEK_OUT_OF_BOUNDS);
 
     tsk_tree_free(&t);
     tsk_treeseq_free(&ts);
@@ -7035,6 +7180,599 @@ test_b2_bad_base(void)
     tsk_tree_free(&t);
 }
 
+static void
+verify_mrcas(tsk_treeseq_t *ts)
+{
+    int ret;
+    tsk_tree_t t;
+    tsk_size_t N = tsk_treeseq_get_num_nodes(ts) + 1;
+    tsk_id_t *u = tsk_malloc(N * N * sizeof(*u));
+    tsk_id_t *v = tsk_malloc(N * N * sizeof(*v));
+    tsk_id_t *mrca = tsk_malloc(N * N * sizeof(*mrca));
+    tsk_id_t j, k, w;
+
+    CU_ASSERT_FATAL(u != NULL && v != NULL && mrca != NULL);
+    /* All pairs of nodes including the virtual root */
+    for (j = 0; j < (tsk_id_t) N; j++) {
+        for (k = 0; k < (tsk_id_t) N; k++) {
+            u[j * (tsk_id_t) N + k] = j;
+            v[j * (tsk_id_t) N + k] = k;
+        }
+    }
+    ret = tsk_tree_init(&t, ts, 0);
+    CU_ASSERT_EQUAL_FATAL(ret, 0);
+    for (ret = tsk_tree_first(&t); ret == TSK_TREE_OK; ret = tsk_tree_next(&t)) {
+        ret = tsk_tree_get_mrcas(&t, N * N, u, v, mrca);
+        CU_ASSERT_EQUAL_FATAL(ret, 0);
+        for (j = 0; j < (tsk_id_t)(N * N); j++) {
+            ret = tsk_tree_get_mrca(&t, u[j], v[j], &w);
+            CU_ASSERT_EQUAL_FATAL(ret, 0);
+            CU_ASSERT_EQUAL_FATAL(mrca[j], w);
+        }
+        ret = tsk_tree_get_mrcas(&t, 0, NULL, NULL, NULL);
+        CU_ASSERT_EQUAL_FATAL(ret, 0);
+    }
+    CU_ASSERT_EQUAL_FATAL(ret, 0);
+
+    ret = tsk_tree_first(&t);
+    CU_ASSERT_EQUAL_FATAL(ret, TSK_TREE_OK);
+    u[0] = (tsk_id_t) N;
+    ret = tsk_tree_get_mrcas(&t, 1, u, v, mrca);
+    CU_ASSERT_EQUAL_FATAL(ret, TSK_ERR_NODE_OUT_OF_BOUNDS);
+    u[0] = 0;
+    v[0] = -1;
+    ret = tsk_tree_get_mrcas(&t, 1, u, v, mrca);
+    CU_ASSERT_EQUAL_FATAL(ret, TSK_ERR_NODE_OUT_OF_BOUNDS);
+    tsk_tree_free(&t);
+
+    ret = tsk_tree_init(&t, ts, TSK_NO_SAMPLE_COUNTS);
+    CU_ASSERT_EQUAL_FATAL(ret, 0);
+    ret = tsk_tree_first(&t);
+    CU_ASSERT_EQUAL_FATAL(ret, TSK_TREE_OK);
+    ret = tsk_tree_get_mrcas(&t, 0, NULL, NULL, NULL);
+    CU_ASSERT_EQUAL_FATAL(ret, TSK_ERR_UNSUPPORTED_OPERATION);
+    tsk_tree_free(&t);
+
+    free(u);
+    free(v);
+    free(mrca);
+}
+
+static void
+verify_tmrca_matrix(tsk_treeseq_t *ts, tsk_size_t num_windows, const double *windows)
+{
+    int ret;
+    tsk_tree_t t;
+    tsk_size_t n = tsk_treeseq_get_num_nodes(ts);
+    const double *time = ts->tables->nodes.time;
+    tsk_id_t *nodes = tsk_malloc(n * sizeof(*nodes));
+    double *result = tsk_malloc(num_windows * n * n * sizeof(*result));
+    double *unnormalised = tsk_malloc(num_windows * n * n * sizeof(*result));
+    double *expected = tsk_calloc(num_windows * n * n, sizeof(*result));
+    double left, right, x;
+    tsk_size_t i, j, k;
+    tsk_id_t w;
+
+    CU_ASSERT_FATAL(nodes != NULL && result != NULL && expected != NULL);
+    CU_ASSERT_FATAL(unnormalised != NULL);
+    for (j = 0; j < n; j++) {
+        /* Reverse the node order to check the output follows the input */
+        nodes[j] = (tsk_id_t)(n - j - 1);
+    }
+    ret = tsk_treeseq_tmrca_matrix(
+        ts, n, nodes, num_windows, windows, TSK_STAT_SPAN_NORMALISE, result);
+    CU_ASSERT_EQUAL_FATAL(ret, 0);
+    ret = tsk_treeseq_tmrca_matrix(ts, n, nodes, num_windows, windows, 0, unnormalised);
+    CU_ASSERT_EQUAL_FATAL(ret, 0);
+
+    ret = tsk_tree_init(&t, ts, 0);
+    CU_ASSERT_EQUAL_FATAL(ret, 0);
+    for (ret = tsk_tree_first(&t); ret == TSK_TREE_OK; ret = tsk_tree_next(&t)) {
+        for (k = 0; k < num_windows; k++) {
+            left = TSK_MAX(t.interval.left, windows[k]);
+            right = TSK_MIN(t.interval.right, windows[k + 1]);
+            if (left >= right) {
+                continue;
+            }
+            for (i = 0; i < n; i++) {
+                for (j = 0; j < n; j++) {
+                    ret = tsk_tree_get_mrca(&t, nodes[i], nodes[j], &w);
+                    CU_ASSERT_EQUAL_FATAL(ret, 0);
+                    x = w == TSK_NULL ? NAN : time[w];
+                    expected[k * n * n + i * n + j] += (right - left) * x;
+                }
+            }
+        }
+    }
+    CU_ASSERT_EQUAL_FATAL(ret, 0);
+    for (k = 0; k < num_windows; k++) {
+        for (j = 0; j < n * n; j++) {
+            x = expected[k * n * n + j];
+            if (tsk_isnan(x)) {
+                CU_ASSERT_FATAL(tsk_isnan(unnormalised[k * n * n + j]));
+                CU_ASSERT_FATAL(tsk_isnan(result[k * n * n + j]));
+            } else {
+                CU_ASSERT_DOUBLE_EQUAL_FATAL(unnormalised[k * n * n + j], x, 1e-9);
+                CU_ASSERT_DOUBLE_EQUAL_FATAL(
+                    result[k * n * n + j], x / (windows[k + 1] - windows[k]), 1e-9);
+            }
+        }
+    }
+
+    ret = tsk_treeseq_tmrca_matrix(ts, n, nodes, 0, windows, 0, result);
+    CU_ASSERT_EQUAL_FATAL(ret, TSK_ERR_BAD_NUM_WINDOWS);
+    nodes[0] = (tsk_id_t) n;
+    ret = tsk_treeseq_tmrca_matrix(ts, n, nodes, num_windows, windows, 0, result);
+    CU_ASSERT_EQUAL_FATAL(ret, TSK_ERR_NODE_OUT_OF_BOUNDS);
+    nodes[0] = -1;
+    ret = tsk_treeseq_tmrca_matrix(ts, n, nodes, num_windows, windows, 0, result);
+    CU_ASSERT_EQUAL_FATAL(ret, TSK_ERR_NODE_OUT_OF_BOUNDS);
+
+    tsk_tree_free(&t);
+    free(nodes);
+    free(result);
+    free(unnormalised);
+    free(expected);
+}
+
+static void
+test_mrcas(void)
+{
+    tsk_treeseq_t ts;
+    /* Node 4 is the parent of a non-sample leaf, so neither is reachable
+     * from the root */
+    const char *nodes = "1  0   0\n"
+                        "1  0   0\n"
+                        "0  0   0\n"
+                        "0  1   0\n"
+                        "0  2   0\n";
+    const char *edges = "0  1   3   0,1\n"
+                        "0  1   4   2\n";
+    double windows[] = { 0, 10 };
+    double unit_windows[] = { 0, 1 };
+
+    tsk_treeseq_from_text(&ts, 1, nodes, edges, NULL, NULL, NULL, NULL, NULL, 0);
+    verify_mrcas(&ts);
+    verify_tmrca_matrix(&ts, 1, unit_windows);
+    tsk_treeseq_free(&ts);
+
+    tsk_treeseq_from_text(&ts, 1, single_tree_ex_nodes, single_tree_ex_edges, NULL, NULL,
+        NULL, NULL, NULL, 0);
+    verify_mrcas(&ts);
+    tsk_treeseq_free(&ts);
+
+    tsk_treeseq_from_text(&ts, 10, paper_ex_nodes, paper_ex_edges, NULL, NULL, NULL,
+        paper_ex_individuals, NULL, 0);
+    verify_mrcas(&ts);
+    verify_tmrca_matrix(&ts, 1, windows);
+    tsk_treeseq_free(&ts);
+
+    tsk_treeseq_from_text(&ts, 10, multiroot_ex_nodes, multiroot_ex_edges, NULL, NULL,
+        NULL, NULL, NULL, 0);
+    verify_mrcas(&ts);
+    verify_tmrca_matrix(&ts, 1, windows);
+    tsk_treeseq_free(&ts);
+
+    tsk_treeseq_from_text(&ts, 100, nonbinary_ex_nodes, nonbinary_ex_edges, NULL, NULL,
+        NULL, NULL, NULL, 0);
+    verify_mrcas(&ts);
+    tsk_treeseq_free(&ts);
+
+    tsk_treeseq_from_text(
+        &ts, 10, unary_ex_nodes, unary_ex_edges, NULL, NULL, NULL, NULL, NULL, 0);
+    verify_mrcas(&ts);
+    tsk_treeseq_free(&ts);
+
+    tsk_treeseq_from_text(&ts, 10, internal_sample_ex_nodes, internal_sample_ex_edges,
+        NULL, NULL, NULL, NULL, NULL, 0);
+    verify_mrcas(&ts);
+    tsk_treeseq_free(&ts);
+}
+
+static void
+test_tmrca_matrix_windows(void)
+{
+    int ret;
+    tsk_treeseq_t ts;
+    double windows[] = { 0, 1.5, 2, 7.25, 10 };
+    double partial_windows[] = { 1, 2, 7.25 };
+    double bad_windows[] = { 0, 5, 5, 10 };
+    tsk_id_t samples[] = { 0, 1, 2, 3 };
+    double result[3 * 4 * 4];
+
+    tsk_treeseq_from_text(&ts, 10, paper_ex_nodes, paper_ex_edges, NULL, NULL, NULL,
+        paper_ex_individuals, NULL, 0);
+    verify_tmrca_matrix(&ts, 4, windows);
+
+    ret = tsk_treeseq_tmrca_matrix(&ts, 4, samples, 2, partial_windows, 0, result);
+    CU_ASSERT_EQUAL_FATAL(ret, TSK_ERR_BAD_WINDOWS);
+    ret = tsk_treeseq_tmrca_matrix(
+        &ts, 4, samples, 2, partial_windows, TSK_STAT_PARTIAL_WINDOWS, result);
+    CU_ASSERT_EQUAL_FATAL(ret, 0);
+    ret = tsk_treeseq_tmrca_matrix(&ts, 4, samples, 3, bad_windows, 0, result);
+    CU_ASSERT_EQUAL_FATAL(ret, TSK_ERR_BAD_WINDOWS);
+    ret = tsk_treeseq_tmrca_matrix(&ts, 4, samples, 1, NULL, 0, result);
+    CU_ASSERT_EQUAL_FATAL(ret, 0);
+    CU_ASSERT_EQUAL(result[0], 0);
+    CU_ASSERT_EQUAL(result[1], result[4]);
+
+    tsk_treeseq_free(&ts);
+}
+
+static void
+verify_coalescence_time_table(
+    tsk_treeseq_t *ts, tsk_size_t num_windows, const double *windows)
+{
+    int ret;
+    tsk_tree_t t;
+    tsk_coalescence_time_table_t result, partial;
+    tsk_size_t n = tsk_treeseq_get_num_samples(ts);
+    const tsk_id_t *samples = tsk_treeseq_get_samples(ts);
+    const tsk_flags_t *flags = ts->tables->nodes.flags;
+    tsk_size_t sample_set_size = n;
+    tsk_size_t num_pairs = n * (n - 1) / 2;
+    double *expected = tsk_calloc(num_windows, sizeof(*expected));
+    double *observed = tsk_calloc(num_windows, sizeof(*observed));
+    tsk_size_t i, j, k, offset;
+    tsk_id_t w;
+    double x;
+
+    CU_ASSERT_FATAL(expected != NULL && observed != NULL);
+
+    /* Unnormalised pair weights sum to the number of pairs whose MRCA is not
+     * a sample, over the trees intersecting each window */
+    ret = tsk_tree_init(&t, ts, 0);
+    CU_ASSERT_EQUAL_FATAL(ret, 0);
+    for (ret = tsk_tree_first(&t); ret == TSK_TREE_OK; ret = tsk_tree_next(&t)) {
+        for (k = 0; k < num_windows; k++) {
+            if (t.interval.right <= windows[k] || t.interval.left >= windows[k + 1]) {
+                continue;
+            }
+            for (i = 0; i < n; i++) {
+                for (j = i + 1; j < n; j++) {
+                    ret = tsk_tree_get_mrca(&t, samples[i], samples[j], &w);
+                    CU_ASSERT_EQUAL_FATAL(ret, 0);
+                    if (w != TSK_NULL && !(flags[w] & TSK_NODE_IS_SAMPLE)) {
+                        expected[k]++;
+                    }
+                }
+            }
+        }
+    }
+    CU_ASSERT_EQUAL_FATAL(ret, 0);
+    tsk_tree_free(&t);
+
+    ret = tsk_treeseq_coalescence_time_table(ts, 1, &sample_set_size, samples,
+        num_windows, windows, 2, TSK_COALESCENCE_EVENTS_PAIR, &result);
+    CU_ASSERT_EQUAL_FATAL(ret, 0);
+    CU_ASSERT_EQUAL_FATAL(result.num_weights, 1);
+    for (j = 0; j < result.num_records; j++) {
+        CU_ASSERT_FATAL(result.window[j] >= 0);
+        CU_ASSERT_FATAL((tsk_size_t) result.window[j] < num_windows);
+        CU_ASSERT_FATAL(result.block[j] >= 0 && result.block[j] < 2);
+        CU_ASSERT_FATAL(j == 0 || result.window[j - 1] <= result.window[j]);
+        CU_ASSERT_FATAL(result.weights[j] <= (double) num_pairs);
+        observed[result.window[j]] += result.weights[j];
+    }
+    for (k = 0; k < num_windows; k++) {
+        CU_ASSERT_DOUBLE_EQUAL_FATAL(observed[k], expected[k], 1e-9);
+    }
+
+    /* Computing a suffix of the windows gives the same records */
+    for (k = 1; k < num_windows; k++) {
+        ret = tsk_treeseq_coalescence_time_table(ts, 1, &sample_set_size, samples,
+            num_windows - k, windows + k, 2,
+            TSK_COALESCENCE_EVENTS_PAIR | TSK_STAT_PARTIAL_WINDOWS, &partial);
+        CU_ASSERT_EQUAL_FATAL(ret, 0);
+        for (offset = 0; offset < result.num_records; offset++) {
+            if ((tsk_size_t) result.window[offset] >= k) {
+                break;
+            }
+        }
+        CU_ASSERT_EQUAL_FATAL(partial.num_records, result.num_records - offset);
+        for (j = 0; j < partial.num_records; j++) {
+            CU_ASSERT_EQUAL_FATAL((tsk_size_t) partial.window[j] + k,
+                (tsk_size_t) result.window[j + offset]);
+            CU_ASSERT_EQUAL_FATAL(partial.block[j], result.block[j + offset]);
+            CU_ASSERT_EQUAL_FATAL(partial.time[j], result.time[j + offset]);
+            CU_ASSERT_DOUBLE_EQUAL_FATAL(
+                partial.weights[j], result.weights[j + offset], 1e-9);
+        }
+        tsk_coalescence_time_table_free(&partial);
+    }
+    tsk_coalescence_time_table_free(&result);
+
+    /* Span normalised weights of single sample counts average to one */
+    ret = tsk_treeseq_coalescence_time_table(ts, 1, &sample_set_size, samples,
+        num_windows, windows, 1, TSK_COALESCENCE_EVENTS | TSK_STAT_SPAN_NORMALISE,
+        &result);
+    CU_ASSERT_EQUAL_FATAL(ret, 0);
+    for (j = 0; j < result.num_records; j++) {
+        x = result.weights[j];
+        CU_ASSERT_FATAL(x > 0 && x <= 1 + 1e-9);
+    }
+    tsk_coalescence_time_table_free(&result);
+
+    /* A single sample set gives a single trio weight */
+    ret = tsk_treeseq_coalescence_time_table(ts, 1, &sample_set_size, samples,
+        num_windows, windows, 1, TSK_COALESCENCE_EVENTS_TRIO, &result);
+    CU_ASSERT_EQUAL_FATAL(ret, 0);
+    CU_ASSERT_EQUAL_FATAL(result.num_weights, 1);
+    tsk_coalescence_time_table_free(&result);
+
+    free(expected);
+    free(observed);
+}
+
+static void
+test_coalescence_time_table(void)
+{
+    tsk_treeseq_t ts;
+    double windows[] = { 0, 1.5, 2, 7.25, 10 };
+    double long_windows[] = { 0, 15, 20, 72.5, 100 };
+    double unit_windows[] = { 0, 1 };
+
+    tsk_treeseq_from_text(&ts, 1, single_tree_ex_nodes, single_tree_ex_edges, NULL, NULL,
+        NULL, NULL, NULL, 0);
+    verify_coalescence_time_table(&ts, 1, unit_windows);
+    tsk_treeseq_free(&ts);
+
+    tsk_treeseq_from_text(&ts, 10, paper_ex_nodes, paper_ex_edges, NULL, NULL, NULL,
+        paper_ex_individuals, NULL, 0);
+    verify_coalescence_time_table(&ts, 4, windows);
+    tsk_treeseq_free(&ts);
+
+    tsk_treeseq_from_text(&ts, 10, multiroot_ex_nodes, multiroot_ex_edges, NULL, NULL,
+        NULL, NULL, NULL, 0);
+    verify_coalescence_time_table(&ts, 4, windows);
+    tsk_treeseq_free(&ts);
+
+    tsk_treeseq_from_text(&ts, 100, nonbinary_ex_nodes, nonbinary_ex_edges, NULL, NULL,
+        NULL, NULL, NULL, 0);
+    verify_coalescence_time_table(&ts, 4, long_windows);
+    tsk_treeseq_free(&ts);
+
+    tsk_treeseq_from_text(
+        &ts, 10, unary_ex_nodes, unary_ex_edges, NULL, NULL, NULL, NULL, NULL, 0);
+    verify_coalescence_time_table(&ts, 4, windows);
+    tsk_treeseq_free(&ts);
+
+    tsk_treeseq_from_text(&ts, 10, internal_sample_ex_nodes, internal_sample_ex_edges,
+        NULL, NULL, NULL, NULL, NULL, 0);
+    verify_coalescence_time_table(&ts, 4, windows);
+    tsk_treeseq_free(&ts);
+}
+
+static void
+test_coalescence_time_table_sample_sets(void)
+{
+    int ret;
+    tsk_treeseq_t ts;
+    tsk_coalescence_time_table_t result;
+    /* Node 4 joins sets {0, 1} and {2}, node 5 joins 4 and 3 */
+    const char *nodes = "1  0   0\n"
+                        "1  0   0\n"
+                        "1  0   0\n"
+                        "1  0   0\n"
+                        "0  1   0\n"
+                        "0  2   0\n"
+                        "0  3   0\n";
+    const char *edges = "0  1   4   0,1,2\n"
+                        "0  1   5   3,4\n";
+    tsk_id_t sample_sets[] = { 0, 1, 2 };
+    tsk_size_t sample_set_sizes[] = { 2, 1 };
+    double windows[] = { 0, 1 };
+    double bad_windows[] = { 0, 0.5, 0.5, 1 };
+
+    tsk_treeseq_from_text(&ts, 1, nodes, edges, NULL, NULL, NULL, NULL, NULL, 0);
+
+    ret = tsk_treeseq_coalescence_time_table(&ts, 2, sample_set_sizes, sample_sets, 1,
+        windows, 1, TSK_COALESCENCE_EVENTS_PAIR, &result);
+    CU_ASSERT_EQUAL_FATAL(ret, 0);
+    /* Pairs (0, 0), (0, 1), (1, 1) at each of nodes 4 and 5 */
+    CU_ASSERT_EQUAL_FATAL(result.num_weights, 3);
+    CU_ASSERT_EQUAL_FATAL(result.num_records, 2);
+    CU_ASSERT_EQUAL(result.time[0], 1);
+    CU_ASSERT_EQUAL(result.weights[0], 1);
+    CU_ASSERT_EQUAL(result.weights[1], 2);
+    CU_ASSERT_EQUAL(result.weights[2], 0);
+    CU_ASSERT_EQUAL(result.time[1], 2);
+    CU_ASSERT_EQUAL(result.weights[3], 0);
+    CU_ASSERT_EQUAL(result.weights[4], 0);
+    CU_ASSERT_EQUAL(result.weights[5], 0);
+    tsk_coalescence_time_table_free(&result);
+
+    ret = tsk_treeseq_coalescence_time_table(&ts, 2, sample_set_sizes, sample_sets, 1,
+        windows, 1, TSK_COALESCENCE_EVENTS_TRIO, &result);
+    CU_ASSERT_EQUAL_FATAL(ret, 0);
+    /* Pairs coalescing in node 4 have no outgroups in the sample sets */
+    CU_ASSERT_EQUAL_FATAL(result.num_weights, 6);
+    for (ret = 0; ret < 12; ret++) {
+        CU_ASSERT_EQUAL(result.weights[ret], 0);
+    }
+    tsk_coalescence_time_table_free(&result);
+
+    ret = tsk_treeseq_coalescence_time_table(&ts, 2, sample_set_sizes, sample_sets, 1,
+        windows, 1, TSK_COALESCENCE_EVENTS, &result);
+    CU_ASSERT_EQUAL_FATAL(ret, 0);
+    CU_ASSERT_EQUAL_FATAL(result.num_weights, 2);
+    CU_ASSERT_EQUAL(result.weights[0], 1);
+    CU_ASSERT_EQUAL(result.weights[1], 1);
+    CU_ASSERT_EQUAL(result.weights[2], 1);
+    CU_ASSERT_EQUAL(result.weights[3], 1);
+    tsk_coalescence_time_table_free(&result);
+
+    ret = tsk_treeseq_coalescence_time_table(
+        &ts, 2, sample_set_sizes, sample_sets, 1, windows, 1, 0, &result);
+    CU_ASSERT_EQUAL_FATAL(ret, TSK_ERR_BAD_PARAM_VALUE);
+    tsk_coalescence_time_table_free(&result);
+    ret = tsk_treeseq_coalescence_time_table(&ts, 2, sample_set_sizes, sample_sets, 1,
+        windows, 1, TSK_COALESCENCE_EVENTS | TSK_COALESCENCE_EVENTS_PAIR, &result);
+    CU_ASSERT_EQUAL_FATAL(ret, TSK_ERR_BAD_PARAM_VALUE);
+    tsk_coalescence_time_table_free(&result);
+    ret = tsk_treeseq_coalescence_time_table(&ts, 2, sample_set_sizes, sample_sets, 1,
+        windows, 0, TSK_COALESCENCE_EVENTS, &result);
+    CU_ASSERT_EQUAL_FATAL(ret, TSK_ERR_BAD_PARAM_VALUE);
+    tsk_coalescence_time_table_free(&result);
+    ret = tsk_treeseq_coalescence_time_table(&ts, 2, sample_set_sizes, sample_sets, 3,
+        bad_windows, 1, TSK_COALESCENCE_EVENTS, &result);
+    CU_ASSERT_EQUAL_FATAL(ret, TSK_ERR_BAD_WINDOWS);
+    tsk_coalescence_time_table_free(&result);
+    sample_sets[0] = 7;
+    ret = tsk_treeseq_coalescence_time_table(&ts, 2, sample_set_sizes, sample_sets, 1,
+        windows, 1, TSK_COALESCENCE_EVENTS, &result);
+    CU_ASSERT_EQUAL_FATAL(ret, TSK_ERR_NODE_OUT_OF_BOUNDS);
+    tsk_coalescence_time_table_free(&result);
+
+    tsk_treeseq_free(&ts);
+}
+
+static void
+verify_tree_metrics(tsk_treeseq_t *ts)
+{
+    int ret;
+    tsk_tree_t t;
+    tsk_size_t num_trees = tsk_treeseq_get_num_trees(ts);
+    tsk_size_t num_samples = tsk_treeseq_get_num_samples(ts);
+    double *total_branch_length = tsk_malloc(num_trees * sizeof(double));
+    tsk_size_t *num_roots = tsk_malloc(num_trees * sizeof(tsk_size_t));
+    double *tmrca = tsk_malloc(num_trees * sizeof(double));
+    tsk_size_t *sackin_index = tsk_malloc(num_trees * sizeof(tsk_size_t));
+    double *colless_index = tsk_malloc(num_trees * sizeof(double));
+    double *b1_index = tsk_malloc(num_trees * sizeof(double));
+    double *b1_part = tsk_malloc(num_trees * sizeof(double));
+    double tbl, b1;
+    tsk_size_t sackin, colless;
+    tsk_size_t num_tree_samples = 0;
+    tsk_id_t j, root;
+
+    CU_ASSERT_FATAL(total_branch_length != NULL);
+    CU_ASSERT_FATAL(num_roots != NULL);
+    CU_ASSERT_FATAL(tmrca != NULL);
+    CU_ASSERT_FATAL(sackin_index != NULL);
+    CU_ASSERT_FATAL(colless_index != NULL);
+    CU_ASSERT_FATAL(b1_index != NULL);
+    CU_ASSERT_FATAL(b1_part != NULL);
+
+    ret = tsk_treeseq_get_tree_metrics(ts, 0, (tsk_id_t) num_trees, 0,
+        total_branch_length, num_roots, tmrca, sackin_index, colless_index, b1_index);
+    CU_ASSERT_EQUAL_FATAL(ret, 0);
+
+    ret = tsk_tree_init(&t, ts, 0);
+    CU_ASSERT_EQUAL_FATAL(ret, 0);
+    for (ret = tsk_tree_first(&t); ret == TSK_TREE_OK; ret = tsk_tree_next(&t)) {
+        j = t.index;
+        ret = tsk_tree_get_total_branch_length(&t, TSK_NULL, &tbl);
+        CU_ASSERT_EQUAL_FATAL(ret, 0);
+        CU_ASSERT_EQUAL(total_branch_length[j], tbl);
+        CU_ASSERT_EQUAL(num_roots[j], tsk_tree_get_num_roots(&t));
+        root = tsk_tree_get_left_root(&t);
+        if (num_roots[j] == 1) {
+            ret = tsk_tree_get_num_samples(&t, root, &num_tree_samples);
+            CU_ASSERT_EQUAL_FATAL(ret, 0);
+        }
+        if (num_roots[j] == 1 && num_tree_samples == num_samples) {
+            CU_ASSERT_EQUAL(tmrca[j], ts->tables->nodes.time[root]);
+        } else {
+            CU_ASSERT_TRUE(tsk_isnan(tmrca[j]));
+        }
+        ret = tsk_tree_sackin_index(&t, &sackin);
+        CU_ASSERT_EQUAL_FATAL(ret, 0);
+        CU_ASSERT_EQUAL(sackin_index[j], sackin);
+        ret = tsk_tree_colless_index(&t, &colless);
+        if (ret == 0) {
+            CU_ASSERT_EQUAL(colless_index[j], (double) colless);
+        } else {
+            CU_ASSERT_TRUE(ret == TSK_ERR_UNDEFINED_MULTIROOT
+                           || ret == TSK_ERR_UNDEFINED_NONBINARY);
+            CU_ASSERT_TRUE(tsk_isnan(colless_index[j]));
+        }
+        ret = tsk_tree_b1_index(&t, &b1);
+        CU_ASSERT_EQUAL_FATAL(ret, 0);
+        CU_ASSERT_DOUBLE_EQUAL(b1_index[j], b1, 1e-9);
+    }
+    CU_ASSERT_EQUAL_FATAL(ret, 0);
+
+    /* Subsets of the trees give the same values, and outputs can be omitted */
+    for (j = 0; j < (tsk_id_t) num_trees; j++) {
+        ret = tsk_treeseq_get_tree_metrics(
+            ts, j, (tsk_id_t) num_trees, 0, NULL, NULL, NULL, NULL, NULL, b1_part);
+        CU_ASSERT_EQUAL_FATAL(ret, 0);
+        CU_ASSERT_EQUAL(b1_part[0], b1_index[j]);
+        CU_ASSERT_EQUAL(
+            b1_part[num_trees - (tsk_size_t) j - 1], b1_index[num_trees - 1]);
+        ret = tsk_treeseq_get_tree_metrics(
+            ts, j, j + 1, 0, NULL, num_roots, NULL, NULL, NULL, NULL);
+        CU_ASSERT_EQUAL_FATAL(ret, 0);
+    }
+    ret = tsk_treeseq_get_tree_metrics(ts, 0, 0, 0, NULL, NULL, NULL, NULL, NULL, NULL);
+    CU_ASSERT_EQUAL_FATAL(ret, 0);
+
+    ret = tsk_treeseq_get_tree_metrics(ts, -1, 0, 0, NULL, NULL, NULL, NULL, NULL, NULL);
+    CU_ASSERT_EQUAL_FATAL(ret, TSK_ERR_SEEK_OUT_OF_BOUNDS);
+    ret = tsk_treeseq_get_tree_metrics(ts, 1, 0, 0, NULL, NULL, NULL, NULL, NULL, NULL);
+    CU_ASSERT_EQUAL_FATAL(ret, TSK_ERR_SEEK_OUT_OF_BOUNDS);
+    ret = tsk_treeseq_get_tree_metrics(
+        ts, 0, (tsk_id_t) num_trees + 1, 0, NULL, NULL, NULL, NULL, NULL, NULL);
+    CU_ASSERT_EQUAL_FATAL(ret, TSK_ERR_SEEK_OUT_OF_BOUNDS);
+
+    tsk_tree_free(&t);
+    free(total_branch_length);
+    free(num_roots);
+    free(tmrca);
+    free(sackin_index);
+    free(colless_index);
+    free(b1_index);
+    free(b1_part);
+}
+
+static void
+test_tree_metrics(void)
+{
+    tsk_treeseq_t ts;
+    tsk_table_collection_t tables;
+    int ret;
+
+    tsk_treeseq_from_text(&ts, 1, single_tree_ex_nodes, single_tree_ex_edges, NULL, NULL,
+        NULL, NULL, NULL, 0);
+    verify_tree_metrics(&ts);
+    tsk_treeseq_free(&ts);
+
+    tsk_treeseq_from_text(&ts, 10, paper_ex_nodes, paper_ex_edges, NULL, NULL, NULL,
+        paper_ex_individuals, NULL, 0);
+    verify_tree_metrics(&ts);
+    tsk_treeseq_free(&ts);
+
+    tsk_treeseq_from_text(&ts, 10, multiroot_ex_nodes, multiroot_ex_edges, NULL, NULL,
+        NULL, NULL, NULL, 0);
+    verify_tree_metrics(&ts);
+    tsk_treeseq_free(&ts);
+
+    tsk_treeseq_from_text(&ts, 100, nonbinary_ex_nodes, nonbinary_ex_edges, NULL, NULL,
+        NULL, NULL, NULL, 0);
+    verify_tree_metrics(&ts);
+    tsk_treeseq_free(&ts);
+
+    tsk_treeseq_from_text(
+        &ts, 10, unary_ex_nodes, unary_ex_edges, NULL, NULL, NULL, NULL, NULL, 0);
+    verify_tree_metrics(&ts);
+    tsk_treeseq_free(&ts);
+
+    tsk_treeseq_from_text(&ts, 10, internal_sample_ex_nodes, internal_sample_ex_edges,
+        NULL, NULL, NULL, NULL, NULL, 0);
+    verify_tree_metrics(&ts);
+    tsk_treeseq_free(&ts);
+
+    ret = tsk_table_collection_init(&tables, 0);
+    CU_ASSERT_EQUAL_FATAL(ret, 0);
+    tables.sequence_length = 1.0;
+    ret = tsk_treeseq_init(&ts, &tables, TSK_TS_INIT_BUILD_INDEXES);
+    CU_ASSERT_EQUAL_FATAL(ret, 0);
+    verify_tree_metrics(&ts);
+    tsk_treeseq_free(&ts);
+    tsk_table_collection_free(&tables);
+}
+
 static void
 test_tree_errors(void)
 {
@@ -8212,7 +8950,10 @@ main(int argc, char **argv)
 
         /* Seek */
         { "test_seek_multi_tree", test_seek_multi_tree },
+        { "test_seek_index_multi_tree", test_seek_index_multi_tree },
         { "test_seek_errors", test_seek_errors },
+        { "test_seek_tree_checkpoints", test_seek_tree_checkpoints },
+        { "test_tree_checkpoints_errors", test_tree_checkpoints_errors },
 
         /* KC distance tests */
         { "test_single_tree_kc", test_single_tree_kc },
@@ -8237,6 +8978,12 @@ main(int argc, char **argv)
         { "test_nonbinary_balance", test_nonbinary_balance },
         { "test_empty_tree_balance", test_empty_tree_balance },
         { "test_b2_bad_base", test_b2_bad_base },
+        { "test_tree_metrics", test_tree_metrics },
+        { "test_mrcas", test_mrcas },
+        { "test_tmrca_matrix_windows", test_tmrca_matrix_windows },
+        { "test_coalescence_time_table", test_coalescence_time_table },
+        { "test_coalescence_time_table_sample_sets",
+            test_coalescence_time_table_sample_sets },
 
         /* Misc */
         { "test_tree_errors", test_tree_errors },
@@ -359,6 +359,10 @@ tsk_strerror_internal(int err)
             ret = "Table collection indexes inconsistent: do they need to be rebuilt? "
                   "(TSK_ERR_TABLES_BAD_INDEXES)";
             break;
+        case TSK_ERR_BAD_TREE_CHECKPOINTS:
+            ret = "Tree checkpoints are inconsistent with the edge table and need "
+                  "to be rebuilt. (TSK_ERR_BAD_TREE_CHECKPOINTS)";
+            break;
         case TSK_ERR_TABLE_OVERFLOW:
             ret = "Table too large; cannot allocate more than 2**31 rows. This error "
                   "is often caused by a lack of simplification when simulating. "
@@ -574,6 +578,17 @@ tsk_strerror_internal(int err)
                   "TSK_SIMPLIFY_KEEP_UNARY_IN_INDIVDUALS. "
                   "(TSK_ERR_KEEP_UNARY_MUTUALLY_EXCLUSIVE)";
             break;
+        case TSK_ERR_SIMPLIFIER_OPTION_NOT_SUPPORTED:
+            ret = "The TSK_SIMPLIFY_KEEP_INPUT_ROOTS and "
+                  "TSK_SIMPLIFY_REDUCE_TO_SITE_TOPOLOGY options are not supported "
+                  "by the persistent simplifier. "
+                  "(TSK_ERR_SIMPLIFIER_OPTION_NOT_SUPPORTED)";
+            break;
+        case TSK_ERR_SIMPLIFIER_ROWS_REMOVED:
+            ret = "Rows have been removed from the tables since the simplifier "
+                  "was last run; only appending rows is supported. "
+                  "(TSK_ERR_SIMPLIFIER_ROWS_REMOVED)";
+            break;
 
         /* Individual errors */
         case TSK_ERR_UNSORTED_INDIVIDUALS:
@@ -562,6 +562,10 @@ Metadata was attempted to be set on a table where it is disabled.
 There was an error with the table's indexes.
 */
 #define TSK_ERR_TABLES_BAD_INDEXES                                  -707
+/**
+The tree checkpoints are inconsistent with the edges and need to be rebuilt.
+*/
+#define TSK_ERR_BAD_TREE_CHECKPOINTS                                -708
 /** @} */
 
 /**
@@ -821,6 +825,15 @@ Both TSK_SIMPLIFY_KEEP_UNARY and TSK_SIMPLIFY_KEEP_UNARY_IN_INDIVIDUALS
 were specified. Only one can be used.
 */
 #define TSK_ERR_KEEP_UNARY_MUTUALLY_EXCLUSIVE                      -1600
+/**
+The specified simplify option is not supported by the persistent simplifier.
+*/
+#define TSK_ERR_SIMPLIFIER_OPTION_NOT_SUPPORTED                    -1601
+/**
+Rows were removed from the tables since the persistent simplifier was last
+run. Only appending rows is supported.
+*/
+#define TSK_ERR_SIMPLIFIER_ROWS_REMOVED                            -1602
 /** @} */
 
 /**
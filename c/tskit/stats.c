@@ -303,3 +303,126 @@ tsk_ld_calc_get_r2_array(tsk_ld_calc_t *self, tsk_id_t a, int direction,
 out:
     return ret;
 }
+
+/* Adds delta to the tracked sample counts of the specified samples and
+ * their ancestors in the current tree. This is much cheaper than resetting
+ * the tracked samples for every focal site when the tree is large. */
+static void
+tsk_ld_calc_update_tracked_samples(
+    tsk_ld_calc_t *self, tsk_size_t num_samples, const tsk_id_t *samples, int delta)
+{
+    tsk_size_t *restrict num_tracked_samples = self->tree.num_tracked_samples;
+    const tsk_id_t *restrict parent = self->tree.parent;
+    tsk_size_t j;
+    tsk_id_t u;
+
+    for (j = 0; j < num_samples; j++) {
+        for (u = samples[j]; u != TSK_NULL; u = parent[u]) {
+            num_tracked_samples[u] += (tsk_size_t) delta;
+        }
+    }
+}
+
+/* The matrix is filled row by row. Rather than moving the main tree back
+ * to each focal site in turn, we use a second tree that moves forward
+ * through the focal sites to find the samples under each focal mutation.
+ * These are then tracked in the main tree, which stays within the column
+ * sites and traverses them in alternating directions. */
+int
+tsk_ld_calc_get_r2_matrix(tsk_ld_calc_t *self, tsk_id_t row_start, tsk_id_t row_stop,
+    tsk_id_t col_start, tsk_id_t col_stop, double max_distance, double *r2)
+{
+    int ret = 0;
+    const tsk_id_t num_sites = (tsk_id_t) tsk_treeseq_get_num_sites(self->tree_sequence);
+    const double *restrict position = self->tree_sequence->tables->sites.position;
+    const tsk_size_t num_cols = (tsk_size_t) TSK_MAX(0, col_stop - col_start);
+    tsk_tree_t focal_tree;
+    tsk_site_t site;
+    tsk_size_t num_focal_samples;
+    double *restrict row;
+    tsk_id_t a, b, j, lower, upper;
+    bool forward = true;
+
+    tsk_memset(&focal_tree, 0, sizeof(focal_tree));
+    if (row_start < 0 || row_start > row_stop || row_stop > num_sites || col_start < 0
+        || col_start > col_stop || col_stop > num_sites) {
+        ret = TSK_ERR_SITE_OUT_OF_BOUNDS;
+        goto out;
+    }
+    if (max_distance < 0) {
+        ret = TSK_ERR_BAD_PARAM_VALUE;
+        goto out;
+    }
+    ret = tsk_tree_init(&focal_tree, self->tree_sequence, TSK_NO_SAMPLE_COUNTS);
+    if (ret != 0) {
+        goto out;
+    }
+    ret = tsk_tree_set_tracked_samples(&self->tree, 0, NULL);
+    if (ret != 0) {
+        goto out;
+    }
+    for (a = row_start; a < row_stop; a++) {
+        row = r2 + ((tsk_size_t)(a - row_start)) * num_cols;
+        for (b = col_start; b < col_stop; b++) {
+            row[b - col_start] = NAN;
+        }
+        ret = tsk_treeseq_get_site(self->tree_sequence, a, &self->focal_site);
+        if (ret != 0) {
+            goto out;
+        }
+        ret = tsk_ld_calc_check_site(self, &self->focal_site);
+        if (ret != 0) {
+            goto out;
+        }
+        /* Sites are sorted by position, so the pairs within range of the
+         * focal site are contiguous */
+        lower = col_start;
+        while (lower < col_stop && position[a] - position[lower] > max_distance) {
+            lower++;
+        }
+        upper = lower;
+        while (upper < col_stop && position[upper] - position[a] <= max_distance) {
+            upper++;
+        }
+        if (lower == upper) {
+            continue;
+        }
+        ret = tsk_tree_seek(&focal_tree, position[a], 0);
+        if (ret != 0) {
+            goto out;
+        }
+        ret = tsk_tree_preorder_samples_from(&focal_tree,
+            self->focal_site.mutations[0].node, self->sample_buffer, &num_focal_samples);
+        if (ret != 0) {
+            goto out;
+        }
+        tsk_ld_calc_update_tracked_samples(
+            self, num_focal_samples, self->sample_buffer, 1);
+        self->focal_samples = num_focal_samples;
+        for (j = 0; j < upper - lower; j++) {
+            b = forward ? lower + j : upper - j - 1;
+            if (a == b) {
+                row[b - col_start] = 1.0;
+                continue;
+            }
+            ret = tsk_treeseq_get_site(self->tree_sequence, b, &site);
+            if (ret != 0) {
+                goto out;
+            }
+            ret = tsk_tree_seek(&self->tree, site.position, 0);
+            if (ret != 0) {
+                goto out;
+            }
+            ret = tsk_ld_calc_compute_r2(self, &site, &row[b - col_start]);
+            if (ret != 0) {
+                goto out;
+            }
+        }
+        tsk_ld_calc_update_tracked_samples(
+            self, num_focal_samples, self->sample_buffer, -1);
+        forward = !forward;
+    }
+out:
+    tsk_tree_free(&focal_tree);
+    return ret;
+}
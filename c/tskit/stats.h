@@ -52,6 +52,22 @@ int tsk_ld_calc_get_r2(tsk_ld_calc_t *self, tsk_id_t a, tsk_id_t b, double *r2);
 int tsk_ld_calc_get_r2_array(tsk_ld_calc_t *self, tsk_id_t a, int direction,
     tsk_size_t max_sites, double max_distance, double *r2, tsk_size_t *num_r2_values);
 
+/**
+@brief Compute a block of the matrix of pairwise r2 values between sites.
+
+@rst
+Fills the ``(row_stop - row_start) * (col_stop - col_start)`` row-major
+array ``r2`` with the values of :math:`r^2` between each site in
+``[row_start, row_stop)`` and each site in ``[col_start, col_stop)``. Pairs
+of sites that are further than ``max_distance`` apart in sequence
+coordinates are not computed and set to NaN, and the value for a site
+with itself is 1. Blocks of the matrix may be computed independently by
+separate calculators, and so the full matrix can be split across threads.
+@endrst
+*/
+int tsk_ld_calc_get_r2_matrix(tsk_ld_calc_t *self, tsk_id_t row_start, tsk_id_t row_stop,
+    tsk_id_t col_start, tsk_id_t col_stop, double max_distance, double *r2);
+
 #ifdef __cplusplus
 }
 #endif
@@ -23,6 +23,18 @@
  * SOFTWARE.
  */
 
+/* Needed for fileno and mmap when compiling with -std=c99 */
+#if !defined(_WIN32) && !defined(_POSIX_C_SOURCE)
+#define _POSIX_C_SOURCE 200112L
+#endif
+/* mincore is not part of POSIX */
+#if !defined(_WIN32) && !defined(_DEFAULT_SOURCE)
+#define _DEFAULT_SOURCE
+#endif
+#if defined(__APPLE__) && !defined(_DARWIN_C_SOURCE)
+#define _DARWIN_C_SOURCE
+#endif
+
 #include <assert.h>
 #include <stdio.h>
 #include <stddef.h>
@@ -32,11 +44,21 @@
 #include <float.h>
 #include <math.h>
 
+#if !defined(_WIN32)
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <unistd.h>
+#endif
+
 #include <tskit/tables.h>
 
 #define TABLE_SEP "-----------------------------------------\n"
 
 #define TSK_COL_OPTIONAL (1 << 0)
+/* Set by the read functions when the column data and offset arrays point
+ * into a memory mapped file, and so must not be freed. */
+#define TSK_COL_BORROWED (1 << 1)
+#define TSK_COL_OFFSET_BORROWED (1 << 2)
 
 typedef struct {
     const char *name;
@@ -103,13 +125,71 @@ check_offset_overflow(tsk_size_t current_size, tsk_size_t additional_elements)
 #define TSK_NUM_ROWS_UNSET ((tsk_size_t) -1)
 #define TSK_MAX_COL_NAME_LEN 64
 
+static const kaitem_t *
+find_store_item(const kastore_t *store, const char *key)
+{
+    const size_t key_len = strlen(key);
+    size_t lower = 0;
+    size_t upper = store->num_items;
+    size_t mid, len;
+    const kaitem_t *item;
+    int cmp;
+
+    while (lower < upper) {
+        mid = lower + (upper - lower) / 2;
+        item = &store->items[mid];
+        len = TSK_MIN(key_len, item->key_len);
+        cmp = memcmp(item->key, key, len);
+        if (cmp == 0) {
+            cmp = (item->key_len > key_len) - (item->key_len < key_len);
+        }
+        if (cmp == 0) {
+            return item;
+        }
+        if (cmp < 0) {
+            lower = mid + 1;
+        } else {
+            upper = mid;
+        }
+    }
+    return NULL;
+}
+
+/* Gets the specified array from the store. If the file underlying the store
+ * has been memory mapped by tsk_table_collection_map_store, mapping points
+ * to the start of the mapped file and we return a pointer to the array
+ * within it, setting borrowed to true. Otherwise, the array is read and the
+ * caller takes ownership of it. */
+static int
+get_store_array(kastore_t *store, void *mapping, const char *key, void **array,
+    size_t *len, int *type, bool *borrowed)
+{
+    int ret = 0;
+    const kaitem_t *item = NULL;
+
+    *borrowed = false;
+    if (mapping != NULL) {
+        item = find_store_item(store, key);
+    }
+    if (item != NULL) {
+        *array = (char *) mapping + store->file_offset + item->array_start;
+        *len = item->array_len;
+        *type = item->type;
+        *borrowed = true;
+    } else {
+        ret = kastore_gets(store, key, array, len, type);
+    }
+    return ret;
+}
+
 static int
-read_table_cols(kastore_t *store, tsk_size_t *num_rows, read_table_col_t *cols,
-    tsk_flags_t TSK_UNUSED(flags))
+read_table_cols(kastore_t *store, void *mapping, tsk_size_t *num_rows,
+    read_table_col_t *cols, tsk_flags_t TSK_UNUSED(flags))
 {
     int ret = 0;
     size_t len;
     int type;
+    bool borrowed;
     read_table_col_t *col;
 
     for (col = cols; col->name != NULL; col++) {
@@ -119,11 +199,15 @@ read_table_cols(kastore_t *store, tsk_size_t *num_rows, read_table_col_t *cols,
             goto out;
         }
         if (ret == 1) {
-            ret = kastore_gets(store, col->name, col->array_dest, &len, &type);
+            ret = get_store_array(
+                store, mapping, col->name, col->array_dest, &len, &type, &borrowed);
             if (ret != 0) {
                 ret = tsk_set_kas_error(ret);
                 goto out;
             }
+            if (borrowed) {
+                col->options |= TSK_COL_BORROWED;
+            }
             if (*num_rows == TSK_NUM_ROWS_UNSET) {
                 *num_rows = (tsk_size_t) len;
             } else {
@@ -166,7 +250,7 @@ out:
 }
 
 static int
-read_table_ragged_cols(kastore_t *store, tsk_size_t *num_rows,
+read_table_ragged_cols(kastore_t *store, void *mapping, tsk_size_t *num_rows,
     read_table_ragged_col_t *cols, tsk_flags_t TSK_UNUSED(flags))
 {
     int ret = 0;
@@ -175,7 +259,8 @@ read_table_ragged_cols(kastore_t *store, tsk_size_t *num_rows,
     int type;
     read_table_ragged_col_t *col;
     char offset_col_name[TSK_MAX_COL_NAME_LEN];
-    bool data_col_present, offset_col_present;
+    bool data_col_present, offset_col_present, borrowed;
+    bool offset_borrowed = false;
     void *store_offset_array = NULL;
     tsk_size_t *offset_array;
 
@@ -187,11 +272,15 @@ read_table_ragged_cols(kastore_t *store, tsk_size_t *num_rows,
         }
         data_col_present = false;
         if (ret == 1) {
-            ret = kastore_gets(store, col->name, col->data_array_dest, &data_len, &type);
+            ret = get_store_array(store, mapping, col->name, col->data_array_dest,
+                &data_len, &type, &borrowed);
             if (ret != 0) {
                 ret = tsk_set_kas_error(ret);
                 goto out;
             }
+            if (borrowed) {
+                col->options |= TSK_COL_BORROWED;
+            }
             if (type != col->data_type) {
                 ret = TSK_ERR_BAD_COLUMN_TYPE;
                 goto out;
@@ -218,8 +307,8 @@ read_table_ragged_cols(kastore_t *store, tsk_size_t *num_rows,
             goto out;
         }
         if (offset_col_present) {
-            ret = kastore_gets(
-                store, offset_col_name, &store_offset_array, &offset_len, &type);
+            ret = get_store_array(store, mapping, offset_col_name, &store_offset_array,
+                &offset_len, &type, &offset_borrowed);
             if (ret != 0) {
                 ret = tsk_set_kas_error(ret);
                 goto out;
@@ -242,12 +331,17 @@ read_table_ragged_cols(kastore_t *store, tsk_size_t *num_rows,
             if (type == KAS_UINT64) {
                 *col->offset_array_dest = (uint64_t *) store_offset_array;
                 store_offset_array = NULL;
+                if (offset_borrowed) {
+                    col->options |= TSK_COL_OFFSET_BORROWED;
+                }
             } else if (type == KAS_UINT32) {
                 ret = cast_offset_array(col, (uint32_t *) store_offset_array, *num_rows);
                 if (ret != 0) {
                     goto out;
                 }
-                tsk_safe_free(store_offset_array);
+                if (!offset_borrowed) {
+                    tsk_safe_free(store_offset_array);
+                }
                 store_offset_array = NULL;
             } else {
                 ret = TSK_ERR_BAD_COLUMN_TYPE;
@@ -261,7 +355,9 @@ read_table_ragged_cols(kastore_t *store, tsk_size_t *num_rows,
         }
     }
 out:
-    tsk_safe_free(store_offset_array);
+    if (!offset_borrowed) {
+        tsk_safe_free(store_offset_array);
+    }
     return ret;
 }
 
@@ -300,7 +396,7 @@ out:
 }
 
 static int
-read_table(kastore_t *store, tsk_size_t *num_rows, read_table_col_t *cols,
+read_table(kastore_t *store, void *mapping, tsk_size_t *num_rows, read_table_col_t *cols,
     read_table_ragged_col_t *ragged_cols, read_table_property_t *properties,
     tsk_flags_t options)
 {
@@ -308,13 +404,13 @@ read_table(kastore_t *store, tsk_size_t *num_rows, read_table_col_t *cols,
 
     *num_rows = TSK_NUM_ROWS_UNSET;
     if (cols != NULL) {
-        ret = read_table_cols(store, num_rows, cols, options);
+        ret = read_table_cols(store, mapping, num_rows, cols, options);
         if (ret != 0) {
             goto out;
         }
     }
     if (ragged_cols != NULL) {
-        ret = read_table_ragged_cols(store, num_rows, ragged_cols, options);
+        ret = read_table_ragged_cols(store, mapping, num_rows, ragged_cols, options);
         if (ret != 0) {
             goto out;
         }
@@ -343,13 +439,19 @@ free_read_table_mem(read_table_col_t *cols, read_table_ragged_col_t *ragged_cols
 
     if (cols != NULL) {
         for (col = cols; col->name != NULL; col++) {
-            tsk_safe_free(*(col->array_dest));
+            if (!(col->options & TSK_COL_BORROWED)) {
+                tsk_safe_free(*(col->array_dest));
+            }
         }
     }
     if (ragged_cols != NULL) {
         for (ragged_col = ragged_cols; ragged_col->name != NULL; ragged_col++) {
-            tsk_safe_free(*(ragged_col->data_array_dest));
-            tsk_safe_free(*(ragged_col->offset_array_dest));
+            if (!(ragged_col->options & TSK_COL_BORROWED)) {
+                tsk_safe_free(*(ragged_col->data_array_dest));
+            }
+            if (!(ragged_col->options & TSK_COL_OFFSET_BORROWED)) {
+                tsk_safe_free(*(ragged_col->offset_array_dest));
+            }
         }
     }
     if (properties != NULL) {
@@ -1894,7 +1996,7 @@ tsk_individual_table_dump(
 }
 
 static int
-tsk_individual_table_load(tsk_individual_table_t *self, kastore_t *store)
+tsk_individual_table_load(tsk_individual_table_t *self, kastore_t *store, void *mapping)
 {
     int ret = 0;
     tsk_flags_t *flags = NULL;
@@ -1927,7 +2029,7 @@ tsk_individual_table_load(tsk_individual_table_t *self, kastore_t *store)
         { .name = NULL },
     };
 
-    ret = read_table(store, &num_rows, cols, ragged_cols, properties, 0);
+    ret = read_table(store, mapping, &num_rows, cols, ragged_cols, properties, 0);
     if (ret != 0) {
         goto out;
     }
@@ -2565,7 +2667,7 @@ tsk_node_table_dump(const tsk_node_table_t *self, kastore_t *store, tsk_flags_t
 }
 
 static int
-tsk_node_table_load(tsk_node_table_t *self, kastore_t *store)
+tsk_node_table_load(tsk_node_table_t *self, kastore_t *store, void *mapping)
 {
     int ret = 0;
     char *metadata_schema = NULL;
@@ -2594,7 +2696,7 @@ tsk_node_table_load(tsk_node_table_t *self, kastore_t *store)
         { .name = NULL },
     };
 
-    ret = read_table(store, &num_rows, cols, ragged_cols, properties, 0);
+    ret = read_table(store, mapping, &num_rows, cols, ragged_cols, properties, 0);
     if (ret != 0) {
         goto out;
     }
@@ -3270,7 +3372,7 @@ out:
 }
 
 static int
-tsk_edge_table_load(tsk_edge_table_t *self, kastore_t *store)
+tsk_edge_table_load(tsk_edge_table_t *self, kastore_t *store, void *mapping)
 {
     int ret = 0;
     char *metadata_schema = NULL;
@@ -3300,7 +3402,7 @@ tsk_edge_table_load(tsk_edge_table_t *self, kastore_t *store)
         { .name = NULL },
     };
 
-    ret = read_table(store, &num_rows, cols, ragged_cols, properties, 0);
+    ret = read_table(store, mapping, &num_rows, cols, ragged_cols, properties, 0);
     if (ret != 0) {
         goto out;
     }
@@ -4012,7 +4114,7 @@ tsk_site_table_dump(const tsk_site_table_t *self, kastore_t *store, tsk_flags_t
 }
 
 static int
-tsk_site_table_load(tsk_site_table_t *self, kastore_t *store)
+tsk_site_table_load(tsk_site_table_t *self, kastore_t *store, void *mapping)
 {
     int ret = 0;
     char *metadata_schema = NULL;
@@ -4040,7 +4142,7 @@ tsk_site_table_load(tsk_site_table_t *self, kastore_t *store)
         { .name = NULL },
     };
 
-    ret = read_table(store, &num_rows, cols, ragged_cols, properties, 0);
+    ret = read_table(store, mapping, &num_rows, cols, ragged_cols, properties, 0);
     if (ret != 0) {
         goto out;
     }
@@ -4819,7 +4921,7 @@ tsk_mutation_table_dump(
 }
 
 static int
-tsk_mutation_table_load(tsk_mutation_table_t *self, kastore_t *store)
+tsk_mutation_table_load(tsk_mutation_table_t *self, kastore_t *store, void *mapping)
 {
     int ret = 0;
     tsk_id_t *node = NULL;
@@ -4853,7 +4955,7 @@ tsk_mutation_table_load(tsk_mutation_table_t *self, kastore_t *store)
         { .name = NULL },
     };
 
-    ret = read_table(store, &num_rows, cols, ragged_cols, properties, 0);
+    ret = read_table(store, mapping, &num_rows, cols, ragged_cols, properties, 0);
     if (ret != 0) {
         goto out;
     }
@@ -5488,7 +5590,7 @@ tsk_migration_table_dump(
 }
 
 static int
-tsk_migration_table_load(tsk_migration_table_t *self, kastore_t *store)
+tsk_migration_table_load(tsk_migration_table_t *self, kastore_t *store, void *mapping)
 {
     int ret = 0;
     tsk_id_t *source = NULL;
@@ -5522,7 +5624,7 @@ tsk_migration_table_load(tsk_migration_table_t *self, kastore_t *store)
         { .name = NULL },
     };
 
-    ret = read_table(store, &num_rows, cols, ragged_cols, properties, 0);
+    ret = read_table(store, mapping, &num_rows, cols, ragged_cols, properties, 0);
     if (ret != 0) {
         goto out;
     }
@@ -6068,7 +6170,7 @@ tsk_population_table_dump(
 }
 
 static int
-tsk_population_table_load(tsk_population_table_t *self, kastore_t *store)
+tsk_population_table_load(tsk_population_table_t *self, kastore_t *store, void *mapping)
 {
     int ret = 0;
     char *metadata = NULL;
@@ -6087,7 +6189,7 @@ tsk_population_table_load(tsk_population_table_t *self, kastore_t *store)
         { .name = NULL },
     };
 
-    ret = read_table(store, &num_rows, NULL, ragged_cols, properties, 0);
+    ret = read_table(store, mapping, &num_rows, NULL, ragged_cols, properties, 0);
     if (ret != 0) {
         goto out;
     }
@@ -6695,7 +6797,7 @@ tsk_provenance_table_dump(
 }
 
 static int
-tsk_provenance_table_load(tsk_provenance_table_t *self, kastore_t *store)
+tsk_provenance_table_load(tsk_provenance_table_t *self, kastore_t *store, void *mapping)
 {
     int ret;
     char *timestamp = NULL;
@@ -6712,7 +6814,7 @@ tsk_provenance_table_load(tsk_provenance_table_t *self, kastore_t *store)
         { .name = NULL },
     };
 
-    ret = read_table(store, &num_rows, NULL, ragged_cols, NULL, 0);
+    ret = read_table(store, mapping, &num_rows, NULL, ragged_cols, NULL, 0);
     if (ret != 0) {
         goto out;
     }
@@ -6741,13 +6843,10 @@ typedef struct {
     tsk_id_t parent;
     tsk_id_t child;
     double time;
-    /* It would be a little bit more convenient to store a pointer to the
-     * metadata here in the struct rather than an offset back into the
-     * original array. However, this would increase the size of the struct
-     * from 40 bytes to 48 and we will allocate very large numbers of these.
-     */
-    tsk_size_t metadata_offset;
-    tsk_size_t metadata_length;
+    /* The original row ID, used to break ties so that the sort order is
+     * total and to retrieve metadata. We allocate very large numbers of
+     * these, so we avoid storing anything else. */
+    tsk_id_t id;
 } edge_sort_t;
 
 typedef struct {
@@ -6865,6 +6964,10 @@ cmp_edge(const void *a, const void *b)
             /* If the child nodes are equal, sort by the left coordinate. */
             if (ret == 0) {
                 ret = (ca->left > cb->left) - (ca->left < cb->left);
+                /* Otherwise, retain the input order */
+                if (ret == 0) {
+                    ret = (ca->id > cb->id) - (ca->id < cb->id);
+                }
             }
         }
     }
@@ -6897,6 +7000,206 @@ cmp_migration(const void *a, const void *b)
     return ret;
 }
 
+typedef struct {
+    char *src;
+    char *dest;
+    size_t size;
+    int (*compar)(const void *, const void *);
+    tsk_size_t start;
+    tsk_size_t mid;
+    tsk_size_t end;
+} sort_block_t;
+
+static void
+sort_block_qsort(void *arg)
+{
+    sort_block_t *block = (sort_block_t *) arg;
+
+    qsort(block->src + block->start * block->size, (size_t)(block->end - block->start),
+        block->size, block->compar);
+}
+
+/* Merge the sorted runs [start, mid) and [mid, end) of src into dest. Ties
+ * are taken from the left run, so that the merge is stable. */
+static void
+sort_block_merge(void *arg)
+{
+    sort_block_t *block = (sort_block_t *) arg;
+    const size_t size = block->size;
+    const char *left = block->src + block->start * size;
+    const char *left_end = block->src + block->mid * size;
+    const char *right = left_end;
+    const char *right_end = block->src + block->end * size;
+    char *dest = block->dest + block->start * size;
+
+    while (left < left_end && right < right_end) {
+        if (block->compar(right, left) < 0) {
+            tsk_memcpy(dest, right, size);
+            right += size;
+        } else {
+            tsk_memcpy(dest, left, size);
+            left += size;
+        }
+        dest += size;
+    }
+    tsk_memcpy(dest, left, (size_t)(left_end - left));
+    dest += left_end - left;
+    tsk_memcpy(dest, right, (size_t)(right_end - right));
+}
+
+static int
+tsk_table_sorter_run_tasks(
+    tsk_table_sorter_t *self, tsk_size_t num_tasks, void (*task)(void *), void **args)
+{
+    int ret = 0;
+    tsk_size_t j;
+
+    if (self->run_tasks != NULL && num_tasks > 1) {
+        ret = self->run_tasks(self, num_tasks, task, args);
+    } else {
+        for (j = 0; j < num_tasks; j++) {
+            task(args[j]);
+        }
+    }
+    return ret;
+}
+
+/* Sorts the specified array using the specified comparison function, which
+ * must define a total order. If the sorter has more than one thread, the
+ * array is split into num_threads blocks which are sorted independently and
+ * then merged in rounds, with the tasks in each round run using run_tasks.
+ * Because the order is total, the result is identical to a single qsort. */
+static int
+tsk_table_sorter_sort_blocks(tsk_table_sorter_t *self, void *base, tsk_size_t n,
+    size_t size, int (*compar)(const void *, const void *))
+{
+    int ret = 0;
+    tsk_size_t num_blocks = TSK_MIN(self->num_threads, n);
+    tsk_size_t num_runs, width, j;
+    sort_block_t *blocks = NULL;
+    void **args = NULL;
+    char *buffer = NULL;
+    char *src = (char *) base;
+    char *dest, *tmp;
+
+    if (num_blocks <= 1) {
+        qsort(base, (size_t) n, size, compar);
+        goto out;
+    }
+    blocks = tsk_malloc(num_blocks * sizeof(*blocks));
+    args = tsk_malloc(num_blocks * sizeof(*args));
+    buffer = tsk_malloc(n * size);
+    if (blocks == NULL || args == NULL || buffer == NULL) {
+        ret = TSK_ERR_NO_MEMORY;
+        goto out;
+    }
+    dest = buffer;
+    for (j = 0; j < num_blocks; j++) {
+        blocks[j].src = src;
+        blocks[j].dest = dest;
+        blocks[j].size = size;
+        blocks[j].compar = compar;
+        blocks[j].start = (j * n) / num_blocks;
+        blocks[j].end = ((j + 1) * n) / num_blocks;
+        args[j] = blocks + j;
+    }
+    ret = tsk_table_sorter_run_tasks(self, num_blocks, sort_block_qsort, args);
+    if (ret != 0) {
+        goto out;
+    }
+    /* Merge adjacent pairs of sorted runs, doubling the run width each round */
+    for (width = 1; width < num_blocks; width *= 2) {
+        num_runs = 0;
+        for (j = 0; j < num_blocks; j += 2 * width) {
+            blocks[num_runs].src = src;
+            blocks[num_runs].dest = dest;
+            blocks[num_runs].start = (j * n) / num_blocks;
+            blocks[num_runs].mid = (TSK_MIN(j + width, num_blocks) * n) / num_blocks;
+            blocks[num_runs].end = (TSK_MIN(j + 2 * width, num_blocks) * n) / num_blocks;
+            args[num_runs] = blocks + num_runs;
+            num_runs++;
+        }
+        ret = tsk_table_sorter_run_tasks(self, num_runs, sort_block_merge, args);
+        if (ret != 0) {
+            goto out;
+        }
+        tmp = src;
+        src = dest;
+        dest = tmp;
+    }
+    if (src != (char *) base) {
+        tsk_memcpy(base, src, n * size);
+    }
+out:
+    tsk_safe_free(blocks);
+    tsk_safe_free(args);
+    tsk_safe_free(buffer);
+    return ret;
+}
+
+/* Sorts the specified array as in tsk_table_sorter_sort_blocks. Tables are
+ * often sorted and then appended to, so we first find the longest prefix of
+ * the array that is already sorted. Only the remaining elements are then
+ * sorted, and the two sorted runs are merged in linear time. The merge is
+ * done in place using a copy of the prefix, which is safe because the merge
+ * output can never overtake the unread elements of the suffix. The first
+ * num_sorted elements are known by the caller to be sorted, and so the scan
+ * for the sorted prefix starts after these. */
+static int
+tsk_table_sorter_sort_array(tsk_table_sorter_t *self, void *base, tsk_size_t n,
+    tsk_size_t num_sorted, size_t size, int (*compar)(const void *, const void *))
+{
+    int ret = 0;
+    char *array = (char *) base;
+    char *prefix = NULL;
+    const char *left, *left_end, *right, *right_end;
+    char *dest;
+
+    if (n <= 1) {
+        goto out;
+    }
+    num_sorted = TSK_MIN(TSK_MAX(num_sorted, 1), n);
+    while (num_sorted < n
+           && compar(array + (num_sorted - 1) * size, array + num_sorted * size) <= 0) {
+        num_sorted++;
+    }
+    if (num_sorted == n) {
+        goto out;
+    }
+    ret = tsk_table_sorter_sort_blocks(
+        self, array + num_sorted * size, n - num_sorted, size, compar);
+    if (ret != 0) {
+        goto out;
+    }
+    prefix = tsk_malloc(num_sorted * size);
+    if (prefix == NULL) {
+        ret = TSK_ERR_NO_MEMORY;
+        goto out;
+    }
+    tsk_memcpy(prefix, array, num_sorted * size);
+    left = prefix;
+    left_end = prefix + num_sorted * size;
+    right = array + num_sorted * size;
+    right_end = array + n * size;
+    dest = array;
+    /* Ties are taken from the prefix, so that the merge is stable */
+    while (left < left_end && right < right_end) {
+        if (compar(right, left) < 0) {
+            tsk_memcpy(dest, right, size);
+            right += size;
+        } else {
+            tsk_memcpy(dest, left, size);
+            left += size;
+        }
+        dest += size;
+    }
+    /* Any remaining elements of the suffix are already in place */
+    tsk_memcpy(dest, left, (size_t)(left_end - left));
+out:
+    tsk_safe_free(prefix);
+    return ret;
+}
+
 static int
 tsk_table_sorter_sort_edges(tsk_table_sorter_t *self, tsk_size_t start)
 {
@@ -6904,16 +7207,27 @@ tsk_table_sorter_sort_edges(tsk_table_sorter_t *self, tsk_size_t start)
     const tsk_edge_table_t *edges = &self->tables->edges;
     const double *restrict node_time = self->tables->nodes.time;
     edge_sort_t *e;
-    tsk_size_t j, k, metadata_offset;
+    tsk_size_t j, k, metadata_offset, metadata_length, num_sorted;
     tsk_size_t n = edges->num_rows - start;
+    bool has_metadata = tsk_edge_table_has_metadata(edges);
     edge_sort_t *sorted_edges = tsk_malloc(n * sizeof(*sorted_edges));
     char *old_metadata = tsk_malloc(edges->metadata_length);
-    bool has_metadata = tsk_edge_table_has_metadata(edges);
+    tsk_size_t *old_metadata_offset = NULL;
 
     if (sorted_edges == NULL || old_metadata == NULL) {
         ret = TSK_ERR_NO_MEMORY;
         goto out;
     }
+    if (has_metadata) {
+        old_metadata_offset
+            = tsk_malloc((edges->num_rows + 1) * sizeof(*old_metadata_offset));
+        if (old_metadata_offset == NULL) {
+            ret = TSK_ERR_NO_MEMORY;
+            goto out;
+        }
+        tsk_memcpy(old_metadata_offset, edges->metadata_offset,
+            (edges->num_rows + 1) * sizeof(*old_metadata_offset));
+    }
     tsk_memcpy(old_metadata, edges->metadata, edges->metadata_length);
     for (j = 0; j < n; j++) {
         e = sorted_edges + j;
@@ -6923,15 +7237,16 @@ tsk_table_sorter_sort_edges(tsk_table_sorter_t *self, tsk_size_t start)
         e->parent = edges->parent[k];
         e->child = edges->child[k];
         e->time = node_time[e->parent];
-        if (has_metadata) {
-            e->metadata_offset = edges->metadata_offset[k];
-            e->metadata_length
-                = edges->metadata_offset[k + 1] - edges->metadata_offset[k];
-        }
+        e->id = (tsk_id_t) k;
+    }
+    num_sorted = self->num_sorted_edges > start ? self->num_sorted_edges - start : 0;
+    ret = tsk_table_sorter_sort_array(
+        self, sorted_edges, n, num_sorted, sizeof(*sorted_edges), cmp_edge);
+    if (ret != 0) {
+        goto out;
     }
-    qsort(sorted_edges, (size_t) n, sizeof(edge_sort_t), cmp_edge);
     /* Copy the edges back into the table. */
-    metadata_offset = 0;
+    metadata_offset = has_metadata ? edges->metadata_offset[start] : 0;
     for (j = 0; j < n; j++) {
         e = sorted_edges + j;
         k = start + j;
@@ -6940,15 +7255,18 @@ tsk_table_sorter_sort_edges(tsk_table_sorter_t *self, tsk_size_t start)
         edges->parent[k] = e->parent;
         edges->child[k] = e->child;
         if (has_metadata) {
+            metadata_length
+                = old_metadata_offset[e->id + 1] - old_metadata_offset[e->id];
             tsk_memcpy(edges->metadata + metadata_offset,
-                old_metadata + e->metadata_offset, e->metadata_length);
+                old_metadata + old_metadata_offset[e->id], metadata_length);
             edges->metadata_offset[k] = metadata_offset;
-            metadata_offset += e->metadata_length;
+            metadata_offset += metadata_length;
         }
     }
 out:
     tsk_safe_free(sorted_edges);
     tsk_safe_free(old_metadata);
+    tsk_safe_free(old_metadata_offset);
     return ret;
 }
 
@@ -7028,7 +7346,11 @@ tsk_table_sorter_sort_sites(tsk_table_sorter_t *self)
     }
 
     /* Sort the sites by position */
-    qsort(sorted_sites, (size_t) num_sites, sizeof(*sorted_sites), cmp_site);
+    ret = tsk_table_sorter_sort_array(
+        self, sorted_sites, num_sites, 0, sizeof(*sorted_sites), cmp_site);
+    if (ret != 0) {
+        goto out;
+    }
 
     /* Build the mapping from old site IDs to new site IDs and copy back into the
      * table
@@ -7082,8 +7404,11 @@ tsk_table_sorter_sort_mutations(tsk_table_sorter_t *self)
         goto out;
     }
 
-    qsort(sorted_mutations, (size_t) num_mutations, sizeof(*sorted_mutations),
-        cmp_mutation);
+    ret = tsk_table_sorter_sort_array(self, sorted_mutations, num_mutations, 0,
+        sizeof(*sorted_mutations), cmp_mutation);
+    if (ret != 0) {
+        goto out;
+    }
 
     /* Make a first pass through the sorted mutations to build the ID map. */
     for (j = 0; j < num_mutations; j++) {
@@ -7628,6 +7953,21 @@ typedef struct {
      * sites.*/
     double *position_lookup;
     int64_t edge_sort_offset;
+    /* State used by the persistent simplifier. Nodes with IDs less than
+     * num_retained_nodes were output by the previous round of simplification.
+     * If ancestry_changed[u] is false for such a node, its ancestry over
+     * each of its input edges as a child is the node itself, so we do not
+     * need to extract it. The coalescent span of each node (the total length
+     * of its ancestry segments mapped to itself) in the previous round is
+     * given by retained_span, and output_span records this for the output
+     * nodes of the current round. */
+    tsk_size_t num_retained_nodes;
+    const bool *was_sample;
+    bool *ancestry_changed;
+    const double *retained_span;
+    double *output_span;
+    tsk_segment_t *interval_buffer;
+    tsk_size_t max_interval_buffer_size;
 } simplifier_t;
 
 static int
@@ -8530,6 +8870,128 @@ tsk_identity_segments_get_items(const tsk_identity_segments_t *self, tsk_id_t *p
     return 0;
 }
 
+typedef struct {
+    tsk_size_t num_nodes;
+    tsk_size_t index;
+    tsk_id_t *pair_a;
+    tsk_id_t *pair_b;
+    double *left;
+    double *right;
+    tsk_id_t *node;
+} get_arrays_params_t;
+
+static void
+get_arrays_traverse(tsk_avl_node_int_t *avl_node, get_arrays_params_t *params)
+{
+    tsk_id_t a, b;
+    tsk_size_t j;
+    const tsk_identity_segment_t *seg;
+
+    if (avl_node == NULL) {
+        return;
+    }
+    get_arrays_traverse(avl_node->llink, params);
+    integer_to_pair(avl_node->key, params->num_nodes, &a, &b);
+    seg = ((tsk_identity_segment_list_t *) avl_node->value)->head;
+    for (; seg != NULL; seg = seg->next) {
+        j = params->index;
+        params->pair_a[j] = a;
+        params->pair_b[j] = b;
+        params->left[j] = seg->left;
+        params->right[j] = seg->right;
+        params->node[j] = seg->node;
+        params->index++;
+    }
+    get_arrays_traverse(avl_node->rlink, params);
+}
+
+int
+tsk_identity_segments_get_arrays(const tsk_identity_segments_t *self, tsk_id_t *pair_a,
+    tsk_id_t *pair_b, double *left, double *right, tsk_id_t *node)
+{
+    get_arrays_params_t params = { .num_nodes = self->num_nodes,
+        .index = 0,
+        .pair_a = pair_a,
+        .pair_b = pair_b,
+        .left = left,
+        .right = right,
+        .node = node };
+
+    if (!self->store_segments) {
+        return TSK_ERR_IBD_SEGMENTS_NOT_STORED;
+    }
+    get_arrays_traverse(tsk_avl_tree_int_get_root(&self->pair_map), &params);
+    tsk_bug_assert(params.index == self->num_segments);
+    return 0;
+}
+
+static void
+get_span_matrix_traverse(tsk_avl_node_int_t *avl_node, tsk_size_t N,
+    const tsk_id_t *node_set, tsk_size_t num_sample_sets, double *result)
+{
+    tsk_id_t a, b, set_a, set_b;
+    double span;
+
+    if (avl_node == NULL) {
+        return;
+    }
+    get_span_matrix_traverse(avl_node->llink, N, node_set, num_sample_sets, result);
+    integer_to_pair(avl_node->key, N, &a, &b);
+    set_a = node_set[a];
+    set_b = node_set[b];
+    if (set_a != TSK_NULL && set_b != TSK_NULL) {
+        span = ((tsk_identity_segment_list_t *) avl_node->value)->total_span;
+        result[(tsk_size_t) set_a * num_sample_sets + (tsk_size_t) set_b] += span;
+        if (set_a != set_b) {
+            result[(tsk_size_t) set_b * num_sample_sets + (tsk_size_t) set_a] += span;
+        }
+    }
+    get_span_matrix_traverse(avl_node->rlink, N, node_set, num_sample_sets, result);
+}
+
+int
+tsk_identity_segments_get_span_matrix(const tsk_identity_segments_t *self,
+    tsk_size_t num_sample_sets, const tsk_size_t *sample_set_sizes,
+    const tsk_id_t *sample_sets, double *result)
+{
+    int ret = 0;
+    tsk_size_t j, k, offset;
+    tsk_id_t u;
+    tsk_id_t *node_set = tsk_malloc(self->num_nodes * sizeof(*node_set));
+
+    if (node_set == NULL) {
+        ret = TSK_ERR_NO_MEMORY;
+        goto out;
+    }
+    if (!self->store_pairs) {
+        ret = TSK_ERR_IBD_PAIRS_NOT_STORED;
+        goto out;
+    }
+    tsk_memset(node_set, 0xff, self->num_nodes * sizeof(*node_set));
+    offset = 0;
+    for (j = 0; j < num_sample_sets; j++) {
+        for (k = 0; k < sample_set_sizes[j]; k++) {
+            u = sample_sets[offset];
+            offset++;
+            if (u < 0 || u >= (tsk_id_t) self->num_nodes) {
+                ret = TSK_ERR_NODE_OUT_OF_BOUNDS;
+                goto out;
+            }
+            if (node_set[u] != TSK_NULL) {
+                ret = TSK_ERR_DUPLICATE_SAMPLE;
+                goto out;
+            }
+            node_set[u] = (tsk_id_t) j;
+        }
+    }
+    tsk_memset(result, 0, num_sample_sets * num_sample_sets * sizeof(*result));
+    get_span_matrix_traverse(tsk_avl_tree_int_get_root(&self->pair_map), self->num_nodes,
+        node_set, num_sample_sets, result);
+out:
+    tsk_safe_free(node_set);
+    return ret;
+}
+
 int
 tsk_identity_segments_free(tsk_identity_segments_t *self)
 {
@@ -8591,6 +9053,13 @@ tsk_identity_segments_add_segment(tsk_identity_segments_t *self, tsk_id_t a, tsk
             goto out;
         }
     }
+    if (self->sink != NULL) {
+        ret = self->sink(
+            TSK_MIN(a, b), TSK_MAX(a, b), left, right, node, self->sink_params);
+        if (ret != 0) {
+            goto out;
+        }
+    }
     self->total_span += right - left;
     self->num_segments++;
 out:
@@ -9575,22 +10044,44 @@ simplifier_init_nodes(simplifier_t *self, const tsk_id_t *samples)
             node_id_map[j] = (tsk_id_t) j;
         }
     }
-    /* Add the initial ancestry */
+out:
+    return ret;
+}
+
+/* Adds the initial ancestry for the samples. When continuing from a previous
+ * round of simplification, a sample whose ancestry has not changed is never
+ * extracted as a child, and its ancestry is rebuilt from scratch if it is
+ * merged as a parent. We therefore only need to map its mutations. */
+static int
+simplifier_init_ancestry(simplifier_t *self, const tsk_id_t *samples)
+{
+    int ret = 0;
+    tsk_id_t node_id;
+    tsk_size_t j;
+    const double sequence_length = self->input_tables.sequence_length;
+
     for (j = 0; j < self->num_samples; j++) {
         node_id = samples[j];
-        ret = simplifier_add_ancestry(self, node_id, 0,
-            self->input_tables.sequence_length, self->node_id_map[node_id]);
-        if (ret != 0) {
-            goto out;
+        if (self->ancestry_changed != NULL && !self->ancestry_changed[node_id]) {
+            simplifier_map_mutations(
+                self, node_id, 0, sequence_length, self->node_id_map[node_id]);
+        } else {
+            ret = simplifier_add_ancestry(
+                self, node_id, 0, sequence_length, self->node_id_map[node_id]);
+            if (ret != 0) {
+                goto out;
+            }
         }
     }
 out:
     return ret;
 }
 
+/* Sets up the simplifier state, apart from the initial ancestry of the
+ * samples, which is added by simplifier_init_ancestry. */
 static int
-simplifier_init(simplifier_t *self, const tsk_id_t *samples, tsk_size_t num_samples,
-    tsk_table_collection_t *tables, tsk_flags_t options)
+simplifier_init_state(simplifier_t *self, const tsk_id_t *samples,
+    tsk_size_t num_samples, tsk_table_collection_t *tables, tsk_flags_t options)
 {
     int ret = 0;
     tsk_size_t j;
@@ -9602,17 +10093,18 @@ simplifier_init(simplifier_t *self, const tsk_id_t *samples, tsk_size_t num_samp
     self->options = options;
     self->tables = tables;
 
-    /* TODO we can add a flag to skip these checks for when we know they are
-     * unnecessary */
     /* TODO Current unit tests require TSK_CHECK_SITE_DUPLICATES but it's
      * debateable whether we need it. If we remove, we definitely need explicit
      * tests to ensure we're doing sensible things with duplicate sites.
      * (Particularly, re TSK_SIMPLIFY_REDUCE_TO_SITE_TOPOLOGY.) */
-    ret_id = tsk_table_collection_check_integrity(tables,
-        TSK_CHECK_EDGE_ORDERING | TSK_CHECK_SITE_ORDERING | TSK_CHECK_SITE_DUPLICATES);
-    if (ret_id != 0) {
-        ret = (int) ret_id;
-        goto out;
+    if (!(options & TSK_NO_CHECK_INTEGRITY)) {
+        ret_id = tsk_table_collection_check_integrity(
+            tables, TSK_CHECK_EDGE_ORDERING | TSK_CHECK_SITE_ORDERING
+                        | TSK_CHECK_SITE_DUPLICATES);
+        if (ret_id != 0) {
+            ret = (int) ret_id;
+            goto out;
+        }
     }
 
     /* Allocate the heaps used for small objects-> Assuming 8K is a good chunk size
@@ -9687,6 +10179,20 @@ out:
     return ret;
 }
 
+static int
+simplifier_init(simplifier_t *self, const tsk_id_t *samples, tsk_size_t num_samples,
+    tsk_table_collection_t *tables, tsk_flags_t options)
+{
+    int ret = simplifier_init_state(self, samples, num_samples, tables, options);
+
+    if (ret != 0) {
+        goto out;
+    }
+    ret = simplifier_init_ancestry(self, samples);
+out:
+    return ret;
+}
+
 static int
 simplifier_free(simplifier_t *self)
 {
@@ -9707,40 +10213,197 @@ simplifier_free(simplifier_t *self)
     tsk_safe_free(self->node_mutation_list_map_tail);
     tsk_safe_free(self->buffered_children);
     tsk_safe_free(self->position_lookup);
+    tsk_safe_free(self->interval_buffer);
     return 0;
 }
 
+/* Computes the union of the intervals covered by the specified range
+ * of input edges, and stores it in the interval buffer. */
 static int TSK_WARN_UNUSED
-simplifier_enqueue_segment(simplifier_t *self, double left, double right, tsk_id_t node)
+simplifier_compute_edge_union(
+    simplifier_t *self, tsk_size_t start, tsk_size_t end, tsk_size_t *ret_num_intervals)
 {
     int ret = 0;
-    tsk_segment_t *seg;
+    const tsk_edge_table_t *input_edges = &self->input_tables.edges;
+    tsk_size_t j, num_intervals;
+    tsk_segment_t *buffer;
     void *p;
 
-    tsk_bug_assert(left < right);
-    /* Make sure we always have room for one more segment in the queue so we
-     * can put a tail sentinel on it */
-    if (self->segment_queue_size == self->max_segment_queue_size - 1) {
-        self->max_segment_queue_size *= 2;
-        p = tsk_realloc(self->segment_queue,
-            self->max_segment_queue_size * sizeof(*self->segment_queue));
+    if (end - start > self->max_interval_buffer_size) {
+        self->max_interval_buffer_size = end - start;
+        p = tsk_realloc(self->interval_buffer,
+            self->max_interval_buffer_size * sizeof(*self->interval_buffer));
         if (p == NULL) {
             ret = TSK_ERR_NO_MEMORY;
             goto out;
         }
-        self->segment_queue = p;
+        self->interval_buffer = p;
     }
-    seg = self->segment_queue + self->segment_queue_size;
-    seg->left = left;
-    seg->right = right;
-    seg->node = node;
-    self->segment_queue_size++;
+    buffer = self->interval_buffer;
+    for (j = start; j < end; j++) {
+        buffer[j - start].left = input_edges->left[j];
+        buffer[j - start].right = input_edges->right[j];
+        buffer[j - start].node = TSK_NULL;
+    }
+    qsort(buffer, (size_t)(end - start), sizeof(*buffer), cmp_segment);
+    num_intervals = 0;
+    for (j = 0; j < end - start; j++) {
+        if (num_intervals > 0 && buffer[num_intervals - 1].right >= buffer[j].left) {
+            buffer[num_intervals - 1].right
+                = TSK_MAX(buffer[num_intervals - 1].right, buffer[j].right);
+        } else {
+            buffer[num_intervals] = buffer[j];
+            num_intervals++;
+        }
+    }
+    *ret_num_intervals = num_intervals;
 out:
     return ret;
 }
 
+/* Returns true if the specified parent or any of its children has
+ * ancestry that differs from the previous round of simplification. */
+static bool
+simplifier_parent_changed(
+    simplifier_t *self, tsk_id_t parent, tsk_size_t start, tsk_size_t end)
+{
+    const tsk_id_t *child = self->input_tables.edges.child;
+    tsk_size_t j;
+
+    if (self->ancestry_changed[parent]) {
+        return true;
+    }
+    for (j = start; j < end; j++) {
+        if (self->ancestry_changed[child[j]]) {
+            return true;
+        }
+    }
+    return false;
+}
+
+/* Processes a retained parent for which neither the parent nor any of its
+ * children have changed ancestry. Such a parent must have been output by the
+ * previous round of simplification, and so its output edges are exactly its
+ * input edges with the nodes remapped. We avoid merging the ancestry of the
+ * children and just copy these over. */
 static int TSK_WARN_UNUSED
-simplifier_merge_ancestors(simplifier_t *self, tsk_id_t input_id)
+simplifier_retain_parent_edges(
+    simplifier_t *self, tsk_id_t parent, tsk_size_t start, tsk_size_t end)
+{
+    int ret = 0;
+    tsk_size_t j, num_flushed_edges, num_intervals;
+    const tsk_edge_table_t *input_edges = &self->input_tables.edges;
+    tsk_id_t output_id = self->node_id_map[parent];
+    tsk_id_t child;
+
+    if (output_id == TSK_NULL) {
+        output_id = simplifier_record_node(self, parent);
+        if (output_id < 0) {
+            ret = (int) output_id;
+            goto out;
+        }
+    }
+    for (j = start; j < end; j++) {
+        tsk_bug_assert(parent == input_edges->parent[j]);
+        child = self->node_id_map[input_edges->child[j]];
+        tsk_bug_assert(child != TSK_NULL);
+        ret = simplifier_record_edge(
+            self, input_edges->left[j], input_edges->right[j], child);
+        if (ret != 0) {
+            goto out;
+        }
+    }
+    ret = simplifier_flush_edges(self, output_id, &num_flushed_edges);
+    if (ret != 0) {
+        goto out;
+    }
+    self->output_span[output_id] = self->retained_span[parent];
+    if (!self->is_sample[parent] && self->node_mutation_list_map_head[parent] != NULL) {
+        /* Mutations on samples were mapped when the sample ancestry was set.
+         * Otherwise, the ancestry of the parent is itself over the union of
+         * its edges. */
+        ret = simplifier_compute_edge_union(self, start, end, &num_intervals);
+        if (ret != 0) {
+            goto out;
+        }
+        for (j = 0; j < num_intervals; j++) {
+            simplifier_map_mutations(self, parent, self->interval_buffer[j].left,
+                self->interval_buffer[j].right, output_id);
+        }
+    }
+out:
+    return ret;
+}
+
+/* After merging the ancestry for a parent, record its coalescent span and
+ * check whether the ancestry of a retained parent has changed, in which
+ * case its parents must also be merged. A retained parent can only coalesce
+ * within the intervals of its previous output edges, over which its ancestry
+ * was previously itself. Its ancestry is therefore unchanged if it is mapped
+ * to itself everywhere with the same total span as before. */
+static void
+simplifier_update_ancestry_changed(simplifier_t *self, tsk_id_t parent)
+{
+    tsk_id_t output_id = self->node_id_map[parent];
+    const tsk_segment_t *x;
+    double span = 0;
+    bool changed = false;
+
+    for (x = self->ancestor_map_head[parent]; x != NULL; x = x->next) {
+        if (output_id != TSK_NULL && x->node == output_id) {
+            span += x->right - x->left;
+        } else {
+            changed = true;
+        }
+    }
+    if (output_id != TSK_NULL) {
+        self->output_span[output_id] = span;
+    }
+    if ((tsk_size_t) parent >= self->num_retained_nodes
+        || self->ancestry_changed[parent]) {
+        return;
+    }
+    if (self->is_sample[parent]) {
+        /* The ancestry of a sample always covers the full sequence, so it
+         * can only have changed if the node was not previously a sample. */
+        changed = !self->was_sample[parent];
+    } else {
+        changed = changed || span != self->retained_span[parent];
+    }
+    self->ancestry_changed[parent] = changed;
+}
+
+static int TSK_WARN_UNUSED
+simplifier_enqueue_segment(simplifier_t *self, double left, double right, tsk_id_t node)
+{
+    int ret = 0;
+    tsk_segment_t *seg;
+    void *p;
+
+    tsk_bug_assert(left < right);
+    /* Make sure we always have room for one more segment in the queue so we
+     * can put a tail sentinel on it */
+    if (self->segment_queue_size == self->max_segment_queue_size - 1) {
+        self->max_segment_queue_size *= 2;
+        p = tsk_realloc(self->segment_queue,
+            self->max_segment_queue_size * sizeof(*self->segment_queue));
+        if (p == NULL) {
+            ret = TSK_ERR_NO_MEMORY;
+            goto out;
+        }
+        self->segment_queue = p;
+    }
+    seg = self->segment_queue + self->segment_queue_size;
+    seg->left = left;
+    seg->right = right;
+    seg->node = node;
+    self->segment_queue_size++;
+out:
+    return ret;
+}
+
+static int TSK_WARN_UNUSED
+simplifier_merge_ancestors(simplifier_t *self, tsk_id_t input_id)
 {
     int ret = 0;
     tsk_segment_t **X, *x;
@@ -9760,7 +10423,14 @@ simplifier_merge_ancestors(simplifier_t *self, tsk_id_t input_id)
     if (is_sample) {
         /* Free up the existing ancestry mapping. */
         x = self->ancestor_map_tail[input_id];
-        tsk_bug_assert(x->left == 0 && x->right == self->tables->sequence_length);
+        if (x == NULL) {
+            /* Unchanged samples are not given initial ancestry when
+             * continuing from a previous round of simplification. */
+            tsk_bug_assert(
+                self->ancestry_changed != NULL && !self->ancestry_changed[input_id]);
+        } else {
+            tsk_bug_assert(x->left == 0 && x->right == self->tables->sequence_length);
+        }
         self->ancestor_map_head[input_id] = NULL;
         self->ancestor_map_tail[input_id] = NULL;
     }
@@ -9926,6 +10596,11 @@ simplifier_process_parent_edges(
     tsk_id_t child;
     double left, right;
 
+    if (self->ancestry_changed != NULL
+        && !simplifier_parent_changed(self, parent, start, end)) {
+        ret = simplifier_retain_parent_edges(self, parent, start, end);
+        goto out;
+    }
     /* Go through the edges and queue up ancestry segments for processing. */
     self->segment_queue_size = 0;
     for (j = start; j < end; j++) {
@@ -9933,7 +10608,20 @@ simplifier_process_parent_edges(
         child = input_edges->child[j];
         left = input_edges->left[j];
         right = input_edges->right[j];
-        ret = simplifier_extract_ancestry(self, left, right, child);
+        if (self->ancestry_changed != NULL && j > start
+            && child == input_edges->child[j - 1] && left == input_edges->left[j - 1]) {
+            /* The persistent simplifier does not check the ordering of the
+             * sorted edges, but the sort leaves any duplicates adjacent. */
+            ret = TSK_ERR_DUPLICATE_EDGES;
+            goto out;
+        }
+        if (self->ancestry_changed != NULL && !self->ancestry_changed[child]) {
+            tsk_bug_assert(self->node_id_map[child] != TSK_NULL);
+            ret = simplifier_enqueue_segment(
+                self, left, right, self->node_id_map[child]);
+        } else {
+            ret = simplifier_extract_ancestry(self, left, right, child);
+        }
         if (ret != 0) {
             goto out;
         }
@@ -9943,6 +10631,9 @@ simplifier_process_parent_edges(
     if (ret != 0) {
         goto out;
     }
+    if (self->ancestry_changed != NULL) {
+        simplifier_update_ancestry_changed(self, parent);
+    }
 out:
     return ret;
 }
@@ -10424,9 +11115,10 @@ out:
     return ret;
 }
 
+/* Checks the rows of the node table from the specified start row onwards. */
 static int
 tsk_table_collection_check_node_integrity(
-    const tsk_table_collection_t *self, tsk_flags_t options)
+    const tsk_table_collection_t *self, tsk_size_t start, tsk_flags_t options)
 {
     int ret = 0;
     tsk_size_t j;
@@ -10436,7 +11128,7 @@ tsk_table_collection_check_node_integrity(
     tsk_id_t num_individuals = (tsk_id_t) self->individuals.num_rows;
     const bool check_population_refs = !(options & TSK_NO_CHECK_POPULATION_REFS);
 
-    for (j = 0; j < self->nodes.num_rows; j++) {
+    for (j = start; j < self->nodes.num_rows; j++) {
         node_time = self->nodes.time[j];
         if (!tsk_isfinite(node_time)) {
             ret = TSK_ERR_TIME_NONFINITE;
@@ -10459,9 +11151,11 @@ out:
     return ret;
 }
 
+/* Checks the rows of the edge table from the specified start row onwards.
+ * The ordering of the edges can only be checked from the first row. */
 static int
 tsk_table_collection_check_edge_integrity(
-    const tsk_table_collection_t *self, tsk_flags_t options)
+    const tsk_table_collection_t *self, tsk_size_t start, tsk_flags_t options)
 {
     int ret = 0;
     tsk_size_t j;
@@ -10474,6 +11168,7 @@ tsk_table_collection_check_edge_integrity(
     const bool check_ordering = !!(options & TSK_CHECK_EDGE_ORDERING);
     bool *parent_seen = NULL;
 
+    tsk_bug_assert(start == 0 || !check_ordering);
     if (check_ordering) {
         parent_seen = tsk_calloc((tsk_size_t) num_nodes, sizeof(*parent_seen));
         if (parent_seen == NULL) {
@@ -10486,7 +11181,7 @@ tsk_table_collection_check_edge_integrity(
     last_left = 0;
     last_parent = 0;
     last_child = 0;
-    for (j = 0; j < edges.num_rows; j++) {
+    for (j = start; j < edges.num_rows; j++) {
         parent = edges.parent[j];
         child = edges.child[j];
         left = edges.left[j];
@@ -10790,9 +11485,11 @@ out:
     return ret;
 }
 
+/* Checks the rows of the individual table from the specified start row
+ * onwards. */
 static int TSK_WARN_UNUSED
 tsk_table_collection_check_individual_integrity(
-    const tsk_table_collection_t *self, tsk_flags_t options)
+    const tsk_table_collection_t *self, tsk_size_t start, tsk_flags_t options)
 {
     int ret = 0;
     tsk_size_t j, k;
@@ -10800,7 +11497,7 @@ tsk_table_collection_check_individual_integrity(
     const tsk_id_t num_individuals = (tsk_id_t) individuals.num_rows;
     const bool check_individual_ordering = options & TSK_CHECK_INDIVIDUAL_ORDERING;
 
-    for (j = 0; j < (tsk_size_t) num_individuals; j++) {
+    for (j = start; j < (tsk_size_t) num_individuals; j++) {
         for (k = individuals.parents_offset[j]; k < individuals.parents_offset[j + 1];
              k++) {
             /* Check parent references are valid */
@@ -10827,6 +11524,38 @@ out:
     return ret;
 }
 
+static int TSK_WARN_UNUSED
+tsk_table_collection_check_tree_checkpoints_bounds(const tsk_table_collection_t *self)
+{
+    int ret = 0;
+    tsk_size_t j;
+    const tsk_size_t num_checkpoints = self->indexes.num_tree_checkpoints;
+    const tsk_id_t *restrict tree = self->indexes.tree_checkpoint_tree;
+    const tsk_id_t *restrict edges = self->indexes.tree_checkpoint_edges;
+    const tsk_size_t *restrict offset = self->indexes.tree_checkpoint_edges_offset;
+    const tsk_id_t num_edges = (tsk_id_t) self->edges.num_rows;
+
+    if (offset[0] != 0) {
+        ret = TSK_ERR_BAD_TREE_CHECKPOINTS;
+        goto out;
+    }
+    for (j = 0; j < num_checkpoints; j++) {
+        if (tree[j] < 0 || (j > 0 && tree[j] <= tree[j - 1])
+            || offset[j + 1] < offset[j]) {
+            ret = TSK_ERR_BAD_TREE_CHECKPOINTS;
+            goto out;
+        }
+    }
+    for (j = 0; j < offset[num_checkpoints]; j++) {
+        if (edges[j] < 0 || edges[j] >= num_edges) {
+            ret = TSK_ERR_BAD_TREE_CHECKPOINTS;
+            goto out;
+        }
+    }
+out:
+    return ret;
+}
+
 static tsk_id_t TSK_WARN_UNUSED
 tsk_table_collection_check_tree_integrity(const tsk_table_collection_t *self)
 {
@@ -10852,6 +11581,20 @@ tsk_table_collection_check_tree_integrity(const tsk_table_collection_t *self)
     tsk_id_t *restrict parent = NULL;
     int8_t *restrict used_edges = NULL;
     tsk_id_t num_trees = 0;
+    const bool check_checkpoints = tsk_table_collection_has_tree_checkpoints(self);
+    const tsk_id_t *restrict checkpoint_tree = self->indexes.tree_checkpoint_tree;
+    const tsk_id_t *restrict checkpoint_edges = self->indexes.tree_checkpoint_edges;
+    const tsk_size_t *restrict checkpoint_edges_offset
+        = self->indexes.tree_checkpoint_edges_offset;
+    tsk_size_t checkpoint = 0;
+    tsk_size_t l;
+
+    if (check_checkpoints) {
+        ret = tsk_table_collection_check_tree_checkpoints_bounds(self);
+        if (ret != 0) {
+            goto out;
+        }
+    }
 
     parent = tsk_malloc(self->nodes.num_rows * sizeof(*parent));
     used_edges = tsk_malloc(num_edges * sizeof(*used_edges));
@@ -10897,6 +11640,31 @@ tsk_table_collection_check_tree_integrity(const tsk_table_collection_t *self)
             parent[u] = edge_parent[e];
             j++;
         }
+        if (check_checkpoints && checkpoint < self->indexes.num_tree_checkpoints
+            && checkpoint_tree[checkpoint] == num_trees) {
+            /* The stored edges must be exactly the edges in this tree. We
+             * temporarily mark each one to detect duplicates. */
+            if (checkpoint_edges_offset[checkpoint + 1]
+                    - checkpoint_edges_offset[checkpoint]
+                != j - k) {
+                ret = TSK_ERR_BAD_TREE_CHECKPOINTS;
+                goto out;
+            }
+            for (l = checkpoint_edges_offset[checkpoint];
+                 l < checkpoint_edges_offset[checkpoint + 1]; l++) {
+                e = checkpoint_edges[l];
+                if (used_edges[e] != 1) {
+                    ret = TSK_ERR_BAD_TREE_CHECKPOINTS;
+                    goto out;
+                }
+                used_edges[e] = 3;
+            }
+            for (l = checkpoint_edges_offset[checkpoint];
+                 l < checkpoint_edges_offset[checkpoint + 1]; l++) {
+                used_edges[checkpoint_edges[l]] = 1;
+            }
+            checkpoint++;
+        }
         tree_right = sequence_length;
         if (j < num_edges) {
             tree_right = TSK_MIN(tree_right, edge_left[I[j]]);
@@ -10944,6 +11712,10 @@ tsk_table_collection_check_tree_integrity(const tsk_table_collection_t *self)
         used_edges[e]++;
         k++;
     }
+    if (check_checkpoints && checkpoint != self->indexes.num_tree_checkpoints) {
+        ret = TSK_ERR_BAD_TREE_CHECKPOINTS;
+        goto out;
+    }
     ret = num_trees;
 out:
     /* Can't use tsk_safe_free because of restrict*/
@@ -11004,11 +11776,11 @@ tsk_table_collection_check_integrity(
     if (ret != 0) {
         goto out;
     }
-    ret = tsk_table_collection_check_node_integrity(self, options);
+    ret = tsk_table_collection_check_node_integrity(self, 0, options);
     if (ret != 0) {
         goto out;
     }
-    ret = tsk_table_collection_check_edge_integrity(self, options);
+    ret = tsk_table_collection_check_edge_integrity(self, 0, options);
     if (ret != 0) {
         goto out;
     }
@@ -11024,7 +11796,7 @@ tsk_table_collection_check_integrity(
     if (ret != 0) {
         goto out;
     }
-    ret = tsk_table_collection_check_individual_integrity(self, options);
+    ret = tsk_table_collection_check_individual_integrity(self, 0, options);
     if (ret != 0) {
         goto out;
     }
@@ -11127,9 +11899,102 @@ out:
     return ret;
 }
 
+static void
+release_mapped_column(const tsk_table_collection_t *self, void **column)
+{
+    const char *data = (const char *) self->mapping.data;
+    const char *p = (const char *) *column;
+
+    if (p != NULL && p >= data && p <= data + self->mapping.size) {
+        *column = NULL;
+    }
+}
+
+/* Sets all column pointers into the memory mapped file to NULL so that
+ * they are not freed with the rest of the table memory. */
+static void
+tsk_table_collection_release_mapped_columns(tsk_table_collection_t *self)
+{
+    size_t j;
+    void **columns[] = {
+        (void **) &self->individuals.flags,
+        (void **) &self->individuals.location,
+        (void **) &self->individuals.location_offset,
+        (void **) &self->individuals.parents,
+        (void **) &self->individuals.parents_offset,
+        (void **) &self->individuals.metadata,
+        (void **) &self->individuals.metadata_offset,
+        (void **) &self->nodes.flags,
+        (void **) &self->nodes.time,
+        (void **) &self->nodes.population,
+        (void **) &self->nodes.individual,
+        (void **) &self->nodes.metadata,
+        (void **) &self->nodes.metadata_offset,
+        (void **) &self->edges.left,
+        (void **) &self->edges.right,
+        (void **) &self->edges.parent,
+        (void **) &self->edges.child,
+        (void **) &self->edges.metadata,
+        (void **) &self->edges.metadata_offset,
+        (void **) &self->migrations.left,
+        (void **) &self->migrations.right,
+        (void **) &self->migrations.node,
+        (void **) &self->migrations.source,
+        (void **) &self->migrations.dest,
+        (void **) &self->migrations.time,
+        (void **) &self->migrations.metadata,
+        (void **) &self->migrations.metadata_offset,
+        (void **) &self->sites.position,
+        (void **) &self->sites.ancestral_state,
+        (void **) &self->sites.ancestral_state_offset,
+        (void **) &self->sites.metadata,
+        (void **) &self->sites.metadata_offset,
+        (void **) &self->mutations.site,
+        (void **) &self->mutations.node,
+        (void **) &self->mutations.parent,
+        (void **) &self->mutations.time,
+        (void **) &self->mutations.derived_state,
+        (void **) &self->mutations.derived_state_offset,
+        (void **) &self->mutations.metadata,
+        (void **) &self->mutations.metadata_offset,
+        (void **) &self->populations.metadata,
+        (void **) &self->populations.metadata_offset,
+        (void **) &self->provenances.timestamp,
+        (void **) &self->provenances.timestamp_offset,
+        (void **) &self->provenances.record,
+        (void **) &self->provenances.record_offset,
+        (void **) &self->indexes.edge_insertion_order,
+        (void **) &self->indexes.edge_removal_order,
+        (void **) &self->indexes.tree_checkpoint_tree,
+        (void **) &self->indexes.tree_checkpoint_edges,
+        (void **) &self->indexes.tree_checkpoint_edges_offset,
+    };
+
+    for (j = 0; j < sizeof(columns) / sizeof(*columns); j++) {
+        release_mapped_column(self, columns[j]);
+    }
+}
+
+static void
+tsk_table_collection_free_mapped_column_names(tsk_table_collection_t *self)
+{
+    tsk_size_t j;
+
+    if (self->mapping.columns != NULL) {
+        for (j = 0; j < self->mapping.num_columns; j++) {
+            tsk_safe_free(self->mapping.columns[j].name);
+        }
+    }
+    tsk_safe_free(self->mapping.columns);
+    self->mapping.num_columns = 0;
+}
+
 int
 tsk_table_collection_free(tsk_table_collection_t *self)
 {
+    if (self->mapping.data != NULL) {
+        tsk_table_collection_release_mapped_columns(self);
+    }
     tsk_individual_table_free(&self->individuals);
     tsk_node_table_free(&self->nodes);
     tsk_edge_table_free(&self->edges);
@@ -11141,10 +12006,21 @@ tsk_table_collection_free(tsk_table_collection_t *self)
     tsk_reference_sequence_free(&self->reference_sequence);
     tsk_safe_free(self->indexes.edge_insertion_order);
     tsk_safe_free(self->indexes.edge_removal_order);
+    tsk_safe_free(self->indexes.tree_checkpoint_tree);
+    tsk_safe_free(self->indexes.tree_checkpoint_edges);
+    tsk_safe_free(self->indexes.tree_checkpoint_edges_offset);
     tsk_safe_free(self->file_uuid);
     tsk_safe_free(self->time_units);
     tsk_safe_free(self->metadata);
     tsk_safe_free(self->metadata_schema);
+    tsk_table_collection_free_mapped_column_names(self);
+#if !defined(_WIN32)
+    if (self->mapping.data != NULL) {
+        munmap(self->mapping.data, self->mapping.size);
+    }
+#endif
+    self->mapping.data = NULL;
+    self->mapping.size = 0;
     return 0;
 }
 
@@ -11287,6 +12163,222 @@ tsk_table_collection_has_reference_sequence(const tsk_table_collection_t *self)
     return !tsk_reference_sequence_is_null(&self->reference_sequence);
 }
 
+bool
+tsk_table_collection_has_tree_checkpoints(const tsk_table_collection_t *self)
+{
+    return self->indexes.tree_checkpoint_tree != NULL
+           && self->indexes.tree_checkpoint_edges != NULL
+           && self->indexes.tree_checkpoint_edges_offset != NULL
+           && tsk_table_collection_has_index(self, 0);
+}
+
+static void
+tsk_table_collection_drop_tree_checkpoints(tsk_table_collection_t *self)
+{
+    tsk_safe_free(self->indexes.tree_checkpoint_tree);
+    tsk_safe_free(self->indexes.tree_checkpoint_edges);
+    tsk_safe_free(self->indexes.tree_checkpoint_edges_offset);
+    self->indexes.tree_checkpoint_tree = NULL;
+    self->indexes.tree_checkpoint_edges = NULL;
+    self->indexes.tree_checkpoint_edges_offset = NULL;
+    self->indexes.num_tree_checkpoints = 0;
+}
+
+static int
+tsk_table_collection_takeset_tree_checkpoints(tsk_table_collection_t *self,
+    tsk_size_t num_tree_checkpoints, tsk_id_t *tree, tsk_id_t *edges,
+    tsk_size_t *edges_offset)
+{
+    int ret = 0;
+
+    if (tree == NULL || edges == NULL || edges_offset == NULL) {
+        ret = TSK_ERR_BAD_PARAM_VALUE;
+        goto out;
+    }
+    tsk_table_collection_drop_tree_checkpoints(self);
+    self->indexes.num_tree_checkpoints = num_tree_checkpoints;
+    self->indexes.tree_checkpoint_tree = tree;
+    self->indexes.tree_checkpoint_edges = edges;
+    self->indexes.tree_checkpoint_edges_offset = edges_offset;
+out:
+    return ret;
+}
+
+static int
+tsk_table_collection_copy_tree_checkpoints(
+    const tsk_table_collection_t *self, tsk_table_collection_t *dest)
+{
+    int ret = 0;
+    const tsk_size_t num_checkpoints = self->indexes.num_tree_checkpoints;
+    const tsk_size_t num_edges
+        = self->indexes.tree_checkpoint_edges_offset[num_checkpoints];
+    tsk_id_t *tree = tsk_malloc(num_checkpoints * sizeof(*tree));
+    tsk_id_t *edges = tsk_malloc(num_edges * sizeof(*edges));
+    tsk_size_t *edges_offset = tsk_malloc((num_checkpoints + 1) * sizeof(*edges_offset));
+
+    if (tree == NULL || edges == NULL || edges_offset == NULL) {
+        ret = TSK_ERR_NO_MEMORY;
+        goto out;
+    }
+    tsk_memcpy(
+        tree, self->indexes.tree_checkpoint_tree, num_checkpoints * sizeof(*tree));
+    tsk_memcpy(edges, self->indexes.tree_checkpoint_edges, num_edges * sizeof(*edges));
+    tsk_memcpy(edges_offset, self->indexes.tree_checkpoint_edges_offset,
+        (num_checkpoints + 1) * sizeof(*edges_offset));
+    ret = tsk_table_collection_takeset_tree_checkpoints(
+        dest, num_checkpoints, tree, edges, edges_offset);
+    if (ret != 0) {
+        goto out;
+    }
+    tree = NULL;
+    edges = NULL;
+    edges_offset = NULL;
+out:
+    tsk_safe_free(tree);
+    tsk_safe_free(edges);
+    tsk_safe_free(edges_offset);
+    return ret;
+}
+
+int TSK_WARN_UNUSED
+tsk_table_collection_build_tree_checkpoints(
+    tsk_table_collection_t *self, tsk_size_t interval, tsk_flags_t TSK_UNUSED(options))
+{
+    int ret = 0;
+    tsk_id_t ret_id;
+    const tsk_id_t num_edges = (tsk_id_t) self->edges.num_rows;
+    const double sequence_length = self->sequence_length;
+    const double *restrict edge_left = self->edges.left;
+    const double *restrict edge_right = self->edges.right;
+    const tsk_id_t *restrict I = self->indexes.edge_insertion_order;
+    const tsk_id_t *restrict O = self->indexes.edge_removal_order;
+    /* The edges in the current tree are kept in a circular doubly linked
+     * list in insertion order, with num_edges used as the head sentinel. */
+    const tsk_id_t head = num_edges;
+    tsk_id_t *next = NULL;
+    tsk_id_t *prev = NULL;
+    tsk_id_t *tree = NULL;
+    tsk_id_t *edges = NULL;
+    tsk_size_t *edges_offset = NULL;
+    tsk_size_t max_checkpoints = 1024;
+    tsk_size_t max_edges = 1024;
+    tsk_size_t num_checkpoints = 0;
+    tsk_size_t total_edges = 0;
+    tsk_size_t tree_index, num_tree_edges;
+    tsk_id_t j, k, e;
+    double tree_left, tree_right;
+    void *p;
+
+    if (interval < 1) {
+        ret = TSK_ERR_BAD_PARAM_VALUE;
+        goto out;
+    }
+    if (!tsk_table_collection_has_index(self, 0)) {
+        ret = TSK_ERR_TABLES_NOT_INDEXED;
+        goto out;
+    }
+    ret_id = tsk_table_collection_check_integrity(self, TSK_CHECK_INDEXES);
+    if (ret_id != 0) {
+        ret = (int) ret_id;
+        goto out;
+    }
+    tsk_table_collection_drop_tree_checkpoints(self);
+
+    next = tsk_malloc(((tsk_size_t) num_edges + 1) * sizeof(*next));
+    prev = tsk_malloc(((tsk_size_t) num_edges + 1) * sizeof(*prev));
+    tree = tsk_malloc(max_checkpoints * sizeof(*tree));
+    edges = tsk_malloc(max_edges * sizeof(*edges));
+    edges_offset = tsk_malloc((max_checkpoints + 1) * sizeof(*edges_offset));
+    if (next == NULL || prev == NULL || tree == NULL || edges == NULL
+        || edges_offset == NULL) {
+        ret = TSK_ERR_NO_MEMORY;
+        goto out;
+    }
+    next[head] = head;
+    prev[head] = head;
+    edges_offset[0] = 0;
+
+    tree_left = 0;
+    tree_index = 0;
+    j = 0;
+    k = 0;
+    while (j < num_edges || tree_left < sequence_length) {
+        while (k < num_edges && edge_right[O[k]] == tree_left) {
+            e = O[k];
+            next[prev[e]] = next[e];
+            prev[next[e]] = prev[e];
+            k++;
+        }
+        while (j < num_edges && edge_left[I[j]] == tree_left) {
+            e = I[j];
+            prev[e] = prev[head];
+            next[e] = head;
+            next[prev[head]] = e;
+            prev[head] = e;
+            j++;
+        }
+        if (tree_index % interval == 0) {
+            num_tree_edges = (tsk_size_t)(j - k);
+            if (num_checkpoints == max_checkpoints) {
+                max_checkpoints *= 2;
+                p = tsk_realloc(tree, max_checkpoints * sizeof(*tree));
+                if (p == NULL) {
+                    ret = TSK_ERR_NO_MEMORY;
+                    goto out;
+                }
+                tree = p;
+                p = tsk_realloc(
+                    edges_offset, (max_checkpoints + 1) * sizeof(*edges_offset));
+                if (p == NULL) {
+                    ret = TSK_ERR_NO_MEMORY;
+                    goto out;
+                }
+                edges_offset = p;
+            }
+            if (total_edges + num_tree_edges > max_edges) {
+                max_edges = TSK_MAX(2 * max_edges, total_edges + num_tree_edges);
+                p = tsk_realloc(edges, max_edges * sizeof(*edges));
+                if (p == NULL) {
+                    ret = TSK_ERR_NO_MEMORY;
+                    goto out;
+                }
+                edges = p;
+            }
+            for (e = next[head]; e != head; e = next[e]) {
+                edges[total_edges] = e;
+                total_edges++;
+            }
+            tree[num_checkpoints] = (tsk_id_t) tree_index;
+            num_checkpoints++;
+            edges_offset[num_checkpoints] = total_edges;
+        }
+        tree_right = sequence_length;
+        if (j < num_edges) {
+            tree_right = TSK_MIN(tree_right, edge_left[I[j]]);
+        }
+        if (k < num_edges) {
+            tree_right = TSK_MIN(tree_right, edge_right[O[k]]);
+        }
+        tree_left = tree_right;
+        tree_index++;
+    }
+    ret = tsk_table_collection_takeset_tree_checkpoints(
+        self, num_checkpoints, tree, edges, edges_offset);
+    if (ret != 0) {
+        goto out;
+    }
+    tree = NULL;
+    edges = NULL;
+    edges_offset = NULL;
+out:
+    tsk_safe_free(next);
+    tsk_safe_free(prev);
+    tsk_safe_free(tree);
+    tsk_safe_free(edges);
+    tsk_safe_free(edges_offset);
+    return ret;
+}
+
 int
 tsk_table_collection_drop_index(
     tsk_table_collection_t *self, tsk_flags_t TSK_UNUSED(options))
@@ -11296,6 +12388,7 @@ tsk_table_collection_drop_index(
     self->indexes.edge_insertion_order = NULL;
     self->indexes.edge_removal_order = NULL;
     self->indexes.num_edges = 0;
+    tsk_table_collection_drop_tree_checkpoints(self);
     return 0;
 }
 
@@ -11441,6 +12534,12 @@ tsk_table_collection_copy(const tsk_table_collection_t *self,
             goto out;
         }
     }
+    if (tsk_table_collection_has_tree_checkpoints(self)) {
+        ret = tsk_table_collection_copy_tree_checkpoints(self, dest);
+        if (ret != 0) {
+            goto out;
+        }
+    }
     ret = tsk_table_collection_set_time_units(
         dest, self->time_units, self->time_units_length);
     if (ret != 0) {
@@ -11629,8 +12728,8 @@ out:
 }
 
 static int TSK_WARN_UNUSED
-tsk_table_collection_dump_indexes(const tsk_table_collection_t *self, kastore_t *store,
-    tsk_flags_t TSK_UNUSED(options))
+tsk_table_collection_dump_indexes(
+    const tsk_table_collection_t *self, kastore_t *store, tsk_flags_t options)
 {
     int ret = 0;
     write_table_col_t cols[] = {
@@ -11641,11 +12740,36 @@ tsk_table_collection_dump_indexes(const tsk_table_collection_t *self, kastore_t
         { .name = NULL },
     };
 
+    write_table_col_t checkpoint_cols[] = {
+        { "indexes/tree_checkpoint_tree", NULL, self->indexes.num_tree_checkpoints,
+            TSK_ID_STORAGE_TYPE },
+        { .name = NULL },
+    };
+    write_table_ragged_col_t checkpoint_ragged_cols[] = {
+        { "indexes/tree_checkpoint_edges", NULL, 0, TSK_ID_STORAGE_TYPE, NULL,
+            self->indexes.num_tree_checkpoints },
+        { .name = NULL },
+    };
+
     if (tsk_table_collection_has_index(self, 0)) {
         cols[0].array = self->indexes.edge_insertion_order;
         cols[1].array = self->indexes.edge_removal_order;
         ret = write_table_cols(store, cols, 0);
+        if (ret != 0) {
+            goto out;
+        }
     }
+    if (tsk_table_collection_has_tree_checkpoints(self)) {
+        checkpoint_cols[0].array = self->indexes.tree_checkpoint_tree;
+        checkpoint_ragged_cols[0].data_array = self->indexes.tree_checkpoint_edges;
+        checkpoint_ragged_cols[0].data_len
+            = self->indexes
+                  .tree_checkpoint_edges_offset[self->indexes.num_tree_checkpoints];
+        checkpoint_ragged_cols[0].offset_array
+            = self->indexes.tree_checkpoint_edges_offset;
+        ret = write_table(store, checkpoint_cols, checkpoint_ragged_cols, options);
+    }
+out:
     return ret;
 }
 
@@ -11655,7 +12779,10 @@ tsk_table_collection_load_indexes(tsk_table_collection_t *self, kastore_t *store
     int ret = 0;
     tsk_id_t *edge_insertion_order = NULL;
     tsk_id_t *edge_removal_order = NULL;
-    tsk_size_t num_rows;
+    tsk_id_t *tree_checkpoint_tree = NULL;
+    tsk_id_t *tree_checkpoint_edges = NULL;
+    tsk_size_t *tree_checkpoint_edges_offset = NULL;
+    tsk_size_t num_rows, num_checkpoint_edges;
 
     read_table_col_t cols[] = {
         { "indexes/edge_insertion_order", (void **) &edge_insertion_order,
@@ -11664,9 +12791,20 @@ tsk_table_collection_load_indexes(tsk_table_collection_t *self, kastore_t *store
             TSK_ID_STORAGE_TYPE, TSK_COL_OPTIONAL },
         { .name = NULL },
     };
+    read_table_col_t checkpoint_cols[] = {
+        { "indexes/tree_checkpoint_tree", (void **) &tree_checkpoint_tree,
+            TSK_ID_STORAGE_TYPE, TSK_COL_OPTIONAL },
+        { .name = NULL },
+    };
+    read_table_ragged_col_t checkpoint_ragged_cols[] = {
+        { "indexes/tree_checkpoint_edges", (void **) &tree_checkpoint_edges,
+            &num_checkpoint_edges, TSK_ID_STORAGE_TYPE, &tree_checkpoint_edges_offset,
+            TSK_COL_OPTIONAL },
+        { .name = NULL },
+    };
 
     num_rows = TSK_NUM_ROWS_UNSET;
-    ret = read_table_cols(store, &num_rows, cols, 0);
+    ret = read_table_cols(store, self->mapping.data, &num_rows, cols, 0);
     if (ret != 0) {
         goto out;
     }
@@ -11688,9 +12826,38 @@ tsk_table_collection_load_indexes(tsk_table_collection_t *self, kastore_t *store
     }
     edge_insertion_order = NULL;
     edge_removal_order = NULL;
+
+    num_rows = TSK_NUM_ROWS_UNSET;
+    ret = read_table_cols(store, self->mapping.data, &num_rows, checkpoint_cols, 0);
+    if (ret != 0) {
+        goto out;
+    }
+    ret = read_table_ragged_cols(
+        store, self->mapping.data, &num_rows, checkpoint_ragged_cols, 0);
+    if (ret != 0) {
+        goto out;
+    }
+    if ((tree_checkpoint_tree == NULL) != (tree_checkpoint_edges == NULL)) {
+        ret = TSK_ERR_BOTH_COLUMNS_REQUIRED;
+        goto out;
+    }
+    if (tree_checkpoint_tree != NULL) {
+        if (!tsk_table_collection_has_index(self, 0)) {
+            ret = TSK_ERR_FILE_FORMAT;
+            goto out;
+        }
+        ret = tsk_table_collection_takeset_tree_checkpoints(self, num_rows,
+            tree_checkpoint_tree, tree_checkpoint_edges, tree_checkpoint_edges_offset);
+        if (ret != 0) {
+            goto out;
+        }
+    }
+    tree_checkpoint_tree = NULL;
+    tree_checkpoint_edges = NULL;
+    tree_checkpoint_edges_offset = NULL;
 out:
-    tsk_safe_free(edge_insertion_order);
-    tsk_safe_free(edge_removal_order);
+    free_read_table_mem(cols, NULL, NULL);
+    free_read_table_mem(checkpoint_cols, checkpoint_ragged_cols, NULL);
     return ret;
 }
 
@@ -11757,16 +12924,148 @@ out:
     return ret;
 }
 
+/* Returns true if the specified file is a regular file positioned such
+ * that the arrays in the store beginning at the current position are
+ * suitably aligned to be used in place when memory mapped. */
+static bool
+file_can_mmap(FILE *file)
+{
+    bool ret = false;
+#if !defined(_WIN32)
+    struct stat st;
+    long offset;
+
+    if (fstat(fileno(file), &st) == 0 && S_ISREG(st.st_mode)) {
+        offset = ftell(file);
+        ret = offset != -1 && offset % 8 == 0;
+    }
+#else
+    (void) file;
+#endif
+    return ret;
+}
+
+/* The size in bytes of each of the kastore types, indexed by type. */
+static const size_t store_type_size[KAS_NUM_TYPES] = { 1, 1, 2, 2, 4, 4, 8, 8, 4, 8 };
+
+/* Memory maps the file underlying the specified store, so that
+ * get_store_array can return pointers to the arrays within the mapping
+ * rather than reading them. The location of each item
+ * within the mapping is recorded so that we can later report which
+ * columns are resident in memory. If the mapping fails we return without
+ * error, and arrays are read from the file as usual. */
+static int
+tsk_table_collection_map_store(tsk_table_collection_t *self, kastore_t *store)
+{
+    int ret = 0;
+#if !defined(_WIN32)
+    struct stat st;
+    size_t j;
+    const size_t offset = (size_t) store->file_offset;
+    const kaitem_t *item;
+    tsk_mapped_column_t *column;
+    void *data;
+
+    if (fstat(fileno(store->file), &st) != 0
+        || (size_t) st.st_size < offset + store->file_size) {
+        goto out;
+    }
+    data = mmap(
+        NULL, (size_t) st.st_size, PROT_READ, MAP_PRIVATE, fileno(store->file), 0);
+    if (data == MAP_FAILED) {
+        goto out;
+    }
+    self->mapping.data = data;
+    self->mapping.size = (size_t) st.st_size;
+    self->mapping.columns = tsk_calloc(store->num_items, sizeof(*self->mapping.columns));
+    if (self->mapping.columns == NULL) {
+        ret = TSK_ERR_NO_MEMORY;
+        goto out;
+    }
+    self->mapping.num_columns = (tsk_size_t) store->num_items;
+    for (j = 0; j < store->num_items; j++) {
+        item = &store->items[j];
+        column = &self->mapping.columns[j];
+        column->name = tsk_malloc(item->key_len + 1);
+        if (column->name == NULL) {
+            ret = TSK_ERR_NO_MEMORY;
+            goto out;
+        }
+        tsk_memcpy(column->name, item->key, item->key_len);
+        column->name[item->key_len] = '\0';
+        column->offset = offset + item->array_start;
+        column->size = item->array_len * store_type_size[item->type];
+    }
+out:
+#else
+    (void) self;
+    (void) store;
+#endif
+    return ret;
+}
+
+int TSK_WARN_UNUSED
+tsk_table_collection_get_column_residency(
+    const tsk_table_collection_t *self, tsk_size_t *resident)
+{
+    int ret = 0;
+#if !defined(_WIN32)
+    const size_t page_size = (size_t) sysconf(_SC_PAGESIZE);
+    const size_t num_pages = (self->mapping.size + page_size - 1) / page_size;
+    const tsk_mapped_column_t *column;
+#if defined(__APPLE__)
+    char *in_core = NULL;
+#else
+    unsigned char *in_core = NULL;
+#endif
+    size_t start, end, page, page_start, page_end;
+    tsk_size_t j;
+
+    if (self->mapping.data == NULL) {
+        goto out;
+    }
+    in_core = tsk_malloc(num_pages * sizeof(*in_core));
+    if (in_core == NULL) {
+        ret = TSK_ERR_NO_MEMORY;
+        goto out;
+    }
+    if (mincore(self->mapping.data, self->mapping.size, in_core) != 0) {
+        ret = TSK_ERR_IO;
+        goto out;
+    }
+    for (j = 0; j < self->mapping.num_columns; j++) {
+        column = &self->mapping.columns[j];
+        resident[j] = 0;
+        start = column->offset;
+        end = column->offset + column->size;
+        for (page = start / page_size; page * page_size < end; page++) {
+            if (in_core[page] & 1) {
+                page_start = TSK_MAX(start, page * page_size);
+                page_end = TSK_MIN(end, (page + 1) * page_size);
+                resident[j] += (tsk_size_t)(page_end - page_start);
+            }
+        }
+    }
+out:
+    tsk_safe_free(in_core);
+#else
+    (void) self;
+    (void) resident;
+#endif
+    return ret;
+}
+
 static int TSK_WARN_UNUSED
 tsk_table_collection_loadf_inited(
     tsk_table_collection_t *self, FILE *file, tsk_flags_t options)
 {
     int ret = 0;
     kastore_t store;
+    const bool mmap_store = (options & TSK_LOAD_MMAP) && file_can_mmap(file);
 
     int kas_flags = KAS_READ_ALL;
-    if ((options & TSK_LOAD_SKIP_TABLES)
-        || (options & TSK_LOAD_SKIP_REFERENCE_SEQUENCE)) {
+    if ((options & TSK_LOAD_SKIP_TABLES) || (options & TSK_LOAD_SKIP_REFERENCE_SEQUENCE)
+        || mmap_store) {
         kas_flags = 0;
     }
     kas_flags = kas_flags | KAS_GET_TAKES_OWNERSHIP;
@@ -11784,40 +13083,46 @@ tsk_table_collection_loadf_inited(
         }
         goto out;
     }
+    if (mmap_store) {
+        ret = tsk_table_collection_map_store(self, &store);
+        if (ret != 0) {
+            goto out;
+        }
+    }
     ret = tsk_table_collection_read_format_data(self, &store);
     if (ret != 0) {
         goto out;
     }
     if (!(options & TSK_LOAD_SKIP_TABLES)) {
-        ret = tsk_node_table_load(&self->nodes, &store);
+        ret = tsk_node_table_load(&self->nodes, &store, self->mapping.data);
         if (ret != 0) {
             goto out;
         }
-        ret = tsk_edge_table_load(&self->edges, &store);
+        ret = tsk_edge_table_load(&self->edges, &store, self->mapping.data);
         if (ret != 0) {
             goto out;
         }
-        ret = tsk_site_table_load(&self->sites, &store);
+        ret = tsk_site_table_load(&self->sites, &store, self->mapping.data);
         if (ret != 0) {
             goto out;
         }
-        ret = tsk_mutation_table_load(&self->mutations, &store);
+        ret = tsk_mutation_table_load(&self->mutations, &store, self->mapping.data);
         if (ret != 0) {
             goto out;
         }
-        ret = tsk_migration_table_load(&self->migrations, &store);
+        ret = tsk_migration_table_load(&self->migrations, &store, self->mapping.data);
         if (ret != 0) {
             goto out;
         }
-        ret = tsk_individual_table_load(&self->individuals, &store);
+        ret = tsk_individual_table_load(&self->individuals, &store, self->mapping.data);
         if (ret != 0) {
             goto out;
         }
-        ret = tsk_population_table_load(&self->populations, &store);
+        ret = tsk_population_table_load(&self->populations, &store, self->mapping.data);
         if (ret != 0) {
             goto out;
         }
-        ret = tsk_provenance_table_load(&self->provenances, &store);
+        ret = tsk_provenance_table_load(&self->provenances, &store, self->mapping.data);
         if (ret != 0) {
             goto out;
         }
@@ -11837,6 +13142,14 @@ tsk_table_collection_loadf_inited(
             goto out;
         }
     }
+    if (mmap_store) {
+        /* Leave the file positioned at the end of this store, so that
+         * subsequent stores can be read from the same file. */
+        if (fseek(file, store.file_offset + (long) store.file_size, SEEK_SET) != 0) {
+            ret = TSK_ERR_IO;
+            goto out;
+        }
+    }
     ret = kastore_close(&store);
     if (ret != 0) {
         goto out;
@@ -11860,6 +13173,12 @@ tsk_table_collection_loadf(tsk_table_collection_t *self, FILE *file, tsk_flags_t
             goto out;
         }
     }
+    /* Memory mapped tables are read-only, and so only supported as part of
+     * a tree sequence */
+    if (options & TSK_LOAD_MMAP) {
+        ret = TSK_ERR_BAD_PARAM_VALUE;
+        goto out;
+    }
     ret = tsk_table_collection_loadf_inited(self, file, options);
     if (ret != 0) {
         goto out;
@@ -11868,6 +13187,23 @@ out:
     return ret;
 }
 
+int TSK_WARN_UNUSED
+tsk_table_collection_loadf_mmap(
+    tsk_table_collection_t *self, FILE *file, tsk_flags_t options)
+{
+    int ret = 0;
+
+    if (!(options & TSK_NO_INIT)) {
+        ret = tsk_table_collection_init(self, options);
+        if (ret != 0) {
+            goto out;
+        }
+    }
+    ret = tsk_table_collection_loadf_inited(self, file, options | TSK_LOAD_MMAP);
+out:
+    return ret;
+}
+
 int TSK_WARN_UNUSED
 tsk_table_collection_load(
     tsk_table_collection_t *self, const char *filename, tsk_flags_t options)
@@ -11881,6 +13217,10 @@ tsk_table_collection_load(
             goto out;
         }
     }
+    if (options & TSK_LOAD_MMAP) {
+        ret = TSK_ERR_BAD_PARAM_VALUE;
+        goto out;
+    }
     file = fopen(filename, "rb");
     if (file == NULL) {
         ret = TSK_ERR_IO;
@@ -12114,6 +13454,333 @@ out:
     return ret;
 }
 
+/*************************
+ * persistent simplifier
+ *************************/
+
+int
+tsk_simplifier_init(
+    tsk_simplifier_t *self, tsk_table_collection_t *tables, tsk_flags_t options)
+{
+    int ret = 0;
+
+    tsk_memset(self, 0, sizeof(*self));
+    if ((options & TSK_SIMPLIFY_KEEP_UNARY)
+        && (options & TSK_SIMPLIFY_KEEP_UNARY_IN_INDIVIDUALS)) {
+        ret = TSK_ERR_KEEP_UNARY_MUTUALLY_EXCLUSIVE;
+        goto out;
+    }
+    if (options
+        & (TSK_SIMPLIFY_KEEP_INPUT_ROOTS | TSK_SIMPLIFY_REDUCE_TO_SITE_TOPOLOGY)) {
+        ret = TSK_ERR_SIMPLIFIER_OPTION_NOT_SUPPORTED;
+        goto out;
+    }
+    self->tables = tables;
+    self->options = options;
+out:
+    return ret;
+}
+
+int
+tsk_simplifier_free(tsk_simplifier_t *self)
+{
+    tsk_safe_free(self->samples);
+    tsk_safe_free(self->is_sample);
+    tsk_safe_free(self->span);
+    return 0;
+}
+
+/* Checks the offsets of a ragged column from the specified start row onwards. */
+static int
+simplifier_check_appended_offsets(
+    tsk_size_t start, tsk_size_t num_rows, const tsk_size_t *offsets, tsk_size_t length)
+{
+    int ret = TSK_ERR_BAD_OFFSET;
+    tsk_size_t j;
+
+    if (offsets[0] != 0 || offsets[num_rows] != length) {
+        goto out;
+    }
+    for (j = start; j < num_rows; j++) {
+        if (offsets[j] > offsets[j + 1]) {
+            goto out;
+        }
+    }
+    ret = 0;
+out:
+    return ret;
+}
+
+/* Checks the integrity of the rows added to the tables since the last round
+ * of simplification. The rows output by the last round are known to be
+ * valid, and so only the appended node, edge and individual rows are
+ * checked. The site and mutation tables are checked in full if they have
+ * appended rows, since they are then sorted from scratch. */
+static int
+simplifier_check_appended_rows(tsk_simplifier_t *self)
+{
+    int ret = 0;
+    const tsk_table_collection_t *tables = self->tables;
+    const tsk_bookmark_t *start = &self->output_rows;
+    tsk_bookmark_t num_rows;
+
+    ret = tsk_table_collection_record_num_rows(tables, &num_rows);
+    if (ret != 0) {
+        goto out;
+    }
+    if (num_rows.individuals < start->individuals || num_rows.nodes < start->nodes
+        || num_rows.edges < start->edges || num_rows.migrations < start->migrations
+        || num_rows.sites < start->sites || num_rows.mutations < start->mutations
+        || num_rows.populations < start->populations
+        || num_rows.provenances < start->provenances) {
+        ret = TSK_ERR_SIMPLIFIER_ROWS_REMOVED;
+        goto out;
+    }
+    if (tables->sequence_length <= 0) {
+        ret = TSK_ERR_BAD_SEQUENCE_LENGTH;
+        goto out;
+    }
+    if (tables->edges.metadata_length > 0) {
+        ret = TSK_ERR_CANT_PROCESS_EDGES_WITH_METADATA;
+        goto out;
+    }
+    if (tables->migrations.num_rows > 0) {
+        ret = TSK_ERR_SIMPLIFY_MIGRATIONS_NOT_SUPPORTED;
+        goto out;
+    }
+    ret = simplifier_check_appended_offsets(start->nodes, num_rows.nodes,
+        tables->nodes.metadata_offset, tables->nodes.metadata_length);
+    if (ret != 0) {
+        goto out;
+    }
+    ret = simplifier_check_appended_offsets(start->individuals, num_rows.individuals,
+        tables->individuals.metadata_offset, tables->individuals.metadata_length);
+    if (ret != 0) {
+        goto out;
+    }
+    ret = simplifier_check_appended_offsets(start->sites, num_rows.sites,
+        tables->sites.ancestral_state_offset, tables->sites.ancestral_state_length);
+    if (ret != 0) {
+        goto out;
+    }
+    ret = simplifier_check_appended_offsets(start->sites, num_rows.sites,
+        tables->sites.metadata_offset, tables->sites.metadata_length);
+    if (ret != 0) {
+        goto out;
+    }
+    ret = simplifier_check_appended_offsets(start->mutations, num_rows.mutations,
+        tables->mutations.derived_state_offset, tables->mutations.derived_state_length);
+    if (ret != 0) {
+        goto out;
+    }
+    ret = simplifier_check_appended_offsets(start->mutations, num_rows.mutations,
+        tables->mutations.metadata_offset, tables->mutations.metadata_length);
+    if (ret != 0) {
+        goto out;
+    }
+    ret = simplifier_check_appended_offsets(start->provenances, num_rows.provenances,
+        tables->provenances.timestamp_offset, tables->provenances.timestamp_length);
+    if (ret != 0) {
+        goto out;
+    }
+    ret = simplifier_check_appended_offsets(start->provenances, num_rows.provenances,
+        tables->provenances.record_offset, tables->provenances.record_length);
+    if (ret != 0) {
+        goto out;
+    }
+    ret = tsk_table_collection_check_node_integrity(tables, start->nodes, 0);
+    if (ret != 0) {
+        goto out;
+    }
+    ret = tsk_table_collection_check_edge_integrity(tables, start->edges, 0);
+    if (ret != 0) {
+        goto out;
+    }
+    if (num_rows.sites != start->sites || num_rows.mutations != start->mutations) {
+        ret = tsk_table_collection_check_site_integrity(tables, 0);
+        if (ret != 0) {
+            goto out;
+        }
+        ret = tsk_table_collection_check_mutation_integrity(tables, 0);
+        if (ret != 0) {
+            goto out;
+        }
+    }
+    ret = tsk_table_collection_check_individual_integrity(tables, start->individuals, 0);
+    if (ret != 0) {
+        goto out;
+    }
+out:
+    return ret;
+}
+
+/* Sorts the tables before a round of simplification. The edges output by
+ * the previous round are already sorted, so only the edges appended since
+ * then are sorted, and these are merged into the existing edges. Sites and
+ * mutations are left alone if no rows have been appended to them, and are
+ * otherwise sorted and checked in full. */
+static int
+simplifier_sort_tables(tsk_simplifier_t *self)
+{
+    int ret = 0;
+    tsk_table_collection_t *tables = self->tables;
+    const tsk_bookmark_t *output_rows = &self->output_rows;
+    bool sort_sites = tables->sites.num_rows != output_rows->sites
+                      || tables->mutations.num_rows != output_rows->mutations;
+    tsk_table_sorter_t sorter;
+    tsk_bookmark_t start;
+
+    tsk_memset(&start, 0, sizeof(start));
+    if (!sort_sites) {
+        start.sites = output_rows->sites;
+        start.mutations = output_rows->mutations;
+    }
+    ret = tsk_table_sorter_init(&sorter, tables, TSK_NO_CHECK_INTEGRITY);
+    if (ret != 0) {
+        goto out;
+    }
+    sorter.num_sorted_edges = output_rows->edges;
+    ret = tsk_table_sorter_run(&sorter, &start);
+    if (ret != 0) {
+        goto out;
+    }
+    if (sort_sites) {
+        ret = tsk_table_collection_check_site_integrity(
+            tables, TSK_CHECK_SITE_ORDERING | TSK_CHECK_SITE_DUPLICATES);
+        if (ret != 0) {
+            goto out;
+        }
+        ret = tsk_table_collection_check_mutation_integrity(tables, 0);
+        if (ret != 0) {
+            goto out;
+        }
+    }
+out:
+    tsk_table_sorter_free(&sorter);
+    return ret;
+}
+
+int
+tsk_simplifier_run(tsk_simplifier_t *self, const tsk_id_t *samples,
+    tsk_size_t num_samples, tsk_id_t *node_map)
+{
+    int ret = 0;
+    tsk_table_collection_t *tables = self->tables;
+    const tsk_bookmark_t *output_rows = &self->output_rows;
+    const tsk_size_t num_nodes = tables->nodes.num_rows;
+    const tsk_size_t num_edges = tables->edges.num_rows;
+    simplifier_t simplifier;
+    bool *ancestry_changed = NULL;
+    double *span = NULL;
+    tsk_size_t j;
+    tsk_id_t u;
+    void *p;
+
+    /* Avoid calling to simplifier_free with uninit'd memory on error branches */
+    tsk_memset(&simplifier, 0, sizeof(simplifier_t));
+
+    ret = simplifier_check_appended_rows(self);
+    if (ret != 0) {
+        goto out;
+    }
+    ancestry_changed = tsk_calloc(TSK_MAX(num_nodes, 1), sizeof(*ancestry_changed));
+    span = tsk_calloc(TSK_MAX(num_nodes, 1), sizeof(*span));
+    if (ancestry_changed == NULL || span == NULL) {
+        ret = TSK_ERR_NO_MEMORY;
+        goto out;
+    }
+    /* Nodes added since the last call have no previous ancestry, and we must
+     * merge the ancestry for the parents of any edges added since then. The
+     * children of these edges must also be treated as changed, since their
+     * ancestry over the new edges is not implied by the previous output. */
+    for (j = output_rows->nodes; j < num_nodes; j++) {
+        ancestry_changed[j] = true;
+    }
+    for (j = output_rows->edges; j < num_edges; j++) {
+        ancestry_changed[tables->edges.parent[j]] = true;
+        ancestry_changed[tables->edges.child[j]] = true;
+    }
+    ret = simplifier_sort_tables(self);
+    if (ret != 0) {
+        goto out;
+    }
+    ret = simplifier_init_state(&simplifier, samples, num_samples, tables,
+        self->options | TSK_NO_CHECK_INTEGRITY);
+    if (ret != 0) {
+        goto out;
+    }
+    /* Nodes that have become samples or stopped being samples since the
+     * last call have changed ancestry. */
+    for (j = 0; j < num_samples; j++) {
+        u = samples[j];
+        if ((tsk_size_t) u < output_rows->nodes && !self->is_sample[u]) {
+            ancestry_changed[u] = true;
+        }
+    }
+    for (j = 0; j < self->num_samples; j++) {
+        u = self->samples[j];
+        if (!simplifier.is_sample[u]) {
+            ancestry_changed[u] = true;
+        }
+    }
+    simplifier.num_retained_nodes = output_rows->nodes;
+    simplifier.was_sample = self->is_sample;
+    simplifier.ancestry_changed = ancestry_changed;
+    simplifier.retained_span = self->span;
+    simplifier.output_span = span;
+    ret = simplifier_init_ancestry(&simplifier, samples);
+    if (ret != 0) {
+        goto out;
+    }
+    ret = simplifier_run(&simplifier, node_map);
+    if (ret != 0) {
+        goto out;
+    }
+    if (!!(self->options & TSK_DEBUG)) {
+        simplifier_print_state(&simplifier, tsk_get_debug_stream());
+    }
+    ret = tsk_table_collection_drop_index(tables, 0);
+    if (ret != 0) {
+        goto out;
+    }
+
+    /* Record the state of the output for the next round. */
+    p = tsk_realloc(
+        self->is_sample, TSK_MAX(tables->nodes.num_rows, 1) * sizeof(*self->is_sample));
+    if (p == NULL) {
+        ret = TSK_ERR_NO_MEMORY;
+        goto out;
+    }
+    self->is_sample = p;
+    p = tsk_realloc(self->samples, TSK_MAX(num_samples, 1) * sizeof(*self->samples));
+    if (p == NULL) {
+        ret = TSK_ERR_NO_MEMORY;
+        goto out;
+    }
+    self->samples = p;
+    tsk_memset(self->is_sample, 0, tables->nodes.num_rows * sizeof(*self->is_sample));
+    for (j = 0; j < num_samples; j++) {
+        u = simplifier.node_id_map[samples[j]];
+        self->samples[j] = u;
+        self->is_sample[u] = true;
+    }
+    self->num_samples = num_samples;
+    tsk_safe_free(self->span);
+    self->span = span;
+    span = NULL;
+    ret = tsk_table_collection_record_num_rows(tables, &self->output_rows);
+out:
+    if (ret != 0) {
+        /* The state of the tables is unknown, so start from scratch next time. */
+        tsk_memset(&self->output_rows, 0, sizeof(self->output_rows));
+        self->num_samples = 0;
+    }
+    simplifier_free(&simplifier);
+    tsk_safe_free(ancestry_changed);
+    tsk_safe_free(span);
+    return ret;
+}
+
 int TSK_WARN_UNUSED
 tsk_table_collection_link_ancestors(tsk_table_collection_t *self, tsk_id_t *samples,
     tsk_size_t num_samples, tsk_id_t *ancestors, tsk_size_t num_ancestors,
@@ -12144,9 +13811,10 @@ out:
 }
 
 int TSK_WARN_UNUSED
-tsk_table_collection_ibd_within(const tsk_table_collection_t *self,
+tsk_table_collection_ibd_within_stream(const tsk_table_collection_t *self,
     tsk_identity_segments_t *result, const tsk_id_t *samples, tsk_size_t num_samples,
-    double min_span, double max_time, tsk_flags_t options)
+    double min_span, double max_time, tsk_identity_segment_sink_t *sink,
+    void *sink_params, tsk_flags_t options)
 {
     int ret = 0;
     tsk_ibd_finder_t ibd_finder;
@@ -12155,6 +13823,8 @@ tsk_table_collection_ibd_within(const tsk_table_collection_t *self,
     if (ret != 0) {
         goto out;
     }
+    result->sink = sink;
+    result->sink_params = sink_params;
     ret = tsk_ibd_finder_init(&ibd_finder, self, result, min_span, max_time);
     if (ret != 0) {
         goto out;
@@ -12176,10 +13846,20 @@ out:
 }
 
 int TSK_WARN_UNUSED
-tsk_table_collection_ibd_between(const tsk_table_collection_t *self,
+tsk_table_collection_ibd_within(const tsk_table_collection_t *self,
+    tsk_identity_segments_t *result, const tsk_id_t *samples, tsk_size_t num_samples,
+    double min_span, double max_time, tsk_flags_t options)
+{
+    return tsk_table_collection_ibd_within_stream(
+        self, result, samples, num_samples, min_span, max_time, NULL, NULL, options);
+}
+
+int TSK_WARN_UNUSED
+tsk_table_collection_ibd_between_stream(const tsk_table_collection_t *self,
     tsk_identity_segments_t *result, tsk_size_t num_sample_sets,
     const tsk_size_t *sample_set_sizes, const tsk_id_t *sample_sets, double min_span,
-    double max_time, tsk_flags_t options)
+    double max_time, tsk_identity_segment_sink_t *sink, void *sink_params,
+    tsk_flags_t options)
 {
     int ret = 0;
     tsk_ibd_finder_t ibd_finder;
@@ -12188,6 +13868,8 @@ tsk_table_collection_ibd_between(const tsk_table_collection_t *self,
     if (ret != 0) {
         goto out;
     }
+    result->sink = sink;
+    result->sink_params = sink_params;
     ret = tsk_ibd_finder_init(&ibd_finder, self, result, min_span, max_time);
     if (ret != 0) {
         goto out;
@@ -12209,6 +13891,16 @@ out:
     return ret;
 }
 
+int TSK_WARN_UNUSED
+tsk_table_collection_ibd_between(const tsk_table_collection_t *self,
+    tsk_identity_segments_t *result, tsk_size_t num_sample_sets,
+    const tsk_size_t *sample_set_sizes, const tsk_id_t *sample_sets, double min_span,
+    double max_time, tsk_flags_t options)
+{
+    return tsk_table_collection_ibd_between_stream(self, result, num_sample_sets,
+        sample_set_sizes, sample_sets, min_span, max_time, NULL, NULL, options);
+}
+
 int TSK_WARN_UNUSED
 tsk_table_collection_sort(
     tsk_table_collection_t *self, const tsk_bookmark_t *start, tsk_flags_t options)
@@ -556,6 +556,13 @@ typedef struct {
     tsk_size_t metadata_schema_length;
 } tsk_reference_sequence_t;
 
+/* The location of a named array within a memory mapped file */
+typedef struct {
+    char *name;
+    size_t offset;
+    size_t size;
+} tsk_mapped_column_t;
+
 /**
 @brief A collection of tables defining the data for a tree sequence.
 */
@@ -593,7 +600,22 @@ typedef struct {
         tsk_id_t *edge_insertion_order;
         tsk_id_t *edge_removal_order;
         tsk_size_t num_edges;
+        /* Optional checkpoints recording the edges present in every k-th tree,
+         * used to seek to arbitrary trees without traversing the edge diffs
+         * from the current position. */
+        tsk_size_t num_tree_checkpoints;
+        tsk_id_t *tree_checkpoint_tree;
+        tsk_id_t *tree_checkpoint_edges;
+        tsk_size_t *tree_checkpoint_edges_offset;
     } indexes;
+    /* The memory mapped file when loaded with TSK_LOAD_MMAP. Column
+     * arrays pointing into the mapping are not owned by the tables. */
+    struct {
+        void *data;
+        size_t size;
+        tsk_size_t num_columns;
+        tsk_mapped_column_t *columns;
+    } mapping;
 } tsk_table_collection_t;
 
 /**
@@ -634,8 +656,41 @@ typedef struct _tsk_table_sorter_t {
     void *user_data;
     /** @brief Mapping from input site IDs to output site IDs */
     tsk_id_t *site_id_map;
+    /** @brief The number of blocks that edges and mutations are split into
+     * by the default sorting functions. If this is <= 1, they are sorted
+     * using a single call to qsort. */
+    tsk_size_t num_threads;
+    /** @brief Function used to run independent sorting tasks, calling
+     * ``task(args[j])`` for each j < num_tasks in any order and possibly
+     * concurrently, and returning once all have completed. If set to NULL,
+     * tasks are run sequentially in the calling thread. */
+    int (*run_tasks)(struct _tsk_table_sorter_t *self, tsk_size_t num_tasks,
+        void (*task)(void *arg), void **args);
+    /** @brief The number of rows at the start of the edge table that are
+     * known to be sorted. The default edge sorting function only sorts the
+     * rows after these, and then merges the two sorted runs. */
+    tsk_size_t num_sorted_edges;
 } tsk_table_sorter_t;
 
+/**
+@brief Persistent simplifier state for repeated simplification.
+*/
+typedef struct {
+    /** @brief The table collection that is simplified in place. */
+    tsk_table_collection_t *tables;
+    /** @brief The simplify options. */
+    tsk_flags_t options;
+    /* The number of rows in each table output by the last call to run */
+    tsk_bookmark_t output_rows;
+    /* The output IDs of the samples in the last call to run, and the
+     * sample status of each output node */
+    tsk_id_t *samples;
+    tsk_size_t num_samples;
+    bool *is_sample;
+    /* The coalescent span of the nodes output by the last call to run */
+    double *span;
+} tsk_simplifier_t;
+
 /* Structs for IBD finding.
  * TODO: document properly
  * */
@@ -660,6 +715,11 @@ typedef struct {
     tsk_identity_segment_t *tail;
 } tsk_identity_segment_list_t;
 
+/* Function called with each identity segment as it is found. A nonzero
+ * return value is treated as an error and stops the search. */
+typedef int tsk_identity_segment_sink_t(
+    tsk_id_t a, tsk_id_t b, double left, double right, tsk_id_t node, void *params);
+
 typedef struct {
     tsk_size_t num_nodes;
     tsk_avl_tree_int_t pair_map;
@@ -668,6 +728,8 @@ typedef struct {
     tsk_blkalloc_t heap;
     bool store_segments;
     bool store_pairs;
+    tsk_identity_segment_sink_t *sink;
+    void *sink_params;
 } tsk_identity_segments_t;
 
 /* Diff iterator. */
@@ -833,6 +895,16 @@ with error TSK_ERR_METADATA_DISABLED.
 @endrst
 */
 #define TSK_TC_NO_EDGE_METADATA (1 << 3)
+/**
+@rst
+Memory map the file and use the mapped data directly for the table
+columns rather than reading them into memory. Only supported by
+:c:func:`tsk_treeseq_load` and :c:func:`tsk_treeseq_loadf`, as the
+resulting tables cannot be modified. If the file cannot be mapped
+(e.g., it is not a regular file) it is read into memory as usual.
+@endrst
+*/
+#define TSK_LOAD_MMAP (1 << 4)
 /** @} */
 
 /* Flags for dump tables */
@@ -4541,6 +4613,37 @@ collection. Any existing index is first dropped using
 */
 int tsk_table_collection_build_index(tsk_table_collection_t *self, tsk_flags_t options);
 
+/**
+@brief Builds tree checkpoints for this table collection.
+
+@rst
+Records the set of edges present in every ``interval``-th tree, so that
+:c:func:`tsk_tree_seek` can reach any tree by restoring the closest
+preceding checkpoint and then applying at most ``interval - 1`` sets of
+edge diffs. The checkpoints are stored alongside the edge indexes, are
+saved to file by :c:func:`tsk_table_collection_dump` and are dropped by
+:c:func:`tsk_table_collection_drop_index`. Any existing checkpoints are
+first dropped. The table collection must be indexed.
+@endrst
+
+@param self A pointer to a tsk_table_collection_t object.
+@param interval The number of trees between checkpoints; must be at least 1.
+@param options Bitwise options. Currently unused; should be
+    set to zero to ensure compatibility with later versions of tskit.
+@return Return 0 on success or a negative value on failure.
+*/
+int tsk_table_collection_build_tree_checkpoints(
+    tsk_table_collection_t *self, tsk_size_t interval, tsk_flags_t options);
+
+/**
+@brief Returns true if this table collection has tree checkpoints.
+
+@param self A pointer to a tsk_table_collection_t object.
+@return Return true if there are tree checkpoints present for this table
+    collection.
+*/
+bool tsk_table_collection_has_tree_checkpoints(const tsk_table_collection_t *self);
+
 /**
 @brief Runs integrity checks on this table collection.
 
@@ -4595,6 +4698,18 @@ tsk_id_t tsk_table_collection_check_integrity(
 
 /* Undocumented methods */
 
+/* Loads the tables with the TSK_LOAD_MMAP option. The resulting tables
+ * are read-only, and this is only intended for use by tsk_treeseq_loadf. */
+int tsk_table_collection_loadf_mmap(
+    tsk_table_collection_t *self, FILE *file, tsk_flags_t options);
+
+/* Stores the number of bytes of each of the mapping.num_columns columns in
+ * the memory mapped file that are currently resident in memory in the
+ * specified array. Columns are only read from the file when first accessed,
+ * and so this reports which columns have been loaded. */
+int tsk_table_collection_get_column_residency(
+    const tsk_table_collection_t *self, tsk_size_t *resident);
+
 /* Flags for ibd_segments */
 #define TSK_IBD_STORE_PAIRS (1 << 0)
 #define TSK_IBD_STORE_SEGMENTS (1 << 1)
@@ -4612,6 +4727,22 @@ int tsk_table_collection_ibd_between(const tsk_table_collection_t *self,
     const tsk_size_t *sample_set_sizes, const tsk_id_t *sample_sets, double min_span,
     double max_time, tsk_flags_t options);
 
+/* Versions of the IBD functions that pass each segment to the specified sink
+ * function as it is found, rather than (or as well as) storing it in the
+ * result. Only the summary information in the result is updated unless the
+ * TSK_IBD_STORE_PAIRS or TSK_IBD_STORE_SEGMENTS options are specified, so
+ * memory usage does not grow with the number of segments. */
+int tsk_table_collection_ibd_within_stream(const tsk_table_collection_t *self,
+    tsk_identity_segments_t *result, const tsk_id_t *samples, tsk_size_t num_samples,
+    double min_span, double max_time, tsk_identity_segment_sink_t *sink,
+    void *sink_params, tsk_flags_t options);
+
+int tsk_table_collection_ibd_between_stream(const tsk_table_collection_t *self,
+    tsk_identity_segments_t *result, tsk_size_t num_sample_sets,
+    const tsk_size_t *sample_set_sizes, const tsk_id_t *sample_sets, double min_span,
+    double max_time, tsk_identity_segment_sink_t *sink, void *sink_params,
+    tsk_flags_t options);
+
 int tsk_table_collection_link_ancestors(tsk_table_collection_t *self, tsk_id_t *samples,
     tsk_size_t num_samples, tsk_id_t *ancestors, tsk_size_t num_ancestors,
     tsk_flags_t options, tsk_edge_table_t *result);
@@ -4697,7 +4828,14 @@ int tsk_reference_sequence_takeset_metadata(
 This must be called before any operations are performed on the
 table sorter and initialises all fields. The ``edge_sort`` function
 is set to the default method using qsort. The ``user_data``
-field is set to NULL.
+and ``run_tasks`` fields are set to NULL and ``num_threads`` is set to 0.
+
+The default edge and mutation sorting functions can be parallelised by
+setting ``num_threads`` to the number of blocks into which the rows are
+split and ``run_tasks`` to a function that runs tasks concurrently (for
+example, using a thread pool). The blocks are sorted independently and then
+merged in rounds of independent pairwise merges. The output is identical
+to the single threaded sort.
 This method supports the same options as
 :c:func:`tsk_table_collection_sort`.
 
@@ -4754,6 +4892,85 @@ int tsk_table_sorter_free(struct _tsk_table_sorter_t *self);
 
 /** @} */
 
+/**
+@defgroup SIMPLIFIER_API_GROUP Persistent simplifier API.
+@{
+*/
+
+/**
+@brief Initialises the persistent simplifier for the specified tables.
+
+@rst
+A persistent simplifier is intended for forward-time simulations, in which
+new nodes and edges are repeatedly appended to a table collection which is
+periodically simplified. Each call to :c:func:`tsk_simplifier_run` is
+equivalent to sorting the tables and then calling
+:c:func:`tsk_table_collection_simplify` with the same options. However,
+rather than merging the ancestry of every node in the tables in each round,
+the simplifier keeps track of the output of the previous round, and only
+merges the ancestry of nodes that are affected by the newly appended rows.
+The ancestry of nodes whose descendants have not changed since the previous
+round is recovered directly from their edges, and only the samples whose
+ancestry has changed are given initial ancestry segments. The output of the
+previous round is known to be valid, so only the newly appended rows are
+checked for integrity. It is also already sorted, so only the newly
+appended edges are sorted, and these are then merged into the existing
+edges. Sites and mutations are only sorted and checked if rows have been
+appended to them since the previous round.
+
+Note that each round still takes time proportional to the size of the
+tables, and not only to the number of newly appended rows. Simplification
+renumbers the nodes, so that the edges, nodes and mutations retained from
+the previous round are copied and rewritten in each round, and every
+input node is included in the node map.
+
+Between calls to :c:func:`tsk_simplifier_run`, rows may be added to the
+tables but existing rows must not be modified or removed.
+
+The :c:macro:`TSK_SIMPLIFY_KEEP_INPUT_ROOTS` and
+:c:macro:`TSK_SIMPLIFY_REDUCE_TO_SITE_TOPOLOGY` options are not supported.
+
+@endrst
+
+@param self A pointer to an uninitialised tsk_simplifier_t object.
+@param tables The table collection to simplify.
+@param options Simplify options; see :c:func:`tsk_table_collection_simplify`.
+@return Return 0 on success or a negative value on failure.
+*/
+int tsk_simplifier_init(
+    tsk_simplifier_t *self, tsk_table_collection_t *tables, tsk_flags_t options);
+
+/**
+@brief Sorts and simplifies the tables in place.
+
+@rst
+The tables are sorted and then simplified with respect to the specified
+samples, with the result being identical to
+:c:func:`tsk_table_collection_simplify`. If an error occurs, the state
+of the tables is undefined, and the next call will simplify the tables
+from scratch.
+@endrst
+
+@param self A pointer to an initialised tsk_simplifier_t object.
+@param samples An array of num_samples distinct and valid node IDs.
+@param num_samples The number of node IDs in the input samples array.
+@param node_map If not NULL, this array will be filled to define the mapping
+    between nodes IDs in the table collection before and after simplification.
+@return Return 0 on success or a negative value on failure.
+*/
+int tsk_simplifier_run(tsk_simplifier_t *self, const tsk_id_t *samples,
+    tsk_size_t num_samples, tsk_id_t *node_map);
+
+/**
+@brief Free the internal memory for the specified simplifier.
+
+@param self A pointer to an initialised tsk_simplifier_t object.
+@return Always returns 0.
+*/
+int tsk_simplifier_free(tsk_simplifier_t *self);
+
+/** @} */
+
 int tsk_squash_edges(
     tsk_edge_t *edges, tsk_size_t num_edges, tsk_size_t *num_output_edges);
 
@@ -4766,6 +4983,16 @@ int tsk_identity_segments_get_keys(
     const tsk_identity_segments_t *result, tsk_id_t *pairs);
 int tsk_identity_segments_get_items(const tsk_identity_segments_t *self, tsk_id_t *pairs,
     tsk_identity_segment_list_t **lists);
+/* Fill the specified arrays, each of length num_segments, with the pairs
+ * and segments in the same order as the keys. Requires segments to be stored. */
+int tsk_identity_segments_get_arrays(const tsk_identity_segments_t *self,
+    tsk_id_t *pair_a, tsk_id_t *pair_b, double *left, double *right, tsk_id_t *node);
+/* Fill the num_sample_sets x num_sample_sets result matrix with the total
+ * span of segments between pairs of nodes in each pair of (disjoint) sample
+ * sets. Requires pairs to be stored. */
+int tsk_identity_segments_get_span_matrix(const tsk_identity_segments_t *self,
+    tsk_size_t num_sample_sets, const tsk_size_t *sample_set_sizes,
+    const tsk_id_t *sample_sets, double *result);
 int tsk_identity_segments_get(const tsk_identity_segments_t *self, tsk_id_t a,
     tsk_id_t b, tsk_identity_segment_list_t **ret_list);
 void tsk_identity_segments_print_state(tsk_identity_segments_t *self, FILE *out);
@@ -503,6 +503,39 @@ tsk_treeseq_copy_tables(
     return tsk_table_collection_copy(self->tables, tables, options);
 }
 
+static int TSK_WARN_UNUSED
+tsk_treeseq_load_mmap(
+    tsk_table_collection_t *tables, const char *filename, tsk_flags_t options)
+{
+    int ret = 0;
+    FILE *file = NULL;
+
+    /* Make sure the tables can be safely freed in error conditions */
+    ret = tsk_table_collection_init(tables, options);
+    if (ret != 0) {
+        goto out;
+    }
+    file = fopen(filename, "rb");
+    if (file == NULL) {
+        ret = TSK_ERR_IO;
+        goto out;
+    }
+    ret = tsk_table_collection_loadf_mmap(tables, file, options | TSK_NO_INIT);
+    if (ret != 0) {
+        goto out;
+    }
+    if (fclose(file) != 0) {
+        ret = TSK_ERR_IO;
+        goto out;
+    }
+    file = NULL;
+out:
+    if (file != NULL) {
+        fclose(file);
+    }
+    return ret;
+}
+
 int TSK_WARN_UNUSED
 tsk_treeseq_load(tsk_treeseq_t *self, const char *filename, tsk_flags_t options)
 {
@@ -517,7 +550,11 @@ tsk_treeseq_load(tsk_treeseq_t *self, const char *filename, tsk_flags_t options)
         goto out;
     }
 
-    ret = tsk_table_collection_load(tables, filename, options);
+    if (options & TSK_LOAD_MMAP) {
+        ret = tsk_treeseq_load_mmap(tables, filename, options);
+    } else {
+        ret = tsk_table_collection_load(tables, filename, options);
+    }
     if (ret != 0) {
         tsk_table_collection_free(tables);
         tsk_safe_free(tables);
@@ -547,7 +584,11 @@ tsk_treeseq_loadf(tsk_treeseq_t *self, FILE *file, tsk_flags_t options)
         goto out;
     }
 
-    ret = tsk_table_collection_loadf(tables, file, options);
+    if (options & TSK_LOAD_MMAP) {
+        ret = tsk_table_collection_loadf_mmap(tables, file, options);
+    } else {
+        ret = tsk_table_collection_loadf(tables, file, options);
+    }
     if (ret != 0) {
         tsk_table_collection_free(tables);
         tsk_safe_free(tables);
@@ -1192,8 +1233,8 @@ out:
  ***********************************/
 
 static int
-tsk_treeseq_check_windows(
-    const tsk_treeseq_t *self, tsk_size_t num_windows, const double *windows)
+tsk_treeseq_check_windows(const tsk_treeseq_t *self, tsk_size_t num_windows,
+    const double *windows, tsk_flags_t options)
 {
     int ret = TSK_ERR_BAD_WINDOWS;
     tsk_size_t j;
@@ -1202,12 +1243,17 @@ tsk_treeseq_check_windows(
         ret = TSK_ERR_BAD_NUM_WINDOWS;
         goto out;
     }
-    /* TODO these restrictions can be lifted later if we want a specific interval. */
-    if (windows[0] != 0) {
-        goto out;
-    }
-    if (windows[num_windows] != self->tables->sequence_length) {
-        goto out;
+    if (options & TSK_STAT_PARTIAL_WINDOWS) {
+        if (windows[0] < 0 || windows[num_windows] > self->tables->sequence_length) {
+            goto out;
+        }
+    } else {
+        if (windows[0] != 0) {
+            goto out;
+        }
+        if (windows[num_windows] != self->tables->sequence_length) {
+            goto out;
+        }
     }
     for (j = 0; j < num_windows; j++) {
         if (windows[j] >= windows[j + 1]) {
@@ -1219,6 +1265,162 @@ out:
     return ret;
 }
 
+/* Returns the index of the tree containing the specified position. */
+static tsk_size_t
+tsk_treeseq_get_tree_index_at(const tsk_treeseq_t *self, double x)
+{
+    tsk_size_t index = tsk_search_sorted(self->breakpoints, self->num_trees + 1, x);
+
+    if (self->breakpoints[index] > x) {
+        index--;
+    }
+    return index;
+}
+
+/* Returns the first index j in the specified edge index order for which
+ * the coordinate of edge order[j] is greater than x. */
+static tsk_id_t
+tsk_search_index_order(const double *restrict coordinate, const tsk_id_t *restrict order,
+    tsk_id_t n, double x)
+{
+    tsk_id_t lower = 0;
+    tsk_id_t upper = n;
+    tsk_id_t mid;
+
+    while (lower < upper) {
+        mid = lower + (upper - lower) / 2;
+        if (coordinate[order[mid]] <= x) {
+            lower = mid + 1;
+        } else {
+            upper = mid;
+        }
+    }
+    return lower;
+}
+
+/* Returns the position in the edge removal order of the first edge with
+ * right coordinate greater than the specified position. The stats algorithms
+ * below begin at the left coordinate of the first window, and edges ending
+ * before this are never inserted and so must not be removed. */
+static tsk_id_t
+tsk_treeseq_get_removal_start(const tsk_treeseq_t *self, double x)
+{
+    return tsk_search_index_order(self->tables->edges.right,
+        self->tables->indexes.edge_removal_order,
+        (tsk_id_t) self->tables->edges.num_rows, x);
+}
+
+/* Iterates over the edges to insert into the trees visited by the stats
+ * algorithms below. The first tree begins at the left coordinate of the
+ * first window, which may be far along the sequence (e.g. when the
+ * windows are split into chunks), so rather than scanning the insertion
+ * order from the start we seek to the edges intersecting this position.
+ * These are found among the edges of the closest tree checkpoint, or
+ * among the edges on the shorter side of the position in the insertion
+ * and removal orders. They are returned (in no particular order) when
+ * inserting into the first tree, after which the remaining edges are
+ * returned in insertion order. */
+typedef struct {
+    const tsk_id_t *restrict I;
+    const double *restrict edge_left;
+    const double *restrict edge_right;
+    tsk_id_t num_edges;
+    tsk_id_t tj;
+    double start;
+    /* The candidate edges intersecting the start position */
+    const tsk_id_t *restrict candidates[2];
+    tsk_id_t candidate_index[2];
+    tsk_id_t candidate_stop[2];
+} tsk_stat_edge_iter_t;
+
+static void
+tsk_stat_edge_iter_init(
+    tsk_stat_edge_iter_t *self, const tsk_treeseq_t *ts, double start)
+{
+    const tsk_table_collection_t *tables = ts->tables;
+    const tsk_id_t num_edges = (tsk_id_t) tables->edges.num_rows;
+    const tsk_id_t *restrict I = tables->indexes.edge_insertion_order;
+    const tsk_id_t *restrict O = tables->indexes.edge_removal_order;
+    const tsk_id_t *restrict checkpoint_tree = tables->indexes.tree_checkpoint_tree;
+    const tsk_size_t *restrict offset = tables->indexes.tree_checkpoint_edges_offset;
+    const tsk_id_t tj = tsk_search_index_order(tables->edges.left, I, num_edges, start);
+    const tsk_id_t tk = tsk_treeseq_get_removal_start(ts, start);
+    tsk_id_t tree, lower, upper, mid, j;
+
+    tsk_memset(self, 0, sizeof(*self));
+    self->I = I;
+    self->edge_left = tables->edges.left;
+    self->edge_right = tables->edges.right;
+    self->num_edges = num_edges;
+    self->tj = tj;
+    self->start = start;
+
+    /* Edges intersecting start are inserted before it and removed after it */
+    if (tj <= num_edges - tk) {
+        self->candidates[0] = I;
+        self->candidate_stop[0] = tj;
+    } else {
+        self->candidates[0] = O;
+        self->candidate_index[0] = tk;
+        self->candidate_stop[0] = num_edges;
+    }
+    if (tsk_table_collection_has_tree_checkpoints(tables)) {
+        /* Find the last checkpoint at or before the tree containing start */
+        tree = (tsk_id_t) tsk_treeseq_get_tree_index_at(ts, start);
+        lower = 0;
+        upper = (tsk_id_t) tables->indexes.num_tree_checkpoints;
+        while (lower < upper) {
+            mid = lower + (upper - lower) / 2;
+            if (checkpoint_tree[mid] <= tree) {
+                lower = mid + 1;
+            } else {
+                upper = mid;
+            }
+        }
+        if (lower > 0) {
+            mid = lower - 1;
+            j = tsk_search_index_order(
+                tables->edges.left, I, num_edges, ts->breakpoints[checkpoint_tree[mid]]);
+            if ((tsk_id_t)(offset[mid + 1] - offset[mid]) + (tj - j)
+                < self->candidate_stop[0] - self->candidate_index[0]) {
+                /* The checkpoint edges plus those inserted since */
+                self->candidates[0] = tables->indexes.tree_checkpoint_edges;
+                self->candidate_index[0] = (tsk_id_t) offset[mid];
+                self->candidate_stop[0] = (tsk_id_t) offset[mid + 1];
+                self->candidates[1] = I;
+                self->candidate_index[1] = j;
+                self->candidate_stop[1] = tj;
+            }
+        }
+    }
+}
+
+/* Returns the next edge to insert into the tree with the specified left
+ * coordinate, or TSK_NULL if there are no more. */
+static inline tsk_id_t
+tsk_stat_edge_iter_next(tsk_stat_edge_iter_t *self, double t_left)
+{
+    tsk_id_t k, h;
+
+    for (k = 0; k < 2; k++) {
+        while (self->candidate_index[k] < self->candidate_stop[k]) {
+            h = self->candidates[k][self->candidate_index[k]];
+            self->candidate_index[k]++;
+            if (self->edge_left[h] <= self->start && self->edge_right[h] > self->start) {
+                return h;
+            }
+        }
+    }
+    while (self->tj < self->num_edges && self->edge_left[self->I[self->tj]] <= t_left) {
+        h = self->I[self->tj];
+        self->tj++;
+        if (self->edge_right[h] > t_left) {
+            return h;
+        }
+    }
+    return TSK_NULL;
+}
+
 /* TODO make these functions more consistent in how the arguments are ordered */
 
 static inline void
@@ -1233,14 +1435,218 @@ update_state(double *X, tsk_size_t state_dim, tsk_id_t dest, tsk_id_t source, in
     }
 }
 
-static inline int
-update_node_summary(tsk_id_t u, tsk_size_t result_dim, double *node_summary, double *X,
-    tsk_size_t state_dim, general_stat_func_t *f, void *f_params)
+/* The summary function used by the general stat algorithms. Summaries are
+ * computed either by calling f once for each state vector, or by calling
+ * batch_f once for a contiguous block of state vectors. When total_weight
+ * is not NULL the summary is unpolarised, so that the summary of a state x
+ * is f(x) + f(total_weight - x). This simplifies the implementation and
+ * memory management of the stat algorithms, which need only gather the
+ * states to be summarised.
+ */
+typedef struct {
+    tsk_size_t state_dim;
+    tsk_size_t result_dim;
+    general_stat_func_t *f;
+    general_stat_batch_func_t *batch_f;
+    void *f_params;
+    const double *total_weight;
+    tsk_size_t max_rows;
+    double *state_buffer;
+    double *result_buffer;
+    double *minus_state_buffer;
+    double *minus_result_buffer;
+} summary_func_t;
+
+static int
+summary_func_init(summary_func_t *self, tsk_size_t state_dim, tsk_size_t result_dim,
+    general_stat_func_t *f, general_stat_batch_func_t *batch_f, void *f_params,
+    const double *total_weight, tsk_size_t max_rows)
+{
+    int ret = 0;
+    tsk_size_t num_minus_rows = batch_f == NULL ? 1 : max_rows;
+
+    tsk_memset(self, 0, sizeof(*self));
+    self->state_dim = state_dim;
+    self->result_dim = result_dim;
+    self->f = f;
+    self->batch_f = batch_f;
+    self->f_params = f_params;
+    self->total_weight = total_weight;
+    self->max_rows = max_rows;
+    if (batch_f != NULL) {
+        self->state_buffer = tsk_malloc(max_rows * state_dim * sizeof(double));
+        self->result_buffer = tsk_malloc(max_rows * result_dim * sizeof(double));
+        if (self->state_buffer == NULL || self->result_buffer == NULL) {
+            ret = TSK_ERR_NO_MEMORY;
+            goto out;
+        }
+    }
+    if (total_weight != NULL) {
+        self->minus_state_buffer
+            = tsk_malloc(num_minus_rows * state_dim * sizeof(double));
+        self->minus_result_buffer
+            = tsk_malloc(num_minus_rows * result_dim * sizeof(double));
+        if (self->minus_state_buffer == NULL || self->minus_result_buffer == NULL) {
+            ret = TSK_ERR_NO_MEMORY;
+            goto out;
+        }
+    }
+out:
+    return ret;
+}
+
+static void
+summary_func_free(summary_func_t *self)
+{
+    tsk_safe_free(self->state_buffer);
+    tsk_safe_free(self->result_buffer);
+    tsk_safe_free(self->minus_state_buffer);
+    tsk_safe_free(self->minus_result_buffer);
+}
+
+static int
+summary_func_apply(summary_func_t *self, const double *state, double *result)
+{
+    int ret = 0;
+    const tsk_size_t state_dim = self->state_dim;
+    const tsk_size_t result_dim = self->result_dim;
+    tsk_size_t k, m;
+
+    ret = self->f(state_dim, state, result_dim, result, self->f_params);
+    if (ret != 0) {
+        goto out;
+    }
+    if (self->total_weight != NULL) {
+        for (k = 0; k < state_dim; k++) {
+            self->minus_state_buffer[k] = self->total_weight[k] - state[k];
+        }
+        ret = self->f(state_dim, self->minus_state_buffer, result_dim,
+            self->minus_result_buffer, self->f_params);
+        if (ret != 0) {
+            goto out;
+        }
+        for (m = 0; m < result_dim; m++) {
+            result[m] += self->minus_result_buffer[m];
+        }
+    }
+out:
+    return ret;
+}
+
+static int
+summary_func_apply_batch(
+    summary_func_t *self, tsk_size_t num_rows, const double *state, double *result)
+{
+    int ret = 0;
+    const tsk_size_t state_dim = self->state_dim;
+    const tsk_size_t result_dim = self->result_dim;
+    tsk_size_t j, k;
+
+    if (num_rows == 0) {
+        goto out;
+    }
+    ret = self->batch_f(state_dim, num_rows, state, result_dim, result, self->f_params);
+    if (ret != 0) {
+        goto out;
+    }
+    if (self->total_weight != NULL) {
+        tsk_bug_assert(num_rows <= self->max_rows);
+        for (j = 0; j < num_rows; j++) {
+            for (k = 0; k < state_dim; k++) {
+                self->minus_state_buffer[j * state_dim + k]
+                    = self->total_weight[k] - state[j * state_dim + k];
+            }
+        }
+        ret = self->batch_f(state_dim, num_rows, self->minus_state_buffer, result_dim,
+            self->minus_result_buffer, self->f_params);
+        if (ret != 0) {
+            goto out;
+        }
+        for (j = 0; j < num_rows * result_dim; j++) {
+            result[j] += self->minus_result_buffer[j];
+        }
+    }
+out:
+    return ret;
+}
+
+/* Compute the summaries of a contiguous block of states */
+static int
+summary_func_eval(
+    summary_func_t *self, tsk_size_t num_rows, const double *state, double *result)
+{
+    int ret = 0;
+    tsk_size_t j;
+
+    if (self->batch_f != NULL) {
+        ret = summary_func_apply_batch(self, num_rows, state, result);
+    } else {
+        for (j = 0; j < num_rows; j++) {
+            ret = summary_func_apply(self, GET_2D_ROW(state, self->state_dim, j),
+                GET_2D_ROW(result, self->result_dim, j));
+            if (ret != 0) {
+                break;
+            }
+        }
+    }
+    return ret;
+}
+
+/* Compute the summaries of the specified nodes, storing the result for
+ * node u in row u of the summary array */
+static int
+summary_func_eval_nodes(summary_func_t *self, tsk_size_t num_nodes,
+    const tsk_id_t *nodes, const double *state, double *summary)
+{
+    int ret = 0;
+    const tsk_size_t state_dim = self->state_dim;
+    const tsk_size_t result_dim = self->result_dim;
+    tsk_size_t j;
+    tsk_id_t u;
+
+    if (self->batch_f == NULL) {
+        for (j = 0; j < num_nodes; j++) {
+            u = nodes[j];
+            ret = summary_func_apply(self, GET_2D_ROW(state, state_dim, u),
+                GET_2D_ROW(summary, result_dim, u));
+            if (ret != 0) {
+                goto out;
+            }
+        }
+    } else {
+        tsk_bug_assert(num_nodes <= self->max_rows);
+        for (j = 0; j < num_nodes; j++) {
+            tsk_memcpy(GET_2D_ROW(self->state_buffer, state_dim, j),
+                GET_2D_ROW(state, state_dim, nodes[j]), state_dim * sizeof(*state));
+        }
+        ret = summary_func_apply_batch(
+            self, num_nodes, self->state_buffer, self->result_buffer);
+        if (ret != 0) {
+            goto out;
+        }
+        for (j = 0; j < num_nodes; j++) {
+            tsk_memcpy(GET_2D_ROW(summary, result_dim, nodes[j]),
+                GET_2D_ROW(self->result_buffer, result_dim, j),
+                result_dim * sizeof(*summary));
+        }
+    }
+out:
+    return ret;
+}
+
+/* Summaries are recomputed once per tree for the nodes whose state has
+ * changed. Returns true if u was not already marked. */
+static inline bool
+mark_node_dirty(tsk_id_t u, bool *is_dirty, tsk_id_t *dirty, tsk_size_t *num_dirty)
 {
-    double *X_u = GET_2D_ROW(X, state_dim, u);
-    double *summary_u = GET_2D_ROW(node_summary, result_dim, u);
+    bool ret = !is_dirty[u];
 
-    return f(state_dim, X_u, result_dim, summary_u, f_params);
+    if (ret) {
+        is_dirty[u] = true;
+        dirty[*num_dirty] = u;
+        (*num_dirty)++;
+    }
+    return ret;
 }
 
 static inline void
@@ -1258,13 +1664,12 @@ update_running_sum(tsk_id_t u, double sign, const double *restrict branch_length
 
 static int
 tsk_treeseq_branch_general_stat(const tsk_treeseq_t *self, tsk_size_t state_dim,
-    const double *sample_weights, tsk_size_t result_dim, general_stat_func_t *f,
-    void *f_params, tsk_size_t num_windows, const double *windows, tsk_flags_t options,
-    double *result)
+    const double *sample_weights, tsk_size_t result_dim, summary_func_t *summary_func,
+    tsk_size_t num_windows, const double *windows, tsk_flags_t options, double *result)
 {
     int ret = 0;
     tsk_id_t u, v;
-    tsk_size_t j, k, tree_index, window_index;
+    tsk_size_t j, k, tree_index, window_index, num_dirty;
     tsk_size_t num_nodes = self->tables->nodes.num_rows;
     const tsk_id_t num_edges = (tsk_id_t) self->tables->edges.num_rows;
     const tsk_id_t *restrict I = self->tables->indexes.edge_insertion_order;
@@ -1277,13 +1682,16 @@ tsk_treeseq_branch_general_stat(const tsk_treeseq_t *self, tsk_size_t state_dim,
     const double sequence_length = self->tables->sequence_length;
     tsk_id_t *restrict parent = tsk_malloc(num_nodes * sizeof(*parent));
     double *restrict branch_length = tsk_calloc(num_nodes, sizeof(*branch_length));
-    tsk_id_t tj, tk, h;
+    tsk_id_t tk, h;
+    tsk_stat_edge_iter_t edge_iter;
     double t_left, t_right, w_left, w_right, left, right, scale;
     const double *weight_u;
-    double *state_u, *result_row, *summary_u;
+    double *state_u, *result_row;
     double *state = tsk_calloc(num_nodes * state_dim, sizeof(*state));
     double *summary = tsk_calloc(num_nodes * result_dim, sizeof(*summary));
     double *running_sum = tsk_calloc(result_dim, sizeof(*running_sum));
+    tsk_id_t *dirty = tsk_malloc(num_nodes * sizeof(*dirty));
+    bool *is_dirty = tsk_calloc(num_nodes, sizeof(*is_dirty));
 
     if (self->time_uncalibrated && !(options & TSK_STAT_ALLOW_TIME_UNCALIBRATED)) {
         ret = TSK_ERR_TIME_UNCALIBRATED;
@@ -1291,7 +1699,7 @@ tsk_treeseq_branch_general_stat(const tsk_treeseq_t *self, tsk_size_t state_dim,
     }
 
     if (parent == NULL || branch_length == NULL || state == NULL || running_sum == NULL
-        || summary == NULL) {
+        || summary == NULL || dirty == NULL || is_dirty == NULL) {
         ret = TSK_ERR_NO_MEMORY;
         goto out;
     }
@@ -1303,82 +1711,89 @@ tsk_treeseq_branch_general_stat(const tsk_treeseq_t *self, tsk_size_t state_dim,
         state_u = GET_2D_ROW(state, state_dim, u);
         weight_u = GET_2D_ROW(sample_weights, state_dim, j);
         tsk_memcpy(state_u, weight_u, state_dim * sizeof(*state_u));
-        summary_u = GET_2D_ROW(summary, result_dim, u);
-        ret = f(state_dim, state_u, result_dim, summary_u, f_params);
-        if (ret != 0) {
-            goto out;
-        }
     }
+    ret = summary_func_eval_nodes(
+        summary_func, self->num_samples, self->samples, state, summary);
+    if (ret != 0) {
+        goto out;
+    }
+    num_dirty = 0;
     tsk_memset(result, 0, num_windows * result_dim * sizeof(*result));
 
-    /* Iterate over the trees */
-    tj = 0;
-    tk = 0;
-    t_left = 0;
+    /* Iterate over the trees. The running sum includes the contributions
+     * of all nodes that are not dirty; the contributions of the dirty nodes
+     * are added back when their summaries are recomputed. */
+    t_left = windows[0];
+    tk = tsk_treeseq_get_removal_start(self, t_left);
+    tsk_stat_edge_iter_init(&edge_iter, self, t_left);
     tree_index = 0;
     window_index = 0;
-    while (tj < num_edges || t_left < sequence_length) {
+    while (t_left < windows[num_windows]) {
         while (tk < num_edges && edge_right[O[tk]] == t_left) {
             h = O[tk];
             tk++;
 
             u = edge_child[h];
-            update_running_sum(u, -1, branch_length, summary, result_dim, running_sum);
+            if (!is_dirty[u]) {
+                update_running_sum(
+                    u, -1, branch_length, summary, result_dim, running_sum);
+            }
             parent[u] = TSK_NULL;
             branch_length[u] = 0;
 
             u = edge_parent[h];
             while (u != TSK_NULL) {
-                update_running_sum(
-                    u, -1, branch_length, summary, result_dim, running_sum);
-                update_state(state, state_dim, u, edge_child[h], -1);
-                ret = update_node_summary(
-                    u, result_dim, summary, state, state_dim, f, f_params);
-                if (ret != 0) {
-                    goto out;
+                if (mark_node_dirty(u, is_dirty, dirty, &num_dirty)) {
+                    update_running_sum(
+                        u, -1, branch_length, summary, result_dim, running_sum);
                 }
-                update_running_sum(
-                    u, +1, branch_length, summary, result_dim, running_sum);
+                update_state(state, state_dim, u, edge_child[h], -1);
                 u = parent[u];
             }
         }
 
-        while (tj < num_edges && edge_left[I[tj]] == t_left) {
-            h = I[tj];
-            tj++;
+        while ((h = tsk_stat_edge_iter_next(&edge_iter, t_left)) != TSK_NULL) {
 
             u = edge_child[h];
             v = edge_parent[h];
             parent[u] = v;
             branch_length[u] = time[v] - time[u];
-            update_running_sum(u, +1, branch_length, summary, result_dim, running_sum);
+            if (!is_dirty[u]) {
+                update_running_sum(
+                    u, +1, branch_length, summary, result_dim, running_sum);
+            }
 
             u = v;
             while (u != TSK_NULL) {
-                update_running_sum(
-                    u, -1, branch_length, summary, result_dim, running_sum);
-                update_state(state, state_dim, u, edge_child[h], +1);
-                ret = update_node_summary(
-                    u, result_dim, summary, state, state_dim, f, f_params);
-                if (ret != 0) {
-                    goto out;
+                if (mark_node_dirty(u, is_dirty, dirty, &num_dirty)) {
+                    update_running_sum(
+                        u, -1, branch_length, summary, result_dim, running_sum);
                 }
-                update_running_sum(
-                    u, +1, branch_length, summary, result_dim, running_sum);
+                update_state(state, state_dim, u, edge_child[h], +1);
                 u = parent[u];
             }
         }
 
+        ret = summary_func_eval_nodes(summary_func, num_dirty, dirty, state, summary);
+        if (ret != 0) {
+            goto out;
+        }
+        for (j = 0; j < num_dirty; j++) {
+            u = dirty[j];
+            update_running_sum(u, +1, branch_length, summary, result_dim, running_sum);
+            is_dirty[u] = false;
+        }
+        num_dirty = 0;
+
         t_right = sequence_length;
-        if (tj < num_edges) {
-            t_right = TSK_MIN(t_right, edge_left[I[tj]]);
+        if (edge_iter.tj < num_edges) {
+            t_right = TSK_MIN(t_right, edge_left[I[edge_iter.tj]]);
         }
         if (tk < num_edges) {
             t_right = TSK_MIN(t_right, edge_right[O[tk]]);
         }
 
-        while (windows[window_index] < t_right) {
-            tsk_bug_assert(window_index < num_windows);
+        while (window_index < num_windows && windows[window_index] < t_right) {
             w_left = windows[window_index];
             w_right = windows[window_index + 1];
             left = TSK_MAX(t_left, w_left);
@@ -1414,6 +1829,8 @@ out:
     tsk_safe_free(state);
     tsk_safe_free(summary);
     tsk_safe_free(running_sum);
+    tsk_safe_free(dirty);
+    tsk_safe_free(is_dirty);
     return ret;
 }
 
@@ -1506,55 +1923,16 @@ out:
     return ret;
 }
 
-static int
-compute_general_stat_site_result(tsk_site_t *site, double *state, tsk_size_t state_dim,
-    tsk_size_t result_dim, general_stat_func_t *f, void *f_params, double *total_weight,
-    bool polarised, double *result)
-{
-    int ret = 0;
-    tsk_size_t k;
-    tsk_size_t allele, num_alleles;
-    double *allele_states;
-    double *result_tmp = tsk_calloc(result_dim, sizeof(*result_tmp));
-
-    if (result_tmp == NULL) {
-        ret = TSK_ERR_NO_MEMORY;
-        goto out;
-    }
-    tsk_memset(result, 0, result_dim * sizeof(*result));
-
-    ret = get_allele_weights(
-        site, state, state_dim, total_weight, &num_alleles, &allele_states);
-    if (ret != 0) {
-        goto out;
-    }
-    /* Sum over the allele weights. Skip the ancestral state if this is a polarised stat
-     */
-    for (allele = polarised ? 1 : 0; allele < num_alleles; allele++) {
-        ret = f(state_dim, GET_2D_ROW(allele_states, state_dim, allele), result_dim,
-            result_tmp, f_params);
-        if (ret != 0) {
-            goto out;
-        }
-        for (k = 0; k < result_dim; k++) {
-            result[k] += result_tmp[k];
-        }
-    }
-out:
-    tsk_safe_free(result_tmp);
-    tsk_safe_free(allele_states);
-    return ret;
-}
-
 static int
 tsk_treeseq_site_general_stat(const tsk_treeseq_t *self, tsk_size_t state_dim,
-    const double *sample_weights, tsk_size_t result_dim, general_stat_func_t *f,
-    void *f_params, tsk_size_t num_windows, const double *windows, tsk_flags_t options,
-    double *result)
+    const double *sample_weights, tsk_size_t result_dim, summary_func_t *summary_func,
+    tsk_size_t num_windows, const double *windows, tsk_flags_t options, double *result)
 {
     int ret = 0;
     tsk_id_t u, v;
-    tsk_size_t j, k, tree_site, tree_index, window_index;
+    tsk_size_t j, k, l, tree_site, tree_index, window_index;
+    tsk_size_t num_alleles, first_allele, num_rows, max_rows, row, max_tree_sites;
+    tsk_size_t num_tree_sites;
     tsk_size_t num_nodes = self->tables->nodes.num_rows;
     const tsk_id_t num_edges = (tsk_id_t) self->tables->edges.num_rows;
     const tsk_id_t *restrict I = self->tables->indexes.edge_insertion_order;
@@ -1566,13 +1944,21 @@ tsk_treeseq_site_general_stat(const tsk_treeseq_t *self, tsk_size_t state_dim,
     const double sequence_length = self->tables->sequence_length;
     tsk_id_t *restrict parent = tsk_malloc(num_nodes * sizeof(*parent));
     tsk_site_t *site;
-    tsk_id_t tj, tk, h;
+    tsk_id_t tk, h;
+    tsk_stat_edge_iter_t edge_iter;
     double t_left, t_right;
     const double *weight_u;
-    double *state_u, *result_row;
+    double *state_u, *result_row, *tmp;
     double *state = tsk_calloc(num_nodes * state_dim, sizeof(*state));
     double *total_weight = tsk_calloc(state_dim, sizeof(*total_weight));
     double *site_result = tsk_calloc(result_dim, sizeof(*site_result));
+    double *allele_states = NULL;
+    /* The allele states of all sites in the current tree, which are
+     * summarised together */
+    double *site_states = NULL;
+    double *site_summaries = NULL;
+    tsk_size_t *site_num_rows = NULL;
+    tsk_size_t *site_window = NULL;
     bool polarised = false;
 
     if (parent == NULL || state == NULL || total_weight == NULL || site_result == NULL) {
@@ -1581,9 +1967,23 @@ tsk_treeseq_site_general_stat(const tsk_treeseq_t *self, tsk_size_t state_dim,
     }
     tsk_memset(parent, 0xff, num_nodes * sizeof(*parent));
 
+    max_tree_sites = 0;
+    for (j = 0; j < self->num_trees; j++) {
+        max_tree_sites = TSK_MAX(max_tree_sites, self->tree_sites_length[j]);
+    }
+    site_num_rows = tsk_malloc(max_tree_sites * sizeof(*site_num_rows));
+    site_window = tsk_malloc(max_tree_sites * sizeof(*site_window));
+    if (site_num_rows == NULL || site_window == NULL) {
+        ret = TSK_ERR_NO_MEMORY;
+        goto out;
+    }
+    max_rows = 0;
+
     if (options & TSK_STAT_POLARISED) {
         polarised = true;
     }
+    /* Skip the ancestral state if this is a polarised stat */
+    first_allele = polarised ? 1 : 0;
 
     /* Set the initial conditions */
     for (j = 0; j < self->num_samples; j++) {
@@ -1598,12 +1998,12 @@ tsk_treeseq_site_general_stat(const tsk_treeseq_t *self, tsk_size_t state_dim,
     tsk_memset(result, 0, num_windows * result_dim * sizeof(*result));
 
     /* Iterate over the trees */
-    tj = 0;
-    tk = 0;
-    t_left = 0;
-    tree_index = 0;
+    t_left = windows[0];
+    tk = tsk_treeseq_get_removal_start(self, t_left);
+    tsk_stat_edge_iter_init(&edge_iter, self, t_left);
+    tree_index = tsk_treeseq_get_tree_index_at(self, t_left);
     window_index = 0;
-    while (tj < num_edges || t_left < sequence_length) {
+    while (t_left < windows[num_windows]) {
         while (tk < num_edges && edge_right[O[tk]] == t_left) {
             h = O[tk];
             tk++;
@@ -1616,9 +2016,7 @@ tsk_treeseq_site_general_stat(const tsk_treeseq_t *self, tsk_size_t state_dim,
             parent[u] = TSK_NULL;
         }
 
-        while (tj < num_edges && edge_left[I[tj]] == t_left) {
-            h = I[tj];
-            tj++;
+        while ((h = tsk_stat_edge_iter_next(&edge_iter, t_left)) != TSK_NULL) {
             u = edge_child[h];
             v = edge_parent[h];
             parent[u] = v;
@@ -1628,22 +2026,49 @@ tsk_treeseq_site_general_stat(const tsk_treeseq_t *self, tsk_size_t state_dim,
             }
         }
         t_right = sequence_length;
-        if (tj < num_edges) {
-            t_right = TSK_MIN(t_right, edge_left[I[tj]]);
+        if (edge_iter.tj < num_edges) {
+            t_right = TSK_MIN(t_right, edge_left[I[edge_iter.tj]]);
         }
         if (tk < num_edges) {
             t_right = TSK_MIN(t_right, edge_right[O[tk]]);
         }
 
-        /* Update the sites */
+        /* Gather the allele weights of the sites */
+        num_tree_sites = 0;
+        num_rows = 0;
         for (tree_site = 0; tree_site < self->tree_sites_length[tree_index];
              tree_site++) {
             site = self->tree_sites[tree_index] + tree_site;
-            ret = compute_general_stat_site_result(site, state, state_dim, result_dim, f,
-                f_params, total_weight, polarised, site_result);
+            if (site->position < windows[0]) {
+                continue;
+            }
+            if (site->position >= windows[num_windows]) {
+                break;
+            }
+            ret = get_allele_weights(
+                site, state, state_dim, total_weight, &num_alleles, &allele_states);
             if (ret != 0) {
                 goto out;
             }
+            if (num_rows + num_alleles > max_rows) {
+                max_rows = TSK_MAX(2 * max_rows, num_rows + num_alleles);
+                tmp = tsk_realloc(site_states, max_rows * state_dim * sizeof(*tmp));
+                if (tmp == NULL) {
+                    ret = TSK_ERR_NO_MEMORY;
+                    goto out;
+                }
+                site_states = tmp;
+                tmp = tsk_realloc(site_summaries, max_rows * result_dim * sizeof(*tmp));
+                if (tmp == NULL) {
+                    ret = TSK_ERR_NO_MEMORY;
+                    goto out;
+                }
+                site_summaries = tmp;
+            }
+            tsk_memcpy(GET_2D_ROW(site_states, state_dim, num_rows),
+                GET_2D_ROW(allele_states, state_dim, first_allele),
+                (num_alleles - first_allele) * state_dim * sizeof(*site_states));
+            tsk_safe_free(allele_states);
 
             while (windows[window_index + 1] <= site->position) {
                 window_index++;
@@ -1651,7 +2076,27 @@ tsk_treeseq_site_general_stat(const tsk_treeseq_t *self, tsk_size_t state_dim,
             }
             tsk_bug_assert(windows[window_index] <= site->position);
             tsk_bug_assert(site->position < windows[window_index + 1]);
-            result_row = GET_2D_ROW(result, result_dim, window_index);
+            site_window[num_tree_sites] = window_index;
+            site_num_rows[num_tree_sites] = num_alleles - first_allele;
+            num_tree_sites++;
+            num_rows += num_alleles - first_allele;
+        }
+
+        /* Sum over the allele summaries of each site */
+        ret = summary_func_eval(summary_func, num_rows, site_states, site_summaries);
+        if (ret != 0) {
+            goto out;
+        }
+        row = 0;
+        for (j = 0; j < num_tree_sites; j++) {
+            tsk_memset(site_result, 0, result_dim * sizeof(*site_result));
+            for (l = 0; l < site_num_rows[j]; l++) {
+                for (k = 0; k < result_dim; k++) {
+                    site_result[k] += site_summaries[row * result_dim + k];
+                }
+                row++;
+            }
+            result_row = GET_2D_ROW(result, result_dim, site_window[j]);
             for (k = 0; k < result_dim; k++) {
                 result_row[k] += site_result[k];
             }
@@ -1667,6 +2112,11 @@ out:
     tsk_safe_free(state);
     tsk_safe_free(total_weight);
     tsk_safe_free(site_result);
+    tsk_safe_free(allele_states);
+    tsk_safe_free(site_states);
+    tsk_safe_free(site_summaries);
+    tsk_safe_free(site_num_rows);
+    tsk_safe_free(site_window);
     return ret;
 }
 
@@ -1682,13 +2132,13 @@ increment_row(tsk_size_t length, double multiplier, double *source, double *dest
 
 static int
 tsk_treeseq_node_general_stat(const tsk_treeseq_t *self, tsk_size_t state_dim,
-    const double *sample_weights, tsk_size_t result_dim, general_stat_func_t *f,
-    void *f_params, tsk_size_t num_windows, const double *windows,
-    tsk_flags_t TSK_UNUSED(options), double *result)
+    const double *sample_weights, tsk_size_t result_dim, summary_func_t *summary_func,
+    tsk_size_t num_windows, const double *windows, tsk_flags_t TSK_UNUSED(options),
+    double *result)
 {
     int ret = 0;
     tsk_id_t u, v;
-    tsk_size_t j, window_index;
+    tsk_size_t j, window_index, num_dirty;
     tsk_size_t num_nodes = self->tables->nodes.num_rows;
     const tsk_id_t num_edges = (tsk_id_t) self->tables->edges.num_rows;
     const tsk_id_t *restrict I = self->tables->indexes.edge_insertion_order;
@@ -1699,19 +2149,26 @@ tsk_treeseq_node_general_stat(const tsk_treeseq_t *self, tsk_size_t state_dim,
     const tsk_id_t *restrict edge_child = self->tables->edges.child;
     const double sequence_length = self->tables->sequence_length;
     tsk_id_t *restrict parent = tsk_malloc(num_nodes * sizeof(*parent));
-    tsk_id_t tj, tk, h;
+    tsk_id_t tk, h;
+    tsk_stat_edge_iter_t edge_iter;
     const double *weight_u;
     double *state_u;
     double *state = tsk_calloc(num_nodes * state_dim, sizeof(*state));
     double *node_summary = tsk_calloc(num_nodes * result_dim, sizeof(*node_summary));
-    double *last_update = tsk_calloc(num_nodes, sizeof(*last_update));
+    double *last_update = tsk_malloc(num_nodes * sizeof(*last_update));
+    tsk_id_t *dirty = tsk_malloc(num_nodes * sizeof(*dirty));
+    bool *is_dirty = tsk_calloc(num_nodes, sizeof(*is_dirty));
     double t_left, t_right, w_right;
 
-    if (parent == NULL || state == NULL || node_summary == NULL || last_update == NULL) {
+    if (parent == NULL || state == NULL || node_summary == NULL || last_update == NULL
+        || dirty == NULL || is_dirty == NULL) {
         ret = TSK_ERR_NO_MEMORY;
         goto out;
     }
     tsk_memset(parent, 0xff, num_nodes * sizeof(*parent));
+    for (u = 0; u < (tsk_id_t) num_nodes; u++) {
+        last_update[u] = windows[0];
+    }
     tsk_memset(result, 0, num_windows * num_nodes * result_dim * sizeof(*result));
 
     /* Set the initial conditions */
@@ -1722,19 +2179,20 @@ tsk_treeseq_node_general_stat(const tsk_treeseq_t *self, tsk_size_t state_dim,
         tsk_memcpy(state_u, weight_u, state_dim * sizeof(*state_u));
     }
     for (u = 0; u < (tsk_id_t) num_nodes; u++) {
-        ret = update_node_summary(
-            u, result_dim, node_summary, state, state_dim, f, f_params);
-        if (ret != 0) {
-            goto out;
-        }
+        dirty[u] = u;
+    }
+    ret = summary_func_eval_nodes(summary_func, num_nodes, dirty, state, node_summary);
+    if (ret != 0) {
+        goto out;
     }
+    num_dirty = 0;
 
     /* Iterate over the trees */
-    tj = 0;
-    tk = 0;
-    t_left = 0;
+    t_left = windows[0];
+    tk = tsk_treeseq_get_removal_start(self, t_left);
+    tsk_stat_edge_iter_init(&edge_iter, self, t_left);
     window_index = 0;
-    while (tj < num_edges || t_left < sequence_length) {
+    while (t_left < windows[num_windows]) {
         tsk_bug_assert(window_index < num_windows);
         while (tk < num_edges && edge_right[O[tk]] == t_left) {
             h = O[tk];
@@ -1742,45 +2200,47 @@ tsk_treeseq_node_general_stat(const tsk_treeseq_t *self, tsk_size_t state_dim,
             u = edge_child[h];
             v = edge_parent[h];
             while (v != TSK_NULL) {
-                increment_row(result_dim, t_left - last_update[v],
-                    GET_2D_ROW(node_summary, result_dim, v),
-                    GET_3D_ROW(result, num_nodes, result_dim, window_index, v));
-                last_update[v] = t_left;
-                update_state(state, state_dim, v, u, -1);
-                ret = update_node_summary(
-                    v, result_dim, node_summary, state, state_dim, f, f_params);
-                if (ret != 0) {
-                    goto out;
+                if (mark_node_dirty(v, is_dirty, dirty, &num_dirty)) {
+                    increment_row(result_dim, t_left - last_update[v],
+                        GET_2D_ROW(node_summary, result_dim, v),
+                        GET_3D_ROW(result, num_nodes, result_dim, window_index, v));
+                    last_update[v] = t_left;
                 }
+                update_state(state, state_dim, v, u, -1);
                 v = parent[v];
             }
             parent[u] = TSK_NULL;
         }
 
-        while (tj < num_edges && edge_left[I[tj]] == t_left) {
-            h = I[tj];
-            tj++;
+        while ((h = tsk_stat_edge_iter_next(&edge_iter, t_left)) != TSK_NULL) {
             u = edge_child[h];
             v = edge_parent[h];
             parent[u] = v;
             while (v != TSK_NULL) {
-                increment_row(result_dim, t_left - last_update[v],
-                    GET_2D_ROW(node_summary, result_dim, v),
-                    GET_3D_ROW(result, num_nodes, result_dim, window_index, v));
-                last_update[v] = t_left;
-                update_state(state, state_dim, v, u, +1);
-                ret = update_node_summary(
-                    v, result_dim, node_summary, state, state_dim, f, f_params);
-                if (ret != 0) {
-                    goto out;
+                if (mark_node_dirty(v, is_dirty, dirty, &num_dirty)) {
+                    increment_row(result_dim, t_left - last_update[v],
+                        GET_2D_ROW(node_summary, result_dim, v),
+                        GET_3D_ROW(result, num_nodes, result_dim, window_index, v));
+                    last_update[v] = t_left;
                 }
+                update_state(state, state_dim, v, u, +1);
                 v = parent[v];
             }
         }
 
+        ret = summary_func_eval_nodes(
+            summary_func, num_dirty, dirty, state, node_summary);
+        if (ret != 0) {
+            goto out;
+        }
+        for (j = 0; j < num_dirty; j++) {
+            is_dirty[dirty[j]] = false;
+        }
+        num_dirty = 0;
+
         t_right = sequence_length;
-        if (tj < num_edges) {
-            t_right = TSK_MIN(t_right, edge_left[I[tj]]);
+        if (edge_iter.tj < num_edges) {
+            t_right = TSK_MIN(t_right, edge_left[I[edge_iter.tj]]);
         }
         if (tk < num_edges) {
             t_right = TSK_MIN(t_right, edge_right[O[tk]]);
@@ -1809,6 +2269,8 @@ out:
     tsk_safe_free(state);
     tsk_safe_free(node_summary);
     tsk_safe_free(last_update);
+    tsk_safe_free(dirty);
+    tsk_safe_free(is_dirty);
     return ret;
 }
 
@@ -1828,118 +2290,24 @@ span_normalise(
     }
 }
 
-typedef struct {
-    general_stat_func_t *f;
-    void *f_params;
-    double *total_weight;
-    double *total_minus_state;
-    double *result_tmp;
-} unpolarised_summary_func_args;
-
-static int
-unpolarised_summary_func(tsk_size_t state_dim, const double *state,
-    tsk_size_t result_dim, double *result, void *params)
-{
-    int ret = 0;
-    unpolarised_summary_func_args *upargs = (unpolarised_summary_func_args *) params;
-    const double *total_weight = upargs->total_weight;
-    double *total_minus_state = upargs->total_minus_state;
-    double *result_tmp = upargs->result_tmp;
-    tsk_size_t k, m;
-
-    ret = upargs->f(state_dim, state, result_dim, result, upargs->f_params);
-    if (ret != 0) {
-        goto out;
-    }
-    for (k = 0; k < state_dim; k++) {
-        total_minus_state[k] = total_weight[k] - state[k];
-    }
-    ret = upargs->f(
-        state_dim, total_minus_state, result_dim, result_tmp, upargs->f_params);
-    if (ret != 0) {
-        goto out;
-    }
-    for (m = 0; m < result_dim; m++) {
-        result[m] += result_tmp[m];
-    }
-out:
-    return ret;
-}
-
-/* Abstracts the running of node and branch stats where the summary function
- * is run twice when non-polarised. We replace the call to the input summary
- * function with a call of the required form when non-polarised, simplifying
- * the implementation and memory management for the node and branch stats.
- */
 static int
-tsk_polarisable_func_general_stat(const tsk_treeseq_t *self, tsk_size_t state_dim,
-    const double *sample_weights, tsk_size_t result_dim, general_stat_func_t *f,
-    void *f_params, tsk_size_t num_windows, const double *windows, tsk_flags_t options,
-    double *result)
-{
-    int ret = 0;
-    bool stat_branch = !!(options & TSK_STAT_BRANCH);
-    bool polarised = options & TSK_STAT_POLARISED;
-    general_stat_func_t *wrapped_f = f;
-    void *wrapped_f_params = f_params;
-    const double *weight_u;
-    unpolarised_summary_func_args upargs;
-    tsk_size_t j, k;
-
-    tsk_memset(&upargs, 0, sizeof(upargs));
-    if (!polarised) {
-        upargs.f = f;
-        upargs.f_params = f_params;
-        upargs.total_weight = tsk_calloc(state_dim, sizeof(double));
-        upargs.total_minus_state = tsk_calloc(state_dim, sizeof(double));
-        upargs.result_tmp = tsk_calloc(result_dim, sizeof(double));
-
-        if (upargs.total_weight == NULL || upargs.total_minus_state == NULL
-            || upargs.result_tmp == NULL) {
-            ret = TSK_ERR_NO_MEMORY;
-            goto out;
-        }
-
-        /* Compute the total weight */
-        for (j = 0; j < self->num_samples; j++) {
-            weight_u = GET_2D_ROW(sample_weights, state_dim, j);
-            for (k = 0; k < state_dim; k++) {
-                upargs.total_weight[k] += weight_u[k];
-            }
-        }
-
-        wrapped_f = unpolarised_summary_func;
-        wrapped_f_params = &upargs;
-    }
-
-    if (stat_branch) {
-        ret = tsk_treeseq_branch_general_stat(self, state_dim, sample_weights,
-            result_dim, wrapped_f, wrapped_f_params, num_windows, windows, options,
-            result);
-    } else {
-        ret = tsk_treeseq_node_general_stat(self, state_dim, sample_weights, result_dim,
-            wrapped_f, wrapped_f_params, num_windows, windows, options, result);
-    }
-out:
-    tsk_safe_free(upargs.total_weight);
-    tsk_safe_free(upargs.total_minus_state);
-    tsk_safe_free(upargs.result_tmp);
-    return ret;
-}
-
-int
-tsk_treeseq_general_stat(const tsk_treeseq_t *self, tsk_size_t state_dim,
+tsk_treeseq_summary_func_general_stat(const tsk_treeseq_t *self, tsk_size_t state_dim,
     const double *sample_weights, tsk_size_t result_dim, general_stat_func_t *f,
-    void *f_params, tsk_size_t num_windows, const double *windows, tsk_flags_t options,
-    double *result)
+    general_stat_batch_func_t *batch_f, void *f_params, tsk_size_t num_windows,
+    const double *windows, tsk_flags_t options, double *result)
 {
     int ret = 0;
     bool stat_site = !!(options & TSK_STAT_SITE);
     bool stat_branch = !!(options & TSK_STAT_BRANCH);
     bool stat_node = !!(options & TSK_STAT_NODE);
+    bool polarised = !!(options & TSK_STAT_POLARISED);
     double default_windows[] = { 0, self->tables->sequence_length };
-    tsk_size_t row_size;
+    double *total_weight = NULL;
+    const double *weight_u;
+    summary_func_t summary_func;
+    tsk_size_t row_size, j, k;
 
+    tsk_memset(&summary_func, 0, sizeof(summary_func));
     /* If no mode is specified, we default to site mode */
     if (!(stat_site || stat_branch || stat_node)) {
         stat_site = true;
@@ -1962,18 +2330,43 @@ tsk_treeseq_general_stat(const tsk_treeseq_t *self, tsk_size_t state_dim,
         num_windows = 1;
         windows = default_windows;
     } else {
-        ret = tsk_treeseq_check_windows(self, num_windows, windows);
+        ret = tsk_treeseq_check_windows(self, num_windows, windows, options);
         if (ret != 0) {
             goto out;
         }
     }
 
+    total_weight = tsk_calloc(state_dim, sizeof(*total_weight));
+    if (total_weight == NULL) {
+        ret = TSK_ERR_NO_MEMORY;
+        goto out;
+    }
+    for (j = 0; j < self->num_samples; j++) {
+        weight_u = GET_2D_ROW(sample_weights, state_dim, j);
+        for (k = 0; k < state_dim; k++) {
+            total_weight[k] += weight_u[k];
+        }
+    }
+    /* The site stats sum over alleles and take care of polarisation themselves;
+     * the node and branch summaries are run twice when non-polarised. */
+    ret = summary_func_init(&summary_func, state_dim, result_dim, f, batch_f, f_params,
+        (stat_site || polarised) ? NULL : total_weight, tsk_treeseq_get_num_nodes(self));
+    if (ret != 0) {
+        goto out;
+    }
+
     if (stat_site) {
         ret = tsk_treeseq_site_general_stat(self, state_dim, sample_weights, result_dim,
-            f, f_params, num_windows, windows, options, result);
+            &summary_func, num_windows, windows, options, result);
+    } else if (stat_branch) {
+        ret = tsk_treeseq_branch_general_stat(self, state_dim, sample_weights,
+            result_dim, &summary_func, num_windows, windows, options, result);
     } else {
-        ret = tsk_polarisable_func_general_stat(self, state_dim, sample_weights,
-            result_dim, f, f_params, num_windows, windows, options, result);
+        ret = tsk_treeseq_node_general_stat(self, state_dim, sample_weights, result_dim,
+            &summary_func, num_windows, windows, options, result);
+    }
+    if (ret != 0) {
+        goto out;
     }
 
     if (options & TSK_STAT_SPAN_NORMALISE) {
@@ -1985,9 +2378,31 @@ tsk_treeseq_general_stat(const tsk_treeseq_t *self, tsk_size_t state_dim,
     }
 
 out:
+    summary_func_free(&summary_func);
+    tsk_safe_free(total_weight);
     return ret;
 }
 
+int
+tsk_treeseq_general_stat(const tsk_treeseq_t *self, tsk_size_t state_dim,
+    const double *sample_weights, tsk_size_t result_dim, general_stat_func_t *f,
+    void *f_params, tsk_size_t num_windows, const double *windows, tsk_flags_t options,
+    double *result)
+{
+    return tsk_treeseq_summary_func_general_stat(self, state_dim, sample_weights,
+        result_dim, f, NULL, f_params, num_windows, windows, options, result);
+}
+
+int
+tsk_treeseq_general_stat_batch(const tsk_treeseq_t *self, tsk_size_t state_dim,
+    const double *sample_weights, tsk_size_t result_dim,
+    general_stat_batch_func_t *batch_f, void *f_params, tsk_size_t num_windows,
+    const double *windows, tsk_flags_t options, double *result)
+{
+    return tsk_treeseq_summary_func_general_stat(self, state_dim, sample_weights,
+        result_dim, NULL, batch_f, f_params, num_windows, windows, options, result);
+}
+
 static int
 check_set_indexes(
     tsk_size_t num_sets, tsk_size_t num_set_indexes, const tsk_id_t *set_indexes)
@@ -2209,7 +2624,8 @@ tsk_treeseq_site_allele_frequency_spectrum(const tsk_treeseq_t *self,
     const double sequence_length = self->tables->sequence_length;
     tsk_id_t *restrict parent = tsk_malloc(num_nodes * sizeof(*parent));
     tsk_site_t *site;
-    tsk_id_t tj, tk, h;
+    tsk_id_t tk, h;
+    tsk_stat_edge_iter_t edge_iter;
     tsk_size_t j;
     const tsk_size_t K = num_sample_sets + 1;
     double t_left, t_right;
@@ -2227,12 +2643,12 @@ tsk_treeseq_site_allele_frequency_spectrum(const tsk_treeseq_t *self,
     total_counts[num_sample_sets] = (double) self->num_samples;
 
     /* Iterate over the trees */
-    tj = 0;
-    tk = 0;
-    t_left = 0;
-    tree_index = 0;
+    t_left = windows[0];
+    tk = tsk_treeseq_get_removal_start(self, t_left);
+    tsk_stat_edge_iter_init(&edge_iter, self, t_left);
+    tree_index = tsk_treeseq_get_tree_index_at(self, t_left);
     window_index = 0;
-    while (tj < num_edges || t_left < sequence_length) {
+    while (t_left < windows[num_windows]) {
         while (tk < num_edges && edge_right[O[tk]] == t_left) {
             h = O[tk];
             tk++;
@@ -2245,9 +2661,7 @@ tsk_treeseq_site_allele_frequency_spectrum(const tsk_treeseq_t *self,
             parent[u] = TSK_NULL;
         }
 
-        while (tj < num_edges && edge_left[I[tj]] == t_left) {
-            h = I[tj];
-            tj++;
+        while ((h = tsk_stat_edge_iter_next(&edge_iter, t_left)) != TSK_NULL) {
             u = edge_child[h];
             v = edge_parent[h];
             parent[u] = v;
@@ -2257,8 +2671,8 @@ tsk_treeseq_site_allele_frequency_spectrum(const tsk_treeseq_t *self,
             }
         }
         t_right = sequence_length;
-        if (tj < num_edges) {
-            t_right = TSK_MIN(t_right, edge_left[I[tj]]);
+        if (edge_iter.tj < num_edges) {
+            t_right = TSK_MIN(t_right, edge_left[I[edge_iter.tj]]);
         }
         if (tk < num_edges) {
             t_right = TSK_MIN(t_right, edge_right[O[tk]]);
@@ -2268,6 +2682,12 @@ tsk_treeseq_site_allele_frequency_spectrum(const tsk_treeseq_t *self,
         for (tree_site = 0; tree_site < self->tree_sites_length[tree_index];
              tree_site++) {
             site = self->tree_sites[tree_index] + tree_site;
+            if (site->position < windows[0]) {
+                continue;
+            }
+            if (site->position >= windows[num_windows]) {
+                break;
+            }
             while (windows[window_index + 1] <= site->position) {
                 window_index++;
                 tsk_bug_assert(window_index < num_windows);
@@ -2353,9 +2773,10 @@ tsk_treeseq_branch_allele_frequency_spectrum(const tsk_treeseq_t *self,
     const double *restrict node_time = self->tables->nodes.time;
     const double sequence_length = self->tables->sequence_length;
     tsk_id_t *restrict parent = tsk_malloc(num_nodes * sizeof(*parent));
-    double *restrict last_update = tsk_calloc(num_nodes, sizeof(*last_update));
+    double *restrict last_update = tsk_malloc(num_nodes * sizeof(*last_update));
     double *restrict branch_length = tsk_calloc(num_nodes, sizeof(*branch_length));
-    tsk_id_t tj, tk, h;
+    tsk_id_t tk, h;
+    tsk_stat_edge_iter_t edge_iter;
     double t_left, t_right, w_right;
     const tsk_size_t K = num_sample_sets + 1;
 
@@ -2364,18 +2785,21 @@ tsk_treeseq_branch_allele_frequency_spectrum(const tsk_treeseq_t *self,
         goto out;
     }
 
-    if (parent == NULL || last_update == NULL) {
+    if (parent == NULL || last_update == NULL || branch_length == NULL) {
         ret = TSK_ERR_NO_MEMORY;
         goto out;
     }
     tsk_memset(parent, 0xff, num_nodes * sizeof(*parent));
+    for (u = 0; u < (tsk_id_t) num_nodes; u++) {
+        last_update[u] = windows[0];
+    }
 
     /* Iterate over the trees */
-    tj = 0;
-    tk = 0;
-    t_left = 0;
+    t_left = windows[0];
+    tk = tsk_treeseq_get_removal_start(self, t_left);
+    tsk_stat_edge_iter_init(&edge_iter, self, t_left);
     window_index = 0;
-    while (tj < num_edges || t_left < sequence_length) {
+    while (t_left < windows[num_windows]) {
         tsk_bug_assert(window_index < num_windows);
         while (tk < num_edges && edge_right[O[tk]] == t_left) {
             h = O[tk];
@@ -2402,9 +2826,7 @@ tsk_treeseq_branch_allele_frequency_spectrum(const tsk_treeseq_t *self,
             branch_length[u] = 0;
         }
 
-        while (tj < num_edges && edge_left[I[tj]] == t_left) {
-            h = I[tj];
-            tj++;
+        while ((h = tsk_stat_edge_iter_next(&edge_iter, t_left)) != TSK_NULL) {
             u = edge_child[h];
             v = edge_parent[h];
             parent[u] = v;
@@ -2422,8 +2844,8 @@ tsk_treeseq_branch_allele_frequency_spectrum(const tsk_treeseq_t *self,
         }
 
         t_right = sequence_length;
-        if (tj < num_edges) {
-            t_right = TSK_MIN(t_right, edge_left[I[tj]]);
+        if (edge_iter.tj < num_edges) {
+            t_right = TSK_MIN(t_right, edge_left[I[edge_iter.tj]]);
         }
         if (tk < num_edges) {
             t_right = TSK_MIN(t_right, edge_right[O[tk]]);
@@ -2498,7 +2920,7 @@ tsk_treeseq_allele_frequency_spectrum(const tsk_treeseq_t *self,
         num_windows = 1;
         windows = default_windows;
     } else {
-        ret = tsk_treeseq_check_windows(self, num_windows, windows);
+        ret = tsk_treeseq_check_windows(self, num_windows, windows, options);
         if (ret != 0) {
             goto out;
         }
@@ -3818,77 +4240,300 @@ out:
     return ret;
 }
 
+/* An index over the nodes reachable from the roots of a tree that answers
+ * MRCA queries in constant time. The nodes are listed in preorder from the
+ * virtual root, and the MRCA of two distinct nodes is the parent of the
+ * shallowest node after the first of them in the preorder, up to and including
+ * the second. We find this node using a sparse table of range minimum queries
+ * over the depths of the nodes in preorder. Building the index for a tree takes
+ * O(n log n) time for a tree with n nodes. */
+typedef struct {
+    const tsk_tree_t *tree;
+    tsk_size_t num_nodes;
+    tsk_size_t table_size;
+    tsk_id_t *position;
+    tsk_id_t *preorder;
+    tsk_id_t *depth;
+    tsk_id_t *stack;
+    tsk_id_t *log2;
+    tsk_id_t *table;
+} tsk_mrca_index_t;
+
 static int
-tsk_tree_get_num_samples_by_traversal(
-    const tsk_tree_t *self, tsk_id_t u, tsk_size_t *num_samples)
+tsk_mrca_index_init(tsk_mrca_index_t *self, const tsk_tree_t *tree)
 {
     int ret = 0;
-    tsk_size_t num_nodes, j;
-    tsk_size_t count = 0;
-    const tsk_flags_t *restrict flags = self->tree_sequence->tables->nodes.flags;
-    tsk_id_t *nodes = tsk_malloc(tsk_tree_get_size_bound(self) * sizeof(*nodes));
-    tsk_id_t v;
+    /* Each node including the virtual root appears at most once */
+    const tsk_size_t N = tree->num_nodes + 1;
+    tsk_size_t j;
 
-    if (nodes == NULL) {
+    tsk_memset(self, 0, sizeof(*self));
+    self->tree = tree;
+    self->position = tsk_malloc(N * sizeof(*self->position));
+    self->preorder = tsk_malloc(N * sizeof(*self->preorder));
+    self->depth = tsk_malloc(N * sizeof(*self->depth));
+    self->stack = tsk_malloc(N * sizeof(*self->stack));
+    self->log2 = tsk_malloc((N + 1) * sizeof(*self->log2));
+    if (self->position == NULL || self->preorder == NULL || self->depth == NULL
+        || self->stack == NULL || self->log2 == NULL) {
         ret = TSK_ERR_NO_MEMORY;
         goto out;
     }
-    ret = tsk_tree_preorder_from(self, u, nodes, &num_nodes);
-    if (ret != 0) {
-        goto out;
+    for (j = 0; j < N; j++) {
+        self->position[j] = TSK_NULL;
     }
-    for (j = 0; j < num_nodes; j++) {
-        v = nodes[j];
-        if (flags[v] & TSK_NODE_IS_SAMPLE) {
-            count++;
-        }
+    self->log2[0] = 0;
+    self->log2[1] = 0;
+    for (j = 2; j <= N; j++) {
+        self->log2[j] = self->log2[j / 2] + 1;
     }
-    *num_samples = count;
 out:
-    tsk_safe_free(nodes);
     return ret;
 }
 
-int TSK_WARN_UNUSED
-tsk_tree_get_num_samples(const tsk_tree_t *self, tsk_id_t u, tsk_size_t *num_samples)
+static void
+tsk_mrca_index_free(tsk_mrca_index_t *self)
+{
+    tsk_safe_free(self->position);
+    tsk_safe_free(self->preorder);
+    tsk_safe_free(self->depth);
+    tsk_safe_free(self->stack);
+    tsk_safe_free(self->log2);
+    tsk_safe_free(self->table);
+}
+
+/* Rebuild the index for the current state of the tree. */
+static int
+tsk_mrca_index_build(tsk_mrca_index_t *self)
 {
     int ret = 0;
+    const tsk_tree_t *tree = self->tree;
+    const tsk_id_t *restrict parent = tree->parent;
+    const tsk_id_t *restrict right_child = tree->right_child;
+    const tsk_id_t *restrict left_sib = tree->left_sib;
+    tsk_id_t *restrict position = self->position;
+    tsk_id_t *restrict preorder = self->preorder;
+    tsk_id_t *restrict depth = self->depth;
+    tsk_id_t *restrict stack = self->stack;
+    tsk_id_t *restrict table;
+    tsk_id_t *restrict prev;
+    tsk_id_t u, v, a, b;
+    tsk_size_t j, k, n, half, num_levels, size;
+    int stack_top;
+    void *p;
 
-    ret = tsk_tree_check_node(self, u);
-    if (ret != 0) {
-        goto out;
+    for (j = 0; j < self->num_nodes; j++) {
+        position[preorder[j]] = TSK_NULL;
+    }
+    n = 0;
+    stack_top = 0;
+    stack[0] = tree->virtual_root;
+    while (stack_top >= 0) {
+        u = stack[stack_top];
+        stack_top--;
+        position[u] = (tsk_id_t) n;
+        preorder[n] = u;
+        if (u == tree->virtual_root) {
+            depth[n] = 0;
+        } else if (parent[u] == TSK_NULL) {
+            depth[n] = 1;
+        } else {
+            depth[n] = depth[position[parent[u]]] + 1;
+        }
+        n++;
+        for (v = right_child[u]; v != TSK_NULL; v = left_sib[v]) {
+            stack_top++;
+            stack[stack_top] = v;
+        }
     }
+    self->num_nodes = n;
 
-    if (!(self->options & TSK_NO_SAMPLE_COUNTS)) {
-        *num_samples = (tsk_size_t) self->num_samples[u];
-    } else {
-        ret = tsk_tree_get_num_samples_by_traversal(self, u, num_samples);
+    num_levels = (tsk_size_t) self->log2[n] + 1;
+    size = num_levels * n;
+    if (size > self->table_size) {
+        p = tsk_realloc(self->table, size * sizeof(*self->table));
+        if (p == NULL) {
+            ret = TSK_ERR_NO_MEMORY;
+            goto out;
+        }
+        self->table = p;
+        self->table_size = size;
+    }
+    /* Level k of the table holds the position of the shallowest node in the
+     * 2^k positions starting at each position. */
+    table = self->table;
+    for (j = 0; j < n; j++) {
+        table[j] = (tsk_id_t) j;
+    }
+    for (k = 1; k < num_levels; k++) {
+        prev = table;
+        table += n;
+        half = ((tsk_size_t) 1) << (k - 1);
+        for (j = 0; j + 2 * half <= n; j++) {
+            a = prev[j];
+            b = prev[j + half];
+            table[j] = depth[a] <= depth[b] ? a : b;
+        }
     }
 out:
     return ret;
 }
 
-int TSK_WARN_UNUSED
-tsk_tree_get_num_tracked_samples(
-    const tsk_tree_t *self, tsk_id_t u, tsk_size_t *num_tracked_samples)
+/* Returns the preorder position of the shallowest node in the positions
+ * after l up to and including r, where l < r. The MRCA of the nodes at
+ * positions l and r is the parent of this node. */
+static inline tsk_id_t
+tsk_mrca_index_query_positions(const tsk_mrca_index_t *self, tsk_id_t l, tsk_id_t r)
+{
+    const tsk_id_t *restrict depth = self->depth;
+    const tsk_id_t k = self->log2[r - l];
+    const tsk_id_t *restrict table = self->table + (tsk_size_t) k * self->num_nodes;
+    const tsk_id_t a = table[l + 1];
+    const tsk_id_t b = table[r - (1 << k) + 1];
+
+    return depth[a] <= depth[b] ? a : b;
+}
+
+/* Returns the MRCA of the specified nodes, which must be valid tree nodes. */
+static tsk_id_t
+tsk_mrca_index_query(const tsk_mrca_index_t *self, tsk_id_t u, tsk_id_t v)
+{
+    const tsk_tree_t *tree = self->tree;
+    tsk_id_t l, r, w, mrca;
+    int ret;
+
+    if (u == v) {
+        return u;
+    }
+    if (u == tree->virtual_root || v == tree->virtual_root) {
+        return tree->virtual_root;
+    }
+    l = self->position[u];
+    r = self->position[v];
+    if (l == TSK_NULL || r == TSK_NULL) {
+        /* Nodes not reachable from the roots are rare, so we just walk up. */
+        ret = tsk_tree_get_mrca(tree, u, v, &mrca);
+        tsk_bug_assert(ret == 0);
+        return mrca;
+    }
+    w = l < r ? tsk_mrca_index_query_positions(self, l, r)
+              : tsk_mrca_index_query_positions(self, r, l);
+    /* Nodes in different trees of the forest only meet at the virtual root */
+    if (self->depth[w] == 1) {
+        return TSK_NULL;
+    }
+    return tree->parent[self->preorder[w]];
+}
+
+int
+tsk_tree_get_mrcas(const tsk_tree_t *self, tsk_size_t num_pairs, const tsk_id_t *u,
+    const tsk_id_t *v, tsk_id_t *mrca)
 {
     int ret = 0;
+    tsk_mrca_index_t index;
+    tsk_size_t j;
 
-    ret = tsk_tree_check_node(self, u);
+    ret = tsk_mrca_index_init(&index, self);
     if (ret != 0) {
         goto out;
     }
-    if (self->options & TSK_NO_SAMPLE_COUNTS) {
+    if (!tsk_tree_has_sample_counts(self)) {
         ret = TSK_ERR_UNSUPPORTED_OPERATION;
         goto out;
     }
-    *num_tracked_samples = self->num_tracked_samples[u];
-out:
-    return ret;
-}
-
-bool
-tsk_tree_is_sample(const tsk_tree_t *self, tsk_id_t u)
+    for (j = 0; j < num_pairs; j++) {
+        ret = tsk_tree_check_node(self, u[j]);
+        if (ret != 0) {
+            goto out;
+        }
+        ret = tsk_tree_check_node(self, v[j]);
+        if (ret != 0) {
+            goto out;
+        }
+    }
+    ret = tsk_mrca_index_build(&index);
+    if (ret != 0) {
+        goto out;
+    }
+    for (j = 0; j < num_pairs; j++) {
+        mrca[j] = tsk_mrca_index_query(&index, u[j], v[j]);
+    }
+out:
+    tsk_mrca_index_free(&index);
+    return ret;
+}
+
+static int
+tsk_tree_get_num_samples_by_traversal(
+    const tsk_tree_t *self, tsk_id_t u, tsk_size_t *num_samples)
+{
+    int ret = 0;
+    tsk_size_t num_nodes, j;
+    tsk_size_t count = 0;
+    const tsk_flags_t *restrict flags = self->tree_sequence->tables->nodes.flags;
+    tsk_id_t *nodes = tsk_malloc(tsk_tree_get_size_bound(self) * sizeof(*nodes));
+    tsk_id_t v;
+
+    if (nodes == NULL) {
+        ret = TSK_ERR_NO_MEMORY;
+        goto out;
+    }
+    ret = tsk_tree_preorder_from(self, u, nodes, &num_nodes);
+    if (ret != 0) {
+        goto out;
+    }
+    for (j = 0; j < num_nodes; j++) {
+        v = nodes[j];
+        if (flags[v] & TSK_NODE_IS_SAMPLE) {
+            count++;
+        }
+    }
+    *num_samples = count;
+out:
+    tsk_safe_free(nodes);
+    return ret;
+}
+
+int TSK_WARN_UNUSED
+tsk_tree_get_num_samples(const tsk_tree_t *self, tsk_id_t u, tsk_size_t *num_samples)
+{
+    int ret = 0;
+
+    ret = tsk_tree_check_node(self, u);
+    if (ret != 0) {
+        goto out;
+    }
+
+    if (!(self->options & TSK_NO_SAMPLE_COUNTS)) {
+        *num_samples = (tsk_size_t) self->num_samples[u];
+    } else {
+        ret = tsk_tree_get_num_samples_by_traversal(self, u, num_samples);
+    }
+out:
+    return ret;
+}
+
+int TSK_WARN_UNUSED
+tsk_tree_get_num_tracked_samples(
+    const tsk_tree_t *self, tsk_id_t u, tsk_size_t *num_tracked_samples)
+{
+    int ret = 0;
+
+    ret = tsk_tree_check_node(self, u);
+    if (ret != 0) {
+        goto out;
+    }
+    if (self->options & TSK_NO_SAMPLE_COUNTS) {
+        ret = TSK_ERR_UNSUPPORTED_OPERATION;
+        goto out;
+    }
+    *num_tracked_samples = self->num_tracked_samples[u];
+out:
+    return ret;
+}
+
+bool
+tsk_tree_is_sample(const tsk_tree_t *self, tsk_id_t u)
 {
     return tsk_treeseq_is_sample(self->tree_sequence, u);
 }
@@ -4551,20 +5196,125 @@ tsk_tree_position_in_interval(const tsk_tree_t *self, double x)
     return self->interval.left <= x && x < self->interval.right;
 }
 
+/* Sets the state of the tree to the specified tree checkpoint by
+ * inserting the edges stored for it into a cleared tree. */
+static int
+tsk_tree_restore_checkpoint(tsk_tree_t *self, tsk_size_t checkpoint)
+{
+    int ret = 0;
+    const tsk_treeseq_t *ts = self->tree_sequence;
+    const tsk_table_collection_t *tables = ts->tables;
+    const tsk_id_t num_edges = (tsk_id_t) tables->edges.num_rows;
+    const tsk_id_t *restrict edge_parent = tables->edges.parent;
+    const tsk_id_t *restrict edge_child = tables->edges.child;
+    const tsk_id_t *restrict edges = tables->indexes.tree_checkpoint_edges;
+    const tsk_size_t *restrict offset = tables->indexes.tree_checkpoint_edges_offset;
+    const tsk_id_t index = tables->indexes.tree_checkpoint_tree[checkpoint];
+    const double left = ts->breakpoints[index];
+    tsk_size_t j;
+    tsk_id_t e;
+
+    ret = tsk_tree_clear(self);
+    if (ret != 0) {
+        goto out;
+    }
+    for (j = offset[checkpoint]; j < offset[checkpoint + 1]; j++) {
+        e = edges[j];
+        tsk_tree_insert_edge(self, edge_parent[e], edge_child[e], e);
+    }
+    self->index = index;
+    self->interval.left = left;
+    self->interval.right = ts->breakpoints[index + 1];
+    self->direction = TSK_DIR_FORWARD;
+    self->left_index = tsk_search_index_order(
+        tables->edges.left, tables->indexes.edge_insertion_order, num_edges, left);
+    self->right_index = tsk_search_index_order(
+        tables->edges.right, tables->indexes.edge_removal_order, num_edges, left);
+    if (tables->sites.num_rows > 0) {
+        self->sites = ts->tree_sites[index];
+        self->sites_length = ts->tree_sites_length[index];
+    }
+out:
+    return ret;
+}
+
+/* Returns the index of the closest tree checkpoint at or before the
+ * specified tree, or -1 if we are closer to the tree by moving the current
+ * tree sequentially. */
+static tsk_id_t
+tsk_tree_get_seek_checkpoint(const tsk_tree_t *self, tsk_id_t target)
+{
+    const tsk_table_collection_t *tables = self->tree_sequence->tables;
+    const tsk_id_t *restrict checkpoint_tree = tables->indexes.tree_checkpoint_tree;
+    const tsk_id_t num_trees = (tsk_id_t) self->tree_sequence->num_trees;
+    tsk_id_t lower = 0;
+    tsk_id_t upper = (tsk_id_t) tables->indexes.num_tree_checkpoints;
+    tsk_id_t mid, distance;
+
+    if (!tsk_table_collection_has_tree_checkpoints(tables)) {
+        return -1;
+    }
+    /* Find the last checkpoint with tree index <= target */
+    while (lower < upper) {
+        mid = lower + (upper - lower) / 2;
+        if (checkpoint_tree[mid] <= target) {
+            lower = mid + 1;
+        } else {
+            upper = mid;
+        }
+    }
+    if (lower == 0) {
+        return -1;
+    }
+    if (self->index == -1) {
+        distance = TSK_MIN(target + 1, num_trees - target);
+    } else {
+        distance = target - self->index;
+        distance = distance < 0 ? -distance : distance;
+    }
+    return target - checkpoint_tree[lower - 1] < distance ? lower - 1 : -1;
+}
+
 int TSK_WARN_UNUSED
 tsk_tree_seek(tsk_tree_t *self, double x, tsk_flags_t TSK_UNUSED(options))
 {
     int ret = 0;
-    const double L = tsk_treeseq_get_sequence_length(self->tree_sequence);
-    const double t_l = self->interval.left;
-    const double t_r = self->interval.right;
+    const tsk_treeseq_t *ts = self->tree_sequence;
+    const double L = tsk_treeseq_get_sequence_length(ts);
+    double t_l, t_r;
     double distance_left, distance_right;
+    tsk_id_t target, checkpoint;
 
     if (x < 0 || x >= L) {
         ret = TSK_ERR_SEEK_OUT_OF_BOUNDS;
         goto out;
     }
 
+    if (!tsk_tree_position_in_interval(self, x)) {
+        target = (tsk_id_t) tsk_search_sorted(ts->breakpoints, ts->num_trees + 1, x);
+        if (ts->breakpoints[target] > x) {
+            target--;
+        }
+        checkpoint = tsk_tree_get_seek_checkpoint(self, target);
+        if (checkpoint != -1) {
+            ret = tsk_tree_restore_checkpoint(self, (tsk_size_t) checkpoint);
+            if (ret != 0) {
+                goto out;
+            }
+            while (!tsk_tree_position_in_interval(self, x)) {
+                ret = tsk_tree_next(self);
+                if (ret < 0) {
+                    goto out;
+                }
+            }
+            ret = 0;
+            goto out;
+        }
+    }
+
+    t_l = self->interval.left;
+    t_r = self->interval.right;
+
     if (x < t_l) {
         /* |-----|-----|========|---------| */
         /* 0     x    t_l      t_r        L */
@@ -4596,6 +5346,21 @@ out:
     return ret;
 }
 
+int TSK_WARN_UNUSED
+tsk_tree_seek_index(tsk_tree_t *self, tsk_id_t tree, tsk_flags_t options)
+{
+    int ret = 0;
+    const tsk_treeseq_t *ts = self->tree_sequence;
+
+    if (tree < 0 || tree >= (tsk_id_t) ts->num_trees) {
+        ret = TSK_ERR_SEEK_OUT_OF_BOUNDS;
+        goto out;
+    }
+    ret = tsk_tree_seek(self, ts->breakpoints[tree], options);
+out:
+    return ret;
+}
+
 int TSK_WARN_UNUSED
 tsk_tree_clear(tsk_tree_t *self)
 {
@@ -5099,6 +5864,891 @@ out:
     return ret;
 }
 
+/* Per-tree metrics for a range of trees. The number of roots and the TMRCA
+ * are read from the roots maintained by the tree as it moves along the
+ * sequence, and the remaining metrics are computed together in a single
+ * preorder traversal per tree. */
+int TSK_WARN_UNUSED
+tsk_treeseq_get_tree_metrics(const tsk_treeseq_t *self, tsk_id_t start, tsk_id_t stop,
+    tsk_flags_t TSK_UNUSED(options), double *total_branch_length, tsk_size_t *num_roots,
+    double *tmrca, tsk_size_t *sackin_index, double *colless_index, double *b1_index)
+{
+    int ret = 0;
+    const double *restrict time = self->tables->nodes.time;
+    const tsk_size_t num_nodes = self->tables->nodes.num_rows;
+    const bool traverse = total_branch_length != NULL || sackin_index != NULL
+                          || colless_index != NULL || b1_index != NULL;
+    const tsk_id_t *restrict parent;
+    const tsk_id_t *restrict right_child;
+    const tsk_id_t *restrict left_sib;
+    tsk_tree_t tree;
+    tsk_id_t *nodes = NULL;
+    tsk_id_t *stack = NULL;
+    tsk_id_t *num_leaves = NULL;
+    tsk_size_t *depth = NULL;
+    tsk_size_t *max_path_length = NULL;
+    tsk_size_t j, k, n, sackin, colless, mpl, tree_num_roots;
+    tsk_id_t u, v, root, num_children, leaves;
+    int stack_top;
+    bool binary;
+    double tbl, b1;
+
+    ret = tsk_tree_init(&tree, self, 0);
+    if (ret != 0) {
+        goto out;
+    }
+    if (start < 0 || stop < start || stop > (tsk_id_t) self->num_trees) {
+        ret = TSK_ERR_SEEK_OUT_OF_BOUNDS;
+        goto out;
+    }
+    if (start == stop) {
+        goto out;
+    }
+    if (traverse) {
+        nodes = tsk_malloc((num_nodes + 1) * sizeof(*nodes));
+        stack = tsk_malloc((num_nodes + 1) * sizeof(*stack));
+        num_leaves = tsk_malloc((num_nodes + 1) * sizeof(*num_leaves));
+        depth = tsk_malloc((num_nodes + 1) * sizeof(*depth));
+        max_path_length = tsk_malloc((num_nodes + 1) * sizeof(*max_path_length));
+        if (nodes == NULL || stack == NULL || num_leaves == NULL || depth == NULL
+            || max_path_length == NULL) {
+            ret = TSK_ERR_NO_MEMORY;
+            goto out;
+        }
+    }
+    parent = tree.parent;
+    right_child = tree.right_child;
+    left_sib = tree.left_sib;
+
+    ret = tsk_tree_seek(&tree, self->breakpoints[start], 0);
+    if (ret != 0) {
+        goto out;
+    }
+    for (k = 0; k < (tsk_size_t)(stop - start); k++) {
+        tsk_bug_assert(tree.index == start + (tsk_id_t) k);
+        tree_num_roots = tsk_tree_get_num_roots(&tree);
+        if (num_roots != NULL) {
+            num_roots[k] = tree_num_roots;
+        }
+        if (tmrca != NULL) {
+            tmrca[k] = NAN;
+            root = tsk_tree_get_left_root(&tree);
+            if (tree_num_roots == 1 && tree.num_samples[root] == self->num_samples) {
+                tmrca[k] = time[root];
+            }
+        }
+        if (traverse) {
+            n = 0;
+            stack_top = -1;
+            for (u = right_child[tree.virtual_root]; u != TSK_NULL; u = left_sib[u]) {
+                stack_top++;
+                stack[stack_top] = u;
+            }
+            tbl = 0;
+            sackin = 0;
+            while (stack_top >= 0) {
+                u = stack[stack_top];
+                stack_top--;
+                nodes[n] = u;
+                n++;
+                v = parent[u];
+                if (v == TSK_NULL) {
+                    depth[u] = 0;
+                } else {
+                    depth[u] = depth[v] + 1;
+                    tbl += time[v] - time[u];
+                }
+                if (right_child[u] == TSK_NULL) {
+                    sackin += depth[u];
+                }
+                for (v = right_child[u]; v != TSK_NULL; v = left_sib[v]) {
+                    stack_top++;
+                    stack[stack_top] = v;
+                }
+            }
+            /* Children always come after their parents in preorder, so visiting
+             * the nodes in reverse gives the bottom-up metrics. */
+            binary = tree_num_roots == 1;
+            colless = 0;
+            b1 = 0;
+            for (j = n; j > 0; j--) {
+                u = nodes[j - 1];
+                num_children = 0;
+                leaves = 0;
+                mpl = 0;
+                for (v = right_child[u]; v != TSK_NULL; v = left_sib[v]) {
+                    num_children++;
+                    leaves += num_leaves[v];
+                    mpl = TSK_MAX(mpl, max_path_length[v]);
+                }
+                if (num_children == 0) {
+                    num_leaves[u] = 1;
+                    max_path_length[u] = 0;
+                } else {
+                    num_leaves[u] = leaves;
+                    max_path_length[u] = mpl + 1;
+                    if (parent[u] != TSK_NULL) {
+                        b1 += 1 / (double) max_path_length[u];
+                    }
+                    if (num_children == 2) {
+                        v = right_child[u];
+                        colless += (tsk_size_t) llabs(
+                            num_leaves[v] - num_leaves[left_sib[v]]);
+                    } else {
+                        binary = false;
+                    }
+                }
+            }
+            if (total_branch_length != NULL) {
+                total_branch_length[k] = tbl;
+            }
+            if (sackin_index != NULL) {
+                sackin_index[k] = sackin;
+            }
+            if (colless_index != NULL) {
+                colless_index[k] = binary ? (double) colless : NAN;
+            }
+            if (b1_index != NULL) {
+                b1_index[k] = b1;
+            }
+        }
+        ret = tsk_tree_next(&tree);
+        if (ret < 0) {
+            goto out;
+        }
+    }
+    ret = 0;
+out:
+    tsk_tree_free(&tree);
+    tsk_safe_free(nodes);
+    tsk_safe_free(stack);
+    tsk_safe_free(num_leaves);
+    tsk_safe_free(depth);
+    tsk_safe_free(max_path_length);
+    return ret;
+}
+
+/* Computes the span-weighted TMRCA of each pair of the specified nodes over
+ * each window, using an MRCA index built once per tree. The MRCA of every pair
+ * is found in each tree, so this takes O(n^2) time per tree for n nodes. */
+int TSK_WARN_UNUSED
+tsk_treeseq_tmrca_matrix(const tsk_treeseq_t *self, tsk_size_t num_nodes,
+    const tsk_id_t *nodes, tsk_size_t num_windows, const double *windows,
+    tsk_flags_t options, double *result)
+{
+    int ret = 0;
+    const double *restrict time = self->tables->nodes.time;
+    const double default_windows[] = { 0, self->tables->sequence_length };
+    const tsk_size_t n = num_nodes;
+    tsk_mrca_index_t index;
+    tsk_tree_t tree;
+    tsk_id_t *position = NULL;
+    double *mrca_time = NULL;
+    tsk_size_t i, j, k, w;
+    tsk_id_t u, l, r, mrca;
+    double left, right, span, tmrca;
+    double *restrict row;
+    double *restrict window_result;
+
+    tsk_memset(&index, 0, sizeof(index));
+    ret = tsk_tree_init(&tree, self, 0);
+    if (ret != 0) {
+        goto out;
+    }
+    for (j = 0; j < n; j++) {
+        u = nodes[j];
+        if (u < 0 || u >= (tsk_id_t) self->tables->nodes.num_rows) {
+            ret = TSK_ERR_NODE_OUT_OF_BOUNDS;
+            goto out;
+        }
+    }
+    if (windows == NULL) {
+        num_windows = 1;
+        windows = default_windows;
+    } else {
+        ret = tsk_treeseq_check_windows(self, num_windows, windows, options);
+        if (ret != 0) {
+            goto out;
+        }
+    }
+    ret = tsk_mrca_index_init(&index, &tree);
+    if (ret != 0) {
+        goto out;
+    }
+    position = tsk_malloc(n * sizeof(*position));
+    mrca_time = tsk_malloc((tree.num_nodes + 1) * sizeof(*mrca_time));
+    if (position == NULL || mrca_time == NULL) {
+        ret = TSK_ERR_NO_MEMORY;
+        goto out;
+    }
+    tsk_memset(result, 0, num_windows * n * n * sizeof(*result));
+
+    ret = tsk_tree_seek(&tree, windows[0], 0);
+    if (ret != 0) {
+        goto out;
+    }
+    w = 0;
+    while (tree.index != -1 && tree.interval.left < windows[num_windows]) {
+        ret = tsk_mrca_index_build(&index);
+        if (ret != 0) {
+            goto out;
+        }
+        for (j = 0; j < index.num_nodes; j++) {
+            mrca_time[j]
+                = index.depth[j] <= 1 ? NAN : time[tree.parent[index.preorder[j]]];
+        }
+        for (j = 0; j < n; j++) {
+            position[j] = index.position[nodes[j]];
+        }
+        while (windows[w + 1] <= tree.interval.left) {
+            w++;
+        }
+        for (k = w; k < num_windows && windows[k] < tree.interval.right; k++) {
+            left = TSK_MAX(tree.interval.left, windows[k]);
+            right = TSK_MIN(tree.interval.right, windows[k + 1]);
+            span = right - left;
+            window_result = result + k * n * n;
+            for (i = 0; i < n; i++) {
+                row = window_result + i * n;
+                row[i] += span * time[nodes[i]];
+                for (j = i + 1; j < n; j++) {
+                    l = position[i];
+                    r = position[j];
+                    if (l == TSK_NULL || r == TSK_NULL || l == r) {
+                        mrca = tsk_mrca_index_query(&index, nodes[i], nodes[j]);
+                        tmrca = mrca == TSK_NULL ? NAN : time[mrca];
+                    } else if (l < r) {
+                        tmrca = mrca_time[tsk_mrca_index_query_positions(&index, l, r)];
+                    } else {
+                        tmrca = mrca_time[tsk_mrca_index_query_positions(&index, r, l)];
+                    }
+                    row[j] += span * tmrca;
+                }
+            }
+        }
+        ret = tsk_tree_next(&tree);
+        if (ret < 0) {
+            goto out;
+        }
+    }
+    ret = 0;
+
+    for (k = 0; k < num_windows; k++) {
+        window_result = result + k * n * n;
+        span = 1;
+        if (options & TSK_STAT_SPAN_NORMALISE) {
+            span = windows[k + 1] - windows[k];
+        }
+        for (i = 0; i < n; i++) {
+            for (j = i; j < n; j++) {
+                window_result[i * n + j] /= span;
+                window_result[j * n + i] = window_result[i * n + j];
+            }
+        }
+    }
+out:
+    tsk_tree_free(&tree);
+    tsk_mrca_index_free(&index);
+    tsk_safe_free(position);
+    tsk_safe_free(mrca_time);
+    return ret;
+}
+
+/* ======================================================== *
+ * Coalescence time tables
+ * ======================================================== */
+
+/* State for tsk_treeseq_coalescence_time_table. For every node we maintain
+ * the number of samples from each sample set in its subtree and, for the
+ * pair weights, the sum over its children of the products of these counts.
+ * The weights of the nodes that are currently coalescences (i.e., non-sample
+ * nodes with two or more children) are stored densely in active order, and
+ * are accumulated into the records lazily, only when they change or at the
+ * end of a block. */
+typedef struct {
+    tsk_size_t num_nodes;
+    tsk_size_t num_sample_sets;
+    tsk_size_t num_pairs;
+    tsk_size_t num_weights;
+    tsk_flags_t weight_func;
+    const double *node_time;
+    const tsk_flags_t *node_flags;
+    tsk_id_t *num_children;
+    double *set_size;
+    double *count;
+    double *sumsq;
+    double *pairs;
+    /* The nodes that are currently coalescences */
+    tsk_id_t *active;
+    tsk_id_t *active_index;
+    tsk_size_t num_active;
+    tsk_size_t max_active;
+    double *output;
+    /* Lazy accumulation */
+    double total_weight;
+    double *last_weight;
+    tsk_id_t *record;
+    tsk_id_t *record_block;
+    tsk_coalescence_time_table_t *result;
+    /* The current window and block */
+    tsk_id_t window;
+    tsk_size_t first_tree;
+    tsk_size_t num_trees;
+    tsk_size_t num_blocks;
+    tsk_size_t block_offset;
+    tsk_size_t record_start;
+    double accessible_span;
+    tsk_id_t block;
+    tsk_id_t block_id;
+} coaltime_t;
+
+static int
+coaltime_add_record(coaltime_t *self, tsk_id_t u)
+{
+    int ret = 0;
+    tsk_coalescence_time_table_t *result = self->result;
+    tsk_size_t W = self->num_weights;
+    tsk_size_t max_records;
+    void *p;
+
+    if (result->num_records == result->max_records) {
+        max_records = TSK_MAX(1024, 2 * result->max_records);
+        p = tsk_realloc(result->time, max_records * sizeof(*result->time));
+        if (p == NULL) {
+            ret = TSK_ERR_NO_MEMORY;
+            goto out;
+        }
+        result->time = p;
+        p = tsk_realloc(result->window, max_records * sizeof(*result->window));
+        if (p == NULL) {
+            ret = TSK_ERR_NO_MEMORY;
+            goto out;
+        }
+        result->window = p;
+        p = tsk_realloc(result->block, max_records * sizeof(*result->block));
+        if (p == NULL) {
+            ret = TSK_ERR_NO_MEMORY;
+            goto out;
+        }
+        result->block = p;
+        p = tsk_realloc(result->weights, max_records * W * sizeof(*result->weights));
+        if (p == NULL) {
+            ret = TSK_ERR_NO_MEMORY;
+            goto out;
+        }
+        result->weights = p;
+        result->max_records = max_records;
+    }
+    result->time[result->num_records] = self->node_time[u];
+    result->window[result->num_records] = self->window;
+    result->block[result->num_records] = self->block;
+    tsk_memset(GET_2D_ROW(result->weights, W, result->num_records), 0,
+        W * sizeof(*result->weights));
+    self->record[u] = (tsk_id_t) result->num_records;
+    self->record_block[u] = self->block_id;
+    result->num_records++;
+out:
+    return ret;
+}
+
+/* Adds the weight of the specified coalescence node since it was last
+ * flushed to its record for the current block. */
+static int
+coaltime_flush(coaltime_t *self, tsk_id_t u)
+{
+    int ret = 0;
+    tsk_size_t j;
+    tsk_size_t W = self->num_weights;
+    double delta = self->total_weight - self->last_weight[u];
+    const double *output = GET_2D_ROW(self->output, W, self->active_index[u]);
+    double *weights;
+
+    if (delta == 0) {
+        goto out;
+    }
+    if (self->record_block[u] != self->block_id) {
+        ret = coaltime_add_record(self, u);
+        if (ret != 0) {
+            goto out;
+        }
+    }
+    weights = GET_2D_ROW(self->result->weights, W, self->record[u]);
+    for (j = 0; j < W; j++) {
+        weights[j] += delta * output[j];
+    }
+    self->last_weight[u] = self->total_weight;
+out:
+    return ret;
+}
+
+static int
+coaltime_flush_all(coaltime_t *self)
+{
+    int ret = 0;
+    tsk_size_t j;
+
+    for (j = 0; j < self->num_active; j++) {
+        ret = coaltime_flush(self, self->active[j]);
+        if (ret != 0) {
+            goto out;
+        }
+    }
+out:
+    return ret;
+}
+
+static void
+coaltime_compute_output(coaltime_t *self, tsk_id_t u, double *output)
+{
+    const tsk_size_t S = self->num_sample_sets;
+    const tsk_size_t P = self->num_pairs;
+    const double *restrict count = GET_2D_ROW(self->count, S, u);
+    const double *restrict sumsq;
+    double *restrict pairs
+        = self->weight_func == TSK_COALESCENCE_EVENTS_TRIO ? self->pairs : output;
+    tsk_size_t j, k, l;
+
+    if (self->weight_func == TSK_COALESCENCE_EVENTS) {
+        for (j = 0; j < S; j++) {
+            output[j] = count[j] > 0 ? 1 : 0;
+        }
+        return;
+    }
+    sumsq = GET_2D_ROW(self->sumsq, P, u);
+    l = 0;
+    for (j = 0; j < S; j++) {
+        pairs[l] = (count[j] * count[j] - sumsq[l]) / 2;
+        l++;
+        for (k = j + 1; k < S; k++) {
+            pairs[l] = count[j] * count[k] - sumsq[l];
+            l++;
+        }
+    }
+    if (self->weight_func == TSK_COALESCENCE_EVENTS_TRIO) {
+        for (l = 0; l < P; l++) {
+            for (k = 0; k < S; k++) {
+                output[l * S + k] = pairs[l] * (self->set_size[k] - count[k]);
+            }
+        }
+    }
+}
+
+/* Updates the coalescence status and weights of a node whose subtree has
+ * changed. */
+static int
+coaltime_update_node(coaltime_t *self, tsk_id_t u)
+{
+    int ret = 0;
+    const tsk_size_t W = self->num_weights;
+    bool is_active = self->active_index[u] != TSK_NULL;
+    bool is_coalescence
+        = self->num_children[u] > 1 && !(self->node_flags[u] & TSK_NODE_IS_SAMPLE);
+    tsk_size_t j, max_active;
+    tsk_id_t v;
+    void *p;
+
+    if (is_active && !is_coalescence) {
+        j = (tsk_size_t) self->active_index[u];
+        self->num_active--;
+        v = self->active[self->num_active];
+        self->active[j] = v;
+        self->active_index[v] = (tsk_id_t) j;
+        tsk_memcpy(GET_2D_ROW(self->output, W, j),
+            GET_2D_ROW(self->output, W, self->num_active), W * sizeof(*self->output));
+        self->active_index[u] = TSK_NULL;
+    } else if (is_coalescence) {
+        if (!is_active) {
+            if (self->num_active == self->max_active) {
+                max_active = TSK_MAX(64, 2 * self->max_active);
+                p = tsk_realloc(self->active, max_active * sizeof(*self->active));
+                if (p == NULL) {
+                    ret = TSK_ERR_NO_MEMORY;
+                    goto out;
+                }
+                self->active = p;
+                p = tsk_realloc(self->output, max_active * W * sizeof(*self->output));
+                if (p == NULL) {
+                    ret = TSK_ERR_NO_MEMORY;
+                    goto out;
+                }
+                self->output = p;
+                self->max_active = max_active;
+            }
+            self->active[self->num_active] = u;
+            self->active_index[u] = (tsk_id_t) self->num_active;
+            self->num_active++;
+        }
+        coaltime_compute_output(
+            self, u, GET_2D_ROW(self->output, W, self->active_index[u]));
+        self->last_weight[u] = self->total_weight;
+    }
+out:
+    return ret;
+}
+
+/* Adds (sign = 1) or removes (sign = -1) the subtree of child below parent,
+ * updating the counts and sums of squares of parent and all of its
+ * ancestors, and flushing the weights of any coalescences on the path. */
+static int
+coaltime_update_path(coaltime_t *self, tsk_id_t child, tsk_id_t parent,
+    const tsk_id_t *parent_array, double sign, bool *is_dirty, tsk_id_t *dirty,
+    tsk_size_t *num_dirty)
+{
+    int ret = 0;
+    const tsk_size_t S = self->num_sample_sets;
+    const tsk_size_t P = self->num_pairs;
+    const double *restrict delta = GET_2D_ROW(self->count, S, child);
+    const double *restrict x;
+    double *restrict count;
+    double *restrict sumsq;
+    tsk_size_t j, k, l;
+    tsk_id_t u = child;
+    tsk_id_t v = parent;
+
+    while (v != TSK_NULL) {
+        if (mark_node_dirty(v, is_dirty, dirty, num_dirty)
+            && self->active_index[v] != TSK_NULL) {
+            ret = coaltime_flush(self, v);
+            if (ret != 0) {
+                goto out;
+            }
+        }
+        if (self->sumsq != NULL) {
+            sumsq = GET_2D_ROW(self->sumsq, P, v);
+            l = 0;
+            if (u == child) {
+                for (j = 0; j < S; j++) {
+                    for (k = j; k < S; k++) {
+                        sumsq[l] += sign * delta[j] * delta[k];
+                        l++;
+                    }
+                }
+            } else {
+                /* The counts of the child u on the path have already been
+                 * updated */
+                x = GET_2D_ROW(self->count, S, u);
+                for (j = 0; j < S; j++) {
+                    for (k = j; k < S; k++) {
+                        sumsq[l] += sign * (delta[j] * x[k] + x[j] * delta[k])
+                                    - delta[j] * delta[k];
+                        l++;
+                    }
+                }
+            }
+        }
+        count = GET_2D_ROW(self->count, S, v);
+        for (j = 0; j < S; j++) {
+            count[j] += sign * delta[j];
+        }
+        u = v;
+        v = parent_array[v];
+    }
+out:
+    return ret;
+}
+
+/* Trees are assigned to blocks by their index within the window, counting
+ * the tree ending at the left coordinate of the window if there is one. */
+static void
+coaltime_start_window(coaltime_t *self, const tsk_treeseq_t *ts, tsk_id_t window,
+    double left, double right, tsk_size_t num_blocks)
+{
+    const tsk_size_t num_breakpoints = ts->num_trees + 1;
+    tsk_size_t index = tsk_search_sorted(ts->breakpoints, num_breakpoints, left);
+    tsk_size_t last_tree = ts->num_trees - 1;
+
+    if (right < ts->tables->sequence_length) {
+        last_tree = tsk_search_sorted(ts->breakpoints, num_breakpoints, right) - 1;
+    }
+    self->window = window;
+    self->first_tree = index == 0 ? 0 : index - 1;
+    self->num_trees = last_tree - self->first_tree + 1;
+    self->block_offset += self->num_blocks;
+    self->num_blocks = TSK_MIN(num_blocks, self->num_trees);
+    self->record_start = self->result->num_records;
+    self->accessible_span = 0;
+    self->block = TSK_NULL;
+}
+
+/* Adds the weights of the coalescences in the tree with the specified index
+ * and genomic interval to its intersection with the current window. If the
+ * window ends within the tree, the window's records are completed and
+ * window_done is set to true. */
+static int
+coaltime_add_tree(coaltime_t *self, tsk_size_t tree_index, double t_left, double t_right,
+    double left, double right, bool span_normalise, bool *window_done)
+{
+    int ret = 0;
+    const tsk_size_t W = self->num_weights;
+    tsk_id_t block = (tsk_id_t)(
+        (self->num_blocks * (tree_index - self->first_tree)) / self->num_trees);
+    double span = TSK_MIN(t_right, right) - TSK_MAX(t_left, left);
+    double scale;
+    double *weights;
+    tsk_size_t j, l;
+
+    if (block != self->block) {
+        ret = coaltime_flush_all(self);
+        if (ret != 0) {
+            goto out;
+        }
+        self->block = block;
+        self->block_id = (tsk_id_t)(self->block_offset + (tsk_size_t) block);
+    }
+    self->total_weight += span_normalise ? span / (right - left) : 1;
+    if (self->num_active > 0) {
+        self->accessible_span += span;
+    }
+    *window_done = right <= t_right;
+    if (*window_done) {
+        ret = coaltime_flush_all(self);
+        if (ret != 0) {
+            goto out;
+        }
+        /* Average the weights over the trees with at least one coalescence */
+        if (span_normalise && self->accessible_span > 0) {
+            scale = (right - left) / self->accessible_span;
+            for (j = self->record_start; j < self->result->num_records; j++) {
+                weights = GET_2D_ROW(self->result->weights, W, j);
+                for (l = 0; l < W; l++) {
+                    weights[l] *= scale;
+                }
+            }
+        }
+    }
+out:
+    return ret;
+}
+
+static int
+coaltime_init(coaltime_t *self, const tsk_treeseq_t *ts, tsk_size_t num_sample_sets,
+    const tsk_size_t *sample_set_sizes, const tsk_id_t *sample_sets,
+    tsk_flags_t weight_func, tsk_coalescence_time_table_t *result)
+{
+    int ret = 0;
+    const tsk_size_t N = ts->tables->nodes.num_rows;
+    const tsk_size_t S = num_sample_sets;
+    tsk_size_t j, k, offset;
+    tsk_id_t u;
+
+    tsk_memset(self, 0, sizeof(*self));
+    self->num_nodes = N;
+    self->num_sample_sets = S;
+    self->num_pairs = S * (S + 1) / 2;
+    self->weight_func = weight_func;
+    self->node_time = ts->tables->nodes.time;
+    self->node_flags = ts->tables->nodes.flags;
+    self->result = result;
+    if (weight_func == TSK_COALESCENCE_EVENTS) {
+        self->num_weights = S;
+    } else if (weight_func == TSK_COALESCENCE_EVENTS_PAIR) {
+        self->num_weights = self->num_pairs;
+    } else {
+        self->num_weights = self->num_pairs * S;
+    }
+    result->num_weights = self->num_weights;
+
+    self->num_children = tsk_calloc(N, sizeof(*self->num_children));
+    self->set_size = tsk_calloc(S, sizeof(*self->set_size));
+    self->count = tsk_calloc(N * S, sizeof(*self->count));
+    self->pairs = tsk_malloc(self->num_pairs * sizeof(*self->pairs));
+    self->active_index = tsk_malloc(N * sizeof(*self->active_index));
+    self->last_weight = tsk_calloc(N, sizeof(*self->last_weight));
+    self->record = tsk_malloc(N * sizeof(*self->record));
+    self->record_block = tsk_malloc(N * sizeof(*self->record_block));
+    if (self->num_children == NULL || self->set_size == NULL || self->count == NULL
+        || self->pairs == NULL || self->active_index == NULL || self->last_weight == NULL
+        || self->record == NULL || self->record_block == NULL) {
+        ret = TSK_ERR_NO_MEMORY;
+        goto out;
+    }
+    if (weight_func != TSK_COALESCENCE_EVENTS) {
+        self->sumsq = tsk_calloc(N * self->num_pairs, sizeof(*self->sumsq));
+        if (self->sumsq == NULL) {
+            ret = TSK_ERR_NO_MEMORY;
+            goto out;
+        }
+    }
+    tsk_memset(self->active_index, 0xff, N * sizeof(*self->active_index));
+    tsk_memset(self->record, 0xff, N * sizeof(*self->record));
+    tsk_memset(self->record_block, 0xff, N * sizeof(*self->record_block));
+    self->block = TSK_NULL;
+    self->block_id = TSK_NULL;
+
+    offset = 0;
+    for (j = 0; j < S; j++) {
+        self->set_size[j] = (double) sample_set_sizes[j];
+        for (k = 0; k < sample_set_sizes[j]; k++) {
+            u = sample_sets[offset];
+            offset++;
+            if (u < 0 || u >= (tsk_id_t) N) {
+                ret = TSK_ERR_NODE_OUT_OF_BOUNDS;
+                goto out;
+            }
+            self->count[(tsk_size_t) u * S + j] = 1;
+        }
+    }
+out:
+    return ret;
+}
+
+static void
+coaltime_free(coaltime_t *self)
+{
+    tsk_safe_free(self->num_children);
+    tsk_safe_free(self->set_size);
+    tsk_safe_free(self->count);
+    tsk_safe_free(self->sumsq);
+    tsk_safe_free(self->pairs);
+    tsk_safe_free(self->active);
+    tsk_safe_free(self->active_index);
+    tsk_safe_free(self->output);
+    tsk_safe_free(self->last_weight);
+    tsk_safe_free(self->record);
+    tsk_safe_free(self->record_block);
+}
+
+int
+tsk_coalescence_time_table_free(tsk_coalescence_time_table_t *self)
+{
+    tsk_safe_free(self->time);
+    tsk_safe_free(self->window);
+    tsk_safe_free(self->block);
+    tsk_safe_free(self->weights);
+    return 0;
+}
+
+int TSK_WARN_UNUSED
+tsk_treeseq_coalescence_time_table(const tsk_treeseq_t *self, tsk_size_t num_sample_sets,
+    const tsk_size_t *sample_set_sizes, const tsk_id_t *sample_sets,
+    tsk_size_t num_windows, const double *windows, tsk_size_t num_blocks,
+    tsk_flags_t options, tsk_coalescence_time_table_t *result)
+{
+    int ret = 0;
+    const tsk_size_t num_nodes = self->tables->nodes.num_rows;
+    const tsk_id_t num_edges = (tsk_id_t) self->tables->edges.num_rows;
+    const tsk_id_t *restrict O = self->tables->indexes.edge_removal_order;
+    const double *restrict edge_right = self->tables->edges.right;
+    const tsk_id_t *restrict edge_parent = self->tables->edges.parent;
+    const tsk_id_t *restrict edge_child = self->tables->edges.child;
+    const double sequence_length = self->tables->sequence_length;
+    const double default_windows[] = { 0, sequence_length };
+    const tsk_flags_t weight_func
+        = options
+          & (TSK_COALESCENCE_EVENTS | TSK_COALESCENCE_EVENTS_PAIR
+                | TSK_COALESCENCE_EVENTS_TRIO);
+    const bool span_normalise = !!(options & TSK_STAT_SPAN_NORMALISE);
+    coaltime_t state;
+    tsk_id_t *parent = tsk_malloc(num_nodes * sizeof(*parent));
+    tsk_id_t *dirty = tsk_malloc(num_nodes * sizeof(*dirty));
+    bool *is_dirty = tsk_calloc(num_nodes, sizeof(*is_dirty));
+    tsk_size_t j, k, w, num_dirty;
+    tsk_id_t tk, h, u, v;
+    tsk_stat_edge_iter_t edge_iter;
+    double t_left, t_right;
+    bool window_done;
+
+    tsk_memset(result, 0, sizeof(*result));
+    tsk_memset(&state, 0, sizeof(state));
+    if (parent == NULL || dirty == NULL || is_dirty == NULL) {
+        ret = TSK_ERR_NO_MEMORY;
+        goto out;
+    }
+    if (weight_func != TSK_COALESCENCE_EVENTS
+        && weight_func != TSK_COALESCENCE_EVENTS_PAIR
+        && weight_func != TSK_COALESCENCE_EVENTS_TRIO) {
+        ret = TSK_ERR_BAD_PARAM_VALUE;
+        goto out;
+    }
+    if (num_blocks < 1) {
+        ret = TSK_ERR_BAD_PARAM_VALUE;
+        goto out;
+    }
+    if (windows == NULL) {
+        num_windows = 1;
+        windows = default_windows;
+    } else {
+        ret = tsk_treeseq_check_windows(self, num_windows, windows, options);
+        if (ret != 0) {
+            goto out;
+        }
+    }
+    ret = coaltime_init(&state, self, num_sample_sets, sample_set_sizes, sample_sets,
+        weight_func, result);
+    if (ret != 0) {
+        goto out;
+    }
+    tsk_memset(parent, 0xff, num_nodes * sizeof(*parent));
+
+    w = 0;
+    coaltime_start_window(&state, self, 0, windows[0], windows[1], num_blocks);
+    t_left = windows[0];
+    k = tsk_treeseq_get_tree_index_at(self, t_left);
+    tk = tsk_treeseq_get_removal_start(self, t_left);
+    tsk_stat_edge_iter_init(&edge_iter, self, t_left);
+    num_dirty = 0;
+    while (w < num_windows) {
+        while (tk < num_edges && edge_right[O[tk]] == t_left) {
+            h = O[tk];
+            tk++;
+            u = edge_child[h];
+            v = edge_parent[h];
+            ret = coaltime_update_path(
+                &state, u, v, parent, -1, is_dirty, dirty, &num_dirty);
+            if (ret != 0) {
+                goto out;
+            }
+            parent[u] = TSK_NULL;
+            state.num_children[v]--;
+        }
+        while ((h = tsk_stat_edge_iter_next(&edge_iter, t_left)) != TSK_NULL) {
+            u = edge_child[h];
+            v = edge_parent[h];
+            ret = coaltime_update_path(
+                &state, u, v, parent, +1, is_dirty, dirty, &num_dirty);
+            if (ret != 0) {
+                goto out;
+            }
+            parent[u] = v;
+            state.num_children[v]++;
+        }
+        for (j = 0; j < num_dirty; j++) {
+            ret = coaltime_update_node(&state, dirty[j]);
+            if (ret != 0) {
+                goto out;
+            }
+            is_dirty[dirty[j]] = false;
+        }
+        num_dirty = 0;
+
+        /* A tree can intersect several windows */
+        t_right = self->breakpoints[k + 1];
+        while (w < num_windows && windows[w] < t_right) {
+            ret = coaltime_add_tree(&state, k, t_left, t_right, windows[w],
+                windows[w + 1], span_normalise, &window_done);
+            if (ret != 0) {
+                goto out;
+            }
+            if (!window_done) {
+                break;
+            }
+            w++;
+            if (w < num_windows) {
+                coaltime_start_window(
+                    &state, self, (tsk_id_t) w, windows[w], windows[w + 1], num_blocks);
+            }
+        }
+        t_left = t_right;
+        k++;
+    }
+out:
+    coaltime_free(&state);
+    tsk_safe_free(parent);
+    tsk_safe_free(dirty);
+    tsk_safe_free(is_dirty);
+    return ret;
+}
+
 int
 tsk_tree_num_lineages(const tsk_tree_t *self, double t, tsk_size_t *result)
 {
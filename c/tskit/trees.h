@@ -52,6 +52,15 @@ extern "C" {
 #define TSK_STAT_POLARISED               (1 << 10)
 #define TSK_STAT_SPAN_NORMALISE          (1 << 11)
 #define TSK_STAT_ALLOW_TIME_UNCALIBRATED (1 << 12)
+/* The windows cover a contiguous subset of the sequence rather than
+ * starting at zero and ending at the sequence length. This is used to
+ * split the windows of a statistic into chunks computed independently. */
+#define TSK_STAT_PARTIAL_WINDOWS         (1 << 13)
+
+/* Weight functions for tsk_treeseq_coalescence_time_table */
+#define TSK_COALESCENCE_EVENTS      (1 << 0)
+#define TSK_COALESCENCE_EVENTS_PAIR (1 << 1)
+#define TSK_COALESCENCE_EVENTS_TRIO (1 << 2)
 
 /* Options for map_mutations */
 #define TSK_MM_FIXED_ANCESTRAL_STATE (1 << 0)
@@ -912,6 +921,44 @@ int tsk_treeseq_genealogical_nearest_neighbours(const tsk_treeseq_t *self,
 int tsk_treeseq_mean_descendants(const tsk_treeseq_t *self,
     const tsk_id_t *const *reference_sets, const tsk_size_t *reference_set_size,
     tsk_size_t num_reference_sets, tsk_flags_t options, double *ret_array);
+int tsk_treeseq_get_tree_metrics(const tsk_treeseq_t *self, tsk_id_t start,
+    tsk_id_t stop, tsk_flags_t options, double *total_branch_length,
+    tsk_size_t *num_roots, double *tmrca, tsk_size_t *sackin_index,
+    double *colless_index, double *b1_index);
+int tsk_treeseq_tmrca_matrix(const tsk_treeseq_t *self, tsk_size_t num_nodes,
+    const tsk_id_t *nodes, tsk_size_t num_windows, const double *windows,
+    tsk_flags_t options, double *result);
+
+/* The weighted coalescence times in a set of genomic windows. Record j is
+ * the node time[j] in block block[j] of window window[j], with
+ * num_weights weights given by row j of the weights matrix. */
+typedef struct {
+    tsk_size_t num_records;
+    tsk_size_t max_records;
+    tsk_size_t num_weights;
+    double *time;
+    tsk_id_t *window;
+    tsk_id_t *block;
+    double *weights;
+} tsk_coalescence_time_table_t;
+
+/* Computes the table of coalescence times and weights for each window, as
+ * used by the CoalescenceTimeDistribution class in the Python API. Each
+ * window is divided into num_blocks blocks of consecutive trees, and there is
+ * one record for every node that is a coalescence (a non-sample node with at
+ * least two children) in at least one tree of a block. A sample node with
+ * children is counted among the samples below each of its ancestors, in the
+ * same way as a leaf sample. The options specify
+ * one of TSK_COALESCENCE_EVENTS, TSK_COALESCENCE_EVENTS_PAIR and
+ * TSK_COALESCENCE_EVENTS_TRIO for the weights, along with
+ * TSK_STAT_SPAN_NORMALISE and TSK_STAT_PARTIAL_WINDOWS. The result is
+ * initialised by this function and must be freed with
+ * tsk_coalescence_time_table_free regardless of the return value. */
+int tsk_treeseq_coalescence_time_table(const tsk_treeseq_t *self,
+    tsk_size_t num_sample_sets, const tsk_size_t *sample_set_sizes,
+    const tsk_id_t *sample_sets, tsk_size_t num_windows, const double *windows,
+    tsk_size_t num_blocks, tsk_flags_t options, tsk_coalescence_time_table_t *result);
+int tsk_coalescence_time_table_free(tsk_coalescence_time_table_t *self);
 
 typedef int general_stat_func_t(tsk_size_t state_dim, const double *state,
     tsk_size_t result_dim, double *result, void *params);
@@ -920,6 +967,15 @@ int tsk_treeseq_general_stat(const tsk_treeseq_t *self, tsk_size_t K, const doub
     tsk_size_t M, general_stat_func_t *f, void *f_params, tsk_size_t num_windows,
     const double *windows, tsk_flags_t options, double *result);
 
+/* Computes the summaries of num_states state vectors at once, where state
+ * and result are num_states x state_dim and num_states x result_dim arrays. */
+typedef int general_stat_batch_func_t(tsk_size_t state_dim, tsk_size_t num_states,
+    const double *state, tsk_size_t result_dim, double *result, void *params);
+
+int tsk_treeseq_general_stat_batch(const tsk_treeseq_t *self, tsk_size_t K,
+    const double *W, tsk_size_t M, general_stat_batch_func_t *f, void *f_params,
+    tsk_size_t num_windows, const double *windows, tsk_flags_t options, double *result);
+
 /* One way weighted stats */
 
 typedef int one_way_weighted_method(const tsk_treeseq_t *self, tsk_size_t num_weights,
@@ -1208,6 +1264,23 @@ a constant time operation.
 */
 int tsk_tree_seek(tsk_tree_t *self, double position, tsk_flags_t options);
 
+/**
+@brief Seek to a specific tree in a tree sequence.
+
+@rst
+Set the state of this tree to reflect the tree in parent
+tree sequence whose index is ``0 <= tree < num_trees``. This is
+equivalent to seeking to the left coordinate of the tree.
+@endrst
+
+@param self A pointer to an initialised tsk_tree_t object.
+@param tree The target tree index.
+@param options Seek options. Currently unused. Set to 0 for compatibility
+    with future versions of tskit.
+@return Return 0 on success or a negative value on failure.
+*/
+int tsk_tree_seek_index(tsk_tree_t *self, tsk_id_t tree, tsk_flags_t options);
+
 /** @} */
 
 /**
@@ -1492,6 +1565,26 @@ node is :c:macro:`TSK_NULL`.
 */
 int tsk_tree_get_mrca(const tsk_tree_t *self, tsk_id_t u, tsk_id_t v, tsk_id_t *mrca);
 
+/**
+@brief Compute the most recent common ancestors of many pairs of nodes.
+
+@rst
+Equivalent to calling :c:func:`tsk_tree_get_mrca` for each pair
+``(u[j], v[j])``, but builds an index of the tree once so that each
+query takes constant time.
+@endrst
+
+@param self A pointer to a tsk_tree_t object.
+@param num_pairs The number of pairs of nodes.
+@param u An array of ``num_pairs`` tree nodes.
+@param v An array of ``num_pairs`` tree nodes.
+@param mrca An array of ``num_pairs`` tsk_id_t values to store the returned most
+    recent common ancestors.
+@return 0 on success or a negative value on failure.
+*/
+int tsk_tree_get_mrcas(const tsk_tree_t *self, tsk_size_t num_pairs, const tsk_id_t *u,
+    const tsk_id_t *v, tsk_id_t *mrca);
+
 /**
 @brief Returns true if u is a descendant of v.
 
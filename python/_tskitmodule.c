@@ -41,6 +41,11 @@
 #define SET_COLS 0
 #define APPEND_COLS 1
 
+/* Error value returned from Python callbacks if an error occured.
+ * This is chosen so that it is not a valid tskit error code and so can
+ * never be mistaken for a different error */
+#define TSK_PYTHON_CALLBACK_ERROR (-100000)
+
 /* TskitException is the superclass of all exceptions that can be thrown by
  * tskit. We define it here in the low-level library so that exceptions defined
  * here and in the high-level library can inherit from it.
@@ -66,9 +71,16 @@ static PyObject *TskitNoSampleListsError;
  * Because C code executed here represents atomic Python operations
  * (while the GIL is held), this should be safe */
 
+/* A TableCollection either owns its tables, or is a read-only view of the
+ * tables belonging to a TreeSequence. In the latter case, owner holds a
+ * reference to the TreeSequence, which keeps the memory alive. Several IBD
+ * segment streams may run on the tables at once in different threads, so
+ * locked counts the streams in progress rather than being a flag. */
 typedef struct _TableCollection {
     PyObject_HEAD
+    int locked;
     tsk_table_collection_t *tables;
+    PyObject *owner;
 } TableCollection;
 
  /* The table pointer in each of the Table classes either points to locally
@@ -132,6 +144,12 @@ typedef struct {
     TableCollection *tables;
 } ProvenanceTable;
 
+typedef struct {
+    PyObject_HEAD
+    TableCollection *tables;
+    tsk_simplifier_t *simplifier;
+} Simplifier;
+
 typedef struct {
     PyObject_HEAD
     tsk_treeseq_t *tree_sequence;
@@ -145,6 +163,7 @@ typedef struct {
 
 typedef struct {
     PyObject_HEAD
+    bool locked;
     TreeSequence *tree_sequence;
     tsk_variant_t *variant;
 } Variant;
@@ -795,7 +814,7 @@ parse_sample_sets(PyObject *sample_set_sizes, PyArrayObject **ret_sample_set_siz
     uint64_t *a;
 
     sample_set_sizes_array = (PyArrayObject *) PyArray_FROMANY(
-        sample_set_sizes, NPY_UINT64, 1, 1, NPY_ARRAY_IN_ARRAY);
+        sample_set_sizes, NPY_UINT64, 1, 1, NPY_ARRAY_IN_ARRAY | NPY_ARRAY_ENSURECOPY);
     if (sample_set_sizes_array == NULL) {
         goto out;
     }
@@ -810,7 +829,7 @@ parse_sample_sets(PyObject *sample_set_sizes, PyArrayObject **ret_sample_set_siz
     }
 
     sample_sets_array = (PyArrayObject *) PyArray_FROMANY(
-        sample_sets, NPY_INT32, 1, 1, NPY_ARRAY_IN_ARRAY);
+        sample_sets, NPY_INT32, 1, 1, NPY_ARRAY_IN_ARRAY | NPY_ARRAY_ENSURECOPY);
     if (sample_sets_array == NULL) {
         goto out;
     }
@@ -828,14 +847,76 @@ out:
     return ret;
 }
 
+/* Make a new array that is owned by the specified object. */
+static PyObject *
+make_owned_array(PyObject *self, tsk_size_t size, int dtype, void *data)
+{
+    PyObject *ret = NULL;
+    PyArrayObject *array = NULL;
+    npy_intp dims = (npy_intp) size;
+
+    array = (PyArrayObject *) PyArray_SimpleNewFromData(1, &dims, dtype, data);
+    if (array == NULL) {
+        goto out;
+    }
+    PyArray_CLEARFLAGS(array, NPY_ARRAY_WRITEABLE);
+    if (PyArray_SetBaseObject(array, (PyObject *) self) != 0) {
+        goto out;
+    }
+    /* PyArray_SetBaseObject steals a reference, so we have to incref this
+     * object. This makes sure that the instance will stay alive if there
+     * are any arrays that refer to its memory. */
+    Py_INCREF(self);
+    ret = (PyObject *) array;
+    array = NULL;
+out:
+    Py_XDECREF(array);
+    return ret;
+}
+
+/* Returns the object that column arrays should be views into, or NULL
+ * if the arrays should be copies. Only read-only table collections
+ * return views, as the memory of other tables can be reallocated. */
+static PyObject *
+table_view_owner(TableCollection *tables)
+{
+    PyObject *ret = NULL;
+
+    if (tables != NULL && tables->owner != NULL) {
+        ret = (PyObject *) tables;
+    }
+    return ret;
+}
+
+static int
+table_check_write(TableCollection *tables)
+{
+    int ret = 0;
+
+    if (table_view_owner(tables) != NULL) {
+        PyErr_SetString(PyExc_AttributeError,
+            "Tables are a read-only view of a TreeSequence; use "
+            "TreeSequence.dump_tables() to obtain a mutable copy");
+        ret = -1;
+    } else if (tables != NULL && tables->locked > 0) {
+        PyErr_SetString(PyExc_RuntimeError, "TableCollection in use by other thread.");
+        ret = -1;
+    }
+    return ret;
+}
+
 static PyObject *
 table_get_column_array(
-    tsk_size_t num_rows, void *data, int npy_type, size_t element_size)
+    PyObject *owner, tsk_size_t num_rows, void *data, int npy_type, size_t element_size)
 {
     PyObject *ret = NULL;
     PyArrayObject *array;
     npy_intp dims = (npy_intp) num_rows;
 
+    if (owner != NULL) {
+        ret = make_owned_array(owner, num_rows, npy_type, data);
+        goto out;
+    }
     array = (PyArrayObject *) PyArray_EMPTY(1, &dims, npy_type, 0);
     if (array == NULL) {
         goto out;
@@ -847,12 +928,16 @@ out:
 }
 
 static PyObject *
-table_get_offset_array(tsk_size_t num_rows, tsk_size_t *data)
+table_get_offset_array(PyObject *owner, tsk_size_t num_rows, tsk_size_t *data)
 {
     PyObject *ret = NULL;
     PyArrayObject *array;
     npy_intp dims = (npy_intp) num_rows + 1;
 
+    if (owner != NULL) {
+        ret = make_owned_array(owner, num_rows + 1, NPY_UINT64, data);
+        goto out;
+    }
     array = (PyArrayObject *) PyArray_EMPTY(1, &dims, NPY_UINT64, 0);
     if (array == NULL) {
         goto out;
@@ -1034,11 +1119,28 @@ IndividualTable_check_state(IndividualTable *self)
         PyErr_SetString(PyExc_RuntimeError, "IndividualTable in use by other thread.");
         goto out;
     }
+    if (self->tables != NULL && self->tables->locked > 0) {
+        PyErr_SetString(PyExc_RuntimeError, "TableCollection in use by other thread.");
+        goto out;
+    }
     ret = 0;
 out:
     return ret;
 }
 
+static int
+IndividualTable_check_write(IndividualTable *self)
+{
+    int ret = IndividualTable_check_state(self);
+
+    if (ret != 0) {
+        goto out;
+    }
+    ret = table_check_write(self->tables);
+out:
+    return ret;
+}
+
 static void
 IndividualTable_dealloc(IndividualTable *self)
 {
@@ -1105,7 +1207,7 @@ IndividualTable_add_row(IndividualTable *self, PyObject *args, PyObject *kwds)
     npy_intp *shape;
     static char *kwlist[] = { "flags", "location", "parents", "metadata", NULL };
 
-    if (IndividualTable_check_state(self) != 0) {
+    if (IndividualTable_check_write(self) != 0) {
         goto out;
     }
     if (!PyArg_ParseTupleAndKeywords(args, kwds, "|O&OOO", kwlist, &uint32_converter,
@@ -1175,7 +1277,7 @@ IndividualTable_update_row(IndividualTable *self, PyObject *args, PyObject *kwds
     static char *kwlist[]
         = { "row_index", "flags", "location", "parents", "metadata", NULL };
 
-    if (IndividualTable_check_state(self) != 0) {
+    if (IndividualTable_check_write(self) != 0) {
         goto out;
     }
     if (!PyArg_ParseTupleAndKeywords(args, kwds, "O&|O&OOO", kwlist, &tsk_id_converter,
@@ -1286,7 +1388,7 @@ IndividualTable_parse_dict_arg(IndividualTable *self, PyObject *args, bool clear
     PyObject *ret = NULL;
     PyObject *dict = NULL;
 
-    if (IndividualTable_check_state(self) != 0) {
+    if (IndividualTable_check_write(self) != 0) {
         goto out;
     }
     if (!PyArg_ParseTuple(args, "O!", &PyDict_Type, &dict)) {
@@ -1319,7 +1421,7 @@ IndividualTable_clear(IndividualTable *self)
     PyObject *ret = NULL;
     int err;
 
-    if (IndividualTable_check_state(self) != 0) {
+    if (IndividualTable_check_write(self) != 0) {
         goto out;
     }
     err = tsk_individual_table_clear(self->table);
@@ -1339,7 +1441,7 @@ IndividualTable_truncate(IndividualTable *self, PyObject *args)
     Py_ssize_t num_rows;
     int err;
 
-    if (IndividualTable_check_state(self) != 0) {
+    if (IndividualTable_check_write(self) != 0) {
         goto out;
     }
     if (!PyArg_ParseTuple(args, "n", &num_rows)) {
@@ -1368,7 +1470,7 @@ IndividualTable_extend(IndividualTable *self, PyObject *args, PyObject *kwds)
     int err;
     static char *kwlist[] = { "other", "row_indexes", NULL };
 
-    if (IndividualTable_check_state(self) != 0) {
+    if (IndividualTable_check_write(self) != 0) {
         goto out;
     }
     if (!PyArg_ParseTupleAndKeywords(args, kwds, "O!O&", kwlist, &IndividualTableType,
@@ -1404,7 +1506,7 @@ IndividualTable_keep_rows(IndividualTable *self, PyObject *args)
 {
     PyObject *ret = NULL;
 
-    if (IndividualTable_check_state(self) != 0) {
+    if (IndividualTable_check_write(self) != 0) {
         goto out;
     }
     ret = table_keep_rows(args, (void *) self->table, self->table->num_rows,
@@ -1457,8 +1559,8 @@ IndividualTable_get_flags(IndividualTable *self, void *closure)
     if (IndividualTable_check_state(self) != 0) {
         goto out;
     }
-    ret = table_get_column_array(
-        self->table->num_rows, self->table->flags, NPY_UINT32, sizeof(uint32_t));
+    ret = table_get_column_array(table_view_owner(self->tables), self->table->num_rows,
+        self->table->flags, NPY_UINT32, sizeof(uint32_t));
 out:
     return ret;
 }
@@ -1471,8 +1573,9 @@ IndividualTable_get_location(IndividualTable *self, void *closure)
     if (IndividualTable_check_state(self) != 0) {
         goto out;
     }
-    ret = table_get_column_array(self->table->location_length, self->table->location,
-        NPY_FLOAT64, sizeof(double));
+    ret = table_get_column_array(table_view_owner(self->tables),
+        self->table->location_length, self->table->location, NPY_FLOAT64,
+        sizeof(double));
 out:
     return ret;
 }
@@ -1485,7 +1588,8 @@ IndividualTable_get_location_offset(IndividualTable *self, void *closure)
     if (IndividualTable_check_state(self) != 0) {
         goto out;
     }
-    ret = table_get_offset_array(self->table->num_rows, self->table->location_offset);
+    ret = table_get_offset_array(table_view_owner(self->tables), self->table->num_rows,
+        self->table->location_offset);
 out:
     return ret;
 }
@@ -1498,7 +1602,7 @@ IndividualTable_get_parents(IndividualTable *self, void *closure)
     if (IndividualTable_check_state(self) != 0) {
         goto out;
     }
-    ret = table_get_column_array(
+    ret = table_get_column_array(table_view_owner(self->tables),
         self->table->parents_length, self->table->parents, NPY_INT32, sizeof(tsk_id_t));
 out:
     return ret;
@@ -1512,7 +1616,8 @@ IndividualTable_get_parents_offset(IndividualTable *self, void *closure)
     if (IndividualTable_check_state(self) != 0) {
         goto out;
     }
-    ret = table_get_offset_array(self->table->num_rows, self->table->parents_offset);
+    ret = table_get_offset_array(table_view_owner(self->tables), self->table->num_rows,
+        self->table->parents_offset);
 out:
     return ret;
 }
@@ -1525,7 +1630,7 @@ IndividualTable_get_metadata(IndividualTable *self, void *closure)
     if (IndividualTable_check_state(self) != 0) {
         goto out;
     }
-    ret = table_get_column_array(
+    ret = table_get_column_array(table_view_owner(self->tables),
         self->table->metadata_length, self->table->metadata, NPY_INT8, sizeof(char));
 out:
     return ret;
@@ -1539,7 +1644,8 @@ IndividualTable_get_metadata_offset(IndividualTable *self, void *closure)
     if (IndividualTable_check_state(self) != 0) {
         goto out;
     }
-    ret = table_get_offset_array(self->table->num_rows, self->table->metadata_offset);
+    ret = table_get_offset_array(table_view_owner(self->tables), self->table->num_rows,
+        self->table->metadata_offset);
 out:
     return ret;
 }
@@ -1566,7 +1672,7 @@ IndividualTable_set_metadata_schema(IndividualTable *self, PyObject *arg, void *
     const char *metadata_schema;
     Py_ssize_t metadata_schema_length;
 
-    if (IndividualTable_check_state(self) != 0) {
+    if (IndividualTable_check_write(self) != 0) {
         goto out;
     }
     metadata_schema = parse_unicode_arg(arg, &metadata_schema_length);
@@ -1698,11 +1804,28 @@ NodeTable_check_state(NodeTable *self)
         PyErr_SetString(PyExc_RuntimeError, "NodeTable in use by other thread.");
         goto out;
     }
+    if (self->tables != NULL && self->tables->locked > 0) {
+        PyErr_SetString(PyExc_RuntimeError, "TableCollection in use by other thread.");
+        goto out;
+    }
     ret = 0;
 out:
     return ret;
 }
 
+static int
+NodeTable_check_write(NodeTable *self)
+{
+    int ret = NodeTable_check_state(self);
+
+    if (ret != 0) {
+        goto out;
+    }
+    ret = table_check_write(self->tables);
+out:
+    return ret;
+}
+
 static void
 NodeTable_dealloc(NodeTable *self)
 {
@@ -1765,7 +1888,7 @@ NodeTable_add_row(NodeTable *self, PyObject *args, PyObject *kwds)
     static char *kwlist[]
         = { "flags", "time", "population", "individual", "metadata", NULL };
 
-    if (NodeTable_check_state(self) != 0) {
+    if (NodeTable_check_write(self) != 0) {
         goto out;
     }
     if (!PyArg_ParseTupleAndKeywords(args, kwds, "|O&dO&O&O", kwlist, &uint32_converter,
@@ -1805,7 +1928,7 @@ NodeTable_update_row(NodeTable *self, PyObject *args, PyObject *kwds)
     static char *kwlist[]
         = { "row_index", "flags", "time", "population", "individual", "metadata", NULL };
 
-    if (NodeTable_check_state(self) != 0) {
+    if (NodeTable_check_write(self) != 0) {
         goto out;
     }
     if (!PyArg_ParseTupleAndKeywords(args, kwds, "O&|O&dO&O&O", kwlist,
@@ -1891,7 +2014,7 @@ NodeTable_parse_dict_arg(NodeTable *self, PyObject *args, bool clear_table)
     PyObject *ret = NULL;
     PyObject *dict = NULL;
 
-    if (NodeTable_check_state(self) != 0) {
+    if (NodeTable_check_write(self) != 0) {
         goto out;
     }
     if (!PyArg_ParseTuple(args, "O!", &PyDict_Type, &dict)) {
@@ -1924,7 +2047,7 @@ NodeTable_clear(NodeTable *self)
     PyObject *ret = NULL;
     int err;
 
-    if (NodeTable_check_state(self) != 0) {
+    if (NodeTable_check_write(self) != 0) {
         goto out;
     }
     err = tsk_node_table_clear(self->table);
@@ -1944,7 +2067,7 @@ NodeTable_truncate(NodeTable *self, PyObject *args)
     Py_ssize_t num_rows;
     int err;
 
-    if (NodeTable_check_state(self) != 0) {
+    if (NodeTable_check_write(self) != 0) {
         goto out;
     }
     if (!PyArg_ParseTuple(args, "n", &num_rows)) {
@@ -1973,7 +2096,7 @@ NodeTable_extend(NodeTable *self, PyObject *args, PyObject *kwds)
     int err;
     static char *kwlist[] = { "other", "row_indexes", NULL };
 
-    if (NodeTable_check_state(self) != 0) {
+    if (NodeTable_check_write(self) != 0) {
         goto out;
     }
     if (!PyArg_ParseTupleAndKeywords(args, kwds, "O!O&", kwlist, &NodeTableType, &other,
@@ -2008,7 +2131,7 @@ NodeTable_keep_rows(NodeTable *self, PyObject *args)
 {
     PyObject *ret = NULL;
 
-    if (NodeTable_check_state(self) != 0) {
+    if (NodeTable_check_write(self) != 0) {
         goto out;
     }
     ret = table_keep_rows(
@@ -2061,8 +2184,8 @@ NodeTable_get_time(NodeTable *self, void *closure)
     if (NodeTable_check_state(self) != 0) {
         goto out;
     }
-    ret = table_get_column_array(
-        self->table->num_rows, self->table->time, NPY_FLOAT64, sizeof(double));
+    ret = table_get_column_array(table_view_owner(self->tables), self->table->num_rows,
+        self->table->time, NPY_FLOAT64, sizeof(double));
 out:
     return ret;
 }
@@ -2075,8 +2198,8 @@ NodeTable_get_flags(NodeTable *self, void *closure)
     if (NodeTable_check_state(self) != 0) {
         goto out;
     }
-    ret = table_get_column_array(
-        self->table->num_rows, self->table->flags, NPY_UINT32, sizeof(uint32_t));
+    ret = table_get_column_array(table_view_owner(self->tables), self->table->num_rows,
+        self->table->flags, NPY_UINT32, sizeof(uint32_t));
 out:
     return ret;
 }
@@ -2089,8 +2212,8 @@ NodeTable_get_population(NodeTable *self, void *closure)
     if (NodeTable_check_state(self) != 0) {
         goto out;
     }
-    ret = table_get_column_array(
-        self->table->num_rows, self->table->population, NPY_INT32, sizeof(int32_t));
+    ret = table_get_column_array(table_view_owner(self->tables), self->table->num_rows,
+        self->table->population, NPY_INT32, sizeof(int32_t));
 out:
     return ret;
 }
@@ -2103,8 +2226,8 @@ NodeTable_get_individual(NodeTable *self, void *closure)
     if (NodeTable_check_state(self) != 0) {
         goto out;
     }
-    ret = table_get_column_array(
-        self->table->num_rows, self->table->individual, NPY_INT32, sizeof(int32_t));
+    ret = table_get_column_array(table_view_owner(self->tables), self->table->num_rows,
+        self->table->individual, NPY_INT32, sizeof(int32_t));
 out:
     return ret;
 }
@@ -2117,7 +2240,7 @@ NodeTable_get_metadata(NodeTable *self, void *closure)
     if (NodeTable_check_state(self) != 0) {
         goto out;
     }
-    ret = table_get_column_array(
+    ret = table_get_column_array(table_view_owner(self->tables),
         self->table->metadata_length, self->table->metadata, NPY_INT8, sizeof(char));
 out:
     return ret;
@@ -2131,7 +2254,8 @@ NodeTable_get_metadata_offset(NodeTable *self, void *closure)
     if (NodeTable_check_state(self) != 0) {
         goto out;
     }
-    ret = table_get_offset_array(self->table->num_rows, self->table->metadata_offset);
+    ret = table_get_offset_array(table_view_owner(self->tables), self->table->num_rows,
+        self->table->metadata_offset);
 out:
     return ret;
 }
@@ -2158,7 +2282,7 @@ NodeTable_set_metadata_schema(NodeTable *self, PyObject *arg, void *closure)
     const char *metadata_schema;
     Py_ssize_t metadata_schema_length;
 
-    if (NodeTable_check_state(self) != 0) {
+    if (NodeTable_check_write(self) != 0) {
         goto out;
     }
     metadata_schema = parse_unicode_arg(arg, &metadata_schema_length);
@@ -2284,11 +2408,28 @@ EdgeTable_check_state(EdgeTable *self)
         PyErr_SetString(PyExc_RuntimeError, "EdgeTable in use by other thread.");
         goto out;
     }
+    if (self->tables != NULL && self->tables->locked > 0) {
+        PyErr_SetString(PyExc_RuntimeError, "TableCollection in use by other thread.");
+        goto out;
+    }
     ret = 0;
 out:
     return ret;
 }
 
+static int
+EdgeTable_check_write(EdgeTable *self)
+{
+    int ret = EdgeTable_check_state(self);
+
+    if (ret != 0) {
+        goto out;
+    }
+    ret = table_check_write(self->tables);
+out:
+    return ret;
+}
+
 static void
 EdgeTable_dealloc(EdgeTable *self)
 {
@@ -2346,7 +2487,7 @@ EdgeTable_add_row(EdgeTable *self, PyObject *args, PyObject *kwds)
     Py_ssize_t metadata_length = 0;
     static char *kwlist[] = { "left", "right", "parent", "child", "metadata", NULL };
 
-    if (EdgeTable_check_state(self) != 0) {
+    if (EdgeTable_check_write(self) != 0) {
         goto out;
     }
     if (!PyArg_ParseTupleAndKeywords(args, kwds, "ddO&O&|O", kwlist, &left, &right,
@@ -2383,7 +2524,7 @@ EdgeTable_update_row(EdgeTable *self, PyObject *args, PyObject *kwds)
     static char *kwlist[]
         = { "row_index", "left", "right", "parent", "child", "metadata", NULL };
 
-    if (EdgeTable_check_state(self) != 0) {
+    if (EdgeTable_check_write(self) != 0) {
         goto out;
     }
     if (!PyArg_ParseTupleAndKeywords(args, kwds, "O&ddO&O&|O", kwlist, &tsk_id_converter,
@@ -2468,7 +2609,7 @@ EdgeTable_parse_dict_arg(EdgeTable *self, PyObject *args, bool clear_table)
     PyObject *ret = NULL;
     PyObject *dict = NULL;
 
-    if (EdgeTable_check_state(self) != 0) {
+    if (EdgeTable_check_write(self) != 0) {
         goto out;
     }
     if (!PyArg_ParseTuple(args, "O!", &PyDict_Type, &dict)) {
@@ -2501,7 +2642,7 @@ EdgeTable_clear(EdgeTable *self)
     PyObject *ret = NULL;
     int err;
 
-    if (EdgeTable_check_state(self) != 0) {
+    if (EdgeTable_check_write(self) != 0) {
         goto out;
     }
     err = tsk_edge_table_clear(self->table);
@@ -2521,7 +2662,7 @@ EdgeTable_truncate(EdgeTable *self, PyObject *args)
     Py_ssize_t num_rows;
     int err;
 
-    if (EdgeTable_check_state(self) != 0) {
+    if (EdgeTable_check_write(self) != 0) {
         goto out;
     }
     if (!PyArg_ParseTuple(args, "n", &num_rows)) {
@@ -2547,7 +2688,7 @@ EdgeTable_squash(EdgeTable *self)
     PyObject *ret = NULL;
     int err;
 
-    if (EdgeTable_check_state(self) != 0) {
+    if (EdgeTable_check_write(self) != 0) {
         goto out;
     }
     err = tsk_edge_table_squash(self->table);
@@ -2569,7 +2710,7 @@ EdgeTable_extend(EdgeTable *self, PyObject *args, PyObject *kwds)
     int err;
     static char *kwlist[] = { "other", "row_indexes", NULL };
 
-    if (EdgeTable_check_state(self) != 0) {
+    if (EdgeTable_check_write(self) != 0) {
         goto out;
     }
     if (!PyArg_ParseTupleAndKeywords(args, kwds, "O!O&", kwlist, &EdgeTableType, &other,
@@ -2604,7 +2745,7 @@ EdgeTable_keep_rows(EdgeTable *self, PyObject *args)
 {
     PyObject *ret = NULL;
 
-    if (EdgeTable_check_state(self) != 0) {
+    if (EdgeTable_check_write(self) != 0) {
         goto out;
     }
     ret = table_keep_rows(
@@ -2657,8 +2798,8 @@ EdgeTable_get_left(EdgeTable *self, void *closure)
     if (EdgeTable_check_state(self) != 0) {
         goto out;
     }
-    ret = table_get_column_array(
-        self->table->num_rows, self->table->left, NPY_FLOAT64, sizeof(double));
+    ret = table_get_column_array(table_view_owner(self->tables), self->table->num_rows,
+        self->table->left, NPY_FLOAT64, sizeof(double));
 out:
     return ret;
 }
@@ -2671,8 +2812,8 @@ EdgeTable_get_right(EdgeTable *self, void *closure)
     if (EdgeTable_check_state(self) != 0) {
         goto out;
     }
-    ret = table_get_column_array(
-        self->table->num_rows, self->table->right, NPY_FLOAT64, sizeof(double));
+    ret = table_get_column_array(table_view_owner(self->tables), self->table->num_rows,
+        self->table->right, NPY_FLOAT64, sizeof(double));
 out:
     return ret;
 }
@@ -2685,8 +2826,8 @@ EdgeTable_get_parent(EdgeTable *self, void *closure)
     if (EdgeTable_check_state(self) != 0) {
         goto out;
     }
-    ret = table_get_column_array(
-        self->table->num_rows, self->table->parent, NPY_INT32, sizeof(int32_t));
+    ret = table_get_column_array(table_view_owner(self->tables), self->table->num_rows,
+        self->table->parent, NPY_INT32, sizeof(int32_t));
 out:
     return ret;
 }
@@ -2699,8 +2840,8 @@ EdgeTable_get_child(EdgeTable *self, void *closure)
     if (EdgeTable_check_state(self) != 0) {
         goto out;
     }
-    ret = table_get_column_array(
-        self->table->num_rows, self->table->child, NPY_INT32, sizeof(int32_t));
+    ret = table_get_column_array(table_view_owner(self->tables), self->table->num_rows,
+        self->table->child, NPY_INT32, sizeof(int32_t));
 out:
     return ret;
 }
@@ -2713,7 +2854,7 @@ EdgeTable_get_metadata(EdgeTable *self, void *closure)
     if (EdgeTable_check_state(self) != 0) {
         goto out;
     }
-    ret = table_get_column_array(
+    ret = table_get_column_array(table_view_owner(self->tables),
         self->table->metadata_length, self->table->metadata, NPY_INT8, sizeof(char));
 out:
     return ret;
@@ -2727,7 +2868,8 @@ EdgeTable_get_metadata_offset(EdgeTable *self, void *closure)
     if (EdgeTable_check_state(self) != 0) {
         goto out;
     }
-    ret = table_get_offset_array(self->table->num_rows, self->table->metadata_offset);
+    ret = table_get_offset_array(table_view_owner(self->tables), self->table->num_rows,
+        self->table->metadata_offset);
 out:
     return ret;
 }
@@ -2754,7 +2896,7 @@ EdgeTable_set_metadata_schema(EdgeTable *self, PyObject *arg, void *closure)
     const char *metadata_schema;
     Py_ssize_t metadata_schema_length;
 
-    if (EdgeTable_check_state(self) != 0) {
+    if (EdgeTable_check_write(self) != 0) {
         goto out;
     }
     metadata_schema = parse_unicode_arg(arg, &metadata_schema_length);
@@ -2881,11 +3023,28 @@ MigrationTable_check_state(MigrationTable *self)
         PyErr_SetString(PyExc_RuntimeError, "MigrationTable in use by other thread.");
         goto out;
     }
+    if (self->tables != NULL && self->tables->locked > 0) {
+        PyErr_SetString(PyExc_RuntimeError, "TableCollection in use by other thread.");
+        goto out;
+    }
     ret = 0;
 out:
     return ret;
 }
 
+static int
+MigrationTable_check_write(MigrationTable *self)
+{
+    int ret = MigrationTable_check_state(self);
+
+    if (ret != 0) {
+        goto out;
+    }
+    ret = table_check_write(self->tables);
+out:
+    return ret;
+}
+
 static void
 MigrationTable_dealloc(MigrationTable *self)
 {
@@ -2944,7 +3103,7 @@ MigrationTable_add_row(MigrationTable *self, PyObject *args, PyObject *kwds)
     static char *kwlist[]
         = { "left", "right", "node", "source", "dest", "time", "metadata", NULL };
 
-    if (MigrationTable_check_state(self) != 0) {
+    if (MigrationTable_check_write(self) != 0) {
         goto out;
     }
     if (!PyArg_ParseTupleAndKeywords(args, kwds, "ddO&O&O&d|O", kwlist, &left, &right,
@@ -2982,7 +3141,7 @@ MigrationTable_update_row(MigrationTable *self, PyObject *args, PyObject *kwds)
     static char *kwlist[] = { "row_index", "left", "right", "node", "source", "dest",
         "time", "metadata", NULL };
 
-    if (MigrationTable_check_state(self) != 0) {
+    if (MigrationTable_check_write(self) != 0) {
         goto out;
     }
     if (!PyArg_ParseTupleAndKeywords(args, kwds, "O&ddO&O&O&d|O", kwlist,
@@ -3068,7 +3227,7 @@ MigrationTable_parse_dict_arg(MigrationTable *self, PyObject *args, bool clear_t
     PyObject *ret = NULL;
     PyObject *dict = NULL;
 
-    if (MigrationTable_check_state(self) != 0) {
+    if (MigrationTable_check_write(self) != 0) {
         goto out;
     }
     if (!PyArg_ParseTuple(args, "O!", &PyDict_Type, &dict)) {
@@ -3101,7 +3260,7 @@ MigrationTable_clear(MigrationTable *self)
     PyObject *ret = NULL;
     int err;
 
-    if (MigrationTable_check_state(self) != 0) {
+    if (MigrationTable_check_write(self) != 0) {
         goto out;
     }
     err = tsk_migration_table_clear(self->table);
@@ -3121,7 +3280,7 @@ MigrationTable_truncate(MigrationTable *self, PyObject *args)
     Py_ssize_t num_rows;
     int err;
 
-    if (MigrationTable_check_state(self) != 0) {
+    if (MigrationTable_check_write(self) != 0) {
         goto out;
     }
     if (!PyArg_ParseTuple(args, "n", &num_rows)) {
@@ -3150,7 +3309,7 @@ MigrationTable_extend(MigrationTable *self, PyObject *args, PyObject *kwds)
     int err;
     static char *kwlist[] = { "other", "row_indexes", NULL };
 
-    if (MigrationTable_check_state(self) != 0) {
+    if (MigrationTable_check_write(self) != 0) {
         goto out;
     }
     if (!PyArg_ParseTupleAndKeywords(args, kwds, "O!O&", kwlist, &MigrationTableType,
@@ -3186,7 +3345,7 @@ MigrationTable_keep_rows(MigrationTable *self, PyObject *args)
 {
     PyObject *ret = NULL;
 
-    if (MigrationTable_check_state(self) != 0) {
+    if (MigrationTable_check_write(self) != 0) {
         goto out;
     }
     ret = table_keep_rows(args, (void *) self->table, self->table->num_rows,
@@ -3239,8 +3398,8 @@ MigrationTable_get_left(MigrationTable *self, void *closure)
     if (MigrationTable_check_state(self) != 0) {
         goto out;
     }
-    ret = table_get_column_array(
-        self->table->num_rows, self->table->left, NPY_FLOAT64, sizeof(double));
+    ret = table_get_column_array(table_view_owner(self->tables), self->table->num_rows,
+        self->table->left, NPY_FLOAT64, sizeof(double));
 out:
     return ret;
 }
@@ -3253,8 +3412,8 @@ MigrationTable_get_right(MigrationTable *self, void *closure)
     if (MigrationTable_check_state(self) != 0) {
         goto out;
     }
-    ret = table_get_column_array(
-        self->table->num_rows, self->table->right, NPY_FLOAT64, sizeof(double));
+    ret = table_get_column_array(table_view_owner(self->tables), self->table->num_rows,
+        self->table->right, NPY_FLOAT64, sizeof(double));
 out:
     return ret;
 }
@@ -3267,8 +3426,8 @@ MigrationTable_get_time(MigrationTable *self, void *closure)
     if (MigrationTable_check_state(self) != 0) {
         goto out;
     }
-    ret = table_get_column_array(
-        self->table->num_rows, self->table->time, NPY_FLOAT64, sizeof(double));
+    ret = table_get_column_array(table_view_owner(self->tables), self->table->num_rows,
+        self->table->time, NPY_FLOAT64, sizeof(double));
 out:
     return ret;
 }
@@ -3281,8 +3440,8 @@ MigrationTable_get_node(MigrationTable *self, void *closure)
     if (MigrationTable_check_state(self) != 0) {
         goto out;
     }
-    ret = table_get_column_array(
-        self->table->num_rows, self->table->node, NPY_INT32, sizeof(int32_t));
+    ret = table_get_column_array(table_view_owner(self->tables), self->table->num_rows,
+        self->table->node, NPY_INT32, sizeof(int32_t));
 out:
     return ret;
 }
@@ -3295,8 +3454,8 @@ MigrationTable_get_source(MigrationTable *self, void *closure)
     if (MigrationTable_check_state(self) != 0) {
         goto out;
     }
-    ret = table_get_column_array(
-        self->table->num_rows, self->table->source, NPY_INT32, sizeof(int32_t));
+    ret = table_get_column_array(table_view_owner(self->tables), self->table->num_rows,
+        self->table->source, NPY_INT32, sizeof(int32_t));
 out:
     return ret;
 }
@@ -3309,8 +3468,8 @@ MigrationTable_get_dest(MigrationTable *self, void *closure)
     if (MigrationTable_check_state(self) != 0) {
         goto out;
     }
-    ret = table_get_column_array(
-        self->table->num_rows, self->table->dest, NPY_INT32, sizeof(int32_t));
+    ret = table_get_column_array(table_view_owner(self->tables), self->table->num_rows,
+        self->table->dest, NPY_INT32, sizeof(int32_t));
 out:
     return ret;
 }
@@ -3323,7 +3482,7 @@ MigrationTable_get_metadata(MigrationTable *self, void *closure)
     if (MigrationTable_check_state(self) != 0) {
         goto out;
     }
-    ret = table_get_column_array(
+    ret = table_get_column_array(table_view_owner(self->tables),
         self->table->metadata_length, self->table->metadata, NPY_INT8, sizeof(char));
 out:
     return ret;
@@ -3337,7 +3496,8 @@ MigrationTable_get_metadata_offset(MigrationTable *self, void *closure)
     if (MigrationTable_check_state(self) != 0) {
         goto out;
     }
-    ret = table_get_offset_array(self->table->num_rows, self->table->metadata_offset);
+    ret = table_get_offset_array(table_view_owner(self->tables), self->table->num_rows,
+        self->table->metadata_offset);
 out:
     return ret;
 }
@@ -3364,7 +3524,7 @@ MigrationTable_set_metadata_schema(MigrationTable *self, PyObject *arg, void *cl
     const char *metadata_schema;
     Py_ssize_t metadata_schema_length;
 
-    if (MigrationTable_check_state(self) != 0) {
+    if (MigrationTable_check_write(self) != 0) {
         goto out;
     }
     metadata_schema = parse_unicode_arg(arg, &metadata_schema_length);
@@ -3492,11 +3652,28 @@ SiteTable_check_state(SiteTable *self)
         PyErr_SetString(PyExc_RuntimeError, "SiteTable in use by other thread.");
         goto out;
     }
+    if (self->tables != NULL && self->tables->locked > 0) {
+        PyErr_SetString(PyExc_RuntimeError, "TableCollection in use by other thread.");
+        goto out;
+    }
     ret = 0;
 out:
     return ret;
 }
 
+static int
+SiteTable_check_write(SiteTable *self)
+{
+    int ret = SiteTable_check_state(self);
+
+    if (ret != 0) {
+        goto out;
+    }
+    ret = table_check_write(self->tables);
+out:
+    return ret;
+}
+
 static void
 SiteTable_dealloc(SiteTable *self)
 {
@@ -3555,7 +3732,7 @@ SiteTable_add_row(SiteTable *self, PyObject *args, PyObject *kwds)
     Py_ssize_t metadata_length = 0;
     static char *kwlist[] = { "position", "ancestral_state", "metadata", NULL };
 
-    if (SiteTable_check_state(self) != 0) {
+    if (SiteTable_check_write(self) != 0) {
         goto out;
     }
     if (!PyArg_ParseTupleAndKeywords(args, kwds, "ds#|O", kwlist, &position,
@@ -3593,7 +3770,7 @@ SiteTable_update_row(SiteTable *self, PyObject *args, PyObject *kwds)
     static char *kwlist[]
         = { "row_index", "position", "ancestral_state", "metadata", NULL };
 
-    if (SiteTable_check_state(self) != 0) {
+    if (SiteTable_check_write(self) != 0) {
         goto out;
     }
     if (!PyArg_ParseTupleAndKeywords(args, kwds, "O&ds#|O", kwlist, &tsk_id_converter,
@@ -3678,7 +3855,7 @@ SiteTable_parse_dict_arg(SiteTable *self, PyObject *args, bool clear_table)
     PyObject *ret = NULL;
     PyObject *dict = NULL;
 
-    if (SiteTable_check_state(self) != 0) {
+    if (SiteTable_check_write(self) != 0) {
         goto out;
     }
     if (!PyArg_ParseTuple(args, "O!", &PyDict_Type, &dict)) {
@@ -3711,7 +3888,7 @@ SiteTable_clear(SiteTable *self)
     PyObject *ret = NULL;
     int err;
 
-    if (SiteTable_check_state(self) != 0) {
+    if (SiteTable_check_write(self) != 0) {
         goto out;
     }
     err = tsk_site_table_clear(self->table);
@@ -3731,7 +3908,7 @@ SiteTable_truncate(SiteTable *self, PyObject *args)
     Py_ssize_t num_rows;
     int err;
 
-    if (SiteTable_check_state(self) != 0) {
+    if (SiteTable_check_write(self) != 0) {
         goto out;
     }
     if (!PyArg_ParseTuple(args, "n", &num_rows)) {
@@ -3760,7 +3937,7 @@ SiteTable_extend(SiteTable *self, PyObject *args, PyObject *kwds)
     int err;
     static char *kwlist[] = { "other", "row_indexes", NULL };
 
-    if (SiteTable_check_state(self) != 0) {
+    if (SiteTable_check_write(self) != 0) {
         goto out;
     }
     if (!PyArg_ParseTupleAndKeywords(args, kwds, "O!O&", kwlist, &SiteTableType, &other,
@@ -3795,7 +3972,7 @@ SiteTable_keep_rows(SiteTable *self, PyObject *args)
 {
     PyObject *ret = NULL;
 
-    if (SiteTable_check_state(self) != 0) {
+    if (SiteTable_check_write(self) != 0) {
         goto out;
     }
     ret = table_keep_rows(
@@ -3848,8 +4025,8 @@ SiteTable_get_position(SiteTable *self, void *closure)
     if (SiteTable_check_state(self) != 0) {
         goto out;
     }
-    ret = table_get_column_array(
-        self->table->num_rows, self->table->position, NPY_FLOAT64, sizeof(double));
+    ret = table_get_column_array(table_view_owner(self->tables), self->table->num_rows,
+        self->table->position, NPY_FLOAT64, sizeof(double));
 out:
     return ret;
 }
@@ -3862,8 +4039,9 @@ SiteTable_get_ancestral_state(SiteTable *self, void *closure)
     if (SiteTable_check_state(self) != 0) {
         goto out;
     }
-    ret = table_get_column_array(self->table->ancestral_state_length,
-        self->table->ancestral_state, NPY_INT8, sizeof(char));
+    ret = table_get_column_array(table_view_owner(self->tables),
+        self->table->ancestral_state_length, self->table->ancestral_state, NPY_INT8,
+        sizeof(char));
 out:
     return ret;
 }
@@ -3876,8 +4054,8 @@ SiteTable_get_ancestral_state_offset(SiteTable *self, void *closure)
     if (SiteTable_check_state(self) != 0) {
         goto out;
     }
-    ret = table_get_offset_array(
-        self->table->num_rows, self->table->ancestral_state_offset);
+    ret = table_get_offset_array(table_view_owner(self->tables), self->table->num_rows,
+        self->table->ancestral_state_offset);
 out:
     return ret;
 }
@@ -3890,7 +4068,7 @@ SiteTable_get_metadata(SiteTable *self, void *closure)
     if (SiteTable_check_state(self) != 0) {
         goto out;
     }
-    ret = table_get_column_array(
+    ret = table_get_column_array(table_view_owner(self->tables),
         self->table->metadata_length, self->table->metadata, NPY_INT8, sizeof(char));
 out:
     return ret;
@@ -3904,7 +4082,8 @@ SiteTable_get_metadata_offset(SiteTable *self, void *closure)
     if (SiteTable_check_state(self) != 0) {
         goto out;
     }
-    ret = table_get_offset_array(self->table->num_rows, self->table->metadata_offset);
+    ret = table_get_offset_array(table_view_owner(self->tables), self->table->num_rows,
+        self->table->metadata_offset);
 out:
     return ret;
 }
@@ -3931,7 +4110,7 @@ SiteTable_set_metadata_schema(SiteTable *self, PyObject *arg, void *closure)
     const char *metadata_schema;
     Py_ssize_t metadata_schema_length;
 
-    if (SiteTable_check_state(self) != 0) {
+    if (SiteTable_check_write(self) != 0) {
         goto out;
     }
     metadata_schema = parse_unicode_arg(arg, &metadata_schema_length);
@@ -4058,11 +4237,28 @@ MutationTable_check_state(MutationTable *self)
         PyErr_SetString(PyExc_RuntimeError, "MutationTable in use by other thread.");
         goto out;
     }
+    if (self->tables != NULL && self->tables->locked > 0) {
+        PyErr_SetString(PyExc_RuntimeError, "TableCollection in use by other thread.");
+        goto out;
+    }
     ret = 0;
 out:
     return ret;
 }
 
+static int
+MutationTable_check_write(MutationTable *self)
+{
+    int ret = MutationTable_check_state(self);
+
+    if (ret != 0) {
+        goto out;
+    }
+    ret = table_check_write(self->tables);
+out:
+    return ret;
+}
+
 static void
 MutationTable_dealloc(MutationTable *self)
 {
@@ -4124,7 +4320,7 @@ MutationTable_add_row(MutationTable *self, PyObject *args, PyObject *kwds)
     static char *kwlist[]
         = { "site", "node", "derived_state", "parent", "metadata", "time", NULL };
 
-    if (MutationTable_check_state(self) != 0) {
+    if (MutationTable_check_write(self) != 0) {
         goto out;
     }
     if (!PyArg_ParseTupleAndKeywords(args, kwds, "O&O&s#|O&Od", kwlist,
@@ -4165,7 +4361,7 @@ MutationTable_update_row(MutationTable *self, PyObject *args, PyObject *kwds)
     static char *kwlist[] = { "row_index", "site", "node", "derived_state", "parent",
         "metadata", "time", NULL };
 
-    if (MutationTable_check_state(self) != 0) {
+    if (MutationTable_check_write(self) != 0) {
         goto out;
     }
     if (!PyArg_ParseTupleAndKeywords(args, kwds, "O&O&O&s#|O&Od", kwlist,
@@ -4253,7 +4449,7 @@ MutationTable_parse_dict_arg(MutationTable *self, PyObject *args, bool clear_tab
     PyObject *ret = NULL;
     PyObject *dict = NULL;
 
-    if (MutationTable_check_state(self) != 0) {
+    if (MutationTable_check_write(self) != 0) {
         goto out;
     }
     if (!PyArg_ParseTuple(args, "O!", &PyDict_Type, &dict)) {
@@ -4286,7 +4482,7 @@ MutationTable_clear(MutationTable *self)
     PyObject *ret = NULL;
     int err;
 
-    if (MutationTable_check_state(self) != 0) {
+    if (MutationTable_check_write(self) != 0) {
         goto out;
     }
     err = tsk_mutation_table_clear(self->table);
@@ -4306,7 +4502,7 @@ MutationTable_truncate(MutationTable *self, PyObject *args)
     Py_ssize_t num_rows;
     int err;
 
-    if (MutationTable_check_state(self) != 0) {
+    if (MutationTable_check_write(self) != 0) {
         goto out;
     }
     if (!PyArg_ParseTuple(args, "n", &num_rows)) {
@@ -4335,7 +4531,7 @@ MutationTable_extend(MutationTable *self, PyObject *args, PyObject *kwds)
     int err;
     static char *kwlist[] = { "other", "row_indexes", NULL };
 
-    if (MutationTable_check_state(self) != 0) {
+    if (MutationTable_check_write(self) != 0) {
         goto out;
     }
     if (!PyArg_ParseTupleAndKeywords(args, kwds, "O!O&", kwlist, &MutationTableType,
@@ -4371,7 +4567,7 @@ MutationTable_keep_rows(MutationTable *self, PyObject *args)
 {
     PyObject *ret = NULL;
 
-    if (MutationTable_check_state(self) != 0) {
+    if (MutationTable_check_write(self) != 0) {
         goto out;
     }
     ret = table_keep_rows(args, (void *) self->table, self->table->num_rows,
@@ -4424,8 +4620,8 @@ MutationTable_get_site(MutationTable *self, void *closure)
     if (MutationTable_check_state(self) != 0) {
         goto out;
     }
-    ret = table_get_column_array(
-        self->table->num_rows, self->table->site, NPY_INT32, sizeof(int32_t));
+    ret = table_get_column_array(table_view_owner(self->tables), self->table->num_rows,
+        self->table->site, NPY_INT32, sizeof(int32_t));
 out:
     return ret;
 }
@@ -4438,8 +4634,8 @@ MutationTable_get_node(MutationTable *self, void *closure)
     if (MutationTable_check_state(self) != 0) {
         goto out;
     }
-    ret = table_get_column_array(
-        self->table->num_rows, self->table->node, NPY_INT32, sizeof(int32_t));
+    ret = table_get_column_array(table_view_owner(self->tables), self->table->num_rows,
+        self->table->node, NPY_INT32, sizeof(int32_t));
 out:
     return ret;
 }
@@ -4452,8 +4648,8 @@ MutationTable_get_parent(MutationTable *self, void *closure)
     if (MutationTable_check_state(self) != 0) {
         goto out;
     }
-    ret = table_get_column_array(
-        self->table->num_rows, self->table->parent, NPY_INT32, sizeof(int32_t));
+    ret = table_get_column_array(table_view_owner(self->tables), self->table->num_rows,
+        self->table->parent, NPY_INT32, sizeof(int32_t));
 out:
     return ret;
 }
@@ -4466,8 +4662,8 @@ MutationTable_get_time(MutationTable *self, void *closure)
     if (MutationTable_check_state(self) != 0) {
         goto out;
     }
-    ret = table_get_column_array(
-        self->table->num_rows, self->table->time, NPY_FLOAT64, sizeof(double));
+    ret = table_get_column_array(table_view_owner(self->tables), self->table->num_rows,
+        self->table->time, NPY_FLOAT64, sizeof(double));
 out:
     return ret;
 }
@@ -4480,8 +4676,9 @@ MutationTable_get_derived_state(MutationTable *self, void *closure)
     if (MutationTable_check_state(self) != 0) {
         goto out;
     }
-    ret = table_get_column_array(self->table->derived_state_length,
-        self->table->derived_state, NPY_INT8, sizeof(char));
+    ret = table_get_column_array(table_view_owner(self->tables),
+        self->table->derived_state_length, self->table->derived_state, NPY_INT8,
+        sizeof(char));
 out:
     return ret;
 }
@@ -4494,8 +4691,8 @@ MutationTable_get_derived_state_offset(MutationTable *self, void *closure)
     if (MutationTable_check_state(self) != 0) {
         goto out;
     }
-    ret = table_get_offset_array(
-        self->table->num_rows, self->table->derived_state_offset);
+    ret = table_get_offset_array(table_view_owner(self->tables), self->table->num_rows,
+        self->table->derived_state_offset);
 out:
     return ret;
 }
@@ -4508,7 +4705,7 @@ MutationTable_get_metadata(MutationTable *self, void *closure)
     if (MutationTable_check_state(self) != 0) {
         goto out;
     }
-    ret = table_get_column_array(
+    ret = table_get_column_array(table_view_owner(self->tables),
         self->table->metadata_length, self->table->metadata, NPY_INT8, sizeof(char));
 out:
     return ret;
@@ -4522,7 +4719,8 @@ MutationTable_get_metadata_offset(MutationTable *self, void *closure)
     if (MutationTable_check_state(self) != 0) {
         goto out;
     }
-    ret = table_get_offset_array(self->table->num_rows, self->table->metadata_offset);
+    ret = table_get_offset_array(table_view_owner(self->tables), self->table->num_rows,
+        self->table->metadata_offset);
 out:
     return ret;
 }
@@ -4549,7 +4747,7 @@ MutationTable_set_metadata_schema(MutationTable *self, PyObject *arg, void *clos
     const char *metadata_schema;
     Py_ssize_t metadata_schema_length;
 
-    if (MutationTable_check_state(self) != 0) {
+    if (MutationTable_check_write(self) != 0) {
         goto out;
     }
     metadata_schema = parse_unicode_arg(arg, &metadata_schema_length);
@@ -4679,11 +4877,28 @@ PopulationTable_check_state(PopulationTable *self)
         PyErr_SetString(PyExc_RuntimeError, "PopulationTable in use by other thread.");
         goto out;
     }
+    if (self->tables != NULL && self->tables->locked > 0) {
+        PyErr_SetString(PyExc_RuntimeError, "TableCollection in use by other thread.");
+        goto out;
+    }
     ret = 0;
 out:
     return ret;
 }
 
+static int
+PopulationTable_check_write(PopulationTable *self)
+{
+    int ret = PopulationTable_check_state(self);
+
+    if (ret != 0) {
+        goto out;
+    }
+    ret = table_check_write(self->tables);
+out:
+    return ret;
+}
+
 static void
 PopulationTable_dealloc(PopulationTable *self)
 {
@@ -4740,7 +4955,7 @@ PopulationTable_add_row(PopulationTable *self, PyObject *args, PyObject *kwds)
     Py_ssize_t metadata_length = 0;
     static char *kwlist[] = { "metadata", NULL };
 
-    if (PopulationTable_check_state(self) != 0) {
+    if (PopulationTable_check_write(self) != 0) {
         goto out;
     }
     if (!PyArg_ParseTupleAndKeywords(args, kwds, "|O", kwlist, &py_metadata)) {
@@ -4774,7 +4989,7 @@ PopulationTable_update_row(PopulationTable *self, PyObject *args, PyObject *kwds
     Py_ssize_t metadata_length = 0;
     static char *kwlist[] = { "row_index", "metadata", NULL };
 
-    if (PopulationTable_check_state(self) != 0) {
+    if (PopulationTable_check_write(self) != 0) {
         goto out;
     }
     if (!PyArg_ParseTupleAndKeywords(
@@ -4860,7 +5075,7 @@ PopulationTable_parse_dict_arg(PopulationTable *self, PyObject *args, bool clear
     PyObject *ret = NULL;
     PyObject *dict = NULL;
 
-    if (PopulationTable_check_state(self) != 0) {
+    if (PopulationTable_check_write(self) != 0) {
         goto out;
     }
     if (!PyArg_ParseTuple(args, "O!", &PyDict_Type, &dict)) {
@@ -4893,7 +5108,7 @@ PopulationTable_clear(PopulationTable *self)
     PyObject *ret = NULL;
     int err;
 
-    if (PopulationTable_check_state(self) != 0) {
+    if (PopulationTable_check_write(self) != 0) {
         goto out;
     }
     err = tsk_population_table_clear(self->table);
@@ -4913,7 +5128,7 @@ PopulationTable_truncate(PopulationTable *self, PyObject *args)
     Py_ssize_t num_rows;
     int err;
 
-    if (PopulationTable_check_state(self) != 0) {
+    if (PopulationTable_check_write(self) != 0) {
         goto out;
     }
     if (!PyArg_ParseTuple(args, "n", &num_rows)) {
@@ -4942,7 +5157,7 @@ PopulationTable_extend(PopulationTable *self, PyObject *args, PyObject *kwds)
     int err;
     static char *kwlist[] = { "other", "row_indexes", NULL };
 
-    if (PopulationTable_check_state(self) != 0) {
+    if (PopulationTable_check_write(self) != 0) {
         goto out;
     }
     if (!PyArg_ParseTupleAndKeywords(args, kwds, "O!O&", kwlist, &PopulationTableType,
@@ -4978,7 +5193,7 @@ PopulationTable_keep_rows(PopulationTable *self, PyObject *args)
 {
     PyObject *ret = NULL;
 
-    if (PopulationTable_check_state(self) != 0) {
+    if (PopulationTable_check_write(self) != 0) {
         goto out;
     }
     ret = table_keep_rows(args, (void *) self->table, self->table->num_rows,
@@ -5031,7 +5246,7 @@ PopulationTable_get_metadata(PopulationTable *self, void *closure)
     if (PopulationTable_check_state(self) != 0) {
         goto out;
     }
-    ret = table_get_column_array(
+    ret = table_get_column_array(table_view_owner(self->tables),
         self->table->metadata_length, self->table->metadata, NPY_INT8, sizeof(char));
 out:
     return ret;
@@ -5045,7 +5260,8 @@ PopulationTable_get_metadata_offset(PopulationTable *self, void *closure)
     if (PopulationTable_check_state(self) != 0) {
         goto out;
     }
-    ret = table_get_offset_array(self->table->num_rows, self->table->metadata_offset);
+    ret = table_get_offset_array(table_view_owner(self->tables), self->table->num_rows,
+        self->table->metadata_offset);
 out:
     return ret;
 }
@@ -5072,7 +5288,7 @@ PopulationTable_set_metadata_schema(PopulationTable *self, PyObject *arg, void *
     const char *metadata_schema;
     Py_ssize_t metadata_schema_length;
 
-    if (PopulationTable_check_state(self) != 0) {
+    if (PopulationTable_check_write(self) != 0) {
         goto out;
     }
     metadata_schema = parse_unicode_arg(arg, &metadata_schema_length);
@@ -5191,11 +5407,28 @@ ProvenanceTable_check_state(ProvenanceTable *self)
         PyErr_SetString(PyExc_RuntimeError, "ProvenanceTable in use by other thread.");
         goto out;
     }
+    if (self->tables != NULL && self->tables->locked > 0) {
+        PyErr_SetString(PyExc_RuntimeError, "TableCollection in use by other thread.");
+        goto out;
+    }
     ret = 0;
 out:
     return ret;
 }
 
+static int
+ProvenanceTable_check_write(ProvenanceTable *self)
+{
+    int ret = ProvenanceTable_check_state(self);
+
+    if (ret != 0) {
+        goto out;
+    }
+    ret = table_check_write(self->tables);
+out:
+    return ret;
+}
+
 static void
 ProvenanceTable_dealloc(ProvenanceTable *self)
 {
@@ -5254,7 +5487,7 @@ ProvenanceTable_add_row(ProvenanceTable *self, PyObject *args, PyObject *kwds)
     Py_ssize_t record_length = 0;
     static char *kwlist[] = { "timestamp", "record", NULL };
 
-    if (ProvenanceTable_check_state(self) != 0) {
+    if (ProvenanceTable_check_write(self) != 0) {
         goto out;
     }
     if (!PyArg_ParseTupleAndKeywords(args, kwds, "s#s#", kwlist, &timestamp,
@@ -5284,7 +5517,7 @@ ProvenanceTable_update_row(ProvenanceTable *self, PyObject *args, PyObject *kwds
     Py_ssize_t record_length = 0;
     static char *kwlist[] = { "row_index", "timestamp", "record", NULL };
 
-    if (ProvenanceTable_check_state(self) != 0) {
+    if (ProvenanceTable_check_write(self) != 0) {
         goto out;
     }
     if (!PyArg_ParseTupleAndKeywords(args, kwds, "O&s#s#", kwlist, &tsk_id_converter,
@@ -5364,7 +5597,7 @@ ProvenanceTable_parse_dict_arg(ProvenanceTable *self, PyObject *args, bool clear
     PyObject *ret = NULL;
     PyObject *dict = NULL;
 
-    if (ProvenanceTable_check_state(self) != 0) {
+    if (ProvenanceTable_check_write(self) != 0) {
         goto out;
     }
     if (!PyArg_ParseTuple(args, "O!", &PyDict_Type, &dict)) {
@@ -5397,7 +5630,7 @@ ProvenanceTable_clear(ProvenanceTable *self)
     PyObject *ret = NULL;
     int err;
 
-    if (ProvenanceTable_check_state(self) != 0) {
+    if (ProvenanceTable_check_write(self) != 0) {
         goto out;
     }
     err = tsk_provenance_table_clear(self->table);
@@ -5417,7 +5650,7 @@ ProvenanceTable_truncate(ProvenanceTable *self, PyObject *args)
     Py_ssize_t num_rows;
     int err;
 
-    if (ProvenanceTable_check_state(self) != 0) {
+    if (ProvenanceTable_check_write(self) != 0) {
         goto out;
     }
     if (!PyArg_ParseTuple(args, "n", &num_rows)) {
@@ -5446,7 +5679,7 @@ ProvenanceTable_extend(ProvenanceTable *self, PyObject *args, PyObject *kwds)
     int err;
     static char *kwlist[] = { "other", "row_indexes", NULL };
 
-    if (ProvenanceTable_check_state(self) != 0) {
+    if (ProvenanceTable_check_write(self) != 0) {
         goto out;
     }
     if (!PyArg_ParseTupleAndKeywords(args, kwds, "O!O&", kwlist, &ProvenanceTableType,
@@ -5482,7 +5715,7 @@ ProvenanceTable_keep_rows(ProvenanceTable *self, PyObject *args)
 {
     PyObject *ret = NULL;
 
-    if (ProvenanceTable_check_state(self) != 0) {
+    if (ProvenanceTable_check_write(self) != 0) {
         goto out;
     }
     ret = table_keep_rows(args, (void *) self->table, self->table->num_rows,
@@ -5535,7 +5768,7 @@ ProvenanceTable_get_timestamp(ProvenanceTable *self, void *closure)
     if (ProvenanceTable_check_state(self) != 0) {
         goto out;
     }
-    ret = table_get_column_array(
+    ret = table_get_column_array(table_view_owner(self->tables),
         self->table->timestamp_length, self->table->timestamp, NPY_INT8, sizeof(char));
 out:
     return ret;
@@ -5549,7 +5782,8 @@ ProvenanceTable_get_timestamp_offset(ProvenanceTable *self, void *closure)
     if (ProvenanceTable_check_state(self) != 0) {
         goto out;
     }
-    ret = table_get_offset_array(self->table->num_rows, self->table->timestamp_offset);
+    ret = table_get_offset_array(table_view_owner(self->tables), self->table->num_rows,
+        self->table->timestamp_offset);
 out:
     return ret;
 }
@@ -5562,7 +5796,7 @@ ProvenanceTable_get_record(ProvenanceTable *self, void *closure)
     if (ProvenanceTable_check_state(self) != 0) {
         goto out;
     }
-    ret = table_get_column_array(
+    ret = table_get_column_array(table_view_owner(self->tables),
         self->table->record_length, self->table->record, NPY_INT8, sizeof(char));
 out:
     return ret;
@@ -5576,7 +5810,8 @@ ProvenanceTable_get_record_offset(ProvenanceTable *self, void *closure)
     if (ProvenanceTable_check_state(self) != 0) {
         goto out;
     }
-    ret = table_get_offset_array(self->table->num_rows, self->table->record_offset);
+    ret = table_get_offset_array(table_view_owner(self->tables), self->table->num_rows,
+        self->table->record_offset);
 out:
     return ret;
 }
@@ -6003,51 +6238,141 @@ out:
 }
 
 static PyObject *
-IdentitySegments_print_state(IdentitySegments *self, PyObject *args)
+IdentitySegments_get_arrays(IdentitySegments *self)
 {
     PyObject *ret = NULL;
-    PyObject *fileobj;
-    FILE *file = NULL;
+    PyArrayObject *pair_a = NULL;
+    PyArrayObject *pair_b = NULL;
+    PyArrayObject *left = NULL;
+    PyArrayObject *right = NULL;
+    PyArrayObject *node = NULL;
+    npy_intp num_segments;
+    int err;
 
     if (IdentitySegments_check_state(self) != 0) {
         goto out;
     }
-    if (!PyArg_ParseTuple(args, "O", &fileobj)) {
+    num_segments = tsk_identity_segments_get_num_segments(self->identity_segments);
+    pair_a = (PyArrayObject *) PyArray_SimpleNew(1, &num_segments, NPY_INT32);
+    pair_b = (PyArrayObject *) PyArray_SimpleNew(1, &num_segments, NPY_INT32);
+    left = (PyArrayObject *) PyArray_SimpleNew(1, &num_segments, NPY_FLOAT64);
+    right = (PyArrayObject *) PyArray_SimpleNew(1, &num_segments, NPY_FLOAT64);
+    node = (PyArrayObject *) PyArray_SimpleNew(1, &num_segments, NPY_INT32);
+    if (pair_a == NULL || pair_b == NULL || left == NULL || right == NULL
+        || node == NULL) {
         goto out;
     }
-    file = make_file(fileobj, "w");
-    if (file == NULL) {
+    err = tsk_identity_segments_get_arrays(self->identity_segments, PyArray_DATA(pair_a),
+        PyArray_DATA(pair_b), PyArray_DATA(left), PyArray_DATA(right),
+        PyArray_DATA(node));
+    if (err != 0) {
+        handle_library_error(err);
         goto out;
     }
-    tsk_identity_segments_print_state(self->identity_segments, file);
-    ret = Py_BuildValue("");
+    ret = Py_BuildValue("OOOOO", pair_a, pair_b, left, right, node);
 out:
-    if (file != NULL) {
-        (void) fclose(file);
-    }
+    Py_XDECREF(pair_a);
+    Py_XDECREF(pair_b);
+    Py_XDECREF(left);
+    Py_XDECREF(right);
+    Py_XDECREF(node);
     return ret;
 }
 
 static PyObject *
-IdentitySegments_get_num_segments(IdentitySegments *self, void *closure)
+IdentitySegments_get_span_matrix(IdentitySegments *self, PyObject *args, PyObject *kwds)
 {
     PyObject *ret = NULL;
+    static char *kwlist[] = { "sample_set_sizes", "sample_sets", NULL };
+    PyObject *sample_set_sizes = NULL;
+    PyObject *sample_sets = NULL;
+    PyArrayObject *sample_set_sizes_array = NULL;
+    PyArrayObject *sample_sets_array = NULL;
+    PyArrayObject *result_array = NULL;
+    tsk_size_t num_sample_sets;
+    npy_intp dims[2];
+    int err;
 
     if (IdentitySegments_check_state(self) != 0) {
         goto out;
     }
-    ret = Py_BuildValue("K", (unsigned long long) tsk_identity_segments_get_num_segments(
-                                 self->identity_segments));
-out:
-    return ret;
-}
-
-static PyObject *
-IdentitySegments_get_total_span(IdentitySegments *self, void *closure)
-{
-    PyObject *ret = NULL;
-
-    if (IdentitySegments_check_state(self) != 0) {
+    if (!PyArg_ParseTupleAndKeywords(
+            args, kwds, "OO", kwlist, &sample_set_sizes, &sample_sets)) {
+        goto out;
+    }
+    if (parse_sample_sets(sample_set_sizes, &sample_set_sizes_array, sample_sets,
+            &sample_sets_array, &num_sample_sets)
+        != 0) {
+        goto out;
+    }
+    dims[0] = (npy_intp) num_sample_sets;
+    dims[1] = (npy_intp) num_sample_sets;
+    result_array = (PyArrayObject *) PyArray_SimpleNew(2, dims, NPY_FLOAT64);
+    if (result_array == NULL) {
+        goto out;
+    }
+    err = tsk_identity_segments_get_span_matrix(self->identity_segments, num_sample_sets,
+        PyArray_DATA(sample_set_sizes_array), PyArray_DATA(sample_sets_array),
+        PyArray_DATA(result_array));
+    if (err != 0) {
+        handle_library_error(err);
+        goto out;
+    }
+    ret = (PyObject *) result_array;
+    result_array = NULL;
+out:
+    Py_XDECREF(sample_set_sizes_array);
+    Py_XDECREF(sample_sets_array);
+    Py_XDECREF(result_array);
+    return ret;
+}
+
+static PyObject *
+IdentitySegments_print_state(IdentitySegments *self, PyObject *args)
+{
+    PyObject *ret = NULL;
+    PyObject *fileobj;
+    FILE *file = NULL;
+
+    if (IdentitySegments_check_state(self) != 0) {
+        goto out;
+    }
+    if (!PyArg_ParseTuple(args, "O", &fileobj)) {
+        goto out;
+    }
+    file = make_file(fileobj, "w");
+    if (file == NULL) {
+        goto out;
+    }
+    tsk_identity_segments_print_state(self->identity_segments, file);
+    ret = Py_BuildValue("");
+out:
+    if (file != NULL) {
+        (void) fclose(file);
+    }
+    return ret;
+}
+
+static PyObject *
+IdentitySegments_get_num_segments(IdentitySegments *self, void *closure)
+{
+    PyObject *ret = NULL;
+
+    if (IdentitySegments_check_state(self) != 0) {
+        goto out;
+    }
+    ret = Py_BuildValue("K", (unsigned long long) tsk_identity_segments_get_num_segments(
+                                 self->identity_segments));
+out:
+    return ret;
+}
+
+static PyObject *
+IdentitySegments_get_total_span(IdentitySegments *self, void *closure)
+{
+    PyObject *ret = NULL;
+
+    if (IdentitySegments_check_state(self) != 0) {
         goto out;
     }
     ret = Py_BuildValue(
@@ -6087,6 +6412,15 @@ static PyMethodDef IdentitySegments_methods[] = {
         .ml_meth = (PyCFunction) IdentitySegments_get_keys,
         .ml_flags = METH_NOARGS,
         .ml_doc = "Return a (n, 2) dim numpy array of all the sample pairs." },
+    { .ml_name = "get_arrays",
+        .ml_meth = (PyCFunction) IdentitySegments_get_arrays,
+        .ml_flags = METH_NOARGS,
+        .ml_doc = "Return a tuple of numpy arrays (a, b, left, right, node) "
+                  "describing all the stored segments." },
+    { .ml_name = "get_span_matrix",
+        .ml_meth = (PyCFunction) IdentitySegments_get_span_matrix,
+        .ml_flags = METH_VARARGS | METH_KEYWORDS,
+        .ml_doc = "Return the matrix of total IBD span between pairs of sample sets." },
     { NULL } /* Sentinel */
 };
 
@@ -6411,8 +6745,11 @@ out:
  *===================================================================
  */
 
+/* Checks that the tables are initialised, but not whether they are locked.
+ * Only read-only operations that may run alongside an IBD segment stream
+ * should use this rather than TableCollection_check_state. */
 static int
-TableCollection_check_state(TableCollection *self)
+TableCollection_check_read(TableCollection *self)
 {
     int ret = 0;
     if (self->tables == NULL) {
@@ -6422,6 +6759,31 @@ TableCollection_check_state(TableCollection *self)
     return ret;
 }
 
+static int
+TableCollection_check_state(TableCollection *self)
+{
+    int ret = TableCollection_check_read(self);
+
+    if (ret == 0 && self->locked > 0) {
+        PyErr_SetString(PyExc_RuntimeError, "TableCollection in use by other thread.");
+        ret = -1;
+    }
+    return ret;
+}
+
+static int
+TableCollection_check_write(TableCollection *self)
+{
+    int ret = TableCollection_check_state(self);
+
+    if (ret != 0) {
+        goto out;
+    }
+    ret = table_check_write(self);
+out:
+    return ret;
+}
+
 static int
 TableCollection_alloc(TableCollection *self)
 {
@@ -6445,7 +6807,12 @@ out:
 static void
 TableCollection_dealloc(TableCollection *self)
 {
-    if (self->tables != NULL) {
+    if (self->owner != NULL) {
+        /* The tables belong to the owning TreeSequence */
+        self->tables = NULL;
+        Py_DECREF(self->owner);
+        self->owner = NULL;
+    } else if (self->tables != NULL) {
         tsk_table_collection_free(self->tables);
         PyMem_Free(self->tables);
         self->tables = NULL;
@@ -6461,7 +6828,9 @@ TableCollection_init(TableCollection *self, PyObject *args, PyObject *kwds)
     static char *kwlist[] = { "sequence_length", NULL };
     double sequence_length = -1;
 
+    self->locked = 0;
     self->tables = NULL;
+    self->owner = NULL;
     if (!PyArg_ParseTupleAndKeywords(args, kwds, "|d", kwlist, &sequence_length)) {
         goto out;
     }
@@ -6669,7 +7038,7 @@ TableCollection_set_sequence_length(
 {
     int ret = -1;
 
-    if (TableCollection_check_state(self) != 0) {
+    if (TableCollection_check_write(self) != 0) {
         goto out;
     }
     if (value == NULL) {
@@ -6721,7 +7090,7 @@ TableCollection_set_time_units(TableCollection *self, PyObject *arg, void *closu
     const char *time_units;
     Py_ssize_t time_units_length;
 
-    if (TableCollection_check_state(self) != 0) {
+    if (TableCollection_check_write(self) != 0) {
         goto out;
     }
     time_units = parse_unicode_arg(arg, &time_units_length);
@@ -6761,7 +7130,7 @@ TableCollection_set_metadata(TableCollection *self, PyObject *arg, void *closure
     char *metadata;
     Py_ssize_t metadata_length;
 
-    if (TableCollection_check_state(self) != 0) {
+    if (TableCollection_check_write(self) != 0) {
         goto out;
     }
     if (arg == NULL) {
@@ -6805,7 +7174,7 @@ TableCollection_set_metadata_schema(TableCollection *self, PyObject *arg, void *
     const char *metadata_schema;
     Py_ssize_t metadata_schema_length;
 
-    if (TableCollection_check_state(self) != 0) {
+    if (TableCollection_check_write(self) != 0) {
         goto out;
     }
     metadata_schema = parse_unicode_arg(arg, &metadata_schema_length);
@@ -6831,8 +7200,8 @@ TableCollection_get_reference_sequence(TableCollection *self, void *closure)
     if (TableCollection_check_state(self) != 0) {
         goto out;
     }
-    ret = ReferenceSequence_get_new(
-        &self->tables->reference_sequence, (PyObject *) self, false);
+    ret = ReferenceSequence_get_new(&self->tables->reference_sequence, (PyObject *) self,
+        table_view_owner(self) != NULL);
 out:
     return ret;
 }
@@ -6862,7 +7231,7 @@ TableCollection_simplify(TableCollection *self, PyObject *args, PyObject *kwds)
               "filter_nodes", "update_sample_flags", "reduce_to_site_topology",
               "keep_unary", "keep_unary_in_individuals", "keep_input_roots", NULL };
 
-    if (TableCollection_check_state(self) != 0) {
+    if (TableCollection_check_write(self) != 0) {
         goto out;
     }
     if (!PyArg_ParseTupleAndKeywords(args, kwds, "O|iiiiiiiii", kwlist, &samples,
@@ -7003,7 +7372,7 @@ TableCollection_subset(TableCollection *self, PyObject *args, PyObject *kwds)
     static char *kwlist[]
         = { "nodes", "reorder_populations", "remove_unreferenced", NULL };
 
-    if (TableCollection_check_state(self) != 0) {
+    if (TableCollection_check_write(self) != 0) {
         goto out;
     }
     if (!PyArg_ParseTupleAndKeywords(args, kwds, "O|ii", kwlist, &nodes,
@@ -7054,7 +7423,7 @@ TableCollection_union(TableCollection *self, PyObject *args, PyObject *kwds)
     static char *kwlist[] = { "other", "other_node_mapping", "check_shared_equality",
         "add_populations", NULL };
 
-    if (TableCollection_check_state(self) != 0) {
+    if (TableCollection_check_write(self) != 0) {
         goto out;
     }
     if (!PyArg_ParseTupleAndKeywords(args, kwds, "O!O|ii", kwlist, &TableCollectionType,
@@ -7091,6 +7460,182 @@ out:
     return ret;
 }
 
+/* Buffers the identity segments passed to the sink function of the IBD
+ * finder, and calls the Python sink with numpy arrays of the buffered
+ * segments whenever the buffer is full. The finder runs without the GIL,
+ * and so we must acquire it to call the sink. */
+typedef struct {
+    PyObject *sink;
+    tsk_size_t num_segments;
+    tsk_size_t max_segments;
+    tsk_id_t *a;
+    tsk_id_t *b;
+    double *left;
+    double *right;
+    tsk_id_t *node;
+} ibd_segment_buffer_t;
+
+static int
+ibd_segment_buffer_init(
+    ibd_segment_buffer_t *self, PyObject *sink, Py_ssize_t max_segments)
+{
+    int ret = -1;
+
+    memset(self, 0, sizeof(*self));
+    if (!PyCallable_Check(sink)) {
+        PyErr_SetString(PyExc_TypeError, "sink must be callable");
+        goto out;
+    }
+    if (max_segments < 1) {
+        PyErr_SetString(PyExc_ValueError, "buffer_size must be >= 1");
+        goto out;
+    }
+    self->sink = sink;
+    self->max_segments = (tsk_size_t) max_segments;
+    self->a = PyMem_Malloc(self->max_segments * sizeof(*self->a));
+    self->b = PyMem_Malloc(self->max_segments * sizeof(*self->b));
+    self->left = PyMem_Malloc(self->max_segments * sizeof(*self->left));
+    self->right = PyMem_Malloc(self->max_segments * sizeof(*self->right));
+    self->node = PyMem_Malloc(self->max_segments * sizeof(*self->node));
+    if (self->a == NULL || self->b == NULL || self->left == NULL || self->right == NULL
+        || self->node == NULL) {
+        PyErr_NoMemory();
+        goto out;
+    }
+    ret = 0;
+out:
+    return ret;
+}
+
+static void
+ibd_segment_buffer_free(ibd_segment_buffer_t *self)
+{
+    PyMem_Free(self->a);
+    PyMem_Free(self->b);
+    PyMem_Free(self->left);
+    PyMem_Free(self->right);
+    PyMem_Free(self->node);
+}
+
+static PyObject *
+ibd_segment_buffer_copy_column(const void *data, npy_intp size, int type)
+{
+    PyArrayObject *array = (PyArrayObject *) PyArray_SimpleNew(1, &size, type);
+
+    if (array != NULL) {
+        memcpy(PyArray_DATA(array), data, (size_t) PyArray_NBYTES(array));
+    }
+    return (PyObject *) array;
+}
+
+static int
+ibd_segment_buffer_flush(ibd_segment_buffer_t *self)
+{
+    int ret = TSK_PYTHON_CALLBACK_ERROR;
+    npy_intp n = (npy_intp) self->num_segments;
+    PyObject *a = NULL;
+    PyObject *b = NULL;
+    PyObject *left = NULL;
+    PyObject *right = NULL;
+    PyObject *node = NULL;
+    PyObject *result = NULL;
+    PyGILState_STATE gil_state = PyGILState_Ensure();
+
+    a = ibd_segment_buffer_copy_column(self->a, n, NPY_INT32);
+    b = ibd_segment_buffer_copy_column(self->b, n, NPY_INT32);
+    left = ibd_segment_buffer_copy_column(self->left, n, NPY_FLOAT64);
+    right = ibd_segment_buffer_copy_column(self->right, n, NPY_FLOAT64);
+    node = ibd_segment_buffer_copy_column(self->node, n, NPY_INT32);
+    if (a == NULL || b == NULL || left == NULL || right == NULL || node == NULL) {
+        goto out;
+    }
+    result = PyObject_CallFunctionObjArgs(self->sink, a, b, left, right, node, NULL);
+    if (result == NULL) {
+        goto out;
+    }
+    self->num_segments = 0;
+    ret = 0;
+out:
+    Py_XDECREF(a);
+    Py_XDECREF(b);
+    Py_XDECREF(left);
+    Py_XDECREF(right);
+    Py_XDECREF(node);
+    Py_XDECREF(result);
+    PyGILState_Release(gil_state);
+    return ret;
+}
+
+static int
+ibd_segment_sink(
+    tsk_id_t a, tsk_id_t b, double left, double right, tsk_id_t node, void *params)
+{
+    int ret = 0;
+    ibd_segment_buffer_t *self = (ibd_segment_buffer_t *) params;
+    tsk_size_t j = self->num_segments;
+
+    self->a[j] = a;
+    self->b[j] = b;
+    self->left[j] = left;
+    self->right[j] = right;
+    self->node[j] = node;
+    self->num_segments++;
+    if (self->num_segments == self->max_segments) {
+        ret = ibd_segment_buffer_flush(self);
+    }
+    return ret;
+}
+
+/* Runs the IBD finder with the specified sink, flushing any remaining
+ * segments at the end */
+static int
+ibd_segments_stream(TableCollection *self, IdentitySegments *result, PyObject *sink,
+    Py_ssize_t buffer_size, tsk_size_t num_sample_sets,
+    const tsk_size_t *sample_set_sizes, const tsk_id_t *samples, tsk_size_t num_samples,
+    double min_span, double max_time, tsk_flags_t options)
+{
+    int ret = -1;
+    int err;
+    ibd_segment_buffer_t buffer;
+
+    if (ibd_segment_buffer_init(&buffer, sink, buffer_size) != 0) {
+        goto out;
+    }
+    /* The sink runs Python code while the tables are in use, so we lock
+     * them for the whole stream to stop it from modifying them. */
+    self->locked++;
+    // clang-format off
+    Py_BEGIN_ALLOW_THREADS
+    if (sample_set_sizes == NULL) {
+        err = tsk_table_collection_ibd_within_stream(self->tables,
+            result->identity_segments, samples, num_samples, min_span, max_time,
+            ibd_segment_sink, &buffer, options);
+    } else {
+        err = tsk_table_collection_ibd_between_stream(self->tables,
+            result->identity_segments, num_sample_sets, sample_set_sizes, samples,
+            min_span, max_time, ibd_segment_sink, &buffer, options);
+    }
+    if (err == 0 && buffer.num_segments > 0) {
+        err = ibd_segment_buffer_flush(&buffer);
+    }
+    Py_END_ALLOW_THREADS
+    self->locked--;
+    /* The buffer doesn't outlive this function */
+    result->identity_segments->sink = NULL;
+    result->identity_segments->sink_params = NULL;
+    if (err == TSK_PYTHON_CALLBACK_ERROR) {
+        goto out;
+    } else if (err != 0) {
+        handle_library_error(err);
+        goto out;
+    }
+    // clang-format on
+    ret = 0;
+out:
+    ibd_segment_buffer_free(&buffer);
+    return ret;
+}
+
 static PyObject *
 TableCollection_ibd_segments_within(
     TableCollection *self, PyObject *args, PyObject *kwds)
@@ -7106,16 +7651,18 @@ TableCollection_ibd_segments_within(
     double max_time = DBL_MAX;
     int store_pairs = 0;
     int store_segments = 0;
+    PyObject *sink = Py_None;
+    Py_ssize_t buffer_size = 65536;
     npy_intp *shape;
-    static char *kwlist[]
-        = { "samples", "min_span", "max_time", "store_pairs", "store_segments", NULL };
+    static char *kwlist[] = { "samples", "min_span", "max_time", "store_pairs",
+        "store_segments", "sink", "buffer_size", NULL };
     tsk_flags_t options = 0;
 
-    if (TableCollection_check_state(self) != 0) {
+    if (TableCollection_check_read(self) != 0) {
         goto out;
     }
-    if (!PyArg_ParseTupleAndKeywords(args, kwds, "|Oddii", kwlist, &py_samples,
-            &min_span, &max_time, &store_pairs, &store_segments)) {
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "|OddiiOn", kwlist, &py_samples,
+            &min_span, &max_time, &store_pairs, &store_segments, &sink, &buffer_size)) {
         goto out;
     }
     if (py_samples != Py_None) {
@@ -7141,11 +7688,19 @@ TableCollection_ibd_segments_within(
         options |= TSK_IBD_STORE_SEGMENTS;
     }
 
-    err = tsk_table_collection_ibd_within(self->tables, result->identity_segments,
-        samples, num_samples, min_span, max_time, options);
-    if (err != 0) {
-        handle_library_error(err);
-        goto out;
+    if (sink != Py_None) {
+        if (ibd_segments_stream(self, result, sink, buffer_size, 0, NULL, samples,
+                num_samples, min_span, max_time, options)
+            != 0) {
+            goto out;
+        }
+    } else {
+        err = tsk_table_collection_ibd_within(self->tables, result->identity_segments,
+            samples, num_samples, min_span, max_time, options);
+        if (err != 0) {
+            handle_library_error(err);
+            goto out;
+        }
     }
     ret = (PyObject *) result;
     result = NULL;
@@ -7171,15 +7726,18 @@ TableCollection_ibd_segments_between(
     double max_time = DBL_MAX;
     int store_pairs = 0;
     int store_segments = 0;
+    PyObject *sink = Py_None;
+    Py_ssize_t buffer_size = 65536;
     static char *kwlist[] = { "sample_set_sizes", "sample_sets", "min_span", "max_time",
-        "store_pairs", "store_segments", NULL };
+        "store_pairs", "store_segments", "sink", "buffer_size", NULL };
     tsk_flags_t options = 0;
 
-    if (TableCollection_check_state(self) != 0) {
+    if (TableCollection_check_read(self) != 0) {
         goto out;
     }
-    if (!PyArg_ParseTupleAndKeywords(args, kwds, "OO|ddii", kwlist, &sample_set_sizes,
-            &sample_sets, &min_span, &max_time, &store_pairs, &store_segments)) {
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "OO|ddiiOn", kwlist, &sample_set_sizes,
+            &sample_sets, &min_span, &max_time, &store_pairs, &store_segments, &sink,
+            &buffer_size)) {
         goto out;
     }
     if (parse_sample_sets(sample_set_sizes, &sample_set_sizes_array, sample_sets,
@@ -7200,12 +7758,22 @@ TableCollection_ibd_segments_between(
         options |= TSK_IBD_STORE_SEGMENTS;
     }
 
-    err = tsk_table_collection_ibd_between(self->tables, result->identity_segments,
-        num_sample_sets, (tsk_size_t *) PyArray_DATA(sample_set_sizes_array),
-        (tsk_id_t *) PyArray_DATA(sample_sets_array), min_span, max_time, options);
-    if (err != 0) {
-        handle_library_error(err);
-        goto out;
+    if (sink != Py_None) {
+        if (ibd_segments_stream(self, result, sink, buffer_size, num_sample_sets,
+                (tsk_size_t *) PyArray_DATA(sample_set_sizes_array),
+                (tsk_id_t *) PyArray_DATA(sample_sets_array), 0, min_span, max_time,
+                options)
+            != 0) {
+            goto out;
+        }
+    } else {
+        err = tsk_table_collection_ibd_between(self->tables, result->identity_segments,
+            num_sample_sets, (tsk_size_t *) PyArray_DATA(sample_set_sizes_array),
+            (tsk_id_t *) PyArray_DATA(sample_sets_array), min_span, max_time, options);
+        if (err != 0) {
+            handle_library_error(err);
+            goto out;
+        }
     }
     ret = (PyObject *) result;
     result = NULL;
@@ -7216,6 +7784,86 @@ out:
     return ret;
 }
 
+/* Worker threads used to run the independent tasks of a table sort. These
+ * threads only call the sorting functions of the C library and never touch
+ * Python objects, so they do not need to hold the GIL. */
+typedef struct {
+    void (*task)(void *);
+    void **args;
+    tsk_size_t num_tasks;
+    tsk_size_t num_workers;
+    tsk_size_t worker;
+    PyThread_type_lock done;
+} sort_worker_t;
+
+static void
+sort_worker_run(sort_worker_t *self)
+{
+    tsk_size_t j;
+
+    for (j = self->worker; j < self->num_tasks; j += self->num_workers) {
+        self->task(self->args[j]);
+    }
+}
+
+static void
+sort_worker_thread(void *arg)
+{
+    sort_worker_t *self = (sort_worker_t *) arg;
+
+    sort_worker_run(self);
+    PyThread_release_lock(self->done);
+}
+
+static int
+table_sorter_run_tasks(
+    tsk_table_sorter_t *sorter, tsk_size_t num_tasks, void (*task)(void *), void **args)
+{
+    int ret = 0;
+    tsk_size_t num_workers = TSK_MIN(sorter->num_threads, num_tasks);
+    sort_worker_t *workers = PyMem_Calloc(num_workers, sizeof(*workers));
+    tsk_size_t j;
+
+    if (workers == NULL) {
+        ret = TSK_ERR_NO_MEMORY;
+        goto out;
+    }
+    for (j = 0; j < num_workers; j++) {
+        workers[j].task = task;
+        workers[j].args = args;
+        workers[j].num_tasks = num_tasks;
+        workers[j].num_workers = num_workers;
+        workers[j].worker = j;
+    }
+    /* The calling thread runs the tasks for the first worker. If we can't
+     * start a thread for any of the others, we run them here too. */
+    for (j = 1; j < num_workers; j++) {
+        workers[j].done = PyThread_allocate_lock();
+        if (workers[j].done != NULL) {
+            PyThread_acquire_lock(workers[j].done, WAIT_LOCK);
+            if (PyThread_start_new_thread(sort_worker_thread, workers + j)
+                == PYTHREAD_INVALID_THREAD_ID) {
+                PyThread_release_lock(workers[j].done);
+                PyThread_free_lock(workers[j].done);
+                workers[j].done = NULL;
+            }
+        }
+    }
+    sort_worker_run(workers);
+    for (j = 1; j < num_workers; j++) {
+        if (workers[j].done == NULL) {
+            sort_worker_run(workers + j);
+        } else {
+            PyThread_acquire_lock(workers[j].done, WAIT_LOCK);
+            PyThread_release_lock(workers[j].done);
+            PyThread_free_lock(workers[j].done);
+        }
+    }
+out:
+    PyMem_Free(workers);
+    return ret;
+}
+
 static PyObject *
 TableCollection_sort(TableCollection *self, PyObject *args, PyObject *kwds)
 {
@@ -7224,27 +7872,43 @@ TableCollection_sort(TableCollection *self, PyObject *args, PyObject *kwds)
     Py_ssize_t edge_start = 0;
     Py_ssize_t site_start = 0;
     Py_ssize_t mutation_start = 0;
+    int num_threads = 0;
     tsk_bookmark_t start;
-    static char *kwlist[] = { "edge_start", "site_start", "mutation_start", NULL };
+    tsk_table_sorter_t sorter;
+    static char *kwlist[]
+        = { "edge_start", "site_start", "mutation_start", "num_threads", NULL };
 
-    if (TableCollection_check_state(self) != 0) {
+    memset(&sorter, 0, sizeof(sorter));
+    if (TableCollection_check_write(self) != 0) {
         goto out;
     }
-    if (!PyArg_ParseTupleAndKeywords(
-            args, kwds, "|nnn", kwlist, &edge_start, &site_start, &mutation_start)) {
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "|nnni", kwlist, &edge_start,
+            &site_start, &mutation_start, &num_threads)) {
         goto out;
     }
     memset(&start, 0, sizeof(start));
     start.edges = (tsk_size_t) edge_start;
     start.sites = (tsk_size_t) site_start;
     start.mutations = (tsk_size_t) mutation_start;
-    err = tsk_table_collection_sort(self->tables, &start, 0);
+    err = tsk_table_sorter_init(&sorter, self->tables, 0);
+    if (err != 0) {
+        handle_library_error(err);
+        goto out;
+    }
+    if (num_threads > 1) {
+        /* The GIL is held while sorting, so that the tables can't be
+         * modified by other Python threads. */
+        sorter.num_threads = (tsk_size_t) num_threads;
+        sorter.run_tasks = table_sorter_run_tasks;
+    }
+    err = tsk_table_sorter_run(&sorter, &start);
     if (err != 0) {
         handle_library_error(err);
         goto out;
     }
     ret = Py_BuildValue("");
 out:
+    tsk_table_sorter_free(&sorter);
     return ret;
 }
 
@@ -7254,7 +7918,7 @@ TableCollection_sort_individuals(TableCollection *self, PyObject *args, PyObject
     int err;
     PyObject *ret = NULL;
 
-    if (TableCollection_check_state(self) != 0) {
+    if (TableCollection_check_write(self) != 0) {
         goto out;
     }
 
@@ -7277,7 +7941,7 @@ TableCollection_canonicalise(TableCollection *self, PyObject *args, PyObject *kw
     int remove_unreferenced = true;
     static char *kwlist[] = { "remove_unreferenced", NULL };
 
-    if (TableCollection_check_state(self) != 0) {
+    if (TableCollection_check_write(self) != 0) {
         goto out;
     }
     if (!PyArg_ParseTupleAndKeywords(args, kwds, "|i", kwlist, &remove_unreferenced)) {
@@ -7304,7 +7968,7 @@ TableCollection_delete_older(TableCollection *self, PyObject *args)
     int err;
     double time;
 
-    if (TableCollection_check_state(self) != 0) {
+    if (TableCollection_check_write(self) != 0) {
         goto out;
     }
     if (!PyArg_ParseTuple(args, "d", &time)) {
@@ -7326,7 +7990,7 @@ TableCollection_compute_mutation_parents(TableCollection *self)
     int err;
     PyObject *ret = NULL;
 
-    if (TableCollection_check_state(self) != 0) {
+    if (TableCollection_check_write(self) != 0) {
         goto out;
     }
     err = tsk_table_collection_compute_mutation_parents(self->tables, 0);
@@ -7345,7 +8009,7 @@ TableCollection_compute_mutation_times(TableCollection *self)
     int err;
     PyObject *ret = NULL;
 
-    if (TableCollection_check_state(self) != 0) {
+    if (TableCollection_check_write(self) != 0) {
         goto out;
     }
     err = tsk_table_collection_compute_mutation_times(self->tables, NULL, 0);
@@ -7364,7 +8028,7 @@ TableCollection_deduplicate_sites(TableCollection *self)
     int err;
     PyObject *ret = NULL;
 
-    if (TableCollection_check_state(self) != 0) {
+    if (TableCollection_check_write(self) != 0) {
         goto out;
     }
     err = tsk_table_collection_deduplicate_sites(self->tables, 0);
@@ -7378,12 +8042,23 @@ out:
 }
 
 static PyObject *
-TableCollection_build_index(TableCollection *self)
+TableCollection_build_index(TableCollection *self, PyObject *args, PyObject *kwds)
 {
     int err;
     PyObject *ret = NULL;
+    static char *kwlist[] = { "tree_checkpoint_interval", NULL };
+    Py_ssize_t tree_checkpoint_interval = 0;
 
-    if (TableCollection_check_state(self) != 0) {
+    if (TableCollection_check_write(self) != 0) {
+        goto out;
+    }
+    if (!PyArg_ParseTupleAndKeywords(
+            args, kwds, "|n", kwlist, &tree_checkpoint_interval)) {
+        goto out;
+    }
+    if (tree_checkpoint_interval < 0) {
+        PyErr_SetString(
+            PyExc_ValueError, "tree_checkpoint_interval must be non-negative");
         goto out;
     }
     err = tsk_table_collection_build_index(self->tables, 0);
@@ -7391,6 +8066,14 @@ TableCollection_build_index(TableCollection *self)
         handle_library_error(err);
         goto out;
     }
+    if (tree_checkpoint_interval > 0) {
+        err = tsk_table_collection_build_tree_checkpoints(
+            self->tables, (tsk_size_t) tree_checkpoint_interval, 0);
+        if (err != 0) {
+            handle_library_error(err);
+            goto out;
+        }
+    }
     ret = Py_BuildValue("");
 out:
     return ret;
@@ -7402,7 +8085,7 @@ TableCollection_drop_index(TableCollection *self)
     int err;
     PyObject *ret = NULL;
 
-    if (TableCollection_check_state(self) != 0) {
+    if (TableCollection_check_write(self) != 0) {
         goto out;
     }
     err = tsk_table_collection_drop_index(self->tables, 0);
@@ -7433,13 +8116,15 @@ TableCollection_get_indexes(TableCollection *self, void *closure)
     }
 
     if (tsk_table_collection_has_index(self->tables, 0)) {
-        insertion = table_get_column_array(self->tables->indexes.num_edges,
-            self->tables->indexes.edge_insertion_order, NPY_INT32, sizeof(tsk_id_t));
+        insertion = table_get_column_array(table_view_owner(self),
+            self->tables->indexes.num_edges, self->tables->indexes.edge_insertion_order,
+            NPY_INT32, sizeof(tsk_id_t));
         if (insertion == NULL) {
             goto out;
         }
-        removal = table_get_column_array(self->tables->indexes.num_edges,
-            self->tables->indexes.edge_removal_order, NPY_INT32, sizeof(tsk_id_t));
+        removal = table_get_column_array(table_view_owner(self),
+            self->tables->indexes.num_edges, self->tables->indexes.edge_removal_order,
+            NPY_INT32, sizeof(tsk_id_t));
         if (removal == NULL) {
             goto out;
         }
@@ -7467,7 +8152,7 @@ TableCollection_set_indexes(TableCollection *self, PyObject *arg, void *closure)
     int err;
     int ret = -1;
 
-    if (TableCollection_check_state(self) != 0) {
+    if (TableCollection_check_write(self) != 0) {
         goto out;
     }
 
@@ -7508,6 +8193,20 @@ out:
     return ret;
 }
 
+static PyObject *
+TableCollection_has_tree_checkpoints(TableCollection *self)
+{
+    PyObject *ret = NULL;
+
+    if (TableCollection_check_state(self) != 0) {
+        goto out;
+    }
+    bool has_tree_checkpoints = tsk_table_collection_has_tree_checkpoints(self->tables);
+    ret = Py_BuildValue("i", (int) has_tree_checkpoints);
+out:
+    return ret;
+}
+
 static PyObject *
 TableCollection_equals(TableCollection *self, PyObject *args, PyObject *kwds)
 {
@@ -7572,7 +8271,7 @@ TableCollection_clear(TableCollection *self, PyObject *args, PyObject *kwds)
     static char *kwlist[] = { "clear_provenance", "clear_metadata_schemas",
         "clear_ts_metadata_and_schema", NULL };
 
-    if (TableCollection_check_state(self)) {
+    if (TableCollection_check_write(self)) {
         goto out;
     }
     if (!PyArg_ParseTupleAndKeywords(args, kwds, "|iii", kwlist, &clear_provenance,
@@ -7645,6 +8344,9 @@ TableCollection_load(TableCollection *self, PyObject *args, PyObject *kwds)
     int skip_reference_sequence = false;
     static char *kwlist[] = { "file", "skip_tables", "skip_reference_sequence", NULL };
 
+    if (table_check_write(self) != 0) {
+        goto out;
+    }
     if (!PyArg_ParseTupleAndKeywords(args, kwds, "O|ii", kwlist, &py_file, &skip_tables,
             &skip_reference_sequence)) {
         goto out;
@@ -7710,7 +8412,7 @@ TableCollection_fromdict(TableCollection *self, PyObject *args)
     PyObject *ret = NULL;
     PyObject *dict = NULL;
 
-    if (TableCollection_check_state(self) != 0) {
+    if (TableCollection_check_write(self) != 0) {
         goto out;
     }
     if (!PyArg_ParseTuple(args, "O!", &PyDict_Type, &dict)) {
@@ -7842,8 +8544,9 @@ static PyMethodDef TableCollection_methods[] = {
         .ml_doc = "Removes sites with duplicate positions." },
     { .ml_name = "build_index",
         .ml_meth = (PyCFunction) TableCollection_build_index,
-        .ml_flags = METH_NOARGS,
-        .ml_doc = "Builds an index on the table collection." },
+        .ml_flags = METH_VARARGS | METH_KEYWORDS,
+        .ml_doc = "Builds an index on the table collection, optionally with "
+                  "tree checkpoints every tree_checkpoint_interval trees." },
     { .ml_name = "drop_index",
         .ml_meth = (PyCFunction) TableCollection_drop_index,
         .ml_flags = METH_NOARGS,
@@ -7856,6 +8559,10 @@ static PyMethodDef TableCollection_methods[] = {
         .ml_meth = (PyCFunction) TableCollection_has_index,
         .ml_flags = METH_NOARGS,
         .ml_doc = "Returns True if the TableCollection is indexed." },
+    { .ml_name = "has_tree_checkpoints",
+        .ml_meth = (PyCFunction) TableCollection_has_tree_checkpoints,
+        .ml_flags = METH_NOARGS,
+        .ml_doc = "Returns True if the TableCollection has tree checkpoints." },
     { .ml_name = "clear",
         .ml_meth = (PyCFunction) TableCollection_clear,
         .ml_flags = METH_VARARGS | METH_KEYWORDS,
@@ -7894,6 +8601,196 @@ static PyTypeObject TableCollectionType = {
     // clang-format on
 };
 
+/*===================================================================
+ * Simplifier
+ *===================================================================
+ */
+
+static int
+Simplifier_check_state(Simplifier *self)
+{
+    int ret = -1;
+    if (self->simplifier == NULL) {
+        PyErr_SetString(PyExc_SystemError, "Simplifier not initialised");
+        goto out;
+    }
+    if (self->tables->locked > 0) {
+        PyErr_SetString(PyExc_RuntimeError, "TableCollection in use by other thread.");
+        goto out;
+    }
+    ret = 0;
+out:
+    return ret;
+}
+
+static void
+Simplifier_dealloc(Simplifier *self)
+{
+    if (self->simplifier != NULL) {
+        tsk_simplifier_free(self->simplifier);
+        PyMem_Free(self->simplifier);
+        self->simplifier = NULL;
+    }
+    Py_XDECREF(self->tables);
+    Py_TYPE(self)->tp_free((PyObject *) self);
+}
+
+static int
+Simplifier_init(Simplifier *self, PyObject *args, PyObject *kwds)
+{
+    int ret = -1;
+    int err;
+    static char *kwlist[] = { "tables", "filter_sites", "filter_populations",
+        "filter_individuals", "filter_nodes", "update_sample_flags", "keep_unary",
+        "keep_unary_in_individuals", NULL };
+    TableCollection *tables = NULL;
+    tsk_flags_t options = 0;
+    int filter_sites = false;
+    int filter_individuals = false;
+    int filter_populations = false;
+    int filter_nodes = true;
+    int update_sample_flags = true;
+    int keep_unary = false;
+    int keep_unary_in_individuals = false;
+
+    self->simplifier = NULL;
+    self->tables = NULL;
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "O!|iiiiiii", kwlist,
+            &TableCollectionType, &tables, &filter_sites, &filter_populations,
+            &filter_individuals, &filter_nodes, &update_sample_flags, &keep_unary,
+            &keep_unary_in_individuals)) {
+        goto out;
+    }
+    self->tables = tables;
+    Py_INCREF(self->tables);
+    if (TableCollection_check_write(self->tables) != 0) {
+        goto out;
+    }
+    if (filter_sites) {
+        options |= TSK_SIMPLIFY_FILTER_SITES;
+    }
+    if (filter_individuals) {
+        options |= TSK_SIMPLIFY_FILTER_INDIVIDUALS;
+    }
+    if (filter_populations) {
+        options |= TSK_SIMPLIFY_FILTER_POPULATIONS;
+    }
+    if (!filter_nodes) {
+        options |= TSK_SIMPLIFY_NO_FILTER_NODES;
+    }
+    if (!update_sample_flags) {
+        options |= TSK_SIMPLIFY_NO_UPDATE_SAMPLE_FLAGS;
+    }
+    if (keep_unary) {
+        options |= TSK_SIMPLIFY_KEEP_UNARY;
+    }
+    if (keep_unary_in_individuals) {
+        options |= TSK_SIMPLIFY_KEEP_UNARY_IN_INDIVIDUALS;
+    }
+    self->simplifier = PyMem_Malloc(sizeof(tsk_simplifier_t));
+    if (self->simplifier == NULL) {
+        PyErr_NoMemory();
+        goto out;
+    }
+    err = tsk_simplifier_init(self->simplifier, self->tables->tables, options);
+    if (err != 0) {
+        handle_library_error(err);
+        goto out;
+    }
+    ret = 0;
+out:
+    return ret;
+}
+
+static PyObject *
+Simplifier_run(Simplifier *self, PyObject *args, PyObject *kwds)
+{
+    int err;
+    PyObject *ret = NULL;
+    PyObject *samples = NULL;
+    PyArrayObject *samples_array = NULL;
+    PyArrayObject *node_map_array = NULL;
+    npy_intp dims;
+    static char *kwlist[] = { "samples", NULL };
+
+    if (Simplifier_check_state(self) != 0) {
+        goto out;
+    }
+    if (TableCollection_check_write(self->tables) != 0) {
+        goto out;
+    }
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "O", kwlist, &samples)) {
+        goto out;
+    }
+    samples_array = (PyArrayObject *) PyArray_FROMANY(
+        samples, NPY_INT32, 1, 1, NPY_ARRAY_IN_ARRAY);
+    if (samples_array == NULL) {
+        goto out;
+    }
+    dims = (npy_intp) self->tables->tables->nodes.num_rows;
+    node_map_array = (PyArrayObject *) PyArray_SimpleNew(1, &dims, NPY_INT32);
+    if (node_map_array == NULL) {
+        goto out;
+    }
+    err = tsk_simplifier_run(self->simplifier, PyArray_DATA(samples_array),
+        (tsk_size_t) PyArray_DIMS(samples_array)[0], PyArray_DATA(node_map_array));
+    if (err != 0) {
+        handle_library_error(err);
+        goto out;
+    }
+    ret = (PyObject *) node_map_array;
+    node_map_array = NULL;
+out:
+    Py_XDECREF(samples_array);
+    Py_XDECREF(node_map_array);
+    return ret;
+}
+
+static PyObject *
+Simplifier_get_tables(Simplifier *self, void *closure)
+{
+    PyObject *ret = NULL;
+
+    if (Simplifier_check_state(self) != 0) {
+        goto out;
+    }
+    Py_INCREF(self->tables);
+    ret = (PyObject *) self->tables;
+out:
+    return ret;
+}
+
+static PyGetSetDef Simplifier_getsetters[] = {
+    { .name = "tables",
+        .get = (getter) Simplifier_get_tables,
+        .doc = "The table collection that is simplified in place." },
+    { NULL } /* Sentinel */
+};
+
+static PyMethodDef Simplifier_methods[] = {
+    { .ml_name = "run",
+        .ml_meth = (PyCFunction) Simplifier_run,
+        .ml_flags = METH_VARARGS | METH_KEYWORDS,
+        .ml_doc = "Sorts and simplifies the tables with respect to the specified "
+                  "samples, returning the node map." },
+    { NULL } /* Sentinel */
+};
+
+static PyTypeObject SimplifierType = {
+    // clang-format off
+    PyVarObject_HEAD_INIT(NULL, 0)
+    .tp_name = "_tskit.Simplifier",
+    .tp_basicsize = sizeof(Simplifier),
+    .tp_dealloc = (destructor) Simplifier_dealloc,
+    .tp_flags = Py_TPFLAGS_DEFAULT,
+    .tp_doc = "Simplifier objects",
+    .tp_methods = Simplifier_methods,
+    .tp_getset = Simplifier_getsetters,
+    .tp_init = (initproc) Simplifier_init,
+    .tp_new = PyType_GenericNew,
+    // clang-format on
+};
+
 /*===================================================================
  * TreeSequence
  *===================================================================
@@ -8028,6 +8925,9 @@ TreeSequence_dump_tables(TreeSequence *self, PyObject *args, PyObject *kwds)
             args, kwds, "O!", kwlist, &TableCollectionType, &tables)) {
         goto out;
     }
+    if (table_check_write(tables) != 0) {
+        goto out;
+    }
     err = tsk_treeseq_copy_tables(self->tree_sequence, tables->tables, TSK_NO_INIT);
     if (err != 0) {
         handle_library_error(err);
@@ -8048,10 +8948,12 @@ TreeSequence_load(TreeSequence *self, PyObject *args, PyObject *kwds)
     tsk_flags_t options = 0;
     int skip_tables = false;
     int skip_reference_sequence = false;
-    static char *kwlist[] = { "file", "skip_tables", "skip_reference_sequence", NULL };
+    int mmap = false;
+    static char *kwlist[]
+        = { "file", "skip_tables", "skip_reference_sequence", "mmap", NULL };
 
-    if (!PyArg_ParseTupleAndKeywords(args, kwds, "O|ii", kwlist, &py_file, &skip_tables,
-            &skip_reference_sequence)) {
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "O|iii", kwlist, &py_file, &skip_tables,
+            &skip_reference_sequence, &mmap)) {
         goto out;
     }
     if (skip_tables) {
@@ -8060,6 +8962,9 @@ TreeSequence_load(TreeSequence *self, PyObject *args, PyObject *kwds)
     if (skip_reference_sequence) {
         options |= TSK_LOAD_SKIP_REFERENCE_SEQUENCE;
     }
+    if (mmap) {
+        options |= TSK_LOAD_MMAP;
+    }
     file = make_file(py_file, "rb");
     if (file == NULL) {
         goto out;
@@ -8493,6 +9398,57 @@ out:
     return ret;
 }
 
+static PyObject *
+TreeSequence_get_column_residency(TreeSequence *self, PyObject *args)
+{
+    int err;
+    PyObject *ret = NULL;
+    PyObject *result = NULL;
+    PyObject *value = NULL;
+    tsk_size_t *resident = NULL;
+    const tsk_table_collection_t *tables;
+    const tsk_mapped_column_t *column;
+    tsk_size_t j;
+
+    if (TreeSequence_check_state(self) != 0) {
+        goto out;
+    }
+    tables = self->tree_sequence->tables;
+    resident = PyMem_Malloc((tables->mapping.num_columns + 1) * sizeof(*resident));
+    if (resident == NULL) {
+        PyErr_NoMemory();
+        goto out;
+    }
+    err = tsk_table_collection_get_column_residency(tables, resident);
+    if (err != 0) {
+        handle_library_error(err);
+        goto out;
+    }
+    result = PyDict_New();
+    if (result == NULL) {
+        goto out;
+    }
+    for (j = 0; j < tables->mapping.num_columns; j++) {
+        column = &tables->mapping.columns[j];
+        value = Py_BuildValue("nn", (Py_ssize_t) resident[j], (Py_ssize_t) column->size);
+        if (value == NULL) {
+            goto out;
+        }
+        if (PyDict_SetItemString(result, column->name, value) != 0) {
+            goto out;
+        }
+        Py_DECREF(value);
+        value = NULL;
+    }
+    ret = result;
+    result = NULL;
+out:
+    PyMem_Free(resident);
+    Py_XDECREF(value);
+    Py_XDECREF(result);
+    return ret;
+}
+
 static PyObject *
 TreeSequence_get_sequence_length(TreeSequence *self)
 {
@@ -8718,6 +9674,65 @@ out:
     return ret;
 }
 
+static PyObject *
+TreeSequence_get_tree_metrics(TreeSequence *self, PyObject *args, PyObject *kwds)
+{
+    PyObject *ret = NULL;
+    static char *kwlist[] = { "start", "stop", NULL };
+    tsk_id_t start, stop;
+    PyArrayObject *total_branch_length = NULL;
+    PyArrayObject *num_roots = NULL;
+    PyArrayObject *tmrca = NULL;
+    PyArrayObject *sackin_index = NULL;
+    PyArrayObject *colless_index = NULL;
+    PyArrayObject *b1_index = NULL;
+    npy_intp dim;
+    int err;
+
+    if (TreeSequence_check_state(self) != 0) {
+        goto out;
+    }
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "O&O&", kwlist, &tsk_id_converter,
+            &start, &tsk_id_converter, &stop)) {
+        goto out;
+    }
+    dim = TSK_MAX(0, stop - start);
+    total_branch_length = (PyArrayObject *) PyArray_SimpleNew(1, &dim, NPY_FLOAT64);
+    num_roots = (PyArrayObject *) PyArray_SimpleNew(1, &dim, NPY_UINT64);
+    tmrca = (PyArrayObject *) PyArray_SimpleNew(1, &dim, NPY_FLOAT64);
+    sackin_index = (PyArrayObject *) PyArray_SimpleNew(1, &dim, NPY_UINT64);
+    colless_index = (PyArrayObject *) PyArray_SimpleNew(1, &dim, NPY_FLOAT64);
+    b1_index = (PyArrayObject *) PyArray_SimpleNew(1, &dim, NPY_FLOAT64);
+    if (total_branch_length == NULL || num_roots == NULL || tmrca == NULL
+        || sackin_index == NULL || colless_index == NULL || b1_index == NULL) {
+        goto out;
+    }
+
+    // clang-format off
+    Py_BEGIN_ALLOW_THREADS
+    err = tsk_treeseq_get_tree_metrics(self->tree_sequence, start, stop, 0,
+        PyArray_DATA(total_branch_length), PyArray_DATA(num_roots),
+        PyArray_DATA(tmrca), PyArray_DATA(sackin_index),
+        PyArray_DATA(colless_index), PyArray_DATA(b1_index));
+    Py_END_ALLOW_THREADS
+        // clang-format on
+        if (err != 0)
+    {
+        handle_library_error(err);
+        goto out;
+    }
+    ret = Py_BuildValue("OOOOOO", total_branch_length, num_roots, tmrca, sackin_index,
+        colless_index, b1_index);
+out:
+    Py_XDECREF(total_branch_length);
+    Py_XDECREF(num_roots);
+    Py_XDECREF(tmrca);
+    Py_XDECREF(sackin_index);
+    Py_XDECREF(colless_index);
+    Py_XDECREF(b1_index);
+    return ret;
+}
+
 static PyObject *
 TreeSequence_genealogical_nearest_neighbours(
     TreeSequence *self, PyObject *args, PyObject *kwds)
@@ -8937,11 +9952,6 @@ out:
     return ret;
 }
 
-/* Error value returned from summary_func callback if an error occured.
- * This is chosen so that it is not a valid tskit error code and so can
- * never be mistaken for a different error */
-#define TSK_PYTHON_CALLBACK_ERROR (-100000)
-
 /* Run the Python callable that takes X as parameter and must return a
  * 1D array of length M that we copy in to the Y array */
 static int
@@ -8955,6 +9965,8 @@ general_stat_func(tsk_size_t K, const double *X, tsk_size_t M, double *Y, void *
     PyArrayObject *Y_array = NULL;
     npy_intp X_dims = (npy_intp) K;
     npy_intp *Y_dims;
+    /* The GIL is released while computing the statistic */
+    PyGILState_STATE gil_state = PyGILState_Ensure();
 
     X_array = (PyArrayObject *) PyArray_SimpleNew(1, &X_dims, NPY_FLOAT64);
     if (X_array == NULL) {
@@ -8997,41 +10009,106 @@ out:
     Py_XDECREF(arglist);
     Py_XDECREF(result);
     Py_XDECREF(Y_array);
+    PyGILState_Release(gil_state);
     return ret;
 }
 
+/* Run the Python callable that takes the N x K array X as parameter and must
+ * return an N x M array that we copy in to the Y array */
 static int
-parse_stats_mode(char *mode, tsk_flags_t *ret)
+general_stat_batch_func(
+    tsk_size_t K, tsk_size_t N, const double *X, tsk_size_t M, double *Y, void *params)
 {
-    tsk_flags_t value = 0;
+    int ret = TSK_PYTHON_CALLBACK_ERROR;
+    PyObject *callable = (PyObject *) params;
+    PyObject *arglist = NULL;
+    PyObject *result = NULL;
+    PyArrayObject *X_array = NULL;
+    PyArrayObject *Y_array = NULL;
+    npy_intp X_dims[2] = { (npy_intp) N, (npy_intp) K };
+    npy_intp *Y_dims;
+    /* The GIL is released while computing the statistic */
+    PyGILState_STATE gil_state = PyGILState_Ensure();
 
-    if (mode == NULL) {
-        value = TSK_STAT_SITE; /* defaults to site mode */
-    } else if (strcmp(mode, "site") == 0) {
-        value = TSK_STAT_SITE;
-    } else if (strcmp(mode, "branch") == 0) {
-        value = TSK_STAT_BRANCH;
-    } else if (strcmp(mode, "node") == 0) {
-        value = TSK_STAT_NODE;
-    } else {
-        PyErr_SetString(PyExc_ValueError, "Unrecognised stats mode");
-        return -1;
+    X_array = (PyArrayObject *) PyArray_SimpleNew(2, X_dims, NPY_FLOAT64);
+    if (X_array == NULL) {
+        goto out;
     }
-    *ret = value;
-    return 0;
-}
-
-static int
-parse_windows(
-    PyObject *windows, PyArrayObject **ret_windows_array, tsk_size_t *ret_num_windows)
-{
-    int ret = -1;
-    tsk_size_t num_windows = 0;
-    PyArrayObject *windows_array = NULL;
-    npy_intp *shape;
-
+    memcpy(PyArray_DATA(X_array), X, N * K * sizeof(*X));
+    arglist = Py_BuildValue("(O)", X_array);
+    if (arglist == NULL) {
+        goto out;
+    }
+    result = PyObject_CallObject(callable, arglist);
+    if (result == NULL) {
+        goto out;
+    }
+    Y_array = (PyArrayObject *) PyArray_FromAny(
+        result, PyArray_DescrFromType(NPY_FLOAT64), 0, 0, NPY_ARRAY_IN_ARRAY, NULL);
+    if (Y_array == NULL) {
+        goto out;
+    }
+    if (PyArray_NDIM(Y_array) != 2) {
+        PyErr_Format(PyExc_ValueError,
+            "Array returned by vectorised general_stat callback is %d dimensional; "
+            "must be 2D",
+            (int) PyArray_NDIM(Y_array));
+        goto out;
+    }
+    Y_dims = PyArray_DIMS(Y_array);
+    if (Y_dims[0] != (npy_intp) N || Y_dims[1] != (npy_intp) M) {
+        PyErr_Format(PyExc_ValueError,
+            "Array returned by vectorised general_stat callback has shape (%d, %d); "
+            "must be (%d, %d)",
+            (int) Y_dims[0], (int) Y_dims[1], (int) N, (int) M);
+        goto out;
+    }
+    /* Copy the contents of the return Y array into Y */
+    memcpy(Y, PyArray_DATA(Y_array), N * M * sizeof(*Y));
+    ret = 0;
+out:
+    Py_XDECREF(X_array);
+    Py_XDECREF(arglist);
+    Py_XDECREF(result);
+    Py_XDECREF(Y_array);
+    PyGILState_Release(gil_state);
+    return ret;
+}
+
+static int
+parse_stats_mode(char *mode, tsk_flags_t *ret)
+{
+    tsk_flags_t value = 0;
+
+    if (mode == NULL) {
+        value = TSK_STAT_SITE; /* defaults to site mode */
+    } else if (strcmp(mode, "site") == 0) {
+        value = TSK_STAT_SITE;
+    } else if (strcmp(mode, "branch") == 0) {
+        value = TSK_STAT_BRANCH;
+    } else if (strcmp(mode, "node") == 0) {
+        value = TSK_STAT_NODE;
+    } else {
+        PyErr_SetString(PyExc_ValueError, "Unrecognised stats mode");
+        return -1;
+    }
+    *ret = value;
+    return 0;
+}
+
+static int
+parse_windows(
+    PyObject *windows, PyArrayObject **ret_windows_array, tsk_size_t *ret_num_windows)
+{
+    int ret = -1;
+    tsk_size_t num_windows = 0;
+    PyArrayObject *windows_array = NULL;
+    npy_intp *shape;
+
+    /* Statistics are computed with the GIL released, so we take a copy to
+     * ensure that the windows can't be modified while in use */
     windows_array = (PyArrayObject *) PyArray_FROMANY(
-        windows, NPY_FLOAT64, 1, 1, NPY_ARRAY_IN_ARRAY);
+        windows, NPY_FLOAT64, 1, 1, NPY_ARRAY_IN_ARRAY | NPY_ARRAY_ENSURECOPY);
     if (windows_array == NULL) {
         goto out;
     }
@@ -9076,12 +10153,186 @@ out:
     return result_array;
 }
 
+static PyObject *
+TreeSequence_tmrca_matrix(TreeSequence *self, PyObject *args, PyObject *kwds)
+{
+    PyObject *ret = NULL;
+    static char *kwlist[] = { "nodes", "windows", "span_normalise", NULL };
+    PyObject *nodes = NULL;
+    PyObject *windows = NULL;
+    PyArrayObject *nodes_array = NULL;
+    PyArrayObject *windows_array = NULL;
+    PyArrayObject *result_array = NULL;
+    tsk_size_t num_windows;
+    npy_intp dims[3];
+    int span_normalise = 0;
+    tsk_flags_t options = 0;
+    int err;
+
+    if (TreeSequence_check_state(self) != 0) {
+        goto out;
+    }
+    if (!PyArg_ParseTupleAndKeywords(
+            args, kwds, "OO|i", kwlist, &nodes, &windows, &span_normalise)) {
+        goto out;
+    }
+    if (span_normalise) {
+        options |= TSK_STAT_SPAN_NORMALISE;
+    }
+    /* Take a copy as we release the GIL */
+    nodes_array = (PyArrayObject *) PyArray_FROMANY(
+        nodes, NPY_INT32, 1, 1, NPY_ARRAY_IN_ARRAY | NPY_ARRAY_ENSURECOPY);
+    if (nodes_array == NULL) {
+        goto out;
+    }
+    if (parse_windows(windows, &windows_array, &num_windows) != 0) {
+        goto out;
+    }
+    dims[0] = (npy_intp) num_windows;
+    dims[1] = PyArray_DIMS(nodes_array)[0];
+    dims[2] = dims[1];
+    result_array = (PyArrayObject *) PyArray_SimpleNew(3, dims, NPY_FLOAT64);
+    if (result_array == NULL) {
+        goto out;
+    }
+
+    // clang-format off
+    Py_BEGIN_ALLOW_THREADS
+    err = tsk_treeseq_tmrca_matrix(self->tree_sequence, (tsk_size_t) dims[1],
+        PyArray_DATA(nodes_array), num_windows, PyArray_DATA(windows_array),
+        options, PyArray_DATA(result_array));
+    Py_END_ALLOW_THREADS
+        // clang-format on
+        if (err != 0)
+    {
+        handle_library_error(err);
+        goto out;
+    }
+    ret = (PyObject *) result_array;
+    result_array = NULL;
+out:
+    Py_XDECREF(nodes_array);
+    Py_XDECREF(windows_array);
+    Py_XDECREF(result_array);
+    return ret;
+}
+
+static PyObject *
+TreeSequence_coalescence_time_table(TreeSequence *self, PyObject *args, PyObject *kwds)
+{
+    PyObject *ret = NULL;
+    static char *kwlist[] = { "sample_set_sizes", "sample_sets", "windows",
+        "weight_func", "num_blocks", "span_normalise", "partial_windows", NULL };
+    PyObject *sample_set_sizes = NULL;
+    PyObject *sample_sets = NULL;
+    PyObject *windows = NULL;
+    char *weight_func = NULL;
+    PyArrayObject *sample_set_sizes_array = NULL;
+    PyArrayObject *sample_sets_array = NULL;
+    PyArrayObject *windows_array = NULL;
+    PyArrayObject *time_array = NULL;
+    PyArrayObject *window_array = NULL;
+    PyArrayObject *block_array = NULL;
+    PyArrayObject *weights_array = NULL;
+    tsk_coalescence_time_table_t result;
+    tsk_size_t num_sample_sets, num_windows;
+    Py_ssize_t num_blocks = 1;
+    npy_intp dims[2];
+    int span_normalise = 0;
+    int partial_windows = 0;
+    tsk_flags_t options = 0;
+    int err;
+
+    tsk_memset(&result, 0, sizeof(result));
+    if (TreeSequence_check_state(self) != 0) {
+        goto out;
+    }
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "OOOs|nii", kwlist, &sample_set_sizes,
+            &sample_sets, &windows, &weight_func, &num_blocks, &span_normalise,
+            &partial_windows)) {
+        goto out;
+    }
+    if (strcmp(weight_func, "coalescence_events") == 0) {
+        options |= TSK_COALESCENCE_EVENTS;
+    } else if (strcmp(weight_func, "pair_coalescence_events") == 0) {
+        options |= TSK_COALESCENCE_EVENTS_PAIR;
+    } else if (strcmp(weight_func, "trio_first_coalescence_events") == 0) {
+        options |= TSK_COALESCENCE_EVENTS_TRIO;
+    } else {
+        PyErr_SetString(PyExc_ValueError, "Unrecognised weight function");
+        goto out;
+    }
+    if (num_blocks < 1) {
+        PyErr_SetString(PyExc_ValueError, "num_blocks must be >= 1");
+        goto out;
+    }
+    if (span_normalise) {
+        options |= TSK_STAT_SPAN_NORMALISE;
+    }
+    if (partial_windows) {
+        options |= TSK_STAT_PARTIAL_WINDOWS;
+    }
+    if (parse_sample_sets(sample_set_sizes, &sample_set_sizes_array, sample_sets,
+            &sample_sets_array, &num_sample_sets)
+        != 0) {
+        goto out;
+    }
+    if (parse_windows(windows, &windows_array, &num_windows) != 0) {
+        goto out;
+    }
+
+    // clang-format off
+    Py_BEGIN_ALLOW_THREADS
+    err = tsk_treeseq_coalescence_time_table(self->tree_sequence, num_sample_sets,
+        PyArray_DATA(sample_set_sizes_array), PyArray_DATA(sample_sets_array),
+        num_windows, PyArray_DATA(windows_array), (tsk_size_t) num_blocks, options,
+        &result);
+    Py_END_ALLOW_THREADS
+    if (err != 0) {
+        handle_library_error(err);
+        goto out;
+    }
+    // clang-format on
+    dims[0] = (npy_intp) result.num_records;
+    dims[1] = (npy_intp) result.num_weights;
+    time_array = (PyArrayObject *) PyArray_SimpleNew(1, dims, NPY_FLOAT64);
+    window_array = (PyArrayObject *) PyArray_SimpleNew(1, dims, NPY_INT32);
+    block_array = (PyArrayObject *) PyArray_SimpleNew(1, dims, NPY_INT32);
+    weights_array = (PyArrayObject *) PyArray_SimpleNew(2, dims, NPY_FLOAT64);
+    if (time_array == NULL || window_array == NULL || block_array == NULL
+        || weights_array == NULL) {
+        goto out;
+    }
+    if (result.num_records > 0) {
+        memcpy(PyArray_DATA(time_array), result.time,
+            result.num_records * sizeof(*result.time));
+        memcpy(PyArray_DATA(window_array), result.window,
+            result.num_records * sizeof(*result.window));
+        memcpy(PyArray_DATA(block_array), result.block,
+            result.num_records * sizeof(*result.block));
+        memcpy(PyArray_DATA(weights_array), result.weights,
+            result.num_records * result.num_weights * sizeof(*result.weights));
+    }
+    ret = Py_BuildValue("OOOO", time_array, window_array, block_array, weights_array);
+out:
+    tsk_coalescence_time_table_free(&result);
+    Py_XDECREF(sample_set_sizes_array);
+    Py_XDECREF(sample_sets_array);
+    Py_XDECREF(windows_array);
+    Py_XDECREF(time_array);
+    Py_XDECREF(window_array);
+    Py_XDECREF(block_array);
+    Py_XDECREF(weights_array);
+    return ret;
+}
+
 static PyObject *
 TreeSequence_general_stat(TreeSequence *self, PyObject *args, PyObject *kwds)
 {
     PyObject *ret = NULL;
-    static char *kwlist[] = { "weights", "summary_func", "output_dim", "windows", "mode",
-        "polarised", "span_normalise", NULL };
+    static char *kwlist[]
+        = { "weights", "summary_func", "output_dim", "windows", "mode", "polarised",
+              "span_normalise", "partial_windows", "vectorised", "compiled", NULL };
     PyObject *weights = NULL;
     PyObject *summary_func = NULL;
     PyObject *windows = NULL;
@@ -9095,20 +10346,49 @@ TreeSequence_general_stat(TreeSequence *self, PyObject *args, PyObject *kwds)
     unsigned int output_dim;
     npy_intp *w_shape;
     tsk_flags_t options = 0;
+    int partial_windows = 0;
+    int vectorised = 0;
+    int compiled = 0;
+    unsigned long long address;
+    general_stat_func_t *f = general_stat_func;
+    general_stat_batch_func_t *batch_f = general_stat_batch_func;
+    void *f_params = NULL;
     int err;
 
     if (TreeSequence_check_state(self) != 0) {
         goto out;
     }
-    if (!PyArg_ParseTupleAndKeywords(args, kwds, "OOIO|sii", kwlist, &weights,
-            &summary_func, &output_dim, &windows, &mode, &polarised, &span_normalise)) {
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "OOIO|siiiii", kwlist, &weights,
+            &summary_func, &output_dim, &windows, &mode, &polarised, &span_normalise,
+            &partial_windows, &vectorised, &compiled)) {
         Py_XINCREF(summary_func);
         goto out;
     }
     Py_INCREF(summary_func);
-    if (!PyCallable_Check(summary_func)) {
-        PyErr_SetString(PyExc_TypeError, "summary_func must be callable");
-        goto out;
+    if (compiled) {
+        /* The summary function is the address of a compiled function, which
+         * is called directly by the library with NULL params */
+        if (!PyLong_Check(summary_func)) {
+            PyErr_SetString(PyExc_TypeError,
+                "summary_func must be the integer address of a compiled function");
+            goto out;
+        }
+        address = PyLong_AsUnsignedLongLong(summary_func);
+        if (PyErr_Occurred()) {
+            goto out;
+        }
+        if (address == 0) {
+            PyErr_SetString(PyExc_ValueError, "Compiled summary_func address is NULL");
+            goto out;
+        }
+        f = (general_stat_func_t *) (uintptr_t) address;
+        batch_f = (general_stat_batch_func_t *) (uintptr_t) address;
+    } else {
+        if (!PyCallable_Check(summary_func)) {
+            PyErr_SetString(PyExc_TypeError, "summary_func must be callable");
+            goto out;
+        }
+        f_params = summary_func;
     }
     if (parse_stats_mode(mode, &options) != 0) {
         goto out;
@@ -9119,12 +10399,15 @@ TreeSequence_general_stat(TreeSequence *self, PyObject *args, PyObject *kwds)
     if (span_normalise) {
         options |= TSK_STAT_SPAN_NORMALISE;
     }
+    if (partial_windows) {
+        options |= TSK_STAT_PARTIAL_WINDOWS;
+    }
     if (parse_windows(windows, &windows_array, &num_windows) != 0) {
         goto out;
     }
 
     weights_array = (PyArrayObject *) PyArray_FROMANY(
-        weights, NPY_FLOAT64, 2, 2, NPY_ARRAY_IN_ARRAY);
+        weights, NPY_FLOAT64, 2, 2, NPY_ARRAY_IN_ARRAY | NPY_ARRAY_ENSURECOPY);
     if (weights_array == NULL) {
         goto out;
     }
@@ -9139,15 +10422,25 @@ TreeSequence_general_stat(TreeSequence *self, PyObject *args, PyObject *kwds)
         goto out;
     }
 
-    err = tsk_treeseq_general_stat(self->tree_sequence, w_shape[1],
-        PyArray_DATA(weights_array), output_dim, general_stat_func, summary_func,
-        num_windows, PyArray_DATA(windows_array), options, PyArray_DATA(result_array));
-    if (err == TSK_PYTHON_CALLBACK_ERROR) {
+    // clang-format off
+    Py_BEGIN_ALLOW_THREADS
+    if (vectorised) {
+        err = tsk_treeseq_general_stat_batch(self->tree_sequence, w_shape[1],
+            PyArray_DATA(weights_array), output_dim, batch_f, f_params, num_windows,
+            PyArray_DATA(windows_array), options, PyArray_DATA(result_array));
+    } else {
+        err = tsk_treeseq_general_stat(self->tree_sequence, w_shape[1],
+            PyArray_DATA(weights_array), output_dim, f, f_params, num_windows,
+            PyArray_DATA(windows_array), options, PyArray_DATA(result_array));
+    }
+    Py_END_ALLOW_THREADS
+    if (err == TSK_PYTHON_CALLBACK_ERROR && !compiled) {
         goto out;
     } else if (err != 0) {
         handle_library_error(err);
         goto out;
     }
+    // clang-format on
     ret = (PyObject *) result_array;
     result_array = NULL;
 out:
@@ -9163,8 +10456,8 @@ TreeSequence_one_way_weighted_method(
     TreeSequence *self, PyObject *args, PyObject *kwds, one_way_weighted_method *method)
 {
     PyObject *ret = NULL;
-    static char *kwlist[]
-        = { "weights", "windows", "mode", "polarised", "span_normalise", NULL };
+    static char *kwlist[] = { "weights", "windows", "mode", "polarised",
+        "span_normalise", "partial_windows", NULL };
     PyObject *weights = NULL;
     PyObject *windows = NULL;
     PyArrayObject *weights_array = NULL;
@@ -9176,13 +10469,14 @@ TreeSequence_one_way_weighted_method(
     tsk_size_t num_windows;
     npy_intp *w_shape;
     tsk_flags_t options = 0;
+    int partial_windows = 0;
     int err;
 
     if (TreeSequence_check_state(self) != 0) {
         goto out;
     }
-    if (!PyArg_ParseTupleAndKeywords(args, kwds, "OO|sii", kwlist, &weights, &windows,
-            &mode, &polarised, &span_normalise)) {
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "OO|siii", kwlist, &weights, &windows,
+            &mode, &polarised, &span_normalise, &partial_windows)) {
         goto out;
     }
     if (parse_stats_mode(mode, &options) != 0) {
@@ -9194,12 +10488,15 @@ TreeSequence_one_way_weighted_method(
     if (span_normalise) {
         options |= TSK_STAT_SPAN_NORMALISE;
     }
+    if (partial_windows) {
+        options |= TSK_STAT_PARTIAL_WINDOWS;
+    }
     if (parse_windows(windows, &windows_array, &num_windows) != 0) {
         goto out;
     }
 
     weights_array = (PyArrayObject *) PyArray_FROMANY(
-        weights, NPY_FLOAT64, 2, 2, NPY_ARRAY_IN_ARRAY);
+        weights, NPY_FLOAT64, 2, 2, NPY_ARRAY_IN_ARRAY | NPY_ARRAY_ENSURECOPY);
     if (weights_array == NULL) {
         goto out;
     }
@@ -9214,14 +10511,18 @@ TreeSequence_one_way_weighted_method(
         goto out;
     }
 
+    // clang-format off
+    Py_BEGIN_ALLOW_THREADS
     err = method(self->tree_sequence, w_shape[1], PyArray_DATA(weights_array),
         num_windows, PyArray_DATA(windows_array), options, PyArray_DATA(result_array));
+    Py_END_ALLOW_THREADS
     if (err == TSK_PYTHON_CALLBACK_ERROR) {
         goto out;
     } else if (err != 0) {
         handle_library_error(err);
         goto out;
     }
+    // clang-format on
     ret = (PyObject *) result_array;
     result_array = NULL;
 out:
@@ -9237,7 +10538,7 @@ TreeSequence_one_way_covariates_method(TreeSequence *self, PyObject *args,
 {
     PyObject *ret = NULL;
     static char *kwlist[] = { "weights", "covariates", "windows", "mode", "polarised",
-        "span_normalise", NULL };
+        "span_normalise", "partial_windows", NULL };
     PyObject *weights = NULL;
     PyObject *covariates = NULL;
     PyObject *windows = NULL;
@@ -9251,13 +10552,15 @@ TreeSequence_one_way_covariates_method(TreeSequence *self, PyObject *args,
     tsk_size_t num_windows;
     npy_intp *w_shape, *z_shape;
     tsk_flags_t options = 0;
+    int partial_windows = 0;
     int err;
 
     if (TreeSequence_check_state(self) != 0) {
         goto out;
     }
-    if (!PyArg_ParseTupleAndKeywords(args, kwds, "OOO|sii", kwlist, &weights,
-            &covariates, &windows, &mode, &polarised, &span_normalise)) {
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "OOO|siii", kwlist, &weights,
+            &covariates, &windows, &mode, &polarised, &span_normalise,
+            &partial_windows)) {
         goto out;
     }
     if (parse_stats_mode(mode, &options) != 0) {
@@ -9269,12 +10572,15 @@ TreeSequence_one_way_covariates_method(TreeSequence *self, PyObject *args,
     if (span_normalise) {
         options |= TSK_STAT_SPAN_NORMALISE;
     }
+    if (partial_windows) {
+        options |= TSK_STAT_PARTIAL_WINDOWS;
+    }
     if (parse_windows(windows, &windows_array, &num_windows) != 0) {
         goto out;
     }
 
     weights_array = (PyArrayObject *) PyArray_FROMANY(
-        weights, NPY_FLOAT64, 2, 2, NPY_ARRAY_IN_ARRAY);
+        weights, NPY_FLOAT64, 2, 2, NPY_ARRAY_IN_ARRAY | NPY_ARRAY_ENSURECOPY);
     if (weights_array == NULL) {
         goto out;
     }
@@ -9285,7 +10591,7 @@ TreeSequence_one_way_covariates_method(TreeSequence *self, PyObject *args,
         goto out;
     }
     covariates_array = (PyArrayObject *) PyArray_FROMANY(
-        covariates, NPY_FLOAT64, 2, 2, NPY_ARRAY_IN_ARRAY);
+        covariates, NPY_FLOAT64, 2, 2, NPY_ARRAY_IN_ARRAY | NPY_ARRAY_ENSURECOPY);
     if (covariates_array == NULL) {
         goto out;
     }
@@ -9301,15 +10607,19 @@ TreeSequence_one_way_covariates_method(TreeSequence *self, PyObject *args,
         goto out;
     }
 
+    // clang-format off
+    Py_BEGIN_ALLOW_THREADS
     err = method(self->tree_sequence, w_shape[1], PyArray_DATA(weights_array),
         z_shape[1], PyArray_DATA(covariates_array), num_windows,
         PyArray_DATA(windows_array), options, PyArray_DATA(result_array));
+    Py_END_ALLOW_THREADS
     if (err == TSK_PYTHON_CALLBACK_ERROR) {
         goto out;
     } else if (err != 0) {
         handle_library_error(err);
         goto out;
     }
+    // clang-format on
     ret = (PyObject *) result_array;
     result_array = NULL;
 out:
@@ -9326,7 +10636,7 @@ TreeSequence_one_way_stat_method(TreeSequence *self, PyObject *args, PyObject *k
 {
     PyObject *ret = NULL;
     static char *kwlist[] = { "sample_set_sizes", "sample_sets", "windows", "mode",
-        "span_normalise", "polarised", NULL };
+        "span_normalise", "polarised", "partial_windows", NULL };
     PyObject *sample_set_sizes = NULL;
     PyObject *sample_sets = NULL;
     PyObject *windows = NULL;
@@ -9339,13 +10649,15 @@ TreeSequence_one_way_stat_method(TreeSequence *self, PyObject *args, PyObject *k
     tsk_flags_t options = 0;
     int span_normalise = 1;
     int polarised = 0;
+    int partial_windows = 0;
     int err;
 
     if (TreeSequence_check_state(self) != 0) {
         goto out;
     }
-    if (!PyArg_ParseTupleAndKeywords(args, kwds, "OOO|sii", kwlist, &sample_set_sizes,
-            &sample_sets, &windows, &mode, &span_normalise, &polarised)) {
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "OOO|siii", kwlist, &sample_set_sizes,
+            &sample_sets, &windows, &mode, &span_normalise, &polarised,
+            &partial_windows)) {
         goto out;
     }
     if (parse_stats_mode(mode, &options) != 0) {
@@ -9362,6 +10674,9 @@ TreeSequence_one_way_stat_method(TreeSequence *self, PyObject *args, PyObject *k
         != 0) {
         goto out;
     }
+    if (partial_windows) {
+        options |= TSK_STAT_PARTIAL_WINDOWS;
+    }
     if (parse_windows(windows, &windows_array, &num_windows) != 0) {
         goto out;
     }
@@ -9371,13 +10686,17 @@ TreeSequence_one_way_stat_method(TreeSequence *self, PyObject *args, PyObject *k
     if (result_array == NULL) {
         goto out;
     }
+    // clang-format off
+    Py_BEGIN_ALLOW_THREADS
     err = method(self->tree_sequence, num_sample_sets,
         PyArray_DATA(sample_set_sizes_array), PyArray_DATA(sample_sets_array),
         num_windows, PyArray_DATA(windows_array), options, PyArray_DATA(result_array));
+    Py_END_ALLOW_THREADS
     if (err != 0) {
         handle_library_error(err);
         goto out;
     }
+    // clang-format on
     ret = (PyObject *) result_array;
     result_array = NULL;
 out:
@@ -9394,7 +10713,7 @@ TreeSequence_allele_frequency_spectrum(
 {
     PyObject *ret = NULL;
     static char *kwlist[] = { "sample_set_sizes", "sample_sets", "windows", "mode",
-        "span_normalise", "polarised", NULL };
+        "span_normalise", "polarised", "partial_windows", NULL };
     PyObject *sample_set_sizes = NULL;
     PyObject *sample_sets = NULL;
     PyObject *windows = NULL;
@@ -9409,13 +10728,15 @@ TreeSequence_allele_frequency_spectrum(
     tsk_flags_t options = 0;
     int polarised = 0;
     int span_normalise = 1;
+    int partial_windows = 0;
     int err;
 
     if (TreeSequence_check_state(self) != 0) {
         goto out;
     }
-    if (!PyArg_ParseTupleAndKeywords(args, kwds, "OOO|sii", kwlist, &sample_set_sizes,
-            &sample_sets, &windows, &mode, &span_normalise, &polarised)) {
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "OOO|siii", kwlist, &sample_set_sizes,
+            &sample_sets, &windows, &mode, &span_normalise, &polarised,
+            &partial_windows)) {
         goto out;
     }
     if (parse_stats_mode(mode, &options) != 0) {
@@ -9432,6 +10753,9 @@ TreeSequence_allele_frequency_spectrum(
         != 0) {
         goto out;
     }
+    if (partial_windows) {
+        options |= TSK_STAT_PARTIAL_WINDOWS;
+    }
     if (parse_windows(windows, &windows_array, &num_windows) != 0) {
         goto out;
     }
@@ -9450,13 +10774,17 @@ TreeSequence_allele_frequency_spectrum(
     if (result_array == NULL) {
         goto out;
     }
+    // clang-format off
+    Py_BEGIN_ALLOW_THREADS
     err = tsk_treeseq_allele_frequency_spectrum(self->tree_sequence, num_sample_sets,
         PyArray_DATA(sample_set_sizes_array), PyArray_DATA(sample_sets_array),
         num_windows, PyArray_DATA(windows_array), options, PyArray_DATA(result_array));
+    Py_END_ALLOW_THREADS
     if (err != 0) {
         handle_library_error(err);
         goto out;
     }
+    // clang-format on
     ret = (PyObject *) result_array;
     result_array = NULL;
 out:
@@ -9514,7 +10842,7 @@ TreeSequence_k_way_stat_method(TreeSequence *self, PyObject *args, PyObject *kwd
 {
     PyObject *ret = NULL;
     static char *kwlist[] = { "sample_set_sizes", "sample_sets", "indexes", "windows",
-        "mode", "span_normalise", "polarised", NULL };
+        "mode", "span_normalise", "polarised", "partial_windows", NULL };
     PyObject *sample_set_sizes = NULL;
     PyObject *sample_sets = NULL;
     PyObject *indexes = NULL;
@@ -9530,13 +10858,15 @@ TreeSequence_k_way_stat_method(TreeSequence *self, PyObject *args, PyObject *kwd
     char *mode = NULL;
     int span_normalise = true;
     int polarised = false;
+    int partial_windows = 0;
     int err;
 
     if (TreeSequence_check_state(self) != 0) {
         goto out;
     }
-    if (!PyArg_ParseTupleAndKeywords(args, kwds, "OOOO|sii", kwlist, &sample_set_sizes,
-            &sample_sets, &indexes, &windows, &mode, &span_normalise, &polarised)) {
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "OOOO|siii", kwlist, &sample_set_sizes,
+            &sample_sets, &indexes, &windows, &mode, &span_normalise, &polarised,
+            &partial_windows)) {
         goto out;
     }
     if (parse_stats_mode(mode, &options) != 0) {
@@ -9553,12 +10883,15 @@ TreeSequence_k_way_stat_method(TreeSequence *self, PyObject *args, PyObject *kwd
         != 0) {
         goto out;
     }
+    if (partial_windows) {
+        options |= TSK_STAT_PARTIAL_WINDOWS;
+    }
     if (parse_windows(windows, &windows_array, &num_windows) != 0) {
         goto out;
     }
 
     indexes_array = (PyArrayObject *) PyArray_FROMANY(
-        indexes, NPY_INT32, 2, 2, NPY_ARRAY_IN_ARRAY);
+        indexes, NPY_INT32, 2, 2, NPY_ARRAY_IN_ARRAY | NPY_ARRAY_ENSURECOPY);
     if (indexes_array == NULL) {
         goto out;
     }
@@ -9575,14 +10908,18 @@ TreeSequence_k_way_stat_method(TreeSequence *self, PyObject *args, PyObject *kwd
     if (result_array == NULL) {
         goto out;
     }
+    // clang-format off
+    Py_BEGIN_ALLOW_THREADS
     err = method(self->tree_sequence, num_sample_sets,
         PyArray_DATA(sample_set_sizes_array), PyArray_DATA(sample_sets_array),
         num_set_index_tuples, PyArray_DATA(indexes_array), num_windows,
         PyArray_DATA(windows_array), options, PyArray_DATA(result_array));
+    Py_END_ALLOW_THREADS
     if (err != 0) {
         handle_library_error(err);
         goto out;
     }
+    // clang-format on
     ret = (PyObject *) result_array;
     result_array = NULL;
 out:
@@ -9758,31 +11095,27 @@ out:
     return ret;
 }
 
-/* Make a new array that is owned by the specified object. */
+/* Returns a read-only TableCollection that refers directly to the tables
+ * of this tree sequence. The TableCollection keeps a reference to the
+ * TreeSequence, so the memory is valid for as long as the view is live. */
 static PyObject *
-make_owned_array(PyObject *self, tsk_size_t size, int dtype, void *data)
+TreeSequence_get_tables(TreeSequence *self, void *closure)
 {
-    PyObject *ret = NULL;
-    PyArrayObject *array = NULL;
-    npy_intp dims = (npy_intp) size;
+    TableCollection *tables = NULL;
 
-    array = (PyArrayObject *) PyArray_SimpleNewFromData(1, &dims, dtype, data);
-    if (array == NULL) {
+    if (TreeSequence_check_state(self) != 0) {
         goto out;
     }
-    PyArray_CLEARFLAGS(array, NPY_ARRAY_WRITEABLE);
-    if (PyArray_SetBaseObject(array, (PyObject *) self) != 0) {
+    tables = PyObject_New(TableCollection, &TableCollectionType);
+    if (tables == NULL) {
         goto out;
     }
-    /* PyArray_SetBaseObject steals a reference, so we have to incref this
-     * object. This makes sure that the instance will stay alive if there
-     * are any arrays that refer to its memory. */
+    tables->locked = 0;
+    tables->tables = self->tree_sequence->tables;
+    tables->owner = (PyObject *) self;
     Py_INCREF(self);
-    ret = (PyObject *) array;
-    array = NULL;
 out:
-    Py_XDECREF(array);
-    return ret;
+    return (PyObject *) tables;
 }
 
 static PyObject *
@@ -10197,6 +11530,11 @@ static PyMethodDef TreeSequence_methods[] = {
         .ml_meth = (PyCFunction) TreeSequence_get_num_trees,
         .ml_flags = METH_NOARGS,
         .ml_doc = "Returns the number of trees in the tree sequence." },
+    { .ml_name = "get_column_residency",
+        .ml_meth = (PyCFunction) TreeSequence_get_column_residency,
+        .ml_flags = METH_NOARGS,
+        .ml_doc = "Returns a dictionary mapping the name of each column in the "
+                  "memory mapped file to its resident and total size in bytes." },
     { .ml_name = "get_sequence_length",
         .ml_meth = (PyCFunction) TreeSequence_get_sequence_length,
         .ml_flags = METH_NOARGS,
@@ -10273,6 +11611,18 @@ static PyMethodDef TreeSequence_methods[] = {
         .ml_meth = (PyCFunction) TreeSequence_get_individuals_time,
         .ml_flags = METH_NOARGS,
         .ml_doc = "Returns the vector of per-individual times." },
+    { .ml_name = "tmrca_matrix",
+        .ml_meth = (PyCFunction) TreeSequence_tmrca_matrix,
+        .ml_flags = METH_VARARGS | METH_KEYWORDS,
+        .ml_doc = "Returns the span-weighted pairwise TMRCA of the specified nodes." },
+    { .ml_name = "coalescence_time_table",
+        .ml_meth = (PyCFunction) TreeSequence_coalescence_time_table,
+        .ml_flags = METH_VARARGS | METH_KEYWORDS,
+        .ml_doc = "Returns the weighted coalescence times in each window and block." },
+    { .ml_name = "get_tree_metrics",
+        .ml_meth = (PyCFunction) TreeSequence_get_tree_metrics,
+        .ml_flags = METH_VARARGS | METH_KEYWORDS,
+        .ml_doc = "Returns the per-tree metrics for the trees in [start, stop)." },
     { .ml_name = "genealogical_nearest_neighbours",
         .ml_meth = (PyCFunction) TreeSequence_genealogical_nearest_neighbours,
         .ml_flags = METH_VARARGS | METH_KEYWORDS,
@@ -10360,6 +11710,9 @@ static PyGetSetDef TreeSequence_getsetters[] = {
     { .name = "reference_sequence",
         .get = (getter) TreeSequence_get_reference_sequence,
         .doc = "The reference sequence." },
+    { .name = "tables",
+        .get = (getter) TreeSequence_get_tables,
+        .doc = "A read-only view of the tables." },
     { .name = "individuals_flags",
         .get = (getter) TreeSequence_get_individuals_flags,
         .doc = "The individual flags array" },
@@ -10658,6 +12011,29 @@ out:
     return ret;
 }
 
+static PyObject *
+Tree_seek_index(Tree *self, PyObject *args)
+{
+    PyObject *ret = NULL;
+    tsk_id_t index = 0;
+    int err;
+
+    if (Tree_check_state(self) != 0) {
+        goto out;
+    }
+    if (!PyArg_ParseTuple(args, "O&", &tsk_id_converter, &index)) {
+        goto out;
+    }
+    err = tsk_tree_seek_index(self->tree, index, 0);
+    if (err != 0) {
+        handle_library_error(err);
+        goto out;
+    }
+    ret = Py_BuildValue("");
+out:
+    return ret;
+}
+
 static PyObject *
 Tree_clear(Tree *self)
 {
@@ -11154,17 +12530,67 @@ out:
 }
 
 static PyObject *
-Tree_get_num_children(Tree *self, PyObject *args)
+Tree_get_mrcas(Tree *self, PyObject *args)
 {
     PyObject *ret = NULL;
-    tsk_size_t num_children;
-    int node;
+    PyObject *u = NULL;
+    PyObject *v = NULL;
+    PyArrayObject *u_array = NULL;
+    PyArrayObject *v_array = NULL;
+    PyArrayObject *mrca_array = NULL;
+    npy_intp num_pairs;
+    int err;
 
-    if (Tree_get_node_argument(self, args, &node) != 0) {
+    if (Tree_check_state(self) != 0) {
         goto out;
     }
-    num_children = self->tree->num_children[node];
-    ret = Py_BuildValue("i", (int) num_children);
+    if (!PyArg_ParseTuple(args, "OO", &u, &v)) {
+        goto out;
+    }
+    u_array = (PyArrayObject *) PyArray_FROMANY(u, NPY_INT32, 1, 1, NPY_ARRAY_IN_ARRAY);
+    if (u_array == NULL) {
+        goto out;
+    }
+    v_array = (PyArrayObject *) PyArray_FROMANY(v, NPY_INT32, 1, 1, NPY_ARRAY_IN_ARRAY);
+    if (v_array == NULL) {
+        goto out;
+    }
+    num_pairs = PyArray_DIMS(u_array)[0];
+    if (PyArray_DIMS(v_array)[0] != num_pairs) {
+        PyErr_SetString(PyExc_ValueError, "u and v must have the same length");
+        goto out;
+    }
+    mrca_array = (PyArrayObject *) PyArray_SimpleNew(1, &num_pairs, NPY_INT32);
+    if (mrca_array == NULL) {
+        goto out;
+    }
+    err = tsk_tree_get_mrcas(self->tree, (tsk_size_t) num_pairs, PyArray_DATA(u_array),
+        PyArray_DATA(v_array), PyArray_DATA(mrca_array));
+    if (err != 0) {
+        handle_library_error(err);
+        goto out;
+    }
+    ret = (PyObject *) mrca_array;
+    mrca_array = NULL;
+out:
+    Py_XDECREF(u_array);
+    Py_XDECREF(v_array);
+    Py_XDECREF(mrca_array);
+    return ret;
+}
+
+static PyObject *
+Tree_get_num_children(Tree *self, PyObject *args)
+{
+    PyObject *ret = NULL;
+    tsk_size_t num_children;
+    int node;
+
+    if (Tree_get_node_argument(self, args, &node) != 0) {
+        goto out;
+    }
+    num_children = self->tree->num_children[node];
+    ret = Py_BuildValue("i", (int) num_children);
 out:
     return ret;
 }
@@ -11796,6 +13222,10 @@ static PyMethodDef Tree_methods[] = {
         .ml_meth = (PyCFunction) Tree_seek,
         .ml_flags = METH_VARARGS,
         .ml_doc = "Seeks to the tree at the specified position" },
+    { .ml_name = "seek_index",
+        .ml_meth = (PyCFunction) Tree_seek_index,
+        .ml_flags = METH_VARARGS,
+        .ml_doc = "Seeks to the tree at the specified index" },
     { .ml_name = "clear",
         .ml_meth = (PyCFunction) Tree_clear,
         .ml_flags = METH_NOARGS,
@@ -11909,6 +13339,10 @@ static PyMethodDef Tree_methods[] = {
         .ml_meth = (PyCFunction) Tree_get_mrca,
         .ml_flags = METH_VARARGS,
         .ml_doc = "Returns the MRCA of nodes u and v" },
+    { .ml_name = "get_mrcas",
+        .ml_meth = (PyCFunction) Tree_get_mrcas,
+        .ml_flags = METH_VARARGS,
+        .ml_doc = "Returns the MRCAs of the specified arrays of pairs of nodes." },
     { .ml_name = "get_num_children",
         .ml_meth = (PyCFunction) Tree_get_num_children,
         .ml_flags = METH_VARARGS,
@@ -12011,6 +13445,9 @@ Variant_check_state(Variant *self)
     if (self->variant == NULL) {
         PyErr_SetString(PyExc_SystemError, "variant not initialised");
         ret = -1;
+    } else if (self->locked) {
+        PyErr_SetString(PyExc_RuntimeError, "Variant in use by other thread.");
+        ret = -1;
     }
     return ret;
 }
@@ -12045,6 +13482,7 @@ Variant_init(Variant *self, PyObject *args, PyObject *kwds)
     npy_intp *shape;
     tsk_flags_t options = 0;
 
+    self->locked = false;
     self->variant = NULL;
     if (!PyArg_ParseTupleAndKeywords(args, kwds, "O!|OiO", kwlist, &TreeSequenceType,
             &tree_sequence, &samples_input, &isolated_as_missing, &py_alleles)) {
@@ -12109,7 +13547,13 @@ Variant_decode(Variant *self, PyObject *args)
     if (!PyArg_ParseTuple(args, "O&", &tsk_id_converter, &site_id)) {
         goto out;
     }
+    self->locked = true;
+    // clang-format off
+    Py_BEGIN_ALLOW_THREADS
     err = tsk_variant_decode(self->variant, site_id, 0);
+    Py_END_ALLOW_THREADS
+    self->locked = false;
+    // clang-format on
     if (err != 0) {
         handle_library_error(err);
         goto out;
@@ -12137,6 +13581,7 @@ Variant_restricted_copy(Variant *self)
     /* Copies have no ts as a way of indicating they shouldn't be decoded
        This is safe as the copy has no reference to the mutation state strings */
     copy->tree_sequence = NULL;
+    copy->locked = false;
     copy->variant = PyMem_Malloc(sizeof(tsk_variant_t));
     if (copy->variant == NULL) {
         PyErr_NoMemory();
@@ -12154,6 +13599,545 @@ out:
     return ret;
 }
 
+/* Simple growable character buffer used to build up text output such as
+ * VCF records without holding the GIL. Memory is managed with the system
+ * allocator as the buffer is filled while the GIL is released. */
+typedef struct {
+    char *data;
+    size_t size;
+    size_t max_size;
+} text_buffer_t;
+
+static int
+text_buffer_reserve(text_buffer_t *self, size_t additional)
+{
+    int ret = 0;
+    size_t new_max_size;
+    char *p;
+
+    if (self->size + additional > self->max_size) {
+        new_max_size = TSK_MAX(2 * self->max_size, self->size + additional);
+        p = realloc(self->data, new_max_size);
+        if (p == NULL) {
+            ret = TSK_ERR_NO_MEMORY;
+            goto out;
+        }
+        self->data = p;
+        self->max_size = new_max_size;
+    }
+out:
+    return ret;
+}
+
+static int
+text_buffer_append(text_buffer_t *self, const char *str, size_t length)
+{
+    int ret = text_buffer_reserve(self, length);
+
+    if (ret == 0) {
+        memcpy(self->data + self->size, str, length);
+        self->size += length;
+    }
+    return ret;
+}
+
+/* Appends the decimal representation of the specified integer. The
+ * caller must ensure that there is space for at least 21 characters. */
+static void
+text_buffer_append_int_unsafe(text_buffer_t *self, int64_t value)
+{
+    char tmp[21];
+    char *dest = self->data + self->size;
+    uint64_t v = (uint64_t) value;
+    int j = 0;
+
+    if (value < 0) {
+        *dest = '-';
+        dest++;
+        self->size++;
+        v = (uint64_t)(-(value + 1)) + 1;
+    }
+    do {
+        tmp[j] = (char) ('0' + (v % 10));
+        v /= 10;
+        j++;
+    } while (v > 0);
+    self->size += (size_t) j;
+    while (j > 0) {
+        j--;
+        *dest = tmp[j];
+        dest++;
+    }
+}
+
+/* Writes the genotypes for the current site into the buffer, using the
+ * general encoding that supports any number of alleles. */
+static int
+encode_vcf_genotypes(const tsk_variant_t *variant, const int32_t *ploidies,
+    tsk_size_t num_individuals, const npy_bool *sample_mask, text_buffer_t *buffer)
+{
+    int ret = 0;
+    tsk_size_t k, l, m;
+    int32_t g;
+    char *dest;
+
+    /* Each genotype takes at most 10 digits plus a separator. */
+    ret = text_buffer_reserve(buffer, variant->num_samples * 11 + 1);
+    if (ret != 0) {
+        goto out;
+    }
+    dest = buffer->data + buffer->size;
+    m = 0;
+    for (k = 0; k < num_individuals; k++) {
+        for (l = 0; l < (tsk_size_t) ploidies[k]; l++) {
+            g = variant->genotypes[m];
+            if (g == TSK_MISSING_DATA || (sample_mask != NULL && sample_mask[m])) {
+                *dest = '.';
+                dest++;
+            } else {
+                buffer->size = (size_t)(dest - buffer->data);
+                text_buffer_append_int_unsafe(buffer, g);
+                dest = buffer->data + buffer->size;
+            }
+            *dest = '|';
+            dest++;
+            m++;
+        }
+        *(dest - 1) = '\t';
+    }
+    if (num_individuals > 0) {
+        dest--;
+    }
+    *dest = '\n';
+    dest++;
+    buffer->size = (size_t)(dest - buffer->data);
+out:
+    return ret;
+}
+
+/* Decodes the variant at each of the specified sites in turn, and writes the
+ * corresponding VCF records to the specified buffer. */
+static int
+encode_vcf_records(tsk_variant_t *variant, const tsk_id_t *site_ids,
+    const int64_t *positions, tsk_size_t num_sites, const char *contig_id,
+    size_t contig_id_length, const int32_t *ploidies, tsk_size_t num_individuals,
+    const npy_bool *sample_mask, text_buffer_t *buffer)
+{
+    int ret = 0;
+    const char fixed_fields[] = "\t.\tPASS\t.\tGT\t";
+    const size_t fixed_fields_length = sizeof(fixed_fields) - 1;
+    const tsk_size_t num_samples = variant->num_samples;
+    tsk_size_t j, k, l, m, num_alleles;
+    char *template = NULL;
+    char *dest;
+    int32_t g;
+
+    /* When all genotypes are single digits, each sample occupies exactly two
+     * characters: the genotype and the following separator. We build the
+     * separators once, and then only fill in the genotypes for each site. */
+    template = malloc(2 * num_samples + 1);
+    if (template == NULL) {
+        ret = TSK_ERR_NO_MEMORY;
+        goto out;
+    }
+    m = 0;
+    for (k = 0; k < num_individuals; k++) {
+        for (l = 0; l < (tsk_size_t) ploidies[k]; l++) {
+            template[2 * m] = '.';
+            template[2 * m + 1] = '|';
+            m++;
+        }
+        template[2 * m - 1] = '\t';
+    }
+    if (num_samples > 0) {
+        template[2 * num_samples - 1] = '\n';
+    } else {
+        template[0] = '\n';
+    }
+    /* Reserve enough space for the typical case up front */
+    ret = text_buffer_reserve(
+        buffer, num_sites * (2 * num_samples + contig_id_length + 64));
+    if (ret != 0) {
+        goto out;
+    }
+
+    for (j = 0; j < num_sites; j++) {
+        if (variant->site.id == TSK_NULL || variant->site.id != site_ids[j]) {
+            ret = tsk_variant_decode(variant, site_ids[j], 0);
+            if (ret != 0) {
+                goto out;
+            }
+        }
+        num_alleles = variant->num_alleles;
+        ret = text_buffer_reserve(buffer, contig_id_length + 64);
+        if (ret != 0) {
+            goto out;
+        }
+        text_buffer_append(buffer, contig_id, contig_id_length);
+        buffer->data[buffer->size++] = '\t';
+        text_buffer_append_int_unsafe(buffer, positions[j]);
+        buffer->data[buffer->size++] = '\t';
+        text_buffer_append_int_unsafe(buffer, (int64_t) site_ids[j]);
+        buffer->data[buffer->size++] = '\t';
+        ret = text_buffer_append(
+            buffer, variant->alleles[0], (size_t) variant->allele_lengths[0]);
+        if (ret != 0) {
+            goto out;
+        }
+        if (num_alleles > 1) {
+            for (k = 1; k < num_alleles; k++) {
+                ret = text_buffer_append(buffer, k == 1 ? "\t" : ",", 1);
+                if (ret != 0) {
+                    goto out;
+                }
+                ret = text_buffer_append(
+                    buffer, variant->alleles[k], (size_t) variant->allele_lengths[k]);
+                if (ret != 0) {
+                    goto out;
+                }
+            }
+        } else {
+            ret = text_buffer_append(buffer, "\t.", 2);
+            if (ret != 0) {
+                goto out;
+            }
+        }
+        /* With no samples, there is no separator after the FORMAT column */
+        ret = text_buffer_append(buffer, fixed_fields,
+            num_samples > 0 ? fixed_fields_length : fixed_fields_length - 1);
+        if (ret != 0) {
+            goto out;
+        }
+
+        if (num_alleles > 10 || num_samples == 0) {
+            ret = encode_vcf_genotypes(
+                variant, ploidies, num_individuals, sample_mask, buffer);
+            if (ret != 0) {
+                goto out;
+            }
+        } else {
+            ret = text_buffer_append(buffer, template, 2 * num_samples);
+            if (ret != 0) {
+                goto out;
+            }
+            dest = buffer->data + buffer->size - 2 * num_samples;
+            for (m = 0; m < num_samples; m++) {
+                g = variant->genotypes[m];
+                dest[2 * m] = g == TSK_MISSING_DATA ? '.' : (char) ('0' + g);
+            }
+            if (sample_mask != NULL) {
+                for (m = 0; m < num_samples; m++) {
+                    if (sample_mask[m]) {
+                        dest[2 * m] = '.';
+                    }
+                }
+            }
+        }
+    }
+out:
+    free(template);
+    return ret;
+}
+
+static PyObject *
+Variant_encode_vcf(Variant *self, PyObject *args, PyObject *kwds)
+{
+    int err;
+    PyObject *ret = NULL;
+    static char *kwlist[]
+        = { "site_ids", "positions", "contig_id", "ploidies", "sample_mask", NULL };
+    PyObject *site_ids_input = NULL;
+    PyObject *positions_input = NULL;
+    PyObject *ploidies_input = NULL;
+    PyObject *sample_mask_input = Py_None;
+    PyArrayObject *site_ids_array = NULL;
+    PyArrayObject *positions_array = NULL;
+    PyArrayObject *ploidies_array = NULL;
+    PyArrayObject *sample_mask_array = NULL;
+    const npy_bool *sample_mask = NULL;
+    const char *contig_id;
+    Py_ssize_t contig_id_length;
+    tsk_size_t num_sites, num_individuals, j;
+    const int32_t *ploidies;
+    int64_t total_ploidy = 0;
+    text_buffer_t buffer = { NULL, 0, 0 };
+
+    if (Variant_check_state(self) != 0) {
+        goto out;
+    }
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "OOs#O|O", kwlist, &site_ids_input,
+            &positions_input, &contig_id, &contig_id_length, &ploidies_input,
+            &sample_mask_input)) {
+        goto out;
+    }
+    /* We're releasing the GIL here so we need to make sure that the memory we
+     * pass to the low-level code doesn't change while it's in use. This is
+     * why we take copies of the input arrays. */
+    site_ids_array = (PyArrayObject *) PyArray_FROMANY(
+        site_ids_input, NPY_INT32, 1, 1, NPY_ARRAY_IN_ARRAY | NPY_ARRAY_ENSURECOPY);
+    if (site_ids_array == NULL) {
+        goto out;
+    }
+    num_sites = (tsk_size_t) PyArray_DIMS(site_ids_array)[0];
+    positions_array = (PyArrayObject *) PyArray_FROMANY(
+        positions_input, NPY_INT64, 1, 1, NPY_ARRAY_IN_ARRAY | NPY_ARRAY_ENSURECOPY);
+    if (positions_array == NULL) {
+        goto out;
+    }
+    if ((tsk_size_t) PyArray_DIMS(positions_array)[0] != num_sites) {
+        PyErr_SetString(
+            PyExc_ValueError, "positions must have the same length as site_ids");
+        goto out;
+    }
+    ploidies_array = (PyArrayObject *) PyArray_FROMANY(
+        ploidies_input, NPY_INT32, 1, 1, NPY_ARRAY_IN_ARRAY | NPY_ARRAY_ENSURECOPY);
+    if (ploidies_array == NULL) {
+        goto out;
+    }
+    num_individuals = (tsk_size_t) PyArray_DIMS(ploidies_array)[0];
+    ploidies = PyArray_DATA(ploidies_array);
+    for (j = 0; j < num_individuals; j++) {
+        if (ploidies[j] < 1) {
+            PyErr_SetString(PyExc_ValueError, "Ploidies must be >= 1");
+            goto out;
+        }
+        total_ploidy += ploidies[j];
+    }
+    if (total_ploidy != (int64_t) self->variant->num_samples) {
+        PyErr_SetString(
+            PyExc_ValueError, "Sum of ploidies must equal the number of samples");
+        goto out;
+    }
+    if (sample_mask_input != Py_None) {
+        sample_mask_array = (PyArrayObject *) PyArray_FROMANY(sample_mask_input,
+            NPY_BOOL, 1, 1, NPY_ARRAY_IN_ARRAY | NPY_ARRAY_ENSURECOPY);
+        if (sample_mask_array == NULL) {
+            goto out;
+        }
+        if ((tsk_size_t) PyArray_DIMS(sample_mask_array)[0]
+            != self->variant->num_samples) {
+            PyErr_SetString(PyExc_ValueError,
+                "Sample mask must be a numpy array of size num_samples");
+            goto out;
+        }
+        sample_mask = PyArray_DATA(sample_mask_array);
+    }
+
+    self->locked = true;
+    // clang-format off
+    Py_BEGIN_ALLOW_THREADS
+    err = encode_vcf_records(self->variant, PyArray_DATA(site_ids_array),
+        PyArray_DATA(positions_array), num_sites, contig_id, (size_t) contig_id_length,
+        ploidies, num_individuals, sample_mask, &buffer);
+    Py_END_ALLOW_THREADS
+    self->locked = false;
+    // clang-format on
+    if (err != 0) {
+        handle_library_error(err);
+        goto out;
+    }
+    ret = PyBytes_FromStringAndSize(buffer.data, (Py_ssize_t) buffer.size);
+out:
+    free(buffer.data);
+    Py_XDECREF(site_ids_array);
+    Py_XDECREF(positions_array);
+    Py_XDECREF(ploidies_array);
+    Py_XDECREF(sample_mask_array);
+    return ret;
+}
+
+typedef struct {
+    tsk_id_t site;
+    tsk_size_t row;
+} site_row_t;
+
+static int
+cmp_site_row(const void *a, const void *b)
+{
+    const site_row_t *ia = (const site_row_t *) a;
+    const site_row_t *ib = (const site_row_t *) b;
+    int ret = (ia->site > ib->site) - (ia->site < ib->site);
+    if (ret == 0) {
+        ret = (ia->row > ib->row) - (ia->row < ib->row);
+    }
+    return ret;
+}
+
+static int
+check_genotypes_buffer(
+    PyArrayObject *genotypes_array, tsk_size_t num_rows, tsk_size_t num_samples)
+{
+    int ret = -1;
+    npy_intp *shape;
+
+    /* The genotypes are written directly into the caller's array, so it
+     * must have exactly the layout that we need */
+    if (PyArray_TYPE(genotypes_array) != NPY_INT32 || PyArray_NDIM(genotypes_array) != 2
+        || !PyArray_ISCARRAY(genotypes_array)) {
+        PyErr_SetString(PyExc_TypeError,
+            "genotypes must be a writeable C-contiguous 2D array of int32");
+        goto out;
+    }
+    shape = PyArray_DIMS(genotypes_array);
+    if ((tsk_size_t) shape[1] != num_samples) {
+        PyErr_SetString(PyExc_ValueError, "genotypes must have num_samples columns");
+        goto out;
+    }
+    if ((tsk_size_t) shape[0] != num_rows) {
+        PyErr_SetString(PyExc_ValueError, "genotypes must have one row per site");
+        goto out;
+    }
+    ret = 0;
+out:
+    return ret;
+}
+
+/* Decodes num_sites sites into the rows of the specified genotypes array,
+ * returning a tuple (alleles, num_trees). If order is NULL we decode the
+ * sites start_site, start_site + 1, ... into consecutive rows; otherwise
+ * the (site, row) pairs in order are decoded in turn. The num_trees
+ * value counts the distinct trees at which sites were decoded. */
+static PyObject *
+Variant_decode_rows(Variant *self, tsk_id_t start_site, const site_row_t *order,
+    tsk_size_t num_sites, int32_t *genotypes)
+{
+    int err = 0;
+    PyObject *ret = NULL;
+    PyObject *alleles_list = NULL;
+    PyObject *alleles = NULL;
+    const tsk_size_t num_samples = self->variant->num_samples;
+    tsk_id_t site, last_site = 0;
+    tsk_id_t last_tree = TSK_NULL;
+    tsk_size_t j, row, last_row = 0, num_trees = 0;
+
+    alleles_list = PyTuple_New((Py_ssize_t) num_sites);
+    if (alleles_list == NULL) {
+        goto out;
+    }
+    for (j = 0; j < num_sites; j++) {
+        site = order == NULL ? start_site + (tsk_id_t) j : order[j].site;
+        row = order == NULL ? j : order[j].row;
+        if (j > 0 && site == last_site) {
+            /* Repeated requests for the same site don't need decoding again */
+            tsk_memcpy(genotypes + row * num_samples, genotypes + last_row * num_samples,
+                num_samples * sizeof(*genotypes));
+            alleles = PyTuple_GET_ITEM(alleles_list, (Py_ssize_t) last_row);
+            Py_INCREF(alleles);
+            PyTuple_SET_ITEM(alleles_list, (Py_ssize_t) row, alleles);
+            continue;
+        }
+        self->locked = true;
+        // clang-format off
+        Py_BEGIN_ALLOW_THREADS
+        err = tsk_variant_decode(self->variant, site, 0);
+        if (err == 0) {
+            tsk_memcpy(genotypes + row * num_samples, self->variant->genotypes,
+                num_samples * sizeof(*genotypes));
+        }
+        Py_END_ALLOW_THREADS
+        self->locked = false;
+        // clang-format on
+        if (err != 0) {
+            handle_library_error(err);
+            goto out;
+        }
+        if (self->variant->tree.index != last_tree) {
+            num_trees++;
+            last_tree = self->variant->tree.index;
+        }
+        alleles = make_alleles(self->variant);
+        if (alleles == NULL) {
+            goto out;
+        }
+        PyTuple_SET_ITEM(alleles_list, (Py_ssize_t) row, alleles);
+        last_site = site;
+        last_row = row;
+    }
+    ret = Py_BuildValue("On", alleles_list, (Py_ssize_t) num_trees);
+out:
+    Py_XDECREF(alleles_list);
+    return ret;
+}
+
+static PyObject *
+Variant_decode_chunk(Variant *self, PyObject *args, PyObject *kwds)
+{
+    PyObject *ret = NULL;
+    static char *kwlist[] = { "start_site", "genotypes", NULL };
+    tsk_id_t start_site;
+    PyArrayObject *genotypes_array = NULL;
+    tsk_size_t num_sites;
+
+    if (Variant_check_state(self) != 0) {
+        goto out;
+    }
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "O&O!", kwlist, &tsk_id_converter,
+            &start_site, &PyArray_Type, &genotypes_array)) {
+        goto out;
+    }
+    num_sites = PyArray_NDIM(genotypes_array) == 2
+                    ? (tsk_size_t) PyArray_DIMS(genotypes_array)[0]
+                    : 0;
+    if (check_genotypes_buffer(genotypes_array, num_sites, self->variant->num_samples)
+        != 0) {
+        goto out;
+    }
+    ret = Variant_decode_rows(
+        self, start_site, NULL, num_sites, PyArray_DATA(genotypes_array));
+out:
+    return ret;
+}
+
+static PyObject *
+Variant_decode_sites(Variant *self, PyObject *args, PyObject *kwds)
+{
+    PyObject *ret = NULL;
+    static char *kwlist[] = { "site_ids", "genotypes", NULL };
+    PyObject *site_ids_input = NULL;
+    PyArrayObject *site_ids_array = NULL;
+    PyArrayObject *genotypes_array = NULL;
+    const tsk_id_t *site_ids;
+    site_row_t *order = NULL;
+    tsk_size_t num_sites, j;
+
+    if (Variant_check_state(self) != 0) {
+        goto out;
+    }
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "OO!", kwlist, &site_ids_input,
+            &PyArray_Type, &genotypes_array)) {
+        goto out;
+    }
+    site_ids_array = (PyArrayObject *) PyArray_FROMANY(
+        site_ids_input, NPY_INT32, 1, 1, NPY_ARRAY_IN_ARRAY);
+    if (site_ids_array == NULL) {
+        goto out;
+    }
+    num_sites = (tsk_size_t) PyArray_DIMS(site_ids_array)[0];
+    if (check_genotypes_buffer(genotypes_array, num_sites, self->variant->num_samples)
+        != 0) {
+        goto out;
+    }
+    /* Visit the sites in genomic order so that each tree is only moved to
+     * once, writing the genotypes into the rows in the order requested */
+    order = PyMem_Malloc((num_sites + 1) * sizeof(*order));
+    if (order == NULL) {
+        PyErr_NoMemory();
+        goto out;
+    }
+    site_ids = PyArray_DATA(site_ids_array);
+    for (j = 0; j < num_sites; j++) {
+        order[j].site = site_ids[j];
+        order[j].row = j;
+    }
+    qsort(order, (size_t) num_sites, sizeof(*order), cmp_site_row);
+    ret = Variant_decode_rows(
+        self, TSK_NULL, order, num_sites, PyArray_DATA(genotypes_array));
+out:
+    PyMem_Free(order);
+    Py_XDECREF(site_ids_array);
+    return ret;
+}
+
 static PyObject *
 Variant_get_site_id(Variant *self, void *closure)
 {
@@ -12266,6 +14250,22 @@ static PyMethodDef Variant_methods[] = {
         .ml_meth = (PyCFunction) Variant_restricted_copy,
         .ml_flags = METH_NOARGS,
         .ml_doc = "Copies the variant" },
+    { .ml_name = "encode_vcf",
+        .ml_meth = (PyCFunction) Variant_encode_vcf,
+        .ml_flags = METH_VARARGS | METH_KEYWORDS,
+        .ml_doc = "Decodes the specified sites and returns the VCF records as bytes" },
+    { .ml_name = "decode_chunk",
+        .ml_meth = (PyCFunction) Variant_decode_chunk,
+        .ml_flags = METH_VARARGS | METH_KEYWORDS,
+        .ml_doc = "Decodes consecutive sites into the rows of a genotypes array "
+                  "and returns the alleles at each site and the number of trees "
+                  "visited" },
+    { .ml_name = "decode_sites",
+        .ml_meth = (PyCFunction) Variant_decode_sites,
+        .ml_flags = METH_VARARGS | METH_KEYWORDS,
+        .ml_doc = "Decodes the specified sites in genomic order into the rows of "
+                  "a genotypes array and returns the alleles at each site and the "
+                  "number of trees visited" },
     { NULL } /* Sentinel */
 };
 
@@ -12443,6 +14443,55 @@ out:
     return ret;
 }
 
+static PyObject *
+LdCalculator_get_r2_matrix(LdCalculator *self, PyObject *args, PyObject *kwds)
+{
+    int err;
+    PyObject *ret = NULL;
+    PyArrayObject *array = NULL;
+    static char *kwlist[]
+        = { "row_start", "row_stop", "col_start", "col_stop", "max_distance", NULL };
+    Py_ssize_t row_start, row_stop, col_start, col_stop;
+    double max_distance = DBL_MAX;
+    npy_intp dims[2];
+
+    if (LdCalculator_check_state(self) != 0) {
+        goto out;
+    }
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "nnnn|d", kwlist, &row_start, &row_stop,
+            &col_start, &col_stop, &max_distance)) {
+        goto out;
+    }
+    if (max_distance < 0) {
+        PyErr_SetString(PyExc_ValueError, "max_distance must be >= 0");
+        goto out;
+    }
+    /* Bad ranges are caught by the library */
+    dims[0] = (npy_intp) TSK_MAX(0, row_stop - row_start);
+    dims[1] = (npy_intp) TSK_MAX(0, col_stop - col_start);
+    array = (PyArrayObject *) PyArray_SimpleNew(2, dims, NPY_FLOAT64);
+    if (array == NULL) {
+        goto out;
+    }
+    // clang-format off
+    Py_BEGIN_ALLOW_THREADS
+    err = tsk_ld_calc_get_r2_matrix(self->ld_calc, (tsk_id_t) row_start,
+        (tsk_id_t) row_stop, (tsk_id_t) col_start, (tsk_id_t) col_stop,
+        max_distance, PyArray_DATA(array));
+    Py_END_ALLOW_THREADS
+        // clang-format on
+        if (err != 0)
+    {
+        handle_library_error(err);
+        goto out;
+    }
+    ret = (PyObject *) array;
+    array = NULL;
+out:
+    Py_XDECREF(array);
+    return ret;
+}
+
 static PyMethodDef LdCalculator_methods[] = {
     { .ml_name = "get_r2",
         .ml_meth = (PyCFunction) LdCalculator_get_r2,
@@ -12453,6 +14502,11 @@ static PyMethodDef LdCalculator_methods[] = {
         .ml_meth = (PyCFunction) LdCalculator_get_r2_array,
         .ml_flags = METH_VARARGS | METH_KEYWORDS,
         .ml_doc = "Returns r2 statistic for a given mutation over specified range" },
+    { .ml_name = "get_r2_matrix",
+        .ml_meth = (PyCFunction) LdCalculator_get_r2_matrix,
+        .ml_flags = METH_VARARGS | METH_KEYWORDS,
+        .ml_doc = "Returns the block of the r2 matrix for the specified ranges "
+                  "of sites" },
     { NULL } /* Sentinel */
 };
 
@@ -13129,6 +15183,492 @@ static PyTypeObject LsHmmType = {
  *===================================================================
  */
 
+/* Values returned for each row by extract_json_values. Rows that cannot be
+ * handled by the scanner below (missing keys, non-numeric values, keys
+ * containing escapes, integers that cannot be represented exactly as doubles
+ * and malformed JSON) are left to be decoded in Python. */
+#define JSON_VALUE_DECODE (-1)
+#define JSON_VALUE_INTEGER 0
+#define JSON_VALUE_FLOAT 1
+#define JSON_VALUE_BOOLEAN 2
+
+/* Values nested more deeply than this are left to be decoded in Python */
+#define JSON_MAX_DEPTH 256
+
+typedef struct {
+    const char *p;
+    const char *end;
+} json_scanner_t;
+
+static void
+json_skip_whitespace(json_scanner_t *self)
+{
+    while (self->p < self->end
+           && (*self->p == ' ' || *self->p == '\t' || *self->p == '\n'
+                  || *self->p == '\r')) {
+        self->p++;
+    }
+}
+
+/* Skips the UTF-8 encoded character at the current position, returning -1
+ * unless it is one that Python's strict UTF-8 decoder accepts. */
+static int
+json_skip_utf8(json_scanner_t *self)
+{
+    const unsigned char *s = (const unsigned char *) self->p;
+    unsigned char lower = 0x80;
+    unsigned char upper = 0xBF;
+    int j, num_continuation;
+
+    if (s[0] >= 0xC2 && s[0] <= 0xDF) {
+        num_continuation = 1;
+    } else if (s[0] >= 0xE0 && s[0] <= 0xEF) {
+        num_continuation = 2;
+        if (s[0] == 0xE0) {
+            lower = 0xA0;
+        } else if (s[0] == 0xED) {
+            /* Surrogates */
+            upper = 0x9F;
+        }
+    } else if (s[0] >= 0xF0 && s[0] <= 0xF4) {
+        num_continuation = 3;
+        if (s[0] == 0xF0) {
+            lower = 0x90;
+        } else if (s[0] == 0xF4) {
+            upper = 0x8F;
+        }
+    } else {
+        return -1;
+    }
+    if (self->end - self->p <= num_continuation || s[1] < lower || s[1] > upper) {
+        return -1;
+    }
+    for (j = 2; j <= num_continuation; j++) {
+        if (s[j] < 0x80 || s[j] > 0xBF) {
+            return -1;
+        }
+    }
+    self->p += num_continuation + 1;
+    return 0;
+}
+
+/* Skips the string starting at the current position, which must be a quote,
+ * and records whether it contains any escape sequences. Returns -1 if the
+ * string is not valid JSON. */
+static int
+json_skip_string(json_scanner_t *self, bool *has_escape)
+{
+    unsigned char c;
+    int j;
+
+    self->p++;
+    while (self->p < self->end) {
+        c = (unsigned char) *self->p;
+        if (c == '"') {
+            self->p++;
+            return 0;
+        } else if (c < 0x20) {
+            /* Control characters must be escaped */
+            return -1;
+        } else if (c == '\\') {
+            *has_escape = true;
+            self->p++;
+            if (self->p == self->end) {
+                return -1;
+            }
+            if (*self->p == 'u') {
+                for (j = 1; j <= 4; j++) {
+                    if (self->end - self->p <= j
+                        || !isxdigit((unsigned char) self->p[j])) {
+                        return -1;
+                    }
+                }
+                self->p += 5;
+            } else if (*self->p != '\0' && strchr("\"\\/bfnrt", *self->p) != NULL) {
+                self->p++;
+            } else {
+                return -1;
+            }
+        } else if (c < 0x80) {
+            self->p++;
+        } else if (json_skip_utf8(self) != 0) {
+            return -1;
+        }
+    }
+    return -1;
+}
+
+/* Skips the number starting at the current position, and records whether
+ * it is an integer. Returns -1 if the number is not valid JSON. */
+static int
+json_skip_number(json_scanner_t *self, bool *is_integer)
+{
+    const char *p = self->p;
+
+    *is_integer = true;
+    if (p < self->end && *p == '-') {
+        p++;
+    }
+    if (p == self->end || !isdigit((unsigned char) *p)) {
+        return -1;
+    }
+    if (*p == '0') {
+        p++;
+    } else {
+        while (p < self->end && isdigit((unsigned char) *p)) {
+            p++;
+        }
+    }
+    if (p < self->end && *p == '.') {
+        *is_integer = false;
+        p++;
+        if (p == self->end || !isdigit((unsigned char) *p)) {
+            return -1;
+        }
+        while (p < self->end && isdigit((unsigned char) *p)) {
+            p++;
+        }
+    }
+    if (p < self->end && (*p == 'e' || *p == 'E')) {
+        *is_integer = false;
+        p++;
+        if (p < self->end && (*p == '+' || *p == '-')) {
+            p++;
+        }
+        if (p == self->end || !isdigit((unsigned char) *p)) {
+            return -1;
+        }
+        while (p < self->end && isdigit((unsigned char) *p)) {
+            p++;
+        }
+    }
+    self->p = p;
+    return 0;
+}
+
+static bool
+json_match_literal(json_scanner_t *self, const char *literal)
+{
+    size_t len = strlen(literal);
+
+    if ((size_t)(self->end - self->p) >= len && memcmp(self->p, literal, len) == 0) {
+        self->p += len;
+        return true;
+    }
+    return false;
+}
+
+/* Skips the value starting at the current position, checking that it
+ * follows the grammar accepted by json.loads. Returns -1 if it does not,
+ * or if it is nested too deeply to check here. */
+static int
+json_skip_value(json_scanner_t *self, int depth)
+{
+    bool has_escape = false;
+    bool is_integer;
+    char close;
+
+    json_skip_whitespace(self);
+    if (self->p == self->end) {
+        return -1;
+    }
+    if (*self->p == '"') {
+        return json_skip_string(self, &has_escape);
+    }
+    if (*self->p != '{' && *self->p != '[') {
+        if (json_match_literal(self, "true") || json_match_literal(self, "false")
+            || json_match_literal(self, "null") || json_match_literal(self, "NaN")
+            || json_match_literal(self, "Infinity")
+            || json_match_literal(self, "-Infinity")) {
+            return 0;
+        }
+        return json_skip_number(self, &is_integer);
+    }
+    if (depth == JSON_MAX_DEPTH) {
+        return -1;
+    }
+    close = *self->p == '{' ? '}' : ']';
+    self->p++;
+    json_skip_whitespace(self);
+    if (self->p < self->end && *self->p == close) {
+        self->p++;
+        return 0;
+    }
+    while (true) {
+        if (close == '}') {
+            json_skip_whitespace(self);
+            if (self->p == self->end || *self->p != '"'
+                || json_skip_string(self, &has_escape) != 0) {
+                return -1;
+            }
+            json_skip_whitespace(self);
+            if (self->p == self->end || *self->p != ':') {
+                return -1;
+            }
+            self->p++;
+        }
+        if (json_skip_value(self, depth + 1) != 0) {
+            return -1;
+        }
+        json_skip_whitespace(self);
+        if (self->p == self->end) {
+            return -1;
+        }
+        if (*self->p == close) {
+            self->p++;
+            return 0;
+        }
+        if (*self->p != ',') {
+            return -1;
+        }
+        self->p++;
+    }
+}
+
+/* Scans the object starting at the current position and moves to the value
+ * of the last occurrence of the specified key, as json.loads keeps the last
+ * of any duplicated keys. Returns 1 if the key is found and 0 if not. */
+static int
+json_find_key(json_scanner_t *self, const char *key, Py_ssize_t key_len)
+{
+    const char *value = NULL;
+    const char *start;
+    bool has_escape = false;
+    bool matched;
+
+    json_skip_whitespace(self);
+    if (self->p == self->end || *self->p != '{') {
+        return -1;
+    }
+    self->p++;
+    json_skip_whitespace(self);
+    if (self->p < self->end && *self->p == '}') {
+        return 0;
+    }
+    while (self->p < self->end) {
+        json_skip_whitespace(self);
+        if (self->p == self->end || *self->p != '"') {
+            return -1;
+        }
+        start = self->p + 1;
+        if (json_skip_string(self, &has_escape) != 0 || has_escape) {
+            return -1;
+        }
+        matched = self->p - 1 - start == key_len
+                  && memcmp(start, key, (size_t) key_len) == 0;
+        json_skip_whitespace(self);
+        if (self->p == self->end || *self->p != ':') {
+            return -1;
+        }
+        self->p++;
+        json_skip_whitespace(self);
+        if (matched) {
+            value = self->p;
+        }
+        if (json_skip_value(self, 0) != 0) {
+            return -1;
+        }
+        json_skip_whitespace(self);
+        if (self->p < self->end && *self->p == ',') {
+            self->p++;
+        } else if (self->p < self->end && *self->p == '}') {
+            if (value == NULL) {
+                return 0;
+            }
+            self->p = value;
+            return 1;
+        } else {
+            return -1;
+        }
+    }
+    return -1;
+}
+
+static int
+json_parse_number(json_scanner_t *self, double *value)
+{
+    char buffer[64];
+    const char *start = self->p;
+    bool is_integer;
+    size_t len, num_digits;
+
+    if (json_skip_number(self, &is_integer) != 0) {
+        return JSON_VALUE_DECODE;
+    }
+    len = (size_t)(self->p - start);
+    if (len >= sizeof(buffer)) {
+        return JSON_VALUE_DECODE;
+    }
+    memcpy(buffer, start, len);
+    buffer[len] = '\0';
+    *value = strtod(buffer, NULL);
+    if (is_integer) {
+        /* Integers with 16 or more digits may not be exactly representable
+         * as doubles (2**53 has 16 digits), so are decoded by Python */
+        num_digits = *start == '-' ? len - 1 : len;
+        if (num_digits >= 16 || fabs(*value) >= 9007199254740992.0) {
+            return JSON_VALUE_DECODE;
+        }
+        return JSON_VALUE_INTEGER;
+    }
+    return JSON_VALUE_FLOAT;
+}
+
+static int
+json_parse_scalar(json_scanner_t *self, double *value)
+{
+    int kind = JSON_VALUE_DECODE;
+
+    if (json_match_literal(self, "true")) {
+        *value = 1;
+        kind = JSON_VALUE_BOOLEAN;
+    } else if (json_match_literal(self, "false")) {
+        *value = 0;
+        kind = JSON_VALUE_BOOLEAN;
+    } else if (json_match_literal(self, "NaN")) {
+        *value = NAN;
+        kind = JSON_VALUE_FLOAT;
+    } else if (json_match_literal(self, "Infinity")) {
+        *value = INFINITY;
+        kind = JSON_VALUE_FLOAT;
+    } else if (json_match_literal(self, "-Infinity")) {
+        *value = -INFINITY;
+        kind = JSON_VALUE_FLOAT;
+    } else {
+        kind = json_parse_number(self, value);
+    }
+    /* The value must be followed by the end of its enclosing object */
+    json_skip_whitespace(self);
+    if (kind != JSON_VALUE_DECODE && self->p < self->end && *self->p != ','
+        && *self->p != '}') {
+        kind = JSON_VALUE_DECODE;
+    }
+    return kind;
+}
+
+static int
+json_extract_value(const char *json, size_t len, const char **keys,
+    const Py_ssize_t *key_lens, Py_ssize_t num_keys, double *value)
+{
+    json_scanner_t scanner = { .p = json, .end = json + len };
+    Py_ssize_t j;
+
+    *value = NAN;
+    /* Rows that json.loads would reject are left to be decoded in Python,
+     * so that they raise the same errors as accessing the row metadata. */
+    if (json_skip_value(&scanner, 0) != 0) {
+        return JSON_VALUE_DECODE;
+    }
+    json_skip_whitespace(&scanner);
+    if (scanner.p != scanner.end) {
+        return JSON_VALUE_DECODE;
+    }
+    scanner.p = json;
+    for (j = 0; j < num_keys; j++) {
+        if (json_find_key(&scanner, keys[j], key_lens[j]) != 1) {
+            return JSON_VALUE_DECODE;
+        }
+    }
+    return json_parse_scalar(&scanner, value);
+}
+
+static PyObject *
+tskit_extract_json_values(PyObject *self, PyObject *args)
+{
+    PyObject *ret = NULL;
+    PyObject *data_input = NULL;
+    PyObject *offset_input = NULL;
+    PyObject *keys = NULL;
+    PyArrayObject *data_array = NULL;
+    PyArrayObject *offset_array = NULL;
+    PyArrayObject *values_array = NULL;
+    PyArrayObject *kinds_array = NULL;
+    const char **key_data = NULL;
+    Py_ssize_t *key_lens = NULL;
+    Py_ssize_t num_keys, j;
+    npy_intp num_rows, data_len;
+    const char *data;
+    const uint64_t *offset;
+    double *values;
+    int8_t *kinds;
+
+    if (!PyArg_ParseTuple(
+            args, "OOO!", &data_input, &offset_input, &PyTuple_Type, &keys)) {
+        goto out;
+    }
+    num_keys = PyTuple_Size(keys);
+    if (num_keys == 0) {
+        PyErr_SetString(PyExc_ValueError, "At least one key must be specified");
+        goto out;
+    }
+    key_data = PyMem_Malloc(num_keys * sizeof(*key_data));
+    key_lens = PyMem_Malloc(num_keys * sizeof(*key_lens));
+    if (key_data == NULL || key_lens == NULL) {
+        PyErr_NoMemory();
+        goto out;
+    }
+    for (j = 0; j < num_keys; j++) {
+        /* The keys tuple holds references to the bytes objects */
+        if (PyBytes_AsStringAndSize(
+                PyTuple_GET_ITEM(keys, j), (char **) &key_data[j], &key_lens[j])
+            != 0) {
+            goto out;
+        }
+    }
+    data_array = (PyArrayObject *) PyArray_FROMANY(
+        data_input, NPY_INT8, 1, 1, NPY_ARRAY_IN_ARRAY);
+    if (data_array == NULL) {
+        goto out;
+    }
+    offset_array = (PyArrayObject *) PyArray_FROMANY(
+        offset_input, NPY_UINT64, 1, 1, NPY_ARRAY_IN_ARRAY);
+    if (offset_array == NULL) {
+        goto out;
+    }
+    data = PyArray_DATA(data_array);
+    data_len = PyArray_DIMS(data_array)[0];
+    offset = PyArray_DATA(offset_array);
+    num_rows = PyArray_DIMS(offset_array)[0] - 1;
+    if (num_rows < 0 || offset[0] != 0 || offset[num_rows] != (uint64_t) data_len) {
+        PyErr_SetString(PyExc_ValueError, "Bad offset column");
+        goto out;
+    }
+    for (j = 0; j < num_rows; j++) {
+        if (offset[j] > offset[j + 1]) {
+            PyErr_SetString(PyExc_ValueError, "Bad offset column");
+            goto out;
+        }
+    }
+    values_array = (PyArrayObject *) PyArray_SimpleNew(1, &num_rows, NPY_FLOAT64);
+    kinds_array = (PyArrayObject *) PyArray_SimpleNew(1, &num_rows, NPY_INT8);
+    if (values_array == NULL || kinds_array == NULL) {
+        goto out;
+    }
+    values = PyArray_DATA(values_array);
+    kinds = PyArray_DATA(kinds_array);
+
+    // clang-format off
+    Py_BEGIN_ALLOW_THREADS
+    for (j = 0; j < num_rows; j++) {
+        kinds[j] = (int8_t) json_extract_value(data + offset[j],
+            (size_t)(offset[j + 1] - offset[j]), key_data, key_lens, num_keys,
+            &values[j]);
+    }
+    Py_END_ALLOW_THREADS
+        // clang-format on
+
+        ret
+        = Py_BuildValue("OO", values_array, kinds_array);
+out:
+    PyMem_Free(key_data);
+    PyMem_Free(key_lens);
+    Py_XDECREF(data_array);
+    Py_XDECREF(offset_array);
+    Py_XDECREF(values_array);
+    Py_XDECREF(kinds_array);
+    return ret;
+}
+
 static PyObject *
 tskit_get_kastore_version(PyObject *self)
 {
@@ -13150,6 +15690,11 @@ static PyMethodDef tskit_methods[] = {
         .ml_meth = (PyCFunction) tskit_get_tskit_version,
         .ml_flags = METH_NOARGS,
         .ml_doc = "Returns the version of the tskit C API we have built in." },
+    { .ml_name = "extract_json_values",
+        .ml_meth = (PyCFunction) tskit_extract_json_values,
+        .ml_flags = METH_VARARGS,
+        .ml_doc = "Returns the numeric values at the specified key path in each "
+                  "row of a JSON metadata column, and their kinds." },
     { NULL } /* Sentinel */
 };
 
@@ -13237,6 +15782,13 @@ PyInit__tskit(void)
     Py_INCREF(&TableCollectionType);
     PyModule_AddObject(module, "TableCollection", (PyObject *) &TableCollectionType);
 
+    /* Simplifier type */
+    if (PyType_Ready(&SimplifierType) < 0) {
+        return NULL;
+    }
+    Py_INCREF(&SimplifierType);
+    PyModule_AddObject(module, "Simplifier", (PyObject *) &SimplifierType);
+
     /* TreeSequence type */
     if (PyType_Ready(&TreeSequenceType) < 0) {
         return NULL;
@@ -13363,6 +15915,12 @@ PyInit__tskit(void)
     PyModule_AddIntConstant(module, "FORWARD", TSK_DIR_FORWARD);
     PyModule_AddIntConstant(module, "REVERSE", TSK_DIR_REVERSE);
 
+    /* Kinds of values returned by extract_json_values */
+    PyModule_AddIntConstant(module, "JSON_VALUE_DECODE", JSON_VALUE_DECODE);
+    PyModule_AddIntConstant(module, "JSON_VALUE_INTEGER", JSON_VALUE_INTEGER);
+    PyModule_AddIntConstant(module, "JSON_VALUE_FLOAT", JSON_VALUE_FLOAT);
+    PyModule_AddIntConstant(module, "JSON_VALUE_BOOLEAN", JSON_VALUE_BOOLEAN);
+
     PyModule_AddStringConstant(module, "TIME_UNITS_UNKNOWN", TSK_TIME_UNITS_UNKNOWN);
     PyModule_AddStringConstant(
         module, "TIME_UNITS_UNCALIBRATED", TSK_TIME_UNITS_UNCALIBRATED);
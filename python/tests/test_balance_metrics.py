@@ -381,3 +381,77 @@ class TestAllRootsN5:
     def test_b2(self):
         with pytest.raises(tskit.LibraryError, match="UNDEFINED_MULTIROOT"):
             self.tree().b2_index()
+
+
+def tree_metrics_definition(ts):
+    rows = []
+    for tree in ts.trees():
+        tmrca = math.nan
+        if tree.num_roots == 1 and tree.num_samples(tree.root) == ts.num_samples:
+            tmrca = tree.time(tree.root)
+        try:
+            colless = tree.colless_index()
+        except tskit.LibraryError:
+            colless = math.nan
+        rows.append(
+            (
+                tree.total_branch_length,
+                tree.num_roots,
+                tmrca,
+                tree.sackin_index(),
+                colless,
+                tree.b1_index(),
+            )
+        )
+    return tskit.TreeMetrics(*map(np.array, zip(*rows)))
+
+
+class TestTreeMetrics:
+    def verify(self, ts, num_threads=0):
+        metrics = ts.tree_metrics(num_threads=num_threads)
+        expected = tree_metrics_definition(ts)
+        assert metrics._fields == expected._fields
+        for name in metrics._fields:
+            value = getattr(metrics, name)
+            assert value.shape == (ts.num_trees,)
+            np.testing.assert_allclose(value, getattr(expected, name), rtol=1e-12)
+        assert metrics.num_roots.dtype == np.uint64
+        assert metrics.sackin_index.dtype == np.uint64
+        return metrics
+
+    @pytest.mark.parametrize("ts", get_example_tree_sequences())
+    def test_example(self, ts):
+        metrics = self.verify(ts)
+        # Values that don't depend on the order of summation are exact
+        expected = tree_metrics_definition(ts)
+        np.testing.assert_array_equal(metrics.num_roots, expected.num_roots)
+        np.testing.assert_array_equal(metrics.tmrca, expected.tmrca)
+        np.testing.assert_array_equal(metrics.sackin_index, expected.sackin_index)
+        np.testing.assert_array_equal(metrics.colless_index, expected.colless_index)
+
+    @pytest.mark.parametrize("ts", get_example_tree_sequences())
+    @pytest.mark.parametrize("num_threads", [2, 5])
+    def test_example_threads(self, ts, num_threads):
+        self.verify(ts, num_threads)
+
+    @pytest.mark.parametrize("num_threads", [0, 1, 3])
+    def test_empty(self, num_threads):
+        tables = tskit.TableCollection(1)
+        metrics = self.verify(tables.tree_sequence(), num_threads)
+        assert metrics.num_roots[0] == 0
+        assert np.isnan(metrics.tmrca[0])
+        assert np.isnan(metrics.colless_index[0])
+
+    def test_all_roots(self):
+        ts = TestAllRootsN5().tree().tree_sequence
+        metrics = self.verify(ts)
+        assert metrics.num_roots[0] == 5
+        assert np.isnan(metrics.tmrca[0])
+
+    def test_balanced_binary(self):
+        ts = tskit.Tree.generate_balanced(8).tree_sequence
+        metrics = self.verify(ts)
+        assert metrics.num_roots[0] == 1
+        assert metrics.tmrca[0] == 3
+        assert metrics.sackin_index[0] == 24
+        assert metrics.colless_index[0] == 0
@@ -295,6 +295,38 @@ class TestTskitArgumentParser:
         assert args.tree_sequence == tree_sequence
         assert args.contig_id == expected
 
+    @pytest.mark.parametrize(
+        "flags,expected",
+        (
+            [[], 0],
+            [["-t", "2"], 2],
+            [["--num-threads", "4"], 4],
+        ),
+    )
+    def test_vcf_num_threads(self, flags, expected):
+        parser = cli.get_tskit_parser()
+        cmd = "vcf"
+        tree_sequence = "test.trees"
+        args = parser.parse_args([cmd, tree_sequence, *flags])
+        assert args.tree_sequence == tree_sequence
+        assert args.num_threads == expected
+
+    @pytest.mark.parametrize(
+        "flags,expected",
+        (
+            [[], False],
+            [["-z"], True],
+            [["--bgzf"], True],
+        ),
+    )
+    def test_vcf_bgzf(self, flags, expected):
+        parser = cli.get_tskit_parser()
+        cmd = "vcf"
+        tree_sequence = "test.trees"
+        args = parser.parse_args([cmd, tree_sequence, *flags])
+        assert args.tree_sequence == tree_sequence
+        assert args.bgzf == expected
+
     def test_upgrade_default_values(self):
         parser = cli.get_tskit_parser()
         cmd = "upgrade"
@@ -555,6 +587,14 @@ class TestTskitConversionOutput(unittest.TestCase):
         assert len(stderr) == 0
         self.verify_vcf(stdout)
 
+    def test_vcf_num_threads(self):
+        cmd = "vcf"
+        stdout, stderr = capture_output(
+            cli.tskit_main, [cmd, self._tree_sequence_file, "--num-threads", "3"]
+        )
+        assert len(stderr) == 0
+        self.verify_vcf(stdout)
+
     def verify_info(self, ts, output_info):
         assert str(ts) == output_info
 
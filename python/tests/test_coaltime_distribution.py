@@ -811,6 +811,120 @@ class TestCoalescenceTimeDistributionBootstrap(TestCoalescenceTimeDistribution):
         np.testing.assert_allclose(cw1, cw2)
 
 
+class TestCoalescenceTimeDistributionBatchBootstrap(TestCoalescenceTimeDistribution):
+    """
+    Bootstrap replicates evaluated in a batch should be the same as resampling
+    blocks in copies of the distribution with the same block multipliers.
+    """
+
+    num_replicates = 10
+
+    @tests.cached_example
+    def coalescence_time_distribution(self):
+        ts = msprime.sim_ancestry(
+            samples=20,
+            ploidy=1,
+            sequence_length=4,
+            recombination_rate=1,
+            discrete_genome=False,
+            random_seed=1234,
+        )
+        distr = ts.coalescence_time_distribution(
+            sample_sets=[list(range(0, 10)), list(range(10, 20))],
+            weight_func="pair_coalescence_events",
+            window_breaks=np.array([0, 1, 2.5, ts.sequence_length]),
+            blocks_per_window=4,
+            span_normalise=True,
+        )
+        return distr
+
+    def replicates(self, boot):
+        for j in range(boot.num_replicates):
+            replicate = boot.distribution.copy()
+            for table, block_multiplier in zip(
+                replicate.tables, boot.block_multipliers
+            ):
+                table.resample_blocks(block_multiplier[j])
+            yield replicate
+
+    def test_block_multipliers(self):
+        distr = self.coalescence_time_distribution()
+        boot = distr.block_bootstrap_batch(self.num_replicates, 1)
+        assert boot.num_replicates == self.num_replicates
+        assert len(boot.block_multipliers) == distr.num_windows
+        for table, block_multiplier in zip(distr.tables, boot.block_multipliers):
+            assert block_multiplier.shape == (self.num_replicates, table.num_blocks)
+            assert np.all(np.sum(block_multiplier, axis=1) == table.num_blocks)
+        other = distr.block_bootstrap_batch(self.num_replicates, 1)
+        for x, y in zip(boot.block_multipliers, other.block_multipliers):
+            np.testing.assert_array_equal(x, y)
+
+    def test_ecdf(self):
+        distr = self.coalescence_time_distribution()
+        boot = distr.block_bootstrap_batch(self.num_replicates, 1)
+        t = np.linspace(0, distr.tables[0].time[-1] + 1, 11)
+        values = boot.ecdf(t)
+        assert values.shape == (self.num_replicates, 3, 3, t.size)
+        for j, replicate in enumerate(self.replicates(boot)):
+            expected = np.transpose(replicate.ecdf(t), (2, 0, 1))
+            np.testing.assert_allclose(values[j], expected)
+
+    def test_quantile(self):
+        distr = self.coalescence_time_distribution()
+        boot = distr.block_bootstrap_batch(self.num_replicates, 1)
+        q = np.linspace(0, 1, 11)
+        values = boot.quantile(q)
+        assert values.shape == (self.num_replicates, 3, 3, q.size)
+        for j, replicate in enumerate(self.replicates(boot)):
+            expected = np.transpose(replicate.quantile(q), (2, 0, 1))
+            np.testing.assert_allclose(values[j], expected)
+
+    def test_mean(self):
+        distr = self.coalescence_time_distribution()
+        boot = distr.block_bootstrap_batch(self.num_replicates, 1)
+        since = np.array([0.0, 0.2, 1.0, np.max(distr.tables[0].time)])
+        values = boot.mean(since)
+        for j, replicate in enumerate(self.replicates(boot)):
+            for i, s in enumerate(since):
+                expected = replicate.mean(float(s)).T
+                np.testing.assert_allclose(values[j, :, :, i], expected)
+
+    def test_coalescence_rate_in_intervals(self):
+        distr = self.coalescence_time_distribution()
+        boot = distr.block_bootstrap_batch(self.num_replicates, 1)
+        t = np.array([0, 0.1, 0.5, 1, 2, np.inf])
+        values = boot.coalescence_rate_in_intervals(t)
+        assert values.shape == (self.num_replicates, 3, 3, t.size - 1)
+        for j, replicate in enumerate(self.replicates(boot)):
+            expected = replicate.coalescence_rate_in_intervals(t)
+            np.testing.assert_allclose(values[j], np.transpose(expected, (2, 0, 1)))
+
+    def test_unit_block_multipliers(self):
+        distr = self.coalescence_time_distribution()
+        block_multipliers = [
+            np.ones((2, table.num_blocks), dtype=int) for table in distr.tables
+        ]
+        boot = tskit.stats.CoalescenceTimeBootstrap(distr, block_multipliers)
+        t = np.linspace(0, 2, 5)
+        q = np.linspace(0, 1, 5)
+        for j in range(2):
+            np.testing.assert_allclose(
+                boot.ecdf(t)[j], np.transpose(distr.ecdf(t), (2, 0, 1))
+            )
+            np.testing.assert_allclose(
+                boot.quantile(q)[j], np.transpose(distr.quantile(q), (2, 0, 1))
+            )
+
+    def test_distribution_unchanged(self):
+        distr = self.coalescence_time_distribution()
+        cum_weights = [table.cum_weights.copy() for table in distr.tables]
+        boot = distr.block_bootstrap_batch(self.num_replicates, 1)
+        boot.quantile(np.linspace(0, 1, 5))
+        for table, x in zip(distr.tables, cum_weights):
+            np.testing.assert_array_equal(table.cum_weights, x)
+            assert np.all(table.block_multiplier == 1)
+
+
 class TestCoalescenceTimeDistributionEmpty(TestCoalescenceTimeDistribution):
     """
     When weights are all zero ECDF table is empty, methods return NaN
@@ -880,6 +994,15 @@ class TestCoalescenceTimeDistributionEmpty(TestCoalescenceTimeDistribution):
         assert np.all(boot_distr.tables[0].cum_weights == 0)
         assert np.all(np.isnan(boot_distr.tables[0].quantile))
 
+    def test_resample_batch(self):
+        distr = self.coalescence_time_distribution()
+        boot = distr.block_bootstrap_batch(2, 3)
+        t = np.array([0.0, 0.5, 1.0])
+        assert np.all(np.isnan(boot.ecdf(t)))
+        assert np.all(np.isnan(boot.quantile(t)))
+        assert np.all(np.isnan(boot.mean(t)))
+        assert np.all(np.isnan(boot.coalescence_rate_in_intervals(t)))
+
 
 class TestCoalescenceTimeDistributionNullWeight(TestCoalescenceTimeDistribution):
     """
@@ -953,6 +1076,19 @@ class TestCoalescenceTimeDistributionNullWeight(TestCoalescenceTimeDistribution)
         assert np.any(boot_distr.tables[0].cum_weights[:, 0] > 0)
         assert np.all(~np.isnan(boot_distr.tables[0].quantile[:, 0]))
 
+    def test_resample_batch(self):
+        distr = self.coalescence_time_distribution()
+        boot = distr.block_bootstrap_batch(2, 3)
+        t = np.array([0.0, 0.5, 1.0])
+        for values in [
+            boot.ecdf(t),
+            boot.quantile(t),
+            boot.coalescence_rate_in_intervals(t),
+        ]:
+            assert np.all(np.isnan(values[:, :, 1])) and np.all(
+                ~np.isnan(values[:, :, 0])
+            )
+
 
 class TestCoalescenceTimeDistributionTableResize(TestCoalescenceTimeDistribution):
     """
@@ -1311,3 +1447,151 @@ class TestWindowedSpanNormalisedCoalescenceTimeTable(TestCoalescenceTimeDistribu
         tw2 = distr.tables[1].weights
         np.testing.assert_allclose(w1, tw1)
         np.testing.assert_allclose(w2, tw2)
+
+
+class TestCoalescenceTimeDistributionNativeEngine(TestCoalescenceTimeDistribution):
+    """
+    The built-in weight functions are computed by the C library. Passing the
+    same weight functions as a tuple of callables uses the Python engine, which
+    should give identical tables.
+    """
+
+    weight_funcs = {
+        "coalescence_events": (
+            tskit.stats.CoalescenceTimeDistribution._count_coalescence_events
+        ),
+        "pair_coalescence_events": (
+            tskit.stats.CoalescenceTimeDistribution._count_pair_coalescence_events
+        ),
+        "trio_first_coalescence_events": (
+            tskit.stats.CoalescenceTimeDistribution._count_trio_first_coalescence_events
+        ),
+    }
+
+    @tests.cached_example
+    def ts_continuous_genome(self):
+        return msprime.sim_ancestry(
+            samples=30,
+            ploidy=1,
+            sequence_length=4,
+            recombination_rate=1,
+            discrete_genome=False,
+            random_seed=1234,
+        )
+
+    def assert_tables_equal(self, distr, other):
+        assert len(distr.tables) == len(other.tables)
+        for table, other_table in zip(distr.tables, other.tables):
+            assert table.num_records == other_table.num_records
+            np.testing.assert_array_equal(table.time, other_table.time)
+            np.testing.assert_array_equal(table.block, other_table.block)
+            np.testing.assert_allclose(table.weights, other_table.weights)
+
+    def verify_native_engine(self, ts, sample_sets, **kwargs):
+        for name, weight_func in self.weight_funcs.items():
+            native = ts.coalescence_time_distribution(
+                sample_sets=sample_sets, weight_func=name, **kwargs
+            )
+            python = ts.coalescence_time_distribution(
+                sample_sets=sample_sets, weight_func=weight_func(), **kwargs
+            )
+            self.assert_tables_equal(native, python)
+
+    @pytest.mark.parametrize("blocks_per_window", [1, 3])
+    @pytest.mark.parametrize("span_normalise", [True, False])
+    def test_windows(self, blocks_per_window, span_normalise):
+        ts = self.ts_continuous_genome()
+        sample_sets = [list(range(0, 10)), list(range(10, 25))]
+        breaks = [t.interval.left for t in ts.trees()][::4]
+        for window_breaks in [
+            None,
+            np.array([0, 0.3, 1.7, 1.71, ts.sequence_length]),
+            np.array(breaks + [ts.sequence_length]),
+        ]:
+            self.verify_native_engine(
+                ts,
+                sample_sets,
+                window_breaks=window_breaks,
+                blocks_per_window=blocks_per_window,
+                span_normalise=span_normalise,
+            )
+
+    def test_missing_trees(self):
+        ts = self.ts_continuous_genome().delete_intervals([[1, 2.5]])
+        self.verify_native_engine(
+            ts,
+            [list(range(0, 15)), list(range(15, 30))],
+            window_breaks=np.array([0, 0.5, 2, ts.sequence_length]),
+            blocks_per_window=2,
+            span_normalise=True,
+        )
+
+    @pytest.mark.parametrize("num_threads", [1, 2, 5])
+    def test_threads(self, num_threads):
+        ts = self.ts_continuous_genome()
+        window_breaks = np.linspace(0, ts.sequence_length, 8)
+        distr = ts.coalescence_time_distribution(
+            weight_func="pair_coalescence_events",
+            window_breaks=window_breaks,
+            blocks_per_window=2,
+        )
+        distr_threads = ts.coalescence_time_distribution(
+            weight_func="pair_coalescence_events",
+            window_breaks=window_breaks,
+            blocks_per_window=2,
+            num_threads=num_threads,
+        )
+        self.assert_tables_equal(distr, distr_threads)
+
+    @pytest.mark.parametrize("weight_func", ["pair_coalescence_events", "python"])
+    def test_unary_nodes(self, weight_func):
+        ts = self.ts_continuous_genome()
+        if weight_func == "python":
+            weight_func = self.weight_funcs["pair_coalescence_events"]()
+        samples = list(range(ts.num_samples // 2))
+        sample_sets = [samples[:5], samples[5:]]
+        time_breaks = np.linspace(0, 2, 5)
+        distrs = [
+            ts.simplify(
+                samples=samples, keep_unary=keep_unary
+            ).coalescence_time_distribution(
+                sample_sets=sample_sets,
+                weight_func=weight_func,
+                window_breaks=np.array([0, 1, 2.5, ts.sequence_length]),
+                span_normalise=True,
+            )
+            for keep_unary in [True, False]
+        ]
+        np.testing.assert_allclose(
+            distrs[0].num_coalesced(time_breaks), distrs[1].num_coalesced(time_breaks)
+        )
+
+    def test_noncontiguous_samples(self):
+        ts = self.ts_continuous_genome()
+        tables = ts.dump_tables()
+        tables.subset(np.arange(ts.num_nodes)[::-1])
+        ts = tables.tree_sequence()
+        samples = list(ts.samples())
+        self.verify_native_engine(ts, [samples[:12], samples[12:]], blocks_per_window=2)
+
+    @pytest.mark.parametrize("weight_func", list(weight_funcs))
+    def test_internal_samples(self, weight_func):
+        ts = self.ts_continuous_genome()
+        tables = ts.dump_tables()
+        flags = tables.nodes.flags
+        flags[np.unique(ts.edges_parent)[:3]] = tskit.NODE_IS_SAMPLE
+        tables.nodes.flags = flags
+        ts = tables.tree_sequence()
+        assert ts.num_trees > 1
+        assert ts.num_samples == 33
+        samples = list(ts.samples())
+        sample_sets = [samples[:10], samples[10:]]
+        native = ts.coalescence_time_distribution(
+            sample_sets=sample_sets, weight_func=weight_func, blocks_per_window=2
+        )
+        python = ts.coalescence_time_distribution(
+            sample_sets=sample_sets,
+            weight_func=self.weight_funcs[weight_func](),
+            blocks_per_window=2,
+        )
+        self.assert_tables_equal(native, python)
@@ -23,8 +23,10 @@
 """
 Test cases for tskit's file format.
 """
+import gc
 import json
 import os
+import platform
 import sys
 import tempfile
 import unittest
@@ -39,9 +41,12 @@ import pytest
 import tszip as tszip
 
 import tests.tsutil as tsutil
+from tests.test_highlevel import get_example_tree_sequences
 import tskit
 import tskit.exceptions as exceptions
 
+IS_WINDOWS = platform.system() == "Windows"
+
 CURRENT_FILE_MAJOR = 12
 CURRENT_FILE_MINOR = 7
 
@@ -901,6 +906,67 @@ class TestOptionalColumns(TestFileFormat):
         tables.assert_equals(ts3.tables)
 
 
+class TestTreeCheckpoints(TestFileFormat):
+    """
+    Checks that tree checkpoints are stored and validated in the file format.
+    """
+
+    def dump_checkpoints(self):
+        ts = msprime.simulate(10, recombination_rate=2, random_seed=42)
+        assert ts.num_trees > 5
+        tables = ts.dump_tables()
+        tables.build_index(tree_checkpoint_interval=2)
+        tables.dump(self.temp_file)
+        return ts
+
+    def test_round_trip(self):
+        ts = self.dump_checkpoints()
+        with kastore.load(self.temp_file) as store:
+            tree = store["indexes/tree_checkpoint_tree"]
+            offset = store["indexes/tree_checkpoint_edges_offset"]
+            assert list(tree) == list(range(0, ts.num_trees, 2))
+            assert len(offset) == len(tree) + 1
+            assert len(store["indexes/tree_checkpoint_edges"]) == offset[-1]
+        tables = tskit.TableCollection.load(self.temp_file)
+        assert tables.has_tree_checkpoints()
+        assert tables == ts.tables
+
+    def test_missing_edges(self):
+        self.dump_checkpoints()
+        with kastore.load(self.temp_file) as store:
+            all_data = dict(store)
+        del all_data["indexes/tree_checkpoint_edges"]
+        del all_data["indexes/tree_checkpoint_edges_offset"]
+        kastore.dump(all_data, self.temp_file)
+        with pytest.raises(tskit.LibraryError, match="TSK_ERR_BOTH_COLUMNS_REQUIRED"):
+            tskit.load(self.temp_file)
+
+    def test_no_edge_index(self):
+        self.dump_checkpoints()
+        with kastore.load(self.temp_file) as store:
+            all_data = dict(store)
+        del all_data["indexes/edge_insertion_order"]
+        del all_data["indexes/edge_removal_order"]
+        kastore.dump(all_data, self.temp_file)
+        with pytest.raises(tskit.FileFormatError):
+            tskit.TableCollection.load(self.temp_file)
+
+    def test_bad_checkpoints(self):
+        for key in ["tree", "edges"]:
+            self.dump_checkpoints()
+            with kastore.load(self.temp_file) as store:
+                all_data = dict(store)
+            column = all_data[f"indexes/tree_checkpoint_{key}"].copy()
+            column[1:] = column[0]
+            all_data[f"indexes/tree_checkpoint_{key}"] = column
+            kastore.dump(all_data, self.temp_file)
+            tables = tskit.TableCollection.load(self.temp_file)
+            with pytest.raises(
+                tskit.LibraryError, match="TSK_ERR_BAD_TREE_CHECKPOINTS"
+            ):
+                tables.tree_sequence()
+
+
 class TestReferenceSequence:
     def test_fixture_has_reference_sequence(self, ts_fixture):
         assert ts_fixture.has_reference_sequence()
@@ -1300,3 +1366,206 @@ class TestSkipReferenceSequence:
         assert not tables_no_refseq.equals(tables)
         assert tables_no_refseq.equals(tables, ignore_reference_sequence=True)
         assert not tables_no_refseq.has_reference_sequence()
+
+
+def mapped_file_ranges(path):
+    # Return the address ranges of the current process that map the given file.
+    path = os.path.realpath(path)
+    ranges = []
+    with open("/proc/self/maps") as f:
+        for line in f:
+            fields = line.split()
+            if len(fields) >= 6 and fields[5] == path:
+                start, end = (int(x, 16) for x in fields[0].split("-"))
+                ranges.append((start, end))
+    return ranges
+
+
+class TestMmapLoad:
+    """
+    Test the `mmap` flag to TreeSequence.load().
+    """
+
+    def test_round_trip_path(self, tmp_path, ts_fixture):
+        save_path = tmp_path / "tmp.trees"
+        ts_fixture.dump(save_path)
+        ts = tskit.load(save_path, mmap=True)
+        assert ts.equals(ts_fixture)
+        ts.tables.assert_equals(ts_fixture.tables)
+        assert ts.tables.has_index()
+
+    def test_round_trip_stream(self, tmp_path, ts_fixture):
+        save_path = tmp_path / "tmp.trees"
+        ts_fixture.dump(save_path)
+        with open(save_path, "rb") as f:
+            ts = tskit.TreeSequence.load(f, mmap=True)
+        assert ts.equals(ts_fixture)
+
+    @pytest.mark.parametrize("ts", get_example_tree_sequences())
+    def test_examples(self, tmp_path, ts):
+        save_path = tmp_path / "tmp.trees"
+        ts.dump(save_path)
+        ts_mapped = tskit.load(save_path, mmap=True)
+        ts_mapped.tables.assert_equals(ts.tables)
+        for t1, t2 in zip(ts.trees(), ts_mapped.trees()):
+            np.testing.assert_array_equal(t1.parent_array, t2.parent_array)
+
+    def test_columns_read_only(self, tmp_path, ts_fixture):
+        save_path = tmp_path / "tmp.trees"
+        ts_fixture.dump(save_path)
+        ts = tskit.load(save_path, mmap=True)
+        for array in [ts.nodes_time, ts.edges_left, ts.sites_position]:
+            assert not array.flags.writeable
+            with pytest.raises(ValueError):
+                array[0] = 1
+
+    @pytest.mark.skipif(
+        not os.path.exists("/proc/self/maps"), reason="Needs /proc/self/maps"
+    )
+    def test_columns_are_views_of_file(self, tmp_path, ts_fixture):
+        save_path = tmp_path / "tmp.trees"
+        ts_fixture.dump(save_path)
+        ts = tskit.load(save_path, mmap=True)
+        ranges = mapped_file_ranges(save_path)
+        assert len(ranges) > 0
+        for array in [ts.nodes_time, ts.edges_parent, ts.mutations_site]:
+            address = array.__array_interface__["data"][0]
+            assert any(start <= address < end for start, end in ranges)
+        ts_copy = tskit.load(save_path)
+        address = ts_copy.nodes_time.__array_interface__["data"][0]
+        assert not any(start <= address < end for start, end in ranges)
+
+    def test_columns_outlive_tree_sequence(self, tmp_path, ts_fixture):
+        save_path = tmp_path / "tmp.trees"
+        ts_fixture.dump(save_path)
+        ts = tskit.load(save_path, mmap=True)
+        time = ts.nodes_time
+        del ts
+        gc.collect()
+        np.testing.assert_array_equal(time, ts_fixture.nodes_time)
+
+    def test_twofile_stream(self, tmp_path, ts_fixture):
+        save_path = tmp_path / "tmp.trees"
+        with open(save_path, "wb") as f:
+            ts_fixture.dump(f)
+            ts_fixture.dump(f)
+        with open(save_path, "rb") as f:
+            ts1 = tskit.load(f, mmap=True)
+            ts2 = tskit.load(f, mmap=True)
+            with pytest.raises(EOFError):
+                tskit.load(f, mmap=True)
+        assert ts_fixture.equals(ts1)
+        assert ts_fixture.equals(ts2)
+
+    def test_unaligned_stream_falls_back(self, tmp_path, ts_fixture):
+        # The second store starts at an offset that is not 8-byte aligned,
+        # so we must fall back to reading it into memory.
+        save_path = tmp_path / "tmp.trees"
+        with open(save_path, "wb") as f:
+            f.write(b"x")
+            f.flush()
+            ts_fixture.dump(f)
+        with open(save_path, "rb") as f:
+            f.seek(1)
+            ts = tskit.load(f, mmap=True)
+        assert ts_fixture.equals(ts)
+
+    @pytest.mark.skipif(IS_WINDOWS, reason="No pipes on Windows")
+    def test_pipe_falls_back(self, ts_fixture):
+        read_fd, write_fd = os.pipe()
+        with os.fdopen(write_fd, "wb") as f:
+            ts_fixture.dump(f)
+        with os.fdopen(read_fd, "rb") as f:
+            ts = tskit.load(f, mmap=True)
+        assert ts_fixture.equals(ts)
+
+    def test_skip_tables(self, tmp_path, ts_fixture):
+        save_path = tmp_path / "tmp.trees"
+        ts_fixture.dump(save_path)
+        ts = tskit.load(save_path, skip_tables=True, mmap=True)
+        assert ts.equals(ts_fixture, ignore_tables=True)
+        assert_tables_empty(ts.tables)
+
+    def test_skip_reference_sequence(self, tmp_path, ts_fixture):
+        save_path = tmp_path / "tmp.trees"
+        ts_fixture.dump(save_path)
+        ts = tskit.load(save_path, skip_reference_sequence=True, mmap=True)
+        assert ts.equals(ts_fixture, ignore_reference_sequence=True)
+        assert not ts.has_reference_sequence()
+
+    def test_tree_checkpoints(self, tmp_path, ts_fixture):
+        tables = ts_fixture.dump_tables()
+        tables.build_index(tree_checkpoint_interval=2)
+        save_path = tmp_path / "tmp.trees"
+        tables.dump(save_path)
+        ts = tskit.load(save_path, mmap=True)
+        assert ts.tables.has_tree_checkpoints()
+        tree = ts.first()
+        for index in [ts.num_trees - 1, 0, ts.num_trees // 2]:
+            tree.seek_index(index)
+            assert tree.index == index
+
+    def test_errors(self, tmp_path):
+        save_path = tmp_path / "tmp.trees"
+        with open(save_path, "wb") as f:
+            f.write(b"not a kastore file" * 10)
+        with pytest.raises(exceptions.FileFormatError):
+            tskit.load(save_path, mmap=True)
+
+
+def evict_from_page_cache(path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+    finally:
+        os.close(fd)
+
+
+class TestColumnResidency:
+    """
+    Test the TreeSequence.column_residency() method for memory mapped
+    tree sequences.
+    """
+
+    def test_not_mapped(self, tmp_path, ts_fixture):
+        save_path = tmp_path / "tmp.trees"
+        ts_fixture.dump(save_path)
+        assert ts_fixture.column_residency() == {}
+        assert tskit.load(save_path).column_residency() == {}
+
+    def test_columns_match_file(self, tmp_path, ts_fixture):
+        save_path = tmp_path / "tmp.trees"
+        ts_fixture.dump(save_path)
+        ts = tskit.load(save_path, mmap=True)
+        residency = ts.column_residency()
+        store = kastore.load(save_path)
+        assert set(residency.keys()) == set(store.keys())
+        for name, (resident, total) in residency.items():
+            assert total == store[name].nbytes
+            assert 0 <= resident <= total
+
+    @pytest.mark.skipif(not hasattr(os, "posix_fadvise"), reason="Needs posix_fadvise")
+    def test_columns_loaded_on_access(self, tmp_path):
+        ts = msprime.sim_ancestry(
+            20, sequence_length=100, recombination_rate=0.01, random_seed=1
+        )
+        tables = ts.dump_tables()
+        # A metadata column much larger than the OS readahead window
+        size = (64 * 1024 * 1024) // ts.num_nodes
+        tables.nodes.packset_metadata([b"x" * size] * ts.num_nodes)
+        save_path = tmp_path / "tmp.trees"
+        tables.dump(save_path)
+        evict_from_page_cache(save_path)
+        ts = tskit.load(save_path, mmap=True)
+        for _ in ts.trees():
+            pass
+        residency = ts.column_residency()
+        resident, total = residency["nodes/metadata"]
+        if resident == total:
+            pytest.skip("Unable to evict the file from the page cache")
+        assert residency["edges/left"][0] == residency["edges/left"][1]
+        assert resident < total / 2
+        ts.dump_tables()
+        resident, total = ts.column_residency()["nodes/metadata"]
+        assert resident == total
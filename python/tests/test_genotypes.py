@@ -727,6 +727,208 @@ class TestLimitInterval:
             list(ts.variants(left=1, right=1))
 
 
+class TestVariantsChunked:
+    """
+    Tests that variants_chunked() returns the same genotypes as variants().
+    """
+
+    @tests.cached_example
+    def ts(self):
+        ts = msprime.sim_ancestry(
+            5, sequence_length=100, recombination_rate=0.01, random_seed=3
+        )
+        ts = msprime.sim_mutations(ts, rate=0.05, random_seed=3)
+        assert ts.num_sites > 20
+        return ts
+
+    def verify(self, ts, chunks, **kwargs):
+        variants = list(ts.variants(**kwargs))
+        site_ids = []
+        for chunk in chunks:
+            assert len(chunk.site_ids) == len(chunk.alleles)
+            assert chunk.genotypes.shape[0] == len(chunk.site_ids)
+            assert chunk.genotypes.dtype == np.int32
+            assert 1 <= chunk.num_trees <= len(chunk.site_ids)
+            for site_id, alleles, genotypes in zip(
+                chunk.site_ids, chunk.alleles, chunk.genotypes
+            ):
+                var = variants[len(site_ids)]
+                assert var.site.id == site_id
+                assert var.alleles == alleles
+                np.testing.assert_array_equal(var.genotypes, genotypes)
+                site_ids.append(site_id)
+        assert site_ids == [var.site.id for var in variants]
+
+    @pytest.mark.parametrize("chunk_size", [None, 1, 2, 7, 1000])
+    def test_chunk_size(self, chunk_size):
+        ts = self.ts()
+        chunks = list(ts.variants_chunked(chunk_size=chunk_size))
+        if chunk_size is not None:
+            assert all(len(c.site_ids) == chunk_size for c in chunks[:-1])
+        self.verify(ts, ts.variants_chunked(chunk_size=chunk_size))
+
+    @pytest.mark.parametrize("num_rows", [1, 5, 100])
+    def test_out(self, num_rows):
+        ts = self.ts()
+        out = np.zeros((num_rows, ts.num_samples), dtype=np.int32)
+        for chunk in ts.variants_chunked(out=out):
+            assert np.shares_memory(chunk.genotypes, out)
+        self.verify(ts, ts.variants_chunked(out=out))
+        self.verify(ts, ts.variants_chunked(out=out, chunk_size=1))
+
+    @pytest.mark.parametrize("left", [None, 0, 10.5, 50])
+    @pytest.mark.parametrize("right", [None, 51, 99.5])
+    def test_interval(self, left, right):
+        ts = self.ts()
+        kwargs = dict(left=left, right=right)
+        self.verify(ts, ts.variants_chunked(chunk_size=3, **kwargs), **kwargs)
+
+    def test_samples(self):
+        ts = self.ts()
+        samples = [5, 0, 3]
+        out = np.zeros((4, len(samples)), dtype=np.int32)
+        chunks = ts.variants_chunked(out=out, samples=samples)
+        self.verify(ts, chunks, samples=samples)
+
+    def test_alleles(self):
+        ts = self.ts()
+        self.verify(
+            ts,
+            ts.variants_chunked(alleles=tskit.ALLELES_ACGT),
+            alleles=tskit.ALLELES_ACGT,
+        )
+
+    @pytest.mark.parametrize("isolated_as_missing", [None, True, False])
+    def test_missing_data(self, isolated_as_missing):
+        tables = self.ts().dump_tables()
+        tables.nodes.add_row(flags=tskit.NODE_IS_SAMPLE, time=0)
+        ts = tables.tree_sequence()
+        kwargs = dict(isolated_as_missing=isolated_as_missing)
+        self.verify(ts, ts.variants_chunked(chunk_size=4, **kwargs), **kwargs)
+
+    def test_no_sites(self):
+        ts = tskit.Tree.generate_balanced(4).tree_sequence
+        assert list(ts.variants_chunked()) == []
+
+    def test_genotype_matrix(self):
+        ts = self.ts()
+        G = np.vstack([c.genotypes.copy() for c in ts.variants_chunked(chunk_size=6)])
+        np.testing.assert_array_equal(G, ts.genotype_matrix())
+
+    @pytest.mark.parametrize("chunk_size", [0, -1])
+    def test_bad_chunk_size(self, chunk_size):
+        ts = self.ts()
+        with pytest.raises(ValueError, match="chunk_size"):
+            next(ts.variants_chunked(chunk_size=chunk_size))
+        out = np.zeros((2, ts.num_samples), dtype=np.int32)
+        with pytest.raises(ValueError, match="chunk_size"):
+            next(ts.variants_chunked(chunk_size=3, out=out))
+
+    def test_bad_out(self):
+        ts = self.ts()
+        n = ts.num_samples
+        with pytest.raises(TypeError, match="2D numpy array"):
+            next(ts.variants_chunked(out=[[0] * n]))
+        with pytest.raises(TypeError, match="2D numpy array"):
+            next(ts.variants_chunked(out=np.zeros(n, dtype=np.int32)))
+        with pytest.raises(ValueError, match="at least one row"):
+            next(ts.variants_chunked(out=np.zeros((0, n), dtype=np.int32)))
+        with pytest.raises(TypeError, match="int32"):
+            next(ts.variants_chunked(out=np.zeros((2, n), dtype=np.int8)))
+        with pytest.raises(ValueError, match="num_samples columns"):
+            next(ts.variants_chunked(out=np.zeros((2, n + 1), dtype=np.int32)))
+
+
+class TestSiteGenotypes:
+    """
+    Tests for random access to genotypes using site_genotypes().
+    """
+
+    @tests.cached_example
+    def ts(self):
+        ts = msprime.sim_ancestry(
+            5, sequence_length=100, recombination_rate=0.01, random_seed=3
+        )
+        ts = msprime.sim_mutations(ts, rate=0.05, random_seed=3)
+        assert ts.num_sites > 20
+        assert ts.num_trees > 5
+        return ts
+
+    def verify(self, ts, site_ids, **kwargs):
+        chunk = ts.site_genotypes(site_ids, **kwargs)
+        variant = tskit.Variant(ts, **kwargs)
+        assert list(chunk.site_ids) == list(site_ids)
+        assert chunk.genotypes.shape == (len(site_ids), len(variant.samples))
+        for site_id, alleles, genotypes in zip(
+            site_ids, chunk.alleles, chunk.genotypes
+        ):
+            variant.decode(site_id)
+            assert variant.alleles == alleles
+            np.testing.assert_array_equal(variant.genotypes, genotypes)
+        tree_ids = {ts.at(ts.site(j).position).index for j in site_ids}
+        assert chunk.num_trees == len(tree_ids)
+        return chunk
+
+    def test_all_sites(self):
+        ts = self.ts()
+        chunk = self.verify(ts, np.arange(ts.num_sites))
+        np.testing.assert_array_equal(chunk.genotypes, ts.genotype_matrix())
+
+    @pytest.mark.parametrize("seed", range(3))
+    def test_random_order(self, seed):
+        ts = self.ts()
+        rng = np.random.default_rng(seed)
+        self.verify(ts, rng.permutation(ts.num_sites))
+        self.verify(ts, rng.integers(0, ts.num_sites, size=50))
+
+    def test_reverse_order(self):
+        ts = self.ts()
+        self.verify(ts, list(range(ts.num_sites))[::-1])
+
+    def test_single_site(self):
+        ts = self.ts()
+        chunk = self.verify(ts, [ts.num_sites - 1])
+        assert chunk.num_trees == 1
+
+    def test_empty(self):
+        ts = self.ts()
+        chunk = ts.site_genotypes([])
+        assert chunk.genotypes.shape == (0, ts.num_samples)
+        assert chunk.alleles == ()
+        assert chunk.num_trees == 0
+
+    def test_samples_and_alleles(self):
+        ts = self.ts()
+        site_ids = [10, 2, 7]
+        self.verify(ts, site_ids, samples=[3, 1])
+        self.verify(ts, site_ids, alleles=tskit.ALLELES_ACGT)
+
+    @pytest.mark.parametrize("isolated_as_missing", [True, False])
+    def test_missing_data(self, isolated_as_missing):
+        tables = self.ts().dump_tables()
+        tables.nodes.add_row(flags=tskit.NODE_IS_SAMPLE, time=0)
+        ts = tables.tree_sequence()
+        self.verify(ts, [5, 1, 3], isolated_as_missing=isolated_as_missing)
+
+    def test_site_ids_copied(self):
+        ts = self.ts()
+        site_ids = np.array([3, 1], dtype=np.int32)
+        chunk = ts.site_genotypes(site_ids)
+        site_ids[:] = 0
+        assert list(chunk.site_ids) == [3, 1]
+
+    @pytest.mark.parametrize("bad_site", [-1, 10**6])
+    def test_bad_site_id(self, bad_site):
+        ts = self.ts()
+        with pytest.raises(tskit.LibraryError, match="Site out of bounds"):
+            ts.site_genotypes([0, bad_site])
+
+    def test_bad_site_ids_shape(self):
+        ts = self.ts()
+        with pytest.raises(ValueError, match="one dimensional"):
+            ts.site_genotypes([[0, 1]])
+
+
 class TestHaplotypeGenerator:
     """
     Tests the haplotype generation code.
@@ -803,7 +1005,7 @@ class TestHaplotypeGenerator:
     def test_acgt_mutations(self):
         ts = msprime.simulate(10, mutation_rate=10)
         assert ts.num_sites > 0
-        tables = ts.tables
+        tables = ts.dump_tables()
         sites = tables.sites
         mutations = tables.mutations
         sites.set_columns(
@@ -823,7 +1025,7 @@ class TestHaplotypeGenerator:
 
     def test_fails_multiletter_mutations(self):
         ts = msprime.simulate(10, random_seed=2)
-        tables = ts.tables
+        tables = ts.dump_tables()
         tables.sites.add_row(0, "ACTG")
         tsp = tables.tree_sequence()
         with pytest.raises(TypeError):
@@ -831,7 +1033,7 @@ class TestHaplotypeGenerator:
 
     def test_fails_deletion_mutations(self):
         ts = msprime.simulate(10, random_seed=2)
-        tables = ts.tables
+        tables = ts.dump_tables()
         tables.sites.add_row(0, "")
         tsp = tables.tree_sequence()
         with pytest.raises(TypeError):
@@ -839,7 +1041,7 @@ class TestHaplotypeGenerator:
 
     def test_nonascii_mutations(self):
         ts = msprime.simulate(10, random_seed=2)
-        tables = ts.tables
+        tables = ts.dump_tables()
         tables.sites.add_row(0, chr(169))  # Copyright symbol
         tsp = tables.tree_sequence()
         with pytest.raises(TypeError):
@@ -1215,6 +1417,14 @@ class TestBinaryTreeExample:
         assert A[0] == "NANNNNNN"
         assert A[1] == "NGNNNNNN"
 
+    @pytest.mark.parametrize("num_threads", [1, 2, 5])
+    def test_alignments_num_threads(self, num_threads):
+        ts = self.ts()
+        A = list(ts.alignments(num_threads=num_threads))
+        assert A == list(ts.alignments())
+        A = list(ts.alignments(left=1, right=9, num_threads=num_threads))
+        assert A == list(ts.alignments(left=1, right=9))
+
     def test_empty_samples(self):
         ts = self.ts()
         A = list(ts.alignments(samples=[]))
@@ -924,6 +924,142 @@ class TestMRCA:
         assert ts.first().mrca(*ts.samples()) == tskit.NULL
 
 
+class TestMRCAArray:
+    t = tskit.Tree.generate_balanced(3)
+    #  4
+    # ┏━┻┓
+    # ┃  3
+    # ┃ ┏┻┓
+    # 0 1 2
+
+    def test_simple(self):
+        mrca = self.t.mrca_array([0, 1, 2, 0, 5, 3], [1, 2, 2, 3, 0, 5])
+        assert mrca.dtype == np.int32
+        assert_array_equal(mrca, [4, 3, 2, 4, 5, 5])
+        tmrca = self.t.tmrca_array([0, 1, 2, 0, 5], [1, 2, 2, 3, 0])
+        assert tmrca.dtype == np.float64
+        assert_array_equal(tmrca, [2, 1, 0, 2, np.inf])
+
+    def test_broadcast(self):
+        samples = self.t.tree_sequence.samples()
+        mrca = self.t.mrca_array(samples[:, np.newaxis], samples)
+        assert mrca.shape == (3, 3)
+        assert_array_equal(mrca, [[0, 4, 4], [4, 1, 3], [4, 3, 2]])
+        assert self.t.mrca_array(0, samples).shape == (3,)
+        assert self.t.mrca_array(0, 1).shape == ()
+        assert self.t.mrca_array([], []).shape == (0,)
+
+    def test_bad_shapes(self):
+        with pytest.raises(ValueError):
+            self.t.mrca_array([0, 1], [0, 1, 2])
+
+    @pytest.mark.parametrize("bad_node", [-1, 6, 1000])
+    def test_out_of_bounds(self, bad_node):
+        with pytest.raises(tskit.LibraryError, match="out of bounds"):
+            self.t.mrca_array([0, bad_node], [1, 1])
+        with pytest.raises(tskit.LibraryError, match="out of bounds"):
+            self.t.tmrca_array([0, 1], [1, bad_node])
+
+    def test_multiple_roots(self):
+        ts = tskit.Tree.generate_balanced(10).tree_sequence
+        ts = ts.delete_intervals([ts.first().interval])
+        tree = ts.first()
+        assert_array_equal(tree.mrca_array([0, 0], [1, 0]), [tskit.NULL, 0])
+        assert_array_equal(tree.tmrca_array([0, 0], [1, 0]), [np.nan, 0])
+
+    def test_no_sample_counts(self):
+        tree = tskit.Tree(self.t.tree_sequence, sample_lists=False)
+        tree.first()
+        assert_array_equal(tree.mrca_array([0], [1]), [4])
+
+    @pytest.mark.parametrize("ts", get_example_tree_sequences())
+    def test_example_pairs(self, ts):
+        rng = np.random.default_rng(5)
+        u = np.append(rng.integers(0, ts.num_nodes + 1, size=200), [0, ts.num_nodes])
+        v = np.append(rng.integers(0, ts.num_nodes + 1, size=200), [0, 0])
+        times = np.append(ts.nodes_time, np.inf)
+        for tree in itertools.islice(ts.trees(), 10):
+            mrca = tree.mrca_array(u, v)
+            tmrca = tree.tmrca_array(u, v)
+            for a, b, w, t in zip(u, v, mrca, tmrca):
+                assert w == tree.mrca(a, b)
+                if w == tskit.NULL:
+                    assert np.isnan(t)
+                else:
+                    assert t == times[w]
+
+
+class TestTmrcaMatrix:
+    def naive_tmrca_matrix(self, ts, nodes, windows, span_normalise=True):
+        result = np.zeros((len(windows) - 1, len(nodes), len(nodes)))
+        for tree in ts.trees():
+            for k in range(len(windows) - 1):
+                left = max(tree.interval.left, windows[k])
+                right = min(tree.interval.right, windows[k + 1])
+                if left >= right:
+                    continue
+                for i, u in enumerate(nodes):
+                    for j, v in enumerate(nodes):
+                        w = tree.mrca(u, v)
+                        t = np.nan if w == tskit.NULL else tree.time(w)
+                        result[k, i, j] += (right - left) * t
+        if span_normalise:
+            result /= np.diff(windows)[:, np.newaxis, np.newaxis]
+        return result
+
+    @pytest.mark.parametrize("ts", get_example_tree_sequences())
+    def test_samples(self, ts):
+        if ts.num_samples > 20:
+            pytest.skip("Too slow")
+        windows = [0, ts.sequence_length]
+        expected = self.naive_tmrca_matrix(ts, ts.samples(), windows)[0]
+        result = ts.tmrca_matrix()
+        assert result.shape == (ts.num_samples, ts.num_samples)
+        np.testing.assert_allclose(result, expected)
+        np.testing.assert_array_equal(result, result.T)
+
+    @pytest.mark.parametrize("ts", get_example_tree_sequences())
+    @pytest.mark.parametrize("span_normalise", [True, False])
+    def test_windows_all_nodes(self, ts, span_normalise):
+        if ts.num_nodes > 20:
+            pytest.skip("Too slow")
+        nodes = np.arange(ts.num_nodes)[::-1]
+        windows = np.linspace(0, ts.sequence_length, num=4)
+        expected = self.naive_tmrca_matrix(ts, nodes, windows, span_normalise)
+        result = ts.tmrca_matrix(nodes, windows=windows, span_normalise=span_normalise)
+        assert result.shape == (3, ts.num_nodes, ts.num_nodes)
+        np.testing.assert_allclose(result, expected)
+
+    def test_trees_windows(self):
+        ts = msprime.simulate(5, recombination_rate=2, random_seed=3)
+        assert ts.num_trees > 2
+        result = ts.tmrca_matrix(windows="trees")
+        assert result.shape == (ts.num_trees, 5, 5)
+        for tree, matrix in zip(ts.trees(), result):
+            samples = ts.samples()
+            np.testing.assert_allclose(
+                matrix, tree.tmrca_array(samples[:, np.newaxis], samples)
+            )
+
+    def test_simple(self):
+        ts = tskit.Tree.generate_balanced(3).tree_sequence
+        assert_array_equal(ts.tmrca_matrix(), [[0, 2, 2], [2, 0, 1], [2, 1, 0]])
+        assert_array_equal(ts.tmrca_matrix([3, 4]), [[1, 2], [2, 2]])
+        assert ts.tmrca_matrix([]).shape == (0, 0)
+
+    @pytest.mark.parametrize("bad_node", [-1, 5, 10])
+    def test_bad_nodes(self, bad_node):
+        ts = tskit.Tree.generate_balanced(3).tree_sequence
+        with pytest.raises(tskit.LibraryError, match="out of bounds"):
+            ts.tmrca_matrix([0, bad_node])
+
+    @pytest.mark.parametrize("windows", [[0, 0.5, 0.5, 1], [0.1, 1], [0, 2]])
+    def test_bad_windows(self, windows):
+        ts = tskit.Tree.generate_balanced(3).tree_sequence
+        with pytest.raises(tskit.LibraryError, match="Windows"):
+            ts.tmrca_matrix(windows=windows)
+
+
 class TestPathLength:
     t = tskit.Tree.generate_balanced(9)
     #         16
@@ -1443,6 +1579,68 @@ class TestTreeSequence(HighLevelTestCase):
         )
         assert ts.discrete_time == discrete_time
 
+    def test_tables_is_view(self, ts_fixture):
+        ts = ts_fixture
+        tables = ts.tables
+        assert tables == ts.dump_tables()
+        for table in tables.table_name_map.values():
+            for column, array in table.asdict().items():
+                if column == "metadata_schema":
+                    continue
+                assert not array.flags.writeable
+                assert not array.flags.owndata
+        assert np.shares_memory(tables.nodes.time, ts.nodes_time)
+        assert np.shares_memory(tables.edges.parent, ts.edges_parent)
+        assert np.shares_memory(
+            tables.indexes.edge_insertion_order, ts.indexes_edge_insertion_order
+        )
+        assert np.shares_memory(tables.nodes.time, ts.tables.nodes.time)
+
+    def test_tables_read_only(self, ts_fixture):
+        ts = ts_fixture
+        tables = ts.tables
+        mutators = [
+            lambda: tables.nodes.add_row(time=1),
+            lambda: tables.nodes.clear(),
+            lambda: tables.nodes.truncate(0),
+            lambda: tables.nodes.set_columns(**ts.dump_tables().nodes.asdict()),
+            lambda: setattr(tables.nodes, "time", tables.nodes.time + 1),
+            lambda: tables.nodes.__setitem__(0, tables.nodes[0]),
+            lambda: tables.nodes.packset_metadata([b""] * tables.nodes.num_rows),
+            lambda: tables.edges.squash(),
+            lambda: tables.sites.replace_with(tskit.SiteTable()),
+            lambda: tables.clear(),
+            lambda: tables.sort(),
+            lambda: tables.simplify(),
+            lambda: tables.build_index(),
+            lambda: setattr(tables, "sequence_length", 1),
+            lambda: setattr(tables, "time_units", "days"),
+            lambda: setattr(tables, "metadata", tables.metadata),
+            lambda: setattr(tables.reference_sequence, "data", "ACGT"),
+        ]
+        for mutator in mutators:
+            with pytest.raises(AttributeError, match="read-only"):
+                mutator()
+        with pytest.raises(ValueError, match="read-only"):
+            tables.nodes.time[:] = 0
+        assert tables == ts.dump_tables()
+        # Copies of the view are mutable
+        copy = tables.copy()
+        copy.nodes.clear()
+        assert ts.num_nodes > 0
+
+    def test_tables_outlive_tree_sequence(self, ts_fixture):
+        tables = ts_fixture.dump_tables()
+        ts = tables.tree_sequence()
+        view = ts.tables
+        nodes = ts.tables.nodes
+        time = ts.tables.nodes.time
+        del ts
+        assert view == tables
+        assert nodes == tables.nodes
+        assert_array_equal(time, tables.nodes.time)
+        assert view.tree_sequence() == tables.tree_sequence()
+
     @pytest.mark.parametrize("ts", get_example_tree_sequences())
     def test_trees(self, ts):
         self.verify_trees(ts)
@@ -2962,6 +3160,83 @@ class TestEdgeDiffs:
             assert left == 0
             assert right == 0
 
+    @pytest.mark.parametrize("ts", get_example_tree_sequences())
+    @pytest.mark.parametrize("direction", [tskit.FORWARD, tskit.REVERSE])
+    @pytest.mark.parametrize("include_terminal", [False, True])
+    def test_as_ids(self, ts, direction, include_terminal):
+        diffs = ts.edge_diffs(include_terminal, direction=direction)
+        id_diffs = ts.edge_diffs(include_terminal, direction=direction, as_ids=True)
+        for diff, id_diff in itertools.zip_longest(diffs, id_diffs):
+            assert diff.interval == id_diff.interval
+            assert isinstance(id_diff.edges_out, np.ndarray)
+            assert isinstance(id_diff.edges_in, np.ndarray)
+            assert id_diff.edges_out.dtype == np.int32
+            assert id_diff.edges_in.dtype == np.int32
+            assert_array_equal([e.id for e in diff.edges_out], id_diff.edges_out)
+            assert_array_equal([e.id for e in diff.edges_in], id_diff.edges_in)
+
+    @pytest.mark.parametrize("ts", get_example_tree_sequences())
+    @pytest.mark.parametrize("direction", [tskit.FORWARD, tskit.REVERSE])
+    def test_arrays_correct_trees(self, ts, direction):
+        diffs = ts.edge_diff_arrays(direction=direction)
+        num_trees = ts.num_trees
+        assert diffs.left.shape == (num_trees,)
+        assert diffs.right.shape == (num_trees,)
+        assert diffs.edges_out_offset.shape == (num_trees + 1,)
+        assert diffs.edges_in_offset.shape == (num_trees + 1,)
+        assert diffs.edges_out_offset.dtype == np.int64
+        assert diffs.edges_in_offset.dtype == np.int64
+        assert diffs.edges_out_offset[0] == 0
+        assert diffs.edges_in_offset[0] == 0
+        assert diffs.edges_out_offset[-1] == len(diffs.edges_out)
+        assert diffs.edges_in_offset[-1] == len(diffs.edges_in)
+        assert len(diffs.edges_in) == ts.num_edges
+        trees = ts.trees() if direction == tskit.FORWARD else reversed(ts.trees())
+        parent = np.full(ts.num_nodes + 1, tskit.NULL, dtype=np.int32)
+        for j, tree in enumerate(trees):
+            assert (diffs.left[j], diffs.right[j]) == tree.interval
+            start, stop = diffs.edges_out_offset[j : j + 2]
+            edges_out = diffs.edges_out[start:stop]
+            parent[ts.edges_child[edges_out]] = tskit.NULL
+            start, stop = diffs.edges_in_offset[j : j + 2]
+            edges_in = diffs.edges_in[start:stop]
+            parent[ts.edges_child[edges_in]] = ts.edges_parent[edges_in]
+            assert_array_equal(parent, tree.parent_array)
+
+    @pytest.mark.parametrize("ts", get_example_tree_sequences())
+    @pytest.mark.parametrize("direction", [tskit.FORWARD, tskit.REVERSE])
+    def test_arrays_include_terminal(self, ts, direction):
+        diffs = ts.edge_diff_arrays(direction=direction)
+        terminal_diffs = ts.edge_diff_arrays(True, direction=direction)
+        num_trees = ts.num_trees
+        assert terminal_diffs.left.shape == (num_trees + 1,)
+        assert terminal_diffs.edges_out_offset.shape == (num_trees + 2,)
+        assert_array_equal(diffs.left, terminal_diffs.left[:-1])
+        assert_array_equal(diffs.right, terminal_diffs.right[:-1])
+        assert_array_equal(diffs.edges_in, terminal_diffs.edges_in)
+        assert_array_equal(
+            diffs.edges_out, terminal_diffs.edges_out[: len(diffs.edges_out)]
+        )
+        # Every edge is removed exactly once, and nothing is inserted at the end
+        assert_array_equal(np.sort(terminal_diffs.edges_out), np.arange(ts.num_edges))
+        assert terminal_diffs.edges_in_offset[-1] == terminal_diffs.edges_in_offset[-2]
+        end = ts.sequence_length if direction == tskit.FORWARD else 0
+        assert terminal_diffs.left[-1] == end
+        assert terminal_diffs.right[-1] == end
+
+    def test_arrays_read_only(self, simple_degree2_ts_fixture):
+        diffs = simple_degree2_ts_fixture.edge_diff_arrays()
+        with pytest.raises(ValueError):
+            diffs.edges_in[0] = 1
+        with pytest.raises(ValueError):
+            diffs.edges_out[0] = 1
+
+    @pytest.mark.parametrize("direction", [-6, "forward", None])
+    def test_arrays_bad_direction(self, direction, simple_degree2_ts_fixture):
+        ts = simple_degree2_ts_fixture
+        with pytest.raises(ValueError, match="direction must be"):
+            ts.edge_diff_arrays(direction=direction)
+
 
 class TestTreeSequenceMethodSignatures:
     ts = msprime.simulate(10, random_seed=1234)
@@ -4740,6 +5015,107 @@ class TestSeek:
                 tree.seek(bad_position)
 
 
+class TestSeekTreeCheckpoints:
+    """
+    Tests for seeking in tree sequences with tree checkpoints.
+    """
+
+    def ts(self, interval):
+        ts = msprime.sim_ancestry(
+            8,
+            sequence_length=100,
+            recombination_rate=0.1,
+            random_seed=42,
+        )
+        ts = msprime.sim_mutations(ts, rate=0.05, random_seed=42)
+        assert ts.num_trees > 20
+        tables = ts.dump_tables()
+        tables.build_index(tree_checkpoint_interval=interval)
+        assert tables.has_tree_checkpoints()
+        return ts, tables.tree_sequence()
+
+    def verify_same_tree(self, t1, t2):
+        assert t1.index == t2.index
+        assert t1.interval == t2.interval
+        assert np.array_equal(t1.parent_array, t2.parent_array)
+        assert np.array_equal(t1.edge_array, t2.edge_array)
+        assert t1.num_edges == t2.num_edges
+        assert set(t1.roots) == set(t2.roots)
+        assert t1.num_children_array[-1] == t2.num_children_array[-1]
+        assert [s.id for s in t1.sites()] == [s.id for s in t2.sites()]
+        for u in t1.nodes():
+            assert t1.num_samples(u) == t2.num_samples(u)
+
+    @pytest.mark.parametrize("interval", [1, 2, 7, 1000])
+    def test_seek_index(self, interval):
+        ts, ts_checkpoints = self.ts(interval)
+        rng = np.random.default_rng(1)
+        indexes = list(rng.integers(0, ts.num_trees, 30)) + [0, ts.num_trees - 1]
+        tree = tskit.Tree(ts_checkpoints)
+        for index in indexes:
+            tree.seek_index(index)
+            self.verify_same_tree(ts.at_index(index), tree)
+            fresh_tree = tskit.Tree(ts_checkpoints)
+            fresh_tree.seek_index(index)
+            self.verify_same_tree(ts.at_index(index), fresh_tree)
+
+    @pytest.mark.parametrize("interval", [1, 5])
+    def test_seek_mid(self, interval):
+        ts, ts_checkpoints = self.ts(interval)
+        breakpoints = ts.breakpoints(as_array=True)
+        mid = breakpoints[:-1] + np.diff(breakpoints) / 2
+        tree = tskit.Tree(ts_checkpoints)
+        for index, x in reversed(list(enumerate(mid))):
+            tree.seek(x)
+            assert tree.index == index
+            self.verify_same_tree(ts.at_index(index), tree)
+
+    def test_iterate_after_seek(self):
+        ts, ts_checkpoints = self.ts(4)
+        index = ts.num_trees // 2
+        tree = tskit.Tree(ts_checkpoints)
+        tree.seek_index(index)
+        tree.next()
+        self.verify_same_tree(ts.at_index(index + 1), tree)
+        tree.seek_index(index)
+        tree.prev()
+        self.verify_same_tree(ts.at_index(index - 1), tree)
+        tree.seek_index(ts.num_trees - 1)
+        assert not tree.next()
+
+    def test_sample_lists(self):
+        ts, ts_checkpoints = self.ts(3)
+        tree = tskit.Tree(ts_checkpoints, sample_lists=True)
+        for index in [ts.num_trees // 2, 4, ts.num_trees - 2]:
+            tree.seek_index(index)
+            t1 = ts.at_index(index, sample_lists=True)
+            for u in t1.nodes():
+                assert sorted(tree.samples(u)) == sorted(t1.samples(u))
+
+    def test_tracked_samples(self):
+        ts, ts_checkpoints = self.ts(3)
+        tree = tskit.Tree(ts_checkpoints, tracked_samples=[0, 1, 5])
+        for index in [ts.num_trees // 2, 4, ts.num_trees - 2]:
+            tree.seek_index(index)
+            t1 = ts.at_index(index, tracked_samples=[0, 1, 5])
+            for u in t1.nodes():
+                assert tree.num_tracked_samples(u) == t1.num_tracked_samples(u)
+
+    def test_dump_load(self, tmp_path):
+        ts, ts_checkpoints = self.ts(5)
+        ts_checkpoints.dump(tmp_path / "checkpoints.trees")
+        ts_loaded = tskit.load(tmp_path / "checkpoints.trees")
+        assert ts_loaded.tables.has_tree_checkpoints()
+        assert ts_loaded.equals(ts)
+        tree = tskit.Tree(ts_loaded)
+        tree.seek_index(ts.num_trees // 2)
+        self.verify_same_tree(ts.at_index(ts.num_trees // 2), tree)
+
+    def test_no_checkpoints_by_default(self):
+        ts, _ = self.ts(5)
+        assert not ts.tables.has_tree_checkpoints()
+
+
 class SimpleContainersMixin:
     """
     Tests for the SimpleContainer classes.
@@ -915,6 +915,160 @@ class TestIbdProperties:
         assert_ibd_equal(between_segs, filtered_segs)
 
 
+def stored_ibd_rows(segs):
+    rows = []
+    for (a, b), seglist in segs.items():
+        for left, right, node in zip(seglist.left, seglist.right, seglist.node):
+            rows.append((a, b, left, right, node))
+    return sorted(rows)
+
+
+def streamed_ibd_rows(ts, **kwargs):
+    batches = []
+    ts.ibd_segments_stream(batches.append, **kwargs)
+    rows = []
+    for batch in batches:
+        assert isinstance(batch, tskit.IdentitySegmentArrays)
+        assert batch.a.dtype == np.int32
+        assert batch.b.dtype == np.int32
+        assert batch.left.dtype == np.float64
+        assert batch.right.dtype == np.float64
+        assert batch.node.dtype == np.int32
+        assert len(batch.a) > 0
+        if "buffer_size" in kwargs:
+            assert len(batch.a) <= kwargs["buffer_size"]
+        assert np.all(batch.a < batch.b)
+        rows.extend(zip(*batch))
+    return sorted(rows)
+
+
+class TestIbdStream:
+    @pytest.mark.parametrize("ts", get_example_tree_sequences())
+    @pytest.mark.parametrize("num_partitions", [1, 3])
+    def test_within_all_samples(self, ts, num_partitions):
+        segs = ts.ibd_segments(store_segments=True)
+        rows = streamed_ibd_rows(ts, num_partitions=num_partitions)
+        assert rows == stored_ibd_rows(segs)
+
+    @pytest.mark.parametrize("ts", get_example_tree_sequences())
+    def test_between(self, ts):
+        samples = ts.samples()[:9]
+        sample_sets = [samples[1::3], samples[2::3], samples[0::3]]
+        segs = ts.ibd_segments(store_segments=True, between=sample_sets)
+        rows = streamed_ibd_rows(ts, between=sample_sets, num_partitions=2)
+        assert rows == stored_ibd_rows(segs)
+
+    @pytest.mark.parametrize("num_partitions", [1, 2, 5, 20, 100])
+    @pytest.mark.parametrize("num_threads", [0, 3])
+    @pytest.mark.parametrize("buffer_size", [1, 7, None])
+    def test_partitions_threads(self, num_partitions, num_threads, buffer_size):
+        ts = msprime.sim_ancestry(
+            10, sequence_length=100, recombination_rate=0.01, random_seed=2
+        )
+        segs = ts.ibd_segments(store_segments=True, max_time=2, min_span=1)
+        kwargs = {} if buffer_size is None else {"buffer_size": buffer_size}
+        rows = streamed_ibd_rows(
+            ts,
+            max_time=2,
+            min_span=1,
+            num_partitions=num_partitions,
+            num_threads=num_threads,
+            **kwargs,
+        )
+        assert len(rows) > 0
+        assert rows == stored_ibd_rows(segs)
+
+    @pytest.mark.parametrize("num_partitions", [1, 4])
+    def test_within_subset(self, num_partitions):
+        ts = msprime.sim_ancestry(
+            10, sequence_length=100, recombination_rate=0.01, random_seed=3
+        )
+        within = ts.samples()[::3]
+        segs = ts.ibd_segments(store_segments=True, within=within)
+        rows = streamed_ibd_rows(ts, within=within, num_partitions=num_partitions)
+        assert rows == stored_ibd_rows(segs)
+
+    @pytest.mark.parametrize("ts", example_ts())
+    def test_tables_interface(self, ts):
+        batches = []
+        ts.tables.ibd_segments_stream(batches.append)
+        assert streamed_ibd_rows(ts) == sorted(
+            row for batch in batches for row in zip(*batch)
+        )
+
+    @pytest.mark.parametrize("ts", example_ts())
+    @pytest.mark.parametrize("within", [[], [0]])
+    def test_no_pairs(self, ts, within):
+        assert streamed_ibd_rows(ts, within=within, num_partitions=2) == []
+
+    @pytest.mark.parametrize("ts", example_ts())
+    def test_empty_in_between(self, ts):
+        assert streamed_ibd_rows(ts, between=[[0, 1], []]) == []
+
+    @pytest.mark.parametrize("ts", example_ts())
+    @pytest.mark.parametrize("num_threads", [0, 2])
+    def test_sink_error(self, ts, num_threads):
+        def sink(segs):
+            raise ValueError("sink error")
+
+        with pytest.raises(ValueError, match="sink error"):
+            ts.ibd_segments_stream(
+                sink, num_partitions=2, num_threads=num_threads, buffer_size=1
+            )
+
+    @pytest.mark.parametrize("num_threads", [0, 2])
+    def test_sink_modifies_tables(self, num_threads):
+        tables = msprime.sim_ancestry(
+            10, sequence_length=100, recombination_rate=0.01, random_seed=4
+        ).dump_tables()
+        n = 10**6
+
+        def sink(segs):
+            tables.clear()
+            tables.edges.set_columns(
+                left=np.zeros(n),
+                right=np.ones(n),
+                parent=np.zeros(n, dtype=np.int32),
+                child=np.zeros(n, dtype=np.int32),
+            )
+
+        with pytest.raises(RuntimeError, match="in use"):
+            tables.ibd_segments_stream(
+                sink, num_partitions=2, num_threads=num_threads, buffer_size=1
+            )
+        # The lock is released when the stream finishes
+        tables.clear()
+        assert tables.edges.num_rows == 0
+
+    @pytest.mark.parametrize("ts", example_ts())
+    def test_sink_modifies_other_tables(self, ts):
+        tables = ts.dump_tables()
+        other = tskit.TableCollection(1)
+        batches = []
+
+        def sink(segs):
+            batches.append(segs)
+            other.edges.add_row(0, 1, 0, 1)
+
+        tables.ibd_segments_stream(sink, buffer_size=1)
+        assert other.edges.num_rows == len(batches)
+
+    @pytest.mark.parametrize("ts", example_ts())
+    def test_bad_args(self, ts):
+        with pytest.raises(TypeError, match="callable"):
+            ts.ibd_segments_stream(None)
+        with pytest.raises(ValueError, match="num_partitions"):
+            ts.ibd_segments_stream(print, num_partitions=0)
+        with pytest.raises(ValueError, match="buffer_size"):
+            ts.ibd_segments_stream(print, buffer_size=0)
+        with pytest.raises(ValueError, match="mutually exclusive"):
+            ts.ibd_segments_stream(print, within=[0, 1], between=[[0], [1]])
+        with pytest.raises(tskit.LibraryError, match="Node out of bounds"):
+            ts.ibd_segments_stream(print, within=[0, -1])
+        with pytest.raises(tskit.LibraryError, match="Duplicate sample"):
+            ts.ibd_segments_stream(print, between=[[0], [0]])
+
+
 class TestIdentitySegments:
     """
     Test the IdentitySegments class interface.
@@ -949,6 +1103,30 @@ class TestIdentitySegments:
         num_segments = sum(len(lst) for lst in ibd_segments.values())
         assert num_segments == ibd_segments.num_segments
 
+        arrays = ibd_segments.arrays()
+        assert isinstance(arrays, tskit.IdentitySegmentArrays)
+        assert len(arrays.a) == ibd_segments.num_segments
+        j = 0
+        for (a, b), segment_list in ibd_segments.items():
+            k = j + len(segment_list)
+            assert np.all(arrays.a[j:k] == a)
+            assert np.all(arrays.b[j:k] == b)
+            np.testing.assert_array_equal(arrays.left[j:k], segment_list.left)
+            np.testing.assert_array_equal(arrays.right[j:k], segment_list.right)
+            np.testing.assert_array_equal(arrays.node[j:k], segment_list.node)
+            j = k
+        assert j == ibd_segments.num_segments
+
+        samples = ts.samples()
+        index = {u: j for j, u in enumerate(samples)}
+        span = np.zeros((len(samples), len(samples)))
+        for (a, b), segment_list in ibd_segments.items():
+            span[index[a], index[b]] = segment_list.total_span
+            span[index[b], index[a]] = segment_list.total_span
+        np.testing.assert_array_equal(
+            ibd_segments.span_matrix([[u] for u in samples]), span
+        )
+
     @pytest.mark.parametrize("store_segments", [True, False])
     @pytest.mark.parametrize("store_pairs", [True, False])
     def test_str(self, store_segments, store_pairs):
@@ -1001,6 +1179,10 @@ class TestIdentitySegments:
             _ = list(result)
         with pytest.raises(tskit.IdentityPairsNotStoredError):
             _ = result == result
+        with pytest.raises(tskit.IdentityPairsNotStoredError):
+            result.span_matrix([[0], [1]])
+        with pytest.raises(tskit.IdentitySegmentsNotStoredError):
+            result.arrays()
         # It's OK to when we compare with another type
         assert result != []
 
@@ -1025,6 +1207,9 @@ class TestIdentitySegments:
             _ = seglist.node
         with pytest.raises(tskit.IdentitySegmentsNotStoredError):
             _ = seglist == seglist
+        with pytest.raises(tskit.IdentitySegmentsNotStoredError):
+            result.arrays()
+        assert result.span_matrix([[0], [1]])[0, 1] == 1
 
     @pytest.mark.parametrize("n", [1, 2, 3])
     def test_pairs_all_samples(self, n):
@@ -1104,6 +1289,46 @@ class TestIdentitySegments:
             assert k in pairs
             assert isinstance(v, tskit.IdentitySegmentList)
 
+    @pytest.mark.parametrize("store_segments", [True, False])
+    def test_span_matrix_individuals(self, store_segments):
+        ts = msprime.sim_ancestry(
+            6, sequence_length=100, recombination_rate=0.01, random_seed=3
+        )
+        result = ts.ibd_segments(
+            store_pairs=True, store_segments=store_segments, max_time=3
+        )
+        sample_sets = [ind.nodes for ind in ts.individuals()]
+        span = np.zeros((ts.num_individuals, ts.num_individuals))
+        for (a, b), segment_list in result.items():
+            i = ts.node(a).individual
+            j = ts.node(b).individual
+            span[i, j] += segment_list.total_span
+            if i != j:
+                span[j, i] += segment_list.total_span
+        matrix = result.span_matrix(sample_sets)
+        assert matrix.shape == span.shape
+        np.testing.assert_allclose(matrix, span)
+        np.testing.assert_allclose(np.triu(matrix).sum(), result.total_span)
+
+    def test_span_matrix_subsets(self):
+        ts = msprime.sim_ancestry(2, random_seed=2)
+        result = ts.ibd_segments(store_pairs=True)
+        assert result.span_matrix([]).shape == (0, 0)
+        np.testing.assert_array_equal(result.span_matrix([[]]), [[0]])
+        np.testing.assert_array_equal(
+            result.span_matrix([[0, 1], [3]]), [[1, 2], [2, 0]]
+        )
+
+    def test_span_matrix_errors(self):
+        ts = msprime.sim_ancestry(2, random_seed=2)
+        result = ts.ibd_segments(store_pairs=True)
+        with pytest.raises(tskit.LibraryError, match="Duplicate sample"):
+            result.span_matrix([[0, 1], [1]])
+        with pytest.raises(tskit.LibraryError, match="Node out of bounds"):
+            result.span_matrix([[0, -1]])
+        with pytest.raises(tskit.LibraryError, match="Node out of bounds"):
+            result.span_matrix([[0], [ts.num_nodes]])
+
 
 class TestIdentitySegmentsList:
     """
@@ -24,6 +24,7 @@
 Test cases for the low level C interface to tskit.
 """
 import collections
+import ctypes
 import gc
 import inspect
 import itertools
@@ -334,7 +335,7 @@ class TestTableCollection(LowLevelTestCase):
 
     def test_simplify_bad_args(self):
         ts = msprime.simulate(10, random_seed=1)
-        tc = ts.tables._ll_tables
+        tc = ts.dump_tables()._ll_tables
         with pytest.raises(TypeError):
             tc.simplify()
         with pytest.raises(ValueError):
@@ -399,7 +400,7 @@ class TestTableCollection(LowLevelTestCase):
 
     def test_subset_bad_args(self):
         ts = msprime.simulate(10, random_seed=1)
-        tc = ts.tables._ll_tables
+        tc = ts.dump_tables()._ll_tables
         with pytest.raises(TypeError):
             tc.subset(np.array(["a"]))
         with pytest.raises(ValueError):
@@ -411,7 +412,7 @@ class TestTableCollection(LowLevelTestCase):
 
     def test_union_bad_args(self):
         ts = msprime.simulate(10, random_seed=1)
-        tc = ts.tables._ll_tables
+        tc = ts.dump_tables()._ll_tables
         tc2 = tc
         with pytest.raises(TypeError):
             tc.union(tc2, np.array(["a"]))
@@ -501,6 +502,60 @@ class TestTableCollection(LowLevelTestCase):
             tc.delete_older("1234")
 
 
+class TestSimplifier(LowLevelTestCase):
+    """
+    Tests for the low-level persistent Simplifier class.
+    """
+
+    def test_bad_args(self):
+        with pytest.raises(TypeError):
+            _tskit.Simplifier()
+        with pytest.raises(TypeError):
+            _tskit.Simplifier(None)
+        with pytest.raises(TypeError):
+            _tskit.Simplifier(_tskit.TableCollection(1), keep_unary="x")
+        with pytest.raises(_tskit.LibraryError, match="KEEP_UNARY_MUTUALLY_EXCLUSIVE"):
+            _tskit.Simplifier(
+                _tskit.TableCollection(1),
+                keep_unary=True,
+                keep_unary_in_individuals=True,
+            )
+
+    def test_run_bad_args(self):
+        tc = _tskit.TableCollection(1)
+        self.get_example_tree_sequence().dump_tables(tc)
+        simplifier = _tskit.Simplifier(tc)
+        with pytest.raises(TypeError):
+            simplifier.run()
+        with pytest.raises(ValueError):
+            simplifier.run(["x"])
+        with pytest.raises(_tskit.LibraryError):
+            simplifier.run([-1])
+
+    def test_run(self):
+        ts = self.get_example_tree_sequence()
+        tc = _tskit.TableCollection(1)
+        ts.dump_tables(tc)
+        other = _tskit.TableCollection(1)
+        ts.dump_tables(other)
+        samples = [0, 1, 2]
+        simplifier = _tskit.Simplifier(tc)
+        assert simplifier.tables is tc
+        node_map = simplifier.run(samples)
+        expected = other.simplify(samples)
+        assert tc.equals(other)
+        np.testing.assert_array_equal(node_map, expected)
+
+    def test_rows_removed(self):
+        tc = _tskit.TableCollection(1)
+        self.get_example_tree_sequence().dump_tables(tc)
+        simplifier = _tskit.Simplifier(tc)
+        simplifier.run([0, 1, 2])
+        tc.clear()
+        with pytest.raises(_tskit.LibraryError, match="removed"):
+            simplifier.run([])
+
+
 class TestIbd:
     def test_uninitialised(self):
         result = _tskit.IdentitySegments.__new__(_tskit.IdentitySegments)
@@ -514,6 +569,10 @@ class TestIbd:
             result.total_span
         with pytest.raises(SystemError):
             result.get_keys()
+        with pytest.raises(SystemError):
+            result.get_arrays()
+        with pytest.raises(SystemError):
+            result.get_span_matrix([1], [0])
 
     def test_get_keys(self):
         ts = msprime.simulate(10, random_seed=1)
@@ -613,6 +672,53 @@ class TestIbd:
         with pytest.raises(_tskit.LibraryError, match="Duplicate sample"):
             tc.ibd_segments_between([1, 1], [0, 0])
 
+    @pytest.mark.parametrize("buffer_size", [1, 7, 100])
+    def test_sink(self, buffer_size):
+        ts = msprime.simulate(10, random_seed=1)
+        tc = ts.dump_tables()._ll_tables
+        batches = []
+
+        def sink(*args):
+            batches.append(args)
+
+        result = tc.ibd_segments_within(sink=sink, buffer_size=buffer_size)
+        assert result.num_segments == 45
+        sizes = [len(batch[0]) for batch in batches]
+        assert sum(sizes) == 45
+        assert max(sizes) <= buffer_size
+        for a, b, left, right, node in batches:
+            assert a.dtype == np.int32
+            assert b.dtype == np.int32
+            assert left.dtype == np.float64
+            assert right.dtype == np.float64
+            assert node.dtype == np.int32
+        batches.clear()
+        result = tc.ibd_segments_between(
+            [5, 5], range(10), sink=sink, buffer_size=buffer_size
+        )
+        assert sum(len(batch[0]) for batch in batches) == 25
+
+    def test_sink_bad_args(self):
+        ts = msprime.simulate(10, random_seed=1)
+        tc = ts.dump_tables()._ll_tables
+        for method, args in [
+            (tc.ibd_segments_within, []),
+            (tc.ibd_segments_between, [[5, 5], range(10)]),
+        ]:
+            with pytest.raises(TypeError, match="callable"):
+                method(*args, sink="sdf")
+            for bad_size in [0, -1]:
+                with pytest.raises(ValueError, match="buffer_size"):
+                    method(*args, sink=print, buffer_size=bad_size)
+            with pytest.raises(TypeError):
+                method(*args, sink=print, buffer_size="sdf")
+
+            def sink(*args):
+                raise ValueError("sink error")
+
+            with pytest.raises(ValueError, match="sink error"):
+                method(*args, sink=sink, buffer_size=1)
+
     def test_get_output(self):
         ts = msprime.simulate(5, random_seed=1)
         tc = ts.tables._ll_tables
@@ -632,6 +738,43 @@ class TestIbd:
             assert value.num_segments == 1
             assert value.total_span == 1
 
+    def test_get_arrays(self):
+        ts = msprime.simulate(5, random_seed=1)
+        tc = ts.dump_tables()._ll_tables
+        result = tc.ibd_segments_within([0, 1, 2, 3], store_segments=True)
+        a, b, left, right, node = result.get_arrays()
+        assert a.dtype == np.int32
+        assert b.dtype == np.int32
+        assert left.dtype == np.float64
+        assert right.dtype == np.float64
+        assert node.dtype == np.int32
+        np.testing.assert_array_equal(np.column_stack([a, b]), result.get_keys())
+        np.testing.assert_array_equal(left, 0)
+        np.testing.assert_array_equal(right, 1)
+        result = tc.ibd_segments_within(store_pairs=True)
+        with pytest.raises(_tskit.IdentitySegmentsNotStoredError):
+            result.get_arrays()
+
+    def test_get_span_matrix(self):
+        ts = msprime.simulate(5, random_seed=1)
+        tc = ts.dump_tables()._ll_tables
+        result = tc.ibd_segments_within([0, 1, 2, 3], store_pairs=True)
+        matrix = result.get_span_matrix([2, 2], [0, 1, 2, 3])
+        np.testing.assert_array_equal(matrix, [[1, 4], [4, 1]])
+        with pytest.raises(TypeError):
+            result.get_span_matrix()
+        with pytest.raises(TypeError):
+            result.get_span_matrix([1])
+        with pytest.raises(ValueError):
+            result.get_span_matrix("sdf", [1, 2])
+        with pytest.raises(ValueError, match="Sum of sample_set_sizes"):
+            result.get_span_matrix([1, 1], [1])
+        with pytest.raises(_tskit.LibraryError, match="Duplicate sample"):
+            result.get_span_matrix([1, 1], [0, 0])
+        result = tc.ibd_segments_within()
+        with pytest.raises(_tskit.IdentityPairsNotStoredError):
+            result.get_span_matrix([1, 1], [0, 1])
+
     def test_get_bad_args(self):
         ts = msprime.simulate(10, random_seed=1)
         tc = ts.tables._ll_tables
@@ -723,7 +866,7 @@ class TestTableMethods:
 
     @pytest.mark.parametrize("table_name", tskit.TABLE_NAMES)
     def test_table_extend(self, table_name, ts_fixture):
-        table = getattr(ts_fixture.tables, table_name)
+        table = getattr(ts_fixture.dump_tables(), table_name)
         assert len(table) >= 5
         ll_table = table.ll_table
         table_copy = table.copy()
@@ -753,7 +896,7 @@ class TestTableMethods:
     def test_table_extend_types(
         self, ts_fixture, table_name, row_indexes, expected_rows
     ):
-        table = getattr(ts_fixture.tables, table_name)
+        table = getattr(ts_fixture.dump_tables(), table_name)
         assert len(table) >= 5
         ll_table = table.ll_table
         table_copy = table.copy()
@@ -765,7 +908,7 @@ class TestTableMethods:
 
     @pytest.mark.parametrize("table_name", tskit.TABLE_NAMES)
     def test_table_keep_rows_errors(self, table_name, ts_fixture):
-        table = getattr(ts_fixture.tables, table_name)
+        table = getattr(ts_fixture.dump_tables(), table_name)
         n = len(table)
         ll_table = table.ll_table
         with pytest.raises(ValueError, match="must be of length"):
@@ -777,7 +920,7 @@ class TestTableMethods:
 
     @pytest.mark.parametrize("table_name", tskit.TABLE_NAMES)
     def test_table_keep_rows_all(self, table_name, ts_fixture):
-        table = getattr(ts_fixture.tables, table_name)
+        table = getattr(ts_fixture.dump_tables(), table_name)
         n = len(table)
         ll_table = table.ll_table
         a = ll_table.keep_rows(np.ones(n, dtype=bool))
@@ -788,7 +931,7 @@ class TestTableMethods:
 
     @pytest.mark.parametrize("table_name", tskit.TABLE_NAMES)
     def test_table_keep_rows_none(self, table_name, ts_fixture):
-        table = getattr(ts_fixture.tables, table_name)
+        table = getattr(ts_fixture.dump_tables(), table_name)
         n = len(table)
         ll_table = table.ll_table
         a = ll_table.keep_rows(np.zeros(n, dtype=bool))
@@ -821,7 +964,7 @@ class TestTableMethods:
         ],
     )
     def test_table_update(self, ts_fixture, table_name, column_name):
-        table = getattr(ts_fixture.tables, table_name)
+        table = getattr(ts_fixture.dump_tables(), table_name)
         copy = table.copy()
         ll_table = table.ll_table
 
@@ -993,7 +1136,7 @@ class TestTableMethodsErrors:
         tskit.TABLE_NAMES,
     )
     def test_table_extend_bad_args(self, ts_fixture, table_name):
-        table = getattr(ts_fixture.tables, table_name)
+        table = getattr(ts_fixture.dump_tables(), table_name)
         ll_table = table.ll_table
         ll_table_copy = table.copy().ll_table
 
@@ -1026,7 +1169,7 @@ class TestTableMethodsErrors:
 
     @pytest.mark.parametrize("table_name", tskit.TABLE_NAMES)
     def test_update_bad_row_index(self, ts_fixture, table_name):
-        table = getattr(ts_fixture.tables, table_name)
+        table = getattr(ts_fixture.dump_tables(), table_name)
         ll_table = table.ll_table
         row_data = ll_table.get_row(0)
         with pytest.raises(_tskit.LibraryError, match="out of bounds"):
@@ -1077,7 +1220,7 @@ class TestTableMethodsErrors:
             table.add_row(flags=-1)
 
     def test_index(self):
-        tc = msprime.simulate(10, random_seed=42).tables._ll_tables
+        tc = msprime.simulate(10, random_seed=42).dump_tables()._ll_tables
         assert tc.indexes["edge_insertion_order"].dtype == np.int32
         assert tc.indexes["edge_removal_order"].dtype == np.int32
         assert np.array_equal(
@@ -1109,13 +1252,27 @@ class TestTableMethodsErrors:
             tc.indexes["edge_removal_order"], np.arange(4242, 4242 + 18, dtype=np.int32)
         )
 
+    def test_tree_checkpoints(self):
+        tc = msprime.simulate(10, recombination_rate=2, random_seed=42).dump_tables()
+        tc = tc._ll_tables
+        assert not tc.has_tree_checkpoints()
+        tc.build_index(tree_checkpoint_interval=2)
+        assert tc.has_tree_checkpoints()
+        tc.drop_index()
+        assert not tc.has_tree_checkpoints()
+        for bad_type in ["2", None, 1.5]:
+            with pytest.raises(TypeError):
+                tc.build_index(tree_checkpoint_interval=bad_type)
+        with pytest.raises(ValueError, match="non-negative"):
+            tc.build_index(tree_checkpoint_interval=-1)
+
     def test_no_indexes(self):
-        tc = msprime.simulate(10, random_seed=42).tables._ll_tables
+        tc = msprime.simulate(10, random_seed=42).dump_tables()._ll_tables
         tc.drop_index()
         assert tc.indexes == {}
 
     def test_bad_indexes(self):
-        tc = msprime.simulate(10, random_seed=42).tables._ll_tables
+        tc = msprime.simulate(10, random_seed=42).dump_tables()._ll_tables
         for col in ("insertion", "removal"):
             d = tc.indexes
             d[f"edge_{col}_order"] = d[f"edge_{col}_order"][:-1]
@@ -1148,9 +1305,11 @@ class TestTableMethodsErrors:
             ):
                 tc.indexes = d
 
-        tc = msprime.simulate(
-            10, recombination_rate=10, random_seed=42
-        ).tables._ll_tables
+        tc = (
+            msprime.simulate(10, recombination_rate=10, random_seed=42)
+            .dump_tables()
+            ._ll_tables
+        )
         modify_indexes = tc.indexes
         shape = modify_indexes["edge_insertion_order"].shape
         modify_indexes["edge_insertion_order"] = np.zeros(shape, dtype=np.int32)
@@ -1230,6 +1389,43 @@ class TestTreeSequence(LowLevelTestCase, MetadataTestMixin):
                 with pytest.raises(TypeError):
                     ts_skip.load(f, skip_tables=bad_bool)
 
+    def test_mmap(self, tmp_path):
+        ts = self.get_example_tree_sequence()
+        with open(tmp_path / "tmp.trees", "wb") as f:
+            ts.dump(f)
+        tc = _tskit.TableCollection(1)
+        ts.dump_tables(tc)
+
+        for good_bool in [1, True]:
+            with open(tmp_path / "tmp.trees", "rb") as f:
+                ts_mapped = _tskit.TreeSequence()
+                ts_mapped.load(f, mmap=good_bool)
+            tc_mapped = _tskit.TableCollection()
+            ts_mapped.dump_tables(tc_mapped)
+            assert tc.equals(tc_mapped)
+
+        for bad_bool in ["x", 0.5, {}]:
+            with open(tmp_path / "tmp.trees", "rb") as f:
+                ts_mapped = _tskit.TreeSequence()
+                with pytest.raises(TypeError):
+                    ts_mapped.load(f, mmap=bad_bool)
+
+    def test_column_residency(self, tmp_path):
+        ts = self.get_example_tree_sequence()
+        assert ts.get_column_residency() == {}
+        with open(tmp_path / "tmp.trees", "wb") as f:
+            ts.dump(f)
+        ts_mapped = _tskit.TreeSequence()
+        with open(tmp_path / "tmp.trees", "rb") as f:
+            ts_mapped.load(f, mmap=True)
+        residency = ts_mapped.get_column_residency()
+        assert "nodes/time" in residency
+        resident, total = residency["nodes/time"]
+        assert total == 8 * ts.get_num_nodes()
+        assert 0 <= resident <= total
+        with pytest.raises(TypeError):
+            ts_mapped.get_column_residency(1)
+
     def test_skip_reference_sequence(self, tmp_path):
         tc = _tskit.TableCollection(1)
         self.get_example_tree_sequence().dump_tables(tc)
@@ -1417,6 +1613,91 @@ class TestTreeSequence(LowLevelTestCase, MetadataTestMixin):
             A = ts.genealogical_nearest_neighbours(focal, [focal[2:], focal[:2]])
             assert A.shape == (len(focal), 2)
 
+    def test_get_tree_metrics(self):
+        for ts in self.get_example_tree_sequences():
+            num_trees = ts.get_num_trees()
+            with pytest.raises(TypeError):
+                ts.get_tree_metrics()
+            with pytest.raises(TypeError):
+                ts.get_tree_metrics(0, "1")
+            for start, stop in [(0, num_trees + 1), (1, 0), (-1, 0)]:
+                with pytest.raises(_tskit.LibraryError, match="out of bounds"):
+                    ts.get_tree_metrics(start, stop)
+            metrics = ts.get_tree_metrics(0, num_trees)
+            assert len(metrics) == 6
+            for values in metrics:
+                assert values.shape == (num_trees,)
+            metrics = ts.get_tree_metrics(num_trees - 1, num_trees)
+            for values in metrics:
+                assert values.shape == (1,)
+            for values in ts.get_tree_metrics(0, 0):
+                assert values.shape == (0,)
+
+    def test_tmrca_matrix(self):
+        for ts in self.get_example_tree_sequences():
+            n = ts.get_num_samples()
+            samples = np.arange(n, dtype=np.int32)
+            windows = [0, ts.get_sequence_length()]
+            with pytest.raises(TypeError):
+                ts.tmrca_matrix()
+            with pytest.raises(TypeError):
+                ts.tmrca_matrix(samples)
+            with pytest.raises(ValueError):
+                ts.tmrca_matrix([[0, 1]], windows)
+            for bad_node in [-1, ts.get_num_nodes()]:
+                with pytest.raises(_tskit.LibraryError, match="out of bounds"):
+                    ts.tmrca_matrix([0, bad_node], windows)
+            with pytest.raises(_tskit.LibraryError):
+                ts.tmrca_matrix(samples, [0, ts.get_sequence_length() + 1])
+            A = ts.tmrca_matrix(samples, windows)
+            assert A.shape == (1, n, n)
+            A = ts.tmrca_matrix(samples, windows, span_normalise=True)
+            assert A.shape == (1, n, n)
+
+    def test_coalescence_time_table(self):
+        for ts in self.get_example_tree_sequences():
+            n = ts.get_num_samples()
+            sizes = np.array([n], dtype=np.uint32)
+            samples = ts.get_samples()
+            windows = [0, ts.get_sequence_length()]
+            with pytest.raises(TypeError):
+                ts.coalescence_time_table()
+            with pytest.raises(TypeError):
+                ts.coalescence_time_table(sizes, samples, windows)
+            with pytest.raises(ValueError, match="weight function"):
+                ts.coalescence_time_table(sizes, samples, windows, "nonsense")
+            with pytest.raises(ValueError, match="num_blocks"):
+                ts.coalescence_time_table(
+                    sizes, samples, windows, "coalescence_events", num_blocks=0
+                )
+            with pytest.raises(ValueError):
+                ts.coalescence_time_table(
+                    [n + 1], samples, windows, "coalescence_events"
+                )
+            with pytest.raises(_tskit.LibraryError, match="out of bounds"):
+                ts.coalescence_time_table(
+                    [1], [ts.get_num_nodes()], windows, "coalescence_events"
+                )
+            with pytest.raises(_tskit.LibraryError):
+                ts.coalescence_time_table(
+                    sizes,
+                    samples,
+                    [0, ts.get_sequence_length() + 1],
+                    "coalescence_events",
+                )
+            for weight_func in [
+                "coalescence_events",
+                "pair_coalescence_events",
+                "trio_first_coalescence_events",
+            ]:
+                time, window, block, weights = ts.coalescence_time_table(
+                    sizes, samples, windows, weight_func, num_blocks=2
+                )
+                assert time.shape == window.shape == block.shape
+                assert weights.shape == (time.shape[0], 1)
+                assert np.all(window == 0)
+                assert np.all(np.logical_and(block >= 0, block < 2))
+
     def test_mean_descendants(self):
         for ts in self.get_example_tree_sequences():
             with pytest.raises(TypeError):
@@ -1734,6 +2015,24 @@ class StatsInterfaceMixin:
             with pytest.raises(_tskit.LibraryError):
                 f(windows=bad_window, **params)
 
+    def test_partial_windows(self):
+        ts, f, params = self.get_example()
+        del params["windows"]
+        L = ts.get_sequence_length()
+        windows = np.linspace(0, L, num=6)
+        sigma = f(windows=windows, **params)
+        for start, stop in [(0, 2), (1, 3), (2, 5), (4, 5)]:
+            sub_windows = windows[start : stop + 1]
+            if start != 0 or stop != 5:
+                with pytest.raises(_tskit.LibraryError):
+                    f(windows=sub_windows, **params)
+            sub_sigma = f(windows=sub_windows, partial_windows=True, **params)
+            assert sub_sigma.shape[0] == stop - start
+            assert np.allclose(sub_sigma, sigma[start:stop], equal_nan=True)
+        for bad_windows in [[L, 0], [-1, L], [0, L + 0.1], [0, 0.1, 0.1, L]]:
+            with pytest.raises(_tskit.LibraryError):
+                f(windows=bad_windows, partial_windows=True, **params)
+
     def test_windows_output(self):
         ts, f, params = self.get_example()
         del params["windows"]
@@ -2410,6 +2709,63 @@ class TestGeneralStatsInterface(LowLevelTestCase, StatsInterfaceMixin):
                     W, lambda x: bad_array, 1, ts.get_breakpoints()  # noqa:B023
                 )
 
+    @pytest.mark.parametrize("mode", ["site", "branch", "node"])
+    def test_vectorised(self, mode):
+        ts = self.get_example_tree_sequence()
+        W = np.arange(2 * ts.get_num_samples()).reshape((-1, 2))
+        windows = ts.get_breakpoints()
+        sigma1 = ts.general_stat(W, lambda x: np.cumsum(x), 2, windows, mode=mode)
+        sigma2 = ts.general_stat(
+            W, lambda X: np.cumsum(X, axis=1), 2, windows, mode=mode, vectorised=True
+        )
+        assert np.allclose(sigma1, sigma2)
+
+    def test_compiled(self):
+        ts = self.get_example_tree_sequence()
+        W = np.ones((ts.get_num_samples(), 1))
+        windows = ts.get_breakpoints()
+
+        @ctypes.CFUNCTYPE(
+            ctypes.c_int,
+            ctypes.c_uint64,
+            ctypes.POINTER(ctypes.c_double),
+            ctypes.c_uint64,
+            ctypes.POINTER(ctypes.c_double),
+            ctypes.c_void_p,
+        )
+        def f(k, x, m, y, params):
+            y[0] = x[0]
+            return 0
+
+        address = ctypes.cast(f, ctypes.c_void_p).value
+        sigma1 = ts.general_stat(W, lambda x: x, 1, windows, mode="branch")
+        sigma2 = ts.general_stat(W, address, 1, windows, mode="branch", compiled=True)
+        assert np.allclose(sigma1, sigma2)
+        for bad_type in [f, "sdf", None, 1.0]:
+            with pytest.raises(TypeError):
+                ts.general_stat(W, bad_type, 1, windows, compiled=True)
+        with pytest.raises(ValueError):
+            ts.general_stat(W, 0, 1, windows, compiled=True)
+        with pytest.raises(OverflowError):
+            ts.general_stat(W, -1, 1, windows, compiled=True)
+
+    def test_vectorised_errors(self):
+        ts = self.get_example_tree_sequence()
+        W = np.zeros((ts.get_num_samples(), 1))
+        windows = ts.get_breakpoints()
+        for bad_array in [[1], 0, np.zeros((1, 1)), np.zeros((1000, 2)), "w4", None]:
+            with pytest.raises(ValueError):
+                ts.general_stat(
+                    W,
+                    lambda X: bad_array,  # noqa:B023
+                    1,
+                    windows,
+                    mode="branch",
+                    vectorised=True,
+                )
+        with pytest.raises(ZeroDivisionError):
+            ts.general_stat(W, lambda X: 1 / 0, 1, windows, vectorised=True)
+
 
 class TestVariant(LowLevelTestCase):
     """
@@ -2602,6 +2958,170 @@ class TestVariant(LowLevelTestCase):
         del variant3
         assert np.array_equal(genotypes_copy, genotypes3)
 
+    def test_encode_vcf(self):
+        ts = self.get_example_tree_sequence(random_seed=42)
+        variant = _tskit.Variant(ts)
+        ploidies = np.full(5, 2, dtype=np.int32)
+        records = variant.encode_vcf([0, 1], [10, 20], "chr1", ploidies)
+        assert isinstance(records, bytes)
+        lines = records.decode().splitlines()
+        assert len(lines) == 2
+        for site_id, pos, line in zip([0, 1], [10, 20], lines):
+            variant.decode(site_id)
+            g = variant.genotypes
+            fields = line.split("\t")
+            assert fields[:3] == ["chr1", str(pos), str(site_id)]
+            assert fields[3:5] == [variant.alleles[0], ",".join(variant.alleles[1:])]
+            assert fields[5:9] == [".", "PASS", ".", "GT"]
+            assert fields[9:] == [f"{g[j]}|{g[j + 1]}" for j in range(0, 10, 2)]
+
+    def test_encode_vcf_empty(self):
+        ts = self.get_example_tree_sequence(random_seed=42)
+        variant = _tskit.Variant(ts)
+        assert variant.encode_vcf([], [], "1", [10]) == b""
+
+    def test_encode_vcf_no_samples(self):
+        ts = self.get_example_tree_sequence(random_seed=42)
+        variant = _tskit.Variant(ts, samples=[])
+        variant.decode(0)
+        alleles = variant.alleles
+        records = variant.encode_vcf([0], [1], "1", np.array([], dtype=np.int32))
+        ref, alt = alleles[0], ",".join(alleles[1:])
+        assert records.decode() == f"1\t1\t0\t{ref}\t{alt}\t.\tPASS\t.\tGT\n"
+
+    def test_encode_vcf_sample_mask(self):
+        ts = self.get_example_tree_sequence(random_seed=42)
+        variant = _tskit.Variant(ts, samples=[0, 1, 2])
+        mask = np.array([True, False, True])
+        records = variant.encode_vcf([0], [1], "1", [1, 1, 1], sample_mask=mask)
+        fields = records.decode().rstrip("\n").split("\t")
+        assert fields[9] == "."
+        assert fields[10] == str(variant.genotypes[1])
+        assert fields[11] == "."
+
+    def test_encode_vcf_missing_data(self):
+        tables = _tskit.TableCollection(1)
+        tables.nodes.add_row(flags=1, time=0)
+        tables.nodes.add_row(flags=1, time=0)
+        tables.sites.add_row(0.1, "A")
+        tables.build_index()
+        ts = _tskit.TreeSequence(0)
+        ts.load_tables(tables)
+        variant = _tskit.Variant(ts)
+        assert (
+            variant.encode_vcf([0], [1], "1", [2])
+            == b"1\t1\t0\tA\t.\t.\tPASS\t.\tGT\t.|.\n"
+        )
+        variant = _tskit.Variant(ts, isolated_as_missing=False)
+        assert (
+            variant.encode_vcf([0], [1], "1", [1, 1])
+            == b"1\t1\t0\tA\t.\t.\tPASS\t.\tGT\t0\t0\n"
+        )
+
+    def test_encode_vcf_errors(self):
+        ts = self.get_example_tree_sequence(random_seed=42)
+        variant = _tskit.Variant(ts)
+        with pytest.raises(TypeError):
+            variant.encode_vcf()
+        with pytest.raises(TypeError):
+            variant.encode_vcf([0], [1], None, [10])
+        with pytest.raises(ValueError, match="same length"):
+            variant.encode_vcf([0], [1, 2], "1", [10])
+        with pytest.raises(ValueError, match="Sum of ploidies"):
+            variant.encode_vcf([0], [1], "1", [2, 2])
+        with pytest.raises(ValueError, match="Ploidies must be"):
+            variant.encode_vcf([0], [1], "1", [0, 10])
+        with pytest.raises(ValueError, match="Sample mask"):
+            variant.encode_vcf([0], [1], "1", [10], sample_mask=[True])
+        with pytest.raises(tskit.LibraryError, match="Site out of bounds"):
+            variant.encode_vcf([-1], [1], "1", [10])
+        with pytest.raises(tskit.LibraryError, match="Site out of bounds"):
+            variant.encode_vcf([ts.get_num_sites()], [1], "1", [10])
+
+    def test_decode_chunk(self):
+        ts = self.get_example_tree_sequence(random_seed=42)
+        variant = _tskit.Variant(ts)
+        num_sites = ts.get_num_sites()
+        G = np.zeros((num_sites, 10), dtype=np.int32)
+        alleles, num_trees = variant.decode_chunk(0, G)
+        assert len(alleles) == num_sites
+        assert 1 <= num_trees <= ts.get_num_trees()
+        for j in range(num_sites):
+            variant.decode(j)
+            assert np.array_equal(G[j], variant.genotypes)
+            assert alleles[j] == variant.alleles
+        alleles, _ = variant.decode_chunk(start_site=2, genotypes=G[:3])
+        assert np.array_equal(G[:3], G[2:5])
+        assert len(alleles) == 3
+        assert variant.decode_chunk(0, G[:0]) == ((), 0)
+
+    def test_decode_chunk_errors(self):
+        ts = self.get_example_tree_sequence(random_seed=42)
+        variant = _tskit.Variant(ts)
+        G = np.zeros((2, 10), dtype=np.int32)
+        with pytest.raises(TypeError):
+            variant.decode_chunk()
+        with pytest.raises(TypeError):
+            variant.decode_chunk(0, G.tolist())
+        for bad_array in [
+            G.astype(np.int64),
+            np.zeros(10, dtype=np.int32),
+            np.zeros((10, 2), dtype=np.int32).T,
+        ]:
+            with pytest.raises(TypeError, match="C-contiguous 2D array of int32"):
+                variant.decode_chunk(0, bad_array)
+        G.flags.writeable = False
+        with pytest.raises(TypeError, match="writeable"):
+            variant.decode_chunk(0, G)
+        with pytest.raises(ValueError, match="num_samples columns"):
+            variant.decode_chunk(0, np.zeros((2, 9), dtype=np.int32))
+        G = np.zeros((2, 10), dtype=np.int32)
+        with pytest.raises(tskit.LibraryError, match="Site out of bounds"):
+            variant.decode_chunk(-1, G)
+        with pytest.raises(tskit.LibraryError, match="Site out of bounds"):
+            variant.decode_chunk(ts.get_num_sites() - 1, G)
+
+    def test_decode_sites(self):
+        ts = self.get_example_tree_sequence(random_seed=42)
+        variant = _tskit.Variant(ts)
+        num_sites = ts.get_num_sites()
+        G = np.zeros((num_sites, 10), dtype=np.int32)
+        variant.decode_chunk(0, G)
+        expected_alleles, num_trees = variant.decode_chunk(0, np.copy(G))
+        site_ids = [3, 0, num_sites - 1, 3, 1, 0]
+        H = np.zeros((len(site_ids), 10), dtype=np.int32)
+        alleles, visited = variant.decode_sites(site_ids, H)
+        assert 1 <= visited <= num_trees
+        for j, site_id in enumerate(site_ids):
+            assert np.array_equal(H[j], G[site_id])
+            assert alleles[j] == expected_alleles[site_id]
+        alleles, visited = variant.decode_sites(
+            site_ids=np.arange(num_sites, dtype=np.int32)[::-1], genotypes=G
+        )
+        assert visited == num_trees
+        assert alleles == expected_alleles[::-1]
+        assert variant.decode_sites([], H[:0]) == ((), 0)
+
+    def test_decode_sites_errors(self):
+        ts = self.get_example_tree_sequence(random_seed=42)
+        variant = _tskit.Variant(ts)
+        G = np.zeros((2, 10), dtype=np.int32)
+        with pytest.raises(TypeError):
+            variant.decode_sites()
+        with pytest.raises(TypeError):
+            variant.decode_sites([0, 1], G.tolist())
+        with pytest.raises(ValueError):
+            variant.decode_sites([[0, 1]], G)
+        with pytest.raises(TypeError, match="C-contiguous 2D array of int32"):
+            variant.decode_sites([0, 1], G.astype(np.int64))
+        with pytest.raises(ValueError, match="num_samples columns"):
+            variant.decode_sites([0, 1], np.zeros((2, 9), dtype=np.int32))
+        with pytest.raises(ValueError, match="one row per site"):
+            variant.decode_sites([0, 1, 2], G)
+        for bad_site in [-1, ts.get_num_sites()]:
+            with pytest.raises(tskit.LibraryError, match="Site out of bounds"):
+                variant.decode_sites([0, bad_site], G)
+
 
 class TestLdCalculator(LowLevelTestCase):
     """
@@ -2648,6 +3168,34 @@ class TestLdCalculator(LowLevelTestCase):
             with pytest.raises(_tskit.LibraryError):
                 calc.get_r2_array(bad_start_pos)
 
+    def test_get_r2_matrix(self):
+        ts = self.get_example_tree_sequence()
+        calc = _tskit.LdCalculator(ts)
+        n = ts.get_num_sites()
+        assert n > 2
+
+        with pytest.raises(TypeError):
+            calc.get_r2_matrix(0, 1, 0)
+        with pytest.raises(TypeError):
+            calc.get_r2_matrix(0, 1, 0, "1")
+        with pytest.raises(ValueError, match="max_distance"):
+            calc.get_r2_matrix(0, 1, 0, 1, max_distance=-1)
+        for bad_range in [(-1, 0), (1, 0), (0, n + 1)]:
+            with pytest.raises(_tskit.LibraryError, match="out of bounds"):
+                calc.get_r2_matrix(*bad_range, 0, n)
+            with pytest.raises(_tskit.LibraryError, match="out of bounds"):
+                calc.get_r2_matrix(0, n, *bad_range)
+        A = calc.get_r2_matrix(0, n, 0, n)
+        assert A.shape == (n, n)
+        assert A.dtype == np.float64
+        assert np.all(np.diag(A) == 1)
+        assert np.array_equal(A[0, 1:], calc.get_r2_array(0))
+        assert np.array_equal(calc.get_r2_matrix(1, 2, 0, n), A[1:2])
+        assert calc.get_r2_matrix(1, 1, 0, n).shape == (0, n)
+        assert calc.get_r2_matrix(0, n, 2, 2).shape == (n, 0)
+        A = calc.get_r2_matrix(0, n, 0, n, max_distance=0)
+        assert np.all(np.diag(A) == 1)
+
     def test_r2_array_properties(self):
         ts = self.get_example_tree_sequence()
         calc = _tskit.LdCalculator(ts)
@@ -2968,6 +3516,25 @@ class TestTree(LowLevelTestCase):
             with pytest.raises(_tskit.LibraryError):
                 tree.seek(bad_pos)
 
+    def test_seek_index(self):
+        ts = self.get_example_tree_sequence()
+        tree = _tskit.Tree(ts)
+        breakpoints = ts.get_breakpoints()
+        for index in reversed(range(ts.get_num_trees())):
+            tree.seek_index(index)
+            assert tree.get_index() == index
+            assert tree.get_left() == breakpoints[index]
+
+    def test_seek_index_errors(self):
+        ts = self.get_example_tree_sequence()
+        tree = _tskit.Tree(ts)
+        for bad_type in ["", "x", {}]:
+            with pytest.raises(TypeError):
+                tree.seek_index(bad_type)
+        for bad_index in [-1, ts.get_num_trees()]:
+            with pytest.raises(_tskit.LibraryError, match="out of bounds"):
+                tree.seek_index(bad_index)
+
     def test_root_threshold(self):
         for ts in self.get_example_tree_sequences():
             tree = _tskit.Tree(ts)
@@ -3153,6 +3720,30 @@ class TestTree(LowLevelTestCase):
             for u, v in itertools.combinations(range(num_nodes), 2):
                 assert st.get_mrca(u, v) == _tskit.NULL
 
+    def test_mrcas_interface(self):
+        for ts in self.get_example_tree_sequences():
+            num_nodes = ts.get_num_nodes()
+            st = _tskit.Tree(ts)
+            with pytest.raises(TypeError):
+                st.get_mrcas()
+            with pytest.raises(TypeError):
+                st.get_mrcas([0])
+            with pytest.raises(ValueError, match="same length"):
+                st.get_mrcas([0, 1], [0])
+            with pytest.raises(ValueError):
+                st.get_mrcas([[0]], [[0]])
+            for v in [num_nodes + 1, 10**6, _tskit.NULL]:
+                with pytest.raises(_tskit.LibraryError, match="out of bounds"):
+                    st.get_mrcas([v], [0])
+                with pytest.raises(_tskit.LibraryError, match="out of bounds"):
+                    st.get_mrcas([0], [v])
+            empty = np.array([], dtype=np.int32)
+            assert st.get_mrcas(empty, empty).shape == (0,)
+            # All the mrcas for an uninitialised tree should be _tskit.NULL
+            u, v = np.triu_indices(num_nodes, k=1)
+            mrcas = st.get_mrcas(u.astype(np.int32), v.astype(np.int32))
+            assert np.all(mrcas == _tskit.NULL)
+
     def test_newick_precision(self):
         ts = self.get_example_tree_sequence()
         st = _tskit.Tree(ts)
@@ -3725,6 +4316,169 @@ class TestReferenceSequenceUpdates:
         assert refseq.is_null()
 
 
+class TestTreeSequenceTablesView(LowLevelTestCase):
+    """
+    Tests for the read-only TableCollection view of a TreeSequence's tables.
+    """
+
+    TABLE_NAMES = [
+        "individuals",
+        "nodes",
+        "edges",
+        "migrations",
+        "sites",
+        "mutations",
+        "populations",
+        "provenances",
+    ]
+
+    def test_equal_to_dump_tables(self):
+        for ts in self.get_example_tree_sequences():
+            tc = _tskit.TableCollection()
+            ts.dump_tables(tc)
+            view = ts.tables
+            assert view is not ts.tables
+            assert view.equals(tc)
+            assert tc.equals(view)
+            assert view.asdict().keys() == tc.asdict().keys()
+
+    @pytest.mark.parametrize(
+        ["table", "column", "array"],
+        [
+            ("nodes", "time", "nodes_time"),
+            ("nodes", "flags", "nodes_flags"),
+            ("edges", "left", "edges_left"),
+            ("edges", "parent", "edges_parent"),
+            ("sites", "position", "sites_position"),
+            ("mutations", "node", "mutations_node"),
+        ],
+    )
+    def test_columns_are_views(self, table, column, array):
+        ts = self.get_example_tree_sequence()
+        a = getattr(getattr(ts.tables, table), column)
+        assert not a.flags.writeable
+        assert not a.flags.owndata
+        assert isinstance(a.base, _tskit.TableCollection)
+        assert np.shares_memory(a, getattr(ts, array))
+        with pytest.raises(ValueError, match="assignment destination"):
+            a[:] = 0
+
+    def test_ragged_columns_are_views(self):
+        ts = self.get_example_tree_sequence()
+        sites = ts.tables.sites
+        for a in [sites.ancestral_state, sites.ancestral_state_offset]:
+            assert not a.flags.writeable
+            assert isinstance(a.base, _tskit.TableCollection)
+        assert np.shares_memory(sites.ancestral_state, ts.tables.sites.ancestral_state)
+        assert len(sites.ancestral_state_offset) == ts.get_num_sites() + 1
+        indexes = ts.tables.indexes
+        assert np.shares_memory(
+            indexes["edge_insertion_order"], ts.indexes_edge_insertion_order
+        )
+
+    def test_view_outlives_tree_sequence(self):
+        ts = self.get_example_tree_sequence()
+        tc = _tskit.TableCollection()
+        ts.dump_tables(tc)
+        view = ts.tables
+        nodes = view.nodes
+        time = nodes.time
+        del ts, view
+        assert np.array_equal(time, tc.nodes.time)
+        assert nodes.num_rows == tc.nodes.num_rows
+
+    @pytest.mark.parametrize(
+        ["method", "args"],
+        [
+            ("simplify", [[0, 1]]),
+            ("subset", [[0, 1]]),
+            ("sort", []),
+            ("sort_individuals", []),
+            ("canonicalise", []),
+            ("delete_older", [1]),
+            ("compute_mutation_parents", []),
+            ("compute_mutation_times", []),
+            ("deduplicate_sites", []),
+            ("build_index", []),
+            ("drop_index", []),
+            ("clear", []),
+        ],
+    )
+    def test_mutating_methods(self, method, args):
+        ts = self.get_example_tree_sequence()
+        view = ts.tables
+        with pytest.raises(AttributeError, match="read-only"):
+            getattr(view, method)(*args)
+        tc = _tskit.TableCollection()
+        ts.dump_tables(tc)
+        assert view.equals(tc)
+
+    def test_mutating_setters(self):
+        ts = self.get_example_tree_sequence()
+        view = ts.tables
+        with pytest.raises(AttributeError, match="read-only"):
+            view.sequence_length = 2
+        with pytest.raises(AttributeError, match="read-only"):
+            view.time_units = "x"
+        with pytest.raises(AttributeError, match="read-only"):
+            view.metadata = b"x"
+        with pytest.raises(AttributeError, match="read-only"):
+            view.metadata_schema = "{}"
+        with pytest.raises(AttributeError, match="read-only"):
+            view.indexes = {}
+        with pytest.raises(AttributeError, match="read-only"):
+            view.reference_sequence.data = "ACGT"
+
+    def test_other_collection_arguments(self):
+        ts = self.get_example_tree_sequence()
+        view = ts.tables
+        tc = _tskit.TableCollection()
+        ts.dump_tables(tc)
+        with pytest.raises(AttributeError, match="read-only"):
+            view.union(tc, np.full(tc.nodes.num_rows, -1, dtype=np.int32))
+        with pytest.raises(AttributeError, match="read-only"):
+            view.fromdict(tc.asdict())
+        with pytest.raises(AttributeError, match="read-only"):
+            ts.dump_tables(view)
+        with tempfile.TemporaryFile() as f:
+            tc.dump(f)
+            f.seek(0)
+            with pytest.raises(AttributeError, match="read-only"):
+                view.load(f)
+        # Read-only views are valid arguments where the tables are not modified
+        other = _tskit.TreeSequence()
+        other.load_tables(view)
+        assert other.get_num_trees() == ts.get_num_trees()
+        tc.union(view, np.arange(tc.nodes.num_rows, dtype=np.int32))
+
+    @pytest.mark.parametrize("name", TABLE_NAMES)
+    def test_table_mutating_methods(self, name):
+        ts = self.get_example_tree_sequence()
+        table = getattr(ts.tables, name)
+        num_rows = table.num_rows
+        for method, args in [
+            ("add_row", []),
+            ("clear", []),
+            ("truncate", [0]),
+            ("keep_rows", [np.zeros(num_rows, dtype=bool)]),
+            ("extend", [type(table)(), []]),
+            ("set_columns", [{}]),
+            ("append_columns", [{}]),
+        ]:
+            with pytest.raises(AttributeError, match="read-only"):
+                getattr(table, method)(*args)
+        if num_rows > 0:
+            with pytest.raises(AttributeError, match="read-only"):
+                table.update_row(0)
+        if name != "provenances":
+            with pytest.raises(AttributeError, match="read-only"):
+                table.metadata_schema = "{}"
+        if name == "edges":
+            with pytest.raises(AttributeError, match="read-only"):
+                table.squash()
+        assert table.num_rows == num_rows
+
+
 class TestReferenceSequenceTableCollection:
     def test_references(self):
         tables = _tskit.TableCollection()
@@ -3871,6 +4625,87 @@ class TestModuleFunctions:
             assert f.read() == f"{maj}.{min_}.{patch}"
 
 
+class TestExtractJsonValues:
+    """
+    Tests for the JSON metadata column scanner.
+    """
+
+    def extract(self, rows, keys):
+        data, offset = tskit.pack_bytes(rows)
+        return _tskit.extract_json_values(data, offset, keys)
+
+    def test_values(self):
+        rows = [
+            b'{"a": 1}',
+            b'{"a":-2.5e1, "b": {"x": true}}',
+            b'{"a": false}',
+            b'{"b": [1, {"a": 2}], "a": NaN}',
+            b'{"a": 1, "a": 2}',
+            b'{"a": -Infinity}',
+        ]
+        values, kinds = self.extract(rows, (b"a",))
+        np.testing.assert_array_equal(values, [1, -25, 0, np.nan, 2, -np.inf])
+        assert list(kinds) == [
+            _tskit.JSON_VALUE_INTEGER,
+            _tskit.JSON_VALUE_FLOAT,
+            _tskit.JSON_VALUE_BOOLEAN,
+            _tskit.JSON_VALUE_FLOAT,
+            _tskit.JSON_VALUE_INTEGER,
+            _tskit.JSON_VALUE_FLOAT,
+        ]
+        values, kinds = self.extract(rows, (b"b", b"x"))
+        assert values[1] == 1
+        assert (
+            list(kinds)
+            == [_tskit.JSON_VALUE_DECODE]
+            + [_tskit.JSON_VALUE_BOOLEAN]
+            + [_tskit.JSON_VALUE_DECODE] * 4
+        )
+
+    @pytest.mark.parametrize(
+        "row",
+        [
+            b"",
+            b"{}",
+            b"[1]",
+            b"null",
+            b'{"b": 1}',
+            b'{"a": "1"}',
+            b'{"a": null}',
+            b'{"a": [1]}',
+            b'{"a": {"x": 1}}',
+            b'{"a": 12345678901234567890}',
+            b'{"a\\u0062": 1, "a": 1}',
+            b'{"a": 01}',
+            b'{"a": 1 2}',
+            b'{"a": 1',
+            b'{"a": 1.}',
+            b'{"a": -}',
+        ],
+    )
+    def test_decode(self, row):
+        _, kinds = self.extract([row], (b"a",))
+        assert list(kinds) == [_tskit.JSON_VALUE_DECODE]
+
+    def test_empty_column(self):
+        values, kinds = _tskit.extract_json_values([], [0], (b"a",))
+        assert values.shape == (0,)
+        assert kinds.shape == (0,)
+
+    def test_bad_args(self):
+        with pytest.raises(TypeError):
+            _tskit.extract_json_values()
+        with pytest.raises(TypeError):
+            _tskit.extract_json_values([], [0], [b"a"])
+        with pytest.raises(TypeError):
+            _tskit.extract_json_values([], [0], ("a",))
+        with pytest.raises(ValueError, match="key"):
+            _tskit.extract_json_values([], [0], ())
+        for offset in [[], [1], [0, 2], [0, 2, 1]]:
+            with pytest.raises(ValueError, match="offset"):
+                _tskit.extract_json_values([1], offset, (b"a",))
+
+
 def test_uninitialised():
     # These methods work from an instance that has a NULL ref so don't check
     skip_list = [
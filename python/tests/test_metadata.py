@@ -1413,6 +1413,157 @@ class TestStructCodecRoundTrip:
         assert ms.decode_row(index_order_encoded) == row_data
 
 
+class TestStructCodecNumpyDtype:
+    def check_rows(self, schema, rows):
+        ms = metadata.MetadataSchema(schema)
+        dtype = ms.numpy_dtype()
+        encoded = b"".join(ms.validate_and_encode_row(row) for row in rows)
+        values = np.frombuffer(encoded, dtype=dtype)
+        assert len(values) == len(rows)
+        for value, row in zip(values, rows):
+            for key in dtype.names:
+                assert value[key] == row[key]
+        return dtype
+
+    def test_numeric_types(self):
+        schema = {"codec": "struct", "type": "object", "properties": {}}
+        row = {}
+        for j, fmt in enumerate("bBhHiIlLqQfd"):
+            schema["properties"][fmt] = {
+                "type": "number",
+                "binaryFormat": fmt,
+                "index": j,
+            }
+            row[fmt] = j
+        schema["properties"]["?"] = {"type": "boolean", "binaryFormat": "?"}
+        row["?"] = True
+        dtype = self.check_rows(schema, [row, {**row, "?": False}])
+        assert dtype.itemsize == struct.calcsize("<bBhHiIlLqQfd?")
+        assert dtype["q"] == np.int64
+        assert dtype["L"] == np.uint32
+        assert dtype["f"] == np.float32
+
+    def test_strings_and_padding(self):
+        schema = {
+            "codec": "struct",
+            "type": "object",
+            "properties": {
+                "a": {"type": "string", "binaryFormat": "5s", "index": 0},
+                "b": {"type": "null", "binaryFormat": "3x", "index": 1},
+                "c": {"type": "null", "index": 2},
+                "d": {"type": "integer", "binaryFormat": "i", "index": 3},
+            },
+        }
+        rows = [
+            {"a": "", "b": None, "c": None, "d": 1},
+            {"a": "abcde", "b": None, "c": None, "d": -1},
+        ]
+        ms = metadata.MetadataSchema(schema)
+        dtype = ms.numpy_dtype()
+        assert dtype.names == ("a", "d")
+        assert dtype.itemsize == 12
+        encoded = b"".join(ms.validate_and_encode_row(row) for row in rows)
+        values = np.frombuffer(encoded, dtype=dtype)
+        assert list(values["a"]) == [b"", b"abcde"]
+        assert list(values["d"]) == [1, -1]
+
+    def test_nested_object(self):
+        schema = {
+            "codec": "struct",
+            "type": "object",
+            "properties": {
+                "obj": {
+                    "type": "object",
+                    "index": 0,
+                    "properties": {
+                        "x": {"type": "number", "binaryFormat": "d"},
+                        "y": {"type": "integer", "binaryFormat": "B"},
+                    },
+                },
+                "z": {"type": "integer", "binaryFormat": "h", "index": 1},
+            },
+        }
+        ms = metadata.MetadataSchema(schema)
+        dtype = ms.numpy_dtype()
+        assert dtype.itemsize == 11
+        row = {"obj": {"x": 1.25, "y": 7}, "z": -3}
+        value = np.frombuffer(ms.validate_and_encode_row(row), dtype=dtype)[0]
+        assert value["obj"]["x"] == 1.25
+        assert value["obj"]["y"] == 7
+        assert value["z"] == -3
+
+    def test_slim_node(self):
+        schema = {
+            "codec": "struct",
+            "type": "object",
+            "properties": {
+                "genomeID": {"type": "integer", "binaryFormat": "q", "index": 0},
+                "isNull": {"type": "boolean", "binaryFormat": "?", "index": 1},
+                "genomeType": {"type": "integer", "binaryFormat": "B", "index": 2},
+            },
+        }
+        values = np.frombuffer(
+            b"E,\x00\x00\x00\x00\x00\x00\x00\x01"
+            b"\xdd.\x00\x00\x00\x00\x00\x00\x01\x00",
+            dtype=metadata.MetadataSchema(schema).numpy_dtype(),
+        )
+        assert list(values["genomeID"]) == [11333, 11997]
+        assert list(values["isNull"]) == [False, True]
+        assert list(values["genomeType"]) == [1, 0]
+
+    @pytest.mark.parametrize(
+        "schema",
+        [
+            {
+                "codec": "struct",
+                "type": "object",
+                "properties": {
+                    "a": {
+                        "type": "array",
+                        "items": {"type": "number", "binaryFormat": "i"},
+                    }
+                },
+            },
+            {
+                "codec": "struct",
+                "type": "object",
+                "properties": {"a": {"type": "string", "binaryFormat": "10p"}},
+            },
+            {
+                "codec": "struct",
+                "type": ["object", "null"],
+                "properties": {"a": {"type": "number", "binaryFormat": "i"}},
+            },
+        ],
+    )
+    def test_variable_size(self, schema):
+        ms = metadata.MetadataSchema(schema)
+        with pytest.raises(ValueError, match="fixed size"):
+            ms.numpy_dtype()
+
+    def test_nullable_object(self):
+        schema = {
+            "codec": "struct",
+            "type": ["object", "null"],
+            "properties": {"a": {"type": "number", "binaryFormat": "i"}},
+        }
+        ms = metadata.MetadataSchema(schema)
+        assert ms.validate_and_encode_row(None) == b""
+        with pytest.raises(ValueError, match="Nullable"):
+            ms.numpy_dtype()
+        table = tskit.PopulationTable()
+        table.metadata_schema = ms
+        table.add_row(metadata=None)
+        table.add_row(metadata={"a": 1})
+        with pytest.raises(ValueError, match="Nullable"):
+            table.structured_metadata()
+
+    @pytest.mark.parametrize("schema", [None, {"codec": "json"}])
+    def test_not_struct(self, schema):
+        with pytest.raises(ValueError, match="struct codec"):
+            metadata.MetadataSchema(schema).numpy_dtype()
+
+
 class TestStructCodecErrors:
     def encode(self, schema, row_data):
         ms = metadata.MetadataSchema(schema)
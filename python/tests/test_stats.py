@@ -599,6 +599,69 @@ class TestLdCalculator:
         self.verify_max_distance(ts)
         self.verify_max_mutations(ts)
 
+    def simulated_ts(self):
+        ts = msprime.simulate(
+            20, mutation_rate=10, recombination_rate=10, random_seed=5
+        )
+        assert ts.get_num_trees() > 10
+        return tsutil.subsample_sites(ts, self.num_test_sites)
+
+    @pytest.mark.parametrize("block_size", [1, 7, 50, 256])
+    @pytest.mark.parametrize("num_threads", [0, 3])
+    def test_r2_matrix_blocks(self, block_size, num_threads):
+        ts = self.simulated_ts()
+        ldc = tskit.LdCalculator(ts)
+        B = get_r2_matrix(ts)
+        ldc._block_size = block_size
+        A = ldc.r2_matrix(num_threads=num_threads)
+        assert np.allclose(A, B)
+        assert np.array_equal(A, A.T)
+
+    @pytest.mark.parametrize("max_distance", [0, 0.01, 0.1, 1])
+    @pytest.mark.parametrize("block_size", [3, 256])
+    def test_r2_matrix_max_distance(self, max_distance, block_size):
+        ts = self.simulated_ts()
+        ldc = tskit.LdCalculator(ts)
+        B = ldc.r2_matrix()
+        ldc._block_size = block_size
+        A = ldc.r2_matrix(max_distance=max_distance)
+        position = ts.tables.sites.position
+        far = np.abs(position[:, np.newaxis] - position) > max_distance
+        assert np.all(np.isnan(A[far]))
+        assert np.array_equal(A[~far], B[~far])
+
+    @pytest.mark.parametrize("threshold", [0, 0.1, 0.5, 1, 2])
+    @pytest.mark.parametrize("max_distance", [None, 0.05])
+    @pytest.mark.parametrize("num_threads", [0, 2])
+    def test_r2_pairs(self, threshold, max_distance, num_threads):
+        ts = self.simulated_ts()
+        ldc = tskit.LdCalculator(ts)
+        A = ldc.r2_matrix(max_distance=max_distance)
+        ldc._block_size = 6
+        a, b, r2 = ldc.r2_pairs(
+            threshold=threshold, max_distance=max_distance, num_threads=num_threads
+        )
+        a_expected, b_expected = np.nonzero(np.triu(A >= threshold, 1))
+        assert np.array_equal(a, a_expected)
+        assert np.array_equal(b, b_expected)
+        assert np.array_equal(r2, A[a, b])
+
+    def test_r2_matrix_no_sites(self):
+        ts = msprime.simulate(5, random_seed=1)
+        ldc = tskit.LdCalculator(ts)
+        assert ldc.r2_matrix().shape == (0, 0)
+        a, b, r2 = ldc.r2_pairs()
+        assert a.shape == b.shape == r2.shape == (0,)
+
+    def test_r2_matrix_multi_mutations(self):
+        ts = msprime.simulate(self.num_test_sites, length=self.num_test_sites)
+        ts = tsutil.insert_branch_mutations(ts)
+        ldc = tskit.LdCalculator(ts)
+        with pytest.raises(_tskit.LibraryError, match="infinite sites"):
+            ldc.r2_matrix(num_threads=2)
+        with pytest.raises(_tskit.LibraryError, match="infinite sites"):
+            ldc.r2_pairs()
+
 
 def set_partitions(collection):
     """
@@ -24,8 +24,11 @@
 Test cases for the low-level tables used to transfer information
 between simulations and the tree sequence.
 """
+import concurrent.futures
 import dataclasses
+import inspect
 import io
+import itertools
 import json
 import math
 import pathlib
@@ -37,6 +40,7 @@ import struct
 import time
 import unittest
 import warnings
+from functools import reduce
 
 import kastore
 import msprime
@@ -1311,6 +1315,241 @@ class MetadataTestsMixin:
         md_vec = table.metadata_vector("u", default_value=[0, 0])
         assert md_vec.shape == (table.num_rows, 2)
 
+    def json_metadata_table(self, metadata_list, schema=None):
+        table = self.table_class()
+        if schema is None:
+            schema = {"codec": "json"}
+        table.metadata_schema = metadata.MetadataSchema(schema)
+        for md in metadata_list:
+            table.add_row(**{**self.input_data_for_add_row(), "metadata": md})
+        return table
+
+    def decoded_metadata_vector(self, table, key, dtype, default_value):
+        keys = key if isinstance(key, list) else [key]
+        values = []
+        for row in table:
+            md = row.metadata
+            for k in keys:
+                if isinstance(md, dict) and k in md:
+                    md = md[k]
+                else:
+                    md = default_value
+                    break
+            values.append(md)
+        return np.array(values, dtype=dtype)
+
+    @pytest.mark.parametrize(
+        "metadata_list",
+        [
+            [{"a": 1}, {"a": 2}, {"a": -3}],
+            [{"a": 1}, {"a": 2.5}, {"a": True}],
+            [{"a": False}, {"a": True}],
+            [{"a": 1, "b": {"x": 2}}, {"b": {"x": 1.5}}, None],
+            [{"a": 2**60}, {"a": 1}],
+            [{"a": "1"}, {"a": 2}],
+            [{"a": [1, 2]}, {"b": 2}],
+            [{"b": {"x": True}, "a": {"x": 3}}, {"a": {"x": 4, "y": "z"}}],
+        ],
+    )
+    def test_json_metadata_vector(self, metadata_list):
+        table = self.json_metadata_table(metadata_list)
+        for key, dtype, default_value in itertools.product(
+            ["a", ["a"], ["b", "x"], ["a", "x"]],
+            [None, "int", "float", "bool", "object"],
+            [0, -1.5],
+        ):
+            try:
+                expected = self.decoded_metadata_vector(
+                    table, key, dtype, default_value
+                )
+            except (TypeError, ValueError):
+                continue
+            values = table.metadata_vector(
+                key, dtype=dtype, default_value=default_value
+            )
+            assert values.dtype == expected.dtype
+            np.testing.assert_array_equal(values, expected)
+
+    def test_json_metadata_vector_schema_defaults(self):
+        schema = {"codec": "json", "properties": {"a": {"default": 5}}}
+        table = self.json_metadata_table([{"a": 1}, {}, {"a": 2.5}], schema)
+        np.testing.assert_array_equal(table.metadata_vector("a"), [1, 5, 2.5])
+
+    @pytest.mark.parametrize(
+        "value",
+        [
+            2**53 - 1,
+            2**53,
+            2**53 + 1,
+            -(2**53) - 1,
+            2**63 - 1,
+            -(2**63 - 1),
+            10**15,
+            -(10**15) + 1,
+        ],
+    )
+    def test_json_metadata_vector_large_integers(self, value):
+        table = self.json_metadata_table([{"a": value}, {"a": 1}])
+        expected = self.decoded_metadata_vector(table, "a", None, None)
+        values = table.metadata_vector("a")
+        assert values.dtype == expected.dtype
+        np.testing.assert_array_equal(values, expected)
+        assert values[0] == value
+
+    @pytest.mark.parametrize("value", [1e308, -1e308, 2.0**63, -(2.0**64)])
+    @pytest.mark.parametrize("dtype", ["int", np.int64])
+    def test_json_metadata_vector_int_overflow(self, value, dtype):
+        table = self.json_metadata_table([{"a": 1}, {"a": value}])
+        with pytest.raises(OverflowError):
+            self.decoded_metadata_vector(table, "a", dtype, None)
+        with pytest.raises(OverflowError):
+            table.metadata_vector("a", dtype=dtype)
+
+    @pytest.mark.parametrize(
+        "row",
+        [
+            b'{"a": 1, "b": }',
+            b'{"a": 1} trailing',
+            b'{"a": 1, "b": [1,,2]}',
+            b'{"a": 1, "b": tru}',
+            b'{"a": 1, "b": "\\q"}',
+            b'{"a": 1, "b": "\\u12"}',
+            b'{"a": 1, "b": "\x01"}',
+            b'{"a": 1, "b": "\xed\xa0\x80"}',
+            b'{"a": 01}',
+            b'{"a": 1,}',
+        ],
+    )
+    def test_json_metadata_vector_malformed_row(self, row):
+        table = self.json_metadata_table([{"a": 1}, {"a": 2}])
+        table.packset_metadata([b'{"a": 1}', row])
+        with pytest.raises(ValueError):
+            table[1].metadata
+        with pytest.raises(ValueError):
+            table.metadata_vector("a")
+        with pytest.raises(ValueError):
+            table.metadata_vector("a", default_value=0)
+
+    def test_json_metadata_vector_threads(self):
+        tables = [
+            self.json_metadata_table(
+                [{"a": j + k, "b": {"x": j * k}} for j in range(50)]
+            )
+            for k in range(4)
+        ]
+        keys = ["a", ["b", "x"]] * 4
+        with concurrent.futures.ThreadPoolExecutor(4) as executor:
+            results = list(
+                executor.map(lambda tk: tk[0].metadata_vector(tk[1]), zip(tables, keys))
+            )
+        for table, key, values in zip(tables, keys, results):
+            expected = self.decoded_metadata_vector(table, key, None, None)
+            np.testing.assert_array_equal(values, expected)
+
+    def struct_metadata_schema(self):
+        return metadata.MetadataSchema(
+            {
+                "codec": "struct",
+                "type": "object",
+                "properties": {
+                    "id": {"type": "integer", "binaryFormat": "q"},
+                    "flag": {"type": "boolean", "binaryFormat": "?"},
+                    "padding": {"type": "null", "binaryFormat": "3x"},
+                    "name": {"type": "string", "binaryFormat": "4s"},
+                    "pos": {
+                        "type": "object",
+                        "properties": {
+                            "x": {"type": "number", "binaryFormat": "f"},
+                            "y": {"type": "number", "binaryFormat": "d"},
+                        },
+                    },
+                },
+            }
+        )
+
+    def struct_metadata_table(self, num_rows):
+        table = self.table_class()
+        table.metadata_schema = self.struct_metadata_schema()
+        metadatas = [
+            {
+                "id": -j,
+                "flag": j % 2 == 0,
+                "padding": None,
+                "name": "n" * (j % 5),
+                "pos": {"x": j / 2, "y": j / 3},
+            }
+            for j in range(num_rows)
+        ]
+        for md in metadatas:
+            table.add_row(**{**self.input_data_for_add_row(), "metadata": md})
+        return table, metadatas
+
+    @pytest.mark.parametrize("num_rows", [0, 1, 10])
+    def test_structured_metadata(self, num_rows):
+        table, metadatas = self.struct_metadata_table(num_rows)
+        values = table.structured_metadata()
+        assert values.dtype == self.struct_metadata_schema().numpy_dtype()
+        assert len(values) == num_rows
+        for value, md in zip(values, metadatas):
+            assert value["id"] == md["id"]
+            assert value["flag"] == md["flag"]
+            assert value["name"] == md["name"].encode()
+            assert value["pos"]["x"] == md["pos"]["x"]
+            assert value["pos"]["y"] == md["pos"]["y"]
+        # The returned array is independent of the table
+        before = table.copy()
+        values["id"] = 100
+        table.assert_equals(before)
+
+    @pytest.mark.parametrize("num_rows", [0, 1, 10])
+    def test_packset_structured_metadata(self, num_rows):
+        table, _ = self.struct_metadata_table(num_rows)
+        values = table.structured_metadata()
+        copy = table.copy()
+        copy.packset_metadata([b"x" * 12] * num_rows)
+        copy.packset_structured_metadata(values)
+        table.assert_equals(copy)
+        # Padding is written as nulls, as in the struct encoding.
+        copy.packset_structured_metadata(values.tolist())
+        table.assert_equals(copy)
+
+    @pytest.mark.parametrize("key", ["id", "flag", ["id"], ["pos", "x"], ["pos", "y"]])
+    @pytest.mark.parametrize("dtype", [None, "int", "float", "object"])
+    def test_structured_metadata_vector(self, key, dtype):
+        table, metadatas = self.struct_metadata_table(10)
+        values = table.metadata_vector(key, dtype=dtype)
+        keys = key if isinstance(key, list) else [key]
+        expected = np.array(
+            [reduce(dict.get, keys, md) for md in metadatas], dtype=dtype
+        )
+        assert values.dtype == expected.dtype
+        np.testing.assert_array_equal(values, expected)
+
+    def test_structured_metadata_vector_fallback(self):
+        table, metadatas = self.struct_metadata_table(5)
+        values = table.metadata_vector("name")
+        np.testing.assert_array_equal(values, [md["name"] for md in metadatas])
+        values = table.metadata_vector("pos")
+        assert list(values) == [md["pos"] for md in metadatas]
+        with pytest.raises(KeyError):
+            table.metadata_vector("xxx")
+
+    def test_structured_metadata_errors(self):
+        table = self.table_class()
+        with pytest.raises(ValueError, match="struct codec"):
+            table.structured_metadata()
+        table.metadata_schema = self.metadata_schema
+        with pytest.raises(ValueError, match="struct codec"):
+            table.structured_metadata()
+        with pytest.raises(ValueError, match="struct codec"):
+            table.packset_structured_metadata([])
+        table, _ = self.struct_metadata_table(3)
+        with pytest.raises(ValueError, match="number of rows"):
+            table.packset_structured_metadata(table.structured_metadata()[:2])
+        table.packset_metadata([b"", b"", b""])
+        with pytest.raises(ValueError, match="bytes of metadata"):
+            table.structured_metadata()
+
 
 class AssertEqualsMixin:
     def test_equal(self, table_5row, test_rows):
@@ -2192,6 +2431,60 @@ class TestTableCollectionIndexes:
         assert index.asdict() == {}
 
 
+class TestTreeCheckpoints:
+    def tables(self):
+        ts = msprime.simulate(10, recombination_rate=2, random_seed=42)
+        assert ts.num_trees > 5
+        return ts.dump_tables()
+
+    def test_build_index(self):
+        tables = self.tables()
+        assert tables.has_index()
+        assert not tables.has_tree_checkpoints()
+        tables.build_index(tree_checkpoint_interval=2)
+        assert tables.has_index()
+        assert tables.has_tree_checkpoints()
+        tables.build_index()
+        assert tables.has_index()
+        assert not tables.has_tree_checkpoints()
+
+    def test_zero_interval(self):
+        tables = self.tables()
+        tables.build_index(tree_checkpoint_interval=0)
+        assert tables.has_index()
+        assert not tables.has_tree_checkpoints()
+
+    def test_negative_interval(self):
+        tables = self.tables()
+        with pytest.raises(ValueError, match="non-negative"):
+            tables.build_index(tree_checkpoint_interval=-1)
+
+    def test_drop_index(self):
+        tables = self.tables()
+        tables.build_index(tree_checkpoint_interval=2)
+        tables.drop_index()
+        assert not tables.has_tree_checkpoints()
+
+    def test_sort_drops_checkpoints(self):
+        tables = self.tables()
+        tables.build_index(tree_checkpoint_interval=2)
+        tables.sort()
+        assert not tables.has_tree_checkpoints()
+
+    def test_tree_sequence_round_trip(self):
+        tables = self.tables()
+        tables.build_index(tree_checkpoint_interval=3)
+        ts = tables.tree_sequence()
+        assert ts.tables.has_tree_checkpoints()
+        assert ts.dump_tables().has_tree_checkpoints()
+
+    def test_asdict_drops_checkpoints(self):
+        tables = self.tables()
+        tables.build_index(tree_checkpoint_interval=3)
+        assert tables.copy().has_index()
+        assert not tables.copy().has_tree_checkpoints()
+
+
 class TestSortTables:
     """
     Tests for the TableCollection.sort() and TableCollection.canonicalise() methods.
@@ -2210,6 +2503,7 @@ class TestSortTables:
             [bytes(str(i), "utf-8") for i in range(tables1.individuals.num_rows)]
         )
         tables2 = tables1.copy()
+        tables3 = tables1.copy()
         tables1.sort()
         tsutil.py_sort(tables2)
 
@@ -2218,6 +2512,10 @@ class TestSortTables:
         # tables2.tree_sequence()
 
         tables1.assert_equals(tables2)
+        for num_threads in [2, 3]:
+            tables4 = tables3.copy()
+            tables4.sort(num_threads=num_threads)
+            tables1.assert_equals(tables4)
 
     def verify_canonical_equality(self, tables, seed):
         # Migrations not supported
@@ -2371,41 +2669,41 @@ class TestSortTables:
     def test_single_tree_no_mutations(self):
         ts = msprime.simulate(10, random_seed=self.random_seed)
         self.verify_sort_offset(ts)
-        self.verify_sort(ts.tables, 432)
+        self.verify_sort(ts.dump_tables(), 432)
 
     def test_single_tree_no_mutations_metadata(self):
         ts = msprime.simulate(10, random_seed=self.random_seed)
         ts = tsutil.add_random_metadata(ts, self.random_seed)
-        self.verify_sort(ts.tables, 12)
+        self.verify_sort(ts.dump_tables(), 12)
 
     def test_many_trees_no_mutations(self):
         ts = msprime.simulate(10, recombination_rate=2, random_seed=self.random_seed)
         assert ts.num_trees > 2
         self.verify_sort_offset(ts)
-        self.verify_sort(ts.tables, 31)
+        self.verify_sort(ts.dump_tables(), 31)
 
     def test_single_tree_mutations(self):
         ts = msprime.simulate(10, mutation_rate=2, random_seed=self.random_seed)
         assert ts.num_sites > 2
         self.verify_sort_offset(ts)
-        self.verify_sort(ts.tables, 83)
+        self.verify_sort(ts.dump_tables(), 83)
 
     def test_single_tree_mutations_metadata(self):
         ts = msprime.simulate(10, mutation_rate=2, random_seed=self.random_seed)
         assert ts.num_sites > 2
         ts = tsutil.add_random_metadata(ts, self.random_seed)
-        self.verify_sort(ts.tables, 384)
+        self.verify_sort(ts.dump_tables(), 384)
 
     def test_single_tree_multichar_mutations(self):
         ts = msprime.simulate(10, random_seed=self.random_seed)
         ts = tsutil.insert_multichar_mutations(ts, self.random_seed)
-        self.verify_sort(ts.tables, 185)
+        self.verify_sort(ts.dump_tables(), 185)
 
     def test_single_tree_multichar_mutations_metadata(self):
         ts = msprime.simulate(10, random_seed=self.random_seed)
         ts = tsutil.insert_multichar_mutations(ts, self.random_seed)
         ts = tsutil.add_random_metadata(ts, self.random_seed)
-        self.verify_sort(ts.tables, 2175)
+        self.verify_sort(ts.dump_tables(), 2175)
 
     def test_many_trees_mutations(self):
         ts = msprime.simulate(
@@ -2414,20 +2712,20 @@ class TestSortTables:
         assert ts.num_trees > 2
         assert ts.num_sites > 2
         self.verify_sort_offset(ts)
-        self.verify_sort(ts.tables, 173)
+        self.verify_sort(ts.dump_tables(), 173)
 
     def test_many_trees_multichar_mutations(self):
         ts = msprime.simulate(10, recombination_rate=2, random_seed=self.random_seed)
         assert ts.num_trees > 2
         ts = tsutil.insert_multichar_mutations(ts, self.random_seed)
-        self.verify_sort(ts.tables, 16)
+        self.verify_sort(ts.dump_tables(), 16)
 
     def test_many_trees_multichar_mutations_metadata(self):
         ts = msprime.simulate(10, recombination_rate=2, random_seed=self.random_seed)
         assert ts.num_trees > 2
         ts = tsutil.insert_multichar_mutations(ts, self.random_seed)
         ts = tsutil.add_random_metadata(ts, self.random_seed)
-        self.verify_sort(ts.tables, 91)
+        self.verify_sort(ts.dump_tables(), 91)
 
     def get_nonbinary_example(self, mutation_rate):
         ts = msprime.simulate(
@@ -2452,20 +2750,20 @@ class TestSortTables:
     def test_nonbinary_trees(self):
         ts = self.get_nonbinary_example(mutation_rate=0)
         self.verify_sort_offset(ts)
-        self.verify_sort(ts.tables, 9182)
+        self.verify_sort(ts.dump_tables(), 9182)
 
     def test_nonbinary_trees_mutations(self):
         ts = self.get_nonbinary_example(mutation_rate=2)
         assert ts.num_trees > 2
         assert ts.num_sites > 2
         self.verify_sort_offset(ts)
-        self.verify_sort(ts.tables, 44)
+        self.verify_sort(ts.dump_tables(), 44)
 
     def test_unknown_times(self):
         ts = self.get_wf_example(seed=486)
         ts = tsutil.insert_branch_mutations(ts, mutations_per_branch=2)
         ts = tsutil.remove_mutation_times(ts)
-        self.verify_sort(ts.tables, 9182)
+        self.verify_sort(ts.dump_tables(), 9182)
 
     def test_no_mutation_parents(self):
         # we should maintain relative order of mutations when all else fails:
@@ -2500,7 +2798,7 @@ class TestSortTables:
     def test_discrete_times(self):
         ts = self.get_wf_example(seed=623)
         ts = tsutil.insert_discrete_time_mutations(ts)
-        self.verify_sort(ts.tables, 9183)
+        self.verify_sort(ts.dump_tables(), 9183)
 
     def test_incompatible_edges(self):
         ts1 = msprime.simulate(10, random_seed=self.random_seed)
@@ -2541,6 +2839,63 @@ class TestSortTables:
         with pytest.raises(_tskit.LibraryError):
             tables1.canonicalise()
 
+    @pytest.mark.parametrize("num_threads", [-1, 0, 1, 2, 5, 1000])
+    def test_num_threads(self, num_threads):
+        ts = msprime.simulate(
+            20, recombination_rate=2, mutation_rate=2, random_seed=self.random_seed
+        )
+        ts = tsutil.add_random_metadata(ts, self.random_seed)
+        tables = ts.dump_tables()
+        tsutil.shuffle_tables(tables, 5, shuffle_populations=False)
+        expected = tables.copy()
+        expected.sort()
+        tables.sort(num_threads=num_threads)
+        tables.assert_equals(expected)
+
+    @pytest.mark.parametrize("edge_start", [0, 1, 10])
+    def test_num_threads_edge_start(self, edge_start):
+        ts = msprime.simulate(10, recombination_rate=2, random_seed=self.random_seed)
+        ts = tsutil.add_random_metadata(ts, self.random_seed)
+        tables = ts.dump_tables()
+        tsutil.shuffle_tables(tables, 7, shuffle_populations=False)
+        expected = tables.copy()
+        expected.sort(edge_start)
+        tables.sort(edge_start, num_threads=4)
+        tables.assert_equals(expected)
+
+    @pytest.mark.parametrize("fraction", [0, 0.1, 0.5, 0.9, 1])
+    @pytest.mark.parametrize("num_threads", [0, 3])
+    def test_sorted_prefix(self, fraction, num_threads):
+        ts = msprime.simulate(
+            20, recombination_rate=2, mutation_rate=2, random_seed=self.random_seed
+        )
+        ts = tsutil.jukes_cantor(ts, 5, 2, seed=self.random_seed)
+        ts = tsutil.add_random_metadata(ts, self.random_seed)
+        tables = ts.dump_tables()
+        # Re-append the rows after the prefix in reverse order, so that the
+        # tables look like sorted tables with some unsorted rows appended.
+        for table in [tables.edges, tables.mutations]:
+            num_sorted = int(fraction * table.num_rows)
+            order = np.arange(table.num_rows)
+            order[num_sorted:] = order[num_sorted:][::-1]
+            new_id = np.argsort(order)
+            rows = list(table)
+            table.clear()
+            for j in order:
+                row = rows[j]
+                if table is tables.mutations and row.parent != tskit.NULL:
+                    row = row.replace(parent=new_id[row.parent])
+                table.append(row)
+        expected = tables.copy()
+        tsutil.py_sort(expected)
+        tables.sort(num_threads=num_threads)
+        tables.assert_equals(expected)
+
+    def test_num_threads_bad_type(self):
+        tables = tskit.TableCollection(1)
+        with pytest.raises(TypeError):
+            tables.sort(num_threads="2")
+
     def test_empty_tables(self):
         tables = tskit.TableCollection(1)
         tables.sort()
@@ -2779,7 +3134,7 @@ class TestSortMutations:
         assert list(mutations.site) == [0, 0, 0, 1, 1, 1, 2, 2, 2]
         assert list(mutations.node) == [0, 0, 0, 0, 0, 0, 0, 0, 0]
         # Nans are not equal so swap in -1
-        times = mutations.time
+        times = mutations.time.copy()
         times[np.isnan(times)] = -1
         assert list(times) == [3.0, 2.0, 1.0, 0.5, 0.5, 0.5, 6.0, 4.0, -5.0]
         assert list(mutations.derived_state) == list(
@@ -3798,7 +4153,7 @@ class TestTableCollection:
     def test_indexes(self, simple_degree1_ts_fixture):
         tc = tskit.TableCollection(sequence_length=1)
         assert tc.indexes == tskit.TableCollectionIndexes()
-        tc = simple_degree1_ts_fixture.tables
+        tc = simple_degree1_ts_fixture.dump_tables()
         assert np.array_equal(
             tc.indexes.edge_insertion_order, np.arange(18, dtype=np.int32)
         )
@@ -4499,7 +4854,7 @@ class TestSubsetTables:
         # adding metadata and locations
         ts = tsutil.add_random_metadata(ts, seed)
         ts = tsutil.insert_random_ploidy_individuals(ts, max_ploidy=1)
-        return ts.tables
+        return ts.dump_tables()
 
     def get_wf_example(self, N=5, ngens=2, seed=1249):
         tables = wf.wf_sim(N, N, num_pops=2, seed=seed)
@@ -4508,7 +4863,7 @@ class TestSubsetTables:
         ts = tsutil.jukes_cantor(ts, 1, 10, seed=seed)
         ts = tsutil.add_random_metadata(ts, seed)
         ts = tsutil.insert_random_ploidy_individuals(ts, max_ploidy=2)
-        return ts.tables
+        return ts.dump_tables()
 
     def get_examples(self, seed):
         yield self.get_msprime_example(seed=seed)
@@ -4791,8 +5146,12 @@ class TestUnionTables(unittest.TestCase):
         shared_nodes = [n.id for n in ts.nodes() if n.time >= T]
         pop1 = list(ts.samples(population=0))
         pop2 = list(ts.samples(population=1))
-        tables1 = ts.simplify(shared_nodes + pop1, record_provenance=False).tables
-        tables2 = ts.simplify(shared_nodes + pop2, record_provenance=False).tables
+        tables1 = ts.simplify(
+            shared_nodes + pop1, record_provenance=False
+        ).dump_tables()
+        tables2 = ts.simplify(
+            shared_nodes + pop2, record_provenance=False
+        ).dump_tables()
         node_mapping = [
             i if i < len(shared_nodes) else tskit.NULL
             for i in range(tables2.nodes.num_rows)
@@ -4965,7 +5324,7 @@ class TestUnionTables(unittest.TestCase):
                 assert s2.position == su.position
                 assert s2.ancestral_state == su.ancestral_state
         # check mutation parents
-        tables_union = tsu.tables
+        tables_union = tsu.dump_tables()
         tables_union.compute_mutation_parents()
         assert tables_union.mutations == tsu.tables.mutations
 
@@ -5032,13 +5391,13 @@ class TestUnionTables(unittest.TestCase):
                     with self.subTest(N=N, T=T):
                         ts = self.get_msprime_example(N, T=T, seed=888)
                         if mut_times:
-                            tables = ts.tables
+                            tables = ts.dump_tables()
                             tables.compute_mutation_times()
                             ts = tables.tree_sequence()
                         self.verify_union(*self.split_example(ts, T))
                         ts = self.get_wf_example(N=N, T=T, seed=827)
                         if mut_times:
-                            tables = ts.tables
+                            tables = ts.dump_tables()
                             tables.compute_mutation_times()
                             ts = tables.tree_sequence()
                         self.verify_union(*self.split_example(ts, T))
@@ -5047,7 +5406,7 @@ class TestUnionTables(unittest.TestCase):
 class TestTableSetitemMetadata:
     @pytest.mark.parametrize("table_name", tskit.TABLE_NAMES)
     def test_setitem_metadata(self, ts_fixture, table_name):
-        table = getattr(ts_fixture.tables, table_name)
+        table = getattr(ts_fixture.dump_tables(), table_name)
         if hasattr(table, "metadata_schema"):
             assert table.metadata_schema == tskit.MetadataSchema({"codec": "json"})
             assert table[0].metadata != table[1].metadata
@@ -5412,3 +5771,176 @@ class TestKeepRowsExamples:
         # ╚══╧═════╧════════╧═══════╧════════╝
         parents = [list(ind.parents) for ind in individuals]
         assert parents == [[], [-1, -1], [-1], [2], [3], [4], [5], [6, 6]]
+
+
+class TestTableBuilder:
+    @pytest.fixture(
+        params=[name for name in tskit.TABLE_NAMES if name != "provenances"]
+    )
+    def table(self, request, ts_fixture):
+        table = getattr(ts_fixture.tables, request.param).copy()
+        assert table.num_rows > 0
+        return table
+
+    def row_kwargs(self, table, row):
+        return {
+            column: getattr(row, column)
+            for column in table.column_names
+            if "_offset" not in column
+        }
+
+    @pytest.mark.parametrize("buffer_size", [None, 1, 2, 3, 1000])
+    def test_rebuild_table(self, table, buffer_size):
+        rebuilt = table.copy()
+        rebuilt.clear()
+        with rebuilt.builder(buffer_size=buffer_size) as builder:
+            for j, row in enumerate(table):
+                assert builder.add_row(**self.row_kwargs(table, row)) == j
+                assert builder.num_rows == j + 1
+        assert builder.num_buffered_rows == 0
+        rebuilt.assert_equals(table)
+
+    def test_append_to_table(self, table):
+        expected = table.copy()
+        rows = list(table)
+        builder = table.builder(buffer_size=2)
+        for j, row in enumerate(rows):
+            assert builder.add_row(**self.row_kwargs(table, row)) == len(rows) + j
+            expected.append(row)
+        assert table.num_rows + builder.num_buffered_rows == len(expected)
+        builder.flush()
+        table.assert_equals(expected)
+
+    def test_add_row_signature(self, table):
+        signature = inspect.signature(table.add_row)
+        assert inspect.signature(table.builder().add_row) == signature
+
+    def test_default_values(self, table):
+        expected = table.copy()
+        parameters = inspect.signature(table.add_row).parameters
+        kwargs = {
+            k: v
+            for k, v in self.row_kwargs(table, table[0]).items()
+            if parameters[k].default is inspect.Parameter.empty
+        }
+        expected.add_row(**kwargs)
+        builder = table.builder()
+        builder.add_row(**kwargs)
+        builder.flush()
+        table.assert_equals(expected)
+
+    def test_bad_metadata(self, table):
+        builder = table.builder()
+        row = table[0]
+        builder.add_row(**self.row_kwargs(table, row))
+        kwargs = self.row_kwargs(table, row)
+        kwargs["metadata"] = object()
+        with pytest.raises(Exception):
+            builder.add_row(**kwargs)
+        assert builder.num_buffered_rows == 1
+
+    def test_flush_empty(self, table):
+        before = table.copy()
+        builder = table.builder()
+        builder.flush()
+        with builder:
+            pass
+        table.assert_equals(before)
+
+    def test_no_flush_on_exception(self, table):
+        before = table.copy()
+        with pytest.raises(ZeroDivisionError):
+            with table.builder() as builder:
+                builder.add_row(**self.row_kwargs(table, table[0]))
+                1 / 0
+        table.assert_equals(before)
+
+    def test_table_modified(self, table):
+        builder = table.builder()
+        row = table[0]
+        builder.add_row(**self.row_kwargs(table, row))
+        table.append(row)
+        with pytest.raises(ValueError, match="modified"):
+            builder.flush()
+
+    def test_table_modified_between_flushes(self, table):
+        expected = table.copy()
+        row = table[0]
+        builder = table.builder()
+        builder.add_row(**self.row_kwargs(table, row))
+        builder.flush()
+        table.append(row)
+        assert builder.add_row(**self.row_kwargs(table, row)) == table.num_rows
+        builder.flush()
+        for _ in range(3):
+            expected.append(row)
+        table.assert_equals(expected)
+
+    @pytest.mark.parametrize("buffer_size", [0, -1])
+    def test_bad_buffer_size(self, table, buffer_size):
+        with pytest.raises(ValueError, match="buffer_size"):
+            table.builder(buffer_size=buffer_size)
+
+
+class TestTableBuilderExamples:
+    def test_edge_bad_type(self):
+        tables = tskit.TableCollection(1)
+        builder = tables.edges.builder()
+        builder.add_row(0, 1, 2, 3)
+        with pytest.raises(TypeError):
+            builder.add_row(0, 1, 2.5, 3)
+        builder.flush()
+        assert tables.edges.num_rows == 1
+        assert tables.edges[0] == tskit.EdgeTableRow(0, 1, 2, 3, b"")
+
+    def test_mutation_defaults(self):
+        tables = tskit.TableCollection(1)
+        builder = tables.mutations.builder()
+        builder.add_row(0, 0, "T")
+        builder.add_row(0, 1, b"AC", parent=0, time=1.5, metadata=b"x")
+        builder.flush()
+        expected = tskit.MutationTable()
+        expected.add_row(0, 0, "T")
+        expected.add_row(0, 1, "AC", parent=0, time=1.5, metadata=b"x")
+        tables.mutations.assert_equals(expected)
+
+    def test_site_states(self):
+        tables = tskit.TableCollection(1)
+        builder = tables.sites.builder()
+        builder.add_row(0.5, "A")
+        builder.add_row(0.75, b"")
+        builder.flush()
+        assert tables.sites.ancestral_state.tobytes() == b"A"
+        np.testing.assert_array_equal(tables.sites.ancestral_state_offset, [0, 1, 1])
+
+    def test_individual_ragged(self):
+        tables = tskit.TableCollection(1)
+        builder = tables.individuals.builder(buffer_size=1)
+        builder.add_row(location=np.array([1.5, 2]), parents=[-1])
+        builder.add_row()
+        builder.add_row(flags=1, parents=np.array([0, 1], dtype=np.int32))
+        builder.flush()
+        assert [list(ind.location) for ind in tables.individuals] == [[1.5, 2], [], []]
+        assert [list(ind.parents) for ind in tables.individuals] == [[-1], [], [0, 1]]
+        assert list(tables.individuals.flags) == [0, 0, 1]
+
+    def test_individual_bad_ragged_value(self):
+        tables = tskit.TableCollection(1)
+        builder = tables.individuals.builder()
+        builder.add_row(location=[1], parents=[0])
+        with pytest.raises(TypeError):
+            builder.add_row(location=[2, 3], parents=["x"])
+        assert builder.num_buffered_rows == 1
+        builder.add_row(parents=[0])
+        builder.flush()
+        assert [list(ind.location) for ind in tables.individuals] == [[1], []]
+        assert [list(ind.parents) for ind in tables.individuals] == [[0], [0]]
+
+    def test_metadata_schema(self):
+        tables = tskit.TableCollection(1)
+        tables.nodes.metadata_schema = tskit.MetadataSchema.permissive_json()
+        with tables.nodes.builder() as builder:
+            builder.add_row(time=1)
+            builder.add_row(time=2, metadata={"x": 1})
+        assert tables.nodes[0].metadata == {}
+        assert tables.nodes[1].metadata == {"x": 1}
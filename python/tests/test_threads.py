@@ -138,6 +138,21 @@ class TestLdCalculatorReplicates:
         for j in range(m):
             assert results[j][0] == m - j - 1
 
+    def test_r2_matrix_single_instance(self):
+        # The blocks of the matrix are computed with separate low-level
+        # calculators, so a single instance can be shared by threads.
+        ts = self.get_tree_sequence()
+        ld_calc = tskit.LdCalculator(ts)
+        A = ld_calc.r2_matrix()
+        ld_calc._block_size = 4
+
+        def worker(thread_index, results):
+            results[thread_index] = ld_calc.r2_matrix(num_threads=2)
+
+        results = run_threads(worker, 10)
+        for B in results:
+            assert np.array_equal(A, B)
+
 
 # Temporarily skipping these on Windows and OSX See
 # https://github.com/tskit-dev/tskit/issues/344
@@ -156,7 +171,7 @@ class TestTables:
         ts = msprime.simulate(
             100, mutation_rate=10, recombination_rate=10, random_seed=8
         )
-        return ts.tables
+        return ts.dump_tables()
 
     def run_multiple_writers(self, writer, num_writers=32):
         barrier = threading.Barrier(num_writers)
@@ -6471,7 +6471,7 @@ class TestMutationParent:
 
     def verify_parents(self, ts):
         parent = tsutil.compute_mutation_parent(ts)
-        tables = ts.tables
+        tables = ts.dump_tables()
         assert np.array_equal(parent, tables.mutations.parent)
         tables.mutations.parent = np.zeros_like(tables.mutations.parent) - 1
         assert np.all(tables.mutations.parent == tskit.NULL)
@@ -6664,7 +6664,7 @@ class TestMutationTime:
     seed = 42
 
     def verify_times(self, ts):
-        tables = ts.tables
+        tables = ts.dump_tables()
         # Clear out the existing mutations as they come from msprime
         tables.mutations.time = np.full(
             tables.mutations.time.shape, -1, dtype=np.float64
@@ -6727,7 +6727,7 @@ class TestMutationTime:
         )
         # ts.dump_text(mutations=sys.stdout)
         # self.assertFalse(True)
-        tables = ts.tables
+        tables = ts.dump_tables()
         python_time = tsutil.compute_mutation_times(ts)
         assert np.allclose(python_time, tables.mutations.time, rtol=1e-15, atol=1e-15)
         tables.mutations.time = np.full(
@@ -7105,7 +7105,7 @@ class TestSquashEdges:
     """
 
     def do_squash(self, ts, compare_lib=True):
-        squashed = ts.tables.edges
+        squashed = ts.dump_tables().edges
         squashed.squash()
         if compare_lib:
             squashed_list = squash_edges(ts)
@@ -7934,7 +7934,7 @@ class TestKeepIntervals(TopologyTestCase):
             random_seed=1,
         )
         with pytest.raises(tskit.LibraryError):
-            ts.tables.keep_intervals([[0, 1]])
+            ts.dump_tables().keep_intervals([[0, 1]])
 
     def test_bad_intervals(self):
         tables = tskit.TableCollection(10)
@@ -25,6 +25,7 @@ Test cases for generalized statistic computation.
 """
 import collections
 import contextlib
+import ctypes
 import functools
 import io
 import itertools
@@ -568,6 +569,9 @@ class StatsTestCase:
     def sum_f(self, ts, k=1):
         return lambda x: np.array([sum(x) * (sum(x) < 2 * ts.num_samples)] * k)
 
+    def vectorise(self, f):
+        return lambda X: np.array([f(x) for x in X])
+
 
 class TopologyExamplesMixin:
     """
@@ -3914,6 +3918,188 @@ class TestGeneralStatInterface(StatsTestCase):
         sigma2 = ts.general_stat(W, lambda x: np.array([0.0]), 1)
         self.assertArrayEqual(sigma1, sigma2)
 
+    @pytest.mark.parametrize("mode", ["site", "branch", "node"])
+    def test_vectorised_batches(self, mode):
+        ts = self.get_tree_sequence()
+        W = np.ones((ts.num_samples, 2))
+        batch_sizes = []
+
+        def f(X):
+            assert X.shape[1] == 2
+            batch_sizes.append(X.shape[0])
+            return X * (X < ts.num_samples)
+
+        ts.general_stat(
+            W, f, 2, mode=mode, polarised=True, vectorised=True, strict=False
+        )
+        # The summaries are computed with at most one call per tree, plus
+        # one for the initial state
+        assert 0 < len(batch_sizes) <= ts.num_trees + 1
+        assert sum(batch_sizes) > len(batch_sizes)
+
+    def test_vectorised_strict(self):
+        ts = self.get_tree_sequence()
+        W = np.ones((ts.num_samples, 1))
+        with pytest.raises(ValueError):
+            ts.general_stat(W, lambda X: X + 1, 1, vectorised=True)
+        sigma1 = ts.sample_count_stat(
+            [ts.samples()], lambda X: X * (ts.num_samples - X), 1, vectorised=True
+        )
+        sigma2 = ts.sample_count_stat(
+            [ts.samples()], lambda x: x * (ts.num_samples - x), 1
+        )
+        self.assertArrayAlmostEqual(sigma1, sigma2)
+
+
+class TestCompiledSummaryFunctions(StatsTestCase):
+    """
+    Tests for general_stat with compiled summary functions.
+    """
+
+    def get_tree_sequence(self):
+        return msprime.simulate(
+            10, recombination_rate=2, mutation_rate=2, random_seed=1
+        )
+
+    def sum_f(self, k, x, m, y, params):
+        assert params is None
+        s = sum(x[j] for j in range(k))
+        for j in range(m):
+            y[j] = s * (j + 1)
+        return 0
+
+    def verify(self, ts, W, f, M, windows=None, **kwargs):
+        def py_f(x):
+            return np.sum(x) * np.arange(1, M + 1)
+
+        for mode in ["site", "branch", "node"]:
+            for polarised in [True, False]:
+                sigma1 = ts.general_stat(
+                    W,
+                    py_f,
+                    M,
+                    windows=windows,
+                    mode=mode,
+                    polarised=polarised,
+                    strict=False,
+                )
+                sigma2 = ts.general_stat(
+                    W,
+                    f,
+                    M,
+                    windows=windows,
+                    mode=mode,
+                    polarised=polarised,
+                    strict=False,
+                    **kwargs,
+                )
+                self.assertArrayAlmostEqual(sigma1, sigma2)
+
+    def test_ctypes(self):
+        ts = self.get_tree_sequence()
+        W = np.arange(3 * ts.num_samples).reshape((-1, 3))
+        f = tskit.util.GENERAL_STAT_FUNC(self.sum_f)
+        self.verify(ts, W, f, 2)
+        address = ctypes.cast(f, ctypes.c_void_p).value
+        self.verify(ts, W, tskit.util.GENERAL_STAT_FUNC(address), 2)
+        self.verify(ts, W, f, 2, num_threads=3, windows=[0, 0.25, 0.5, 1])
+
+    def test_ctypes_vectorised(self):
+        ts = self.get_tree_sequence()
+        W = np.arange(2 * ts.num_samples).reshape((-1, 2))
+
+        @tskit.util.GENERAL_STAT_BATCH_FUNC
+        def f(k, n, X, m, Y, params):
+            for j in range(n):
+                s = sum(X[j * k + i] for i in range(k))
+                for i in range(m):
+                    Y[j * m + i] = s * (i + 1)
+            return 0
+
+        self.verify(ts, W, f, 3, vectorised=True)
+
+    def test_numba_cfunc(self):
+        numba = pytest.importorskip("numba")
+        types = numba.types
+        signature = types.int32(
+            types.uint64,
+            types.CPointer(types.float64),
+            types.uint64,
+            types.CPointer(types.float64),
+            types.voidptr,
+        )
+
+        @numba.cfunc(signature, nopython=True)
+        def f(k, x, m, y, params):
+            s = 0.0
+            for j in range(k):
+                s += x[j]
+            for j in range(m):
+                y[j] = s * (j + 1)
+            return 0
+
+        ts = self.get_tree_sequence()
+        W = np.arange(ts.num_samples).reshape((-1, 1))
+        self.verify(ts, W, f, 2)
+
+    def test_strict(self):
+        ts = self.get_tree_sequence()
+        W = np.ones((ts.num_samples, 1))
+        f = tskit.util.GENERAL_STAT_FUNC(self.sum_f)
+        with pytest.raises(ValueError, match="does not return zero"):
+            ts.general_stat(W, f, 1)
+
+        @tskit.util.GENERAL_STAT_FUNC
+        def g(k, x, m, y, params):
+            y[0] = x[0] * (ts.num_samples - x[0])
+            return 0
+
+        sigma1 = ts.sample_count_stat([ts.samples()], g, 1, mode="branch")
+        sigma2 = ts.diversity(mode="branch") * ts.num_samples * (ts.num_samples - 1)
+        self.assertArrayAlmostEqual(sigma1, sigma2)
+
+    def test_not_compiled(self):
+        ts = self.get_tree_sequence()
+        W = np.ones((ts.num_samples, 1))
+        f = tskit.util.GENERAL_STAT_FUNC(self.sum_f)
+        address = ctypes.cast(f, ctypes.c_void_p).value
+
+        class WithAddress:
+            def __init__(self, address):
+                self.address = address
+
+        for bad_f in [address, WithAddress(address)]:
+            for strict in [True, False]:
+                with pytest.raises(TypeError):
+                    ts.general_stat(W, bad_f, 1, strict=strict)
+
+    def test_bad_signature(self):
+        ts = self.get_tree_sequence()
+        W = np.ones((ts.num_samples, 1))
+        f = tskit.util.GENERAL_STAT_FUNC(self.sum_f)
+        with pytest.raises(TypeError, match="GENERAL_STAT_BATCH_FUNC"):
+            ts.general_stat(W, f, 1, vectorised=True)
+        prototype = ctypes.CFUNCTYPE(
+            ctypes.c_int, ctypes.c_uint64, ctypes.POINTER(ctypes.c_double)
+        )
+        g = prototype(lambda k, x: 0)
+        with pytest.raises(TypeError, match="GENERAL_STAT_FUNC"):
+            ts.general_stat(W, g, 1)
+
+    def test_error(self):
+        ts = self.get_tree_sequence()
+        W = np.ones((ts.num_samples, 1))
+
+        @tskit.util.GENERAL_STAT_FUNC
+        def f(k, x, m, y, params):
+            y[0] = 0
+            return -1
+
+        with pytest.raises(ValueError, match="returned error -1"):
+            ts.general_stat(W, f, 1)
+        with pytest.raises(exceptions.LibraryError):
+            ts.general_stat(W, f, 1, strict=False)
+
 
 class TestGeneralBranchStats(StatsTestCase):
     """
@@ -3926,10 +4112,21 @@ class TestGeneralBranchStats(StatsTestCase):
         sigma1 = naive_branch_general_stat(ts, W, f, windows, polarised=polarised)
         sigma2 = ts.general_stat(W, f, M, windows, polarised=polarised, mode="branch")
         sigma3 = branch_general_stat(ts, W, f, windows, polarised=polarised)
+        sigma4 = ts.general_stat(
+            W,
+            self.vectorise(f),
+            M,
+            windows,
+            polarised=polarised,
+            mode="branch",
+            vectorised=True,
+        )
         assert sigma1.shape == sigma2.shape
         assert sigma1.shape == sigma3.shape
+        assert sigma1.shape == sigma4.shape
         self.assertArrayAlmostEqual(sigma1, sigma2)
         self.assertArrayAlmostEqual(sigma1, sigma3)
+        self.assertArrayAlmostEqual(sigma1, sigma4)
         return sigma1
 
     def test_simple_identity_f_w_zeros(self):
@@ -4022,10 +4219,21 @@ class TestGeneralSiteStats(StatsTestCase):
         sigma1 = naive_site_general_stat(ts, W, f, windows, polarised=polarised)
         sigma2 = ts.general_stat(W, f, M, windows, polarised=polarised, mode="site")
         sigma3 = site_general_stat(ts, W, f, windows, polarised=polarised)
+        sigma4 = ts.general_stat(
+            W,
+            self.vectorise(f),
+            M,
+            windows,
+            polarised=polarised,
+            mode="site",
+            vectorised=True,
+        )
         assert sigma1.shape == sigma2.shape
         assert sigma1.shape == sigma3.shape
+        assert sigma1.shape == sigma4.shape
         self.assertArrayAlmostEqual(sigma1, sigma2)
         self.assertArrayAlmostEqual(sigma1, sigma3)
+        self.assertArrayAlmostEqual(sigma1, sigma4)
         return sigma1
 
     def test_identity_f_W_0_multiple_alleles(self):
@@ -4082,10 +4290,21 @@ class TestGeneralNodeStats(StatsTestCase):
         sigma1 = naive_node_general_stat(ts, W, f, windows, polarised=polarised)
         sigma2 = ts.general_stat(W, f, M, windows, polarised=polarised, mode="node")
         sigma3 = node_general_stat(ts, W, f, windows, polarised=polarised)
+        sigma4 = ts.general_stat(
+            W,
+            self.vectorise(f),
+            M,
+            windows,
+            polarised=polarised,
+            mode="node",
+            vectorised=True,
+        )
         assert sigma1.shape == sigma2.shape
         assert sigma1.shape == sigma3.shape
+        assert sigma1.shape == sigma4.shape
         self.assertArrayAlmostEqual(sigma1, sigma2)
         self.assertArrayAlmostEqual(sigma1, sigma3)
+        self.assertArrayAlmostEqual(sigma1, sigma4)
         return sigma1
 
     def test_simple_sum_f_w_zeros(self):
@@ -6254,3 +6473,147 @@ class TestGeneralStatCallbackErrors:
                 output_dim=1,
                 strict=False,
             )
+
+    def test_vectorised_one_d(self, ts_fixture):
+        def f_1d(X):
+            return X[:, 0]
+
+        msg = (
+            "Array returned by vectorised general_stat callback is 1 dimensional; "
+            "must be 2D"
+        )
+        with pytest.raises(ValueError, match=msg):
+            ts_fixture.sample_count_stat(
+                sample_sets=[ts_fixture.samples()],
+                f=f_1d,
+                output_dim=1,
+                strict=False,
+                vectorised=True,
+            )
+
+    def test_vectorised_wrong_shape(self, ts_fixture):
+        def f_too_long(X):
+            return np.zeros((X.shape[0], 2))
+
+        msg = "Array returned by vectorised general_stat callback has shape"
+        with pytest.raises(ValueError, match=msg):
+            ts_fixture.sample_count_stat(
+                sample_sets=[ts_fixture.samples()],
+                f=f_too_long,
+                output_dim=1,
+                strict=False,
+                vectorised=True,
+            )
+
+    def test_vectorised_exception(self, ts_fixture):
+        def f_error(X):
+            raise ZeroDivisionError()
+
+        with pytest.raises(ZeroDivisionError):
+            ts_fixture.sample_count_stat(
+                sample_sets=[ts_fixture.samples()],
+                f=f_error,
+                output_dim=1,
+                strict=False,
+                vectorised=True,
+            )
+
+
+class TestThreadedWindowedStats:
+    """
+    Tests that computing windowed statistics in multiple threads gives the
+    same results as computing them in a single thread.
+    """
+
+    def ts(self):
+        ts = msprime.simulate(
+            12, recombination_rate=2, mutation_rate=2, random_seed=42, length=10
+        )
+        assert ts.num_trees > 5
+        assert ts.num_sites > 5
+        return ts
+
+    def windows(self, ts):
+        breakpoints = list(ts.breakpoints())
+        positions = list(ts.tables.sites.position)
+        windows = sorted(set([0, 1.5, 4.0, breakpoints[3], positions[2], 7.25, 10]))
+        return windows
+
+    def verify(self, stat, windows, **kwargs):
+        A = stat(windows=windows, **kwargs)
+        for num_threads in [0, 1, 2, 3, 100]:
+            B = stat(windows=windows, num_threads=num_threads, **kwargs)
+            assert A.shape == B.shape
+            nt.assert_allclose(A, B)
+
+    @pytest.mark.parametrize("mode", ["site", "branch", "node"])
+    def test_one_way(self, mode):
+        ts = self.ts()
+        windows = self.windows(ts)
+        sample_sets = [ts.samples()[:6], ts.samples()[6:]]
+        for stat in [ts.diversity, ts.segregating_sites, ts.Y1]:
+            self.verify(stat, windows, sample_sets=sample_sets, mode=mode)
+        self.verify(ts.diversity, "trees", sample_sets=sample_sets, mode=mode)
+        self.verify(ts.diversity, windows, mode=mode, span_normalise=False)
+        if mode != "node":
+            self.verify(ts.allele_frequency_spectrum, windows, mode=mode)
+
+    @pytest.mark.parametrize("mode", ["site", "branch", "node"])
+    def test_k_way(self, mode):
+        ts = self.ts()
+        windows = self.windows(ts)
+        sample_sets = np.array_split(ts.samples(), 4)
+        self.verify(ts.divergence, windows, sample_sets=sample_sets[:2], mode=mode)
+        self.verify(ts.Fst, windows, sample_sets=sample_sets[:2], mode=mode)
+        self.verify(ts.Y3, windows, sample_sets=sample_sets[:3], mode=mode)
+        self.verify(ts.f4, windows, sample_sets=sample_sets, mode=mode)
+        self.verify(
+            ts.genetic_relatedness,
+            windows,
+            sample_sets=sample_sets[:2],
+            mode=mode,
+            proportion=False,
+        )
+
+    def test_tajimas_d(self):
+        ts = self.ts()
+        self.verify(ts.Tajimas_D, self.windows(ts))
+
+    @pytest.mark.parametrize("mode", ["site", "branch", "node"])
+    def test_general_stat(self, mode):
+        ts = self.ts()
+        W = np.ones((ts.num_samples, 2))
+        W[:, 1] = np.arange(ts.num_samples)
+        total = np.sum(W, axis=0)
+
+        def f(x):
+            return x * (total - x)
+
+        self.verify(
+            ts.general_stat, self.windows(ts), W=W, f=f, output_dim=2, mode=mode
+        )
+        self.verify(
+            ts.trait_covariance, self.windows(ts), W=W, mode=mode, span_normalise=False
+        )
+
+    @pytest.mark.parametrize("interval", [1, 2, 5])
+    @pytest.mark.parametrize("mode", ["site", "branch", "node"])
+    def test_tree_checkpoints(self, interval, mode):
+        tables = self.ts().dump_tables()
+        tables.build_index(tree_checkpoint_interval=interval)
+        ts = tables.tree_sequence()
+        assert ts.tables.has_tree_checkpoints()
+        windows = self.windows(ts)
+        sample_sets = [ts.samples()[:6], ts.samples()[6:]]
+        self.verify(ts.diversity, windows, sample_sets=sample_sets, mode=mode)
+        self.verify(ts.divergence, "trees", sample_sets=sample_sets, mode=mode)
+        nt.assert_allclose(
+            ts.diversity(windows=windows, mode=mode, num_threads=3),
+            self.ts().diversity(windows=windows, mode=mode),
+        )
+
+    def test_bad_windows(self):
+        ts = self.ts()
+        for windows in [[0.1, 5, ts.sequence_length], [0, 5, 9], [0, 5, 3, 10]]:
+            with pytest.raises(exceptions.LibraryError):
+                ts.diversity(windows=windows, num_threads=2)
@@ -23,6 +23,7 @@
 Tests for functions in util.py
 """
 import collections
+import gzip
 import itertools
 import math
 import pickle
@@ -569,3 +570,69 @@ class TestRandomNuceotides:
     def test_length_bad_type(self, length):
         with pytest.raises(TypeError, match="argument must be a string"):
             tskit.random_nucleotides(length)
+
+
+class TestThreadedMap:
+    @pytest.mark.parametrize("num_threads", [0, 1, 2, 10])
+    def test_ordered(self, num_threads):
+        items = list(range(100))
+        result = list(
+            util.threaded_map(lambda x: x * 2, items, num_threads=num_threads)
+        )
+        assert result == [x * 2 for x in items]
+
+    @pytest.mark.parametrize("num_threads", [0, 3])
+    def test_empty(self, num_threads):
+        assert list(util.threaded_map(str, [], num_threads=num_threads)) == []
+
+    @pytest.mark.parametrize("num_threads", [0, 3])
+    def test_error(self, num_threads):
+        def f(x):
+            if x == 5:
+                raise ValueError("bad item")
+            return x
+
+        with pytest.raises(ValueError, match="bad item"):
+            list(util.threaded_map(f, range(20), num_threads=num_threads))
+
+    def test_lazy_input(self):
+        consumed = []
+
+        def gen():
+            for j in range(100):
+                consumed.append(j)
+                yield j
+
+        result = util.threaded_map(lambda x: x, gen(), num_threads=2)
+        assert next(result) == 0
+        # Only a bounded number of items are read ahead.
+        assert len(consumed) < 10
+        result.close()
+
+
+class TestBgzfCompress:
+    @pytest.mark.parametrize(
+        "data", [b"", b"x", b"abc" * 1000, bytes(range(256)) * 1000]
+    )
+    def test_round_trip(self, data):
+        compressed = util.bgzf_compress(data)
+        assert gzip.decompress(compressed) == data
+        assert gzip.decompress(compressed + util.BGZF_EOF) == data
+
+    def test_block_structure(self):
+        data = bytes(range(256)) * 1000
+        compressed = util.bgzf_compress(data)
+        offset = 0
+        num_blocks = 0
+        while offset < len(compressed):
+            assert compressed[offset : offset + 4] == b"\x1f\x8b\x08\x04"
+            # The BSIZE field records the total block size minus 1
+            bsize = int.from_bytes(compressed[offset + 16 : offset + 18], "little")
+            offset += bsize + 1
+            num_blocks += 1
+        assert offset == len(compressed)
+        assert num_blocks == math.ceil(len(data) / util.BGZF_BLOCK_SIZE)
+
+    def test_eof(self):
+        assert len(util.BGZF_EOF) == 28
+        assert gzip.decompress(util.BGZF_EOF) == b""
@@ -24,11 +24,13 @@
 Test cases for VCF output in tskit.
 """
 import contextlib
+import gzip
 import io
 import math
 import os
 import tempfile
 import textwrap
+import threading
 
 import msprime
 import numpy as np
@@ -379,6 +381,15 @@ class TestInterface:
         with pytest.raises(ValueError, match="List of sample individuals empty"):
             ts.as_vcf(individuals=[])
 
+    def test_no_samples(self):
+        tables = tskit.TableCollection(10)
+        tables.nodes.add_row(time=0)
+        tables.sites.add_row(1, "A")
+        tables.mutations.add_row(site=0, node=0, derived_state="T")
+        ts = tables.tree_sequence()
+        with pytest.raises(ValueError, match="no samples"):
+            ts.as_vcf()
+
     def test_duplicate_individuals(self):
         ts = msprime.sim_ancestry(3, random_seed=2)
         ts = tsutil.insert_branch_sites(ts)
@@ -437,27 +448,156 @@ class TestInterface:
             assert ts.as_vcf(2, "chr2")
 
 
-class TestLimitations:
+class TestManyAlleles:
     """
-    Verify the correct error behaviour in cases we don't support.
+    Verify that sites with more than 9 alleles are written correctly.
     """
 
     def test_many_alleles(self):
         ts = msprime.simulate(20, random_seed=45)
         tables = ts.dump_tables()
         tables.sites.add_row(0.5, "0")
-        # 9 alleles should be fine
-        for j in range(8):
+        for j in range(14):
             tables.mutations.add_row(0, node=j, derived_state=str(j + 1))
         ts = tables.tree_sequence()
-        ts.write_vcf(io.StringIO())
-        for j in range(9, 15):
-            tables.mutations.add_row(0, node=j, derived_state=str(j))
-            ts = tables.tree_sequence()
-            with pytest.raises(
-                ValueError, match="More than 9 alleles not currently supported"
-            ):
-                ts.write_vcf(io.StringIO())
+        var = next(ts.variants())
+        assert var.num_alleles == 15
+        line = drop_header(ts.as_vcf()).splitlines()[1]
+        fields = line.split("\t")
+        assert fields[3] == "0"
+        assert fields[4] == ",".join(var.alleles[1:])
+        assert fields[9:] == [str(g) for g in var.genotypes]
+
+    @pytest.mark.skipif(not _pysam_imported, reason="pysam not available")
+    def test_many_alleles_ok_with_pysam(self):
+        ts = msprime.simulate(20, random_seed=45)
+        tables = ts.dump_tables()
+        tables.sites.add_row(0.5, "A")
+        for j in range(12):
+            tables.mutations.add_row(0, node=j, derived_state="A" + "C" * (j + 1))
+        ts = tables.tree_sequence()
+        var = next(ts.variants())
+        with ts_to_pysam(ts) as records:
+            (record,) = list(records)
+            assert record.alleles == var.alleles
+            gts = [record.samples[f"tsk_{j}"]["GT"][0] for j in range(ts.num_samples)]
+            assert gts == list(var.genotypes)
+
+
+class TestBlockedOutput:
+    """
+    Check that output is identical however the sites are split into blocks.
+    """
+
+    @tests.cached_example
+    def ts(self):
+        ts = msprime.sim_ancestry(
+            5, sequence_length=100, recombination_rate=0.01, random_seed=3
+        )
+        ts = msprime.sim_mutations(ts, rate=0.05, random_seed=3)
+        assert ts.num_sites > 10
+        return ts
+
+    @pytest.mark.parametrize("block_bytes", [1, 100, 1000])
+    def test_block_size(self, monkeypatch, block_bytes):
+        ts = self.ts()
+        expected = ts.as_vcf()
+        monkeypatch.setattr(tskit.vcf, "VCF_BLOCK_BYTES", block_bytes)
+        assert ts.as_vcf() == expected
+
+    def test_matches_variants(self):
+        ts = self.ts()
+        lines = drop_header(ts.as_vcf()).splitlines()[1:]
+        assert len(lines) == ts.num_sites
+        for line, var in zip(lines, ts.variants()):
+            fields = line.split("\t")
+            assert int(fields[2]) == var.site.id
+            assert fields[3] == var.alleles[0]
+            gts = "\t".join(
+                "|".join(str(g) for g in var.genotypes[j : j + 2])
+                for j in range(0, ts.num_samples, 2)
+            )
+            assert "\t".join(fields[9:]) == gts
+
+    @pytest.mark.parametrize("num_threads", [1, 2, 7])
+    @pytest.mark.parametrize("block_bytes", [1, 1000])
+    def test_num_threads(self, monkeypatch, num_threads, block_bytes):
+        ts = self.ts()
+        expected = ts.as_vcf()
+        monkeypatch.setattr(tskit.vcf, "VCF_BLOCK_BYTES", block_bytes)
+        assert ts.as_vcf(num_threads=num_threads) == expected
+
+    @pytest.mark.parametrize("num_threads", [0, 3])
+    def test_num_threads_masks(self, monkeypatch, num_threads):
+        ts = self.ts()
+        monkeypatch.setattr(tskit.vcf, "VCF_BLOCK_BYTES", 100)
+
+        def sample_mask(variant):
+            mask = np.zeros(ts.num_samples, dtype=bool)
+            mask[variant.site.id % ts.num_samples] = True
+            return mask
+
+        site_mask = np.arange(ts.num_sites) % 3 == 0
+        kwargs = dict(site_mask=site_mask, sample_mask=sample_mask)
+        expected = ts.as_vcf(**kwargs)
+        assert ts.as_vcf(num_threads=num_threads, **kwargs) == expected
+
+    def test_sample_mask_callable_calling_thread(self, monkeypatch):
+        ts = self.ts()
+        monkeypatch.setattr(tskit.vcf, "VCF_BLOCK_BYTES", 100)
+        thread_ids = set()
+
+        def sample_mask(variant):
+            thread_ids.add(threading.get_ident())
+            return np.zeros(ts.num_samples, dtype=bool)
+
+        assert ts.as_vcf(num_threads=4, sample_mask=sample_mask) == ts.as_vcf()
+        assert thread_ids == {threading.get_ident()}
+
+    @pytest.mark.parametrize("num_threads", [0, 3])
+    def test_write_twice(self, monkeypatch, num_threads):
+        ts = self.ts()
+        monkeypatch.setattr(tskit.vcf, "VCF_BLOCK_BYTES", 100)
+        writer = tskit.vcf.VcfWriter(
+            ts,
+            ploidy=None,
+            contig_id="1",
+            individuals=None,
+            individual_names=None,
+            position_transform=None,
+            site_mask=None,
+            sample_mask=np.arange(ts.num_samples) % 2 == 0,
+            isolated_as_missing=None,
+            num_threads=num_threads,
+        )
+        outputs = [io.StringIO(), io.StringIO()]
+        for output in outputs:
+            writer.write(output)
+        assert outputs[0].getvalue() == outputs[1].getvalue()
+        assert "\t.|" in outputs[0].getvalue()
+
+    @pytest.mark.parametrize("num_threads", [0, 2])
+    @pytest.mark.parametrize("block_bytes", [1, 100, 2**22])
+    def test_bgzf(self, monkeypatch, num_threads, block_bytes):
+        ts = self.ts()
+        expected = ts.as_vcf()
+        monkeypatch.setattr(tskit.vcf, "VCF_BLOCK_BYTES", block_bytes)
+        output = io.BytesIO()
+        ts.write_vcf(output, num_threads=num_threads, bgzf=True)
+        data = output.getvalue()
+        assert data.endswith(tskit.util.BGZF_EOF)
+        assert gzip.decompress(data).decode() == expected
+
+    @pytest.mark.skipif(not _pysam_imported, reason="pysam not available")
+    def test_bgzf_tabix(self, tmp_path):
+        ts = self.ts()
+        path = tmp_path / "out.vcf.gz"
+        with open(path, "wb") as f:
+            ts.write_vcf(f, bgzf=True, num_threads=2)
+        pysam.tabix_index(str(path), preset="vcf")
+        with pysam.VariantFile(str(path)) as vcf:
+            records = list(vcf.fetch("1", 0, int(ts.sequence_length)))
+        assert len(records) == ts.num_sites
 
 
 class TestPositionTransformErrors:
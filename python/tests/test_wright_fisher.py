@@ -31,6 +31,7 @@ import numpy as np
 import numpy.testing as nt
 import pytest
 
+import _tskit
 import tests as tests
 import tests.tsutil as tsutil
 import tskit
@@ -400,7 +401,7 @@ class TestSimulation:
         tables.sort()
         ts = tables.tree_sequence()
         ts = tsutil.jukes_cantor(ts, 10, 0.1, seed=self.random_seed)
-        tables = ts.tables
+        tables = ts.dump_tables()
         assert tables.sites.num_rows > 0
         assert tables.mutations.num_rows > 0
         samples = np.where(tables.nodes.flags == tskit.NODE_IS_SAMPLE)[0].astype(
@@ -427,7 +428,7 @@ class TestSimulation:
         tables.sort()
         ts = tables.tree_sequence()
         ts = tsutil.jukes_cantor(ts, 1, 10, seed=self.random_seed)
-        tables = ts.tables
+        tables = ts.dump_tables()
         assert tables.sites.num_rows == 1
         assert tables.mutations.num_rows > 0
         # before simplify
@@ -636,3 +637,182 @@ class TestSimplify:
                 st_nodes = list(st.nodes())
                 for k, v in enumerate(visited):
                     assert v == (k in st_nodes)
+
+
+def incremental_wf_sim(
+    N, ngens, simplify_interval, seed, simplifier_params, remember=False
+):
+    """
+    Runs a simple haploid Wright-Fisher simulation with mutations, in which
+    the tables are simplified every ``simplify_interval`` generations using
+    the persistent :class:`tskit.Simplifier`. At each simplification, the
+    output is checked against sorting and simplifying a copy of the tables.
+    If ``remember`` is True, the first node of every third generation is
+    kept as a sample for the rest of the simulation, and new mutations are
+    also added above these remembered samples.
+    """
+    rng = np.random.default_rng(seed)
+    tables = tskit.TableCollection(1)
+    alive = np.array(
+        [
+            tables.nodes.add_row(flags=tskit.NODE_IS_SAMPLE, time=ngens)
+            for _ in range(N)
+        ],
+        dtype=np.int32,
+    )
+    remembered = np.array([], dtype=np.int32)
+    simplifier = tskit.Simplifier(tables, **simplifier_params)
+    for t in range(ngens - 1, -1, -1):
+        children = np.arange(N, dtype=np.int32) + tables.nodes.num_rows
+        tables.nodes.append_columns(
+            flags=np.zeros(N, dtype=np.uint32), time=np.full(N, t, dtype=np.float64)
+        )
+        breakpoints = rng.random(N)
+        tables.edges.append_columns(
+            left=np.concatenate([np.zeros(N), breakpoints]),
+            right=np.concatenate([breakpoints, np.ones(N)]),
+            parent=np.concatenate(
+                [alive[rng.integers(N, size=N)], alive[rng.integers(N, size=N)]]
+            ),
+            child=np.concatenate([children, children]),
+        )
+        for u in children[rng.random(N) < 0.2]:
+            site = tables.sites.add_row(position=rng.random(), ancestral_state="0")
+            tables.mutations.add_row(site=site, node=u, derived_state="1", time=t)
+        if remember and len(remembered) > 0:
+            site = tables.sites.add_row(position=rng.random(), ancestral_state="0")
+            tables.mutations.add_row(
+                site=site, node=rng.choice(remembered), derived_state="1"
+            )
+        alive = children
+        if remember and t % 3 == 0:
+            remembered = np.append(remembered, alive[0])
+        if t % simplify_interval == 0:
+            samples = np.concatenate([alive, remembered[remembered != alive[0]]])
+            expected = tables.copy()
+            expected.sort()
+            expected_node_map = expected.simplify(
+                samples, record_provenance=False, **simplifier_params
+            )
+            node_map = simplifier.simplify(samples)
+            tables.assert_equals(expected)
+            nt.assert_array_equal(node_map, expected_node_map)
+            alive = node_map[alive]
+            remembered = node_map[remembered]
+    return tables
+
+
+class TestPersistentSimplifier:
+    """
+    Tests for the persistent Simplifier in a forward-time simulation loop.
+    """
+
+    @pytest.mark.parametrize("simplify_interval", [1, 3, 10])
+    @pytest.mark.parametrize(
+        "params",
+        [
+            {},
+            {"keep_unary": True},
+            {"filter_nodes": False},
+            {"filter_sites": False},
+            {"update_sample_flags": False},
+        ],
+    )
+    def test_matches_simplify(self, simplify_interval, params):
+        tables = incremental_wf_sim(10, 30, simplify_interval, 42, params)
+        assert tables.nodes.num_rows > 0
+        tables.tree_sequence()
+
+    @pytest.mark.parametrize("simplify_interval", [1, 2, 5])
+    @pytest.mark.parametrize("params", [{}, {"keep_unary": True}])
+    def test_remembered_samples(self, simplify_interval, params):
+        tables = incremental_wf_sim(10, 30, simplify_interval, 7, params, True)
+        assert np.sum(tables.nodes.flags == tskit.NODE_IS_SAMPLE) > 10
+        tables.tree_sequence()
+
+    def test_keep_unary_in_individuals(self):
+        ts = msprime.sim_ancestry(
+            4, sequence_length=10, recombination_rate=0.1, random_seed=5
+        )
+        tables = ts.dump_tables()
+        expected = tables.copy()
+        simplifier = tskit.Simplifier(tables, keep_unary_in_individuals=True)
+        node_map = simplifier.simplify([0, 1, 2, 3])
+        expected_node_map = expected.simplify(
+            [0, 1, 2, 3], keep_unary_in_individuals=True, record_provenance=False
+        )
+        tables.assert_equals(expected)
+        nt.assert_array_equal(node_map, expected_node_map)
+
+    def test_default_samples(self):
+        ts = msprime.sim_ancestry(5, random_seed=3)
+        tables = ts.dump_tables()
+        expected = tables.copy()
+        expected.simplify(record_provenance=False)
+        tskit.Simplifier(tables).simplify()
+        tables.assert_equals(expected)
+
+    def test_sample_status_change(self):
+        ts = msprime.sim_ancestry(
+            5, sequence_length=10, recombination_rate=0.1, random_seed=3
+        )
+        tables = ts.dump_tables()
+        expected = tables.copy()
+        simplifier = tskit.Simplifier(tables)
+        for samples in [np.arange(10), np.arange(5), np.arange(2, 7)]:
+            node_map = simplifier.simplify(samples)
+            expected_node_map = expected.simplify(samples, record_provenance=False)
+            tables.assert_equals(expected)
+            nt.assert_array_equal(node_map, expected_node_map)
+
+    @pytest.mark.parametrize(
+        "params", [{"keep_input_roots": True}, {"reduce_to_site_topology": True}]
+    )
+    def test_unsupported_options(self, params):
+        with pytest.raises(TypeError):
+            tskit.Simplifier(tskit.TableCollection(1), **params)
+
+    def test_keep_unary_mutually_exclusive(self):
+        with pytest.raises(_tskit.LibraryError):
+            tskit.Simplifier(
+                tskit.TableCollection(1),
+                keep_unary=True,
+                keep_unary_in_individuals=True,
+            )
+
+    def test_rows_removed(self):
+        tables = msprime.sim_ancestry(5, random_seed=3).dump_tables()
+        simplifier = tskit.Simplifier(tables)
+        simplifier.simplify()
+        tables.edges.truncate(1)
+        with pytest.raises(_tskit.LibraryError, match="ROWS_REMOVED"):
+            simplifier.simplify()
+
+    @pytest.mark.parametrize(
+        ["add_rows", "error"],
+        [
+            (lambda tables: tables.edges.append(tables.edges[0]), "DUPLICATE_EDGES"),
+            (lambda tables: tables.edges.add_row(0, 1, 0, 10), "TIME_ORDERING"),
+            (lambda tables: tables.nodes.add_row(population=10), "POPULATION_OUT"),
+            (
+                lambda tables: [tables.sites.add_row(0.5, "0") for _ in range(2)],
+                "DUPLICATE_SITE_POSITION",
+            ),
+        ],
+    )
+    def test_bad_appended_rows(self, add_rows, error):
+        tables = msprime.sim_ancestry(5, random_seed=3).dump_tables()
+        simplifier = tskit.Simplifier(tables)
+        simplifier.simplify()
+        add_rows(tables)
+        with pytest.raises(_tskit.LibraryError, match=error):
+            simplifier.simplify()
+
+    def test_read_only_tables(self):
+        ts = msprime.sim_ancestry(5, random_seed=3)
+        with pytest.raises(AttributeError, match="read-only"):
+            tskit.Simplifier(ts.tables)
+
+    def test_tables(self):
+        tables = tskit.TableCollection(1)
+        assert tskit.Simplifier(tables).tables is tables
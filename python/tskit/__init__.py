@@ -76,6 +76,7 @@ from tskit.provenance import validate_provenance  # NOQA
 from tskit.formats import *  # NOQA
 from tskit.trees import *  # NOQA
 from tskit.genotypes import Variant  # NOQA
+from tskit.genotypes import VariantChunk  # NOQA
 from tskit.tables import *  # NOQA
 from tskit.stats import *  # NOQA
 from tskit.combinatorics import (  # NOQA
@@ -137,7 +137,14 @@ def run_fasta(args):
 
 def run_vcf(args):
     tree_sequence = load_tree_sequence(args.tree_sequence)
-    tree_sequence.write_vcf(sys.stdout, ploidy=args.ploidy, contig_id=args.contig_id)
+    output = sys.stdout.buffer if args.bgzf else sys.stdout
+    tree_sequence.write_vcf(
+        output,
+        ploidy=args.ploidy,
+        contig_id=args.contig_id,
+        num_threads=args.num_threads,
+        bgzf=args.bgzf,
+    )
 
 
 def add_tree_sequence_argument(parser):
@@ -223,6 +230,19 @@ def get_tskit_parser():
     parser.add_argument(
         "--contig-id", "-c", type=str, default="1", help="Specify the contig id"
     )
+    parser.add_argument(
+        "--num-threads",
+        "-t",
+        type=int,
+        default=0,
+        help="The number of threads used to generate the output",
+    )
+    parser.add_argument(
+        "--bgzf",
+        "-z",
+        action="store_true",
+        help="Write BGZF compressed output, suitable for indexing with tabix",
+    )
     parser.set_defaults(runner=run_vcf)
 
     parser = subparsers.add_parser(
@@ -26,6 +26,7 @@ from __future__ import annotations
 import collections
 import logging
 import typing
+from dataclasses import dataclass
 
 import numpy as np
 
@@ -352,6 +353,50 @@ class Variant:
         return f"Variant({repr(d)})"
 
 
+@dataclass
+class VariantChunk(util.Dataclass):
+    """
+    The genotypes for a set of sites, as returned by
+    :meth:`TreeSequence.variants_chunked` and
+    :meth:`TreeSequence.site_genotypes`. For
+    :meth:`~TreeSequence.variants_chunked` the ``genotypes`` array is
+    usually a view of a buffer that is reused between chunks, and so its
+    contents are overwritten when the next chunk is decoded; take a copy
+    if the values are needed for longer.
+    """
+
+    __slots__ = ["site_ids", "alleles", "genotypes", "num_trees"]
+    site_ids: range | np.ndarray
+    """
+    The IDs of the sites in this chunk, in order.
+    """
+    alleles: tuple[tuple[str | None, ...], ...]
+    """
+    The alleles at each site in this chunk, as for :attr:`Variant.alleles`.
+    """
+    genotypes: np.ndarray
+    """
+    A ``len(site_ids)`` by ``num_samples`` array of int32 values, such that
+    ``genotypes[j]`` gives the genotypes at site ``site_ids[j]``, as for
+    :attr:`Variant.genotypes`.
+    """
+    num_trees: int
+    """
+    The number of distinct trees at which genotypes were decoded for this
+    chunk, which gives an indication of the cost of decoding it.
+    """
+
+    # We need a custom eq for the numpy array
+    def __eq__(self, other):
+        return (
+            isinstance(other, VariantChunk)
+            and np.array_equal(self.site_ids, other.site_ids)
+            and self.alleles == other.alleles
+            and np.array_equal(self.genotypes, other.genotypes)
+            and self.num_trees == other.num_trees
+        )
+
+
 #
 # Miscellaneous auxiliary methods.
 #
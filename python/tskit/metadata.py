@@ -38,6 +38,7 @@ from typing import Any
 from typing import Mapping
 
 import jsonschema
+import numpy as np
 
 import tskit
 import tskit.exceptions as exceptions
@@ -291,6 +292,25 @@ struct_meta_schema["definitions"]["root"]["properties"][
 StructCodecSchemaValidator.META_SCHEMA = struct_meta_schema
 
 
+# The numpy equivalents of the struct numeric formats, using the standard sizes
+# and little-endian byte order of the struct codec.
+_struct_numpy_formats = {
+    "b": "i1",
+    "B": "u1",
+    "?": "?",
+    "h": "<i2",
+    "H": "<u2",
+    "i": "<i4",
+    "I": "<u4",
+    "l": "<i4",
+    "L": "<u4",
+    "q": "<i8",
+    "Q": "<u8",
+    "f": "<f4",
+    "d": "<f8",
+}
+
+
 class StructCodec(AbstractMetadataCodec):
     """
     Codec that encodes data using struct. Note that this codec has extra restrictions
@@ -541,6 +561,54 @@ class StructCodec(AbstractMetadataCodec):
     def make_numeric_encode(cls, sub_schema):
         return struct.Struct("<" + sub_schema["binaryFormat"]).pack
 
+    @classmethod
+    def make_numpy_dtype(cls, sub_schema):
+        """
+        Create a numpy dtype with the same memory layout as the encoding of
+        this schema, raising ValueError if the encoded size is not fixed.
+        Nullable objects raise ValueError, as a null value is encoded as
+        zero bytes.
+        """
+        type_ = sub_schema["type"]
+        if isinstance(type_, list):
+            raise ValueError(
+                "Nullable struct metadata objects cannot be represented as a "
+                "fixed size numpy dtype"
+            )
+        if type_ == "object":
+            names = []
+            formats = []
+            offsets = []
+            offset = 0
+            for key, prop in sub_schema["properties"].items():
+                if prop["type"] == "null":
+                    # Padding is not included in the fields of the dtype
+                    offset += struct.calcsize(prop.get("binaryFormat", "0x"))
+                    continue
+                dtype = StructCodec.make_numpy_dtype(prop)
+                names.append(key)
+                formats.append(dtype)
+                offsets.append(offset)
+                offset += dtype.itemsize
+            return np.dtype(
+                {
+                    "names": names,
+                    "formats": formats,
+                    "offsets": offsets,
+                    "itemsize": offset,
+                }
+            )
+        binary_format = sub_schema.get("binaryFormat", "")
+        if type_ == "string" and binary_format[-1:] in ("s", "c"):
+            return np.dtype(f"S{struct.calcsize(binary_format)}")
+        if type_ in ("number", "integer", "boolean"):
+            if binary_format in _struct_numpy_formats:
+                return np.dtype(_struct_numpy_formats[binary_format])
+        raise ValueError(
+            f"Struct metadata of type {type_} with binaryFormat '{binary_format}' "
+            "cannot be represented as a fixed size numpy dtype"
+        )
+
     @classmethod
     def modify_schema(cls, schema: Mapping) -> Mapping:
         # This codec requires that additional properties are
@@ -584,6 +652,17 @@ class StructCodec(AbstractMetadataCodec):
         self.encode = StructCodec.make_encode(schema)
         decoder = StructCodec.make_decode(schema)
         self.decode = lambda buffer: decoder(iter(buffer))
+        self.schema = schema
+        self._numpy_dtype = None
+
+    def numpy_dtype(self) -> np.dtype:
+        """
+        Returns the numpy dtype equivalent to the encoding of this codec's
+        schema. See :meth:`MetadataSchema.numpy_dtype`.
+        """
+        if self._numpy_dtype is None:
+            self._numpy_dtype = StructCodec.make_numpy_dtype(self.schema)
+        return self._numpy_dtype
 
     def encode(self, obj: Any) -> bytes:
         # Set by __init__
@@ -614,6 +693,7 @@ class MetadataSchema:
     def __init__(self, schema: Mapping[str, Any] | None) -> None:
         self._schema = schema
         self._bypass_validation = False
+        self._codec = None
 
         if schema is None:
             self._string = ""
@@ -640,6 +720,7 @@ class MetadataSchema:
             self._string = tskit.canonical_json(schema)
             self._validate_row = TSKITMetadataSchemaValidator(schema).validate
             self._bypass_validation = codec_cls.is_schema_trivial(schema)
+            self._codec = codec_instance
             self.encode_row = codec_instance.encode
             self.decode_row = codec_instance.decode
 
@@ -704,6 +785,26 @@ class MetadataSchema:
         # Set by __init__
         pass  # pragma: no cover
 
+    def numpy_dtype(self) -> np.dtype:
+        """
+        Returns the numpy structured dtype that has the same memory layout as
+        the binary encoding of a row of metadata. This is only possible for
+        schemas using the ``struct`` codec in which every property has a fixed
+        size: arrays, nullable objects and ``p`` strings are not supported.
+        Strings are represented as fixed-length ``bytes`` values (numpy ``S``
+        dtype), and padding is not included in the fields of the dtype.
+
+        :return: The numpy dtype of a row of metadata.
+        :rtype: numpy.dtype
+        :raises ValueError: If the schema does not describe fixed size
+            struct encoded metadata.
+        """
+        if not isinstance(self._codec, StructCodec):
+            raise ValueError(
+                "Only metadata schemas using the struct codec have a numpy dtype"
+            )
+        return self._codec.numpy_dtype()
+
     @staticmethod
     def permissive_json():
         """
@@ -62,6 +62,8 @@ class LdCalculator:
         # To protect low-level C code, only one method may execute on the
         # low-level objects at one time.
         self._instance_lock = threading.Lock()
+        # The number of sites in each dimension of the blocks of the r2 matrix
+        self._block_size = 256
 
     def get_r2(self, a, b):
         # Deprecated alias for r2(a, b)
@@ -150,24 +152,108 @@ class LdCalculator:
         # Deprecated alias for r2_matrix
         return self.r2_matrix()
 
-    def r2_matrix(self):
+    def _r2_blocks(self, max_distance, num_threads):
+        # Tiles the upper triangle of the r2 matrix (including the diagonal)
+        # into blocks, skipping those that are entirely further apart than
+        # max_distance. Each thread gets its own low-level calculator, so we
+        # don't need to hold the instance lock.
+        position = self._tree_sequence.tables.sites.position
+        m = len(position)
+        block_size = self._block_size
+        tiles = []
+        for row_start in range(0, m, block_size):
+            row_stop = min(row_start + block_size, m)
+            col_stop = m
+            if max_distance is not None:
+                col_stop = np.searchsorted(
+                    position, position[row_stop - 1] + max_distance, side="right"
+                )
+            for col_start in range(row_start, col_stop, block_size):
+                tiles.append(
+                    (row_start, row_stop, col_start, min(col_start + block_size, m))
+                )
+        max_distance = sys.float_info.max if max_distance is None else max_distance
+        ll_ts = self._tree_sequence.get_ll_tree_sequence()
+        local = threading.local()
+
+        def compute(tile):
+            if not hasattr(local, "calculator"):
+                local.calculator = _tskit.LdCalculator(ll_ts)
+            block = local.calculator.get_r2_matrix(*tile, max_distance=max_distance)
+            return tile, block
+
+        return tskit.util.threaded_map(compute, tiles, num_threads=num_threads)
+
+    def r2_matrix(self, *, max_distance=None, num_threads=0):
         """
         Returns the complete :math:`m \\times m` matrix of pairwise
         :math:`r^2` values in a tree sequence with :math:`m` sites.
 
+        The matrix is computed in blocks of sites, which may be distributed
+        over several threads using the ``num_threads`` argument. If
+        ``max_distance`` is specified, only pairs of sites that are at most
+        this distance apart in sequence coordinates are computed, and the
+        remaining entries are NaN. For large numbers of sites see
+        :meth:`.r2_pairs`, which does not store the full matrix.
+
+        :param float max_distance: The maximum distance between pairs of
+            sites for which :math:`r^2` is computed. Defaults to no limit.
+        :param int num_threads: The number of threads to use. If this is
+            <= 1 (the default) the matrix is computed in the current thread.
         :return: An 2 dimensional square array of double precision
             floating point values representing the :math:`r^2` values for
             all pairs of sites.
         :rtype: numpy.ndarray
         """
         m = self._tree_sequence.num_sites
-        A = np.ones((m, m), dtype=float)
-        for j in range(m - 1):
-            a = self.get_r2_array(j)
-            A[j, j + 1 :] = a
-            A[j + 1 :, j] = a
+        A = np.full((m, m), np.nan)
+        for tile, block in self._r2_blocks(max_distance, num_threads):
+            row_start, row_stop, col_start, col_stop = tile
+            A[row_start:row_stop, col_start:col_stop] = block
+        # Only the upper triangle is guaranteed to be filled, so mirror it
+        A = np.triu(A, 1)
+        A += A.T
+        np.fill_diagonal(A, 1)
         return A
 
+    def r2_pairs(self, *, threshold=0, max_distance=None, num_threads=0):
+        """
+        Returns the pairs of sites :math:`a < b` for which :math:`r^2` is at
+        least the specified ``threshold``, as a tuple of three arrays
+        ``(a, b, r2)`` sorted by ``a`` and then ``b``. Unlike
+        :meth:`.r2_matrix`, the full matrix is never stored, and so this is
+        suitable for very large numbers of sites, particularly when combined
+        with ``max_distance``.
+
+        :param float threshold: The minimum value of :math:`r^2` for a pair of
+            sites to be returned. Defaults to 0, so that all pairs are
+            returned.
+        :param float max_distance: The maximum distance between pairs of
+            sites for which :math:`r^2` is computed. Defaults to no limit.
+        :param int num_threads: The number of threads to use. If this is
+            <= 1 (the default) the values are computed in the current thread.
+        :return: A tuple ``(a, b, r2)`` of the site indexes and the
+            :math:`r^2` values for each pair of sites.
+        :rtype: tuple(numpy.ndarray, numpy.ndarray, numpy.ndarray)
+        """
+        a = [np.array([], dtype=np.int64)]
+        b = [np.array([], dtype=np.int64)]
+        r2 = [np.array([], dtype=np.float64)]
+        for tile, block in self._r2_blocks(max_distance, num_threads):
+            row_start, _, col_start, _ = tile
+            rows, cols = np.nonzero(block >= threshold)
+            rows += row_start
+            cols += col_start
+            keep = rows < cols
+            a.append(rows[keep])
+            b.append(cols[keep])
+            r2.append(block[rows[keep] - row_start, cols[keep] - col_start])
+        a = np.concatenate(a)
+        b = np.concatenate(b)
+        r2 = np.concatenate(r2)
+        order = np.lexsort((b, a))
+        return a[order], b[order], r2[order]
+
 
 class CoalescenceTimeTable:
     """
@@ -190,8 +276,8 @@ class CoalescenceTimeTable:
         self.time = np.pad(self.time, (0, 1))
         self.block = np.pad(self.block, (0, 1))
         self.weights = np.pad(self.weights, ((0, 1), (0, 0)))
-        # sort by node time
-        time_order = np.argsort(self.time)
+        # sort by node time, breaking ties by block
+        time_order = np.lexsort((self.block, self.time))
         self.time = self.time[time_order]
         self.block = self.block[time_order]
         self.weights = self.weights[time_order, :]
@@ -218,6 +304,46 @@ class CoalescenceTimeTable:
             else:
                 self.quantile[:, i] = np.nan
 
+    def block_sums(self, values=None):
+        """
+        Returns the sorted unique times in the table, and the sums of ``values``
+        (by default the weights) over the records in each block at each unique
+        time, as an array of shape ``(num_unique_times, num_blocks,
+        values.shape[1])``.
+        """
+        if values is None:
+            values = self.weights
+        time, inverse = np.unique(self.time, return_inverse=True)
+        bins = inverse * self.num_blocks + self.block
+        sums = np.empty((time.size, self.num_blocks, values.shape[1]))
+        for i in range(values.shape[1]):
+            sums[:, :, i] = np.bincount(
+                bins, values[:, i], minlength=time.size * self.num_blocks
+            ).reshape(time.size, self.num_blocks)
+        return time, sums
+
+    def cumulative_block_sums(self, times, values=None):
+        """
+        Returns the sums of ``values`` (by default the weights) over the records
+        in each block with time no greater than each of ``times``, as an array
+        of shape ``(len(times), num_blocks, values.shape[1])``.
+        """
+        if values is None:
+            values = self.weights
+        # records are sorted by time, so each time point includes a prefix of
+        # the records; bin records by the first sorted time point including them
+        count = np.searchsorted(self.time, times, side="right")
+        order = np.argsort(count, kind="stable")
+        first = np.searchsorted(count[order], np.arange(self.num_records), side="right")
+        bins = first * self.num_blocks + self.block
+        sums = np.empty((times.size, self.num_blocks, values.shape[1]))
+        for i in range(values.shape[1]):
+            x = np.bincount(
+                bins, values[:, i], minlength=(times.size + 1) * self.num_blocks
+            ).reshape(times.size + 1, self.num_blocks)
+            sums[order, :, i] = np.cumsum(x, axis=0)[:-1]
+        return sums
+
 
 class CoalescenceTimeDistribution:
     """
@@ -234,6 +360,10 @@ class CoalescenceTimeDistribution:
     initialized via,
 
         ``state[sample] = initialize(sample, sample_sets)``
+
+    The built-in weight functions, named by string, are computed by the C
+    library; windows are then split into contiguous chunks that can be
+    processed over ``num_threads`` threads.
     """
 
     @staticmethod
@@ -363,10 +493,6 @@ class CoalescenceTimeDistribution:
 
         assert edge_diff.interval == tree.interval
 
-        # empty rows in the running arrays
-        available_rows = {i for i in range(self.running_array_size)}
-        available_rows -= set(running_index.values())
-
         # find internal nodes that have been removed from tree or are unary
         removed_nodes = set()
         for i in edge_diff.edges_out:
@@ -374,11 +500,12 @@ class CoalescenceTimeDistribution:
                 if tree.num_children(j) < 2 and not tree.is_sample(j):
                     removed_nodes.add(j)
 
-        # find non-unary nodes where descendant subtree has been altered
-        modified_nodes = {
-            i.parent for i in edge_diff.edges_in if tree.num_children(i.parent) > 1
-        }
-        for i in copy.deepcopy(modified_nodes):
+        # find non-unary nodes where descendant subtree has been altered, tracing
+        # ancestors through unary nodes from both inserted and removed edges
+        altered_nodes = {i.parent for i in edge_diff.edges_in}
+        altered_nodes |= {i.parent for i in edge_diff.edges_out}
+        modified_nodes = {i for i in altered_nodes if tree.num_children(i) > 1}
+        for i in altered_nodes:
             while tree.parent(i) != tskit.NULL and not tree.parent(i) in modified_nodes:
                 i = tree.parent(i)
                 if tree.num_children(i) > 1:
@@ -389,7 +516,7 @@ class CoalescenceTimeDistribution:
             if i in running_index:
                 running_state[running_index[i], :] = 0
                 running_output[running_index[i], :] = 0
-                available_rows.add(running_index.pop(i))
+                running_index.pop(i)
 
         # recalculate state/output for nodes whose descendants have changed
         for i in sorted(modified_nodes, key=lambda node: tree.time(node)):
@@ -408,7 +535,7 @@ class CoalescenceTimeDistribution:
 
             # update running state/output arrays
             if i not in running_index:
-                running_index[i] = available_rows.pop()
+                running_index[i] = i
             running_output[running_index[i], :] = output
             for state_index, x in zip(self.state_indices, state):
                 running_state[running_index[i], state_index] = x
@@ -549,8 +676,8 @@ class CoalescenceTimeDistribution:
         tree = ts.first()
         edge_diffs = ts.edge_diffs()
 
-        # initialize running arrays for first tree
-        running_index = {i: n for i, n in enumerate(tree.samples())}
+        # initialize running arrays for first tree, with a row for each node
+        running_index = {n: n for n in tree.samples()}
         running_output = np.zeros(
             (self.running_array_size, self.num_weights),
             dtype=np.float64,
@@ -579,6 +706,44 @@ class CoalescenceTimeDistribution:
                 running_index,
             )
 
+    def _generate_native_ecdf_tables(self, ts, window_breaks, num_threads):
+        """
+        Return a list of ECDF tables across genomic windows defined by
+        ``window_breaks``, computed by the C library for one of the built-in
+        weight functions. Windows are split into contiguous chunks that are
+        processed in parallel over ``num_threads`` threads.
+        """
+
+        sample_set_sizes = np.array([len(s) for s in self.sample_sets], dtype=np.uint32)
+        sample_sets = np.array([u for s in self.sample_sets for u in s], dtype=np.int32)
+        chunks = np.array_split(
+            np.arange(self.num_windows), min(max(1, num_threads), self.num_windows)
+        )
+
+        def compute(chunk):
+            return ts.ll_tree_sequence.coalescence_time_table(
+                sample_set_sizes,
+                sample_sets,
+                window_breaks[chunk[0] : chunk[-1] + 2],
+                self._native_weight_func,
+                num_blocks=self.num_blocks,
+                span_normalise=self.span_normalise,
+                partial_windows=True,
+            )
+
+        tables = []
+        results = tskit.util.threaded_map(compute, chunks, num_threads=num_threads)
+        for chunk, (time, window, block, weights) in zip(chunks, results):
+            # records are created in window order, and windows may have none
+            splits = np.searchsorted(window, np.arange(1, chunk.size))
+            for t, b, w in zip(
+                np.split(time, splits),
+                np.split(block, splits),
+                np.split(weights, splits),
+            ):
+                tables.append(CoalescenceTimeTable(t, b, w))
+        return tables
+
     def __init__(
         self,
         ts,
@@ -587,6 +752,7 @@ class CoalescenceTimeDistribution:
         window_breaks=None,
         blocks_per_window=None,
         span_normalise=True,
+        num_threads=0,
     ):
 
         assert isinstance(ts, trees.TreeSequence)
@@ -597,12 +763,17 @@ class CoalescenceTimeDistribution:
         assert all([i in ts.samples() for j in sample_sets for i in j])
         self.sample_sets = sample_sets
 
+        # the built-in weight functions are computed by the C library
+        self._native_weight_func = None
         if weight_func is None or weight_func == "coalescence_events":
             self._initialize, self._update = self._count_coalescence_events()
+            self._native_weight_func = "coalescence_events"
         elif weight_func == "pair_coalescence_events":
             self._initialize, self._update = self._count_pair_coalescence_events()
+            self._native_weight_func = weight_func
         elif weight_func == "trio_first_coalescence_events":
             self._initialize, self._update = self._count_trio_first_coalescence_events()
+            self._native_weight_func = weight_func
         else:
             # user supplies pair of callables ``(initialize, update)``
             assert isinstance(weight_func, tuple)
@@ -663,9 +834,22 @@ class CoalescenceTimeDistribution:
         self.span_normalise = span_normalise
 
         self.buffer_size = ts.num_nodes
-        self.running_array_size = ts.num_samples * 2 - 1  # assumes no unary nodes
+        self.running_array_size = ts.num_nodes
         self.weight_func_evals = 0
-        self.tables = [table for table in self._generate_ecdf_tables(ts, window_breaks)]
+        # The C library counts a sample with children among the samples below
+        # its ancestors, which the Python engine does not, so tree sequences
+        # with internal samples always use the Python engine.
+        internal_samples = np.any(
+            ts.nodes_flags[ts.edges_parent] & tskit.NODE_IS_SAMPLE
+        )
+        if self._native_weight_func is not None and not internal_samples:
+            self.tables = self._generate_native_ecdf_tables(
+                ts, window_breaks, num_threads
+            )
+        else:
+            self.tables = [
+                table for table in self._generate_ecdf_tables(ts, window_breaks)
+            ]
 
     # TODO
     #
@@ -860,7 +1044,8 @@ class CoalescenceTimeDistribution:
         Return a generator that produces ``num_replicates`` copies of the
         object where blocks within genomic windows are randomly resampled.
 
-        ..note:: Copying could be expensive.
+        ..note:: Copying could be expensive; see :meth:`.block_bootstrap_batch`
+            to evaluate many replicates without copies.
         """
 
         rng = np.random.default_rng(random_seed)
@@ -872,3 +1057,226 @@ class CoalescenceTimeDistribution:
                 )
                 table.resample_blocks(block_multiplier)
             yield replicate
+
+    def block_bootstrap_batch(self, num_replicates=1, random_seed=None):
+        """
+        Return a :class:`CoalescenceTimeBootstrap` with ``num_replicates``
+        replicates where blocks within genomic windows are randomly resampled.
+        The block multipliers for all replicates are drawn at once, and the
+        replicates are evaluated together without copying the object.
+        """
+
+        assert isinstance(num_replicates, int) and num_replicates > 0
+        rng = np.random.default_rng(random_seed)
+        block_multipliers = [
+            rng.multinomial(
+                table.num_blocks,
+                [1.0 / table.num_blocks] * table.num_blocks,
+                size=num_replicates,
+            )
+            for table in self.tables
+        ]
+        return CoalescenceTimeBootstrap(self, block_multipliers)
+
+
+def _interp_rows(x, xp, fp):
+    """
+    Row-wise linear interpolation, equivalent to ``np.interp(x[j], xp[j], fp[j])``
+    for each row ``j``, where the rows of ``xp`` are non-decreasing with values
+    in ``[0, xp.shape[1] - 1]`` and the values in ``x`` lie within the range of
+    the corresponding row of ``xp``.
+    """
+
+    num_rows, num_points = xp.shape
+    if num_points == 1:
+        return np.repeat(fp, x.shape[1], axis=1)
+    # The points lie within [0, num_points - 1] (see the caller), so offsetting
+    # each row by a multiple of num_points sorts all the rows together. Any
+    # rounding in the offsets only matters at the points themselves, where
+    # the interpolant is continuous.
+    offset = np.arange(num_rows)[:, None] * num_points
+    rank = np.searchsorted((xp + offset).ravel(), (x + offset).ravel(), side="right")
+    rank = rank.reshape(x.shape) - offset
+    hi = np.clip(rank, 1, num_points - 1)
+    lo = hi - 1
+    x_lo = np.take_along_axis(xp, lo, axis=1)
+    x_hi = np.take_along_axis(xp, hi, axis=1)
+    f_lo = np.take_along_axis(fp, lo, axis=1)
+    f_hi = np.take_along_axis(fp, hi, axis=1)
+    delta = x_hi - x_lo
+    frac = np.divide(x - x_lo, delta, out=np.ones(x.shape), where=delta > 0)
+    return f_lo + np.clip(frac, 0, 1) * (f_hi - f_lo)
+
+
+class CoalescenceTimeBootstrap:
+    """
+    Block bootstrap replicates of a :class:`CoalescenceTimeDistribution`,
+    evaluated together without copying the distribution. ``block_multipliers``
+    contains an array of shape ``(num_replicates, num_blocks)`` for each
+    window, giving the number of times each block is drawn in each replicate.
+    Weights are summed within blocks over a sorted time axis, and then
+    combined across blocks for all replicates at once by matrix products.
+
+    Methods return arrays of shape ``(num_replicates, num_windows,
+    num_weights, ...)``, where ``values[j, k]`` is the output of the
+    corresponding :class:`CoalescenceTimeDistribution` method for window ``k``
+    with blocks resampled by ``block_multipliers[k][j]``.
+    """
+
+    def __init__(self, distribution, block_multipliers):
+        assert isinstance(distribution, CoalescenceTimeDistribution)
+        assert len(block_multipliers) == distribution.num_windows
+        self.distribution = distribution
+        self.block_multipliers = [np.asarray(m) for m in block_multipliers]
+        self.num_replicates = self.block_multipliers[0].shape[0]
+        for table, multiplier in zip(distribution.tables, self.block_multipliers):
+            assert multiplier.shape == (self.num_replicates, table.num_blocks)
+        self.num_windows = distribution.num_windows
+        self.num_weights = distribution.num_weights
+
+    def _windows(self):
+        for table, multiplier in zip(self.distribution.tables, self.block_multipliers):
+            yield table, multiplier.astype(np.float64)
+
+    def _empty(self, size):
+        values = np.empty(
+            (self.num_replicates, self.num_windows, self.num_weights, size)
+        )
+        values[:] = np.nan
+        return values
+
+    def ecdf(self, times):
+        """
+        Returns the empirical distribution function of each replicate evaluated
+        at the time points in ``times``.
+
+        The output array has shape ``(self.num_replicates, self.num_windows,
+        self.num_weights, len(times))``.
+        """
+
+        assert isinstance(times, np.ndarray)
+        assert times.ndim == 1
+        assert np.all(times >= 0)
+
+        values = self._empty(times.size)
+        for k, (table, multiplier) in enumerate(self._windows()):
+            cum_weights = np.einsum(
+                "jb,tbi->jit", multiplier, table.cumulative_block_sums(times)
+            )
+            totals = multiplier @ table.cumulative_block_sums(np.array([np.inf]))[0]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                values[:, k] = cum_weights / totals[:, :, None]
+        return values
+
+    def quantile(self, quantiles):
+        """
+        Return interpolated quantiles of weighted coalescence times for each
+        replicate, as in :meth:`CoalescenceTimeDistribution.quantile`.
+
+        The output array has shape ``(self.num_replicates, self.num_windows,
+        self.num_weights, len(quantiles))``.
+        """
+
+        assert isinstance(quantiles, np.ndarray)
+        assert quantiles.ndim == 1
+        assert np.all(np.logical_and(quantiles >= 0, quantiles <= 1))
+
+        values = self._empty(quantiles.size)
+        rows = np.arange(self.num_replicates)
+        for k, (table, multiplier) in enumerate(self._windows()):
+            time, block_sums = table.block_sums()
+            if time.size < 2:
+                continue
+            for i in range(self.num_weights):
+                # weights at each unique time are sums of non-negative terms,
+                # so are exactly zero where there is no step in the ECDF
+                weights = multiplier @ block_sums[:, :, i].T
+                cum_weights = np.cumsum(weights, axis=1)
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    weights /= cum_weights[:, -1:]
+                    ecdf = cum_weights / cum_weights[:, -1:]
+                # interpolate between the steps as for a single table, with the
+                # steps of each replicate moved to the start of its row
+                step = weights[:, 1:] > 0
+                n_eff = np.sum(step, axis=1)
+                last = np.maximum(n_eff - 1, 0)
+                rank = np.cumsum(step, axis=1) - 1
+                midpoint = rank * weights[:, 1:] + last[:, None] * ecdf[:, :-1]
+                order = np.argsort(~step, axis=1, kind="stable")
+                xp = np.take_along_axis(midpoint, order, axis=1)
+                fp = time[1:][order]
+                after_last = np.arange(time.size - 1) >= n_eff[:, None]
+                xp = np.where(after_last, last[:, None], xp)
+                fp = np.where(after_last, fp[rows, last][:, None], fp)
+                x = quantiles[None, :] * last[:, None]
+                values[:, k, i] = np.where(
+                    n_eff[:, None] > 0, _interp_rows(x, xp, fp), np.nan
+                )
+        return values
+
+    def mean(self, since):
+        """
+        Returns the average time between each value in ``since`` and the
+        coalescence events that occurred after it, for each replicate.
+
+        The output array has shape ``(self.num_replicates, self.num_windows,
+        self.num_weights, len(since))``.
+        """
+
+        assert isinstance(since, np.ndarray)
+        assert since.ndim == 1
+
+        values = self._empty(since.size)
+        times = np.append(since, np.inf)
+        for k, (table, multiplier) in enumerate(self._windows()):
+            weights = table.cumulative_block_sums(times)
+            weights = weights[-1:] - weights[:-1]
+            time_weights = table.cumulative_block_sums(
+                times, table.weights * table.time[:, None]
+            )
+            time_weights = time_weights[-1:] - time_weights[:-1]
+            # counts of records are exact, unlike differences of sums
+            counts = table.cumulative_block_sums(
+                times, (table.weights > 0).astype(np.float64)
+            )
+            counts = counts[-1:] - counts[:-1]
+            weights = np.einsum("jb,tbi->jit", multiplier, weights)
+            time_weights = np.einsum("jb,tbi->jit", multiplier, time_weights)
+            counts = np.einsum("jb,tbi->jit", multiplier, counts)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                values[:, k] = np.where(
+                    counts > 0, time_weights / weights - since, np.nan
+                )
+        return values
+
+    def coalescence_rate_in_intervals(self, time_breaks):
+        """
+        Returns the interval-censored Kaplan-Meier estimate of the hazard rate
+        for coalesence events within the time intervals defined by
+        ``time_breaks``, for each replicate, as in
+        :meth:`CoalescenceTimeDistribution.coalescence_rate_in_intervals`.
+
+        The output array has shape ``(self.num_replicates, self.num_windows,
+        self.num_weights, len(time_breaks)-1)``.
+        """
+
+        assert isinstance(time_breaks, np.ndarray)
+
+        time_breaks = np.sort(np.unique(time_breaks))
+        ecdf = self.ecdf(time_breaks)
+        totals = self._empty(1)
+        for k, (table, multiplier) in enumerate(self._windows()):
+            block_totals = table.cumulative_block_sums(np.array([np.inf]))[0]
+            totals[:, k, :, 0] = multiplier @ block_totals
+        num_coalesced = ecdf * totals
+        num_uncoalesced = (1.0 - ecdf) * totals
+        numer = num_coalesced[..., 1:] - num_coalesced[..., :-1]
+        denom = num_uncoalesced[..., :-1]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            phi = numer / np.where(np.isclose(denom, 0.0), np.nan, denom)
+            duration = time_breaks[1:] - time_breaks[:-1]
+            rate = -np.log(1.0 - np.where(np.isclose(phi, 1.0), np.nan, phi)) / duration
+            rate = np.where(
+                np.isclose(phi, 1.0), 1.0 / self.mean(time_breaks[:-1]), rate
+            )
+        return rate
@@ -24,16 +24,19 @@
 """
 Tree sequence IO via the tables API.
 """
+import array
 import collections.abc
 import dataclasses
 import datetime
 import json
 import numbers
+import threading
 import warnings
 from collections.abc import Mapping
 from dataclasses import dataclass
 from functools import reduce
 from typing import Dict
+from typing import NamedTuple
 from typing import Optional
 from typing import Union
 
@@ -340,6 +343,363 @@ def keep_with_offset(keep, data, offset):
     )
 
 
+class TableBuilder:
+    """
+    Buffers rows to be added to a table, so that they can be appended in large
+    batches rather than one at a time. Each call to ``add_row`` stores the
+    row's values in growable buffers and immediately returns the ID that the
+    row will have in the table. When ``buffer_size`` rows have accumulated, or
+    when :meth:`.flush` is called, the buffers are converted to numpy arrays
+    (without copying) and the buffered rows are added to the table in a single
+    call to ``append_columns``.
+
+    Builders are not intended to be instantiated directly, and are returned
+    by the ``builder`` method of a table, e.g.
+    :meth:`NodeTable.builder`. A builder can also be used as a context
+    manager, in which case it is flushed when the ``with`` block exits:
+
+    .. code-block:: python
+
+        with tables.edges.builder() as edges:
+            for parent, child in pairs:
+                edges.add_row(0, tables.sequence_length, parent, child)
+
+    Buffered rows are not visible in the table until they are flushed, and
+    rows must not be added to or removed from the table by other means while
+    there are buffered rows.
+
+    Metadata is validated and encoded using the table's metadata schema at
+    the time the builder was created.
+    """
+
+    # The columns of the table, mapped to their dtypes. Must be set by
+    # subclasses.
+    columns = {}
+    # The variable length columns of the table, mapped to their dtypes. Must be
+    # set by subclasses.
+    ragged_columns = {}
+
+    def __init__(self, table, buffer_size=None):
+        if buffer_size is None:
+            buffer_size = 2**16
+        buffer_size = int(buffer_size)
+        if buffer_size < 1:
+            raise ValueError("buffer_size must be at least 1")
+        self.table = table
+        self.buffer_size = buffer_size
+        schema = table.metadata_schema
+        self._encode_metadata = schema.validate_and_encode_row
+        self._empty_metadata = schema.validate_and_encode_row(schema.empty_value)
+        self._start = 0
+        self._num_buffered_rows = 0
+        self._clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.flush()
+
+    def _clear(self):
+        self._buffers = {
+            name: array.array(np.dtype(dtype).char)
+            for name, dtype in {**self.columns, **self.ragged_columns}.items()
+        }
+        offset_typecode = np.dtype(np.uint64).char
+        self._offsets = {
+            name: array.array(offset_typecode, [0]) for name in self.ragged_columns
+        }
+        # Bound methods for appending to the buffers, to keep _add fast.
+        self._column_appends = [
+            (name, self._buffers[name].append) for name in self.columns
+        ]
+        self._ragged_appends = [
+            (name, self._buffers[name], offset.append)
+            for name, offset in self._offsets.items()
+        ]
+
+    def _truncate(self, num_rows):
+        # Removes any partially added row after an error.
+        for name in self.columns:
+            del self._buffers[name][num_rows:]
+        for name, offset in self._offsets.items():
+            del offset[num_rows + 1 :]
+            del self._buffers[name][offset[num_rows] :]
+
+    def _add(self, values):
+        # Buffers a row with the specified column values and returns its ID.
+        # Values for the ragged columns may be None, a str, bytes or a
+        # sequence of values, and the metadata value is encoded first.
+        metadata = values["metadata"]
+        if metadata is None:
+            values["metadata"] = self._empty_metadata
+        else:
+            values["metadata"] = self._encode_metadata(metadata)
+        j = self._num_buffered_rows
+        if j == self.buffer_size:
+            self.flush()
+            j = 0
+        if j == 0:
+            self._start = self.table.num_rows
+        try:
+            for name, append in self._column_appends:
+                append(values[name])
+            for name, buffer, append_offset in self._ragged_appends:
+                value = values[name]
+                if isinstance(value, bytes):
+                    buffer.frombytes(value)
+                elif isinstance(value, str):
+                    buffer.frombytes(value.encode())
+                elif value is not None:
+                    buffer.extend(value)
+                append_offset(len(buffer))
+        except Exception:
+            self._truncate(j)
+            raise
+        self._num_buffered_rows = j + 1
+        return self._start + j
+
+    @property
+    def num_buffered_rows(self) -> int:
+        """
+        The number of rows that have been added to this builder but not yet
+        flushed to the table.
+        """
+        return self._num_buffered_rows
+
+    @property
+    def num_rows(self) -> int:
+        """
+        The number of rows in the table, including the rows that are
+        currently buffered.
+        """
+        if self._num_buffered_rows == 0:
+            return self.table.num_rows
+        return self._start + self._num_buffered_rows
+
+    def flush(self):
+        """
+        Appends the buffered rows to the table.
+        """
+        if self._num_buffered_rows == 0:
+            return
+        if self.table.num_rows != self._start:
+            raise ValueError(
+                "The table has been modified while rows were buffered by the builder"
+            )
+        columns = {}
+        for name, dtype in {**self.columns, **self.ragged_columns}.items():
+            columns[name] = np.frombuffer(self._buffers[name], dtype=dtype)
+        for name, offset in self._offsets.items():
+            columns[name + "_offset"] = np.frombuffer(offset, dtype=np.uint64)
+        self.table.append_columns(**columns)
+        self._num_buffered_rows = 0
+        self._clear()
+
+
+class IndividualTableBuilder(TableBuilder):
+    """
+    A :class:`TableBuilder` for an :class:`IndividualTable`.
+    """
+
+    columns = {"flags": np.uint32}
+    ragged_columns = {"location": np.float64, "parents": np.int32, "metadata": np.int8}
+
+    def add_row(self, flags=0, location=None, parents=None, metadata=None):
+        """
+        Buffers a new individual and returns its ID. The parameters are the
+        same as for :meth:`IndividualTable.add_row`.
+
+        :return: The ID of the new individual.
+        :rtype: int
+        """
+        return self._add(
+            {
+                "flags": flags,
+                "location": location,
+                "parents": parents,
+                "metadata": metadata,
+            }
+        )
+
+
+class NodeTableBuilder(TableBuilder):
+    """
+    A :class:`TableBuilder` for a :class:`NodeTable`.
+    """
+
+    columns = {
+        "flags": np.uint32,
+        "time": np.float64,
+        "population": np.int32,
+        "individual": np.int32,
+    }
+    ragged_columns = {"metadata": np.int8}
+
+    def add_row(self, flags=0, time=0, population=-1, individual=-1, metadata=None):
+        """
+        Buffers a new node and returns its ID. The parameters are the
+        same as for :meth:`NodeTable.add_row`.
+
+        :return: The ID of the new node.
+        :rtype: int
+        """
+        return self._add(
+            {
+                "flags": flags,
+                "time": time,
+                "population": population,
+                "individual": individual,
+                "metadata": metadata,
+            }
+        )
+
+
+class EdgeTableBuilder(TableBuilder):
+    """
+    A :class:`TableBuilder` for an :class:`EdgeTable`.
+    """
+
+    columns = {
+        "left": np.float64,
+        "right": np.float64,
+        "parent": np.int32,
+        "child": np.int32,
+    }
+    ragged_columns = {"metadata": np.int8}
+
+    def add_row(self, left, right, parent, child, metadata=None):
+        """
+        Buffers a new edge and returns its ID. The parameters are the
+        same as for :meth:`EdgeTable.add_row`.
+
+        :return: The ID of the new edge.
+        :rtype: int
+        """
+        return self._add(
+            {
+                "left": left,
+                "right": right,
+                "parent": parent,
+                "child": child,
+                "metadata": metadata,
+            }
+        )
+
+
+class MigrationTableBuilder(TableBuilder):
+    """
+    A :class:`TableBuilder` for a :class:`MigrationTable`.
+    """
+
+    columns = {
+        "left": np.float64,
+        "right": np.float64,
+        "node": np.int32,
+        "source": np.int32,
+        "dest": np.int32,
+        "time": np.float64,
+    }
+    ragged_columns = {"metadata": np.int8}
+
+    def add_row(self, left, right, node, source, dest, time, metadata=None):
+        """
+        Buffers a new migration and returns its ID. The parameters are the
+        same as for :meth:`MigrationTable.add_row`.
+
+        :return: The ID of the new migration.
+        :rtype: int
+        """
+        return self._add(
+            {
+                "left": left,
+                "right": right,
+                "node": node,
+                "source": source,
+                "dest": dest,
+                "time": time,
+                "metadata": metadata,
+            }
+        )
+
+
+class SiteTableBuilder(TableBuilder):
+    """
+    A :class:`TableBuilder` for a :class:`SiteTable`.
+    """
+
+    columns = {"position": np.float64}
+    ragged_columns = {"ancestral_state": np.int8, "metadata": np.int8}
+
+    def add_row(self, position, ancestral_state, metadata=None):
+        """
+        Buffers a new site and returns its ID. The parameters are the
+        same as for :meth:`SiteTable.add_row`.
+
+        :return: The ID of the new site.
+        :rtype: int
+        """
+        return self._add(
+            {
+                "position": position,
+                "ancestral_state": ancestral_state,
+                "metadata": metadata,
+            }
+        )
+
+
+class MutationTableBuilder(TableBuilder):
+    """
+    A :class:`TableBuilder` for a :class:`MutationTable`.
+    """
+
+    columns = {
+        "site": np.int32,
+        "node": np.int32,
+        "time": np.float64,
+        "parent": np.int32,
+    }
+    ragged_columns = {"derived_state": np.int8, "metadata": np.int8}
+
+    def add_row(self, site, node, derived_state, parent=-1, metadata=None, time=None):
+        """
+        Buffers a new mutation and returns its ID. The parameters are the
+        same as for :meth:`MutationTable.add_row`.
+
+        :return: The ID of the new mutation.
+        :rtype: int
+        """
+        return self._add(
+            {
+                "site": site,
+                "node": node,
+                "time": UNKNOWN_TIME if time is None else time,
+                "parent": parent,
+                "derived_state": derived_state,
+                "metadata": metadata,
+            }
+        )
+
+
+class PopulationTableBuilder(TableBuilder):
+    """
+    A :class:`TableBuilder` for a :class:`PopulationTable`.
+    """
+
+    ragged_columns = {"metadata": np.int8}
+
+    def add_row(self, metadata=None):
+        """
+        Buffers a new population and returns its ID. The parameters are the
+        same as for :meth:`PopulationTable.add_row`.
+
+        :return: The ID of the new population.
+        :rtype: int
+        """
+        return self._add({"metadata": metadata})
+
+
 class BaseTable:
     """
     Superclass of high-level tables. Not intended for direct instantiation.
@@ -707,12 +1067,29 @@ class MetadataTable(BaseTable):
     # low-level get/set metadata schemas functionality). We should refactor
     # this so we're only doing it in one place.
     # https://github.com/tskit-dev/tskit/issues/1957
+
+    # The TableBuilder subclass for the table. Must be set by subclasses.
+    builder_class = None
+
     def __init__(self, ll_table, row_class):
         super().__init__(ll_table, row_class)
 
     def _make_row(self, *args):
         return self.row_class(*args, metadata_decoder=self.metadata_schema.decode_row)
 
+    def builder(self, buffer_size=None):
+        """
+        Returns a :class:`TableBuilder` for this table, which buffers new rows
+        and appends them to the table in large batches. This is much faster
+        than calling ``add_row`` on the table when adding large numbers of rows.
+
+        :param int buffer_size: The number of rows to buffer before they are
+            appended to the table. (Default: 65536)
+        :return: A builder for this table.
+        :rtype: TableBuilder
+        """
+        return self.builder_class(self, buffer_size)
+
     def packset_metadata(self, metadatas):
         """
         Packs the specified list of metadata values and updates the ``metadata``
@@ -727,6 +1104,61 @@ class MetadataTable(BaseTable):
         d["metadata_offset"] = offset
         self.set_columns(**d)
 
+    def structured_metadata(self):
+        """
+        Returns the metadata of every row as a numpy structured array, for
+        tables whose :attr:`.metadata_schema` uses the ``struct`` codec with
+        fixed size properties (see :meth:`MetadataSchema.numpy_dtype`). The
+        array is a view of a copy of the ``metadata`` column, so no per-row
+        decoding is performed. Individual properties can be accessed as
+        columns of the result, e.g. ``table.structured_metadata()["x"]``.
+        Modifying the returned array does not change the table.
+
+        :return: A structured array with one element per row of the table.
+        :rtype: numpy.ndarray
+        :raises ValueError: If the schema does not have a numpy dtype, or if
+            a row does not contain exactly one encoded metadata value.
+        """
+        dtype = self.metadata_schema.numpy_dtype()
+        if np.any(np.diff(self.metadata_offset) != dtype.itemsize):
+            raise ValueError(
+                f"Every row must have {dtype.itemsize} bytes of metadata to be "
+                "viewed as a structured array"
+            )
+        if dtype.itemsize == 0:
+            return np.zeros(self.num_rows, dtype=dtype)
+        return self.metadata.view(dtype)
+
+    def packset_structured_metadata(self, values):
+        """
+        Sets the metadata of every row from a numpy structured array (or any
+        sequence of tuples that can be converted to one) with the dtype given
+        by the :meth:`MetadataSchema.numpy_dtype` of this table's schema,
+        and updates the ``metadata`` and ``metadata_offset`` columns. This
+        is equivalent to encoding each value with the schema and calling
+        :meth:`.packset_metadata`, but is performed in bulk. Fields are
+        assigned by position, and the values are not validated against
+        the schema. The length of the values array must be equal to the
+        number of rows in the table.
+
+        :param numpy.ndarray values: The structured array of metadata values.
+        """
+        dtype = self.metadata_schema.numpy_dtype()
+        if len(values) != self.num_rows:
+            raise ValueError(
+                f"Length of values ({len(values)}) must equal the number "
+                f"of rows ({self.num_rows})"
+            )
+        # Start from zeros so that any padding bytes are encoded as nulls
+        packed = np.zeros(self.num_rows, dtype=dtype)
+        packed[:] = values
+        d = self.asdict()
+        d["metadata"] = packed.view(np.int8)
+        d["metadata_offset"] = (
+            np.arange(self.num_rows + 1, dtype=np.uint64) * dtype.itemsize
+        )
+        self.set_columns(**d)
+
     @property
     def metadata_schema(self) -> metadata.MetadataSchema:
         """
@@ -747,6 +1179,73 @@ class MetadataTable(BaseTable):
             )
         self.ll_table.metadata_schema = repr(schema)
 
+    def _structured_metadata_vector(self, key, dtype):
+        # Fast path for numeric properties of fixed size struct metadata, which
+        # are read directly from the metadata column rather than decoding rows.
+        try:
+            values = self.structured_metadata()
+        except ValueError:
+            return None
+        for k in key if isinstance(key, list) else [key]:
+            if values.dtype.names is None or k not in values.dtype.names:
+                return None
+            values = values[k]
+        if values.dtype.kind not in "biuf":
+            return None
+        if dtype is None:
+            # Match the dtype numpy gives to the equivalent list of decoded values
+            dtype = values.dtype
+            if dtype.kind == "f":
+                dtype = np.float64
+            elif dtype.kind in "iu" and dtype != np.uint64:
+                dtype = np.int64
+        return np.array(values, dtype=dtype)
+
+    def _json_metadata_vector(self, key, dtype, getter):
+        # Fast path for JSON metadata. The values at the key path are extracted
+        # by scanning the metadata column in C, without holding the GIL, and
+        # only the rows that the scanner cannot handle (such as missing keys,
+        # non-numeric values or malformed JSON) are decoded, so that any errors
+        # are raised by the JSON codec as for the row metadata.
+        schema = self.metadata_schema
+        keys = key if isinstance(key, list) else [key]
+        if (
+            not isinstance(schema._codec, metadata.JSONCodec)
+            or len(keys) == 0
+            or not all(isinstance(k, str) for k in keys)
+            or self.num_rows == 0
+        ):
+            return None
+        data = self.metadata
+        offset = self.metadata_offset
+        values, kinds = _tskit.extract_json_values(
+            data, offset, tuple(k.encode() for k in keys)
+        )
+        decode = np.flatnonzero(kinds == _tskit.JSON_VALUE_DECODE)
+        if len(decode) == 0:
+            if dtype is None:
+                # Match the dtype numpy gives to the equivalent list of values
+                if np.any(kinds == _tskit.JSON_VALUE_FLOAT):
+                    return values
+                if np.any(kinds == _tskit.JSON_VALUE_INTEGER):
+                    return values.astype(np.int64)
+                return values.astype(bool)
+            # Values that do not fit in an int64 go through the slow path,
+            # which raises an OverflowError rather than wrapping around.
+            if np.dtype(dtype) in (np.float64, np.bool_) or (
+                np.dtype(dtype) == np.int64 and np.all(np.abs(values) < 2**63)
+            ):
+                return values.astype(dtype)
+        out = values.tolist()
+        for j in np.flatnonzero(kinds == _tskit.JSON_VALUE_INTEGER):
+            out[j] = int(out[j])
+        for j in np.flatnonzero(kinds == _tskit.JSON_VALUE_BOOLEAN):
+            out[j] = bool(out[j])
+        for j in decode:
+            row_metadata = schema.decode_row(data[offset[j] : offset[j + 1]].tobytes())
+            out[j] = reduce(getter, keys, row_metadata)
+        return np.array(out, dtype=dtype)
+
     def metadata_vector(self, key, *, dtype=None, default_value=NOTSET):
         """
         Returns a numpy array of metadata values obtained by extracting ``key``
@@ -761,6 +1260,14 @@ class MetadataTable(BaseTable):
             is not present. Note that for numeric columns, a default value of None
             will result in a non-numeric array. The default behaviour is to raise
             ``KeyError`` on missing entries.
+
+        For tables with ``json`` codec metadata, numeric and boolean values are
+        read by scanning the whole metadata column in a single pass in C, and
+        only the rows for which this is not possible are decoded. As the
+        scan does not hold the GIL, vectors for several tables or keys can
+        be extracted concurrently from different threads. For fixed size
+        ``struct`` codec metadata, numeric values are read directly from the
+        column (see :meth:`.structured_metadata`).
         """
 
         if default_value == NOTSET:
@@ -775,6 +1282,12 @@ class MetadataTable(BaseTable):
                     d.get(k, default_value) if isinstance(d, Mapping) else default_value
                 )
 
+        values = self._structured_metadata_vector(key, dtype)
+        if values is None:
+            values = self._json_metadata_vector(key, dtype, getter)
+        if values is not None:
+            return values
+
         if isinstance(key, list):
             out = np.array(
                 [
@@ -838,6 +1351,7 @@ class IndividualTable(MetadataTable):
         "metadata",
         "metadata_offset",
     ]
+    builder_class = IndividualTableBuilder
 
     def __init__(self, max_rows_increment=0, ll_table=None):
         if ll_table is None:
@@ -1111,6 +1625,7 @@ class NodeTable(MetadataTable):
         "metadata",
         "metadata_offset",
     ]
+    builder_class = NodeTableBuilder
 
     def __init__(self, max_rows_increment=0, ll_table=None):
         if ll_table is None:
@@ -1305,6 +1820,7 @@ class EdgeTable(MetadataTable):
         "metadata",
         "metadata_offset",
     ]
+    builder_class = EdgeTableBuilder
 
     def __init__(self, max_rows_increment=0, ll_table=None):
         if ll_table is None:
@@ -1520,6 +2036,7 @@ class MigrationTable(MetadataTable):
         "metadata",
         "metadata_offset",
     ]
+    builder_class = MigrationTableBuilder
 
     def __init__(self, max_rows_increment=0, ll_table=None):
         if ll_table is None:
@@ -1733,6 +2250,7 @@ class SiteTable(MetadataTable):
         "metadata",
         "metadata_offset",
     ]
+    builder_class = SiteTableBuilder
 
     def __init__(self, max_rows_increment=0, ll_table=None):
         if ll_table is None:
@@ -1949,6 +2467,7 @@ class MutationTable(MetadataTable):
         "metadata",
         "metadata_offset",
     ]
+    builder_class = MutationTableBuilder
 
     def __init__(self, max_rows_increment=0, ll_table=None):
         if ll_table is None:
@@ -2212,6 +2731,7 @@ class PopulationTable(MetadataTable):
     """
 
     column_names = ["metadata", "metadata_offset"]
+    builder_class = PopulationTableBuilder
 
     def __init__(self, max_rows_increment=0, ll_table=None):
         if ll_table is None:
@@ -2633,6 +3153,37 @@ class IdentitySegmentList(collections.abc.Iterable, collections.abc.Sized):
         return self._ll_segment_list.node
 
 
+class IdentitySegmentArrays(NamedTuple):
+    """
+    IBD segments in columnar form, as returned by
+    :meth:`.IdentitySegments.arrays` and passed to the sink of
+    :meth:`.TreeSequence.ibd_segments_stream`. Row ``j`` describes a segment
+    ``[left[j], right[j])`` shared by the sample nodes ``a[j] < b[j]``, whose
+    MRCA over the segment is ``node[j]``.
+    """
+
+    a: np.ndarray
+    """
+    A numpy array (dtype=np.int32) of the first node in each sample pair.
+    """
+    b: np.ndarray
+    """
+    A numpy array (dtype=np.int32) of the second node in each sample pair.
+    """
+    left: np.ndarray
+    """
+    A numpy array (dtype=np.float64) of the ``left`` coordinates of segments.
+    """
+    right: np.ndarray
+    """
+    A numpy array (dtype=np.float64) of the ``right`` coordinates of segments.
+    """
+    node: np.ndarray
+    """
+    A numpy array (dtype=np.int32) of the MRCA node IDs in segments.
+    """
+
+
 class IdentitySegments(collections.abc.Mapping):
     """
     A class summarising and optionally storing the segments of identity
@@ -2732,6 +3283,49 @@ class IdentitySegments(collections.abc.Mapping):
     def __len__(self):
         return self.num_pairs
 
+    def arrays(self):
+        """
+        Returns all of the stored segments as an :class:`.IdentitySegmentArrays`
+        instance of numpy arrays, with one entry per segment. Segments are
+        ordered by sample pair, in the same order as :attr:`.pairs`, and
+        then by the order in which they were found. This is much more
+        efficient than iterating over the :class:`.IdentitySegmentList`
+        for each pair when there are many segments. (Only available when
+        ``store_segments`` is specified).
+
+        :return: The stored segments in columnar form.
+        :rtype: IdentitySegmentArrays
+        """
+        return IdentitySegmentArrays(*self._ll_identity_segments.get_arrays())
+
+    def span_matrix(self, sample_sets):
+        """
+        Returns a ``(k, k)`` numpy array whose ``[i, j]`` entry is the total
+        span of the segments found between pairs of nodes such that one node
+        is in ``sample_sets[i]`` and the other in ``sample_sets[j]``. The
+        diagonal entries give the total span of segments between pairs of
+        nodes within each set. Passing each sample in its own set gives the
+        total IBD span of each pair of samples; passing the nodes of each
+        individual as a set gives the pairwise sums over individuals. Pairs
+        involving nodes not in any of the sets are ignored. (Only available
+        when ``store_pairs`` or ``store_segments`` is specified).
+
+        :param list[list] sample_sets: A list of ``k`` disjoint lists of node IDs.
+        :return: The matrix of total IBD span between sample sets.
+        :rtype: numpy.ndarray
+        """
+        sample_set_sizes = np.array(
+            [len(sample_set) for sample_set in sample_sets], dtype=np.uint64
+        )
+        pre_flattened = [lst for lst in sample_sets if len(lst) > 0]
+        if len(pre_flattened) == 0:
+            flattened = []
+        else:
+            flattened = util.safe_np_int_cast(np.hstack(pre_flattened), np.int32)
+        return self._ll_identity_segments.get_span_matrix(
+            sample_set_sizes=sample_set_sizes, sample_sets=flattened
+        )
+
 
 # TODO move to reference_sequence.py when we start adding more functionality.
 class ReferenceSequence(metadata.MetadataProvider):
@@ -3543,7 +4137,7 @@ class TableCollection(metadata.MetadataProvider):
         # A deprecated alias for link_ancestors()
         return self.link_ancestors(*args, **kwargs)
 
-    def sort(self, edge_start=0, *, site_start=0, mutation_start=0):
+    def sort(self, edge_start=0, *, site_start=0, mutation_start=0, num_threads=0):
         """
         Sorts the tables in place. This ensures that all tree sequence ordering
         requirements listed in the
@@ -3560,6 +4154,14 @@ class TableCollection(metadata.MetadataProvider):
         in their retrospective tables then neither is sorted. Note that a partial
         non-sorting is not possible, and both or neither must be skipped.
 
+        It is not necessary to specify these parameters when rows have been
+        appended to already sorted tables: the longest sorted prefix of the
+        edge, site and mutation tables is detected automatically, and only the
+        rows that follow it are sorted and then merged with the prefix in
+        linear time. Repeatedly sorting tables that grow by appending (for
+        example, between calls to :meth:`.simplify` in a forward-time
+        simulation) is therefore much cheaper than a full sort.
+
         The node, individual, population and provenance tables are not affected
         by this method.
 
@@ -3598,8 +4200,15 @@ class TableCollection(metadata.MetadataProvider):
             (default=0; must be one of [0, len(sites)]).
         :param int mutation_start: The index in the mutation table where sorting starts
             (default=0; must be one of [0, len(mutations)]).
-        """
-        self._ll_tables.sort(edge_start, site_start, mutation_start)
+        :param int num_threads: The number of threads to use. If this is <= 1
+            the tables are sorted in the calling thread; otherwise, the edges
+            and mutations are split into ``num_threads`` blocks which are
+            sorted concurrently and then merged. The output is identical to
+            the single threaded sort. (Default: 0)
+        """
+        self._ll_tables.sort(
+            edge_start, site_start, mutation_start, num_threads=num_threads
+        )
         # TODO add provenance
 
     def sort_individuals(self):
@@ -4022,12 +4631,37 @@ class TableCollection(metadata.MetadataProvider):
         """
         return bool(self._ll_tables.has_index())
 
-    def build_index(self):
+    def has_tree_checkpoints(self):
+        """
+        Returns True if this TableCollection is indexed and has tree checkpoints.
+        See :meth:`.build_index` for details.
+        """
+        return bool(self._ll_tables.has_tree_checkpoints())
+
+    def build_index(self, *, tree_checkpoint_interval=None):
         """
         Builds an index on this TableCollection. Any existing indexes are automatically
         dropped.  See :ref:`sec_table_indexes` for information on indexes.
-        """
-        self._ll_tables.build_index()
+
+        If ``tree_checkpoint_interval`` is specified, we also store the
+        edges present in every ``tree_checkpoint_interval``-th tree along
+        the genome. These tree checkpoints are saved along with the other
+        indexes by :meth:`.dump`, and allow :meth:`Tree.seek` and
+        :meth:`Tree.seek_index` to jump to an arbitrary tree by
+        restoring the nearest preceding checkpoint and applying at most
+        ``tree_checkpoint_interval - 1`` edge diffs, rather than iterating
+        from the current tree. Smaller intervals give faster seeks at the
+        cost of more storage. Checkpoints are dropped along with the other
+        indexes when the tables are modified (e.g., by :meth:`.sort`), and
+        are not included in :meth:`.asdict` or :meth:`.copy`.
+
+        :param int tree_checkpoint_interval: The number of trees between
+            successive tree checkpoints. If None (the default) or zero,
+            no tree checkpoints are stored.
+        """
+        if tree_checkpoint_interval is None:
+            tree_checkpoint_interval = 0
+        self._ll_tables.build_index(tree_checkpoint_interval=tree_checkpoint_interval)
 
     def drop_index(self):
         """
@@ -4213,3 +4847,214 @@ class TableCollection(metadata.MetadataProvider):
             store_pairs=store_pairs,
             store_segments=store_segments,
         )
+
+    def ibd_segments_stream(
+        self,
+        sink,
+        *,
+        within=None,
+        between=None,
+        max_time=None,
+        min_span=None,
+        num_partitions=None,
+        num_threads=0,
+        buffer_size=None,
+    ):
+        """
+        Equivalent to the :meth:`TreeSequence.ibd_segments_stream` method;
+        please see its documentation for more details, and use this method only
+        if you specifically need to work with a :class:`TableCollection` object.
+        The same data requirements as for :meth:`TableCollection.ibd_segments`
+        apply.
+
+        :param callable sink: As for the :meth:`TreeSequence.ibd_segments_stream`
+            method.
+        :param list within: As for the :meth:`TreeSequence.ibd_segments` method.
+        :param list[list] between: As for the :meth:`TreeSequence.ibd_segments`
+            method.
+        :param float max_time: As for the :meth:`TreeSequence.ibd_segments` method.
+        :param float min_span: As for the :meth:`TreeSequence.ibd_segments` method.
+        :param int num_partitions: As for the
+            :meth:`TreeSequence.ibd_segments_stream` method.
+        :param int num_threads: As for the
+            :meth:`TreeSequence.ibd_segments_stream` method.
+        :param int buffer_size: As for the
+            :meth:`TreeSequence.ibd_segments_stream` method.
+        """
+        max_time = np.inf if max_time is None else max_time
+        min_span = 0 if min_span is None else min_span
+        num_partitions = 1 if num_partitions is None else num_partitions
+        buffer_size = 2**16 if buffer_size is None else buffer_size
+        if not callable(sink):
+            raise TypeError("sink must be callable")
+        if num_partitions < 1:
+            raise ValueError("num_partitions must be >= 1")
+        if within is not None and between is not None:
+            raise ValueError(
+                "The ``within`` and ``between`` arguments are mutually exclusive"
+            )
+
+        def partition(samples):
+            samples = util.safe_np_int_cast(samples, np.int32)
+            chunks = np.array_split(samples, min(num_partitions, max(1, len(samples))))
+            return [chunk for chunk in chunks if len(chunk) > 0]
+
+        # Every pair of samples is either within one chunk or between two
+        # distinct chunks, so the union of these tasks finds each pair's
+        # segments exactly once.
+        tasks = []
+        if between is not None:
+            sample_sets = [partition(sample_set) for sample_set in between]
+            for k in range(len(sample_sets)):
+                for j in range(k + 1, len(sample_sets)):
+                    for chunk_a in sample_sets[k]:
+                        for chunk_b in sample_sets[j]:
+                            tasks.append((None, [chunk_a, chunk_b]))
+        else:
+            if within is None:
+                within = np.flatnonzero(
+                    np.bitwise_and(self.nodes.flags, _tskit.NODE_IS_SAMPLE)
+                )
+            chunks = partition(within)
+            for k in range(len(chunks)):
+                tasks.append((chunks[k], None))
+                for j in range(k + 1, len(chunks)):
+                    tasks.append((None, [chunks[k], chunks[j]]))
+
+        lock = threading.Lock()
+
+        def ll_sink(a, b, left, right, node):
+            with lock:
+                sink(IdentitySegmentArrays(a, b, left, right, node))
+
+        def run(task):
+            samples, sample_sets = task
+            if sample_sets is None:
+                self._ll_tables.ibd_segments_within(
+                    samples=samples,
+                    max_time=max_time,
+                    min_span=min_span,
+                    sink=ll_sink,
+                    buffer_size=buffer_size,
+                )
+            else:
+                self._ll_tables.ibd_segments_between(
+                    sample_set_sizes=np.array(
+                        [len(sample_set) for sample_set in sample_sets],
+                        dtype=np.uint64,
+                    ),
+                    sample_sets=np.hstack(sample_sets),
+                    max_time=max_time,
+                    min_span=min_span,
+                    sink=ll_sink,
+                    buffer_size=buffer_size,
+                )
+
+        for _ in util.threaded_map(run, tasks, num_threads=num_threads):
+            pass
+
+
+class Simplifier:
+    """
+    A persistent simplifier for the repeated simplification of a
+    :class:`TableCollection` that is being added to, as in a forward-time
+    simulation. Each call to :meth:`.simplify` sorts and simplifies the
+    tables in place, with a result identical to calling
+    :meth:`TableCollection.sort` followed by :meth:`TableCollection.simplify`
+    with the same options. However, rather than merging the ancestry of
+    every node in the tables each time, the simplifier keeps track of the
+    output of the previous call and only merges the ancestry of nodes that
+    are affected by rows added since then. Similarly, only the rows added
+    since the previous call are checked for integrity, and only the edges
+    added since then are sorted before being merged into the already sorted
+    output of that call. Each call still copies and renumbers all of the
+    retained rows, however, so its cost grows with the size of the tables
+    and not only with the number of rows added since the previous call.
+
+    Between calls to :meth:`.simplify`, new rows may be added to any of
+    the tables, but existing rows must not be modified or removed.
+
+    .. code-block:: python
+
+        tables = tskit.TableCollection(sequence_length=1e6)
+        simplifier = tskit.Simplifier(tables)
+        for generation in range(num_generations):
+            # ... add nodes and edges for the new generation to tables
+            node_map = simplifier.simplify(alive)
+            alive = node_map[alive]
+
+    The ``reduce_to_site_topology`` and ``keep_input_roots`` options of
+    :meth:`TableCollection.simplify` are not supported, and no provenance
+    record is added to the tables.
+
+    :param TableCollection tables: The table collection to simplify in place.
+    :param bool filter_populations: If True, remove any populations that are
+        not referenced by nodes after simplification. (Default: True)
+    :param bool filter_individuals: If True, remove any individuals that are
+        not referenced by nodes after simplification. (Default: True)
+    :param bool filter_sites: If True, remove any sites that are
+        not referenced by mutations after simplification. (Default: True)
+    :param bool filter_nodes: If True, remove any nodes that are
+        not referenced by edges after simplification. (Default: True)
+    :param bool update_sample_flags: If True, update node flags so that only
+        the nodes in the specified list of samples have the NODE_IS_SAMPLE
+        flag after simplification. (Default: True)
+    :param bool keep_unary: If True, preserve unary nodes that exist on the
+        path from samples to root. (Default: False)
+    :param bool keep_unary_in_individuals: If True, preserve unary nodes
+        that exist on the path from samples to root, but only if they are
+        associated with an individual. (Default: False)
+    """
+
+    def __init__(
+        self,
+        tables,
+        *,
+        filter_populations=True,
+        filter_individuals=True,
+        filter_sites=True,
+        filter_nodes=True,
+        update_sample_flags=True,
+        keep_unary=False,
+        keep_unary_in_individuals=False,
+    ):
+        self._tables = tables
+        self._ll_simplifier = _tskit.Simplifier(
+            tables._ll_tables,
+            filter_sites=filter_sites,
+            filter_individuals=filter_individuals,
+            filter_populations=filter_populations,
+            filter_nodes=filter_nodes,
+            update_sample_flags=update_sample_flags,
+            keep_unary=keep_unary,
+            keep_unary_in_individuals=keep_unary_in_individuals,
+        )
+
+    @property
+    def tables(self):
+        """
+        The :class:`TableCollection` that is simplified in place.
+        """
+        return self._tables
+
+    def simplify(self, samples=None):
+        """
+        Sorts and simplifies the tables in place to retain only the
+        information necessary to reconstruct the tree sequence describing
+        the given ``samples``. See :meth:`TableCollection.simplify` for
+        details.
+
+        :param list[int] samples: A list of node IDs to retain as samples.
+            If not specified or None, use all nodes marked with the IS_SAMPLE
+            flag.
+        :return: A numpy array mapping node IDs in the input tables to their
+            corresponding node IDs in the output tables.
+        :rtype: numpy.ndarray (dtype=np.int32)
+        """
+        if samples is None:
+            samples = np.where(
+                np.bitwise_and(self._tables.nodes.flags, _tskit.NODE_IS_SAMPLE) != 0
+            )[0].astype(np.int32)
+        else:
+            samples = util.safe_np_int_cast(samples, np.int32)
+        return self._ll_simplifier.run(samples)
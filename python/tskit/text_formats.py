@@ -196,6 +196,7 @@ def write_fasta(
     wrap_width,
     reference_sequence,
     missing_data_character,
+    num_threads=0,
 ):
     # See TreeSequence.write_fasta for documentation
     if wrap_width < 0 or int(wrap_width) != wrap_width:
@@ -208,6 +209,7 @@ def write_fasta(
     alignments = ts.alignments(
         reference_sequence=reference_sequence,
         missing_data_character=missing_data_character,
+        num_threads=num_threads,
     )
     for u, alignment in zip(ts.samples(), alignments):
         print(">", f"n{u}", sep="", file=output)
@@ -34,6 +34,7 @@ import io
 import itertools
 import math
 import numbers
+import threading
 import warnings
 from dataclasses import dataclass
 from typing import Any
@@ -97,6 +98,24 @@ class EdgeDiff(NamedTuple):
     edges_in: list
 
 
+class EdgeDiffArrays(NamedTuple):
+    left: np.ndarray
+    right: np.ndarray
+    edges_out: np.ndarray
+    edges_out_offset: np.ndarray
+    edges_in: np.ndarray
+    edges_in_offset: np.ndarray
+
+
+class TreeMetrics(NamedTuple):
+    total_branch_length: np.ndarray
+    num_roots: np.ndarray
+    tmrca: np.ndarray
+    sackin_index: np.ndarray
+    colless_index: np.ndarray
+    b1_index: np.ndarray
+
+
 def store_tree_sequence(cls):
     wrapped_init = cls.__init__
 
@@ -820,6 +839,10 @@ class Tree:
 
         .. include:: substitutions/linear_traversal_warning.rst
 
+        If the tree sequence was built from tables with tree checkpoints
+        (see :meth:`TableCollection.build_index`), seeking restores the
+        nearest preceding checkpoint when that is cheaper than moving
+        from the current tree.
 
         :param int index: The tree index to seek to.
         :raises IndexError: If an index outside the acceptable range is provided.
@@ -829,12 +852,7 @@ class Tree:
             index += num_trees
         if index < 0 or index >= num_trees:
             raise IndexError("Index out of bounds")
-        # This should be implemented in C efficiently using the indexes.
-        # No point in complicating the current implementation by trying
-        # to seek from the correct direction.
-        self.first()
-        while self.index != index:
-            self.next()
+        self._ll_tree.seek_index(index)
 
     def seek(self, position):
         """
@@ -845,6 +863,11 @@ class Tree:
 
         .. include:: substitutions/linear_traversal_warning.rst
 
+        If the tree sequence was built from tables with tree checkpoints
+        (see :meth:`TableCollection.build_index`), seeking restores the
+        nearest preceding checkpoint when that is cheaper than moving
+        from the current tree.
+
         :param float position: The position along the sequence length to
             seek to.
         :raises ValueError: If 0 < position or position >=
@@ -1015,6 +1038,43 @@ class Tree:
                 break
         return mrca
 
+    def mrca_array(self, u, v):
+        """
+        Returns the most recent common ancestor of each pair of nodes in the
+        specified arrays, as a numpy array of node IDs with the shape of
+        ``u`` and ``v`` broadcast together. The MRCA of a pair of nodes that
+        do not share a common ancestor is :data:`tskit.NULL`. This is equivalent
+        to calling :meth:`.mrca` for each pair of nodes, but an index of the tree
+        is built once so that each pair is answered in constant time, making this
+        much faster when there are many pairs.
+
+        :param array_like u: The first node in each pair.
+        :param array_like v: The second node in each pair.
+        :return: The most recent common ancestor of each pair of nodes.
+        :rtype: numpy.ndarray (dtype=np.int32)
+        """
+        u, v = np.broadcast_arrays(
+            util.safe_np_int_cast(u, np.int32), util.safe_np_int_cast(v, np.int32)
+        )
+        mrca = self._ll_tree.get_mrcas(u.ravel(), v.ravel())
+        return mrca.reshape(u.shape)
+
+    def tmrca_array(self, u, v):
+        """
+        Returns the time of the most recent common ancestor of each pair of nodes
+        in the specified arrays (see :meth:`.mrca_array`). The value for a pair
+        of nodes that do not share a common ancestor is NaN.
+
+        :param array_like u: The first node in each pair.
+        :param array_like v: The second node in each pair.
+        :return: The time of the most recent common ancestor of each pair of nodes.
+        :rtype: numpy.ndarray (dtype=np.float64)
+        """
+        mrca = self.mrca_array(u, v)
+        # The virtual root has infinite time and NULL gives NaN
+        time = np.append(self.tree_sequence.nodes_time, [np.inf, np.nan])
+        return time[np.where(mrca == tskit.NULL, len(time) - 1, mrca)]
+
     def get_tmrca(self, u, v):
         # Deprecated alias for tmrca
         return self.tmrca(u, v)
@@ -3266,7 +3326,7 @@ class Tree:
         )
 
 
-def load(file, *, skip_tables=False, skip_reference_sequence=False):
+def load(file, *, skip_tables=False, skip_reference_sequence=False, mmap=False):
     """
     Return a :class:`TreeSequence` instance loaded from the specified file object or
     path. The file must be in the
@@ -3285,12 +3345,26 @@ def load(file, *, skip_tables=False, skip_reference_sequence=False):
         sequence object.
     :param bool skip_reference_sequence: If True, the tree sequence is read
         without loading its reference sequence.
+    :param bool mmap: If True, memory map the file and use the mapped data
+        directly for the table columns rather than reading them into memory.
+        Column arrays such as :attr:`TreeSequence.nodes_time` are then
+        read-only views of the mapping, so several processes loading the
+        same file share its pages in the operating system's cache, and
+        only the parts of the file that are accessed are read from disk.
+        Columns that are not needed are therefore never loaded; see
+        :meth:`TreeSequence.column_residency`.
+        The file must not be modified while the tree sequence is in use.
+        If the file cannot be memory mapped (for example, if it is a pipe
+        or socket, or on Windows), it is read into memory as usual.
     :return: The tree sequence object containing the information
         stored in the specified file path.
     :rtype: :class:`tskit.TreeSequence`
     """
     return TreeSequence.load(
-        file, skip_tables=skip_tables, skip_reference_sequence=skip_reference_sequence
+        file,
+        skip_tables=skip_tables,
+        skip_reference_sequence=skip_reference_sequence,
+        mmap=mmap,
     )
 
 
@@ -4083,7 +4157,14 @@ class TreeSequence:
         return [tree.copy() for tree in self.trees(**kwargs)]
 
     @classmethod
-    def load(cls, file_or_path, *, skip_tables=False, skip_reference_sequence=False):
+    def load(
+        cls,
+        file_or_path,
+        *,
+        skip_tables=False,
+        skip_reference_sequence=False,
+        mmap=False,
+    ):
         file, local_file = util.convert_file_like_to_open_file(file_or_path, "rb")
         try:
             ts = _tskit.TreeSequence()
@@ -4091,6 +4172,7 @@ class TreeSequence:
                 file,
                 skip_tables=skip_tables,
                 skip_reference_sequence=skip_reference_sequence,
+                mmap=mmap,
             )
             return TreeSequence(ts)
         except tskit.FileFormatError as e:
@@ -4144,6 +4226,28 @@ class TreeSequence:
         """
         return bool(self._ll_tree_sequence.has_reference_sequence())
 
+    def column_residency(self):
+        """
+        Returns a dictionary describing which columns of a tree sequence
+        loaded with ``mmap=True`` (see :func:`tskit.load`) are resident in
+        memory. Memory mapped columns are only read from the file when they
+        are first accessed, so that, for example, iterating over the trees
+        reads the node and edge columns but not the mutation derived states
+        or metadata. Each key is the name of an array in the
+        :ref:`file format<sec_tree_sequence_file_format>` (e.g.
+        ``"mutations/derived_state"``) and maps to a tuple
+        ``(resident_bytes, total_bytes)``. Residency is determined by the
+        operating system, so pages read by other processes may also be
+        reported as resident, and pages may be evicted when memory is
+        short. If the tree sequence was not memory mapped, all of its data
+        is in memory and an empty dictionary is returned.
+
+        :return: A dictionary mapping column names to the number of bytes
+            resident in memory and the total number of bytes.
+        :rtype: dict
+        """
+        return self._ll_tree_sequence.get_column_residency()
+
     @property
     def tables_dict(self):
         """
@@ -4156,21 +4260,18 @@ class TreeSequence:
     @property
     def tables(self):
         """
-        Returns the :class:`tables<TableCollection>` underlying this tree
-        sequence, intended for read-only access. See :meth:`.dump_tables` if you wish
-        to modify the tables.
-
-        .. warning:: This property currently returns a copy of the tables
-            underlying a tree sequence but it may return a read-only
-            **view** in the future. Thus, if the tables will subsequently be
-            updated, please use the :meth:`.dump_tables` method instead as
-            this will always return a new copy of the TableCollection.
+        Returns a read-only **view** of the :class:`tables<TableCollection>`
+        underlying this tree sequence. No data is copied: the column arrays
+        of the returned tables are read-only numpy arrays referring directly
+        to the memory of the tree sequence, and any attempt to modify the
+        tables raises an :class:`AttributeError`. See :meth:`.dump_tables`
+        if you wish to modify the tables.
 
-        :return: A :class:`TableCollection` containing all a copy of the
+        :return: A read-only :class:`TableCollection` view of the
             tables underlying this tree sequence.
         :rtype: TableCollection
         """
-        return self.dump_tables()
+        return tables.TableCollection(ll_tables=self._ll_tree_sequence.tables)
 
     @property
     def nbytes(self):
@@ -4671,113 +4772,9 @@ class TreeSequence:
             edgeset.children = sorted(children[edgeset.parent])
             yield edgeset
 
-    def _edge_diffs_forward(self, include_terminal=False):
-        metadata_decoder = self.table_metadata_schemas.edge.decode_row
-        edge_left = self.edges_left
-        edge_right = self.edges_right
-        sequence_length = self.sequence_length
-        in_order = self.indexes_edge_insertion_order
-        out_order = self.indexes_edge_removal_order
-        M = self.num_edges
-        j = 0
-        k = 0
-        left = 0.0
-        while j < M or left < sequence_length:
-            edges_out = []
-            edges_in = []
-            while k < M and edge_right[out_order[k]] == left:
-                edges_out.append(
-                    Edge(
-                        *self._ll_tree_sequence.get_edge(out_order[k]),
-                        id=out_order[k],
-                        metadata_decoder=metadata_decoder,
-                    )
-                )
-                k += 1
-            while j < M and edge_left[in_order[j]] == left:
-                edges_in.append(
-                    Edge(
-                        *self._ll_tree_sequence.get_edge(in_order[j]),
-                        id=in_order[j],
-                        metadata_decoder=metadata_decoder,
-                    )
-                )
-                j += 1
-            right = sequence_length
-            if j < M:
-                right = min(right, edge_left[in_order[j]])
-            if k < M:
-                right = min(right, edge_right[out_order[k]])
-            yield EdgeDiff(Interval(left, right), edges_out, edges_in)
-            left = right
-
-        if include_terminal:
-            edges_out = []
-            while k < M:
-                edges_out.append(
-                    Edge(
-                        *self._ll_tree_sequence.get_edge(out_order[k]),
-                        id=out_order[k],
-                        metadata_decoder=metadata_decoder,
-                    )
-                )
-                k += 1
-            yield EdgeDiff(Interval(left, right), edges_out, [])
-
-    def _edge_diffs_reverse(self, include_terminal=False):
-        metadata_decoder = self.table_metadata_schemas.edge.decode_row
-        edge_left = self.edges_left
-        edge_right = self.edges_right
-        sequence_length = self.sequence_length
-        in_order = self.indexes_edge_removal_order
-        out_order = self.indexes_edge_insertion_order
-        M = self.num_edges
-        j = M - 1
-        k = M - 1
-        right = sequence_length
-        while j >= 0 or right > 0:
-            edges_out = []
-            edges_in = []
-            while k >= 0 and edge_left[out_order[k]] == right:
-                edges_out.append(
-                    Edge(
-                        *self._ll_tree_sequence.get_edge(out_order[k]),
-                        id=out_order[k],
-                        metadata_decoder=metadata_decoder,
-                    )
-                )
-                k -= 1
-            while j >= 0 and edge_right[in_order[j]] == right:
-                edges_in.append(
-                    Edge(
-                        *self._ll_tree_sequence.get_edge(in_order[j]),
-                        id=in_order[j],
-                        metadata_decoder=metadata_decoder,
-                    )
-                )
-                j -= 1
-            left = 0
-            if j >= 0:
-                left = max(left, edge_right[in_order[j]])
-            if k >= 0:
-                left = max(left, edge_left[out_order[k]])
-            yield EdgeDiff(Interval(left, right), edges_out, edges_in)
-            right = left
-
-        if include_terminal:
-            edges_out = []
-            while k >= 0:
-                edges_out.append(
-                    Edge(
-                        *self._ll_tree_sequence.get_edge(out_order[k]),
-                        id=out_order[k],
-                        metadata_decoder=metadata_decoder,
-                    )
-                )
-                k -= 1
-            yield EdgeDiff(Interval(left, right), edges_out, [])
-
-    def edge_diffs(self, include_terminal=False, *, direction=tskit.FORWARD):
+    def edge_diffs(
+        self, include_terminal=False, *, direction=tskit.FORWARD, as_ids=False
+    ):
         """
         Returns an iterator over all the :ref:`edges <sec_edge_table_definition>` that
         are inserted and removed to build the trees as we move from left-to-right along
@@ -4810,17 +4807,123 @@ class TreeSequence:
         :param int direction: The direction of travel along the sequence for
             diffs. Must be one of :data:`.FORWARD` or :data:`.REVERSE`.
             (Default: :data:`.FORWARD`).
+        :param bool as_ids: If True, ``edges_out`` and ``edges_in`` are numpy
+            arrays of edge IDs rather than lists of :class:`Edge` objects. This
+            avoids creating a Python object for every edge in the tree sequence,
+            and is much more efficient for algorithms that only need the edge IDs
+            to look up values in the edge table columns (e.g. :attr:`.edges_parent`).
+            The arrays are read-only views into a single array of IDs covering all
+            trees (see :meth:`.edge_diff_arrays`). (Default: False)
         :return: An iterator over the (interval, edges_out, edges_in) tuples. This
             is a named tuple, so the 3 values can be accessed by position
             (e.g. ``returned_tuple[0]``) or name (e.g. ``returned_tuple.interval``).
         :rtype: :class:`collections.abc.Iterable`
         """
+        diffs = self.edge_diff_arrays(include_terminal, direction=direction)
+        return self._edge_diffs(diffs, as_ids)
+
+    def _edge_diffs(self, diffs, as_ids):
+        metadata_decoder = self.table_metadata_schemas.edge.decode_row
+        ll_ts = self._ll_tree_sequence
+
+        def make_edges(ids):
+            return [
+                Edge(*ll_ts.get_edge(j), id=j, metadata_decoder=metadata_decoder)
+                for j in ids
+            ]
+
+        out_offset = diffs.edges_out_offset
+        in_offset = diffs.edges_in_offset
+        for t in range(diffs.left.shape[0]):
+            edges_out = diffs.edges_out[out_offset[t] : out_offset[t + 1]]
+            edges_in = diffs.edges_in[in_offset[t] : in_offset[t + 1]]
+            if not as_ids:
+                edges_out = make_edges(edges_out)
+                edges_in = make_edges(edges_in)
+            yield EdgeDiff(Interval(diffs.left[t], diffs.right[t]), edges_out, edges_in)
+
+    def edge_diff_arrays(self, include_terminal=False, *, direction=tskit.FORWARD):
+        """
+        Returns the edge diffs for all trees in the tree sequence (see
+        :meth:`.edge_diffs`) as a set of numpy arrays, without creating any
+        per-edge or per-tree Python objects. The result is a named tuple with
+        the following fields:
+
+        ``left``, ``right``
+            The genomic interval covered by the tree produced by each diff, in the
+            order of travel, as numpy float64 arrays of length ``num_diffs``.
+            The number of diffs is equal to the number of trees, plus one if
+            ``include_terminal`` is True.
+
+        ``edges_out``, ``edges_out_offset``
+            The IDs of the edges removed to produce each tree, concatenated into
+            a single numpy int32 array. The edges removed for diff ``j`` are
+            ``edges_out[edges_out_offset[j]: edges_out_offset[j + 1]]``, where
+            ``edges_out_offset`` is an int64 array of length ``num_diffs + 1``.
+
+        ``edges_in``, ``edges_in_offset``
+            The IDs of the edges inserted to produce each tree, using the same
+            offset encoding as ``edges_out``.
+
+        Edges within each diff are in the same order as in :meth:`.edge_diffs`.
+        As the edge IDs in each diff are contiguous blocks of the
+        :ref:`sec_table_indexes`, the ID arrays are read-only views of
+        :attr:`.indexes_edge_insertion_order` and
+        :attr:`.indexes_edge_removal_order` (reversed for the
+        :data:`.REVERSE` direction) and the arrays can be computed in time
+        proportional to ``num_trees * log(num_edges)``.
+
+        :param bool include_terminal: If True, include a final diff that removes
+            all remaining edges, as described in :meth:`.edge_diffs`.
+            (Default: False)
+        :param int direction: The direction of travel along the sequence for
+            diffs. Must be one of :data:`.FORWARD` or :data:`.REVERSE`.
+            (Default: :data:`.FORWARD`).
+        :return: The ``(left, right, edges_out, edges_out_offset, edges_in,
+            edges_in_offset)`` named tuple describing all edge diffs.
+        :rtype: EdgeDiffArrays
+        """
+        breakpoints = self.breakpoints(as_array=True)
+        insertion_order = self.indexes_edge_insertion_order
+        removal_order = self.indexes_edge_removal_order
         if direction == _tskit.FORWARD:
-            return self._edge_diffs_forward(include_terminal=include_terminal)
+            positions = breakpoints
+            left = breakpoints[:-1]
+            right = breakpoints[1:]
+            edges_out = removal_order
+            edges_in = insertion_order
+            # Edges leave the tree at their right coordinate and enter at their left.
+            out_position = self.edges_right[edges_out]
+            in_position = self.edges_left[edges_in]
+            terminal = self.sequence_length
         elif direction == _tskit.REVERSE:
-            return self._edge_diffs_reverse(include_terminal=include_terminal)
+            # Negating the coordinates lets us use the same ascending search.
+            positions = -breakpoints[::-1]
+            left = breakpoints[-2::-1]
+            right = breakpoints[:0:-1]
+            edges_out = insertion_order[::-1]
+            edges_in = removal_order[::-1]
+            out_position = -self.edges_left[edges_out]
+            in_position = -self.edges_right[edges_in]
+            terminal = 0
         else:
             raise ValueError("direction must be either tskit.FORWARD or tskit.REVERSE")
+        edges_out_offset = np.searchsorted(out_position, positions).astype(np.int64)
+        edges_in_offset = np.searchsorted(in_position, positions).astype(np.int64)
+        if include_terminal:
+            num_edges = self.num_edges
+            edges_out_offset = np.append(edges_out_offset, num_edges)
+            edges_in_offset = np.append(edges_in_offset, num_edges)
+            left = np.append(left, terminal)
+            right = np.append(right, terminal)
+        return EdgeDiffArrays(
+            left=left,
+            right=right,
+            edges_out=edges_out[: edges_out_offset[-1]],
+            edges_out_offset=edges_out_offset,
+            edges_in=edges_in[: edges_in_offset[-1]],
+            edges_in_offset=edges_in_offset,
+        )
 
     def sites(self):
         """
@@ -4899,6 +5002,58 @@ class TreeSequence:
             breakpoints = map(float, breakpoints)
         return breakpoints
 
+    def tree_metrics(self, *, num_threads=0):
+        """
+        Returns per-tree summaries of the shape of every tree in the tree
+        sequence, computed in a single pass along the sequence without creating
+        any :class:`Tree` objects. The result is a named tuple of numpy arrays,
+        each of length :attr:`.num_trees` and indexed by tree index, with the
+        following fields:
+
+        ``total_branch_length``
+            As :attr:`Tree.total_branch_length`.
+        ``num_roots``
+            As :attr:`Tree.num_roots` (dtype=np.uint64).
+        ``tmrca``
+            The time of the most recent common ancestor of all samples, which is
+            the time of the root if the tree has a single root that subtends
+            all the samples, or NaN otherwise.
+        ``sackin_index``
+            As :meth:`Tree.sackin_index` (dtype=np.uint64).
+        ``colless_index``
+            As :meth:`Tree.colless_index`, except that trees for which the
+            index is undefined (trees that are not singly-rooted and binary)
+            have a value of NaN rather than raising an error.
+        ``b1_index``
+            As :meth:`Tree.b1_index`.
+
+        This is equivalent to, but much faster than, calling the corresponding
+        :class:`Tree` methods on each tree in :meth:`.trees`. The number of
+        roots and the TMRCA are read directly from the tree as it is updated
+        along the sequence, and the remaining values are computed together in
+        a single traversal of each tree.
+
+        :param int num_threads: The number of threads to use. If this is
+            greater than 1, the trees are split into ``num_threads`` contiguous
+            blocks which are processed concurrently. The children of a tree
+            may be ordered differently at the start of a block, so summed
+            floating point values can differ from the single threaded values
+            by rounding error. (Default: 0)
+        :return: The per-tree metrics, as a named tuple of numpy arrays.
+        :rtype: TreeMetrics
+        """
+        ll_ts = self._ll_tree_sequence
+        blocks = np.array_split(np.arange(self.num_trees), max(1, num_threads))
+        results = util.threaded_map(
+            lambda block: ll_ts.get_tree_metrics(
+                int(block[0]) if len(block) > 0 else 0,
+                int(block[-1]) + 1 if len(block) > 0 else 0,
+            ),
+            blocks,
+            num_threads=num_threads,
+        )
+        return TreeMetrics(*map(np.concatenate, zip(*results)))
+
     def at(self, position, **kwargs):
         """
         Returns the tree covering the specified genomic location. The returned tree
@@ -5092,6 +5247,7 @@ class TreeSequence:
         isolated_as_missing=None,
         missing_data_character=None,
         samples=None,
+        num_threads=0,
     ):
         # return an array of haplotypes and the first and last site positions
         if missing_data_character is None:
@@ -5106,39 +5262,48 @@ class TreeSequence:
             dtype=np.int8,
         )
         missing_int8 = ord(missing_data_character.encode("ascii"))
-        for var in self.variants(
-            samples=samples,
-            isolated_as_missing=isolated_as_missing,
-            left=interval.left,
-            right=interval.right,
-        ):
-            alleles = np.full(len(var.alleles), missing_int8, dtype=np.int8)
-            for i, allele in enumerate(var.alleles):
-                if allele is not None:
-                    if len(allele) != 1:
-                        raise TypeError(
-                            "Multi-letter allele or deletion detected at site {}".format(
-                                var.site.id
+        thread_local = threading.local()
+
+        def fill_haplotypes(site_ids):
+            # Each thread decodes its own contiguous slice of the sites.
+            var = getattr(thread_local, "variant", None)
+            if var is None:
+                var = tskit.Variant(
+                    self, samples=samples, isolated_as_missing=isolated_as_missing
+                )
+                thread_local.variant = var
+            for site_id in site_ids:
+                var.decode(site_id)
+                alleles = np.full(len(var.alleles), missing_int8, dtype=np.int8)
+                for i, allele in enumerate(var.alleles):
+                    if allele is not None:
+                        if len(allele) != 1:
+                            raise TypeError(
+                                "Multi-letter allele or deletion detected at site "
+                                "{}".format(var.site.id)
                             )
-                        )
-                    try:
-                        ascii_allele = allele.encode("ascii")
-                    except UnicodeEncodeError:
-                        raise TypeError(
-                            "Non-ascii character in allele at site {}".format(
-                                var.site.id
+                        try:
+                            ascii_allele = allele.encode("ascii")
+                        except UnicodeEncodeError:
+                            raise TypeError(
+                                "Non-ascii character in allele at site {}".format(
+                                    var.site.id
+                                )
                             )
-                        )
-                    allele_int8 = ord(ascii_allele)
-                    if allele_int8 == missing_int8:
-                        raise ValueError(
-                            "The missing data character '{}' clashes with an "
-                            "existing allele at site {}".format(
-                                missing_data_character, var.site.id
+                        allele_int8 = ord(ascii_allele)
+                        if allele_int8 == missing_int8:
+                            raise ValueError(
+                                "The missing data character '{}' clashes with an "
+                                "existing allele at site {}".format(
+                                    missing_data_character, var.site.id
+                                )
                             )
-                        )
-                    alleles[i] = allele_int8
-            H[:, var.site.id - start_site] = alleles[var.genotypes]
+                        alleles[i] = allele_int8
+                H[:, var.site.id - start_site] = alleles[var.genotypes]
+
+        slices = np.array_split(np.arange(start_site, stop_site), max(1, num_threads))
+        for _ in util.threaded_map(fill_haplotypes, slices, num_threads=num_threads):
+            pass
         return H, (start_site, stop_site - 1)
 
     def haplotypes(
@@ -5421,12 +5586,149 @@ class TreeSequence:
 
         num_samples = self.num_samples if samples is None else len(samples)
         ret = np.zeros(shape=(self.num_sites, num_samples), dtype=np.int32)
+        variant._ll_variant.decode_chunk(0, ret)
+        return ret
+
+    def variants_chunked(
+        self,
+        *,
+        chunk_size=None,
+        out=None,
+        samples=None,
+        isolated_as_missing=None,
+        alleles=None,
+        left=None,
+        right=None,
+    ):
+        """
+        Returns an iterator over the genotypes between the ``left`` (inclusive)
+        and ``right`` (exclusive) genomic positions in this tree sequence,
+        decoded ``chunk_size`` sites at a time. Each chunk is returned as a
+        :class:`VariantChunk`, whose ``genotypes`` attribute is a
+        ``k`` by ``n`` array of genotypes for the ``k`` sites in the chunk and
+        the ``n`` requested samples. This provides the same information as the
+        :meth:`.variants` iterator, but with much less per-site overhead, and
+        without the memory requirements of :meth:`.genotype_matrix`.
+
+        The genotypes are written directly into a single buffer of
+        ``chunk_size`` rows, which is reused for every chunk, so that no
+        memory is allocated after the first chunk. This buffer may be supplied
+        using the ``out`` parameter, which must then be a C-contiguous, writeable
+        numpy array of int32 values with ``n`` columns. The ``genotypes`` of
+        each chunk is a view of the first ``k`` rows of this buffer; ``k`` is
+        equal to ``chunk_size`` for all but (possibly) the last chunk. Because
+        the buffer is overwritten when the next chunk is decoded, any genotypes
+        that are needed for longer must be copied.
 
-        for site_id in range(self.num_sites):
-            variant.decode(site_id)
-            ret[site_id, :] = variant.genotypes
+        .. code-block:: python
 
-        return ret
+            buff = np.empty((1000, ts.num_samples), dtype=np.int32)
+            for chunk in ts.variants_chunked(out=buff):
+                process(chunk.site_ids, chunk.genotypes)
+
+        :param int chunk_size: The maximum number of sites in each chunk.
+            If None (the default), this is the number of rows in ``out``
+            or 1024 if ``out`` is not specified.
+        :param numpy.ndarray out: The array into which genotypes are decoded,
+            or None (the default) to allocate a new array.
+        :param array_like samples: As for the :meth:`.variants` method.
+        :param bool isolated_as_missing: As for the :meth:`.variants` method.
+        :param tuple alleles: As for the :meth:`.variants` method.
+        :param int left: As for the :meth:`.variants` method.
+        :param int right: As for the :meth:`.variants` method.
+        :return: An iterator over chunks of consecutive sites.
+        :rtype: iter(:class:`VariantChunk`)
+        """
+        interval = self._check_genomic_range(left, right)
+        if isolated_as_missing is None:
+            isolated_as_missing = True
+        variant = tskit.Variant(
+            self,
+            samples=samples,
+            isolated_as_missing=isolated_as_missing,
+            alleles=alleles,
+        )
+        num_samples = len(variant.samples)
+        if out is None:
+            if chunk_size is None:
+                chunk_size = 1024
+            chunk_size = int(chunk_size)
+            if chunk_size < 1:
+                raise ValueError("chunk_size must be at least 1")
+            out = np.empty((chunk_size, num_samples), dtype=np.int32)
+        else:
+            if not isinstance(out, np.ndarray) or out.ndim != 2:
+                raise TypeError("out must be a 2D numpy array")
+            if out.shape[0] < 1:
+                raise ValueError("out must have at least one row")
+            if chunk_size is None:
+                chunk_size = out.shape[0]
+            chunk_size = int(chunk_size)
+            if not 1 <= chunk_size <= out.shape[0]:
+                raise ValueError(
+                    "chunk_size must be at least 1 and no more than the number "
+                    "of rows in out"
+                )
+        start, stop = np.searchsorted(self.sites_position, interval)
+        for chunk_start in range(start, stop, chunk_size):
+            chunk_stop = min(chunk_start + chunk_size, stop)
+            genotypes = out[: chunk_stop - chunk_start]
+            chunk_alleles, num_trees = variant._ll_variant.decode_chunk(
+                chunk_start, genotypes
+            )
+            yield tskit.VariantChunk(
+                site_ids=range(chunk_start, chunk_stop),
+                alleles=chunk_alleles,
+                genotypes=genotypes,
+                num_trees=num_trees,
+            )
+
+    def site_genotypes(
+        self,
+        site_ids,
+        *,
+        samples=None,
+        isolated_as_missing=None,
+        alleles=None,
+    ):
+        """
+        Returns the genotypes at an arbitrary collection of sites, specified
+        by their IDs, as a :class:`VariantChunk`. Row ``j`` of the returned
+        ``genotypes`` array contains the genotypes at site ``site_ids[j]``,
+        and the ``alleles`` are similarly listed in the requested order.
+        Site IDs may be given in any order and may be repeated.
+
+        Decoding the genotypes at a site requires moving a tree to the
+        site's position, and so accessing sites in a random order using
+        :meth:`Variant.decode` can be very slow. This method instead
+        decodes the requested sites in genomic order, so that each tree is
+        visited at most once. The ``num_trees`` attribute of the returned
+        chunk records the number of distinct trees that were visited.
+
+        :param array_like site_ids: The IDs of the sites to decode.
+        :param array_like samples: As for the :meth:`.variants` method.
+        :param bool isolated_as_missing: As for the :meth:`.variants` method.
+        :param tuple alleles: As for the :meth:`.variants` method.
+        :return: The genotypes at the requested sites.
+        :rtype: :class:`VariantChunk`
+        """
+        site_ids = util.safe_np_int_cast(site_ids, np.int32, copy=True)
+        if site_ids.ndim != 1:
+            raise ValueError("site_ids must be a one dimensional array")
+        variant = tskit.Variant(
+            self,
+            samples=samples,
+            isolated_as_missing=isolated_as_missing,
+            alleles=alleles,
+        )
+        genotypes = np.empty((len(site_ids), len(variant.samples)), dtype=np.int32)
+        site_alleles, num_trees = variant._ll_variant.decode_sites(site_ids, genotypes)
+        return tskit.VariantChunk(
+            site_ids=site_ids,
+            alleles=site_alleles,
+            genotypes=genotypes,
+            num_trees=num_trees,
+        )
 
     def alignments(
         self,
@@ -5436,6 +5738,7 @@ class TreeSequence:
         samples=None,
         left=None,
         right=None,
+        num_threads=0,
     ):
         """
         Returns an iterator over the full sequence alignments for the defined samples
@@ -5519,6 +5822,10 @@ class TreeSequence:
             (default) alignments start at 0.
         :param int right: Alignments will stop before this genomic position. If ``None``
             (default) alignments will continue until the end of the tree sequence.
+        :param int num_threads: The number of threads used to decode the
+            genotypes at the sites in the requested region. Sites are split
+            into contiguous blocks which are decoded concurrently. If 0 (the
+            default) or 1, use a single thread.
         :return: An iterator over the alignment strings for specified samples in
             this tree sequence, in the order given in ``samples``.
         :rtype: collections.abc.Iterable
@@ -5582,6 +5889,7 @@ class TreeSequence:
             interval=interval,
             missing_data_character=missing_data_character,
             samples=samples,
+            num_threads=num_threads,
         )
         site_pos = self.sites_position.astype(np.int64)[
             first_site_id : last_site_id + 1
@@ -5660,8 +5968,8 @@ class TreeSequence:
         """
         Efficient access to the ``flags`` column in the
         :ref:`sec_individual_table_definition` as a numpy array (dtype=np.uint32).
-        Equivalent to ``ts.tables.individuals.flags`` (but avoiding the full copy
-        of the table data that accessing ``ts.tables`` currently entails).
+        Equivalent to ``ts.tables.individuals.flags`` (but avoiding
+        the creation of the intermediate table objects).
         """
         return self._individuals_flags
 
@@ -5670,8 +5978,8 @@ class TreeSequence:
         """
         Efficient access to the ``time`` column in the
         :ref:`sec_node_table_definition` as a numpy array (dtype=np.float64).
-        Equivalent to ``ts.tables.nodes.time`` (but avoiding the full copy
-        of the table data that accessing ``ts.tables`` currently entails).
+        Equivalent to ``ts.tables.nodes.time`` (but avoiding
+        the creation of the intermediate table objects).
         """
         return self._nodes_time
 
@@ -5680,8 +5988,8 @@ class TreeSequence:
         """
         Efficient access to the ``flags`` column in the
         :ref:`sec_node_table_definition` as a numpy array (dtype=np.uint32).
-        Equivalent to ``ts.tables.nodes.flags`` (but avoiding the full copy
-        of the table data that accessing ``ts.tables`` currently entails).
+        Equivalent to ``ts.tables.nodes.flags`` (but avoiding
+        the creation of the intermediate table objects).
         """
         return self._nodes_flags
 
@@ -5690,8 +5998,8 @@ class TreeSequence:
         """
         Efficient access to the ``population`` column in the
         :ref:`sec_node_table_definition` as a numpy array (dtype=np.int32).
-        Equivalent to ``ts.tables.nodes.population`` (but avoiding the full copy
-        of the table data that accessing ``ts.tables`` currently entails).
+        Equivalent to ``ts.tables.nodes.population`` (but avoiding
+        the creation of the intermediate table objects).
         """
         return self._nodes_population
 
@@ -5700,8 +6008,8 @@ class TreeSequence:
         """
         Efficient access to the ``individual`` column in the
         :ref:`sec_node_table_definition` as a numpy array (dtype=np.int32).
-        Equivalent to ``ts.tables.nodes.individual`` (but avoiding the full copy
-        of the table data that accessing ``ts.tables`` currently entails).
+        Equivalent to ``ts.tables.nodes.individual`` (but avoiding
+        the creation of the intermediate table objects).
         """
         return self._nodes_individual
 
@@ -5710,8 +6018,8 @@ class TreeSequence:
         """
         Efficient access to the ``left`` column in the
         :ref:`sec_edge_table_definition` as a numpy array (dtype=np.float64).
-        Equivalent to ``ts.tables.edges.left`` (but avoiding the full copy
-        of the table data that accessing ``ts.tables`` currently entails).
+        Equivalent to ``ts.tables.edges.left`` (but avoiding
+        the creation of the intermediate table objects).
         """
         return self._edges_left
 
@@ -5720,8 +6028,8 @@ class TreeSequence:
         """
         Efficient access to the ``right`` column in the
         :ref:`sec_edge_table_definition` as a numpy array (dtype=np.float64).
-        Equivalent to ``ts.tables.edges.right`` (but avoiding the full copy
-        of the table data that accessing ``ts.tables`` currently entails).
+        Equivalent to ``ts.tables.edges.right`` (but avoiding
+        the creation of the intermediate table objects).
         """
         return self._edges_right
 
@@ -5730,8 +6038,8 @@ class TreeSequence:
         """
         Efficient access to the ``parent`` column in the
         :ref:`sec_edge_table_definition` as a numpy array (dtype=np.int32).
-        Equivalent to ``ts.tables.edges.parent`` (but avoiding the full copy
-        of the table data that accessing ``ts.tables`` currently entails).
+        Equivalent to ``ts.tables.edges.parent`` (but avoiding
+        the creation of the intermediate table objects).
         """
         return self._edges_parent
 
@@ -5740,8 +6048,8 @@ class TreeSequence:
         """
         Efficient access to the ``child`` column in the
         :ref:`sec_edge_table_definition` as a numpy array (dtype=np.int32).
-        Equivalent to ``ts.tables.edges.child`` (but avoiding the full copy
-        of the table data that accessing ``ts.tables`` currently entails).
+        Equivalent to ``ts.tables.edges.child`` (but avoiding
+        the creation of the intermediate table objects).
         """
         return self._edges_child
 
@@ -5750,8 +6058,8 @@ class TreeSequence:
         """
         Efficient access to the ``position`` column in the
         :ref:`sec_site_table_definition` as a numpy array (dtype=np.float64).
-        Equivalent to ``ts.tables.sites.position`` (but avoiding the full copy
-        of the table data that accessing ``ts.tables`` currently entails).
+        Equivalent to ``ts.tables.sites.position`` (but avoiding
+        the creation of the intermediate table objects).
         """
         return self._sites_position
 
@@ -5760,8 +6068,8 @@ class TreeSequence:
         """
         Efficient access to the ``site`` column in the
         :ref:`sec_mutation_table_definition` as a numpy array (dtype=np.int32).
-        Equivalent to ``ts.tables.mutations.site`` (but avoiding the full copy
-        of the table data that accessing ``ts.tables`` currently entails).
+        Equivalent to ``ts.tables.mutations.site`` (but avoiding
+        the creation of the intermediate table objects).
         """
         return self._mutations_site
 
@@ -5770,8 +6078,8 @@ class TreeSequence:
         """
         Efficient access to the ``node`` column in the
         :ref:`sec_mutation_table_definition` as a numpy array (dtype=np.int32).
-        Equivalent to ``ts.tables.mutations.node`` (but avoiding the full copy
-        of the table data that accessing ``ts.tables`` currently entails).
+        Equivalent to ``ts.tables.mutations.node`` (but avoiding
+        the creation of the intermediate table objects).
         """
         return self._mutations_node
 
@@ -5780,8 +6088,8 @@ class TreeSequence:
         """
         Efficient access to the ``parent`` column in the
         :ref:`sec_mutation_table_definition` as a numpy array (dtype=np.int32).
-        Equivalent to ``ts.tables.mutations.parent`` (but avoiding the full copy
-        of the table data that accessing ``ts.tables`` currently entails).
+        Equivalent to ``ts.tables.mutations.parent`` (but avoiding
+        the creation of the intermediate table objects).
         """
         return self._mutations_parent
 
@@ -5790,8 +6098,8 @@ class TreeSequence:
         """
         Efficient access to the ``time`` column in the
         :ref:`sec_mutation_table_definition` as a numpy array (dtype=np.float64).
-        Equivalent to ``ts.tables.mutations.time`` (but avoiding the full copy
-        of the table data that accessing ``ts.tables`` currently entails).
+        Equivalent to ``ts.tables.mutations.time`` (but avoiding
+        the creation of the intermediate table objects).
         """
         return self._mutations_time
 
@@ -5800,8 +6108,8 @@ class TreeSequence:
         """
         Efficient access to the ``left`` column in the
         :ref:`sec_migration_table_definition` as a numpy array (dtype=np.float64).
-        Equivalent to ``ts.tables.migrations.left`` (but avoiding the full copy
-        of the table data that accessing ``ts.tables`` currently entails).
+        Equivalent to ``ts.tables.migrations.left`` (but avoiding
+        the creation of the intermediate table objects).
         """
         return self._migrations_left
 
@@ -5810,8 +6118,8 @@ class TreeSequence:
         """
         Efficient access to the ``right`` column in the
         :ref:`sec_migration_table_definition` as a numpy array (dtype=np.float64).
-        Equivalent to ``ts.tables.migrations.right`` (but avoiding the full copy
-        of the table data that accessing ``ts.tables`` currently entails).
+        Equivalent to ``ts.tables.migrations.right`` (but avoiding
+        the creation of the intermediate table objects).
         """
         return self._migrations_right
 
@@ -5820,8 +6128,8 @@ class TreeSequence:
         """
         Efficient access to the ``node`` column in the
         :ref:`sec_migration_table_definition` as a numpy array (dtype=np.int32).
-        Equivalent to ``ts.tables.migrations.node`` (but avoiding the full copy
-        of the table data that accessing ``ts.tables`` currently entails).
+        Equivalent to ``ts.tables.migrations.node`` (but avoiding
+        the creation of the intermediate table objects).
         """
         return self._migrations_node
 
@@ -5830,8 +6138,8 @@ class TreeSequence:
         """
         Efficient access to the ``source`` column in the
         :ref:`sec_migration_table_definition` as a numpy array (dtype=np.int32).
-        Equivalent to ``ts.tables.migrations.source`` (but avoiding the full copy
-        of the table data that accessing ``ts.tables`` currently entails).
+        Equivalent to ``ts.tables.migrations.source`` (but avoiding
+        the creation of the intermediate table objects).
         """
         return self._migrations_source
 
@@ -5840,8 +6148,8 @@ class TreeSequence:
         """
         Efficient access to the ``dest`` column in the
         :ref:`sec_migration_table_definition` as a numpy array (dtype=np.int32).
-        Equivalent to ``ts.tables.migrations.dest`` (but avoiding the full copy
-        of the table data that accessing ``ts.tables`` currently entails).
+        Equivalent to ``ts.tables.migrations.dest`` (but avoiding
+        the creation of the intermediate table objects).
         """
         return self._migrations_dest
 
@@ -5850,8 +6158,8 @@ class TreeSequence:
         """
         Efficient access to the ``time`` column in the
         :ref:`sec_migration_table_definition` as a numpy array (dtype=np.float64).
-        Equivalent to ``ts.tables.migrations.time`` (but avoiding the full copy
-        of the table data that accessing ``ts.tables`` currently entails).
+        Equivalent to ``ts.tables.migrations.time`` (but avoiding
+        the creation of the intermediate table objects).
         """
         return self._migrations_time
 
@@ -5861,8 +6169,7 @@ class TreeSequence:
         Efficient access to the ``edge_insertion_order`` column in the
         :ref:`sec_table_indexes` as a numpy array (dtype=np.int32).
         Equivalent to ``ts.tables.indexes.edge_insertion_order`` (but avoiding
-        the full copy of the table data that accessing ``ts.tables``
-        currently entails).
+        the creation of the intermediate table objects).
         """
         return self._indexes_edge_insertion_order
 
@@ -5872,8 +6179,7 @@ class TreeSequence:
         Efficient access to the ``edge_removal_order`` column in the
         :ref:`sec_table_indexes` as a numpy array (dtype=np.int32).
         Equivalent to ``ts.tables.indexes.edge_removal_order`` (but avoiding
-        the full copy of the table data that accessing ``ts.tables``
-        currently entails).
+        the creation of the intermediate table objects).
         """
         return self._indexes_edge_removal_order
 
@@ -6167,6 +6473,8 @@ class TreeSequence:
         site_mask=None,
         sample_mask=None,
         isolated_as_missing=None,
+        num_threads=0,
+        bgzf=False,
     ):
         """
         Convert the genetic variation data in this tree sequence to Variant
@@ -6293,6 +6601,17 @@ class TreeSequence:
             missing samples (i.e., isolated samples without mutations) is "."
             If False, missing samples will be assigned the ancestral allele.
             See :meth:`.variants` for more information. Default: True.
+        :param int num_threads: The number of threads used to generate the
+            output. Sites are split into contiguous genomic blocks, which are
+            decoded and formatted concurrently and then written in order, so
+            that the output is identical to the single threaded case. If
+            ``sample_mask`` is a callable, all sites are processed in the
+            calling thread and this argument is ignored. If 0 (the default)
+            or 1, use a single thread.
+        :param bool bgzf: If True, write the output as a series of
+            `BGZF <https://samtools.github.io/hts-specs/SAMv1.pdf>`__
+            compressed blocks, which can be indexed using ``tabix``. In this
+            case ``output`` must be opened in binary mode. Default: False.
         """
         writer = vcf.VcfWriter(
             self,
@@ -6304,6 +6623,8 @@ class TreeSequence:
             site_mask=site_mask,
             sample_mask=sample_mask,
             isolated_as_missing=isolated_as_missing,
+            num_threads=num_threads,
+            bgzf=bgzf,
         )
         writer.write(output)
 
@@ -6314,6 +6635,7 @@ class TreeSequence:
         wrap_width=60,
         reference_sequence=None,
         missing_data_character=None,
+        num_threads=0,
     ):
         """
         Writes the :meth:`.alignments` for this tree sequence to file in
@@ -6352,6 +6674,7 @@ class TreeSequence:
             (Default=60).
         :param str reference_sequence: As for the :meth:`.alignments` method.
         :param str missing_data_character: As for the :meth:`.alignments` method.
+        :param int num_threads: As for the :meth:`.alignments` method.
         """
         text_formats.write_fasta(
             self,
@@ -6359,6 +6682,7 @@ class TreeSequence:
             wrap_width=wrap_width,
             reference_sequence=reference_sequence,
             missing_data_character=missing_data_character,
+            num_threads=num_threads,
         )
 
     def as_fasta(self, **kwargs):
@@ -7248,6 +7572,8 @@ class TreeSequence:
         mode=None,
         span_normalise=True,
         strict=True,
+        num_threads=0,
+        vectorised=False,
     ):
         """
         Compute a windowed statistic from weights and a summary function.
@@ -7279,6 +7605,19 @@ class TreeSequence:
         then the output will be ``m``-dimensional for each node or window (depending
         on "mode").
 
+        The summary function ``f`` may also be a compiled function, given as a
+        ``ctypes`` function pointer (for example, created with
+        ``tskit.util.GENERAL_STAT_FUNC``, which can also wrap the integer
+        address of a function from ``cffi``) or a numba ``cfunc``. This is
+        called directly by the C library and must have the signature
+        ``int f(uint64_t k, const double *x, uint64_t m, double *y, void *params)``,
+        writing the ``m``-dimensional summary of ``x`` to ``y`` and returning
+        zero on success (``params`` is NULL). If ``vectorised`` is True, the
+        signature is instead
+        ``int f(uint64_t k, uint64_t n, const double *X, uint64_t m, double *Y,
+        void *params)``, where ``X`` and ``Y`` are ``n`` by ``k`` and ``n``
+        by ``m`` arrays in row-major order.
+
         .. note::
             The summary function ``f`` should return zero when given both 0 and
             the total weight (i.e., ``f(0) = 0`` and ``f(np.sum(W, axis=0)) = 0``),
@@ -7290,7 +7629,7 @@ class TreeSequence:
             column for each weight.
         :param f: A function that takes a one-dimensional array of length
             equal to the number of columns of ``W`` and returns a one-dimensional
-            array.
+            array, or a compiled function (see above).
         :param int output_dim: The length of ``f``'s return value.
         :param list windows: An increasing list of breakpoints between the windows
             to compute the statistic in.
@@ -7301,15 +7640,30 @@ class TreeSequence:
         :param bool span_normalise: Whether to divide the result by the span of the
             window (defaults to True).
         :param bool strict: Whether to check that f(0) and f(total weight) are zero.
+        :param int num_threads: The number of threads to compute the windows
+            in (see :ref:`sec_stats_num_threads`; defaults to 0).
+        :param bool vectorised: If True, ``f`` is called once for each tree with
+            a two-dimensional array whose rows are the weights to be summarised,
+            and must return a two-dimensional array whose rows are the
+            corresponding summaries. This greatly reduces the overhead of
+            calling ``f`` (defaults to False).
         :return: A ndarray with shape equal to (num windows, num statistics).
         """
         if mode is None:
             mode = "site"
+        address = util.compiled_function_address(f, vectorised=vectorised)
         if strict:
+            summary_func = f
+            if address is not None:
+                summary_func = util.compiled_summary_func(
+                    address, output_dim, vectorised=vectorised
+                )
             total_weights = np.sum(W, axis=0)
             for x in [total_weights, total_weights * 0.0]:
+                if vectorised:
+                    x = x.reshape((1, -1))
                 with np.errstate(invalid="ignore", divide="ignore"):
-                    fx = np.array(f(x))
+                    fx = np.array(summary_func(x))
                 fx[np.isnan(fx)] = 0.0
                 if not np.allclose(fx, np.zeros((output_dim,))):
                     raise ValueError(
@@ -7320,11 +7674,14 @@ class TreeSequence:
             windows,
             self.ll_tree_sequence.general_stat,
             W,
-            f,
+            f if address is None else address,
             output_dim,
             polarised=polarised,
             span_normalise=span_normalise,
+            num_threads=num_threads,
             mode=mode,
+            vectorised=vectorised,
+            compiled=address is not None,
         )
 
     def sample_count_stat(
@@ -7337,6 +7694,8 @@ class TreeSequence:
         mode=None,
         span_normalise=True,
         strict=True,
+        num_threads=0,
+        vectorised=False,
     ):
         """
         Compute a windowed statistic from sample counts and a summary function.
@@ -7391,7 +7750,8 @@ class TreeSequence:
         :param list sample_sets: A list of lists of Node IDs, specifying the
             groups of nodes to compute the statistic with.
         :param f: A function that takes a one-dimensional array of length
-            equal to the number of sample sets and returns a one-dimensional array.
+            equal to the number of sample sets and returns a one-dimensional array,
+            or a compiled function (see :meth:`.general_stat`).
         :param int output_dim: The length of ``f``'s return value.
         :param list windows: An increasing list of breakpoints between the windows
             to compute the statistic in.
@@ -7402,6 +7762,13 @@ class TreeSequence:
         :param bool span_normalise: Whether to divide the result by the span of the
             window (defaults to True).
         :param bool strict: Whether to check that f(0) and f(total weight) are zero.
+        :param int num_threads: The number of threads to compute the windows
+            in (see :ref:`sec_stats_num_threads`; defaults to 0).
+        :param bool vectorised: If True, ``f`` is called once for each tree with
+            a two-dimensional array whose rows are the weights to be summarised,
+            and must return a two-dimensional array whose rows are the
+            corresponding summaries. This greatly reduces the overhead of
+            calling ``f`` (defaults to False).
         :return: A ndarray with shape equal to (num windows, num statistics).
         """  # noqa: B950
         # helper function for common case where weights are indicators of sample sets
@@ -7425,7 +7792,9 @@ class TreeSequence:
             polarised=polarised,
             mode=mode,
             span_normalise=span_normalise,
+            num_threads=num_threads,
             strict=strict,
+            vectorised=vectorised,
         )
 
     def parse_windows(self, windows):
@@ -7453,10 +7822,35 @@ class TreeSequence:
                 )
         return np.array(windows)
 
-    def __run_windowed_stat(self, windows, method, *args, **kwargs):
+    def __run_windowed_stat(self, windows, method, *args, num_threads=0, **kwargs):
         strip_dim = windows is None
         windows = self.parse_windows(windows)
-        stat = method(*args, **kwargs, windows=windows)
+        num_windows = len(windows) - 1 if windows.ndim == 1 else 0
+        if (
+            num_threads <= 1
+            or num_windows < 2
+            or windows[0] != 0
+            or windows[-1] != self.sequence_length
+        ):
+            # Malformed windows are reported by the library.
+            stat = method(*args, **kwargs, windows=windows)
+        else:
+            # Each block of windows is computed independently over its own
+            # stretch of the genome, and the results are concatenated.
+            blocks = np.array_split(
+                np.arange(num_windows), min(num_threads, num_windows)
+            )
+
+            def worker(block):
+                return method(
+                    *args,
+                    **kwargs,
+                    windows=windows[block[0] : block[-1] + 2],
+                    partial_windows=True,
+                )
+
+            with concurrent.futures.ThreadPoolExecutor(max_workers=num_threads) as pool:
+                stat = np.concatenate(list(pool.map(worker, blocks)))
         if strip_dim:
             stat = stat[0]
         return stat
@@ -7469,6 +7863,7 @@ class TreeSequence:
         mode=None,
         span_normalise=True,
         polarised=False,
+        num_threads=0,
     ):
         if sample_sets is None:
             sample_sets = self.samples()
@@ -7501,6 +7896,7 @@ class TreeSequence:
             flattened,
             mode=mode,
             span_normalise=span_normalise,
+            num_threads=num_threads,
             polarised=polarised,
         )
         if drop_dimension:
@@ -7519,6 +7915,7 @@ class TreeSequence:
         mode=None,
         span_normalise=True,
         polarised=False,
+        num_threads=0,
     ):
         sample_set_sizes = np.array(
             [len(sample_set) for sample_set in sample_sets], dtype=np.uint32
@@ -7553,6 +7950,7 @@ class TreeSequence:
             indexes,
             mode=mode,
             span_normalise=span_normalise,
+            num_threads=num_threads,
             polarised=polarised,
         )
         if drop_dimension:
@@ -7566,7 +7964,12 @@ class TreeSequence:
     ############################################
 
     def diversity(
-        self, sample_sets=None, windows=None, mode="site", span_normalise=True
+        self,
+        sample_sets=None,
+        windows=None,
+        mode="site",
+        span_normalise=True,
+        num_threads=0,
     ):
         """
         Computes mean genetic diversity (also known as "pi") in each of the
@@ -7616,6 +8019,8 @@ class TreeSequence:
             (defaults to "site").
         :param bool span_normalise: Whether to divide the result by the span of the
             window (defaults to True).
+        :param int num_threads: The number of threads to compute the windows
+            in (see :ref:`sec_stats_num_threads`; defaults to 0).
         :return: A numpy array whose length is equal to the number of sample sets.
             If there is one sample set and windows=None, a numpy scalar is returned.
         """
@@ -7625,10 +8030,17 @@ class TreeSequence:
             windows=windows,
             mode=mode,
             span_normalise=span_normalise,
+            num_threads=num_threads,
         )
 
     def divergence(
-        self, sample_sets, indexes=None, windows=None, mode="site", span_normalise=True
+        self,
+        sample_sets,
+        indexes=None,
+        windows=None,
+        mode="site",
+        span_normalise=True,
+        num_threads=0,
     ):
         r"""
         Computes mean genetic divergence between (and within) pairs of
@@ -7683,6 +8095,8 @@ class TreeSequence:
             (defaults to "site").
         :param bool span_normalise: Whether to divide the result by the span of the
             window (defaults to True).
+        :param int num_threads: The number of threads to compute the windows
+            in (see :ref:`sec_stats_num_threads`; defaults to 0).
         :return: A ndarray with shape equal to (num windows, num statistics).
             If there is one pair of sample sets and windows=None, a numpy scalar is
             returned.
@@ -7696,6 +8110,7 @@ class TreeSequence:
             windows=windows,
             mode=mode,
             span_normalise=span_normalise,
+            num_threads=num_threads,
         )
 
     # JK: commenting this out for now to get the other methods well tested.
@@ -7743,6 +8158,7 @@ class TreeSequence:
         span_normalise=True,
         polarised=False,
         proportion=True,
+        num_threads=0,
     ):
         """
         Computes genetic relatedness between (and within) pairs of
@@ -7809,6 +8225,8 @@ class TreeSequence:
             (defaults to "site").
         :param bool span_normalise: Whether to divide the result by the span of the
             window (defaults to True). Has no effect if ``proportion`` is True.
+        :param int num_threads: The number of threads to compute the windows
+            in (see :ref:`sec_stats_num_threads`; defaults to 0).
         :param bool proportion: Defaults to True.  Whether to divide the result by
             :meth:`.segregating_sites`, called with the same ``windows``,
             ``mode``, and ``span_normalise``. Note that this counts sites
@@ -7827,6 +8245,7 @@ class TreeSequence:
                 windows=windows,
                 mode=mode,
                 span_normalise=span_normalise,
+                num_threads=num_threads,
             )
         else:
             denominator = 1
@@ -7839,6 +8258,7 @@ class TreeSequence:
             windows=windows,
             mode=mode,
             span_normalise=span_normalise,
+            num_threads=num_threads,
             polarised=polarised,
         )
         with np.errstate(divide="ignore", invalid="ignore"):
@@ -7846,7 +8266,9 @@ class TreeSequence:
 
         return out
 
-    def trait_covariance(self, W, windows=None, mode="site", span_normalise=True):
+    def trait_covariance(
+        self, W, windows=None, mode="site", span_normalise=True, num_threads=0
+    ):
         """
         Computes the mean squared covariances between each of the columns of ``W``
         (the "phenotypes") and inheritance along the tree sequence.
@@ -7895,6 +8317,8 @@ class TreeSequence:
             (defaults to "site").
         :param bool span_normalise: Whether to divide the result by the span of the
             window (defaults to True).
+        :param int num_threads: The number of threads to compute the windows
+            in (see :ref:`sec_stats_num_threads`; defaults to 0).
         :return: A ndarray with shape equal to (num windows, num statistics).
             If windows=None and W is a single column, a numpy scalar is returned.
         """
@@ -7908,9 +8332,12 @@ class TreeSequence:
             W,
             mode=mode,
             span_normalise=span_normalise,
+            num_threads=num_threads,
         )
 
-    def trait_correlation(self, W, windows=None, mode="site", span_normalise=True):
+    def trait_correlation(
+        self, W, windows=None, mode="site", span_normalise=True, num_threads=0
+    ):
         """
         Computes the mean squared correlations between each of the columns of ``W``
         (the "phenotypes") and inheritance along the tree sequence.
@@ -7961,6 +8388,8 @@ class TreeSequence:
             (defaults to "site").
         :param bool span_normalise: Whether to divide the result by the span of the
             window (defaults to True).
+        :param int num_threads: The number of threads to compute the windows
+            in (see :ref:`sec_stats_num_threads`; defaults to 0).
         :return: A ndarray with shape equal to (num windows, num statistics).
             If windows=None and W is a single column, a numpy scalar is returned.
         """
@@ -7979,6 +8408,7 @@ class TreeSequence:
             W,
             mode=mode,
             span_normalise=span_normalise,
+            num_threads=num_threads,
         )
 
     def trait_regression(self, *args, **kwargs):
@@ -7993,7 +8423,7 @@ class TreeSequence:
         return self.trait_linear_model(*args, **kwargs)
 
     def trait_linear_model(
-        self, W, Z=None, windows=None, mode="site", span_normalise=True
+        self, W, Z=None, windows=None, mode="site", span_normalise=True, num_threads=0
     ):
         """
         Finds the relationship between trait and genotype after accounting for
@@ -8048,6 +8478,8 @@ class TreeSequence:
             (defaults to "site").
         :param bool span_normalise: Whether to divide the result by the span of the
             window (defaults to True).
+        :param int num_threads: The number of threads to compute the windows
+            in (see :ref:`sec_stats_num_threads`; defaults to 0).
         :return: A ndarray with shape equal to (num windows, num statistics).
             If windows=None and W is a single column, a numpy scalar is returned.
         """
@@ -8075,10 +8507,16 @@ class TreeSequence:
             Z,
             mode=mode,
             span_normalise=span_normalise,
+            num_threads=num_threads,
         )
 
     def segregating_sites(
-        self, sample_sets=None, windows=None, mode="site", span_normalise=True
+        self,
+        sample_sets=None,
+        windows=None,
+        mode="site",
+        span_normalise=True,
+        num_threads=0,
     ):
         """
         Computes the density of segregating sites for each of the sets of nodes
@@ -8116,6 +8554,8 @@ class TreeSequence:
             (defaults to "site").
         :param bool span_normalise: Whether to divide the result by the span of the
             window (defaults to True).
+        :param int num_threads: The number of threads to compute the windows
+            in (see :ref:`sec_stats_num_threads`; defaults to 0).
         :return: A ndarray with shape equal to (num windows, num statistics).
             If there is one sample set and windows=None, a numpy scalar is returned.
         """
@@ -8125,6 +8565,7 @@ class TreeSequence:
             windows=windows,
             mode=mode,
             span_normalise=span_normalise,
+            num_threads=num_threads,
         )
 
     def allele_frequency_spectrum(
@@ -8134,6 +8575,7 @@ class TreeSequence:
         mode="site",
         span_normalise=True,
         polarised=False,
+        num_threads=0,
     ):
         """
         Computes the allele frequency spectrum (AFS) in windows across the genome for
@@ -8218,6 +8660,8 @@ class TreeSequence:
             (defaults to "site").
         :param bool span_normalise: Whether to divide the result by the span of the
             window (defaults to True).
+        :param int num_threads: The number of threads to compute the windows
+            in (see :ref:`sec_stats_num_threads`; defaults to 0).
         :return: A (k + 1) dimensional numpy array, where k is the number of sample
             sets specified.
             If there is one sample set and windows=None, a 1 dimensional array is
@@ -8231,10 +8675,11 @@ class TreeSequence:
             windows=windows,
             mode=mode,
             span_normalise=span_normalise,
+            num_threads=num_threads,
             polarised=polarised,
         )
 
-    def Tajimas_D(self, sample_sets=None, windows=None, mode="site"):
+    def Tajimas_D(self, sample_sets=None, windows=None, mode="site", num_threads=0):
         """
         Computes Tajima's D of sets of nodes from ``sample_sets`` in windows.
         Please see the :ref:`one-way statistics <sec_stats_sample_sets_one_way>`
@@ -8270,6 +8715,8 @@ class TreeSequence:
             to compute the statistic in.
         :param str mode: A string giving the "type" of the statistic to be computed
             (defaults to "site").
+        :param int num_threads: The number of threads to compute the windows
+            in (see :ref:`sec_stats_num_threads`; defaults to 0).
         :return: A ndarray with shape equal to (num windows, num statistics).
             If there is one sample set and windows=None, a numpy scalar is returned.
         """
@@ -8291,11 +8738,22 @@ class TreeSequence:
             return D
 
         return self.__one_way_sample_set_stat(
-            tjd_func, sample_sets, windows=windows, mode=mode, span_normalise=False
+            tjd_func,
+            sample_sets,
+            windows=windows,
+            mode=mode,
+            span_normalise=False,
+            num_threads=num_threads,
         )
 
     def Fst(
-        self, sample_sets, indexes=None, windows=None, mode="site", span_normalise=True
+        self,
+        sample_sets,
+        indexes=None,
+        windows=None,
+        mode="site",
+        span_normalise=True,
+        num_threads=0,
     ):
         """
         Computes "windowed" Fst between pairs of sets of nodes from ``sample_sets``.
@@ -8331,6 +8789,8 @@ class TreeSequence:
             (defaults to "site").
         :param bool span_normalise: Whether to divide the result by the span of the
             window (defaults to True).
+        :param int num_threads: The number of threads to compute the windows
+            in (see :ref:`sec_stats_num_threads`; defaults to 0).
         :return: A ndarray with shape equal to (num windows, num statistics).
             If there is one pair of sample sets and windows=None, a numpy scalar is
             returned.
@@ -8378,10 +8838,17 @@ class TreeSequence:
             windows=windows,
             mode=mode,
             span_normalise=span_normalise,
+            num_threads=num_threads,
         )
 
     def Y3(
-        self, sample_sets, indexes=None, windows=None, mode="site", span_normalise=True
+        self,
+        sample_sets,
+        indexes=None,
+        windows=None,
+        mode="site",
+        span_normalise=True,
+        num_threads=0,
     ):
         """
         Computes the 'Y' statistic between triples of sets of nodes from ``sample_sets``.
@@ -8419,6 +8886,8 @@ class TreeSequence:
             (defaults to "site").
         :param bool span_normalise: Whether to divide the result by the span of the
             window (defaults to True).
+        :param int num_threads: The number of threads to compute the windows
+            in (see :ref:`sec_stats_num_threads`; defaults to 0).
         :return: A ndarray with shape equal to (num windows, num statistics).
             If there is one triple of sample sets and windows=None, a numpy scalar is
             returned.
@@ -8431,10 +8900,17 @@ class TreeSequence:
             windows=windows,
             mode=mode,
             span_normalise=span_normalise,
+            num_threads=num_threads,
         )
 
     def Y2(
-        self, sample_sets, indexes=None, windows=None, mode="site", span_normalise=True
+        self,
+        sample_sets,
+        indexes=None,
+        windows=None,
+        mode="site",
+        span_normalise=True,
+        num_threads=0,
     ):
         """
         Computes the 'Y2' statistic between pairs of sets of nodes from ``sample_sets``.
@@ -8463,6 +8939,8 @@ class TreeSequence:
             (defaults to "site").
         :param bool span_normalise: Whether to divide the result by the span of the
             window (defaults to True).
+        :param int num_threads: The number of threads to compute the windows
+            in (see :ref:`sec_stats_num_threads`; defaults to 0).
         :return: A ndarray with shape equal to (num windows, num statistics).
             If there is one pair of sample sets and windows=None, a numpy scalar is
             returned.
@@ -8475,9 +8953,12 @@ class TreeSequence:
             windows=windows,
             mode=mode,
             span_normalise=span_normalise,
+            num_threads=num_threads,
         )
 
-    def Y1(self, sample_sets, windows=None, mode="site", span_normalise=True):
+    def Y1(
+        self, sample_sets, windows=None, mode="site", span_normalise=True, num_threads=0
+    ):
         """
         Computes the 'Y1' statistic within each of the sets of nodes given by
         ``sample_sets``.
@@ -8503,6 +8984,8 @@ class TreeSequence:
             (defaults to "site").
         :param bool span_normalise: Whether to divide the result by the span of the
             window (defaults to True).
+        :param int num_threads: The number of threads to compute the windows
+            in (see :ref:`sec_stats_num_threads`; defaults to 0).
         :return: A ndarray with shape equal to (num windows, num statistics).
             If there is one sample set and windows=None, a numpy scalar is returned.
         """
@@ -8512,10 +8995,17 @@ class TreeSequence:
             windows=windows,
             mode=mode,
             span_normalise=span_normalise,
+            num_threads=num_threads,
         )
 
     def f4(
-        self, sample_sets, indexes=None, windows=None, mode="site", span_normalise=True
+        self,
+        sample_sets,
+        indexes=None,
+        windows=None,
+        mode="site",
+        span_normalise=True,
+        num_threads=0,
     ):
         """
         Computes Patterson's f4 statistic between four groups of nodes from
@@ -8559,6 +9049,8 @@ class TreeSequence:
             (defaults to "site").
         :param bool span_normalise: Whether to divide the result by the span of the
             window (defaults to True).
+        :param int num_threads: The number of threads to compute the windows
+            in (see :ref:`sec_stats_num_threads`; defaults to 0).
         :return: A ndarray with shape equal to (num windows, num statistics).
             If there are four sample sets and windows=None, a numpy scalar is returned.
         """
@@ -8570,10 +9062,17 @@ class TreeSequence:
             windows=windows,
             mode=mode,
             span_normalise=span_normalise,
+            num_threads=num_threads,
         )
 
     def f3(
-        self, sample_sets, indexes=None, windows=None, mode="site", span_normalise=True
+        self,
+        sample_sets,
+        indexes=None,
+        windows=None,
+        mode="site",
+        span_normalise=True,
+        num_threads=0,
     ):
         r"""
         Computes Patterson's f3 statistic between three groups of nodes from
@@ -8613,6 +9112,8 @@ class TreeSequence:
             (defaults to "site").
         :param bool span_normalise: Whether to divide the result by the span of the
             window (defaults to True).
+        :param int num_threads: The number of threads to compute the windows
+            in (see :ref:`sec_stats_num_threads`; defaults to 0).
         :return: A ndarray with shape equal to (num windows, num statistics).
             If there are three sample sets and windows=None, a numpy scalar is returned.
         """
@@ -8624,10 +9125,17 @@ class TreeSequence:
             windows=windows,
             mode=mode,
             span_normalise=span_normalise,
+            num_threads=num_threads,
         )
 
     def f2(
-        self, sample_sets, indexes=None, windows=None, mode="site", span_normalise=True
+        self,
+        sample_sets,
+        indexes=None,
+        windows=None,
+        mode="site",
+        span_normalise=True,
+        num_threads=0,
     ):
         """
         Computes Patterson's f2 statistic between two groups of nodes from
@@ -8658,6 +9166,8 @@ class TreeSequence:
             (defaults to "site").
         :param bool span_normalise: Whether to divide the result by the span of the
             window (defaults to True).
+        :param int num_threads: The number of threads to compute the windows
+            in (see :ref:`sec_stats_num_threads`; defaults to 0).
         :return: A ndarray with shape equal to (num windows, num statistics).
             If there is one pair of sample sets and windows=None, a numpy scalar is
             returned.
@@ -8670,6 +9180,7 @@ class TreeSequence:
             windows=windows,
             mode=mode,
             span_normalise=span_normalise,
+            num_threads=num_threads,
         )
 
     def mean_descendants(self, sample_sets):
@@ -8694,6 +9205,46 @@ class TreeSequence:
         """
         return self._ll_tree_sequence.mean_descendants(sample_sets)
 
+    def tmrca_matrix(self, nodes=None, *, windows=None, span_normalise=True):
+        """
+        Returns the matrix of times to the most recent common ancestor of each
+        pair of the specified nodes, averaged along the genome. The value for
+        nodes ``u`` and ``v`` is the sum over all trees of the span of the
+        tree times :meth:`Tree.tmrca` of ``u`` and ``v`` in the tree, divided
+        by the length of the genome (or window) if ``span_normalise`` is True.
+        If ``u`` and ``v`` do not share a common ancestor in any of the trees
+        the value is NaN. The diagonal holds the times of the nodes
+        themselves.
+
+        This is computed in C without creating any :class:`Tree` objects, using
+        an index of each tree that answers each most recent common ancestor
+        query in constant time. The time taken is proportional to the number of
+        trees multiplied by the square of the number of nodes.
+
+        :param list nodes: The nodes for which to compute the matrix. Defaults
+            to all samples.
+        :param list windows: An increasing list of breakpoints between the
+            windows to compute the matrix in (see :ref:`sec_stats_windows`).
+        :param bool span_normalise: Whether to divide the result by the span of
+            the window (defaults to True).
+        :return: A ``len(nodes)`` by ``len(nodes)`` numpy array of pairwise
+            times, with an additional first dimension indexing the windows if
+            ``windows`` is specified.
+        :rtype: numpy.ndarray
+        """
+        if nodes is None:
+            nodes = self.samples()
+        strip_dim = windows is None
+        windows = self.parse_windows(windows)
+        result = self._ll_tree_sequence.tmrca_matrix(
+            util.safe_np_int_cast(nodes, np.int32),
+            windows,
+            span_normalise=span_normalise,
+        )
+        if strip_dim:
+            result = result[0]
+        return result
+
     def genealogical_nearest_neighbours(self, focal, sample_sets, num_threads=0):
         """
         Return the genealogical nearest neighbours (GNN) proportions for the given
@@ -8865,6 +9416,73 @@ class TreeSequence:
             store_pairs=store_pairs,
         )
 
+    def ibd_segments_stream(
+        self,
+        sink,
+        *,
+        within=None,
+        between=None,
+        max_time=None,
+        min_span=None,
+        num_partitions=None,
+        num_threads=0,
+        buffer_size=None,
+    ):
+        """
+        Finds the same IBD segments as :meth:`.ibd_segments`, but rather than
+        storing them passes them in batches to the specified ``sink`` function
+        as they are found, so that the memory required does not grow with the
+        number of segments. Each call to ``sink`` receives a single
+        :class:`.IdentitySegmentArrays` instance holding up to ``buffer_size``
+        segments as numpy arrays, which may be written to disk, summarised or
+        otherwise processed before the next batch is found. Each segment is
+        passed to the sink exactly once, but no guarantee is made about the
+        order in which segments or sample pairs are reported. Calls to
+        ``sink`` are never made concurrently, even when several threads are
+        used. If ``sink`` raises an exception, the search is stopped and the
+        exception is raised by this method.
+
+        The samples in ``within`` (or in each sample set in ``between``) are
+        split into ``num_partitions`` contiguous chunks, and the segments for
+        pairs within each chunk and between each pair of chunks are found
+        separately. Smaller chunks bound the working memory of each search,
+        and the searches can be distributed over ``num_threads`` threads.
+        Note that the total amount of work increases with the number of
+        partitions, since the genealogy is traversed once for each chunk or
+        pair of chunks.
+
+        .. code-block:: python
+
+            with open("ibd.txt", "w") as f:
+
+                def sink(segs):
+                    np.savetxt(f, np.column_stack(segs))
+
+                ts.ibd_segments_stream(sink, max_time=100, num_partitions=4)
+
+        :param callable sink: The function called with each batch of segments.
+        :param list within: As for the :meth:`.ibd_segments` method.
+        :param list[list] between: As for the :meth:`.ibd_segments` method.
+        :param float max_time: As for the :meth:`.ibd_segments` method.
+        :param float min_span: As for the :meth:`.ibd_segments` method.
+        :param int num_partitions: The number of chunks each set of samples is
+            split into. (Default=1)
+        :param int num_threads: The number of threads to use. If this is <= 1
+            the searches are carried out sequentially. (Default=0)
+        :param int buffer_size: The maximum number of segments passed to each
+            call of ``sink``. (Default=65536)
+        """
+        self.tables.ibd_segments_stream(
+            sink,
+            within=within,
+            between=between,
+            max_time=max_time,
+            min_span=min_span,
+            num_partitions=num_partitions,
+            num_threads=num_threads,
+            buffer_size=buffer_size,
+        )
+
     def coalescence_time_distribution(
         self,
         *,
@@ -8873,6 +9491,7 @@ class TreeSequence:
         window_breaks=None,
         blocks_per_window=None,
         span_normalise=False,
+        num_threads=0,
     ):
         # TODO docstring, not yet in API
 
@@ -8883,6 +9502,7 @@ class TreeSequence:
             window_breaks=window_breaks,
             blocks_per_window=blocks_per_window,
             span_normalise=span_normalise,
+            num_threads=num_threads,
         )
 
     ############################################
@@ -22,12 +22,17 @@
 """
 Module responsible for various utility functions used in other modules.
 """
+import collections
+import concurrent.futures
+import ctypes
 import dataclasses
 import io
 import itertools
 import json
 import numbers
 import os
+import struct
+import zlib
 from typing import Union
 
 import numpy as np
@@ -779,3 +784,169 @@ def raise_known_file_format_errors(open_file, existing_exception):
             "`tszip.decompress` in Python code."
         ) from existing_exception
     raise existing_exception
+
+
+def threaded_map(func, iterable, *, num_threads=0):
+    """
+    Returns an iterator over the results of calling ``func`` on each item of
+    the specified iterable, in order. If ``num_threads`` is greater than 1,
+    the calls are distributed over a pool of that many threads, with at most
+    ``2 * num_threads`` results held in memory at any one time. This is only
+    useful if ``func`` spends much of its time with the GIL released.
+    """
+    if num_threads <= 1:
+        yield from map(func, iterable)
+        return
+    max_pending = 2 * num_threads
+    with concurrent.futures.ThreadPoolExecutor(max_workers=num_threads) as executor:
+        pending = collections.deque()
+        try:
+            for item in iterable:
+                pending.append(executor.submit(func, item))
+                if len(pending) >= max_pending:
+                    yield pending.popleft().result()
+            while len(pending) > 0:
+                yield pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+# The ctypes argument types of the general_stat_func_t and
+# general_stat_batch_func_t summary functions in the C library, which
+# both return an int.
+_GENERAL_STAT_FUNC_ARGTYPES = (
+    ctypes.c_uint64,
+    ctypes.POINTER(ctypes.c_double),
+    ctypes.c_uint64,
+    ctypes.POINTER(ctypes.c_double),
+    ctypes.c_void_p,
+)
+_GENERAL_STAT_BATCH_FUNC_ARGTYPES = (ctypes.c_uint64,) + _GENERAL_STAT_FUNC_ARGTYPES
+GENERAL_STAT_FUNC = ctypes.CFUNCTYPE(ctypes.c_int, *_GENERAL_STAT_FUNC_ARGTYPES)
+GENERAL_STAT_BATCH_FUNC = ctypes.CFUNCTYPE(
+    ctypes.c_int, *_GENERAL_STAT_BATCH_FUNC_ARGTYPES
+)
+
+
+def compiled_function_address(func, *, vectorised=False):
+    """
+    Returns the address of the specified compiled summary function, or None
+    if it is not a compiled function. Compiled functions are ``ctypes``
+    function pointers, or objects that provide one as their ``ctypes``
+    attribute (such as numba ``cfunc`` objects), and must have the signature
+    of :data:`GENERAL_STAT_FUNC` (or :data:`GENERAL_STAT_BATCH_FUNC` if
+    ``vectorised`` is True). Integer addresses are not accepted, but can be
+    wrapped as a function pointer with ``GENERAL_STAT_FUNC(address)``.
+    """
+    cfunc = getattr(func, "ctypes", func)
+    argtypes = getattr(cfunc, "argtypes", None)
+    restype = getattr(cfunc, "restype", None)
+    if argtypes is None or restype is None:
+        return None
+    if vectorised:
+        name, expected_argtypes = "BATCH_FUNC", _GENERAL_STAT_BATCH_FUNC_ARGTYPES
+    else:
+        name, expected_argtypes = "FUNC", _GENERAL_STAT_FUNC_ARGTYPES
+    if tuple(argtypes) != expected_argtypes or restype is not ctypes.c_int:
+        raise TypeError(
+            "Compiled summary function must have the signature of "
+            f"tskit.util.GENERAL_STAT_{name}"
+        )
+    try:
+        return ctypes.cast(cfunc, ctypes.c_void_p).value
+    except ctypes.ArgumentError:
+        raise TypeError("Compiled summary function must be a ctypes function pointer")
+
+
+def compiled_summary_func(address, output_dim, *, vectorised=False):
+    """
+    Returns a Python function that calls the compiled general stat summary
+    function at the specified address, for use when checking the function's
+    properties.
+    """
+    c_double_p = ctypes.POINTER(ctypes.c_double)
+
+    def check(ret):
+        if ret != 0:
+            raise ValueError(f"Compiled summary function returned error {ret}")
+
+    if vectorised:
+        batch_func = GENERAL_STAT_BATCH_FUNC(address)
+
+        def f(X):
+            X = np.ascontiguousarray(X, dtype=np.float64)
+            Y = np.zeros((X.shape[0], output_dim))
+            check(
+                batch_func(
+                    X.shape[1],
+                    X.shape[0],
+                    X.ctypes.data_as(c_double_p),
+                    output_dim,
+                    Y.ctypes.data_as(c_double_p),
+                    None,
+                )
+            )
+            return Y
+
+    else:
+        func = GENERAL_STAT_FUNC(address)
+
+        def f(x):
+            x = np.ascontiguousarray(x, dtype=np.float64)
+            y = np.zeros(output_dim)
+            check(
+                func(
+                    x.shape[0],
+                    x.ctypes.data_as(c_double_p),
+                    output_dim,
+                    y.ctypes.data_as(c_double_p),
+                    None,
+                )
+            )
+            return y
+
+    return f
+
+
+# The maximum amount of uncompressed data stored in each BGZF block. This is
+# the value used by htslib, chosen so that an incompressible block still fits
+# within the 64KiB limit.
+BGZF_BLOCK_SIZE = 0xFF00
+
+# The empty block that marks the end of a BGZF file.
+BGZF_EOF = bytes.fromhex("1f8b08040000000000ff0600424302001b0003000000000000000000")
+
+
+def bgzf_compress(data, compresslevel=6):
+    """
+    Returns the specified bytes compressed as a sequence of complete
+    `BGZF <https://samtools.github.io/hts-specs/SAMv1.pdf>`__ blocks. The
+    output of multiple calls may be concatenated, followed by
+    :data:`BGZF_EOF`, to produce a valid BGZF (and therefore gzip) file
+    which can be indexed by tools such as ``tabix``.
+    """
+    blocks = []
+    for offset in range(0, len(data), BGZF_BLOCK_SIZE):
+        chunk = data[offset : offset + BGZF_BLOCK_SIZE]
+        compressor = zlib.compressobj(compresslevel, zlib.DEFLATED, -15)
+        cdata = compressor.compress(chunk) + compressor.flush()
+        # The header is 18 bytes and the footer 8; BSIZE is the total minus 1.
+        header = struct.pack(
+            "<4BI2BH2BHH",
+            0x1F,
+            0x8B,
+            8,
+            4,
+            0,
+            0,
+            0xFF,
+            6,
+            ord("B"),
+            ord("C"),
+            2,
+            len(cdata) + 25,
+        )
+        footer = struct.pack("<II", zlib.crc32(chunk), len(chunk))
+        blocks.extend((header, cdata, footer))
+    return b"".join(blocks)
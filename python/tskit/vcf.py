@@ -23,10 +23,20 @@
 """
 Convert tree sequences to VCF.
 """
+import functools
+import io
+import itertools
+import threading
+
 import numpy as np
 
 import tskit
 from . import provenance
+from . import util
+
+# The approximate number of bytes of VCF text that we generate in each block
+# before writing to the output.
+VCF_BLOCK_BYTES = 4 * 1024 * 1024
 
 
 def legacy_position_transform(positions):
@@ -63,12 +73,18 @@ class VcfWriter:
         site_mask,
         sample_mask,
         isolated_as_missing,
+        num_threads=0,
+        bgzf=False,
     ):
         self.tree_sequence = tree_sequence
         self.contig_id = contig_id
         self.isolated_as_missing = isolated_as_missing
+        self.num_threads = num_threads
+        self.bgzf = bgzf
 
         self.__make_sample_mapping(ploidy, individuals)
+        self.ploidies = np.array(self.individual_ploidies, dtype=np.int32)
+        self.num_samples = int(np.sum(self.ploidies))
         if individual_names is None:
             individual_names = [f"tsk_{j}" for j in range(self.num_individuals)]
         self.individual_names = individual_names
@@ -106,10 +122,8 @@ class VcfWriter:
             raise ValueError("Site mask must be 1D a boolean array of length num_sites")
 
         self.sample_mask = sample_mask
-        if sample_mask is not None:
-            if not callable(sample_mask):
-                sample_mask = np.array(sample_mask, dtype=bool)
-                self.sample_mask = lambda _: sample_mask
+        if sample_mask is not None and not callable(sample_mask):
+            self.sample_mask = np.array(sample_mask, dtype=bool)
 
     def __make_sample_mapping(self, ploidy, individuals):
         """
@@ -127,6 +141,10 @@ class VcfWriter:
             )
 
         if individuals is None:
+            if ts.num_samples == 0:
+                raise ValueError(
+                    "Cannot write a VCF for a tree sequence with no samples"
+                )
             # Find all sample nodes that reference individuals
             individuals = np.unique(ts.nodes_individual[ts.samples()])
             if len(individuals) == 1 and individuals[0] == tskit.NULL:
@@ -146,22 +164,36 @@ class VcfWriter:
                 raise ValueError("List of sample individuals empty")
 
         if individuals is not None:
-            self.samples = []
-            # FIXME this could probably be done more efficiently.
-            for i in individuals:
-                if i < 0 or i >= self.tree_sequence.num_individuals:
-                    raise ValueError("Invalid individual IDs provided.")
-                ind = self.tree_sequence.individual(i)
-                if len(ind.nodes) == 0:
-                    raise ValueError(f"Individual {i} not associated with a node")
-                is_sample = {ts.node(u).is_sample() for u in ind.nodes}
-                if len(is_sample) != 1:
-                    raise ValueError(
-                        f"Individual {ind.id} has nodes that are sample and "
-                        "non-samples"
-                    )
-                self.samples.extend(ind.nodes)
-                self.individual_ploidies.append(len(ind.nodes))
+            if np.any((individuals < 0) | (individuals >= ts.num_individuals)):
+                raise ValueError("Invalid individual IDs provided.")
+            # Group the nodes by individual, preserving node ID order within
+            # each individual as for Individual.nodes.
+            nodes_individual = ts.nodes_individual
+            nodes = np.flatnonzero(nodes_individual != tskit.NULL)
+            nodes = nodes[np.argsort(nodes_individual[nodes], kind="stable")]
+            counts = np.bincount(nodes_individual[nodes], minlength=ts.num_individuals)
+            offsets = np.concatenate(([0], np.cumsum(counts)))
+            ploidies = counts[individuals]
+            no_nodes = np.flatnonzero(ploidies == 0)
+            if len(no_nodes) > 0:
+                raise ValueError(
+                    f"Individual {individuals[no_nodes[0]]} not associated with a node"
+                )
+            first = np.cumsum(ploidies) - ploidies
+            index = np.repeat(offsets[individuals] - first, ploidies)
+            samples = nodes[index + np.arange(np.sum(ploidies))]
+            is_sample = (ts.nodes_flags[samples] & tskit.NODE_IS_SAMPLE) != 0
+            num_sample_nodes = np.add.reduceat(is_sample.astype(int), first)
+            mixed = np.flatnonzero(
+                (num_sample_nodes > 0) & (num_sample_nodes < ploidies)
+            )
+            if len(mixed) > 0:
+                raise ValueError(
+                    f"Individual {individuals[mixed[0]]} has nodes that are sample "
+                    "and non-samples"
+                )
+            self.samples = samples.astype(np.int32)
+            self.individual_ploidies = ploidies
         else:
             if ploidy is None:
                 ploidy = 1
@@ -201,71 +233,96 @@ class VcfWriter:
         )
 
     def write(self, output):
-        self.__write_header(output)
+        header = io.StringIO()
+        self.__write_header(header)
 
-        # Build the array for hold the text genotype VCF data and the indexes into
-        # this array for when we're updating it.
-        gt_array = []
-        indexes = []
-        for ploidy in self.individual_ploidies:
-            for _ in range(ploidy):
-                indexes.append(len(gt_array))
-                # First element here is a placeholder that we'll write the actual
-                # genotypes into when for each variant.
-                gt_array.extend([0, ord("|")])
-            gt_array[-1] = ord("\t")
-        gt_array[-1] = ord("\n")
-        gt_array = np.array(gt_array, dtype=np.int8)
-        # TODO Unclear here whether using int64 or int32 will be faster for this index
-        # array. Test it out.
-        indexes = np.array(indexes, dtype=int)
+        # Genotypes are decoded and formatted as text in C, a block of sites
+        # at a time, so that the per-site overhead is kept to a minimum.
+        # The block size is chosen so that each chunk of output is a few MiB.
+        # Blocks are contiguous genomic slices, and with multiple workers each
+        # thread seeks its own decoder to the start of the blocks it is given,
+        # while the output is written in order. The per-call state is passed
+        # to the workers rather than stored on the writer, so that write can
+        # be called more than once. A callable sample mask may not be safe to
+        # call concurrently, so in this case all sites are processed in the
+        # calling thread.
+        site_ids = np.flatnonzero(np.logical_not(self.site_mask)).astype(np.int32)
+        fixed_sample_mask = None
+        num_threads = self.num_threads
+        if callable(self.sample_mask):
+            num_threads = 0
+        elif self.sample_mask is not None and len(site_ids) > 0:
+            fixed_sample_mask = self.__check_sample_mask(
+                self.sample_mask, self.num_samples
+            )
+        block_size = max(1, VCF_BLOCK_BYTES // (2 * self.num_samples + 64))
+        blocks = (
+            site_ids[start : start + block_size]
+            for start in range(0, len(site_ids), block_size)
+        )
+        encode_block = functools.partial(
+            self.__encode_block, threading.local(), fixed_sample_mask
+        )
+        chunks = itertools.chain(
+            [self.__finalise_chunk(header.getvalue().encode())],
+            util.threaded_map(encode_block, blocks, num_threads=num_threads),
+        )
+        if self.bgzf:
+            for chunk in chunks:
+                output.write(chunk)
+            output.write(util.BGZF_EOF)
+        else:
+            for chunk in chunks:
+                output.write(chunk.decode())
 
-        for variant in self.tree_sequence.variants(
-            samples=self.samples, isolated_as_missing=self.isolated_as_missing
-        ):
-            site_id = variant.site.id
-            # We check the mask before we do any checks so we can use this as a
-            # way of skipping problematic sites.
-            if self.site_mask[site_id]:
-                continue
+    def __finalise_chunk(self, chunk):
+        if self.bgzf:
+            chunk = util.bgzf_compress(chunk)
+        return chunk
 
-            if variant.num_alleles > 9:
-                raise ValueError(
-                    "More than 9 alleles not currently supported. Please open an issue "
-                    "on GitHub if this limitation affects you."
+    def __encode_block(self, thread_local, fixed_sample_mask, site_ids):
+        variant = getattr(thread_local, "variant", None)
+        if variant is None:
+            variant = tskit.Variant(
+                self.tree_sequence,
+                samples=self.samples,
+                isolated_as_missing=self.isolated_as_missing,
+            )
+            thread_local.variant = variant
+        encode = variant._ll_variant.encode_vcf
+        positions = self.transformed_positions[site_ids]
+        if callable(self.sample_mask):
+            # The mask can depend on the variant, so we must visit sites one
+            # at a time. Encoding does not re-decode the current site.
+            records = []
+            for j, site_id in enumerate(site_ids):
+                variant.decode(site_id)
+                sample_mask = self.__check_sample_mask(
+                    self.sample_mask(variant), self.num_samples
                 )
-            pos = self.transformed_positions[variant.index]
-            ref = variant.alleles[0]
-            alt = "."
-            if variant.num_alleles > 1:
-                alt = ",".join(variant.alleles[1 : variant.num_alleles])
-            print(
+                records.append(
+                    encode(
+                        site_ids[j : j + 1],
+                        positions[j : j + 1],
+                        self.contig_id,
+                        self.ploidies,
+                        sample_mask=sample_mask,
+                    )
+                )
+            records = b"".join(records)
+        else:
+            records = encode(
+                site_ids,
+                positions,
                 self.contig_id,
-                pos,
-                site_id,
-                ref,
-                alt,
-                ".",
-                "PASS",
-                ".",
-                "GT",
-                sep="\t",
-                end="\t",
-                file=output,
+                self.ploidies,
+                sample_mask=fixed_sample_mask,
             )
-            genotypes = variant.genotypes
-            gt_array[indexes] = genotypes + ord("0")
-            if self.sample_mask is not None:
-                genotypes = genotypes.copy()
-                sample_mask = np.array(self.sample_mask(variant), dtype=bool)
-                if sample_mask.shape != genotypes.shape:
-                    raise ValueError(
-                        "Sample mask must be a numpy array of size num_samples"
-                    )
-                genotypes[sample_mask] = -1
-            if self.sample_mask is not None or variant.has_missing_data:
-                missing = genotypes == -1
-                gt_array[indexes[missing]] = ord(".")
-            g_bytes = memoryview(gt_array).tobytes()
-            g_str = g_bytes.decode()
-            print(g_str, end="", file=output)
+        return self.__finalise_chunk(records)
+
+    @staticmethod
+    def __check_sample_mask(sample_mask, num_samples):
+        sample_mask = np.array(sample_mask, dtype=bool)
+        if sample_mask.shape != (num_samples,):
+            raise ValueError("Sample mask must be a numpy array of size num_samples")
+        return sample_mask